@@ -0,0 +1,53 @@
+"""create cc_proveedor_saldos (saldo mantenido por proveedor/empresa/moneda)
+
+Revision ID: 20261017_cc_proveedor_saldos
+Revises: 20261017_sync_job_runs
+Create Date: 2026-10-17
+
+Projection of cc_proveedor_movimientos kept up to date by
+cc_proveedor_service.insertar_mov in the same transaction as each movement.
+Backfilled here from the ledger with the same signed-amount formula.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_cc_proveedor_saldos"
+down_revision = "20261017_sync_job_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cc_proveedor_saldos",
+        sa.Column("proveedor_id", sa.Integer(), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), nullable=False),
+        sa.Column("moneda", sa.String(length=3), nullable=False),
+        sa.Column("saldo", sa.Numeric(precision=18, scale=2), nullable=False),
+        sa.Column("movimientos", sa.Integer(), nullable=False),
+        sa.Column("ultimo_movimiento_id", sa.BigInteger(), nullable=True),
+        sa.Column("actualizado_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["proveedor_id"], ["proveedores.id"], ondelete="RESTRICT"),
+        sa.ForeignKeyConstraint(["empresa_id"], ["empresas.id"], ondelete="RESTRICT"),
+        sa.PrimaryKeyConstraint("proveedor_id", "empresa_id", "moneda"),
+    )
+    op.execute(
+        """
+        INSERT INTO cc_proveedor_saldos (proveedor_id, empresa_id, moneda, saldo, movimientos, ultimo_movimiento_id)
+        SELECT proveedor_id, empresa_id, moneda,
+               SUM(CASE tipo WHEN 'debe' THEN monto
+                             WHEN 'haber' THEN -monto
+                             WHEN 'ajuste' THEN signo_ajuste * monto
+                             ELSE 0 END),
+               COUNT(*),
+               MAX(id)
+        FROM cc_proveedor_movimientos
+        GROUP BY proveedor_id, empresa_id, moneda
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("cc_proveedor_saldos")
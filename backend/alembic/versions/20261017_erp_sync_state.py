@@ -0,0 +1,38 @@
+"""create erp_sync_state (watermarks of the declarative ERP sync engine)
+
+Revision ID: 20261017_erp_sync_state
+Revises: 20261017_pricing_snapshots
+Create Date: 2026-10-17
+
+One row per synced table: last watermark reached plus status of the last run.
+Written by app.services.erp_sync_engine in the same transaction as each merged
+batch.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_erp_sync_state"
+down_revision = "20261017_pricing_snapshots"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "erp_sync_state",
+        sa.Column("tabla", sa.String(length=100), nullable=False),
+        sa.Column("watermark", sa.String(length=100), nullable=True),
+        sa.Column("modo", sa.String(length=20), nullable=True),
+        sa.Column("estado", sa.String(length=20), nullable=True),
+        sa.Column("filas", sa.Integer(), nullable=True),
+        sa.Column("duracion_s", sa.Float(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("actualizado_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.PrimaryKeyConstraint("tabla"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("erp_sync_state")
@@ -0,0 +1,47 @@
+"""create export_jobs (background Excel exports with cached artifacts)
+
+Revision ID: 20261017_export_jobs
+Revises: 20261017_cc_proveedor_saldos
+Create Date: 2026-10-17
+
+Exports run in app.services.export_jobs_service's worker pool instead of the
+request thread. The finished file lives under EXPORTS_CACHE_DIR, keyed by
+`clave` = sha256(tipo, parámetros, usuario, versión de datos).
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "20261017_export_jobs"
+down_revision = "20261017_cc_proveedor_saldos"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "export_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("tipo", sa.String(length=50), nullable=False),
+        sa.Column("parametros", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("clave", sa.String(length=64), nullable=False),
+        sa.Column("version_datos", sa.String(length=200), nullable=True),
+        sa.Column("estado", sa.String(length=20), nullable=False),
+        sa.Column("filas", sa.Integer(), nullable=False),
+        sa.Column("archivo", sa.String(length=500), nullable=True),
+        sa.Column("filename", sa.String(length=255), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("usuario_id", sa.Integer(), nullable=False),
+        sa.Column("creado_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("terminado_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["usuario_id"], ["usuarios.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_export_jobs_clave_estado", "export_jobs", ["clave", "estado"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_export_jobs_clave_estado", table_name="export_jobs")
+    op.drop_table("export_jobs")
@@ -0,0 +1,56 @@
+"""create pricing_snapshots (materialised price + markup per item and pricelist)
+
+Revision ID: 20261017_pricing_snapshots
+Revises: 20261017_listing_orden_idx
+Create Date: 2026-10-17
+
+GET /productos and the product exports used to recompute commission, envío and
+markup for every row on every request (plus per-row queries in the exports).
+pricing_snapshots stores that result once per (item_id, pricelist_id); rows are
+flagged stale by app.events.pricing_snapshot_hooks when an input changes and
+refreshed by app.scripts.refrescar_pricing_snapshot.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_pricing_snapshots"
+down_revision = "20261017_listing_orden_idx"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pricing_snapshots",
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("pricelist_id", sa.Integer(), nullable=False),
+        sa.Column("precio", sa.Float(), nullable=True),
+        sa.Column("markup", sa.Float(), nullable=True),
+        sa.Column("costo_ars", sa.Float(), nullable=True),
+        sa.Column("costo_envio", sa.Float(), nullable=True),
+        sa.Column("comision_total", sa.Float(), nullable=True),
+        sa.Column("limpio", sa.Float(), nullable=True),
+        sa.Column("precio_rebate", sa.Float(), nullable=True),
+        sa.Column("markup_rebate", sa.Float(), nullable=True),
+        sa.Column("mejor_oferta_mla", sa.String(length=50), nullable=True),
+        sa.Column("mejor_oferta_precio", sa.Float(), nullable=True),
+        sa.Column("mejor_oferta_pvp", sa.Float(), nullable=True),
+        sa.Column("mejor_oferta_monto", sa.Float(), nullable=True),
+        sa.Column("mejor_oferta_porcentaje", sa.Float(), nullable=True),
+        sa.Column("mejor_oferta_fecha_hasta", sa.Date(), nullable=True),
+        sa.Column("markup_oferta", sa.Float(), nullable=True),
+        sa.Column("inputs_hash", sa.String(length=64), nullable=False),
+        sa.Column("stale", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+        sa.Column("calculado_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", "pricelist_id", name="pk_pricing_snapshots"),
+    )
+    op.create_index("ix_pricing_snapshots_pricelist_markup", "pricing_snapshots", ["pricelist_id", "markup"])
+    op.create_index("ix_pricing_snapshots_stale", "pricing_snapshots", ["stale"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_pricing_snapshots_stale", table_name="pricing_snapshots")
+    op.drop_index("ix_pricing_snapshots_pricelist_markup", table_name="pricing_snapshots")
+    op.drop_table("pricing_snapshots")
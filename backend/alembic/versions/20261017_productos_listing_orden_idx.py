@@ -0,0 +1,41 @@
+"""add indexes on productos_pricing markups used to sort GET /productos in SQL
+
+Revision ID: 20261017_listing_orden_idx
+Revises: 20260708_ml_bot_defs
+Create Date: 2026-10-17
+
+GET /productos now sorts and paginates in SQL (offset or keyset cursor) instead
+of materialising the whole catalog and sorting in Python. These indexes let the
+common sort keys (markups) be read in index order, so the cost of a page stays
+flat as the catalog grows.
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_listing_orden_idx"
+down_revision = "20260708_ml_bot_defs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_productos_pricing_markup_calculado", "productos_pricing", ["markup_calculado"], if_not_exists=True
+    )
+    op.create_index("ix_productos_pricing_markup_rebate", "productos_pricing", ["markup_rebate"], if_not_exists=True)
+    op.create_index("ix_productos_pricing_markup_oferta", "productos_pricing", ["markup_oferta"], if_not_exists=True)
+    op.create_index(
+        "ix_productos_pricing_markup_web_real", "productos_pricing", ["markup_web_real"], if_not_exists=True
+    )
+    op.create_index("ix_productos_erp_costo", "productos_erp", ["costo"], if_not_exists=True)
+    op.create_index("ix_productos_erp_stock", "productos_erp", ["stock"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_productos_erp_stock", table_name="productos_erp", if_exists=True)
+    op.drop_index("ix_productos_erp_costo", table_name="productos_erp", if_exists=True)
+    op.drop_index("ix_productos_pricing_markup_web_real", table_name="productos_pricing", if_exists=True)
+    op.drop_index("ix_productos_pricing_markup_oferta", table_name="productos_pricing", if_exists=True)
+    op.drop_index("ix_productos_pricing_markup_rebate", table_name="productos_pricing", if_exists=True)
+    op.drop_index("ix_productos_pricing_markup_calculado", table_name="productos_pricing", if_exists=True)
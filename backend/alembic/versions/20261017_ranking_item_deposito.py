@@ -0,0 +1,115 @@
+"""create ranking_item_deposito (ageing/stock rollup for the consultas ranking)
+
+Revision ID: 20261017_ranking_item_deposito
+Revises: 20261017_sale_orders_sync_hash
+Create Date: 2026-10-17
+
+One row per (item, depot) with the depot stock, plus one row per item
+(stor_id = 0) with last sale, last purchase and the combo flag. The ranking
+endpoints read it instead of aggregating tb_item_transactions per request.
+
+The upgrade backfills it from the current data (same definitions as
+app.services.ranking_rollup_service at the time of writing) and stores the
+it_transaction watermark, so the next incremental sync only applies new rows.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_ranking_item_deposito"
+down_revision = "20261017_sale_orders_sync_hash"
+branch_labels = None
+depends_on = None
+
+SD_VENTAS = "1, 4, 21, 56"
+DF_VENTA_TODOS = (
+    "1, 2, 3, 4, 5, 6, 63, 85, 86, 87, 65, 67, 68, 69, 70, 71, 72, 73, 74, 81, 103, 105, 106, 109, 111, "
+    "115, 116, 117, 118, 122, 124, 125, 126, 127, 113, 114, 129, 130, 131, 132"
+)
+ITEMS_EXCLUIDOS = "16, 460"
+PUCO_COMPRAS = 10
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ranking_item_deposito",
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("stor_id", sa.Integer(), nullable=False),
+        sa.Column("stock", sa.Integer(), nullable=True),
+        sa.Column("ultima_venta", sa.Date(), nullable=True),
+        sa.Column("ultima_compra_cd", sa.DateTime(), nullable=True),
+        sa.Column("ultima_compra_fecha", sa.Date(), nullable=True),
+        sa.Column("ultima_compra_cant", sa.Numeric(18, 4), nullable=True),
+        sa.Column("es_combo", sa.Boolean(), server_default="false", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", "stor_id", name="pk_ranking_item_deposito"),
+    )
+    op.create_index(
+        "ix_ranking_item_deposito_ultima_venta",
+        "ranking_item_deposito",
+        ["ultima_venta"],
+        postgresql_where=sa.text("stor_id = 0"),
+    )
+
+    op.execute(
+        """
+        INSERT INTO ranking_item_deposito (item_id, stor_id, stock)
+        SELECT item_id, stor_id, stock FROM stock_por_deposito WHERE stor_id <> 0
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO ranking_item_deposito (item_id, stor_id, ultima_venta)
+        SELECT tit.item_id, 0, MAX(tct.ct_date)::date
+        FROM tb_item_transactions tit
+        JOIN tb_commercial_transactions tct ON tct.ct_transaction = tit.ct_transaction
+        WHERE tct.sd_id IN ({SD_VENTAS})
+          AND tct.df_id IN ({DF_VENTA_TODOS})
+          AND tit.it_qty <> 0
+          AND tit.item_id IS NOT NULL
+          AND tit.item_id NOT IN ({ITEMS_EXCLUIDOS})
+        GROUP BY tit.item_id
+        HAVING MAX(tct.ct_date) IS NOT NULL
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO ranking_item_deposito (item_id, stor_id, ultima_compra_cd, ultima_compra_fecha, ultima_compra_cant)
+        SELECT DISTINCT ON (tit.item_id) tit.item_id, 0, tit.it_cd, tct.ct_date::date, tit.it_qty
+        FROM tb_item_transactions tit
+        JOIN tb_commercial_transactions tct ON tct.ct_transaction = tit.ct_transaction
+        WHERE tit.puco_id = {PUCO_COMPRAS}
+          AND tit.item_id IS NOT NULL
+          AND tit.it_cd IS NOT NULL
+        ORDER BY tit.item_id, tit.it_cd DESC, tit.it_transaction DESC
+        ON CONFLICT (item_id, stor_id) DO UPDATE SET
+            ultima_compra_cd = EXCLUDED.ultima_compra_cd,
+            ultima_compra_fecha = EXCLUDED.ultima_compra_fecha,
+            ultima_compra_cant = EXCLUDED.ultima_compra_cant
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO ranking_item_deposito (item_id, stor_id, es_combo)
+        SELECT DISTINCT item_id, 0, TRUE
+        FROM tb_item_association
+        WHERE iasso_qty > 0 AND item_id IS NOT NULL
+        ON CONFLICT (item_id, stor_id) DO UPDATE SET es_combo = TRUE
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO erp_sync_state (tabla, watermark, modo, estado)
+        SELECT 'ranking_item_deposito', MAX(it_transaction)::text, 'full', 'ok'
+        FROM tb_item_transactions
+        HAVING MAX(it_transaction) IS NOT NULL
+        ON CONFLICT (tabla) DO UPDATE SET watermark = EXCLUDED.watermark, modo = 'full', estado = 'ok'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM erp_sync_state WHERE tabla = 'ranking_item_deposito'")
+    op.drop_index("ix_ranking_item_deposito_ultima_venta", table_name="ranking_item_deposito")
+    op.drop_table("ranking_item_deposito")
@@ -0,0 +1,36 @@
+"""add sync_hash to the sale order tables
+
+Revision ID: 20261017_sale_orders_sync_hash
+Revises: 20261017_export_jobs
+Create Date: 2026-10-17
+
+sync_sale_orders_all stores a content hash per row and only upserts rows
+whose hash changed. NULL (existing rows) counts as changed: the first run
+after the upgrade rewrites the window once and fills the hashes.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_sale_orders_sync_hash"
+down_revision = "20261017_export_jobs"
+branch_labels = None
+depends_on = None
+
+TABLAS = (
+    "tb_sale_order_header",
+    "tb_sale_order_detail",
+    "tb_sale_order_header_history",
+    "tb_sale_order_detail_history",
+)
+
+
+def upgrade() -> None:
+    for tabla in TABLAS:
+        op.add_column(tabla, sa.Column("sync_hash", sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    for tabla in TABLAS:
+        op.drop_column(tabla, "sync_hash")
@@ -0,0 +1,45 @@
+"""create sync_job_runs (per-job results of the sync DAG scheduler)
+
+Revision ID: 20261017_sync_job_runs
+Revises: 20261017_erp_sync_state
+Create Date: 2026-10-17
+
+app.scripts.sync_all_incremental now runs its jobs in-process as a DAG with
+bounded parallelism (app.services.sync_scheduler). Each job writes one row
+here with its status, duration and row count.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_sync_job_runs"
+down_revision = "20261017_erp_sync_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_job_runs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("corrida_id", sa.String(length=36), nullable=False),
+        sa.Column("job", sa.String(length=100), nullable=False),
+        sa.Column("estado", sa.String(length=20), nullable=False),
+        sa.Column("inicio", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("fin", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("duracion_s", sa.Float(), nullable=False),
+        sa.Column("filas", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_sync_job_runs_id", "sync_job_runs", ["id"])
+    op.create_index("ix_sync_job_runs_corrida", "sync_job_runs", ["corrida_id"])
+    op.create_index("ix_sync_job_runs_job_inicio", "sync_job_runs", ["job", "inicio"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sync_job_runs_job_inicio", table_name="sync_job_runs")
+    op.drop_index("ix_sync_job_runs_corrida", table_name="sync_job_runs")
+    op.drop_index("ix_sync_job_runs_id", table_name="sync_job_runs")
+    op.drop_table("sync_job_runs")
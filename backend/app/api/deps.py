@@ -1,6 +1,6 @@
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.core.config import settings
@@ -8,6 +8,7 @@ from app.core.database import get_async_db, get_background_db
 from app.core.exceptions import api_error, ErrorCode
 from app.core.security import decode_token
 from app.models.usuario import Usuario, RolUsuario
+from app.services.identidad_service import resolver_usuario
 
 security = HTTPBearer()
 security_optional = HTTPBearer(auto_error=False)
@@ -29,14 +30,8 @@ async def get_current_user(
     if username is None:
         raise api_error(401, ErrorCode.INVALID_TOKEN, "Token inválido")
 
-    # Buscar por username (nuevo) o email (backward compatibility)
-    # Eager-load rol_obj to avoid lazy load on es_superadmin check
-    usuario = (
-        db.query(Usuario)
-        .options(joinedload(Usuario.rol_obj))
-        .filter((Usuario.username == username) | (Usuario.email == username))
-        .first()
-    )
+    # Usuario + permisos cacheados por `sub` (sin DB en hit; en miss, carga en un thread)
+    usuario = await resolver_usuario(db, username)
 
     if usuario is None:
         raise api_error(401, ErrorCode.INVALID_TOKEN, "Usuario no encontrado")
@@ -44,12 +39,6 @@ async def get_current_user(
     if not usuario.activo:
         raise api_error(401, ErrorCode.INACTIVE_USER, "Usuario inactivo")
 
-    # Pre-load permissions once so downstream checks use the cache
-    from app.services.permisos_service import PermisosService
-
-    svc = PermisosService(db)
-    usuario._permisos_cache = svc.obtener_permisos_usuario(usuario)
-
     return usuario
 
 
@@ -234,9 +223,7 @@ async def get_user_or_localhost(
             if payload:
                 username: str = payload.get("sub")
                 if username:
-                    usuario = (
-                        db.query(Usuario).filter((Usuario.username == username) | (Usuario.email == username)).first()
-                    )
+                    usuario = await resolver_usuario(db, username)
                     if usuario and usuario.activo:
                         return usuario
         return None
@@ -253,7 +240,7 @@ async def get_user_or_localhost(
     if username is None:
         raise api_error(401, ErrorCode.INVALID_TOKEN, "Token inválido")
 
-    usuario = db.query(Usuario).filter((Usuario.username == username) | (Usuario.email == username)).first()
+    usuario = await resolver_usuario(db, username)
 
     if usuario is None:
         raise api_error(401, ErrorCode.INVALID_TOKEN, "Usuario no encontrado")
@@ -24,12 +24,13 @@ from datetime import date, datetime
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, Field
 
-from app.core.database import get_db, get_async_db
+from app.core.database import get_async_session, get_db
 from app.api.deps import get_current_user
 from app.models.usuario import Usuario
 from app.models.colecta import Colecta
@@ -461,7 +462,7 @@ async def upload_etiquetas_colecta(
     colecta_id: Optional[int] = Form(None, description="Colecta destino. Si no se pasa, se resuelve por fecha/numero"),
     fecha: Optional[date] = Form(None, description="Fecha de la colecta (default hoy)"),
     numero: Optional[int] = Form(None, description="Número de colecta del día (default próximo disponible)"),
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ) -> UploadResultResponse:
     """
@@ -470,42 +471,56 @@ async def upload_etiquetas_colecta(
 
     La colecta se resuelve por colecta_id, o por (fecha, numero). Si la colecta
     no existe, se crea. Si está despachada, se rechaza la operación.
-    """
-    _check_permiso(db, current_user, "envios_flex.subir_etiquetas")
-
-    colecta = _resolver_colecta(db, colecta_id, fecha, numero)
-    batch_id = uuid.uuid4()
-
-    total = 0
-    nuevas = 0
-    duplicadas = 0
-    errores = 0
-    detalle_errores: List[str] = []
 
+    Los archivos se leen primero (await) y el parseo + inserción corre en
+    `run_sync` sobre la conexión async, sin bloquear el event loop.
+    """
+    archivos: List[tuple[str, Optional[bytes]]] = []
     for file in files:
         filename = file.filename or ""
         if not filename.endswith((".zip", ".txt")):
-            errores += 1
-            detalle_errores.append(f"{filename}: solo se aceptan .zip o .txt")
+            archivos.append((filename, None))
             continue
+        archivos.append((filename, await file.read()))
 
-        content = await file.read()
-        f_total, f_nuevas, f_dup, f_err, f_det = _procesar_archivo_zpl(
-            content, filename, db, colecta.fecha, colecta.id, batch_id
-        )
-        total += f_total
-        nuevas += f_nuevas
-        duplicadas += f_dup
-        errores += f_err
-        detalle_errores.extend(f_det)
+    def _registrar(sync_db: Session) -> tuple[int, int, int, int, List[str], uuid.UUID]:
+        _check_permiso(sync_db, current_user, "envios_flex.subir_etiquetas")
 
-    if total == 0 and errores == 0:
-        raise HTTPException(400, "No se encontraron etiquetas en los archivos")
+        colecta = _resolver_colecta(sync_db, colecta_id, fecha, numero)
+        batch_id = uuid.uuid4()
+
+        total = 0
+        nuevas = 0
+        duplicadas = 0
+        errores = 0
+        detalle_errores: List[str] = []
+
+        for filename, content in archivos:
+            if content is None:
+                errores += 1
+                detalle_errores.append(f"{filename}: solo se aceptan .zip o .txt")
+                continue
+
+            f_total, f_nuevas, f_dup, f_err, f_det = _procesar_archivo_zpl(
+                content, filename, sync_db, colecta.fecha, colecta.id, batch_id
+            )
+            total += f_total
+            nuevas += f_nuevas
+            duplicadas += f_dup
+            errores += f_err
+            detalle_errores.extend(f_det)
+
+        if total == 0 and errores == 0:
+            raise HTTPException(400, "No se encontraron etiquetas en los archivos")
+
+        return total, nuevas, duplicadas, errores, detalle_errores, batch_id
+
+    total, nuevas, duplicadas, errores, detalle_errores, batch_id = await db.run_sync(_registrar)
 
     try:
-        db.commit()
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error("Error en commit de upload colecta: %s", e)
         raise HTTPException(500, "Error guardando etiquetas")
 
@@ -3,15 +3,22 @@ Endpoint para parsear respuestas SOAP del ERP (reemplazo del worker de Cloudflar
 """
 
 from fastapi import APIRouter, HTTPException, Request, Depends
-from typing import Any
-import httpx
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Optional
+import logging
 import re
 import json
 from app.api.deps import get_user_or_localhost, get_current_user
 from app.core.config import settings
+from app.core.http_clients import get_http_client
+from app.utils.soap_stream import SoapRowParser, parse_soap_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 # Configuración del ERP desde Settings (validadas por Pydantic)
 P_USERNAME = settings.GBP_USERNAME
 P_PASSWORD = settings.GBP_PASSWORD
@@ -243,12 +250,12 @@ async def authenticate_user() -> str:
       </soap:Body>
     </soap:Envelope>"""
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            SOAP_URL,
-            content=xml_payload,
-            headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": soap_action},
-        )
+    response = await get_http_client("erp_soap").post(
+        SOAP_URL,
+        content=xml_payload,
+        headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": soap_action},
+        timeout=30.0,
+    )
 
     match = re.search(r"<AuthenticateUserResult>(.*?)</AuthenticateUserResult>", response.text)
     if not match:
@@ -259,17 +266,9 @@ async def authenticate_user() -> str:
     return token
 
 
-async def call_soap_service(soap_body: str, soap_action: str, token: str, timeout: float = 300.0) -> str:
-    """Llama al servicio SOAP del ERP.
-
-    Args:
-        soap_body: Cuerpo XML del mensaje SOAP (sin el envelope).
-        soap_action: Valor del header SOAPAction.
-        token: Token de autenticación del ERP.
-        timeout: Timeout en segundos para la llamada HTTP (default 300s).
-                 Scripts pesados como scriptAgeing necesitan valores mayores.
-    """
-    xml_payload = f"""<?xml version="1.0" encoding="utf-8"?>
+def _soap_envelope(soap_body: str, token: str) -> str:
+    """Arma el envelope SOAP autenticado alrededor de `soap_body`."""
+    return f"""<?xml version="1.0" encoding="utf-8"?>
     <soap:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
                    xmlns:xsd="http://www.w3.org/2001/XMLSchema"
                    xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
@@ -287,73 +286,156 @@ async def call_soap_service(soap_body: str, soap_action: str, token: str, timeou
       </soap:Body>
     </soap:Envelope>"""
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.post(
+
+async def call_soap_service(soap_body: str, soap_action: str, token: str, timeout: float = 300.0) -> str:
+    """Llama al servicio SOAP del ERP.
+
+    Args:
+        soap_body: Cuerpo XML del mensaje SOAP (sin el envelope).
+        soap_action: Valor del header SOAPAction.
+        token: Token de autenticación del ERP.
+        timeout: Timeout en segundos para la llamada HTTP (default 300s).
+                 Scripts pesados como scriptAgeing necesitan valores mayores.
+    """
+    response = await get_http_client("erp_soap").post(
+        SOAP_URL,
+        content=_soap_envelope(soap_body, token),
+        headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": soap_action},
+        timeout=timeout,
+    )
+
+    return response.text
+
+
+async def stream_soap_rows(soap_body: str, soap_action: str, timeout: float = 300.0) -> AsyncIterator[Any]:
+    """Llama al SOAP del ERP y va devolviendo las filas mientras baja el body.
+
+    Mismas filas que `parse_soap_response(call_soap_service(...))`, pero sin
+    cargar la respuesta completa: el body se consume con `aiter_text` y se
+    pasa a `SoapRowParser`.
+
+    "TOKEN Expired" se detecta mientras todavía no salió ninguna fila (la
+    respuesta de token vencido es un error corto); en ese caso se renueva el
+    token y se reintenta una vez. Cualquier otro status de error levanta
+    `httpx.HTTPStatusError` antes de parsear.
+    """
+    token = _token_cache.get("token")
+    if not token:
+        token = await authenticate_user()
+
+    for intento in range(2):
+        parser = SoapRowParser()
+        cabecera: Optional[list[str]] = []  # texto crudo hasta la primera fila
+        async with get_http_client("erp_soap").stream(
+            "POST",
             SOAP_URL,
-            content=xml_payload,
+            content=_soap_envelope(soap_body, token),
             headers={"Content-Type": "text/xml; charset=utf-8", "SOAPAction": soap_action},
-        )
+            timeout=timeout,
+        ) as response:
+            if response.is_error:
+                # Un 5xx no es "sin filas": se propaga. El token vencido puede
+                # venir como SOAP fault (500), así que se mira el body antes.
+                cuerpo = (await response.aread()).decode(errors="replace")
+                if intento == 0 and "TOKEN Expired" in cuerpo:
+                    token = await authenticate_user()
+                    continue
+                response.raise_for_status()
+            async for chunk in response.aiter_text():
+                if cabecera is not None:
+                    cabecera.append(chunk)
+                for fila in parser.feed(chunk):
+                    cabecera = None
+                    yield fila
+
+        if intento == 0 and cabecera is not None and "TOKEN Expired" in "".join(cabecera):
+            token = await authenticate_user()
+            continue
 
-    return response.text
+        for fila in parser.close():
+            yield fila
+        return
 
 
-def parse_soap_response(xml_content: str) -> Any:
-    """Parsea la respuesta SOAP y extrae los datos"""
-    # Buscar el tag Result
-    match = re.search(r"<\w*:?\s*\w+Result[^>]*>([\s\S]*?)</\w*:?\s*\w+Result>", xml_content)
-    if not match:
-        return [{"error": "No se encontró el tag result"}]
-
-    # Decodificar entidades HTML
-    inner_xml = match.group(1)
-    inner_xml = inner_xml.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
-    inner_xml = inner_xml.replace("&quot;", '"').replace("&apos;", "'")
-
-    # Remover CDATA
-    inner_xml = re.sub(r"<!\[CDATA\[(.*?)\]\]>", r"\1", inner_xml, flags=re.DOTALL)
-
-    # Buscar tablas
-    tables = re.findall(r"<Table[\s\S]*?</Table>", inner_xml)
-
-    if tables:
-        rows = []
-        for table_xml in tables:
-            row = {}
-            # Extraer tags
-            tag_matches = re.findall(r"<([^>/\s]+)>([^<]*)</\1>", table_xml)
-            for tag_name, tag_value in tag_matches:
-                value = tag_value.strip()
-
-                # Intentar parsear JSON
-                if value and len(value) > 1:
-                    first, last = value[0], value[-1]
-                    if (first == "{" and last == "}") or (first == "[" and last == "]"):
-                        try:
-                            value = json.loads(value)
-                        except (json.JSONDecodeError, ValueError):
-                            pass
-
-                row[tag_name] = value
-
-            rows.append(row)
-
-        # Si es una sola fila con un solo campo que es un array, retornar el array
-        if len(rows) == 1 and len(rows[0]) == 1:
-            value = list(rows[0].values())[0]
-            if isinstance(value, list):
-                return value
-
-        return rows
+def _construir_operacion(body: dict) -> tuple[str, str, float]:
+    """Arma (soap_body, soap_action, timeout) según intExpgr_id / strScriptLabel / opName."""
+    intExpgr_id = body.get("intExpgr_id")
+    strScriptLabel = body.get("strScriptLabel")
+    opName = body.get("opName")
+
+    soap_timeout: float = 300.0
+
+    # Construir SOAP body según tipo de operación
+    if intExpgr_id:
+        conf = OPERATION_CONFIG["wsExportDataById"]
+        soap_action = conf["soapAction"]
+        soap_body = conf["template"].format(intExpgr_id=intExpgr_id)
+
+    elif strScriptLabel:
+        allowed_params = SCRIPT_CONFIG.get(strScriptLabel, [])
+        params = {k: body[k] for k in allowed_params if k in body}
+        json_params = json.dumps(params)
+
+        conf = OPERATION_CONFIG["wsGBPScriptExecute4Dataset"]
+        soap_action = conf["soapAction"]
+        soap_body = conf["template"].format(strScriptLabel=strScriptLabel, strJSonParameters=json_params)
+        soap_timeout = SCRIPT_TIMEOUTS.get(strScriptLabel, 300.0)
+
+    elif opName:
+        conf = OPERATION_CONFIG.get(opName)
+        if not conf:
+            raise HTTPException(status_code=400, detail=f"Operación desconocida: {opName}")
+
+        # Construir parámetros
+        params = {}
+        for param in conf["params"]:
+            if param in body:
+                params[param] = body[param]
+            else:
+                params[param] = -1
+
+        soap_action = conf["soapAction"]
+        soap_body = conf["template"].format(**params)
+
     else:
-        # Buscar JSON directo
-        json_match = re.search(r"(\{[\s\S]*\}|\[[\s\S]*\])", inner_xml)
-        if json_match:
-            try:
-                return json.loads(json_match.group(1))
-            except (json.JSONDecodeError, ValueError):
-                return [{"raw": inner_xml}]
-        else:
-            return [{"raw": inner_xml}]
+        raise HTTPException(status_code=400, detail="Faltan parámetros válidos (intExpgr_id, strScriptLabel o opName)")
+
+    return soap_body, soap_action, soap_timeout
+
+
+def _quiere_ndjson(request: Request, body: dict) -> bool:
+    """Modo streaming: format=ndjson (query o body) o Accept: application/x-ndjson."""
+    if body.get("format") == "ndjson" or request.query_params.get("format") == "ndjson":
+        return True
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _respuesta_ndjson(soap_body: str, soap_action: str, soap_timeout: float) -> StreamingResponse:
+    """Respuesta NDJSON: una fila JSON por línea, enviada a medida que se parsea.
+
+    La primera fila se obtiene antes de responder, así los errores de
+    autenticación / conexión siguen saliendo como HTTP 500. Un error a mitad
+    de stream (el status ya se envió) se informa como última línea
+    `{"error": ..., "truncated": true}`.
+    """
+    filas = stream_soap_rows(soap_body, soap_action, timeout=soap_timeout)
+    try:
+        primera = await anext(filas)
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type=NDJSON_MEDIA_TYPE)
+
+    async def _lineas() -> AsyncIterator[bytes]:
+        yield json.dumps(primera, ensure_ascii=False).encode() + b"\n"
+        try:
+            async for fila in filas:
+                yield json.dumps(fila, ensure_ascii=False).encode() + b"\n"
+        except Exception as e:
+            logger.exception("Error en stream NDJSON del gbp-parser")
+            yield json.dumps({"error": str(e), "truncated": True}, ensure_ascii=False).encode() + b"\n"
+        finally:
+            await filas.aclose()
+
+    return StreamingResponse(_lineas(), media_type=NDJSON_MEDIA_TYPE)
 
 
 @router.get("/gbp-parser", operation_id="gbp_parser_get")
@@ -363,7 +445,11 @@ async def gbp_parser(request: Request, _user=Depends(get_user_or_localhost)):
     Endpoint para parsear respuestas SOAP del ERP.
     Reemplaza el worker de Cloudflare.
 
-    Soporta tanto GET (query params) como POST (body JSON)
+    Soporta tanto GET (query params) como POST (body JSON).
+
+    Con `format=ndjson` (o `Accept: application/x-ndjson`) responde en
+    streaming, una fila JSON por línea, a medida que baja la respuesta del
+    ERP: los scripts de sync pueden ir insertando mientras tanto.
     """
     try:
         # Obtener parámetros (GET o POST)
@@ -386,50 +472,10 @@ async def gbp_parser(request: Request, _user=Depends(get_user_or_localhost)):
         if not body:
             raise HTTPException(status_code=400, detail="No se enviaron parámetros")
 
-        intExpgr_id = body.get("intExpgr_id")
-        strScriptLabel = body.get("strScriptLabel")
-        opName = body.get("opName")
-
-        soap_body = ""
-        soap_action = None
-        soap_timeout: float = 300.0
-
-        # Construir SOAP body según tipo de operación
-        if intExpgr_id:
-            conf = OPERATION_CONFIG["wsExportDataById"]
-            soap_action = conf["soapAction"]
-            soap_body = conf["template"].format(intExpgr_id=intExpgr_id)
-
-        elif strScriptLabel:
-            allowed_params = SCRIPT_CONFIG.get(strScriptLabel, [])
-            params = {k: body[k] for k in allowed_params if k in body}
-            json_params = json.dumps(params)
-
-            conf = OPERATION_CONFIG["wsGBPScriptExecute4Dataset"]
-            soap_action = conf["soapAction"]
-            soap_body = conf["template"].format(strScriptLabel=strScriptLabel, strJSonParameters=json_params)
-            soap_timeout = SCRIPT_TIMEOUTS.get(strScriptLabel, 300.0)
-
-        elif opName:
-            conf = OPERATION_CONFIG.get(opName)
-            if not conf:
-                raise HTTPException(status_code=400, detail=f"Operación desconocida: {opName}")
-
-            # Construir parámetros
-            params = {}
-            for param in conf["params"]:
-                if param in body:
-                    params[param] = body[param]
-                else:
-                    params[param] = -1
-
-            soap_action = conf["soapAction"]
-            soap_body = conf["template"].format(**params)
+        soap_body, soap_action, soap_timeout = _construir_operacion(body)
 
-        else:
-            raise HTTPException(
-                status_code=400, detail="Faltan parámetros válidos (intExpgr_id, strScriptLabel o opName)"
-            )
+        if _quiere_ndjson(request, body):
+            return await _respuesta_ndjson(soap_body, soap_action, soap_timeout)
 
         # Obtener o crear token
         token = _token_cache.get("token")
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import delete, desc, func, select, update
 from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 from datetime import UTC, datetime
 from app.api.deps import get_current_user
-from app.core.database import get_db, get_async_db
+from app.core.database import get_async_session, get_db
 from app.core.sse import sse_publish
 from app.models.usuario import Usuario
 from app.models.notificacion import Notificacion, SeveridadNotificacion, EstadoNotificacion
@@ -248,26 +249,30 @@ def obtener_estadisticas_notificaciones(
     return {"total": total, "no_leidas": no_leidas, "por_tipo": por_tipo}
 
 
+async def _notificacion_del_usuario(db: AsyncSession, notificacion_id: int, user_id: int) -> Notificacion:
+    notificacion = await db.scalar(
+        select(Notificacion).where(Notificacion.id == notificacion_id, Notificacion.user_id == user_id)
+    )
+    if not notificacion:
+        raise HTTPException(404, "Notificación no encontrada")
+    return notificacion
+
+
 @router.patch("/notificaciones/{notificacion_id}/marcar-leida")
 async def marcar_notificacion_leida(
-    notificacion_id: int, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    notificacion_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Marca una notificación como leída (solo la del usuario actual)
     """
-    notificacion = (
-        db.query(Notificacion)
-        .filter(Notificacion.id == notificacion_id, Notificacion.user_id == current_user.id)
-        .first()
-    )
-
-    if not notificacion:
-        raise HTTPException(404, "Notificación no encontrada")
+    notificacion = await _notificacion_del_usuario(db, notificacion_id, current_user.id)
 
     if not notificacion.leida:
         notificacion.leida = True
         notificacion.fecha_lectura = datetime.now(UTC)
-        db.commit()
+        await db.commit()
         await sse_publish("notificaciones:updated", {"hint": "reload"})
 
     return {"mensaje": "Notificación marcada como leída"}
@@ -275,24 +280,19 @@ async def marcar_notificacion_leida(
 
 @router.patch("/notificaciones/{notificacion_id}/marcar-no-leida")
 async def marcar_notificacion_no_leida(
-    notificacion_id: int, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    notificacion_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Marca una notificación como no leída
     """
-    notificacion = (
-        db.query(Notificacion)
-        .filter(Notificacion.id == notificacion_id, Notificacion.user_id == current_user.id)
-        .first()
-    )
-
-    if not notificacion:
-        raise HTTPException(404, "Notificación no encontrada")
+    notificacion = await _notificacion_del_usuario(db, notificacion_id, current_user.id)
 
     if notificacion.leida:
         notificacion.leida = False
         notificacion.fecha_lectura = None
-        db.commit()
+        await db.commit()
         await sse_publish("notificaciones:updated", {"hint": "reload"})
 
     return {"mensaje": "Notificación marcada como no leída"}
@@ -300,78 +300,83 @@ async def marcar_notificacion_no_leida(
 
 @router.post("/notificaciones/marcar-todas-leidas")
 async def marcar_todas_leidas(
-    tipo: Optional[str] = None, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    tipo: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Marca todas las notificaciones del usuario actual como leídas (opcionalmente filtradas por tipo)
     """
-    query = db.query(Notificacion).filter(Notificacion.user_id == current_user.id, Notificacion.leida == False)
+    stmt = update(Notificacion).where(Notificacion.user_id == current_user.id, Notificacion.leida == False)
 
     if tipo:
-        query = query.filter(Notificacion.tipo == tipo)
+        stmt = stmt.where(Notificacion.tipo == tipo)
 
-    count = query.update({"leida": True, "fecha_lectura": datetime.now(UTC)})
+    result = await db.execute(
+        stmt.values(leida=True, fecha_lectura=datetime.now(UTC)).execution_options(synchronize_session=False)
+    )
 
-    db.commit()
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
-    return {"mensaje": f"{count} notificaciones marcadas como leídas"}
+    return {"mensaje": f"{result.rowcount} notificaciones marcadas como leídas"}
 
 
 @router.post("/notificaciones/marcar-todas-no-leidas")
 async def marcar_todas_no_leidas(
-    tipo: Optional[str] = None, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    tipo: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Marca todas las notificaciones del usuario actual como no leídas
     """
-    query = db.query(Notificacion).filter(Notificacion.user_id == current_user.id, Notificacion.leida == True)
+    stmt = update(Notificacion).where(Notificacion.user_id == current_user.id, Notificacion.leida == True)
 
     if tipo:
-        query = query.filter(Notificacion.tipo == tipo)
+        stmt = stmt.where(Notificacion.tipo == tipo)
 
-    count = query.update({"leida": False, "fecha_lectura": None})
+    result = await db.execute(stmt.values(leida=False, fecha_lectura=None).execution_options(synchronize_session=False))
 
-    db.commit()
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
-    return {"mensaje": f"{count} notificaciones marcadas como no leídas"}
+    return {"mensaje": f"{result.rowcount} notificaciones marcadas como no leídas"}
 
 
 @router.delete("/notificaciones/limpiar")
 async def limpiar_notificaciones_leidas(
-    db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_session), current_user: Usuario = Depends(get_current_user)
 ):
     """
     Elimina todas las notificaciones leídas del usuario actual.
     IMPORTANTE: Esta ruta DEBE estar antes de /notificaciones/{notificacion_id}
     para evitar que FastAPI matchee "limpiar" como notificacion_id (422).
     """
-    count = db.query(Notificacion).filter(Notificacion.user_id == current_user.id, Notificacion.leida == True).delete()
-    db.commit()
+    result = await db.execute(
+        delete(Notificacion)
+        .where(Notificacion.user_id == current_user.id, Notificacion.leida == True)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
-    return {"mensaje": f"{count} notificaciones leídas eliminadas"}
+    return {"mensaje": f"{result.rowcount} notificaciones leídas eliminadas"}
 
 
 @router.delete("/notificaciones/{notificacion_id}")
 async def eliminar_notificacion(
-    notificacion_id: int, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    notificacion_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Elimina una notificación del usuario actual
     """
-    notificacion = (
-        db.query(Notificacion)
-        .filter(Notificacion.id == notificacion_id, Notificacion.user_id == current_user.id)
-        .first()
-    )
-
-    if not notificacion:
-        raise HTTPException(404, "Notificación no encontrada")
+    notificacion = await _notificacion_del_usuario(db, notificacion_id, current_user.id)
 
-    db.delete(notificacion)
-    db.commit()
+    await db.delete(notificacion)
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
     return {"mensaje": "Notificación eliminada"}
@@ -389,20 +394,13 @@ class CambiarEstadoRequest(BaseModel):
 async def cambiar_estado_notificacion(
     notificacion_id: int,
     request: CambiarEstadoRequest,
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ):
     """
     Cambia el estado de una notificación (revisada, descartada, en_gestion, resuelta)
     """
-    notificacion = (
-        db.query(Notificacion)
-        .filter(Notificacion.id == notificacion_id, Notificacion.user_id == current_user.id)
-        .first()
-    )
-
-    if not notificacion:
-        raise HTTPException(404, "Notificación no encontrada")
+    notificacion = await _notificacion_del_usuario(db, notificacion_id, current_user.id)
 
     notificacion.estado = request.estado
 
@@ -419,8 +417,8 @@ async def cambiar_estado_notificacion(
     elif request.estado == EstadoNotificacion.RESUELTA:
         notificacion.fecha_resolucion = ahora
 
-    db.commit()
-    db.refresh(notificacion)
+    await db.commit()
+    await db.refresh(notificacion)
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
     return {"mensaje": f"Notificación marcada como {request.estado.value}", "notificacion": notificacion}
@@ -430,7 +428,7 @@ async def cambiar_estado_notificacion(
 async def revisar_notificacion(
     notificacion_id: int,
     notas: Optional[str] = None,
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ):
     """
@@ -440,12 +438,28 @@ async def revisar_notificacion(
     return await cambiar_estado_notificacion(notificacion_id, request, db, current_user)
 
 
+def _crear_reglas_ignorar(db: Session, notificaciones: List[Notificacion], user_id: int) -> None:
+    """Reglas de ignorar para las notificaciones con datos completos (NotificacionService es sync)."""
+    servicio = NotificacionService(db)
+    for notif in notificaciones:
+        if notif.item_id and notif.markup_real is not None:
+            servicio.agregar_regla_ignorar(
+                user_id=user_id,
+                item_id=notif.item_id,
+                tipo=notif.tipo,
+                markup_real=notif.markup_real,
+                codigo_producto=notif.codigo_producto,
+                descripcion_producto=notif.descripcion_producto,
+                notificacion_id=notif.id,
+            )
+
+
 @router.patch("/notificaciones/{notificacion_id}/descartar")
 async def descartar_notificacion(
     notificacion_id: int,
     notas: Optional[str] = None,
     crear_regla_ignorar: bool = True,
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ):
     """
@@ -458,27 +472,11 @@ async def descartar_notificacion(
                             del mismo producto + tipo + markup (default: True)
     """
     # Obtener notificación antes de cambiar estado
-    notificacion = (
-        db.query(Notificacion)
-        .filter(Notificacion.id == notificacion_id, Notificacion.user_id == current_user.id)
-        .first()
-    )
-
-    if not notificacion:
-        raise HTTPException(404, "Notificación no encontrada")
+    notificacion = await _notificacion_del_usuario(db, notificacion_id, current_user.id)
 
     # Crear regla de ignorar si se solicitó y tenemos los datos necesarios
-    if crear_regla_ignorar and notificacion.item_id and notificacion.markup_real is not None:
-        servicio = NotificacionService(db)
-        servicio.agregar_regla_ignorar(
-            user_id=current_user.id,
-            item_id=notificacion.item_id,
-            tipo=notificacion.tipo,
-            markup_real=notificacion.markup_real,
-            codigo_producto=notificacion.codigo_producto,
-            descripcion_producto=notificacion.descripcion_producto,
-            notificacion_id=notificacion_id,
-        )
+    if crear_regla_ignorar:
+        await db.run_sync(_crear_reglas_ignorar, [notificacion], current_user.id)
 
     # Cambiar estado a descartada
     request = CambiarEstadoRequest(estado=EstadoNotificacion.DESCARTADA, notas=notas)
@@ -489,7 +487,7 @@ async def descartar_notificacion(
 async def resolver_notificacion(
     notificacion_id: int,
     notas: Optional[str] = None,
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ):
     """
@@ -504,7 +502,7 @@ async def descartar_notificaciones_bulk(
     notificaciones_ids: List[int],
     notas: Optional[str] = None,
     crear_reglas_ignorar: bool = True,
-    db: Session = Depends(get_async_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: Usuario = Depends(get_current_user),
 ):
     """
@@ -518,42 +516,28 @@ async def descartar_notificaciones_bulk(
     # Si se solicitan reglas de ignorar, obtener las notificaciones primero
     if crear_reglas_ignorar:
         notificaciones = (
-            db.query(Notificacion)
-            .filter(Notificacion.id.in_(notificaciones_ids), Notificacion.user_id == current_user.id)
-            .all()
-        )
-
-        servicio = NotificacionService(db)
-
-        # Crear reglas de ignorar para cada una que tenga datos completos
-        for notif in notificaciones:
-            if notif.item_id and notif.markup_real is not None:
-                servicio.agregar_regla_ignorar(
-                    user_id=current_user.id,
-                    item_id=notif.item_id,
-                    tipo=notif.tipo,
-                    markup_real=notif.markup_real,
-                    codigo_producto=notif.codigo_producto,
-                    descripcion_producto=notif.descripcion_producto,
-                    notificacion_id=notif.id,
+            await db.scalars(
+                select(Notificacion).where(
+                    Notificacion.id.in_(notificaciones_ids), Notificacion.user_id == current_user.id
                 )
+            )
+        ).all()
+        await db.run_sync(_crear_reglas_ignorar, list(notificaciones), current_user.id)
 
     # Descartar las notificaciones
     ahora = datetime.now(UTC)
 
-    count = (
-        db.query(Notificacion)
-        .filter(Notificacion.id.in_(notificaciones_ids), Notificacion.user_id == current_user.id)
-        .update(
-            {"estado": EstadoNotificacion.DESCARTADA, "fecha_descarte": ahora, "notas_revision": notas},
-            synchronize_session=False,
-        )
+    result = await db.execute(
+        update(Notificacion)
+        .where(Notificacion.id.in_(notificaciones_ids), Notificacion.user_id == current_user.id)
+        .values(estado=EstadoNotificacion.DESCARTADA, fecha_descarte=ahora, notas_revision=notas)
+        .execution_options(synchronize_session=False)
     )
 
-    db.commit()
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
-    return {"mensaje": f"{count} notificaciones descartadas"}
+    return {"mensaje": f"{result.rowcount} notificaciones descartadas"}
 
 
 @router.get("/notificaciones/dashboard")
@@ -663,22 +647,22 @@ def listar_reglas_ignoradas(
 
 @router.delete("/notificaciones/ignoradas/{regla_id}")
 async def eliminar_regla_ignorada(
-    regla_id: int, db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    regla_id: int, db: AsyncSession = Depends(get_async_session), current_user: Usuario = Depends(get_current_user)
 ):
     """
     Elimina una regla de ignorar (re-habilita notificaciones para ese producto/tipo/markup).
     """
-    regla = (
-        db.query(NotificacionIgnorada)
-        .filter(NotificacionIgnorada.id == regla_id, NotificacionIgnorada.user_id == current_user.id)
-        .first()
+    regla = await db.scalar(
+        select(NotificacionIgnorada).where(
+            NotificacionIgnorada.id == regla_id, NotificacionIgnorada.user_id == current_user.id
+        )
     )
 
     if not regla:
         raise HTTPException(404, "Regla no encontrada")
 
-    db.delete(regla)
-    db.commit()
+    await db.delete(regla)
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
     return {
@@ -694,21 +678,23 @@ async def eliminar_regla_ignorada(
 
 @router.delete("/notificaciones/ignoradas/bulk")
 async def eliminar_reglas_ignoradas_bulk(
-    reglas_ids: List[int], db: Session = Depends(get_async_db), current_user: Usuario = Depends(get_current_user)
+    reglas_ids: List[int],
+    db: AsyncSession = Depends(get_async_session),
+    current_user: Usuario = Depends(get_current_user),
 ):
     """
     Elimina múltiples reglas de ignorar a la vez.
     """
-    count = (
-        db.query(NotificacionIgnorada)
-        .filter(NotificacionIgnorada.id.in_(reglas_ids), NotificacionIgnorada.user_id == current_user.id)
-        .delete(synchronize_session=False)
+    result = await db.execute(
+        delete(NotificacionIgnorada)
+        .where(NotificacionIgnorada.id.in_(reglas_ids), NotificacionIgnorada.user_id == current_user.id)
+        .execution_options(synchronize_session=False)
     )
 
-    db.commit()
+    await db.commit()
     await sse_publish("notificaciones:updated", {"hint": "reload"})
 
-    return {"mensaje": f"{count} reglas eliminadas"}
+    return {"mensaje": f"{result.rowcount} reglas eliminadas"}
 
 
 @router.get("/notificaciones/ignoradas/stats")
@@ -710,13 +710,22 @@ async def sincronizar_pedidos_local(
     logger.info("Iniciando sincronizacion de pedidos local (7 dias)...")
 
     try:
-        await main_async(days=7)
+        resultados = await main_async(days=7)
 
         logger.info("Sincronizacion completada")
 
         return {
             "mensaje": "Sincronización completada exitosamente",
             "detalle": "Pedidos de los últimos 7 días sincronizados desde el ERP",
+            "tablas": [
+                {
+                    "tabla": r.tabla,
+                    "descargadas": r.descargadas,
+                    "cambiadas": r.cambiadas,
+                    "escritas": r.escritas,
+                }
+                for r in resultados
+            ],
         }
 
     except Exception as e:
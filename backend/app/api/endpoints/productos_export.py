@@ -7,7 +7,7 @@ from app.core.database import get_db
 from app.models.producto import ProductoERP, ProductoPricing
 from app.models.usuario import Usuario
 from app.api.deps import get_current_user
-from fastapi.responses import Response
+from app.utils.xlsx_stream import ENCABEZADO_AZUL, Estilo, Hoja, filas_por_lotes, respuesta_xlsx
 import logging
 
 from app.api.endpoints.productos_shared import (  # noqa: F401
@@ -186,17 +186,18 @@ def _apply_search_filter(query, search: Optional[str]):
     return query
 
 
+def _xlsx_vacio(mensaje: str, filename: str):
+    """Excel de una sola celda para los exports que no tienen filas."""
+    return respuesta_xlsx([Hoja(titulo="Sheet", filas=[[mensaje]])], filename)
+
+
 @router.post("/productos/exportar-rebate")
 def exportar_rebate(
     request: ExportRebateRequest, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_user)
 ):
     """Exporta productos con rebate a Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment
     from datetime import datetime, date
     from calendar import monthrange
-    from io import BytesIO
-    from fastapi.responses import StreamingResponse
     from app.models.publicacion_ml import PublicacionML
     from app.models.mla_banlist import MLABanlist
     from app.models.mercadolibre_item_publicado import MercadoLibreItemPublicado
@@ -521,12 +522,7 @@ def exportar_rebate(
                 ~ProductoERP.item_id.in_(select(items_activos.c.item_id)),
             )
 
-    productos = query.all()
-
-    # Crear Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rebate Export"
+    productos = filas_por_lotes(query)
 
     # Headers
     if request.formato == "nuevo":
@@ -559,208 +555,204 @@ def exportar_rebate(
             "PVP SELLER",
         ]
 
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-    # Header columna T para formato nuevo
+    # Header columna T para formato nuevo (J-S quedan vacías y ocultas)
     if request.formato == "nuevo":
-        cell = ws.cell(row=1, column=20, value="REBATE %")
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-    # Precargar todos los MLA IDs de los productos del export para fallback batch a ml_previews
-    item_ids_export = [p[0].item_id for p in productos]
-    all_mla_ids = [
-        mla_id
-        for (mla_id,) in db.query(PublicacionML.mla)
-        .filter(PublicacionML.item_id.in_(item_ids_export), PublicacionML.activo == True)
-        .all()
-    ]
+        headers = headers + [None] * 10 + ["REBATE %"]
+
+    # MLA IDs de todos los productos del export para el fallback batch a ml_previews.
+    # Los productos se leen en streaming, así que los item_ids van como subquery.
+    item_ids_export = query.with_entities(ProductoERP.item_id).order_by(None).subquery()
+    all_mla_ids_query = db.query(PublicacionML.mla).filter(
+        PublicacionML.item_id.in_(select(item_ids_export.c.item_id)), PublicacionML.activo == True
+    )
     mlwebhook_prices: dict[str, float] | None = None  # lazy: se carga solo si se necesita
 
     # Datos
-    row = 2
-    for producto_erp, producto_pricing in productos:
-        # Buscar MLAs de la lista seleccionada
-        query_mlas = db.query(PublicacionML).filter(
-            PublicacionML.item_id == producto_erp.item_id,
-            PublicacionML.pricelist_id == pricelist_id,
-            PublicacionML.activo == True,
-        )
-        if subq_mlas_permitidos is not None:
-            query_mlas = query_mlas.filter(PublicacionML.mla.in_(select(subq_mlas_permitidos)))
-        mlas = query_mlas.all()
-
-        # Para cuotas: también traer MLAs de la pricelist PVP equivalente y unificar
-        if pricelist_pvp_equivalente:
-            query_mlas_pvp = db.query(PublicacionML).filter(
+    def _filas():
+        nonlocal mlwebhook_prices
+        for producto_erp, producto_pricing in productos:
+            # Buscar MLAs de la lista seleccionada
+            query_mlas = db.query(PublicacionML).filter(
                 PublicacionML.item_id == producto_erp.item_id,
-                PublicacionML.pricelist_id == pricelist_pvp_equivalente,
+                PublicacionML.pricelist_id == pricelist_id,
                 PublicacionML.activo == True,
             )
             if subq_mlas_permitidos is not None:
-                query_mlas_pvp = query_mlas_pvp.filter(PublicacionML.mla.in_(select(subq_mlas_permitidos)))
-            mlas_pvp = query_mlas_pvp.all()
-            # Deduplicar por MLA (el código MLA es único, priorizar el de cuotas)
-            mlas_existentes = {m.mla for m in mlas}
-            for m in mlas_pvp:
-                if m.mla not in mlas_existentes:
-                    mlas.append(m)
-                    mlas_existentes.add(m.mla)
-
-        # Si no tiene MLAs, skip
-        if not mlas:
-            continue
-
-        # Obtener precio de la lista seleccionada de PrecioML
-        from app.models.precio_ml import PrecioML
-
-        precio_lista = (
-            db.query(PrecioML)
-            .filter(PrecioML.item_id == producto_erp.item_id, PrecioML.pricelist_id == pricelist_id)
-            .first()
-        )
+                query_mlas = query_mlas.filter(PublicacionML.mla.in_(select(subq_mlas_permitidos)))
+            mlas = query_mlas.all()
+
+            # Para cuotas: también traer MLAs de la pricelist PVP equivalente y unificar
+            if pricelist_pvp_equivalente:
+                query_mlas_pvp = db.query(PublicacionML).filter(
+                    PublicacionML.item_id == producto_erp.item_id,
+                    PublicacionML.pricelist_id == pricelist_pvp_equivalente,
+                    PublicacionML.activo == True,
+                )
+                if subq_mlas_permitidos is not None:
+                    query_mlas_pvp = query_mlas_pvp.filter(PublicacionML.mla.in_(select(subq_mlas_permitidos)))
+                mlas_pvp = query_mlas_pvp.all()
+                # Deduplicar por MLA (el código MLA es único, priorizar el de cuotas)
+                mlas_existentes = {m.mla for m in mlas}
+                for m in mlas_pvp:
+                    if m.mla not in mlas_existentes:
+                        mlas.append(m)
+                        mlas_existentes.add(m.mla)
+
+            # Si no tiene MLAs, skip
+            if not mlas:
+                continue
 
-        precio_pricelist = float(precio_lista.precio) if precio_lista and precio_lista.precio else 0
+            # Obtener precio de la lista seleccionada de PrecioML
+            from app.models.precio_ml import PrecioML
 
-        # También obtener precio de la pricelist PVP equivalente (para MLAs que vengan de PVP)
-        precio_pricelist_pvp = 0
-        if pricelist_pvp_equivalente:
-            precio_lista_pvp = (
+            precio_lista = (
                 db.query(PrecioML)
-                .filter(PrecioML.item_id == producto_erp.item_id, PrecioML.pricelist_id == pricelist_pvp_equivalente)
+                .filter(PrecioML.item_id == producto_erp.item_id, PrecioML.pricelist_id == pricelist_id)
                 .first()
             )
-            precio_pricelist_pvp = float(precio_lista_pvp.precio) if precio_lista_pvp and precio_lista_pvp.precio else 0
-
-        # NO skipear acá: si precios_ml no tiene registro, el fallback por MLA
-        # (mlp_lastPriceInformedByML) más abajo resuelve el PVP LLENO real de ML
-
-        porcentaje_rebate = float(producto_pricing.porcentaje_rebate or 3.8)
-
-        if pricelist_id == 4:
-            # Clásica: necesita precio_lista_ml como base
-            if not producto_pricing.precio_lista_ml:
-                continue
-            precio_base = float(producto_pricing.precio_lista_ml)
-            # PVP SELLER = precio_lista_ml / (1 - rebate%)
-            pvp_seller = precio_base / (1 - porcentaje_rebate / 100)
-            # PVP LLENO se determina por MLA (web o pvp) más abajo
-        else:
-            # Cuotas: usar el precio editado de la columna de cuotas (ProductoPricing)
-            # como base para PVP SELLER, y el precio de la pricelist (PrecioML) como PVP LLENO
-            cuotas_campo_map = {
-                "3": "precio_3_cuotas",
-                "6": "precio_6_cuotas",
-                "9": "precio_9_cuotas",
-                "12": "precio_12_cuotas",
-            }
-            campo_cuota = cuotas_campo_map.get(request.tipo_cuotas)
-            precio_cuota_editado = float(getattr(producto_pricing, campo_cuota, None) or 0) if campo_cuota else 0
-
-            if precio_cuota_editado == 0:
-                # Si no tiene precio de cuota editado, skip este producto
-                continue
-
-            porcentaje_cuotas = (
-                request.porcentaje_rebate_override
-                if request.porcentaje_rebate_override is not None
-                else porcentaje_rebate
-            )
-            # PVP SELLER = precio editado de cuotas / (1 - rebate%)
-            pvp_seller = precio_cuota_editado / (1 - porcentaje_cuotas / 100)
 
-        # Una fila por cada MLA (excluyendo los baneados)
-        for mla in mlas:
-            # Saltar si el MLA está en la banlist
-            if mla.mla in mlas_baneados_set:
-                continue
+            precio_pricelist = float(precio_lista.precio) if precio_lista and precio_lista.precio else 0
 
-            # Determinar PVP LLENO según la pricelist del MLA (con fallback)
-            es_mla_pvp = pricelist_pvp_equivalente and mla.pricelist_id == pricelist_pvp_equivalente
-            if es_mla_pvp:
-                precio_base_lleno = precio_pricelist_pvp if precio_pricelist_pvp > 0 else precio_pricelist
-            else:
-                precio_base_lleno = precio_pricelist if precio_pricelist > 0 else precio_pricelist_pvp
-
-            # Fallback: si no hay PrecioML para ninguna lista, usar el precio real del MLA
-            if precio_base_lleno == 0:
-                # 1) Intentar desde tb_mercadolibre_items_publicados
-                mla_publicado = (
-                    db.query(MercadoLibreItemPublicado)
-                    .filter(MercadoLibreItemPublicado.mlp_publicationID == mla.mla)
+            # También obtener precio de la pricelist PVP equivalente (para MLAs que vengan de PVP)
+            precio_pricelist_pvp = 0
+            if pricelist_pvp_equivalente:
+                precio_lista_pvp = (
+                    db.query(PrecioML)
+                    .filter(
+                        PrecioML.item_id == producto_erp.item_id, PrecioML.pricelist_id == pricelist_pvp_equivalente
+                    )
                     .first()
                 )
-                if mla_publicado and mla_publicado.mlp_lastPriceInformedByML:
-                    precio_base_lleno = float(mla_publicado.mlp_lastPriceInformedByML)
-
-            if precio_base_lleno == 0:
-                # 2) Intentar desde ml_previews (DB webhook) — precio real publicado en ML
-                if mlwebhook_prices is None:
-                    mlwebhook_prices = _cargar_precios_mlwebhook(all_mla_ids)
-                precio_webhook = mlwebhook_prices.get(mla.mla, 0)
-                if precio_webhook > 0:
-                    precio_base_lleno = precio_webhook
+                precio_pricelist_pvp = (
+                    float(precio_lista_pvp.precio) if precio_lista_pvp and precio_lista_pvp.precio else 0
+                )
 
-            if pricelist_id == 4:
-                pvp_lleno = precio_base_lleno
-            else:
-                offset_lleno = request.offset_pvp_lleno if request.offset_pvp_lleno is not None else 0
-                pvp_lleno = precio_base_lleno * (1 + offset_lleno / 100)
+            # NO skipear acá: si precios_ml no tiene registro, el fallback por MLA
+            # (mlp_lastPriceInformedByML) más abajo resuelve el PVP LLENO real de ML
 
-            # Si no hay PVP LLENO válido para este MLA, skip
-            if not pvp_lleno or pvp_lleno == 0:
-                continue
+            porcentaje_rebate = float(producto_pricing.porcentaje_rebate or 3.8)
 
-            if request.formato == "nuevo":
-                # Formato DXI (9 columnas + col T = rebate%)
-                ws.cell(row=row, column=1, value=mla.mla)
-                ws.cell(row=row, column=2, value="")
-                ws.cell(row=row, column=3, value="")
-                ws.cell(row=row, column=4, value="")
-                ws.cell(row=row, column=5, value="DxI")
-                ws.cell(row=row, column=6, value=fecha_desde)
-                ws.cell(row=row, column=7, value=fecha_hasta)
-                ws.cell(row=row, column=8, value=round(pvp_lleno, 2))
-                ws.cell(row=row, column=9, value=round(pvp_seller, 2))
-                # Columna T (20): porcentaje de rebate formateado (ej: "3,80%")
-                rebate_mostrar = porcentaje_cuotas if pricelist_id != 4 else porcentaje_rebate
-                ws.cell(row=row, column=20, value=f"{rebate_mostrar:.2f}%".replace(".", ","))
+            if pricelist_id == 4:
+                # Clásica: necesita precio_lista_ml como base
+                if not producto_pricing.precio_lista_ml:
+                    continue
+                precio_base = float(producto_pricing.precio_lista_ml)
+                # PVP SELLER = precio_lista_ml / (1 - rebate%)
+                pvp_seller = precio_base / (1 - porcentaje_rebate / 100)
+                # PVP LLENO se determina por MLA (web o pvp) más abajo
             else:
-                # Formato tradicional
-                rebate_mostrar = porcentaje_cuotas if pricelist_id != 4 else porcentaje_rebate
-                ws.cell(row=row, column=1, value=f"{rebate_mostrar}%")
-                ws.cell(row=row, column=2, value=producto_erp.marca or "")
-                ws.cell(row=row, column=3, value=fecha_desde)
-                ws.cell(row=row, column=4, value=fecha_hasta)
-                ws.cell(row=row, column=5, value="DxI")
-                ws.cell(row=row, column=6, value="")  # Categoría vacía
-                ws.cell(row=row, column=7, value=mla.item_title or producto_erp.descripcion or "")
-                ws.cell(row=row, column=8, value="Clásica" if pricelist_id == 4 else f"{request.tipo_cuotas} Cuotas")
-                ws.cell(row=row, column=9, value=producto_erp.stock)
-                ws.cell(row=row, column=10, value="FALSE")
-                ws.cell(row=row, column=11, value=mla.mla)
-                ws.cell(row=row, column=12, value=pvp_lleno)
-                ws.cell(row=row, column=13, value=round(pvp_seller, 2))
-
-            row += 1
-
-    # Ocultar columnas vacías J-S (10 a 19) en formato nuevo
-    if request.formato == "nuevo":
-        for col_letter in ["J", "K", "L", "M", "N", "O", "P", "Q", "R", "S"]:
-            ws.column_dimensions[col_letter].hidden = True
-
-    # Guardar en memoria
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=rebate_export_{hoy.strftime('%Y%m%d')}.xlsx"},
+                # Cuotas: usar el precio editado de la columna de cuotas (ProductoPricing)
+                # como base para PVP SELLER, y el precio de la pricelist (PrecioML) como PVP LLENO
+                cuotas_campo_map = {
+                    "3": "precio_3_cuotas",
+                    "6": "precio_6_cuotas",
+                    "9": "precio_9_cuotas",
+                    "12": "precio_12_cuotas",
+                }
+                campo_cuota = cuotas_campo_map.get(request.tipo_cuotas)
+                precio_cuota_editado = float(getattr(producto_pricing, campo_cuota, None) or 0) if campo_cuota else 0
+
+                if precio_cuota_editado == 0:
+                    # Si no tiene precio de cuota editado, skip este producto
+                    continue
+
+                porcentaje_cuotas = (
+                    request.porcentaje_rebate_override
+                    if request.porcentaje_rebate_override is not None
+                    else porcentaje_rebate
+                )
+                # PVP SELLER = precio editado de cuotas / (1 - rebate%)
+                pvp_seller = precio_cuota_editado / (1 - porcentaje_cuotas / 100)
+
+            # Una fila por cada MLA (excluyendo los baneados)
+            for mla in mlas:
+                # Saltar si el MLA está en la banlist
+                if mla.mla in mlas_baneados_set:
+                    continue
+
+                # Determinar PVP LLENO según la pricelist del MLA (con fallback)
+                es_mla_pvp = pricelist_pvp_equivalente and mla.pricelist_id == pricelist_pvp_equivalente
+                if es_mla_pvp:
+                    precio_base_lleno = precio_pricelist_pvp if precio_pricelist_pvp > 0 else precio_pricelist
+                else:
+                    precio_base_lleno = precio_pricelist if precio_pricelist > 0 else precio_pricelist_pvp
+
+                # Fallback: si no hay PrecioML para ninguna lista, usar el precio real del MLA
+                if precio_base_lleno == 0:
+                    # 1) Intentar desde tb_mercadolibre_items_publicados
+                    mla_publicado = (
+                        db.query(MercadoLibreItemPublicado)
+                        .filter(MercadoLibreItemPublicado.mlp_publicationID == mla.mla)
+                        .first()
+                    )
+                    if mla_publicado and mla_publicado.mlp_lastPriceInformedByML:
+                        precio_base_lleno = float(mla_publicado.mlp_lastPriceInformedByML)
+
+                if precio_base_lleno == 0:
+                    # 2) Intentar desde ml_previews (DB webhook) — precio real publicado en ML
+                    if mlwebhook_prices is None:
+                        mlwebhook_prices = _cargar_precios_mlwebhook([mla_id for (mla_id,) in all_mla_ids_query])
+                    precio_webhook = mlwebhook_prices.get(mla.mla, 0)
+                    if precio_webhook > 0:
+                        precio_base_lleno = precio_webhook
+
+                if pricelist_id == 4:
+                    pvp_lleno = precio_base_lleno
+                else:
+                    offset_lleno = request.offset_pvp_lleno if request.offset_pvp_lleno is not None else 0
+                    pvp_lleno = precio_base_lleno * (1 + offset_lleno / 100)
+
+                # Si no hay PVP LLENO válido para este MLA, skip
+                if not pvp_lleno or pvp_lleno == 0:
+                    continue
+
+                if request.formato == "nuevo":
+                    # Formato DXI (9 columnas + col T = rebate%)
+                    rebate_mostrar = porcentaje_cuotas if pricelist_id != 4 else porcentaje_rebate
+                    yield [
+                        mla.mla,
+                        "",
+                        "",
+                        "",
+                        "DxI",
+                        fecha_desde,
+                        fecha_hasta,
+                        round(pvp_lleno, 2),
+                        round(pvp_seller, 2),
+                        *[None] * 10,
+                        # Columna T (20): porcentaje de rebate formateado (ej: "3,80%")
+                        f"{rebate_mostrar:.2f}%".replace(".", ","),
+                    ]
+                else:
+                    # Formato tradicional
+                    rebate_mostrar = porcentaje_cuotas if pricelist_id != 4 else porcentaje_rebate
+                    yield [
+                        f"{rebate_mostrar}%",
+                        producto_erp.marca or "",
+                        fecha_desde,
+                        fecha_hasta,
+                        "DxI",
+                        "",  # Categoría vacía
+                        mla.item_title or producto_erp.descripcion or "",
+                        "Clásica" if pricelist_id == 4 else f"{request.tipo_cuotas} Cuotas",
+                        producto_erp.stock,
+                        "FALSE",
+                        mla.mla,
+                        pvp_lleno,
+                        round(pvp_seller, 2),
+                    ]
+
+    return respuesta_xlsx(
+        [
+            Hoja(
+                titulo="Rebate Export",
+                filas=_filas(),
+                encabezado=headers,
+                # Ocultar columnas vacías J-S (10 a 19) en formato nuevo
+                ocultas=range(10, 20) if request.formato == "nuevo" else (),
+            )
+        ],
+        f"rebate_export_{hoy.strftime('%Y%m%d')}.xlsx",
     )
 
 
@@ -796,8 +788,6 @@ def exportar_web_transferencia(
     current_user: Usuario = Depends(get_current_user),
 ):
     """Exporta precios de Web Transferencia en formato Excel con filtros opcionales"""
-    from io import BytesIO
-    from openpyxl import Workbook
     from app.models.tipo_cambio import TipoCambio
 
     # Obtener productos con precio web transferencia
@@ -876,17 +866,7 @@ def exportar_web_transferencia(
             query = query.filter(ProductoERP.item_id.in_(item_ids_audit))
         else:
             # Si no hay productos con las auditorías filtradas, retornar vacío
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["No se encontraron productos con los filtros aplicados"])
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            return Response(
-                content=output.getvalue(),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": "attachment; filename=web_transferencia_vacia.xlsx"},
-            )
+            return _xlsx_vacio("No se encontraron productos con los filtros aplicados", "web_transferencia_vacia.xlsx")
 
     # Aplicar filtros básicos
     query = _apply_search_filter(query, search)
@@ -920,17 +900,7 @@ def exportar_web_transferencia(
             )
         else:
             # Si el PM no tiene marcas asignadas, no hay productos
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["No hay productos para los PMs seleccionados"])
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            return Response(
-                content=output.getvalue(),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": "attachment; filename=web_transferencia_vacia.xlsx"},
-            )
+            return _xlsx_vacio("No hay productos para los PMs seleccionados", "web_transferencia_vacia.xlsx")
 
     # Filtro por colores
     if colores:
@@ -1039,9 +1009,10 @@ def exportar_web_transferencia(
                 ~ProductoERP.item_id.in_(select(items_activos.c.item_id)),
             )
 
-    productos = query.all()
+    productos = filas_por_lotes(query)
 
-    # Aplicar filtros de markup y oferta (requieren cálculos, se hacen después de la query)
+    # Aplicar filtros de markup y oferta (requieren cálculos, se hacen después de la query).
+    # Es un generador: filtra a medida que se leen las filas, sin materializar la lista.
     if (
         markup_clasica_positivo is not None
         or markup_rebate_positivo is not None
@@ -1053,71 +1024,71 @@ def exportar_web_transferencia(
         from app.models.publicacion_ml import PublicacionML
         from datetime import date
 
-        productos_filtrados = []
         hoy = date.today()
 
-        for producto in productos:
-            item_id = producto[0]
-            incluir = True
-
-            # Obtener ProductoERP para el item_id
-            producto_erp = db.query(ProductoERP).filter(ProductoERP.item_id == item_id).first()
-            if not producto_erp:
-                continue
-
-            producto_pricing = db.query(ProductoPricing).filter(ProductoPricing.item_id == item_id).first()
-            if not producto_pricing:
-                continue
-
-            # Filtro de markup clásica
-            if markup_clasica_positivo is not None and incluir:
-                markup = producto_pricing.markup_calculado if producto_pricing else None
-                if markup is not None:
-                    if markup_clasica_positivo and markup < 0:
-                        incluir = False
-                    elif not markup_clasica_positivo and markup >= 0:
+        def _filtrar(productos):
+            for producto in productos:
+                item_id = producto[0]
+                incluir = True
+
+                # Obtener ProductoERP para el item_id
+                producto_erp = db.query(ProductoERP).filter(ProductoERP.item_id == item_id).first()
+                if not producto_erp:
+                    continue
+
+                producto_pricing = db.query(ProductoPricing).filter(ProductoPricing.item_id == item_id).first()
+                if not producto_pricing:
+                    continue
+
+                # Filtro de markup clásica
+                if markup_clasica_positivo is not None and incluir:
+                    markup = producto_pricing.markup_calculado if producto_pricing else None
+                    if markup is not None:
+                        if markup_clasica_positivo and markup < 0:
+                            incluir = False
+                        elif not markup_clasica_positivo and markup >= 0:
+                            incluir = False
+                    else:
                         incluir = False
-                else:
-                    incluir = False
 
-            # Filtro de markup web transferencia
-            if markup_web_transf_positivo is not None and incluir:
-                if producto_pricing and producto_pricing.markup_web_real is not None:
-                    markup_web = float(producto_pricing.markup_web_real)
-                    if markup_web_transf_positivo and markup_web < 0:
-                        incluir = False
-                    elif not markup_web_transf_positivo and markup_web >= 0:
+                # Filtro de markup web transferencia
+                if markup_web_transf_positivo is not None and incluir:
+                    if producto_pricing and producto_pricing.markup_web_real is not None:
+                        markup_web = float(producto_pricing.markup_web_real)
+                        if markup_web_transf_positivo and markup_web < 0:
+                            incluir = False
+                        elif not markup_web_transf_positivo and markup_web >= 0:
+                            incluir = False
+                    else:
                         incluir = False
-                else:
-                    incluir = False
 
-            # Filtro de oferta
-            if con_oferta is not None and incluir:
-                pubs = db.query(PublicacionML).filter(PublicacionML.item_id == item_id).all()
-                tiene_oferta = False
-                for pub in pubs:
-                    oferta = (
-                        db.query(OfertaML)
-                        .filter(
-                            OfertaML.mla == pub.mla,
-                            OfertaML.fecha_desde <= hoy,
-                            OfertaML.fecha_hasta >= hoy,
-                            OfertaML.pvp_seller.isnot(None),
+                # Filtro de oferta
+                if con_oferta is not None and incluir:
+                    pubs = db.query(PublicacionML).filter(PublicacionML.item_id == item_id).all()
+                    tiene_oferta = False
+                    for pub in pubs:
+                        oferta = (
+                            db.query(OfertaML)
+                            .filter(
+                                OfertaML.mla == pub.mla,
+                                OfertaML.fecha_desde <= hoy,
+                                OfertaML.fecha_hasta >= hoy,
+                                OfertaML.pvp_seller.isnot(None),
+                            )
+                            .first()
                         )
-                        .first()
-                    )
-                    if oferta:
-                        tiene_oferta = True
-                        break
-                if con_oferta and not tiene_oferta:
-                    incluir = False
-                elif not con_oferta and tiene_oferta:
-                    incluir = False
+                        if oferta:
+                            tiene_oferta = True
+                            break
+                    if con_oferta and not tiene_oferta:
+                        incluir = False
+                    elif not con_oferta and tiene_oferta:
+                        incluir = False
 
-            if incluir:
-                productos_filtrados.append(producto)
+                if incluir:
+                    yield producto
 
-        productos = productos_filtrados
+        productos = _filtrar(productos)
 
     # Obtener dólar venta si currency_id es 2
     dolar_ajustado = None
@@ -1126,40 +1097,34 @@ def exportar_web_transferencia(
         if tipo_cambio:
             dolar_ajustado = float(tipo_cambio.venta) + offset_dolar
 
-    # Crear Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Web Transferencia"
-
-    # Header
-    ws.append(["Código/EAN", "Precio", "ID Moneda"])
-
     # Datos - todo como texto
-    for item_id, codigo, precio_base in productos:
-        # Aplicar porcentaje adicional
-        precio_final = float(precio_base) * (1 + porcentaje_adicional / 100)
-
-        # Si es USD, dividir por dólar ajustado
-        if currency_id == 2 and dolar_ajustado:
-            precio_final = precio_final / dolar_ajustado
-            # Para USD, redondear a 2 decimales
-            precio_str = f"{precio_final:.2f}"
-        else:
-            # Para ARS, redondear a múltiplo de 10
-            precio_final = round(precio_final / 10) * 10
-            precio_str = str(int(precio_final))
-
-        ws.append([str(codigo), precio_str, str(currency_id)])
-
-    # Guardar en memoria
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=web_transferencia.xlsx"},
+    def _filas():
+        for item_id, codigo, precio_base in productos:
+            # Aplicar porcentaje adicional
+            precio_final = float(precio_base) * (1 + porcentaje_adicional / 100)
+
+            # Si es USD, dividir por dólar ajustado
+            if currency_id == 2 and dolar_ajustado:
+                precio_final = precio_final / dolar_ajustado
+                # Para USD, redondear a 2 decimales
+                precio_str = f"{precio_final:.2f}"
+            else:
+                # Para ARS, redondear a múltiplo de 10
+                precio_final = round(precio_final / 10) * 10
+                precio_str = str(int(precio_final))
+
+            yield [str(codigo), precio_str, str(currency_id)]
+
+    return respuesta_xlsx(
+        [
+            Hoja(
+                titulo="Web Transferencia",
+                filas=_filas(),
+                encabezado=["Código/EAN", "Precio", "ID Moneda"],
+                estilo_encabezado=None,
+            )
+        ],
+        "web_transferencia.xlsx",
     )
 
 
@@ -1215,8 +1180,6 @@ def exportar_clasica(
     # Verificar permiso
     if not verificar_permiso(db, current_user, "productos.exportar_clasica"):
         raise HTTPException(status_code=403, detail="No tienes permiso para exportar lista de precios clásica")
-    from io import BytesIO
-    from openpyxl import Workbook
     from app.models.tipo_cambio import TipoCambio
 
     # Obtener productos con precio clásica y precios con cuotas
@@ -1308,19 +1271,8 @@ def exportar_clasica(
             query = query.filter(ProductoERP.item_id.in_(item_ids_audit))
         else:
             # Si no hay productos con las auditorías filtradas, retornar vacío
-            from io import BytesIO
-            from openpyxl import Workbook
-
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["No se encontraron productos con los filtros aplicados"])
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            return Response(
-                content=output.getvalue(),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": "attachment; filename=exportacion_clasica_vacia.xlsx"},
+            return _xlsx_vacio(
+                "No se encontraron productos con los filtros aplicados", "exportacion_clasica_vacia.xlsx"
             )
 
     # Aplicar filtros básicos (con soporte para operadores *, +, :)
@@ -1355,20 +1307,7 @@ def exportar_clasica(
             )
         else:
             # Si el PM no tiene marcas asignadas, no hay productos
-            from io import BytesIO
-            from openpyxl import Workbook
-
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["No hay productos para los PMs seleccionados"])
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            return Response(
-                content=output.getvalue(),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": "attachment; filename=exportacion_clasica_vacia.xlsx"},
-            )
+            return _xlsx_vacio("No hay productos para los PMs seleccionados", "exportacion_clasica_vacia.xlsx")
 
     # Filtro por colores
     if colores:
@@ -1494,34 +1433,38 @@ def exportar_clasica(
         or markup_web_transf_positivo is not None
         or con_oferta is not None
     ):
-        from app.services.pricing_calculator import (
-            obtener_tipo_cambio_actual,
-            convertir_a_pesos,
-            obtener_grupo_subcategoria,
-            obtener_comision_base,
-            calcular_comision_ml_total,
-            calcular_limpio,
-            calcular_markup,
+        from app.services.pricing_snapshot_service import (
+            LISTA_CLASICA,
+            cargar_contexto_pricing,
+            obtener_snapshot,
         )
-        from app.models.oferta_ml import OfertaML
-        from app.models.publicacion_ml import PublicacionML
-        from datetime import date
+
+        # Markup rebate y ofertas salen del snapshot de pricing (mismos valores
+        # que GET /productos); sólo se calculan en el momento los ítems stale.
+        item_ids_filtro = [producto[0] for producto in productos]
+        pares = (
+            db.query(ProductoERP, ProductoPricing)
+            .join(ProductoPricing, ProductoERP.item_id == ProductoPricing.item_id)
+            .filter(ProductoERP.item_id.in_(item_ids_filtro))
+            .all()
+            if item_ids_filtro
+            else []
+        )
+        pricing_by_item = {erp.item_id: pricing for erp, pricing in pares}
+        snapshot_by_item = {}
+        if markup_rebate_positivo is not None or con_oferta is not None:
+            snapshot_by_item = obtener_snapshot(db, cargar_contexto_pricing(db), pares)
 
         productos_filtrados = []
-        hoy = date.today()
 
         for producto in productos:
             item_id = producto[0]
             incluir = True
 
-            # Obtener ProductoERP para el item_id
-            producto_erp = db.query(ProductoERP).filter(ProductoERP.item_id == item_id).first()
-            if not producto_erp:
-                continue
-
-            producto_pricing = db.query(ProductoPricing).filter(ProductoPricing.item_id == item_id).first()
+            producto_pricing = pricing_by_item.get(item_id)
             if not producto_pricing:
                 continue
+            clasica = snapshot_by_item.get(item_id, {}).get(LISTA_CLASICA, {})
 
             # Filtro de markup clásica
             if markup_clasica_positivo is not None and incluir:
@@ -1536,60 +1479,18 @@ def exportar_clasica(
 
             # Filtro de markup rebate
             if markup_rebate_positivo is not None and incluir:
-                if producto_pricing and producto_pricing.participa_rebate and producto_pricing.precio_lista_ml:
-                    try:
-                        precio_rebate = float(producto_pricing.precio_lista_ml) * (
-                            1 + float(producto_pricing.porcentaje_rebate or 3.8) / 100
-                        )
-                        tipo_cambio = (
-                            obtener_tipo_cambio_actual(db, "USD") if producto_erp.moneda_costo == "USD" else None
-                        )
-                        costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio)
-                        grupo_id = obtener_grupo_subcategoria(db, producto_erp.subcategoria_id)
-                        comision_base = obtener_comision_base(db, 4, grupo_id)  # 4 = Clásica
-                        if comision_base:
-                            comisiones = calcular_comision_ml_total(
-                                precio_rebate, comision_base, producto_erp.iva, db=db
-                            )
-                            limpio = calcular_limpio(
-                                precio_rebate,
-                                producto_erp.iva,
-                                producto_erp.envio or 0,
-                                comisiones["comision_total"],
-                                db=db,
-                                grupo_id=grupo_id,
-                            )
-                            markup_rebate = calcular_markup(limpio, costo_ars) * 100
-                            if markup_rebate_positivo and markup_rebate < 0:
-                                incluir = False
-                            elif not markup_rebate_positivo and markup_rebate >= 0:
-                                incluir = False
-                        else:
-                            incluir = False
-                    except Exception as e:
-                        logger.warning("Error calculando markup rebate para item %s: %s", item_id, e)
+                markup_rebate = clasica.get("markup_rebate")
+                if markup_rebate is not None:
+                    if markup_rebate_positivo and markup_rebate < 0:
+                        incluir = False
+                    elif not markup_rebate_positivo and markup_rebate >= 0:
                         incluir = False
                 else:
                     incluir = False
 
             # Filtro de oferta
             if con_oferta is not None and incluir:
-                pubs = db.query(PublicacionML).filter(PublicacionML.item_id == item_id).all()
-                tiene_oferta = False
-                for pub in pubs:
-                    oferta = (
-                        db.query(OfertaML)
-                        .filter(
-                            OfertaML.mla == pub.mla,
-                            OfertaML.fecha_desde <= hoy,
-                            OfertaML.fecha_hasta >= hoy,
-                            OfertaML.pvp_seller.isnot(None),
-                        )
-                        .first()
-                    )
-                    if oferta:
-                        tiene_oferta = True
-                        break
+                tiene_oferta = clasica.get("mejor_oferta_mla") is not None
                 if con_oferta and not tiene_oferta:
                     incluir = False
                 elif not con_oferta and tiene_oferta:
@@ -1690,128 +1591,118 @@ def exportar_clasica(
     # Determinar el número máximo de MLAs que tiene cualquier producto
     max_mlas = max([len(mlas) for mlas in mla_por_item.values()]) if mla_por_item else 0
 
-    # Crear Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = tipo_cuotas.title()
-
     # Header - Columnas base + una columna por cada MLA
     header = ["Código/EAN", "Precio", "ID Moneda"]
     for i in range(max_mlas):
         header.append(f"MLA {i + 1}")
-    ws.append(header)
 
-    # Datos
-    for (
-        item_id,
-        codigo,
-        precio_clasica,
-        participa_rebate,
-        porcentaje_rebate,
-        precio_3,
-        precio_6,
-        precio_9,
-        precio_12,
-        precio_pvp,
-        precio_pvp_3,
-        precio_pvp_6,
-        precio_pvp_9,
-        precio_pvp_12,
-    ) in productos:
-        # Determinar qué precio usar según tipo_cuotas
-        if tipo_cuotas == "clasica":
-            # Si tiene rebate activo, calcular precio rebate y aplicar % adicional
-            if participa_rebate and porcentaje_rebate:
-                precio_rebate = precio_clasica * (1 + float(porcentaje_rebate) / 100)
-                precio_exportar = precio_rebate * (1 + porcentaje_adicional / 100)
+    # Datos: `productos` ya está en memoria (hace falta para max_mlas y los
+    # post-filtros); lo que no se arma es el Workbook entero.
+    def _filas():
+        for (
+            item_id,
+            codigo,
+            precio_clasica,
+            participa_rebate,
+            porcentaje_rebate,
+            precio_3,
+            precio_6,
+            precio_9,
+            precio_12,
+            precio_pvp,
+            precio_pvp_3,
+            precio_pvp_6,
+            precio_pvp_9,
+            precio_pvp_12,
+        ) in productos:
+            # Determinar qué precio usar según tipo_cuotas
+            if tipo_cuotas == "clasica":
+                # Si tiene rebate activo, calcular precio rebate y aplicar % adicional
+                if participa_rebate and porcentaje_rebate:
+                    precio_rebate = precio_clasica * (1 + float(porcentaje_rebate) / 100)
+                    precio_exportar = precio_rebate * (1 + porcentaje_adicional / 100)
+                else:
+                    # Si no tiene rebate, usar precio clásica sin modificar
+                    precio_exportar = precio_clasica
+            elif tipo_cuotas == "3":
+                # Si no hay precio de 3 cuotas, saltar este producto
+                if not precio_3:
+                    continue
+                precio_exportar = float(precio_3)
+            elif tipo_cuotas == "6":
+                # Si no hay precio de 6 cuotas, saltar este producto
+                if not precio_6:
+                    continue
+                precio_exportar = float(precio_6)
+            elif tipo_cuotas == "9":
+                # Si no hay precio de 9 cuotas, saltar este producto
+                if not precio_9:
+                    continue
+                precio_exportar = float(precio_9)
+            elif tipo_cuotas == "12":
+                # Si no hay precio de 12 cuotas, saltar este producto
+                if not precio_12:
+                    continue
+                precio_exportar = float(precio_12)
+            elif tipo_cuotas == "pvp":
+                # Usar precio PVP clásico (sin cuotas)
+                if not precio_pvp:
+                    continue
+                precio_exportar = float(precio_pvp)
+            elif tipo_cuotas == "pvp_3":
+                # Si no hay precio PVP 3 cuotas, saltar este producto
+                if not precio_pvp_3:
+                    continue
+                precio_exportar = float(precio_pvp_3)
+            elif tipo_cuotas == "pvp_6":
+                # Si no hay precio PVP 6 cuotas, saltar este producto
+                if not precio_pvp_6:
+                    continue
+                precio_exportar = float(precio_pvp_6)
+            elif tipo_cuotas == "pvp_9":
+                # Si no hay precio PVP 9 cuotas, saltar este producto
+                if not precio_pvp_9:
+                    continue
+                precio_exportar = float(precio_pvp_9)
+            elif tipo_cuotas == "pvp_12":
+                # Si no hay precio PVP 12 cuotas, saltar este producto
+                if not precio_pvp_12:
+                    continue
+                precio_exportar = float(precio_pvp_12)
             else:
-                # Si no tiene rebate, usar precio clásica sin modificar
                 precio_exportar = precio_clasica
-        elif tipo_cuotas == "3":
-            # Si no hay precio de 3 cuotas, saltar este producto
-            if not precio_3:
-                continue
-            precio_exportar = float(precio_3)
-        elif tipo_cuotas == "6":
-            # Si no hay precio de 6 cuotas, saltar este producto
-            if not precio_6:
-                continue
-            precio_exportar = float(precio_6)
-        elif tipo_cuotas == "9":
-            # Si no hay precio de 9 cuotas, saltar este producto
-            if not precio_9:
-                continue
-            precio_exportar = float(precio_9)
-        elif tipo_cuotas == "12":
-            # Si no hay precio de 12 cuotas, saltar este producto
-            if not precio_12:
-                continue
-            precio_exportar = float(precio_12)
-        elif tipo_cuotas == "pvp":
-            # Usar precio PVP clásico (sin cuotas)
-            if not precio_pvp:
-                continue
-            precio_exportar = float(precio_pvp)
-        elif tipo_cuotas == "pvp_3":
-            # Si no hay precio PVP 3 cuotas, saltar este producto
-            if not precio_pvp_3:
-                continue
-            precio_exportar = float(precio_pvp_3)
-        elif tipo_cuotas == "pvp_6":
-            # Si no hay precio PVP 6 cuotas, saltar este producto
-            if not precio_pvp_6:
-                continue
-            precio_exportar = float(precio_pvp_6)
-        elif tipo_cuotas == "pvp_9":
-            # Si no hay precio PVP 9 cuotas, saltar este producto
-            if not precio_pvp_9:
-                continue
-            precio_exportar = float(precio_pvp_9)
-        elif tipo_cuotas == "pvp_12":
-            # Si no hay precio PVP 12 cuotas, saltar este producto
-            if not precio_pvp_12:
-                continue
-            precio_exportar = float(precio_pvp_12)
-        else:
-            precio_exportar = precio_clasica
-
-        # Si es USD, dividir por dólar ajustado
-        if currency_id == 2 and dolar_ajustado:
-            precio_final = precio_exportar / dolar_ajustado
-            # Para USD, redondear a 2 decimales
-            precio_str = f"{precio_final:.2f}"
-        elif tipo_cuotas.startswith("pvp"):
-            # Para PVP en ARS, exportar precio exacto sin redondear
-            precio_str = f"{float(precio_exportar):.2f}"
-        else:
-            # Para ARS (clásica/cuotas), redondear a múltiplo de 10
-            precio_final = round(precio_exportar / 10) * 10
-            precio_str = str(int(precio_final))
 
-        # Obtener MLAs de la lista seleccionada para este item
-        mlas = mla_por_item.get(item_id, [])
+            # Si es USD, dividir por dólar ajustado
+            if currency_id == 2 and dolar_ajustado:
+                precio_final = precio_exportar / dolar_ajustado
+                # Para USD, redondear a 2 decimales
+                precio_str = f"{precio_final:.2f}"
+            elif tipo_cuotas.startswith("pvp"):
+                # Para PVP en ARS, exportar precio exacto sin redondear
+                precio_str = f"{float(precio_exportar):.2f}"
+            else:
+                # Para ARS (clásica/cuotas), redondear a múltiplo de 10
+                precio_final = round(precio_exportar / 10) * 10
+                precio_str = str(int(precio_final))
 
-        # Crear fila con columnas base
-        fila = [str(codigo), precio_str, str(currency_id)]
+            # Obtener MLAs de la lista seleccionada para este item
+            mlas = mla_por_item.get(item_id, [])
 
-        # Agregar cada MLA en su propia columna
-        for i in range(max_mlas):
-            if i < len(mlas):
-                fila.append(mlas[i])
-            else:
-                fila.append("")  # Columna vacía si no hay MLA
+            # Crear fila con columnas base
+            fila = [str(codigo), precio_str, str(currency_id)]
 
-        ws.append(fila)
+            # Agregar cada MLA en su propia columna
+            for i in range(max_mlas):
+                if i < len(mlas):
+                    fila.append(mlas[i])
+                else:
+                    fila.append("")  # Columna vacía si no hay MLA
 
-    # Guardar en memoria
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+            yield fila
 
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=clasica.xlsx"},
+    return respuesta_xlsx(
+        [Hoja(titulo=tipo_cuotas.title(), filas=_filas(), encabezado=header, estilo_encabezado=None)],
+        "clasica.xlsx",
     )
 
 
@@ -1854,11 +1745,6 @@ def exportar_vista_actual(
             f"Exportar vista actual - Filtros TN: con_descuento={tiendanube_con_descuento}, sin_descuento={tiendanube_sin_descuento}, no_publicado={tiendanube_no_publicado}"
         )
 
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from io import BytesIO
-        from fastapi.responses import StreamingResponse
-
         # Usar la misma lógica de obtener_productos para filtrar
         query = db.query(ProductoERP, ProductoPricing).outerjoin(
             ProductoPricing, ProductoERP.item_id == ProductoPricing.item_id
@@ -2085,14 +1971,8 @@ def exportar_vista_actual(
                     ~ProductoERP.item_id.in_(select(items_activos.c.item_id)),
                 )
 
-        # Ejecutar query
-        productos = query.limit(page_size).offset((page - 1) * page_size).all()
-        logger.info(f"Se encontraron {len(productos)} productos para exportar")
-
-        # Crear Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Vista Actual"
+        # Ejecutar query (cursor server-side: se lee a medida que se escribe el Excel)
+        productos = filas_por_lotes(query.limit(page_size).offset((page - 1) * page_size))
 
         # Encabezados
         headers = [
@@ -2115,112 +1995,60 @@ def exportar_vista_actual(
             "Out of Cards",
             "Color",
         ]
+        # Anchos fijos: el writer en streaming no puede auto-ajustar por contenido
+        anchos = [15, 50, 15, 8, 12, 14, 18, 14, 18, 14, 18, 17, 15, 12, 16, 13, 13, 12]
 
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal="center")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.font = Font(bold=True, color="FFFFFF")
+        def _float(valor):
+            return float(valor) if valor else None
 
         # Datos
-        row_num = 2
-        for producto_erp, producto_pricing in productos:
-            ws.cell(row=row_num, column=1, value=producto_erp.codigo or "")
-            ws.cell(row=row_num, column=2, value=producto_erp.descripcion or "")
-            ws.cell(row=row_num, column=3, value=producto_erp.marca or "")
-            ws.cell(row=row_num, column=4, value=producto_erp.stock or 0)
-            ws.cell(row=row_num, column=5, value=float(producto_erp.costo) if producto_erp.costo else 0)
-
-            if producto_pricing:
-                ws.cell(
-                    row=row_num,
-                    column=6,
-                    value=float(producto_pricing.precio_lista_ml) if producto_pricing.precio_lista_ml else None,
+        def _filas():
+            for producto_erp, producto_pricing in productos:
+                fila = [
+                    producto_erp.codigo or "",
+                    producto_erp.descripcion or "",
+                    producto_erp.marca or "",
+                    producto_erp.stock or 0,
+                    float(producto_erp.costo) if producto_erp.costo else 0,
+                ]
+
+                if producto_pricing:
+                    # Calcular precio rebate dinámicamente (misma fórmula que el listado)
+                    precio_rebate = None
+                    if producto_pricing.participa_rebate and producto_pricing.precio_lista_ml:
+                        porcentaje_rebate = float(producto_pricing.porcentaje_rebate or 3.8)
+                        precio_rebate = float(producto_pricing.precio_lista_ml) / (1 - porcentaje_rebate / 100)
+
+                    fila += [
+                        _float(producto_pricing.precio_lista_ml),
+                        _float(producto_pricing.markup_calculado),
+                        precio_rebate,
+                        _float(producto_pricing.markup_rebate),
+                        _float(producto_pricing.precio_3_cuotas),
+                        _float(producto_pricing.markup_oferta),
+                        _float(producto_pricing.precio_web_transferencia),
+                        _float(producto_pricing.markup_web_real),
+                        # Tienda Nube
+                        _float(producto_pricing.precio_tiendanube),
+                        _float(producto_pricing.descuento_tiendanube),
+                        "Sí" if producto_pricing.publicado_tiendanube else "No",
+                        "Sí" if producto_pricing.out_of_cards else "No",
+                        producto_pricing.color_marcado or "",
+                    ]
+
+                yield fila
+
+        return respuesta_xlsx(
+            [
+                Hoja(
+                    titulo="Vista Actual",
+                    filas=_filas(),
+                    encabezado=headers,
+                    estilo_encabezado=ENCABEZADO_AZUL,
+                    anchos=anchos,
                 )
-                ws.cell(
-                    row=row_num,
-                    column=7,
-                    value=float(producto_pricing.markup_calculado) if producto_pricing.markup_calculado else None,
-                )
-
-                # Calcular precio rebate dinámicamente (misma fórmula que el listado)
-                precio_rebate = None
-                if producto_pricing.participa_rebate and producto_pricing.precio_lista_ml:
-                    porcentaje_rebate = float(producto_pricing.porcentaje_rebate or 3.8)
-                    precio_rebate = float(producto_pricing.precio_lista_ml) / (1 - porcentaje_rebate / 100)
-                ws.cell(row=row_num, column=8, value=precio_rebate)
-
-                ws.cell(
-                    row=row_num,
-                    column=9,
-                    value=float(producto_pricing.markup_rebate) if producto_pricing.markup_rebate else None,
-                )
-                ws.cell(
-                    row=row_num,
-                    column=10,
-                    value=float(producto_pricing.precio_3_cuotas) if producto_pricing.precio_3_cuotas else None,
-                )
-                ws.cell(
-                    row=row_num,
-                    column=11,
-                    value=float(producto_pricing.markup_oferta) if producto_pricing.markup_oferta else None,
-                )
-                ws.cell(
-                    row=row_num,
-                    column=12,
-                    value=float(producto_pricing.precio_web_transferencia)
-                    if producto_pricing.precio_web_transferencia
-                    else None,
-                )
-                ws.cell(
-                    row=row_num,
-                    column=13,
-                    value=float(producto_pricing.markup_web_real) if producto_pricing.markup_web_real else None,
-                )
-
-                # Tienda Nube
-                ws.cell(
-                    row=row_num,
-                    column=14,
-                    value=float(producto_pricing.precio_tiendanube) if producto_pricing.precio_tiendanube else None,
-                )
-                ws.cell(
-                    row=row_num,
-                    column=15,
-                    value=float(producto_pricing.descuento_tiendanube)
-                    if producto_pricing.descuento_tiendanube
-                    else None,
-                )
-                ws.cell(row=row_num, column=16, value="Sí" if producto_pricing.publicado_tiendanube else "No")
-
-                ws.cell(row=row_num, column=17, value="Sí" if producto_pricing.out_of_cards else "No")
-                ws.cell(row=row_num, column=18, value=producto_pricing.color_marcado or "")
-
-            row_num += 1
-
-        # Ajustar anchos de columna
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                except Exception as e:
-                    logger.warning("Error calculando ancho de columna %s: %s", column_letter, e)
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Guardar en BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=vista_actual.xlsx"},
+            ],
+            "vista_actual.xlsx",
         )
     except Exception as e:
         logger.error("Error en exportar_vista_actual: %s", e, exc_info=True)
@@ -2241,10 +2069,6 @@ def exportar_lista_gremio(
     current_user: Usuario = Depends(get_current_user),
 ):
     """Exporta Lista Gremio a Excel con precios calculados. Soporta ARS y USD."""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from io import BytesIO
-    from fastapi.responses import StreamingResponse
     from sqlalchemy import text
     from app.models.markup_tienda import MarkupTiendaBrand, MarkupTiendaProducto
     from app.services.pricing_calculator import obtener_constantes_pricing, obtener_tipo_cambio_actual
@@ -2312,7 +2136,7 @@ def exportar_lista_gremio(
                 query = query.filter(ProductoPricing.color_marcado_tienda.in_(colores_list))
 
         # Ejecutar query
-        results = query.order_by(ProductoERP.marca, ProductoERP.codigo).all()
+        results = filas_por_lotes(query.order_by(ProductoERP.marca, ProductoERP.codigo))
 
         # Función para convertir a pesos
         def convertir_a_pesos(costo, moneda):
@@ -2323,11 +2147,6 @@ def exportar_lista_gremio(
                 return costo_float * tipo_cambio
             return costo_float
 
-        # Crear Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Lista Gremio"
-
         # Headers - cambiar según moneda
         moneda_texto = "USD" if currency_id == 2 else "ARS"
         headers = [
@@ -2340,81 +2159,70 @@ def exportar_lista_gremio(
             f"Precio Gremio {moneda_texto} s/IVA",
             f"Precio Gremio {moneda_texto} c/IVA",
         ]
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
-
-        # Datos
-        row_num = 2
-        for producto_erp, producto_pricing in results:
-            # Calcular costo en ARS
-            costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo)
-
-            # Calcular precio gremio - Verificar override manual primero
-            precio_gremio_sin_iva = None
-            precio_gremio_con_iva = None
-            markup_gremio = None
-
-            # Si existe override manual, usar esos precios
-            if producto_erp.item_id in precio_gremio_overrides:
-                override = precio_gremio_overrides[producto_erp.item_id]
-                precio_gremio_sin_iva = float(override.precio_gremio_sin_iva_manual)
-                precio_gremio_con_iva = float(override.precio_gremio_con_iva_manual)
-            else:
-                # Calcular automáticamente según reglas
-                # Primero buscar markup por producto
-                if producto_erp.item_id in markups_producto_dict:
-                    markup_gremio = markups_producto_dict[producto_erp.item_id]
-                # Si no, buscar por marca
-                elif producto_erp.marca and producto_erp.marca.upper() in markups_marca_dict:
-                    markup_gremio = markups_marca_dict[producto_erp.marca.upper()]
-
-                if markup_gremio is not None and costo_ars and costo_ars > 0:
-                    precio_gremio_sin_iva = costo_ars * (1 + varios_porcentaje / 100) * (1 + markup_gremio / 100)
-                    iva_producto = producto_erp.iva if producto_erp.iva else 21.0
-                    precio_gremio_con_iva = precio_gremio_sin_iva * (1 + iva_producto / 100)
-
-            # Convertir a USD si es necesario
-            if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
-                if precio_gremio_sin_iva:
-                    precio_gremio_sin_iva = precio_gremio_sin_iva / tipo_cambio_ajustado
-                if precio_gremio_con_iva:
-                    precio_gremio_con_iva = precio_gremio_con_iva / tipo_cambio_ajustado
-
-            # Filtro de solo productos con precio gremio
-            if con_precio_gremio and precio_gremio_sin_iva is None:
-                continue
 
-            ws.cell(row=row_num, column=1, value=producto_erp.marca or "")
-            ws.cell(row=row_num, column=2, value=producto_erp.categoria or "")
-            ws.cell(row=row_num, column=3, value=subcats_dict.get(producto_erp.subcategoria_id, "") or "")
-            ws.cell(row=row_num, column=4, value=producto_erp.codigo or "")
-            ws.cell(row=row_num, column=5, value=producto_erp.descripcion or "")
-            ws.cell(row=row_num, column=6, value=producto_erp.stock or 0)
-            ws.cell(row=row_num, column=7, value=round(precio_gremio_sin_iva, 2) if precio_gremio_sin_iva else None)
-            ws.cell(row=row_num, column=8, value=round(precio_gremio_con_iva, 2) if precio_gremio_con_iva else None)
-
-            row_num += 1
-
-        # Ajustar anchos de columna
-        column_widths = [15, 20, 20, 15, 50, 10, 18, 18]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[ws.cell(row=1, column=i).column_letter].width = width
-
-        # Guardar en BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=lista_gremio.xlsx"},
+        # Datos: se generan a medida que se escribe el Excel
+        def _filas():
+            for producto_erp, producto_pricing in results:
+                # Calcular costo en ARS
+                costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo)
+
+                # Calcular precio gremio - Verificar override manual primero
+                precio_gremio_sin_iva = None
+                precio_gremio_con_iva = None
+                markup_gremio = None
+
+                # Si existe override manual, usar esos precios
+                if producto_erp.item_id in precio_gremio_overrides:
+                    override = precio_gremio_overrides[producto_erp.item_id]
+                    precio_gremio_sin_iva = float(override.precio_gremio_sin_iva_manual)
+                    precio_gremio_con_iva = float(override.precio_gremio_con_iva_manual)
+                else:
+                    # Calcular automáticamente según reglas
+                    # Primero buscar markup por producto
+                    if producto_erp.item_id in markups_producto_dict:
+                        markup_gremio = markups_producto_dict[producto_erp.item_id]
+                    # Si no, buscar por marca
+                    elif producto_erp.marca and producto_erp.marca.upper() in markups_marca_dict:
+                        markup_gremio = markups_marca_dict[producto_erp.marca.upper()]
+
+                    if markup_gremio is not None and costo_ars and costo_ars > 0:
+                        precio_gremio_sin_iva = costo_ars * (1 + varios_porcentaje / 100) * (1 + markup_gremio / 100)
+                        iva_producto = producto_erp.iva if producto_erp.iva else 21.0
+                        precio_gremio_con_iva = precio_gremio_sin_iva * (1 + iva_producto / 100)
+
+                # Convertir a USD si es necesario
+                if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
+                    if precio_gremio_sin_iva:
+                        precio_gremio_sin_iva = precio_gremio_sin_iva / tipo_cambio_ajustado
+                    if precio_gremio_con_iva:
+                        precio_gremio_con_iva = precio_gremio_con_iva / tipo_cambio_ajustado
+
+                # Filtro de solo productos con precio gremio
+                if con_precio_gremio and precio_gremio_sin_iva is None:
+                    continue
+
+                yield [
+                    producto_erp.marca or "",
+                    producto_erp.categoria or "",
+                    subcats_dict.get(producto_erp.subcategoria_id, "") or "",
+                    producto_erp.codigo or "",
+                    producto_erp.descripcion or "",
+                    producto_erp.stock or 0,
+                    round(precio_gremio_sin_iva, 2) if precio_gremio_sin_iva else None,
+                    round(precio_gremio_con_iva, 2) if precio_gremio_con_iva else None,
+                ]
+
+        return respuesta_xlsx(
+            [
+                Hoja(
+                    titulo="Lista Gremio",
+                    filas=_filas(),
+                    encabezado=headers,
+                    estilo_encabezado=ENCABEZADO_AZUL,
+                    anchos=[15, 20, 20, 15, 50, 10, 18, 18],
+                )
+            ],
+            "lista_gremio.xlsx",
         )
 
     except Exception as e:
@@ -2436,10 +2244,6 @@ def exportar_lista_sugerido(
     current_user: Usuario = Depends(get_current_user),
 ):
     """Exporta Lista Precio Sugerido a Excel. Fórmula: costo * (1+varios%) * (1 + (markup_clasica + markup_sugerido)%)."""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from io import BytesIO
-    from fastapi.responses import StreamingResponse
     from sqlalchemy import text
     from app.models.markup_tienda import MarkupTiendaBrand, MarkupTiendaProducto
     from app.services.pricing_calculator import obtener_constantes_pricing, obtener_tipo_cambio_actual
@@ -2506,7 +2310,7 @@ def exportar_lista_sugerido(
                 query = query.filter(ProductoPricing.color_marcado_tienda.in_(colores_list))
 
         # Ejecutar query
-        results = query.order_by(ProductoERP.marca, ProductoERP.codigo).all()
+        results = filas_por_lotes(query.order_by(ProductoERP.marca, ProductoERP.codigo))
 
         # Función para convertir a pesos
         def convertir_a_pesos(costo, moneda):
@@ -2517,11 +2321,6 @@ def exportar_lista_sugerido(
                 return costo_float * tipo_cambio
             return costo_float
 
-        # Crear Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Lista Sugerido"
-
         # Headers
         moneda_texto = "USD" if currency_id == 2 else "ARS"
         headers = [
@@ -2537,91 +2336,72 @@ def exportar_lista_sugerido(
             f"Precio Sugerido {moneda_texto} s/IVA",
             f"Precio Sugerido {moneda_texto} c/IVA",
         ]
-        header_fill = PatternFill(start_color="4A7C59", end_color="4A7C59", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
-
-        # Datos
-        row_num = 2
-        for producto_erp, producto_pricing in results:
-            # Calcular costo en ARS
-            costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo)
-
-            # Resolver markup_sugerido (producto > marca)
-            markup_sugerido_valor = None
-            if producto_erp.item_id in markups_sugerido_producto_dict:
-                markup_sugerido_valor = markups_sugerido_producto_dict[producto_erp.item_id]
-            elif producto_erp.marca and producto_erp.marca.upper() in markups_sugerido_marca_dict:
-                markup_sugerido_valor = markups_sugerido_marca_dict[producto_erp.marca.upper()]
-
-            # markup_clasica viene de markup_calculado
-            markup_clasica = producto_pricing.markup_calculado if producto_pricing else None
-
-            # Calcular precio sugerido
-            precio_sugerido_sin_iva = None
-            precio_sugerido_con_iva = None
-            markup_total = None
-
-            if markup_clasica is not None and costo_ars and costo_ars > 0:
-                # Si no hay markup_sugerido configurado, usar 0 (precio = solo markup_clasica)
-                effective_sugerido = markup_sugerido_valor if markup_sugerido_valor is not None else 0.0
-                markup_total = markup_clasica + effective_sugerido
-                precio_sugerido_sin_iva = costo_ars * (1 + varios_porcentaje / 100) * (1 + markup_total / 100)
-                iva_producto = producto_erp.iva if producto_erp.iva else 21.0
-                precio_sugerido_con_iva = precio_sugerido_sin_iva * (1 + iva_producto / 100)
-
-            # Convertir a USD si es necesario
-            if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
-                if precio_sugerido_sin_iva:
-                    precio_sugerido_sin_iva = precio_sugerido_sin_iva / tipo_cambio_ajustado
-                if precio_sugerido_con_iva:
-                    precio_sugerido_con_iva = precio_sugerido_con_iva / tipo_cambio_ajustado
-
-            # Filtro de solo productos con precio sugerido
-            if con_precio_sugerido and precio_sugerido_sin_iva is None:
-                continue
 
-            ws.cell(row=row_num, column=1, value=producto_erp.marca or "")
-            ws.cell(row=row_num, column=2, value=producto_erp.categoria or "")
-            ws.cell(row=row_num, column=3, value=subcats_dict.get(producto_erp.subcategoria_id, "") or "")
-            ws.cell(row=row_num, column=4, value=producto_erp.codigo or "")
-            ws.cell(row=row_num, column=5, value=producto_erp.descripcion or "")
-            ws.cell(row=row_num, column=6, value=producto_erp.stock or 0)
-            ws.cell(row=row_num, column=7, value=round(markup_clasica, 2) if markup_clasica is not None else None)
-            ws.cell(
-                row=row_num,
-                column=8,
-                value=round(markup_sugerido_valor, 2) if markup_sugerido_valor is not None else None,
-            )
-            ws.cell(row=row_num, column=9, value=round(markup_total, 2) if markup_total is not None else None)
-            ws.cell(
-                row=row_num, column=10, value=round(precio_sugerido_sin_iva, 2) if precio_sugerido_sin_iva else None
-            )
-            ws.cell(
-                row=row_num, column=11, value=round(precio_sugerido_con_iva, 2) if precio_sugerido_con_iva else None
-            )
-
-            row_num += 1
-
-        # Ajustar anchos de columna
-        column_widths = [15, 20, 20, 15, 50, 10, 16, 16, 14, 20, 20]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[ws.cell(row=1, column=i).column_letter].width = width
-
-        # Guardar en BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=lista_sugerido.xlsx"},
+        # Datos: se generan a medida que se escribe el Excel
+        def _filas():
+            for producto_erp, producto_pricing in results:
+                # Calcular costo en ARS
+                costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo)
+
+                # Resolver markup_sugerido (producto > marca)
+                markup_sugerido_valor = None
+                if producto_erp.item_id in markups_sugerido_producto_dict:
+                    markup_sugerido_valor = markups_sugerido_producto_dict[producto_erp.item_id]
+                elif producto_erp.marca and producto_erp.marca.upper() in markups_sugerido_marca_dict:
+                    markup_sugerido_valor = markups_sugerido_marca_dict[producto_erp.marca.upper()]
+
+                # markup_clasica viene de markup_calculado
+                markup_clasica = producto_pricing.markup_calculado if producto_pricing else None
+
+                # Calcular precio sugerido
+                precio_sugerido_sin_iva = None
+                precio_sugerido_con_iva = None
+                markup_total = None
+
+                if markup_clasica is not None and costo_ars and costo_ars > 0:
+                    # Si no hay markup_sugerido configurado, usar 0 (precio = solo markup_clasica)
+                    effective_sugerido = markup_sugerido_valor if markup_sugerido_valor is not None else 0.0
+                    markup_total = markup_clasica + effective_sugerido
+                    precio_sugerido_sin_iva = costo_ars * (1 + varios_porcentaje / 100) * (1 + markup_total / 100)
+                    iva_producto = producto_erp.iva if producto_erp.iva else 21.0
+                    precio_sugerido_con_iva = precio_sugerido_sin_iva * (1 + iva_producto / 100)
+
+                # Convertir a USD si es necesario
+                if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
+                    if precio_sugerido_sin_iva:
+                        precio_sugerido_sin_iva = precio_sugerido_sin_iva / tipo_cambio_ajustado
+                    if precio_sugerido_con_iva:
+                        precio_sugerido_con_iva = precio_sugerido_con_iva / tipo_cambio_ajustado
+
+                # Filtro de solo productos con precio sugerido
+                if con_precio_sugerido and precio_sugerido_sin_iva is None:
+                    continue
+
+                yield [
+                    producto_erp.marca or "",
+                    producto_erp.categoria or "",
+                    subcats_dict.get(producto_erp.subcategoria_id, "") or "",
+                    producto_erp.codigo or "",
+                    producto_erp.descripcion or "",
+                    producto_erp.stock or 0,
+                    round(markup_clasica, 2) if markup_clasica is not None else None,
+                    round(markup_sugerido_valor, 2) if markup_sugerido_valor is not None else None,
+                    round(markup_total, 2) if markup_total is not None else None,
+                    round(precio_sugerido_sin_iva, 2) if precio_sugerido_sin_iva else None,
+                    round(precio_sugerido_con_iva, 2) if precio_sugerido_con_iva else None,
+                ]
+
+        return respuesta_xlsx(
+            [
+                Hoja(
+                    titulo="Lista Sugerido",
+                    filas=_filas(),
+                    encabezado=headers,
+                    estilo_encabezado=Estilo(negrita=True, color="FFFFFF", relleno="4A7C59", horizontal="center"),
+                    anchos=[15, 20, 20, 15, 50, 10, 16, 16, 14, 20, 20],
+                )
+            ],
+            "lista_sugerido.xlsx",
         )
 
     except Exception as e:
@@ -2643,10 +2423,6 @@ def exportar_lista_web_transferencia(
 ):
     """Exporta Lista Web Transferencia a Excel con formato de lista (como Lista Gremio).
     Usa el precio_web_transferencia almacenado. Soporta ARS y USD."""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, PatternFill
-    from io import BytesIO
-    from fastapi.responses import StreamingResponse
     from sqlalchemy import text
     from app.services.pricing_calculator import obtener_tipo_cambio_actual
 
@@ -2702,12 +2478,7 @@ def exportar_lista_web_transferencia(
                 query = query.filter(ProductoPricing.color_marcado_tienda.in_(colores_list))
 
         # Ejecutar query
-        results = query.order_by(ProductoERP.marca, ProductoERP.codigo).all()
-
-        # Crear Excel
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Lista Web Transferencia"
+        results = filas_por_lotes(query.order_by(ProductoERP.marca, ProductoERP.codigo))
 
         # Headers
         moneda_texto = "USD" if currency_id == 2 else "ARS"
@@ -2721,54 +2492,43 @@ def exportar_lista_web_transferencia(
             f"Precio Web Transf. {moneda_texto} s/IVA",
             f"Precio Web Transf. {moneda_texto} c/IVA",
         ]
-        header_fill = PatternFill(start_color="2E7D32", end_color="2E7D32", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
 
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
+        # Datos: se generan a medida que se escribe el Excel
+        def _filas():
+            for producto_erp, producto_pricing in results:
+                precio_con_iva = float(producto_pricing.precio_web_transferencia)
 
-        # Datos
-        row_num = 2
-        for producto_erp, producto_pricing in results:
-            precio_con_iva = float(producto_pricing.precio_web_transferencia)
-
-            # Derivar precio sin IVA
-            iva_producto = producto_erp.iva if producto_erp.iva else 21.0
-            precio_sin_iva = precio_con_iva / (1 + iva_producto / 100)
-
-            # Convertir a USD si es necesario
-            if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
-                precio_sin_iva = precio_sin_iva / tipo_cambio_ajustado
-                precio_con_iva = precio_con_iva / tipo_cambio_ajustado
-
-            ws.cell(row=row_num, column=1, value=producto_erp.marca or "")
-            ws.cell(row=row_num, column=2, value=producto_erp.categoria or "")
-            ws.cell(row=row_num, column=3, value=subcats_dict.get(producto_erp.subcategoria_id, "") or "")
-            ws.cell(row=row_num, column=4, value=producto_erp.codigo or "")
-            ws.cell(row=row_num, column=5, value=producto_erp.descripcion or "")
-            ws.cell(row=row_num, column=6, value=producto_erp.stock or 0)
-            ws.cell(row=row_num, column=7, value=round(precio_sin_iva, 2))
-            ws.cell(row=row_num, column=8, value=round(precio_con_iva, 2))
-
-            row_num += 1
-
-        # Ajustar anchos de columna
-        column_widths = [15, 20, 20, 15, 50, 10, 22, 22]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[ws.cell(row=1, column=i).column_letter].width = width
-
-        # Guardar en BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=lista_web_transferencia.xlsx"},
+                # Derivar precio sin IVA
+                iva_producto = producto_erp.iva if producto_erp.iva else 21.0
+                precio_sin_iva = precio_con_iva / (1 + iva_producto / 100)
+
+                # Convertir a USD si es necesario
+                if currency_id == 2 and tipo_cambio_ajustado and tipo_cambio_ajustado > 0:
+                    precio_sin_iva = precio_sin_iva / tipo_cambio_ajustado
+                    precio_con_iva = precio_con_iva / tipo_cambio_ajustado
+
+                yield [
+                    producto_erp.marca or "",
+                    producto_erp.categoria or "",
+                    subcats_dict.get(producto_erp.subcategoria_id, "") or "",
+                    producto_erp.codigo or "",
+                    producto_erp.descripcion or "",
+                    producto_erp.stock or 0,
+                    round(precio_sin_iva, 2),
+                    round(precio_con_iva, 2),
+                ]
+
+        return respuesta_xlsx(
+            [
+                Hoja(
+                    titulo="Lista Web Transferencia",
+                    filas=_filas(),
+                    encabezado=headers,
+                    estilo_encabezado=Estilo(negrita=True, color="FFFFFF", relleno="2E7D32", horizontal="center"),
+                    anchos=[15, 20, 20, 15, 50, 10, 22, 22],
+                )
+            ],
+            "lista_web_transferencia.xlsx",
         )
 
     except Exception as e:
@@ -7,7 +7,8 @@ from app.models.producto import ProductoERP, ProductoPricing
 from app.models.usuario import Usuario
 from datetime import UTC, date
 from app.api.deps import get_current_user
-from app.services.envio_real_service import resolver_costos_envio_batch, resolver_costo_envio
+from app.services.envio_real_service import resolver_costo_envio
+from app.services.productos_paginacion import CursorInvalidoError, paginar, parse_orden
 import logging
 
 from app.api.endpoints.productos_shared import (  # noqa: F401
@@ -56,6 +57,7 @@ def listar_productos(
     estado_mla: Optional[str] = None,
     nuevos_ultimos_7_dias: Optional[bool] = None,
     tienda_oficial: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user),
 ):
@@ -532,301 +534,56 @@ def listar_productos(
         )
         query = query.filter(ProductoERP.item_id.in_(item_ids_tienda))
 
-    # Ordenamiento
-    orden_requiere_calculo = False
-    if orden_campos and orden_direcciones:
-        campos = orden_campos.split(",")
-        direcciones = orden_direcciones.split(",")
-
-        for campo, direccion in zip(campos, direcciones):
-            # Mapeo de campos del frontend a columnas de la DB
-            if campo == "item_id":
-                col = ProductoERP.item_id
-            elif campo == "codigo":
-                col = ProductoERP.codigo
-            elif campo == "descripcion":
-                col = ProductoERP.descripcion
-            elif campo == "marca":
-                col = ProductoERP.marca
-            elif campo == "moneda_costo":
-                col = ProductoERP.moneda_costo
-            elif campo == "costo":
-                col = ProductoERP.costo
-            elif campo == "stock":
-                col = ProductoERP.stock
-            elif campo == "precio_lista_ml":
-                col = ProductoPricing.precio_lista_ml
-            elif campo == "markup" or campo == "precio_clasica":
-                col = ProductoPricing.markup_calculado
-            elif campo == "precio_rebate":
-                # Markup rebate requiere cálculo dinámico
-                orden_requiere_calculo = True
-                continue
-            elif campo == "mejor_oferta":
-                # Mejor oferta requiere cálculo dinámico
-                orden_requiere_calculo = True
-                continue
-            elif campo == "web_transf":
-                col = ProductoPricing.markup_web_real
-            else:
-                continue
-
-            if direccion == "asc":
-                query = query.order_by(col.asc().nullslast())
-            else:
-                query = query.order_by(col.desc().nullslast())
-
-    # Contar total y paginar
-    # Los filtros de markup ahora se aplican en SQL, no necesitamos traer todo
-    total_productos = None
-    if not orden_requiere_calculo:
-        total_productos = query.count()
-        offset = (page - 1) * page_size
-        results = query.offset(offset).limit(page_size).all()
-    else:
-        # Solo si hay ordenamiento que requiere cálculo dinámico
-        results = query.all()
-        len(results)
-
-    from app.models.oferta_ml import OfertaML
-    from app.models.publicacion_ml import PublicacionML
-    from app.services.pricing_calculator import (
-        obtener_tipo_cambio_actual,
-        convertir_a_pesos,
-        calcular_comision_ml_total,
-        calcular_limpio,
-        calcular_markup,
-        obtener_constantes_pricing,
-        GRUPO_DEFAULT,
-    )
-    from app.models.comision_config import SubcategoriaGrupo
-    from app.models.comision_versionada import ComisionVersion, ComisionBase, ComisionAdicionalCuota
-    from datetime import date
-
-    hoy = date.today()
-
-    # ── T-3: Prefetch tipo_cambio + constantes ──────────────────────────
-    tipo_cambio_usd = obtener_tipo_cambio_actual(db, "USD")
-    constantes = obtener_constantes_pricing(db)
-
-    # ── T-4: Prefetch SubcategoriaGrupo mapping ─────────────────────────
-    all_subcat_grupos = db.query(SubcategoriaGrupo).all()
-    subcat_to_grupo = {sg.subcat_id: sg.grupo_id for sg in all_subcat_grupos}
-
-    # ── T-5: Prefetch comision lookup ───────────────────────────────────
-    _pricelist_pvp_to_web = {
-        12: 4,
-        18: 17,
-        19: 14,
-        20: 13,
-        21: 23,
-    }
-    _pricelist_to_cuotas = {17: 3, 14: 6, 13: 9, 23: 12}
-
-    _active_version = (
-        db.query(ComisionVersion)
-        .filter(
-            and_(
-                ComisionVersion.fecha_desde <= hoy,
-                or_(ComisionVersion.fecha_hasta.is_(None), ComisionVersion.fecha_hasta >= hoy),
-                ComisionVersion.activo == True,
-            )
-        )
-        .first()
+    # Ordenamiento + paginación en SQL (keyset si viene cursor).
+    # Sólo se enriquecen (ofertas, catálogo, TN, PVP) las filas de la página.
+    orden = parse_orden(orden_campos, orden_direcciones)
+    total = query.count()
+    try:
+        results, next_cursor = paginar(query, orden, page, page_size, cursor=cursor)
+    except CursorInvalidoError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    from app.services.pricing_snapshot_service import (
+        LISTA_CLASICA,
+        cargar_contexto_pricing,
+        cargar_pubs_items,
+        obtener_snapshot,
     )
-    _comision_base_map: dict = {}
-    _comision_adicional_map: dict = {}
-    if _active_version:
-        for cb in db.query(ComisionBase).filter(ComisionBase.version_id == _active_version.id).all():
-            _comision_base_map[(_active_version.id, cb.grupo_id)] = float(cb.comision_base)
-        for ca in (
-            db.query(ComisionAdicionalCuota).filter(ComisionAdicionalCuota.version_id == _active_version.id).all()
-        ):
-            _comision_adicional_map[(_active_version.id, ca.cuotas)] = float(ca.adicional)
-
-    def _lookup_comision(pricelist_id: int, grupo_id: int):
-        """Pure dict lookup replacement for obtener_comision_base."""
-        resolved_pl = _pricelist_pvp_to_web.get(pricelist_id, pricelist_id)
-        if not _active_version:
-            return None
-        base = _comision_base_map.get((_active_version.id, grupo_id))
-        if base is None:
-            return None
-        if resolved_pl == 4:
-            return base
-        cuotas = _pricelist_to_cuotas.get(resolved_pl)
-        if cuotas is None:
-            return base
-        adicional = _comision_adicional_map.get((_active_version.id, cuotas), 0)
-        return base + adicional
-
-    # ── T-6: Prefetch envio_promedio_grupo (single bulk query) ─────────
-    from app.models.producto import ProductoERP as _PE_envio
-
-    unique_grupo_ids = set(subcat_to_grupo.values())
-    envio_promedio_by_grupo: dict = {gid: 0.0 for gid in unique_grupo_ids}
-    # Build reverse map: grupo_id -> [subcat_ids]
-    _grupo_to_subcats: dict = {}
-    for sc_id, g_id in subcat_to_grupo.items():
-        _grupo_to_subcats.setdefault(g_id, []).append(sc_id)
-    # All subcat_ids that belong to any grupo
-    _all_subcat_ids_envio = list(subcat_to_grupo.keys())
-    if _all_subcat_ids_envio:
-        _envio_rows = (
-            db.query(_PE_envio.subcategoria_id, func.avg(_PE_envio.envio))
-            .filter(
-                _PE_envio.subcategoria_id.in_(_all_subcat_ids_envio),
-                _PE_envio.activo == True,
-                _PE_envio.envio > 0,
-            )
-            .group_by(_PE_envio.subcategoria_id)
-            .all()
-        )
-        # Aggregate per grupo
-        _subcat_envio_avg = {sc_id: float(avg_val) for sc_id, avg_val in _envio_rows}
-        for gid, sc_list in _grupo_to_subcats.items():
-            vals = [_subcat_envio_avg[sc] for sc in sc_list if sc in _subcat_envio_avg]
-            if vals:
-                envio_promedio_by_grupo[gid] = sum(vals) / len(vals)
-
-    # ── T-7: Batch-load PublicacionML + OfertaML ────────────────────────
+
+    # Contexto global de pricing (tipo de cambio, constantes, comisiones, envío
+    # promedio) + snapshot de la página: las filas vigentes se leen de
+    # pricing_snapshots; sólo las faltantes/stale se calculan acá.
+    ctx_pricing = cargar_contexto_pricing(db)
     all_item_ids_page = [r[0].item_id for r in results]
-    all_pubs = (
-        db.query(PublicacionML).filter(PublicacionML.item_id.in_(all_item_ids_page)).all() if all_item_ids_page else []
-    )
-    pubs_by_item: dict = {}
-    all_mla_list: list = []
-    for pub in all_pubs:
-        pubs_by_item.setdefault(pub.item_id, []).append(pub)
-        all_mla_list.append(pub.mla)
-
-    ofertas_by_mla: dict = {}
-    if all_mla_list:
-        all_ofertas = (
-            db.query(OfertaML)
-            .filter(
-                OfertaML.mla.in_(all_mla_list),
-                OfertaML.fecha_desde <= hoy,
-                OfertaML.fecha_hasta >= hoy,
-                OfertaML.pvp_seller.isnot(None),
-            )
-            .all()
-        )
-        for oferta in all_ofertas:
-            if oferta.mla not in ofertas_by_mla:
-                ofertas_by_mla[oferta.mla] = oferta
-
-    # ── Batch-resolve real shipping costs (one cross-DB query per page) ──────
-    envio_real_by_item: dict[int, float] = resolver_costos_envio_batch(db, all_item_ids_page, pubs_by_item=pubs_by_item)
-
-    def _resolve_envio(item_id: int, producto_envio: float, grupo_id: int, precio: float) -> float:
-        """Resolve costo_envio: real mlwebhook cost first, then grupo average fallback."""
-        # Real cost from mlwebhook DB (already resolved as batch)
-        real_cost = envio_real_by_item.get(item_id)
-        if real_cost is not None:
-            return real_cost
-        # ERP + grupo-average fallback (existing logic)
-        costo_envio = producto_envio or 0
-        montot3 = constantes["monto_tier3"] if constantes else 33000
-        if costo_envio == 0 and precio >= montot3 and grupo_id is not None:
-            costo_envio = envio_promedio_by_grupo.get(grupo_id, 0.0)
-        return costo_envio
+    pubs_by_item = cargar_pubs_items(db, all_item_ids_page)
+    all_mla_list = [pub.mla for pub_list in pubs_by_item.values() for pub in pub_list]
+    snapshot_by_item = obtener_snapshot(db, ctx_pricing, results, pubs_by_item=pubs_by_item)
+
+    def _precio(valor) -> Optional[float]:
+        return float(valor) if valor else None
 
     productos = []
     for producto_erp, producto_pricing in results:
         costo_ars = producto_erp.costo if producto_erp.moneda_costo == "ARS" else None
-        # Buscar mejor oferta vigente
-        mejor_oferta_precio = None
-        mejor_oferta_monto = None
-        mejor_oferta_pvp = None
-        mejor_oferta_markup = None
-        mejor_oferta_porcentaje = None
-        mejor_oferta_fecha_hasta = None
-
-        # T-7: Use prefetched pubs + ofertas (dict lookup instead of DB queries)
-        pubs = pubs_by_item.get(producto_erp.item_id, [])
-
-        mejor_oferta = None
-        mejor_pub = None
-
-        for pub in pubs:
-            oferta = ofertas_by_mla.get(pub.mla)
-            if oferta and not mejor_oferta:
-                mejor_oferta = oferta
-                mejor_pub = pub
-
-        # T-4: Resolve grupo_id once per product from prefetched map
-        grupo_id = subcat_to_grupo.get(producto_erp.subcategoria_id, GRUPO_DEFAULT)
-
-        if mejor_oferta and mejor_pub:
-            mejor_oferta_precio = float(mejor_oferta.precio_final) if mejor_oferta.precio_final else None
-            mejor_oferta_pvp = float(mejor_oferta.pvp_seller) if mejor_oferta.pvp_seller else None
-            mejor_oferta_porcentaje = (
-                float(mejor_oferta.aporte_meli_porcentaje) if mejor_oferta.aporte_meli_porcentaje else None
-            )
-            mejor_oferta_fecha_hasta = mejor_oferta.fecha_hasta
+        snapshot = snapshot_by_item.get(producto_erp.item_id, {})
+        clasica = snapshot.get(LISTA_CLASICA, {})
 
-            # Calcular monto rebate
-            if mejor_oferta_precio and mejor_oferta_pvp:
-                mejor_oferta_monto = mejor_oferta_pvp - mejor_oferta_precio
+        def _markup_lista(pricelist_id: int) -> Optional[float]:
+            return snapshot.get(pricelist_id, {}).get("markup")
 
-            # Calcular markup de la oferta
-            if mejor_oferta_pvp and mejor_oferta_pvp > 0:
-                # T-3: Use prefetched tipo_cambio_usd
-                tipo_cambio = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
+        def _precio_lista(pricelist_id: int) -> Optional[float]:
+            return _precio(snapshot.get(pricelist_id, {}).get("precio"))
 
-                costo_calc = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio)
-                # T-5: Use _lookup_comision instead of obtener_comision_base
-                comision_base = _lookup_comision(mejor_pub.pricelist_id, grupo_id)
+        precio_rebate = clasica.get("precio_rebate")
+        markup_rebate = clasica.get("markup_rebate")
 
-                if comision_base:
-                    # T-3: Pass constantes instead of db
-                    comisiones = calcular_comision_ml_total(
-                        mejor_oferta_pvp, comision_base, producto_erp.iva, constantes=constantes
-                    )
-                    # T-6/T-12: Resolve envio (real cost first, then grupo fallback)
-                    costo_envio = _resolve_envio(
-                        producto_erp.item_id, producto_erp.envio or 0, grupo_id, mejor_oferta_pvp
-                    )
-                    limpio = calcular_limpio(
-                        mejor_oferta_pvp,
-                        producto_erp.iva,
-                        costo_envio,
-                        comisiones["comision_total"],
-                        constantes=constantes,
-                    )
-                    mejor_oferta_markup = calcular_markup(limpio, costo_calc)
-
-        # Calcular precio_rebate y markup_rebate
-        precio_rebate = None
-        markup_rebate = None
-        if producto_pricing and producto_pricing.precio_lista_ml and producto_pricing.participa_rebate:
-            porcentaje_rebate_val = float(
-                producto_pricing.porcentaje_rebate if producto_pricing.porcentaje_rebate is not None else 3.8
-            )
-            precio_rebate = float(producto_pricing.precio_lista_ml) / (1 - porcentaje_rebate_val / 100)
-
-            # Calcular markup del rebate
-            tipo_cambio_rebate = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
-
-            costo_rebate = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_rebate)
-            comision_base_rebate = _lookup_comision(4, grupo_id)  # Lista clásica
-
-            if comision_base_rebate and precio_rebate > 0:
-                comisiones_rebate = calcular_comision_ml_total(
-                    precio_rebate, comision_base_rebate, producto_erp.iva, constantes=constantes
-                )
-                costo_envio_rebate = _resolve_envio(
-                    producto_erp.item_id, producto_erp.envio or 0, grupo_id, precio_rebate
-                )
-                limpio_rebate = calcular_limpio(
-                    precio_rebate,
-                    producto_erp.iva,
-                    costo_envio_rebate,
-                    comisiones_rebate["comision_total"],
-                    constantes=constantes,
-                )
-                markup_rebate = calcular_markup(limpio_rebate, costo_rebate) * 100
+        mejor_oferta_precio = clasica.get("mejor_oferta_precio")
+        mejor_oferta_monto = clasica.get("mejor_oferta_monto")
+        mejor_oferta_pvp = clasica.get("mejor_oferta_pvp")
+        mejor_oferta_porcentaje = clasica.get("mejor_oferta_porcentaje")
+        mejor_oferta_fecha_hasta = clasica.get("mejor_oferta_fecha_hasta")
+        markup_oferta = clasica.get("markup_oferta")
+        mejor_oferta_markup = markup_oferta / 100 if markup_oferta is not None else None
 
         # Si el producto tiene rebate y está out_of_cards, replicar el rebate a mejor_oferta
         if (
@@ -835,7 +592,6 @@ def listar_productos(
             and precio_rebate is not None
             and markup_rebate is not None
         ):
-            # Replicar datos del rebate a mejor_oferta
             mejor_oferta_precio = precio_rebate
             mejor_oferta_pvp = precio_rebate  # El PVP es el mismo que el precio rebate
             mejor_oferta_markup = markup_rebate / 100  # Convertir de porcentaje a decimal
@@ -843,133 +599,6 @@ def listar_productos(
             mejor_oferta_monto = None  # No hay monto de rebate en este caso
             mejor_oferta_fecha_hasta = None  # No aplica fecha para rebate
 
-        # Calcular markups para precios de cuotas
-        markup_3_cuotas = None
-        markup_6_cuotas = None
-        markup_9_cuotas = None
-        markup_12_cuotas = None
-
-        if producto_pricing:
-            cuotas_config = [
-                (producto_pricing.precio_3_cuotas, 17, "3_cuotas"),
-                (producto_pricing.precio_6_cuotas, 14, "6_cuotas"),
-                (producto_pricing.precio_9_cuotas, 13, "9_cuotas"),
-                (producto_pricing.precio_12_cuotas, 23, "12_cuotas"),
-            ]
-
-            tipo_cambio_cuota = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
-            costo_cuota = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_cuota)
-
-            for precio_cuota, pricelist_id, nombre_cuota in cuotas_config:
-                if precio_cuota and float(precio_cuota) > 0:
-                    try:
-                        comision_base_cuota = _lookup_comision(pricelist_id, grupo_id)
-
-                        if comision_base_cuota:
-                            comisiones_cuota = calcular_comision_ml_total(
-                                float(precio_cuota), comision_base_cuota, producto_erp.iva, constantes=constantes
-                            )
-                            costo_envio_cuota = _resolve_envio(
-                                producto_erp.item_id, producto_erp.envio or 0, grupo_id, float(precio_cuota)
-                            )
-                            limpio_cuota = calcular_limpio(
-                                float(precio_cuota),
-                                producto_erp.iva,
-                                costo_envio_cuota,
-                                comisiones_cuota["comision_total"],
-                                constantes=constantes,
-                            )
-                            markup_calculado = calcular_markup(limpio_cuota, costo_cuota) * 100
-
-                            if nombre_cuota == "3_cuotas":
-                                markup_3_cuotas = markup_calculado
-                            elif nombre_cuota == "6_cuotas":
-                                markup_6_cuotas = markup_calculado
-                            elif nombre_cuota == "9_cuotas":
-                                markup_9_cuotas = markup_calculado
-                            elif nombre_cuota == "12_cuotas":
-                                markup_12_cuotas = markup_calculado
-                    except Exception:
-                        pass
-
-        # Calcular markups para precios PVP
-        markup_pvp = None
-        markup_pvp_3_cuotas = None
-        markup_pvp_6_cuotas = None
-        markup_pvp_9_cuotas = None
-        markup_pvp_12_cuotas = None
-
-        if producto_pricing:
-            # Markup PVP clásica
-            if producto_pricing.precio_pvp and float(producto_pricing.precio_pvp) > 0:
-                try:
-                    tipo_cambio_pvp = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
-                    costo_pvp = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_pvp)
-                    comision_base_pvp = _lookup_comision(12, grupo_id)
-
-                    if comision_base_pvp:
-                        pvp_precio = float(producto_pricing.precio_pvp)
-                        comisiones_pvp = calcular_comision_ml_total(
-                            pvp_precio, comision_base_pvp, producto_erp.iva, constantes=constantes
-                        )
-                        costo_envio_pvp = _resolve_envio(
-                            producto_erp.item_id, producto_erp.envio or 0, grupo_id, pvp_precio
-                        )
-                        limpio_pvp = calcular_limpio(
-                            pvp_precio,
-                            producto_erp.iva,
-                            costo_envio_pvp,
-                            comisiones_pvp["comision_total"],
-                            constantes=constantes,
-                        )
-                        markup_pvp = round(calcular_markup(limpio_pvp, costo_pvp) * 100, 2)
-                except Exception:
-                    pass
-
-            # Markups PVP cuotas
-            cuotas_pvp_config = [
-                (producto_pricing.precio_pvp_3_cuotas, 18, "pvp_3_cuotas"),
-                (producto_pricing.precio_pvp_6_cuotas, 19, "pvp_6_cuotas"),
-                (producto_pricing.precio_pvp_9_cuotas, 20, "pvp_9_cuotas"),
-                (producto_pricing.precio_pvp_12_cuotas, 21, "pvp_12_cuotas"),
-            ]
-
-            tipo_cambio_cuota_pvp = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
-            costo_cuota_pvp = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_cuota_pvp)
-
-            for precio_cuota_pvp, pricelist_id_pvp, nombre_cuota_pvp in cuotas_pvp_config:
-                if precio_cuota_pvp and float(precio_cuota_pvp) > 0:
-                    try:
-                        comision_base_cuota_pvp = _lookup_comision(pricelist_id_pvp, grupo_id)
-
-                        if comision_base_cuota_pvp:
-                            pvp_cuota_val = float(precio_cuota_pvp)
-                            comisiones_cuota_pvp = calcular_comision_ml_total(
-                                pvp_cuota_val, comision_base_cuota_pvp, producto_erp.iva, constantes=constantes
-                            )
-                            costo_envio_pvp_c = _resolve_envio(
-                                producto_erp.item_id, producto_erp.envio or 0, grupo_id, pvp_cuota_val
-                            )
-                            limpio_cuota_pvp = calcular_limpio(
-                                pvp_cuota_val,
-                                producto_erp.iva,
-                                costo_envio_pvp_c,
-                                comisiones_cuota_pvp["comision_total"],
-                                constantes=constantes,
-                            )
-                            markup_calculado_pvp = round(calcular_markup(limpio_cuota_pvp, costo_cuota_pvp) * 100, 2)
-
-                            if nombre_cuota_pvp == "pvp_3_cuotas":
-                                markup_pvp_3_cuotas = markup_calculado_pvp
-                            elif nombre_cuota_pvp == "pvp_6_cuotas":
-                                markup_pvp_6_cuotas = markup_calculado_pvp
-                            elif nombre_cuota_pvp == "pvp_9_cuotas":
-                                markup_pvp_9_cuotas = markup_calculado_pvp
-                            elif nombre_cuota_pvp == "pvp_12_cuotas":
-                                markup_pvp_12_cuotas = markup_calculado_pvp
-                    except Exception:
-                        pass
-
         producto_obj = ProductoResponse(
             item_id=producto_erp.item_id,
             codigo=producto_erp.codigo,
@@ -1013,22 +642,14 @@ def listar_productos(
             mejor_oferta_fecha_hasta=mejor_oferta_fecha_hasta,
             out_of_cards=producto_pricing.out_of_cards if producto_pricing else False,
             color_marcado=producto_pricing.color_marcado if producto_pricing else None,
-            precio_3_cuotas=float(producto_pricing.precio_3_cuotas)
-            if producto_pricing and producto_pricing.precio_3_cuotas
-            else None,
-            precio_6_cuotas=float(producto_pricing.precio_6_cuotas)
-            if producto_pricing and producto_pricing.precio_6_cuotas
-            else None,
-            precio_9_cuotas=float(producto_pricing.precio_9_cuotas)
-            if producto_pricing and producto_pricing.precio_9_cuotas
-            else None,
-            precio_12_cuotas=float(producto_pricing.precio_12_cuotas)
-            if producto_pricing and producto_pricing.precio_12_cuotas
-            else None,
-            markup_3_cuotas=markup_3_cuotas,
-            markup_6_cuotas=markup_6_cuotas,
-            markup_9_cuotas=markup_9_cuotas,
-            markup_12_cuotas=markup_12_cuotas,
+            precio_3_cuotas=_precio(producto_pricing.precio_3_cuotas) if producto_pricing else None,
+            precio_6_cuotas=_precio(producto_pricing.precio_6_cuotas) if producto_pricing else None,
+            precio_9_cuotas=_precio(producto_pricing.precio_9_cuotas) if producto_pricing else None,
+            precio_12_cuotas=_precio(producto_pricing.precio_12_cuotas) if producto_pricing else None,
+            markup_3_cuotas=_markup_lista(17),
+            markup_6_cuotas=_markup_lista(14),
+            markup_9_cuotas=_markup_lista(13),
+            markup_12_cuotas=_markup_lista(23),
             recalcular_cuotas_auto=producto_pricing.recalcular_cuotas_auto if producto_pricing else None,
             markup_adicional_cuotas_custom=float(producto_pricing.markup_adicional_cuotas_custom)
             if producto_pricing and producto_pricing.markup_adicional_cuotas_custom
@@ -1036,31 +657,21 @@ def listar_productos(
             markup_adicional_cuotas_pvp_custom=float(producto_pricing.markup_adicional_cuotas_pvp_custom)
             if producto_pricing and producto_pricing.markup_adicional_cuotas_pvp_custom
             else None,
-            # Campos PVP
-            precio_pvp=float(producto_pricing.precio_pvp) if producto_pricing and producto_pricing.precio_pvp else None,
-            precio_pvp_3_cuotas=float(producto_pricing.precio_pvp_3_cuotas)
-            if producto_pricing and producto_pricing.precio_pvp_3_cuotas
-            else None,
-            precio_pvp_6_cuotas=float(producto_pricing.precio_pvp_6_cuotas)
-            if producto_pricing and producto_pricing.precio_pvp_6_cuotas
-            else None,
-            precio_pvp_9_cuotas=float(producto_pricing.precio_pvp_9_cuotas)
-            if producto_pricing and producto_pricing.precio_pvp_9_cuotas
-            else None,
-            precio_pvp_12_cuotas=float(producto_pricing.precio_pvp_12_cuotas)
-            if producto_pricing and producto_pricing.precio_pvp_12_cuotas
-            else None,
-            markup_pvp=markup_pvp,
-            markup_pvp_3_cuotas=markup_pvp_3_cuotas,
-            markup_pvp_6_cuotas=markup_pvp_6_cuotas,
-            markup_pvp_9_cuotas=markup_pvp_9_cuotas,
-            markup_pvp_12_cuotas=markup_pvp_12_cuotas,
+            # Campos PVP (precios_ml manda sobre productos_pricing, resuelto en el snapshot)
+            precio_pvp=_precio_lista(12),
+            precio_pvp_3_cuotas=_precio_lista(18),
+            precio_pvp_6_cuotas=_precio_lista(19),
+            precio_pvp_9_cuotas=_precio_lista(20),
+            precio_pvp_12_cuotas=_precio_lista(21),
+            markup_pvp=_markup_lista(12),
+            markup_pvp_3_cuotas=_markup_lista(18),
+            markup_pvp_6_cuotas=_markup_lista(19),
+            markup_pvp_9_cuotas=_markup_lista(20),
+            markup_pvp_12_cuotas=_markup_lista(21),
             catalog_status=None,  # Se llenará después
             has_catalog=None,  # Se llenará después
         )
 
-        # Los filtros de markup ahora se aplican en SQL
-        # Solo agregamos el producto a la lista
         productos.append(producto_obj)
 
     # Obtener catalog status de los productos con publicaciones ML
@@ -1141,133 +752,9 @@ def listar_productos(
                 producto.tn_promotional_price = tn_data["promotional_price"]
                 producto.tn_has_promotion = tn_data["has_promotion"]
 
-    # Obtener precios PVP desde precios_ml
-    if productos:
-        from app.models.precio_ml import PrecioML
-
-        item_ids = [p.item_id for p in productos]
-
-        # Build producto_erp lookup from original results (avoid per-product DB query)
-        erp_by_item_id = {r[0].item_id: r[0] for r in results}
-
-        # Query para obtener precios PVP (listas 12, 18, 19, 20, 21)
-        precios_pvp_query = (
-            db.query(PrecioML.item_id, PrecioML.pricelist_id, PrecioML.precio)
-            .filter(PrecioML.item_id.in_(item_ids), PrecioML.pricelist_id.in_([12, 18, 19, 20, 21]))
-            .all()
-        )
-
-        # Crear diccionario item_id -> {pricelist_id: precio}
-        pvp_dict = {}
-        for item_id, pricelist_id, precio in precios_pvp_query:
-            if item_id not in pvp_dict:
-                pvp_dict[item_id] = {}
-            pvp_dict[item_id][pricelist_id] = float(precio) if precio else None
-
-        # Asignar precios PVP y calcular markups (using prefetched data)
-        for producto in productos:
-            if producto.item_id in pvp_dict:
-                precios = pvp_dict[producto.item_id]
-
-                # Asignar precios PVP
-                producto.precio_pvp = precios.get(12)
-                producto.precio_pvp_3_cuotas = precios.get(18)
-                producto.precio_pvp_6_cuotas = precios.get(19)
-                producto.precio_pvp_9_cuotas = precios.get(20)
-                producto.precio_pvp_12_cuotas = precios.get(21)
-
-                # Use prefetched producto_erp from original results
-                producto_erp = erp_by_item_id.get(producto.item_id)
-
-                if producto_erp:
-                    # Use prefetched tipo_cambio + grupo + comision
-                    tipo_cambio_pvp = tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
-                    costo_pvp = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_pvp)
-                    grupo_id_pvp = subcat_to_grupo.get(producto_erp.subcategoria_id, GRUPO_DEFAULT)
-
-                    pvp_configs = [
-                        (producto.precio_pvp, 12, "pvp"),
-                        (producto.precio_pvp_3_cuotas, 18, "pvp_3_cuotas"),
-                        (producto.precio_pvp_6_cuotas, 19, "pvp_6_cuotas"),
-                        (producto.precio_pvp_9_cuotas, 20, "pvp_9_cuotas"),
-                        (producto.precio_pvp_12_cuotas, 21, "pvp_12_cuotas"),
-                    ]
-
-                    for precio_pvp, pricelist_id, nombre_pvp in pvp_configs:
-                        if precio_pvp and precio_pvp > 0:
-                            try:
-                                comision_base_pvp = _lookup_comision(pricelist_id, grupo_id_pvp)
-
-                                if comision_base_pvp:
-                                    comisiones_pvp = calcular_comision_ml_total(
-                                        precio_pvp, comision_base_pvp, producto_erp.iva, constantes=constantes
-                                    )
-                                    costo_envio_pvp = _resolve_envio(
-                                        producto_erp.item_id, producto_erp.envio or 0, grupo_id_pvp, precio_pvp
-                                    )
-                                    limpio_pvp = calcular_limpio(
-                                        precio_pvp,
-                                        producto_erp.iva,
-                                        costo_envio_pvp,
-                                        comisiones_pvp["comision_total"],
-                                        constantes=constantes,
-                                    )
-                                    markup_calculado = calcular_markup(limpio_pvp, costo_pvp) * 100
-
-                                    if nombre_pvp == "pvp":
-                                        producto.markup_pvp = markup_calculado
-                                    elif nombre_pvp == "pvp_3_cuotas":
-                                        producto.markup_pvp_3_cuotas = markup_calculado
-                                    elif nombre_pvp == "pvp_6_cuotas":
-                                        producto.markup_pvp_6_cuotas = markup_calculado
-                                    elif nombre_pvp == "pvp_9_cuotas":
-                                        producto.markup_pvp_9_cuotas = markup_calculado
-                                    elif nombre_pvp == "pvp_12_cuotas":
-                                        producto.markup_pvp_12_cuotas = markup_calculado
-                            except Exception:
-                                # Si hay error calculando el markup, simplemente no lo mostramos
-                                pass
-
-    # Si aplicamos ordenamiento dinámico, necesitamos paginar manualmente
-    if orden_requiere_calculo:
-        # Ordenamiento dinámico si es necesario
-        if orden_requiere_calculo and orden_campos and orden_direcciones:
-            campos = orden_campos.split(",")
-            direcciones = orden_direcciones.split(",")
-
-            # Ordenar por cada columna con su dirección (en orden inverso para aplicar prioridad correcta)
-            for i in range(len(campos) - 1, -1, -1):
-                campo = campos[i]
-                direccion = direcciones[i]
-                reverse = direccion == "desc"
-
-                if campo in ["precio_rebate", "mejor_oferta", "precio_clasica", "web_transf"]:
-
-                    def get_sort_value(prod, campo=campo):
-                        if campo == "precio_rebate":
-                            val = prod.markup_rebate
-                        elif campo == "mejor_oferta":
-                            val = prod.mejor_oferta_markup
-                            if val is not None:
-                                val = val * 100
-                        elif campo == "precio_clasica":
-                            val = prod.markup
-                        elif campo == "web_transf":
-                            val = prod.markup_web_real
-                        else:
-                            val = None
-                        return (val is None, val if val is not None else float("-inf"))
-
-                    productos.sort(key=get_sort_value, reverse=reverse)
-
-        total = len(productos)
-        offset = (page - 1) * page_size
-        productos = productos[offset : offset + page_size]
-    else:
-        # Si no hay filtros dinámicos, usar el total pre-calculado
-        total = total_productos if total_productos is not None else len(productos)
-
-    return ProductoListResponse(total=total, page=page, page_size=page_size, productos=productos)
+    return ProductoListResponse(
+        total=total, page=page, page_size=page_size, productos=productos, next_cursor=next_cursor
+    )
 
 
 @router.get("/productos/precios-listas")
@@ -1775,215 +1262,38 @@ def listar_productos_tienda(
         overrides = db.query(PrecioGremioOverride).filter(PrecioGremioOverride.item_id.in_(item_ids_results)).all()
         precio_gremio_overrides = {o.item_id: o for o in overrides}
 
-    from app.models.oferta_ml import OfertaML
-    from app.models.publicacion_ml import PublicacionML
-    from app.services.pricing_calculator import (
-        obtener_tipo_cambio_actual,
-        convertir_a_pesos,
-        calcular_comision_ml_total,
-        calcular_limpio,
-        calcular_markup,
-        GRUPO_DEFAULT,
+    from app.services.pricing_snapshot_service import (
+        LISTA_CLASICA,
+        cargar_contexto_pricing,
+        cargar_pubs_items,
+        obtener_snapshot,
     )
-    from app.models.comision_config import SubcategoriaGrupo
-    from app.models.comision_versionada import ComisionVersion, ComisionBase, ComisionAdicionalCuota
 
-    hoy = date.today()
     productos = []
 
-    # ── T-8/T-3: Prefetch tipo_cambio + constantes (reuse constantes_pricing) ──
-    tipo_cambio_usd_t = obtener_tipo_cambio_actual(db, "USD")
-    constantes_t = constantes_pricing  # Already fetched above
-
-    # ── T-8/T-4: Prefetch SubcategoriaGrupo mapping ─────────────────────
-    all_subcat_grupos_t = db.query(SubcategoriaGrupo).all()
-    subcat_to_grupo_t = {sg.subcat_id: sg.grupo_id for sg in all_subcat_grupos_t}
-
-    # ── T-8/T-5: Prefetch comision lookup ────────────────────────────────
-    _pricelist_pvp_to_web_t = {12: 4, 18: 17, 19: 14, 20: 13, 21: 23}
-    _pricelist_to_cuotas_t = {17: 3, 14: 6, 13: 9, 23: 12}
-
-    _active_version_t = (
-        db.query(ComisionVersion)
-        .filter(
-            and_(
-                ComisionVersion.fecha_desde <= hoy,
-                or_(ComisionVersion.fecha_hasta.is_(None), ComisionVersion.fecha_hasta >= hoy),
-                ComisionVersion.activo == True,
-            )
-        )
-        .first()
-    )
-    _comision_base_map_t: dict = {}
-    _comision_adicional_map_t: dict = {}
-    if _active_version_t:
-        for cb in db.query(ComisionBase).filter(ComisionBase.version_id == _active_version_t.id).all():
-            _comision_base_map_t[(_active_version_t.id, cb.grupo_id)] = float(cb.comision_base)
-        for ca in (
-            db.query(ComisionAdicionalCuota).filter(ComisionAdicionalCuota.version_id == _active_version_t.id).all()
-        ):
-            _comision_adicional_map_t[(_active_version_t.id, ca.cuotas)] = float(ca.adicional)
-
-    def _lookup_comision_t(pricelist_id: int, grupo_id: int):
-        resolved_pl = _pricelist_pvp_to_web_t.get(pricelist_id, pricelist_id)
-        if not _active_version_t:
-            return None
-        base = _comision_base_map_t.get((_active_version_t.id, grupo_id))
-        if base is None:
-            return None
-        if resolved_pl == 4:
-            return base
-        cuotas = _pricelist_to_cuotas_t.get(resolved_pl)
-        if cuotas is None:
-            return base
-        adicional = _comision_adicional_map_t.get((_active_version_t.id, cuotas), 0)
-        return base + adicional
-
-    # ── T-8/T-6: Prefetch envio_promedio_grupo (single bulk query) ──────
-    from app.models.producto import ProductoERP as _PE_envio_t
-
-    unique_grupo_ids_t = set(subcat_to_grupo_t.values())
-    envio_promedio_by_grupo_t: dict = {gid: 0.0 for gid in unique_grupo_ids_t}
-    _grupo_to_subcats_t: dict = {}
-    for sc_id, g_id in subcat_to_grupo_t.items():
-        _grupo_to_subcats_t.setdefault(g_id, []).append(sc_id)
-    _all_subcat_ids_envio_t = list(subcat_to_grupo_t.keys())
-    if _all_subcat_ids_envio_t:
-        _envio_rows_t = (
-            db.query(_PE_envio_t.subcategoria_id, func.avg(_PE_envio_t.envio))
-            .filter(
-                _PE_envio_t.subcategoria_id.in_(_all_subcat_ids_envio_t),
-                _PE_envio_t.activo == True,
-                _PE_envio_t.envio > 0,
-            )
-            .group_by(_PE_envio_t.subcategoria_id)
-            .all()
-        )
-        _subcat_envio_avg_t = {sc_id: float(avg_val) for sc_id, avg_val in _envio_rows_t}
-        for gid, sc_list in _grupo_to_subcats_t.items():
-            vals = [_subcat_envio_avg_t[sc] for sc in sc_list if sc in _subcat_envio_avg_t]
-            if vals:
-                envio_promedio_by_grupo_t[gid] = sum(vals) / len(vals)
-
-    # ── T-8/T-7: Batch-load PublicacionML + OfertaML ─────────────────────
-    all_pubs_t = (
-        db.query(PublicacionML).filter(PublicacionML.item_id.in_(item_ids_results)).all() if item_ids_results else []
-    )
-    pubs_by_item_t: dict = {}
-    all_mla_list_t: list = []
-    for pub in all_pubs_t:
-        pubs_by_item_t.setdefault(pub.item_id, []).append(pub)
-        all_mla_list_t.append(pub.mla)
-
-    ofertas_by_mla_t: dict = {}
-    if all_mla_list_t:
-        all_ofertas_t = (
-            db.query(OfertaML)
-            .filter(
-                OfertaML.mla.in_(all_mla_list_t),
-                OfertaML.fecha_desde <= hoy,
-                OfertaML.fecha_hasta >= hoy,
-                OfertaML.pvp_seller.isnot(None),
-            )
-            .all()
-        )
-        for oferta in all_ofertas_t:
-            if oferta.mla not in ofertas_by_mla_t:
-                ofertas_by_mla_t[oferta.mla] = oferta
-
-    # ── Batch-resolve real shipping costs (one cross-DB query per page) ──────
-    envio_real_by_item_t: dict[int, float] = resolver_costos_envio_batch(
-        db, item_ids_results, pubs_by_item=pubs_by_item_t
-    )
-
-    def _resolve_envio_t(item_id: int, producto_envio: float, grupo_id: int, precio: float) -> float:
-        # Real cost from mlwebhook DB (already resolved as batch)
-        real_cost = envio_real_by_item_t.get(item_id)
-        if real_cost is not None:
-            return real_cost
-        # ERP + grupo-average fallback (existing logic)
-        costo_envio = producto_envio or 0
-        montot3 = constantes_t["monto_tier3"] if constantes_t else 33000
-        if costo_envio == 0 and precio >= montot3 and grupo_id is not None:
-            costo_envio = envio_promedio_by_grupo_t.get(grupo_id, 0.0)
-        return costo_envio
+    # Contexto global + snapshot de la página (mismo camino que listar_productos):
+    # rebate, mejor oferta y markups de cuotas salen de pricing_snapshots y sólo
+    # las filas faltantes/stale se calculan acá.
+    ctx_pricing = cargar_contexto_pricing(db)
+    pubs_by_item_t = cargar_pubs_items(db, item_ids_results)
+    all_mla_list_t = [pub.mla for pub_list in pubs_by_item_t.values() for pub in pub_list]
+    snapshot_by_item = obtener_snapshot(db, ctx_pricing, results, pubs_by_item=pubs_by_item_t)
 
     for producto_erp, producto_pricing in results:
-        # Calcular costo en ARS
-        costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio_usd_t)
-
-        # T-4: Resolve grupo_id once per product
-        grupo_id = subcat_to_grupo_t.get(producto_erp.subcategoria_id, GRUPO_DEFAULT)
-
-        # Mejor oferta (T-7: dict lookup)
-        (
-            mejor_oferta_precio,
-            mejor_oferta_monto,
-            mejor_oferta_pvp,
-            mejor_oferta_markup,
-            mejor_oferta_porcentaje,
-            mejor_oferta_fecha_hasta,
-        ) = None, None, None, None, None, None
-        pubs = pubs_by_item_t.get(producto_erp.item_id, [])
-        mejor_oferta, mejor_pub = None, None
-        for pub in pubs:
-            oferta = ofertas_by_mla_t.get(pub.mla)
-            if oferta and not mejor_oferta:
-                mejor_oferta, mejor_pub = oferta, pub
-        if mejor_oferta and mejor_pub:
-            mejor_oferta_precio = float(mejor_oferta.precio_final) if mejor_oferta.precio_final else None
-            mejor_oferta_pvp = float(mejor_oferta.pvp_seller) if mejor_oferta.pvp_seller else None
-            mejor_oferta_porcentaje = (
-                float(mejor_oferta.aporte_meli_porcentaje) if mejor_oferta.aporte_meli_porcentaje else None
-            )
-            mejor_oferta_fecha_hasta = mejor_oferta.fecha_hasta
-            if mejor_oferta_precio and mejor_oferta_pvp:
-                mejor_oferta_monto = mejor_oferta_pvp - mejor_oferta_precio
-            if mejor_oferta_pvp and mejor_oferta_pvp > 0:
-                tc_oferta = tipo_cambio_usd_t if producto_erp.moneda_costo == "USD" else None
-                costo_calc = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tc_oferta)
-                comision_base = _lookup_comision_t(mejor_pub.pricelist_id, grupo_id)
-                if comision_base:
-                    comisiones = calcular_comision_ml_total(
-                        mejor_oferta_pvp, comision_base, producto_erp.iva, constantes=constantes_t
-                    )
-                    costo_envio_of = _resolve_envio_t(
-                        producto_erp.item_id, producto_erp.envio or 0, grupo_id, mejor_oferta_pvp
-                    )
-                    limpio = calcular_limpio(
-                        mejor_oferta_pvp,
-                        producto_erp.iva,
-                        costo_envio_of,
-                        comisiones["comision_total"],
-                        constantes=constantes_t,
-                    )
-                    mejor_oferta_markup = calcular_markup(limpio, costo_calc)
+        snapshot = snapshot_by_item.get(producto_erp.item_id, {})
+        clasica = snapshot.get(LISTA_CLASICA, {})
+        costo_ars = clasica.get("costo_ars")
 
-        # Rebate
-        precio_rebate, markup_rebate = None, None
-        if producto_pricing and producto_pricing.precio_lista_ml and producto_pricing.participa_rebate:
-            porcentaje_rebate_val = float(
-                producto_pricing.porcentaje_rebate if producto_pricing.porcentaje_rebate is not None else 3.8
-            )
-            precio_rebate = float(producto_pricing.precio_lista_ml) / (1 - porcentaje_rebate_val / 100)
-            tc_rebate = tipo_cambio_usd_t if producto_erp.moneda_costo == "USD" else None
-            costo_rebate = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tc_rebate)
-            comision_base_rebate = _lookup_comision_t(4, grupo_id)
-            if comision_base_rebate and precio_rebate > 0:
-                comisiones_rebate = calcular_comision_ml_total(
-                    precio_rebate, comision_base_rebate, producto_erp.iva, constantes=constantes_t
-                )
-                costo_envio_reb = _resolve_envio_t(
-                    producto_erp.item_id, producto_erp.envio or 0, grupo_id, precio_rebate
-                )
-                limpio_rebate = calcular_limpio(
-                    precio_rebate,
-                    producto_erp.iva,
-                    costo_envio_reb,
-                    comisiones_rebate["comision_total"],
-                    constantes=constantes_t,
-                )
-                markup_rebate = calcular_markup(limpio_rebate, costo_rebate) * 100
+        precio_rebate = clasica.get("precio_rebate")
+        markup_rebate = clasica.get("markup_rebate")
+
+        mejor_oferta_precio = clasica.get("mejor_oferta_precio")
+        mejor_oferta_monto = clasica.get("mejor_oferta_monto")
+        mejor_oferta_pvp = clasica.get("mejor_oferta_pvp")
+        mejor_oferta_porcentaje = clasica.get("mejor_oferta_porcentaje")
+        mejor_oferta_fecha_hasta = clasica.get("mejor_oferta_fecha_hasta")
+        markup_oferta = clasica.get("markup_oferta")
+        mejor_oferta_markup = markup_oferta / 100 if markup_oferta is not None else None
 
         if (
             producto_pricing
@@ -2043,45 +1353,9 @@ def listar_productos_tienda(
         )
 
         # Markups cuotas
-        markup_3_cuotas, markup_6_cuotas, markup_9_cuotas, markup_12_cuotas = None, None, None, None
-        if producto_pricing:
-            tc_cuota = tipo_cambio_usd_t if producto_erp.moneda_costo == "USD" else None
-            cc = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tc_cuota)
-
-            for precio_cuota, pricelist_id, nombre in [
-                (producto_pricing.precio_3_cuotas, 17, "3"),
-                (producto_pricing.precio_6_cuotas, 14, "6"),
-                (producto_pricing.precio_9_cuotas, 13, "9"),
-                (producto_pricing.precio_12_cuotas, 23, "12"),
-            ]:
-                if precio_cuota and float(precio_cuota) > 0:
-                    try:
-                        cb = _lookup_comision_t(pricelist_id, grupo_id)
-                        if cb:
-                            com = calcular_comision_ml_total(
-                                float(precio_cuota), cb, producto_erp.iva, constantes=constantes_t
-                            )
-                            ce = _resolve_envio_t(
-                                producto_erp.item_id, producto_erp.envio or 0, grupo_id, float(precio_cuota)
-                            )
-                            lim = calcular_limpio(
-                                float(precio_cuota),
-                                producto_erp.iva,
-                                ce,
-                                com["comision_total"],
-                                constantes=constantes_t,
-                            )
-                            mc = calcular_markup(lim, cc) * 100
-                            if nombre == "3":
-                                markup_3_cuotas = mc
-                            elif nombre == "6":
-                                markup_6_cuotas = mc
-                            elif nombre == "9":
-                                markup_9_cuotas = mc
-                            elif nombre == "12":
-                                markup_12_cuotas = mc
-                    except Exception:
-                        pass
+        markup_3_cuotas, markup_6_cuotas, markup_9_cuotas, markup_12_cuotas = (
+            snapshot.get(pricelist_id, {}).get("markup") for pricelist_id in (17, 14, 13, 23)
+        )
 
         productos.append(
             ProductoTiendaResponse(
@@ -596,7 +596,12 @@ def calcular_pvp_masivo(
     request: CalculoPVPMasivoRequest, db: Session = Depends(get_db), current_user: Usuario = Depends(get_current_user)
 ):
     """Calcula precios PVP masivamente (clásica + cuotas con markup convergente)"""
-    from app.services.pricing_calculator import calcular_precio_producto, obtener_tipo_cambio_actual
+    from app.services.pricing_calculator import (
+        convertir_a_pesos,
+        obtener_grupo_subcategoria,
+        obtener_tipo_cambio_actual,
+    )
+    from app.services.pricing_vectorizado import calcular_precios_listas, costo_calculable
 
     # Obtener productos base
     query = db.query(ProductoERP, ProductoPricing).outerjoin(
@@ -700,129 +705,77 @@ def calcular_pvp_masivo(
     pvp_masivo_item_ids = [p_erp.item_id for p_erp, _ in productos]
     envio_real_by_item: dict[int, float] = resolver_costos_envio_batch(db, pvp_masivo_item_ids)
 
-    procesados = 0
-    tipo_cambio_cache = {}
+    tipo_cambio_usd = obtener_tipo_cambio_actual(db, "USD")
+    errores = 0
 
+    # Armar arrays del catálogo: un solo cálculo vectorizado para las 5 listas PVP
+    a_calcular = []
+    costos_ars, ivas, envios, grupos = [], [], [], []
     for producto_erp, producto_pricing in productos:
-        try:
-            # Obtener tipo de cambio si es necesario
-            tipo_cambio = None
-            if producto_erp.moneda_costo == "USD":
-                if "USD" not in tipo_cambio_cache:
-                    tipo_cambio_cache["USD"] = obtener_tipo_cambio_actual(db, "USD")
-                tipo_cambio = tipo_cambio_cache["USD"]
-                if not tipo_cambio:
-                    continue  # Saltar este producto si no hay tipo de cambio
-
-            # Crear pricing si no existe
-            if not producto_pricing:
-                producto_pricing = ProductoPricing(item_id=producto_erp.item_id, usuario_id=current_user.id)
-                db.add(producto_pricing)
-
-            # Resolve real shipping cost: batch resolver takes priority over ERP envio.
-            costo_envio_pvp = envio_real_by_item.get(producto_erp.item_id)
-            if costo_envio_pvp is None:
-                costo_envio_pvp = float(producto_erp.envio or 0)
-
-            # Calcular PVP CLÁSICA (pricelist_id=12)
-            resultado_clasica = calcular_precio_producto(
-                db=db,
-                costo=producto_erp.costo,
-                moneda_costo=producto_erp.moneda_costo,
-                iva=producto_erp.iva,
-                envio=costo_envio_pvp,
-                subcategoria_id=producto_erp.subcategoria_id,
-                pricelist_id=12,  # 54-Lista ML PVP
-                markup_objetivo=request.markup_pvp_clasica,
-                tipo_cambio=tipo_cambio,
-                adicional_markup=0,  # Sin adicional para clásica
-            )
-
-            if "error" not in resultado_clasica:
-                producto_pricing.precio_pvp = resultado_clasica["precio"]
-                producto_pricing.markup_pvp = resultado_clasica["markup_real"]
-
-            # Calcular PVP CUOTAS (usa markup de clásica + adicional separado)
-            # Igual que en /precios/set-rapido
-
-            # 3 cuotas (pricelist_id=18)
-            resultado_3 = calcular_precio_producto(
-                db=db,
-                costo=producto_erp.costo,
-                moneda_costo=producto_erp.moneda_costo,
-                iva=producto_erp.iva,
-                envio=costo_envio_pvp,
-                subcategoria_id=producto_erp.subcategoria_id,
-                pricelist_id=18,  # 55-Lista ML PVP 3C
-                markup_objetivo=request.markup_pvp_clasica,  # Mismo que clásica
-                tipo_cambio=tipo_cambio,
-                adicional_markup=request.adicional_cuotas,  # El adicional va acá
-            )
-
-            if "error" not in resultado_3:
-                producto_pricing.precio_pvp_3_cuotas = resultado_3["precio"]
-                producto_pricing.markup_pvp_3_cuotas = resultado_3["markup_real"]
-
-            # 6 cuotas (pricelist_id=19)
-            resultado_6 = calcular_precio_producto(
-                db=db,
-                costo=producto_erp.costo,
-                moneda_costo=producto_erp.moneda_costo,
-                iva=producto_erp.iva,
-                envio=costo_envio_pvp,
-                subcategoria_id=producto_erp.subcategoria_id,
-                pricelist_id=19,  # 56-Lista ML PVP 6C
-                markup_objetivo=request.markup_pvp_clasica,
-                tipo_cambio=tipo_cambio,
-                adicional_markup=request.adicional_cuotas,
-            )
-
-            if "error" not in resultado_6:
-                producto_pricing.precio_pvp_6_cuotas = resultado_6["precio"]
-                producto_pricing.markup_pvp_6_cuotas = resultado_6["markup_real"]
-
-            # 9 cuotas (pricelist_id=20)
-            resultado_9 = calcular_precio_producto(
-                db=db,
-                costo=producto_erp.costo,
-                moneda_costo=producto_erp.moneda_costo,
-                iva=producto_erp.iva,
-                envio=costo_envio_pvp,
-                subcategoria_id=producto_erp.subcategoria_id,
-                pricelist_id=20,  # 57-Lista ML PVP 9C
-                markup_objetivo=request.markup_pvp_clasica,
-                tipo_cambio=tipo_cambio,
-                adicional_markup=request.adicional_cuotas,
-            )
-
-            if "error" not in resultado_9:
-                producto_pricing.precio_pvp_9_cuotas = resultado_9["precio"]
-                producto_pricing.markup_pvp_9_cuotas = resultado_9["markup_real"]
-
-            # 12 cuotas (pricelist_id=21)
-            resultado_12 = calcular_precio_producto(
-                db=db,
-                costo=producto_erp.costo,
-                moneda_costo=producto_erp.moneda_costo,
-                iva=producto_erp.iva,
-                envio=costo_envio_pvp,
-                subcategoria_id=producto_erp.subcategoria_id,
-                pricelist_id=21,  # 58-Lista ML PVP 12C
-                markup_objetivo=request.markup_pvp_clasica,
-                tipo_cambio=tipo_cambio,
-                adicional_markup=request.adicional_cuotas,
+        tipo_cambio = None
+        if producto_erp.moneda_costo == "USD":
+            tipo_cambio = tipo_cambio_usd
+            if not tipo_cambio:
+                continue  # Saltar este producto si no hay tipo de cambio
+
+        # Sin costo/IVA utilizable no se calcula (ni se pisan precios existentes)
+        if not costo_calculable(producto_erp.costo, producto_erp.iva):
+            logger.warning(
+                "PVP masivo: producto %s sin costo/IVA válido (costo=%s, iva=%s)",
+                producto_erp.item_id,
+                producto_erp.costo,
+                producto_erp.iva,
             )
+            errores += 1
+            continue
 
-            if "error" not in resultado_12:
-                producto_pricing.precio_pvp_12_cuotas = resultado_12["precio"]
-                producto_pricing.markup_pvp_12_cuotas = resultado_12["markup_real"]
+        # Crear pricing si no existe
+        if not producto_pricing:
+            producto_pricing = ProductoPricing(item_id=producto_erp.item_id, usuario_id=current_user.id)
+            db.add(producto_pricing)
 
-            producto_pricing.fecha_modificacion = datetime.now(UTC)
-            procesados += 1
+        # Resolve real shipping cost: batch resolver takes priority over ERP envio.
+        costo_envio_pvp = envio_real_by_item.get(producto_erp.item_id)
+        if costo_envio_pvp is None:
+            costo_envio_pvp = float(producto_erp.envio or 0)
+
+        a_calcular.append(producto_pricing)
+        costos_ars.append(convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio))
+        ivas.append(producto_erp.iva)
+        envios.append(costo_envio_pvp)
+        grupos.append(obtener_grupo_subcategoria(db, producto_erp.subcategoria_id))
+
+    # Clásica (12) sin adicional; cuotas (18/19/20/21) con el mismo markup + adicional
+    listas_pvp = {
+        12: ("precio_pvp", "markup_pvp"),
+        18: ("precio_pvp_3_cuotas", "markup_pvp_3_cuotas"),
+        19: ("precio_pvp_6_cuotas", "markup_pvp_6_cuotas"),
+        20: ("precio_pvp_9_cuotas", "markup_pvp_9_cuotas"),
+        21: ("precio_pvp_12_cuotas", "markup_pvp_12_cuotas"),
+    }
+    resultados = {}
+    if a_calcular:
+        resultados = calcular_precios_listas(
+            db,
+            costo_ars=costos_ars,
+            iva=ivas,
+            envio=envios,
+            grupo_ids=grupos,
+            markup_objetivo=request.markup_pvp_clasica,
+            adicional_por_lista={
+                pricelist_id: 0 if pricelist_id == 12 else request.adicional_cuotas for pricelist_id in listas_pvp
+            },
+        )
 
-        except Exception as e:
-            logger.error("Error procesando producto %s: %s", producto_erp.item_id, e, exc_info=True)
-            continue
+    ahora = datetime.now(UTC)
+    for i, producto_pricing in enumerate(a_calcular):
+        for pricelist_id, (campo_precio, campo_markup) in listas_pvp.items():
+            resultado = resultados[pricelist_id]
+            if resultado.valido[i]:
+                setattr(producto_pricing, campo_precio, int(resultado.precio[i]))
+                setattr(producto_pricing, campo_markup, float(resultado.markup_real[i]))
+        producto_pricing.fecha_modificacion = ahora
+    procesados = len(a_calcular)
 
     db.commit()
 
@@ -847,6 +800,7 @@ def calcular_pvp_masivo(
 
     return {
         "procesados": procesados,
+        "errores": errores,
         "markup_pvp_clasica": request.markup_pvp_clasica,
         "adicional_cuotas": request.adicional_cuotas,
     }
@@ -864,15 +818,14 @@ def recalcular_cuotas_masivo(
     para cada producto que matchea los filtros y tiene precio base > 0.
     """
     from app.services.pricing_calculator import (
-        calcular_precio_producto,
         obtener_tipo_cambio_actual,
         convertir_a_pesos,
         obtener_grupo_subcategoria,
         obtener_comision_base,
-        calcular_comision_ml_total,
-        calcular_limpio,
-        calcular_markup,
+        obtener_constantes_pricing,
+        obtener_envio_promedio_grupo,
     )
+    from app.services.pricing_vectorizado import calcular_precios_listas, costo_calculable, markup_vectorizado
     from app.api.endpoints.pricing import obtener_markup_adicional_cuotas
 
     lista_tipo = request.lista_tipo
@@ -992,9 +945,7 @@ def recalcular_cuotas_masivo(
     # Markup adicional global (fallback si el producto no tiene custom)
     markup_adicional_global = obtener_markup_adicional_cuotas(db)
 
-    # Cache de tipo de cambio
-    tipo_cambio_cache = {}
-    procesados = 0
+    tipo_cambio_usd = obtener_tipo_cambio_actual(db, "USD")
     errores = 0
 
     # Configuración de pricelists según lista_tipo
@@ -1015,121 +966,99 @@ def recalcular_cuotas_masivo(
         }
         pricelist_clasica = 4
 
+    # Arrays del catálogo (sólo productos con precio base y comisión clásica)
+    a_calcular = []
+    precios_base, costos_ars, ivas, envios, grupos, comisiones_base, adicionales = [], [], [], [], [], [], []
     for producto_erp, producto_pricing in productos:
-        try:
-            # Obtener precio base existente
-            if lista_tipo == "pvp":
-                precio_base = float(producto_pricing.precio_pvp)
-            else:
-                precio_base = float(producto_pricing.precio_lista_ml)
+        # Obtener precio base existente
+        if lista_tipo == "pvp":
+            precio_base = float(producto_pricing.precio_pvp)
+        else:
+            precio_base = float(producto_pricing.precio_lista_ml)
 
-            if precio_base <= 0:
-                continue
+        if precio_base <= 0:
+            continue
 
-            # Tipo de cambio
-            tipo_cambio = None
-            if producto_erp.moneda_costo == "USD":
-                if "USD" not in tipo_cambio_cache:
-                    tipo_cambio_cache["USD"] = obtener_tipo_cambio_actual(db, "USD")
-                tipo_cambio = tipo_cambio_cache["USD"]
-                if not tipo_cambio:
-                    continue
-
-            costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio)
-            grupo_id = obtener_grupo_subcategoria(db, producto_erp.subcategoria_id)
-
-            # Resolve real shipping cost: batch resolver takes priority over ERP envio.
-            costo_envio_cuotas = envio_real_by_item.get(producto_erp.item_id)
-            if costo_envio_cuotas is None:
-                costo_envio_cuotas = float(producto_erp.envio or 0)
-
-            # Calcular markup del precio base existente
-            comision_base = obtener_comision_base(db, pricelist_clasica, grupo_id)
-            if not comision_base:
+        # Tipo de cambio
+        tipo_cambio = None
+        if producto_erp.moneda_costo == "USD":
+            tipo_cambio = tipo_cambio_usd
+            if not tipo_cambio:
                 continue
 
-            comisiones = calcular_comision_ml_total(precio_base, comision_base, producto_erp.iva, db=db)
-            limpio = calcular_limpio(
-                precio_base,
+        if not costo_calculable(producto_erp.costo, producto_erp.iva):
+            logger.warning(
+                "Recálculo cuotas: producto %s sin costo/IVA válido (costo=%s, iva=%s)",
+                producto_erp.item_id,
+                producto_erp.costo,
                 producto_erp.iva,
-                costo_envio_cuotas,
-                comisiones["comision_total"],
-                db=db,
-                grupo_id=grupo_id,
             )
-            markup = calcular_markup(limpio, costo_ars)
-            markup_porcentaje = round(markup * 100, 2)
-
-            # Markup adicional: custom del producto > global
-            if lista_tipo == "pvp":
-                markup_adicional = (
-                    float(producto_pricing.markup_adicional_cuotas_pvp_custom)
-                    if producto_pricing.markup_adicional_cuotas_pvp_custom is not None
-                    else markup_adicional_global
-                )
-            else:
-                markup_adicional = (
-                    float(producto_pricing.markup_adicional_cuotas_custom)
-                    if producto_pricing.markup_adicional_cuotas_custom is not None
-                    else markup_adicional_global
-                )
+            errores += 1
+            continue
 
-            # Calcular cada cuota
-            for nombre_precio, (pricelist_id, nombre_markup) in cuotas_config.items():
-                try:
-                    resultado = calcular_precio_producto(
-                        db=db,
-                        costo=producto_erp.costo,
-                        moneda_costo=producto_erp.moneda_costo,
-                        iva=producto_erp.iva,
-                        envio=costo_envio_cuotas,
-                        subcategoria_id=producto_erp.subcategoria_id,
-                        pricelist_id=pricelist_id,
-                        markup_objetivo=markup_porcentaje,
-                        tipo_cambio=tipo_cambio,
-                        adicional_markup=markup_adicional,
-                    )
+        grupo_id = obtener_grupo_subcategoria(db, producto_erp.subcategoria_id)
+        comision_base = obtener_comision_base(db, pricelist_clasica, grupo_id)
+        if not comision_base:
+            continue
+
+        # Resolve real shipping cost: batch resolver takes priority over ERP envio.
+        costo_envio_cuotas = envio_real_by_item.get(producto_erp.item_id)
+        if costo_envio_cuotas is None:
+            costo_envio_cuotas = float(producto_erp.envio or 0)
+
+        # Markup adicional: custom del producto > global
+        if lista_tipo == "pvp":
+            custom = producto_pricing.markup_adicional_cuotas_pvp_custom
+        else:
+            custom = producto_pricing.markup_adicional_cuotas_custom
+
+        a_calcular.append(producto_pricing)
+        precios_base.append(precio_base)
+        costos_ars.append(convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio))
+        ivas.append(producto_erp.iva)
+        envios.append(costo_envio_cuotas)
+        grupos.append(grupo_id)
+        comisiones_base.append(comision_base)
+        adicionales.append(float(custom) if custom is not None else markup_adicional_global)
+
+    if a_calcular:
+        # Markup del precio base existente (mismo redondeo que el cálculo por ítem)
+        markup_base = markup_vectorizado(
+            precios_base,
+            costos_ars,
+            ivas,
+            comisiones_base,
+            envios,
+            constantes=obtener_constantes_pricing(db),
+            envio_promedio=[obtener_envio_promedio_grupo(db, g) for g in grupos],
+        )
+        markups_porcentaje = [round(float(m) * 100, 2) for m in markup_base]
+
+        resultados = calcular_precios_listas(
+            db,
+            costo_ars=costos_ars,
+            iva=ivas,
+            envio=envios,
+            grupo_ids=grupos,
+            markup_objetivo=markups_porcentaje,
+            adicional_por_lista={pricelist_id: adicionales for pricelist_id, _ in cuotas_config.values()},
+        )
 
-                    if "error" not in resultado:
-                        precio_cuota = round(resultado["precio"], 2)
-                        setattr(producto_pricing, nombre_precio, precio_cuota if precio_cuota > 0 else None)
-
-                        # Calcular markup de esta cuota
-                        if precio_cuota > 0:
-                            comision_base_cuota = obtener_comision_base(db, pricelist_id, grupo_id)
-                            if comision_base_cuota:
-                                comisiones_cuota = calcular_comision_ml_total(
-                                    float(precio_cuota), comision_base_cuota, producto_erp.iva, db=db
-                                )
-                                limpio_cuota = calcular_limpio(
-                                    float(precio_cuota),
-                                    producto_erp.iva,
-                                    costo_envio_cuotas,
-                                    comisiones_cuota["comision_total"],
-                                    db=db,
-                                    grupo_id=grupo_id,
-                                )
-                                markup_cuota = round(calcular_markup(limpio_cuota, costo_ars) * 100, 2)
-                                setattr(producto_pricing, nombre_markup, markup_cuota)
-                            else:
-                                setattr(producto_pricing, nombre_markup, None)
-                        else:
-                            setattr(producto_pricing, nombre_markup, None)
-                    else:
-                        setattr(producto_pricing, nombre_precio, None)
-                        setattr(producto_pricing, nombre_markup, None)
-                except Exception:
+        ahora = datetime.now(UTC)
+        for i, producto_pricing in enumerate(a_calcular):
+            for nombre_precio, (pricelist_id, nombre_markup) in cuotas_config.items():
+                resultado = resultados[pricelist_id]
+                precio_cuota = round(float(resultado.precio[i]), 2) if resultado.valido[i] else None
+                if precio_cuota is not None and precio_cuota > 0:
+                    setattr(producto_pricing, nombre_precio, precio_cuota)
+                    setattr(producto_pricing, nombre_markup, float(resultado.markup_real[i]))
+                else:
                     setattr(producto_pricing, nombre_precio, None)
                     setattr(producto_pricing, nombre_markup, None)
 
             producto_pricing.usuario_id = current_user.id
-            producto_pricing.fecha_modificacion = datetime.now(UTC)
-            procesados += 1
-
-        except Exception as e:
-            logger.warning(f"Error recalculando cuotas producto {producto_erp.item_id}: {str(e)}")
-            errores += 1
-            continue
+            producto_pricing.fecha_modificacion = ahora
+    procesados = len(a_calcular)
 
     db.commit()
 
@@ -1166,7 +1095,11 @@ def limpiar_rebate(db: Session = Depends(get_db), current_user: Usuario = Depend
 
     count = db.query(ProductoPricing).filter(ProductoPricing.participa_rebate == True).count()
 
-    db.query(ProductoPricing).update({ProductoPricing.participa_rebate: False})
+    # Update masivo: pricing_snapshot_hooks marca stale los ítems del WHERE;
+    # fecha_modificacion deja el cambio visible para items_pendientes
+    db.query(ProductoPricing).filter(ProductoPricing.participa_rebate == True).update(
+        {ProductoPricing.participa_rebate: False, ProductoPricing.fecha_modificacion: datetime.now(UTC)}
+    )
     db.commit()
 
     # Registrar auditoría
@@ -1191,11 +1124,18 @@ def limpiar_web_transferencia(db: Session = Depends(get_db), current_user: Usuar
 
     count = db.query(ProductoPricing).filter(ProductoPricing.participa_web_transferencia == True).count()
 
-    db.query(ProductoPricing).update(
+    db.query(ProductoPricing).filter(
+        or_(
+            ProductoPricing.participa_web_transferencia == True,
+            ProductoPricing.precio_web_transferencia.isnot(None),
+            ProductoPricing.markup_web_real.isnot(None),
+        )
+    ).update(
         {
             ProductoPricing.participa_web_transferencia: False,
             ProductoPricing.precio_web_transferencia: None,
             ProductoPricing.markup_web_real: None,
+            ProductoPricing.fecha_modificacion: datetime.now(UTC),
         }
     )
     db.commit()
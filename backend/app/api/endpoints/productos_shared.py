@@ -92,6 +92,7 @@ class ProductoListResponse(BaseModel):
     page: int
     page_size: int
     productos: List[ProductoResponse]
+    next_cursor: Optional[str] = None
 
 
 class PrecioUpdate(BaseModel):
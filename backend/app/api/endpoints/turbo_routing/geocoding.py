@@ -15,7 +15,12 @@ from app.models.asignacion_turbo import AsignacionTurbo
 from app.models.geocoding_cache import GeocodingCache
 from app.models.mercadolibre_order_shipping import MercadoLibreOrderShipping
 from app.services.permisos_service import verificar_permiso
-from app.services.geocoding_service import geocode_address
+from app.services.geocoding_service import (
+    SolicitudGeocoding,
+    geocode_address,
+    geocodificar_lote,
+    guardar_en_cache_bulk,
+)
 from app.services.ml_webhook_service import fetch_shipment_data, extraer_coordenadas, extraer_direccion_completa
 
 router = APIRouter()
@@ -88,10 +93,12 @@ async def geocodificar_batch(
 ):
     """
     Geocodifica múltiples envíos en batch.
-    IMPORTANTE: Esto puede tomar tiempo. Mapbox permite ~10 req/seg.
 
-    Usa sesiones cortas (get_background_db) por cada item para no retener
-    una conexión del pool durante todo el batch (10-20s con rate limiting).
+    Usa `geocodificar_lote`: los hits del cache se resuelven con una sola
+    query, los misses se geocodifican en paralelo respetando el rate limit de
+    cada proveedor, y los resultados nuevos se guardan en un solo upsert.
+    Las sesiones son cortas (get_background_db): ninguna conexión del pool
+    queda tomada mientras se espera a Mapbox.
     """
     if not verificar_permiso(db, current_user, "ordenes.gestionar_turbo_routing"):
         raise HTTPException(status_code=403, detail="Sin permiso")
@@ -101,73 +108,78 @@ async def geocodificar_batch(
 
     resultados = {"total": len(shipment_ids), "exitosos": 0, "fallidos": 0, "detalles": []}
 
-    for shipment_id in shipment_ids:
-        with get_background_db() as bg_db:
-            # Buscar envío
-            envio = (
-                bg_db.query(MercadoLibreOrderShipping)
-                .filter(MercadoLibreOrderShipping.mlshippingid == shipment_id)
-                .first()
+    # 1. Envíos en una sola query
+    with get_background_db() as bg_db:
+        envios = (
+            bg_db.query(
+                MercadoLibreOrderShipping.mlshippingid,
+                MercadoLibreOrderShipping.mlstreet_name,
+                MercadoLibreOrderShipping.mlstreet_number,
+                MercadoLibreOrderShipping.mlcity_name,
             )
+            .filter(MercadoLibreOrderShipping.mlshippingid.in_(shipment_ids))
+            .all()
+        )
+    envios_map = {str(e.mlshippingid): e for e in envios}
 
-            if not envio:
-                resultados["fallidos"] += 1
-                resultados["detalles"].append(
-                    {"shipment_id": shipment_id, "status": "error", "mensaje": "Envío no encontrado"}
-                )
-                continue
-
-            # Construir dirección
-            direccion_partes = []
-            if envio.mlstreet_name:
-                direccion_partes.append(envio.mlstreet_name)
-            if envio.mlstreet_number:
-                direccion_partes.append(envio.mlstreet_number)
-
-            direccion = " ".join(direccion_partes) if direccion_partes else None
-            ciudad = envio.mlcity_name or "Buenos Aires"
-
-            if not direccion:
-                resultados["fallidos"] += 1
-                resultados["detalles"].append(
-                    {"shipment_id": shipment_id, "status": "error", "mensaje": "Sin dirección válida"}
-                )
-                continue
-
-            # Geocodificar (HTTP call a Mapbox — la sesión queda open pero es breve)
-            coords = await geocode_address(direccion, ciudad=ciudad, db=bg_db)
-
-            if not coords:
-                resultados["fallidos"] += 1
-                resultados["detalles"].append(
-                    {"shipment_id": shipment_id, "status": "error", "mensaje": "No se pudo geocodificar"}
-                )
-                continue
-
-            latitud, longitud = coords
+    solicitudes = []
+    direcciones: dict[str, str] = {}
+    errores: dict[str, str] = {}
+    for shipment_id in shipment_ids:
+        envio = envios_map.get(str(shipment_id))
+        if not envio:
+            errores[shipment_id] = "Envío no encontrado"
+            continue
 
-            # Actualizar asignación si existe
-            asignacion = (
+        # Construir dirección
+        direccion_partes = [p for p in (envio.mlstreet_name, envio.mlstreet_number) if p]
+        if not direccion_partes:
+            errores[shipment_id] = "Sin dirección válida"
+            continue
+        direccion = " ".join(direccion_partes)
+        ciudad = envio.mlcity_name or "Buenos Aires"
+        direcciones[shipment_id] = f"{direccion}, {ciudad}"
+        solicitudes.append(SolicitudGeocoding(clave=shipment_id, direccion=direccion, ciudad=ciudad))
+
+    # 2. Geocoding en lote (cache bulk + misses en paralelo + upsert bulk)
+    lote = await geocodificar_lote(solicitudes)
+    for shipment_id, coords in lote.coordenadas.items():
+        if coords is None:
+            errores[shipment_id] = "No se pudo geocodificar"
+
+    # 3. Actualizar asignaciones existentes en una sola query
+    geocodificados = {sid: c for sid, c in lote.coordenadas.items() if c is not None}
+    if geocodificados:
+        with get_background_db() as bg_db:
+            asignaciones = (
                 bg_db.query(AsignacionTurbo)
-                .filter(AsignacionTurbo.mlshippingid == shipment_id, AsignacionTurbo.estado != "cancelado")
-                .first()
+                .filter(
+                    AsignacionTurbo.mlshippingid.in_(list(geocodificados)),
+                    AsignacionTurbo.estado != "cancelado",
+                )
+                .all()
             )
-
-            if asignacion:
+            for asignacion in asignaciones:
+                latitud, longitud = geocodificados[str(asignacion.mlshippingid)]
                 asignacion.latitud = latitud
                 asignacion.longitud = longitud
-                asignacion.direccion = f"{direccion}, {ciudad}"
+                asignacion.direccion = direcciones[str(asignacion.mlshippingid)]
+            # commit is handled by get_background_db() on exit
 
+    for shipment_id in shipment_ids:
+        if shipment_id in errores:
+            resultados["fallidos"] += 1
+            resultados["detalles"].append(
+                {"shipment_id": shipment_id, "status": "error", "mensaje": errores[shipment_id]}
+            )
+        else:
+            latitud, longitud = geocodificados[shipment_id]
             resultados["exitosos"] += 1
             resultados["detalles"].append(
                 {"shipment_id": shipment_id, "status": "success", "latitud": latitud, "longitud": longitud}
             )
 
-            # commit is handled by get_background_db() on exit
-
-        # Rate limiting FUERA de la sesión — la conexión ya se devolvió al pool
-        await asyncio.sleep(0.1)
-
+    resultados["stats"] = lote.stats.as_dict()
     return resultados
 
 
@@ -250,11 +262,12 @@ async def geocodificar_batch_ml_webhook(
 
     # Set para trackear hashes procesados en este batch (evitar duplicados)
     hashes_procesados_batch = set()
+    nuevos_cache = []
 
-    # 2. Procesar cada envío con sesiones cortas (get_background_db).
-    # Cada iteración hace un HTTP call a ML Webhook (~50ms+), así que
-    # usamos sesiones independientes para no retener una conexión del pool
-    # durante todo el batch (200 items × 50ms = 10s+).
+    # 2. Procesar cada envío SIN sesión DB abierta: cada iteración hace un
+    # HTTP call a ML Webhook (~50ms+) y no queremos retener una conexión del
+    # pool durante todo el batch (200 items × 50ms = 10s+). El cache se
+    # escribe en bulk al final, con una sesión corta.
     for envio in envios_data:
         try:
             # Validar que tenga shipping_id
@@ -296,28 +309,16 @@ async def geocodificar_batch_ml_webhook(
                 exitosos += 1  # Contar como exitoso (ya está cacheado)
                 continue
 
-            # Sesión corta solo para la escritura en DB
-            with get_background_db() as bg_db:
-                # Merge: si existe la dirección (buscar por PK), actualiza; si no, inserta
-                existing = bg_db.query(GeocodingCache).filter(GeocodingCache.direccion_hash == direccion_hash).first()
-
-                if existing:
-                    # Actualizar registro existente
-                    existing.latitud = lat
-                    existing.longitud = lng
-                    existing.provider = "ml_webhook"
-                else:
-                    # Crear nuevo registro
-                    cache_entry = GeocodingCache(
-                        direccion_hash=direccion_hash,
-                        direccion_normalizada=direccion_completa,
-                        latitud=lat,
-                        longitud=lng,
-                        provider="ml_webhook",
-                    )
-                    bg_db.add(cache_entry)
-
-                # commit is handled by get_background_db() on exit
+            # Se escribe al cache en un solo upsert al final del batch
+            nuevos_cache.append(
+                {
+                    "direccion_hash": direccion_hash,
+                    "direccion_normalizada": direccion_completa[:500],
+                    "latitud": lat,
+                    "longitud": lng,
+                    "provider": "ml_webhook",
+                }
+            )
 
             # Marcar hash como procesado
             hashes_procesados_batch.add(direccion_hash)
@@ -328,7 +329,7 @@ async def geocodificar_batch_ml_webhook(
             if exitosos % 10 == 0:
                 logger.info(f"✅ Geocodificados: {exitosos}/{total_envios}")
 
-            # Rate limiting FUERA de la sesión — la conexión ya se devolvió al pool
+            # Rate limiting
             await asyncio.sleep(0.05)  # 50ms = ~20 req/seg
 
         except Exception as e:
@@ -336,6 +337,10 @@ async def geocodificar_batch_ml_webhook(
             logger.error(f"Error geocodificando envío {envio['mlshippingid']}: {e}", exc_info=True)
             continue
 
+    if nuevos_cache:
+        with get_background_db() as bg_db:
+            guardar_en_cache_bulk(nuevos_cache, bg_db)
+
     logger.info(
         f"✅ Geocoding batch completado: "
         f"{exitosos} exitosos, {fallidos} fallidos, "
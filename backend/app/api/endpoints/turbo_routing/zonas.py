@@ -18,7 +18,11 @@ from app.models.geocoding_cache import GeocodingCache
 from app.models.mercadolibre_order_shipping import MercadoLibreOrderShipping
 from app.models.usuario import Usuario
 from app.services.permisos_service import verificar_permiso
-from app.services.kmeans_zone_service import generar_zonas_kmeans, validar_envios_geocodificados
+from app.services.kmeans_zone_service import (
+    centroides_de_zonas,
+    generar_zonas_kmeans,
+    validar_envios_geocodificados,
+)
 
 from ._shared import (
     ARGENTINA_TZ,
@@ -214,6 +218,17 @@ def auto_generar_zonas(
 
         logger.info(mensaje)
 
+        # Centroides de la última zonificación automática (en orden de zona)
+        # → warm start de K-Means y numeración estable entre corridas
+        ultimas_automaticas = (
+            db.query(ZonaReparto.poligono)
+            .filter(ZonaReparto.tipo_generacion == "automatica", ZonaReparto.activa.is_(True))
+            .order_by(ZonaReparto.id.desc())
+            .limit(cantidad_motoqueros)
+            .all()
+        )
+        poligonos_previos = [z.poligono for z in reversed(ultimas_automaticas)]
+
         # 4. Eliminar zonas anteriores si se solicita
         if eliminar_anteriores:
             # Manuales: DESACTIVAR (conservar en BD)
@@ -237,7 +252,11 @@ def auto_generar_zonas(
             )
 
         # 5. Generar zonas usando K-Means
-        zonas_data = generar_zonas_kmeans(envios_coords=envios_coords, cantidad_zonas=cantidad_motoqueros)
+        zonas_data = generar_zonas_kmeans(
+            envios_coords=envios_coords,
+            cantidad_zonas=cantidad_motoqueros,
+            centroides_previos=centroides_de_zonas(poligonos_previos),
+        )
 
         if not zonas_data:
             raise HTTPException(status_code=500, detail="No se pudieron generar zonas. Verificar logs del servidor.")
@@ -1,15 +1,11 @@
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, desc
 from typing import List, Optional
 from datetime import UTC, datetime, date, timedelta
 import httpx
-import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 from app.core.database import get_db, get_async_db
 from app.models.venta_ml import VentaML
 from app.models.usuario import Usuario, RolUsuario
@@ -18,6 +14,7 @@ from app.api.deps import get_current_user
 from pydantic import BaseModel, ConfigDict
 from decimal import Decimal
 from app.utils.ml_metrics_calculator import calcular_metricas_ml
+from app.utils.xlsx_stream import FILAS_POR_LOTE_DB, Estilo, Hoja, respuesta_xlsx
 
 logger = logging.getLogger(__name__)
 
@@ -1250,28 +1247,50 @@ def exportar_operaciones(
     if categorias_param:
         params["categorias"] = categorias_param
 
-    # Ejecutar query
-    raw_connection = db.connection().connection
-    cursor = raw_connection.cursor()
-    cursor.execute(query_str, params)
-
-    columns = [desc[0] for desc in cursor.description]
-    from collections import namedtuple
-
-    Row = namedtuple("Row", columns)
-    rows = [Row(*row) for row in cursor.fetchall()]
-    cursor.close()
+    pricelist_names = {
+        4: "Clásica",
+        12: "Clásica",
+        17: "3 Cuotas",
+        18: "3 Cuotas",
+        14: "6 Cuotas",
+        19: "6 Cuotas",
+        13: "9 Cuotas",
+        20: "9 Cuotas",
+        23: "12 Cuotas",
+        21: "12 Cuotas",
+    }
 
-    # Procesar operaciones
-    operaciones = []
-    for row in rows:
+    def _filas():
+        # Cursor server-side (named): el ERP devuelve decenas de miles de líneas y
+        # se leen de a FILAS_POR_LOTE_DB mientras se escribe el Excel.
+        raw_connection = db.connection().connection
+        cursor = raw_connection.cursor(name="exportar_operaciones_ml")
+        try:
+            cursor.execute(query_str, params)
+            Row = None
+            while True:
+                lote = cursor.fetchmany(FILAS_POR_LOTE_DB)
+                if not lote:
+                    break
+                if Row is None:
+                    from collections import namedtuple
+
+                    Row = namedtuple("Row", [desc[0] for desc in cursor.description])
+                for valores in lote:
+                    fila = _fila_operacion(Row(*valores))
+                    if fila is not None:
+                        yield fila
+        finally:
+            cursor.close()
+
+    def _fila_operacion(row):
         if pares_usuario is not None:
             if len(pares_usuario) == 0:
-                continue
+                return None
             marca_upper = (row.marca or "").upper()
             cat_upper = (row.categoria or "").upper()
             if (marca_upper, cat_upper) not in pares_usuario:
-                continue
+                return None
 
         costo_envio_producto = None
         if row.envio_producto:
@@ -1296,60 +1315,35 @@ def exportar_operaciones(
             shipment_total=float(row.shipment_total) if hasattr(row, "shipment_total") and row.shipment_total else None,
         )
 
-        pricelist_names = {
-            4: "Clásica",
-            12: "Clásica",
-            17: "3 Cuotas",
-            18: "3 Cuotas",
-            14: "6 Cuotas",
-            19: "6 Cuotas",
-            13: "9 Cuotas",
-            20: "9 Cuotas",
-            23: "12 Cuotas",
-            21: "12 Cuotas",
-        }
         tipo_publicacion = (
             pricelist_names.get(row.pricelist_id, f"Lista {row.pricelist_id}") if row.pricelist_id else None
         )
 
         costo_total = float(row.costo_sin_iva or 0) * float(row.cantidad or 1)
 
-        operaciones.append(
-            {
-                "id_operacion": row.id_operacion,
-                "fecha": row.fecha_venta,
-                "marca": row.marca,
-                "categoria": row.categoria,
-                "subcategoria": row.subcategoria,
-                "codigo_item": row.codigo,
-                "descripcion": row.descripcion,
-                "cantidad": row.cantidad,
-                "monto_unitario": row.monto_unitario,
-                "monto_total": row.monto_total,
-                "pricelist_id": row.pricelist_id,
-                "tipo_publicacion": tipo_publicacion,
-                "costo_sin_iva": row.costo_sin_iva,
-                "costo_total": costo_total,
-                "comision_porcentaje": row.comision_base_porcentaje,
-                "comision_pesos": metricas["comision_ml"],
-                "costo_envio": metricas["costo_envio"],
-                "monto_limpio": metricas["monto_limpio"],
-                "markup_porcentaje": metricas["markup_porcentaje"],
-                "offset_flex": metricas["offset_flex"],
-            }
-        )
-
-    # Crear Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Operaciones ML"
+        return [
+            row.id_operacion,
+            row.fecha_venta.strftime("%Y-%m-%d %H:%M:%S") if row.fecha_venta else "",
+            row.marca,
+            row.categoria,
+            row.subcategoria,
+            row.codigo,
+            row.descripcion,
+            row.cantidad,
+            float(row.monto_unitario) if row.monto_unitario else 0,
+            float(row.monto_total) if row.monto_total else 0,
+            row.pricelist_id,
+            tipo_publicacion,
+            float(row.costo_sin_iva),
+            float(costo_total),
+            float(row.comision_base_porcentaje),
+            float(metricas["comision_ml"]),
+            float(metricas["costo_envio"]),
+            float(metricas["monto_limpio"]),
+            float(metricas["offset_flex"]),
+            float(metricas["markup_porcentaje"]),
+        ]
 
-    # Estilos
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-
-    # Headers
     headers = [
         "ID Operación",
         "Fecha",
@@ -1372,50 +1366,13 @@ def exportar_operaciones(
         "Offset Flex",
         "Markup %",
     ]
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-    # Data
-    for row_num, op in enumerate(operaciones, 2):
-        ws.cell(row=row_num, column=1, value=op["id_operacion"])
-        ws.cell(row=row_num, column=2, value=op["fecha"].strftime("%Y-%m-%d %H:%M:%S") if op["fecha"] else "")
-        ws.cell(row=row_num, column=3, value=op["marca"])
-        ws.cell(row=row_num, column=4, value=op["categoria"])
-        ws.cell(row=row_num, column=5, value=op["subcategoria"])
-        ws.cell(row=row_num, column=6, value=op["codigo_item"])
-        ws.cell(row=row_num, column=7, value=op["descripcion"])
-        ws.cell(row=row_num, column=8, value=op["cantidad"])
-        ws.cell(row=row_num, column=9, value=float(op["monto_unitario"]) if op["monto_unitario"] else 0)
-        ws.cell(row=row_num, column=10, value=float(op["monto_total"]) if op["monto_total"] else 0)
-        ws.cell(row=row_num, column=11, value=op["pricelist_id"])
-        ws.cell(row=row_num, column=12, value=op["tipo_publicacion"])
-        ws.cell(row=row_num, column=13, value=float(op["costo_sin_iva"]))
-        ws.cell(row=row_num, column=14, value=float(op["costo_total"]))
-        ws.cell(row=row_num, column=15, value=float(op["comision_porcentaje"]))
-        ws.cell(row=row_num, column=16, value=float(op["comision_pesos"]))
-        ws.cell(row=row_num, column=17, value=float(op["costo_envio"]))
-        ws.cell(row=row_num, column=18, value=float(op["monto_limpio"]))
-        ws.cell(row=row_num, column=19, value=float(op["offset_flex"]))
-        ws.cell(row=row_num, column=20, value=float(op["markup_porcentaje"]))
-
-    # Ajustar anchos de columna
-    column_widths = [12, 20, 15, 20, 20, 15, 40, 8, 12, 12, 10, 12, 12, 12, 10, 12, 12, 12, 12, 10]
-    for i, width in enumerate(column_widths, 1):
-        ws.column_dimensions[chr(64 + i)].width = width
-
-    # Guardar en memoria
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    filename = f"operaciones_ml_{from_date}_{to_date}.xlsx"
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    hoja = Hoja(
+        titulo="Operaciones ML",
+        filas=_filas(),
+        encabezado=headers,
+        estilo_encabezado=Estilo(
+            negrita=True, color="FFFFFF", relleno="4F81BD", horizontal="center", vertical="center"
+        ),
+        anchos=[12, 20, 15, 20, 20, 15, 40, 8, 12, 12, 10, 12, 12, 12, 10, 12, 12, 12, 12, 10],
     )
+    return respuesta_xlsx([hoja], f"operaciones_ml_{from_date}_{to_date}.xlsx")
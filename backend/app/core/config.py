@@ -101,10 +101,29 @@ class Settings(BaseSettings):
     # Mapbox Geocoding API
     MAPBOX_ACCESS_TOKEN: Optional[str] = None
 
-    # Redis (for SSE pub/sub fan-out)
+    # Redis (for SSE fan-out, app/core/sse.py)
     REDIS_URL: str = "redis://localhost:6379/0"
     SSE_HEARTBEAT_SECONDS: int = 30
-    SSE_MAX_CONNECTIONS: int = 100
+    SSE_MAX_CONNECTIONS: int = 5000  # per API worker
+    # Reload hints of a channel within this window collapse into one event
+    SSE_COALESCE_MS: int = 250
+    # Approximate length of the sse:stream replay buffer (Last-Event-ID)
+    SSE_REPLAY_MAXLEN: int = 10000
+
+    # Pooled HTTP clients (app/core/http_clients.py) — defaults for upstreams
+    # that don't set their own limits. HTTP/2 also needs the `h2` package.
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 20
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 10
+    HTTP_CLIENT_HTTP2: bool = True
+
+    # Background worker (app/core/worker_runtime.py, `python -m app.worker`).
+    # One process holds the Redis lease and runs the periodic tasks; the rest
+    # wait. WORKER_EMBEDDED runs the runtime inside the API lifespan instead.
+    # Default True until pricing-worker.service (see
+    # pricing-worker.service.example) is installed on every host; then set
+    # WORKER_EMBEDDED=false in .env. Both at once is safe: one lease.
+    WORKER_EMBEDDED: bool = True
+    WORKER_LEASE_TTL_SECONDS: int = 30
 
     # Rate limiting (login brute-force friction)
     LOGIN_RATE_LIMIT: str = "10/minute"
@@ -147,6 +166,15 @@ class Settings(BaseSettings):
     COMPRAS_UPLOADS_DIR: str = "uploads/compras"
     COMPRAS_MAX_FILE_SIZE_MB: int = 20
 
+    # Exports a Excel en segundo plano (app.services.export_jobs_service).
+    # Los archivos terminados se guardan como {EXPORTS_CACHE_DIR}/{clave}_{job}.xlsx y
+    # se reutilizan mientras no cambie la versión de datos (y hasta el TTL).
+    EXPORTS_CACHE_DIR: str = "uploads/exports"
+    EXPORT_JOBS_WORKERS: int = 2
+    EXPORTS_CACHE_TTL_MINUTES: int = 240
+    # Un job pendiente/corriendo más viejo que esto se da por muerto (worker reiniciado)
+    EXPORT_JOBS_TIMEOUT_MINUTES: int = 30
+
     # Hikvision DS-K1T804 (access control terminal — ISAPI over HTTP + Digest Auth)
     HIKVISION_HOST: Optional[str] = None
     HIKVISION_PORT: int = 80
@@ -1,8 +1,13 @@
 import sys
 from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from uuid import uuid4
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 from sqlalchemy.pool import NullPool
 
@@ -64,8 +69,6 @@ else:
     # Can't use connect_args (PgBouncer rejects startup parameters).
     # Use "checkout" event (fires every time a connection leaves the pool)
     # instead of "connect" (only fires on new connections).
-    from sqlalchemy import event
-
     @event.listens_for(engine, "checkout")
     def _set_session_timeouts(dbapi_conn, connection_record, connection_proxy):
         cursor = dbapi_conn.cursor()
@@ -87,10 +90,15 @@ def get_db():
         db.close()
 
 
-# Async dependency para endpoints `async def`.
-# Garantiza que el finally se ejecute en el contexto async
-# (a diferencia de get_db que es sync y se corre en threadpool,
-# donde el finally puede no ejecutarse si la coroutine se cancela).
+# LEGACY: sesión SYNC para endpoints `async def`. Cada query de esa sesión
+# bloquea el event loop del worker mientras espera a PostgreSQL (todas las
+# requests de ese worker quedan frenadas detrás, ej. un ranking de 3s).
+# No usar en endpoints nuevos. Camino de migración, de menor a mayor cambio:
+#   1. El endpoint no hace `await` de nada → `def` + get_db (corre en el threadpool).
+#   2. Hace I/O async y usa servicios/helpers sync del ORM → get_async_session +
+#      `await db.run_sync(helper, ...)`: el helper recibe una Session sync sobre
+#      la conexión async y sus queries esperan sin bloquear el loop.
+#   3. Queries propias → get_async_session + `await db.execute(select(...))`.
 async def get_async_db():
     db = SessionLocal()
     try:
@@ -99,6 +107,107 @@ async def get_async_db():
         db.close()
 
 
+# ──────────────────────────────────────────────
+# Engine async (asyncpg) — para endpoints `async def`
+# ──────────────────────────────────────────────
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+_async_engine: AsyncEngine | None = None
+_async_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+
+def _async_url(url: str):
+    """DATABASE_URL (psycopg2) → mismo destino con el driver async."""
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=_ASYNC_DRIVERS[parsed.get_backend_name()])
+    if "sslmode" in parsed.query:
+        # asyncpg no entiende sslmode (libpq); acepta los mismos valores como `ssl`
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Engine async lazy-inicializado sobre DATABASE_URL (PgBouncer, transaction mode).
+
+    Pool por worker: pool_size=10 + max_overflow=10. Las sesiones async no
+    ocupan threads, así que el límite es la conexión y no el threadpool; con
+    4 workers son 4 × (25 sync + 20 async) = 180 client-conns a PgBouncer
+    (max_client_conn=500), que las multiplexa sobre default_pool_size=80.
+
+    PgBouncer en transaction mode no garantiza la misma conexión de servidor
+    entre transacciones, así que:
+      - statement_cache_size=0 / prepared_statement_cache_size=0: sin caches de
+        prepared statements que sobrevivan a la transacción.
+      - prepared_statement_name_func: nombres únicos, para que dos clientes no
+        choquen con "__asyncpg_stmt_1__" en la misma conexión de servidor
+        (PgBouncer ≥ 1.21 con max_prepared_statements, ver pgbouncer.ini.example).
+      - Los timeouts se setean en checkout, igual que el engine sync.
+    Scripts → NullPool, como el engine sync.
+    """
+    global _async_engine
+    if _async_engine is None:
+        url = _async_url(settings.DATABASE_URL)
+        if url.get_backend_name() != "postgresql":
+            # SQLite (tests/dev local): aiosqlite, sin tuning de pool
+            _async_engine = create_async_engine(url)
+            return _async_engine
+
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+        if _is_script_context():
+            _async_engine = create_async_engine(url, poolclass=NullPool, connect_args=connect_args)
+        else:
+            _async_engine = create_async_engine(
+                url,
+                connect_args=connect_args,
+                pool_pre_ping=True,
+                pool_size=10,
+                max_overflow=10,
+                pool_recycle=600,
+                pool_timeout=30,
+                pool_use_lifo=True,
+            )
+
+            @event.listens_for(_async_engine.sync_engine, "checkout")
+            def _set_async_session_timeouts(dbapi_conn, connection_record, connection_proxy):
+                # asyncpg no acepta varios statements en un execute
+                cursor = dbapi_conn.cursor()
+                cursor.execute("SET statement_timeout = '60s'")
+                cursor.execute("SET idle_in_transaction_session_timeout = '120s'")
+                cursor.close()
+
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Nueva AsyncSession (expire_on_commit=False: los objetos siguen legibles tras el commit)."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory()
+
+
+# Dependency para endpoints `async def`: las queries se esperan sin bloquear el loop.
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine() -> None:
+    """Cierra el pool async (shutdown del lifespan)."""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_factory = None
+
+
 @contextmanager
 def get_background_db() -> Generator[Session, None, None]:
     """
@@ -129,6 +238,19 @@ def get_background_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def insert_on_conflict(db: Session, tabla):
+    """
+    `INSERT` con `ON CONFLICT` en el dialecto de la sesión.
+
+    Producción es PostgreSQL; los tests corren sobre SQLite. Los dos insert
+    de dialecto exponen la misma API (on_conflict_do_update / do_nothing,
+    excluded), así que los upserts se escriben una sola vez contra este helper.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(tabla)
+    return pg_insert(tabla)
+
+
 # ── ML Webhook DB (ml_previews, read-only) ─────────────────────
 _mlwebhook_engine = None
 
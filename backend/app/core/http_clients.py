@@ -0,0 +1,226 @@
+"""Registry of pooled, long-lived httpx clients — one per upstream.
+
+The ERP (gbp-parser and SOAP), MercadoLibre, ml-webhook, TiendaNube and the
+geocoders used to be called through a fresh `httpx.AsyncClient` per call,
+paying TCP (and TLS) setup on every request and never reusing a connection.
+Callers now ask the registry for the upstream's shared client instead:
+
+    client = get_http_client("ml")
+    response = await client.get(url, headers=..., timeout=15.0)
+
+Design:
+  - One client per (event loop, upstream). An AsyncClient's connections are
+    bound to the loop that opened them; uvicorn workers run a single loop, but
+    scripts and tests call `asyncio.run` repeatedly, so a new loop transparently
+    gets its own clients. Entries are weakly keyed by loop.
+  - Pool limits, default timeout and HTTP/2 are per upstream (`UPSTREAMS`),
+    falling back to the HTTP_CLIENT_* settings. HTTP/2 is only negotiated over
+    TLS and only when the optional `h2` package is installed; otherwise the
+    client silently stays on HTTP/1.1 keep-alive.
+  - Per-upstream metrics are collected by a wrapping transport: requests,
+    latency histogram (until response headers), pool wait (time until the
+    pool hands out a connection, via httpcore's `trace` extension), transport
+    errors and 4xx/5xx counts. `http_client_metrics()` returns a snapshot.
+  - The app lifespan calls `close_http_clients()` on shutdown. Callers must
+    never close a registry client themselves (no `async with`).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Pool settings for one upstream. None → HTTP_CLIENT_* setting."""
+
+    timeout: float = 10.0
+    max_connections: Optional[int] = None
+    max_keepalive_connections: Optional[int] = None
+    keepalive_expiry: float = 30.0
+    http2: Optional[bool] = None
+
+
+UPSTREAMS: dict[str, UpstreamConfig] = {
+    # gbp-parser local (HTTP plano) — consultas largas
+    "erp": UpstreamConfig(timeout=30.0),
+    # SOAP del ERP (IIS, HTTP plano) — scriptAgeing y similares pasan timeout propio por request
+    "erp_soap": UpstreamConfig(timeout=300.0, max_connections=10, max_keepalive_connections=5),
+    "ml": UpstreamConfig(timeout=10.0, max_connections=40, max_keepalive_connections=20),
+    # Dimensionado a la concurrencia de MLWebhookClient.get_items_batch
+    "ml_webhook": UpstreamConfig(timeout=10.0, max_connections=32, max_keepalive_connections=32),
+    "tiendanube": UpstreamConfig(timeout=10.0),
+    "mapbox": UpstreamConfig(timeout=10.0),
+    # Nominatim permite 1 req/s: una sola conexión alcanza
+    "nominatim": UpstreamConfig(timeout=10.0, max_connections=2, max_keepalive_connections=1),
+}
+
+# Latency / pool-wait histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS: tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+
+class UpstreamMetrics:
+    """Thread-safe counters for one upstream (shared by all its per-loop clients)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.status_4xx = 0
+            self.status_5xx = 0
+            self.latency_buckets = [0] * len(LATENCY_BUCKETS_MS)
+            self.latency_sum_ms = 0.0
+            self.pool_wait_sum_ms = 0.0
+            self.pool_wait_max_ms = 0.0
+
+    def observe(self, latency_ms: float, pool_wait_ms: float, status_code: Optional[int]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.pool_wait_sum_ms += pool_wait_ms
+            self.pool_wait_max_ms = max(self.pool_wait_max_ms, pool_wait_ms)
+            if status_code is None:
+                self.errors += 1
+                return
+            if 400 <= status_code < 500:
+                self.status_4xx += 1
+            elif status_code >= 500:
+                self.status_5xx += 1
+            self.latency_sum_ms += latency_ms
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if latency_ms <= bound:
+                    self.latency_buckets[i] += 1
+                    break
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            completed = self.requests - self.errors
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "status_4xx": self.status_4xx,
+                "status_5xx": self.status_5xx,
+                "latency_avg_ms": self.latency_sum_ms / completed if completed else 0.0,
+                "latency_histogram_ms": dict(zip(LATENCY_BUCKETS_MS, self.latency_buckets)),
+                "pool_wait_avg_ms": self.pool_wait_sum_ms / self.requests if self.requests else 0.0,
+                "pool_wait_max_ms": self.pool_wait_max_ms,
+            }
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport and records latency, pool wait and errors."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, metrics: UpstreamMetrics) -> None:
+        self._inner = inner
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        acquired: Optional[float] = None
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict) -> None:
+            # First event httpcore emits is on the connection it was handed
+            # (connect_tcp for a new one, send_request_headers for a reused one).
+            nonlocal acquired
+            if acquired is None:
+                acquired = time.perf_counter()
+            if outer_trace is not None:
+                await outer_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        status_code: Optional[int] = None
+        try:
+            response = await self._inner.handle_async_request(request)
+            status_code = response.status_code
+            return response
+        finally:
+            end = time.perf_counter()
+            pool_wait = ((acquired or end) - start) * 1000
+            self._metrics.observe((end - start) * 1000, pool_wait, status_code)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+_metrics: dict[str, UpstreamMetrics] = {name: UpstreamMetrics() for name in UPSTREAMS}
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    config = UPSTREAMS[name]
+    max_connections = config.max_connections or settings.HTTP_CLIENT_MAX_CONNECTIONS
+    max_keepalive = config.max_keepalive_connections or settings.HTTP_CLIENT_MAX_KEEPALIVE
+    http2 = settings.HTTP_CLIENT_HTTP2 if config.http2 is None else config.http2
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_keepalive, max_connections),
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    pool = httpx.AsyncHTTPTransport(limits=limits, http2=http2 and HTTP2_AVAILABLE)
+    return httpx.AsyncClient(
+        transport=_InstrumentedTransport(pool, _metrics[name]),
+        timeout=config.timeout,
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Shared pooled client for `name` on the running event loop.
+
+    Must be called from async code. Raises KeyError for an unknown upstream.
+    """
+    if name not in UPSTREAMS:
+        raise KeyError(f"Unknown HTTP upstream: {name}")
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _clients.setdefault(loop, {})
+        client = per_loop.get(name)
+        if client is None or client.is_closed:
+            client = _build_client(name)
+            per_loop[name] = client
+        return client
+
+
+async def close_http_clients() -> None:
+    """Close every registry client opened on the running loop (app shutdown)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _clients.pop(loop, {})
+    for name, client in per_loop.items():
+        try:
+            await client.aclose()
+        except Exception:
+            logger.warning("Error closing HTTP client %s", name, exc_info=True)
+
+
+def http_client_metrics() -> dict[str, dict[str, Any]]:
+    """Per-upstream metrics snapshot."""
+    return {name: metrics.snapshot() for name, metrics in _metrics.items()}
+
+
+def reset_http_client_metrics() -> None:
+    for metrics in _metrics.values():
+        metrics.reset()
@@ -0,0 +1,201 @@
+"""Process-wide cache for reference data — versioned, TTL-bounded, Redis-invalidated.
+
+Pricing constants, exchange rates, commission versions, subcategory→group
+mapping and group shipping averages change a few times a day, but
+`pricing_calculator` used to re-query them on every call (up to 50 times per
+goal-seek). This module keeps them in memory per worker/process. The same
+machinery backs the authenticated-identity cache (namespace "auth", see
+app/services/identidad_service.py).
+
+Design:
+  - Entries live under a *namespace* ("constantes", "tipo_cambio", "comisiones",
+    "subcategorias", "envio_promedio"). Each namespace carries a local version
+    number; every entry is stamped with the version it was loaded under.
+    `invalidate(ns)` just bumps the version → all entries of that namespace
+    become unreachable in O(1) and are replaced lazily on the next read.
+  - Every entry also has a TTL. It bounds staleness when an invalidation is
+    missed (Redis down, a write made outside the ORM, another host).
+  - Cross-worker invalidation is Redis pub/sub on `refcache:invalidate`
+    (payload: namespace). Publishing is fail-open with the same 0.25s socket
+    timeouts as app/core/token_revocation.py: a Redis outage degrades to
+    TTL-only freshness, never to a failed write.
+  - The subscriber is a daemon thread (sync redis-py), so it works in uvicorn
+    workers and in long-running scripts alike. Short-lived scripts do not need
+    it: their cache dies with the process.
+
+Who invalidates: app/events/pricing_reference_hooks.py (and the models it is
+told about by app/events/auth_cache_hooks.py), after commit of any session that
+wrote one of the reference models.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "refcache:invalidate"
+DEFAULT_TTL_SECONDS = 300.0
+
+# Per-namespace TTL overrides: group shipping averages derive from productos_erp,
+# which the ERP syncs write outside the ORM (no hook fires), so they live shorter.
+NAMESPACE_TTL: dict[str, float] = {
+    "envio_promedio": 120.0,
+    # Resolved user + permission set per JWT `sub`: short, since a deactivated
+    # user must be rejected quickly even if an invalidation is lost.
+    "auth": 30.0,
+}
+
+_MISSING = object()
+
+
+class ReferenceCache:
+    """Thread-safe, namespaced, version-stamped cache with TTL eviction."""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._entries: dict[tuple[str, Hashable], tuple[int, float, Any]] = {}
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(namespace, key)
+        return default if value is _MISSING else value
+
+    def get_or_load(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, or run `loader()` and cache its result.
+
+        The loader runs outside the lock (it hits the DB). If the namespace is
+        invalidated while it runs, the result is returned but not stored.
+        """
+        value = self._lookup(namespace, key)
+        if value is not _MISSING:
+            return value
+        version = self.version(namespace)
+        value = loader()
+        ttl = NAMESPACE_TTL.get(namespace, self._ttl)
+        with self._lock:
+            if self._versions.get(namespace, 0) == version:
+                self._entries[(namespace, key)] = (version, self._clock() + ttl, value)
+        return value
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Bump the version of one namespace (or all of them). Local only."""
+        with self._lock:
+            namespaces = [namespace] if namespace else {ns for ns, _ in self._entries} | set(self._versions)
+            for ns in namespaces:
+                self._versions[ns] = self._versions.get(ns, 0) + 1
+            # Sweep superseded entries (date-keyed entries would otherwise pile up)
+            self._entries = {k: entry for k, entry in self._entries.items() if entry[0] == self._versions.get(k[0], 0)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def _lookup(self, namespace: str, key: Hashable) -> Any:
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return _MISSING
+        version, expires_at, value = entry
+        if version != self._versions.get(namespace, 0) or self._clock() >= expires_at:
+            return _MISSING
+        return value
+
+
+# ── Process-wide singleton ─────────────────────────────────────────
+
+cache = ReferenceCache()
+
+# Lazily built so tests can inject a fake before first use.
+_client: Optional[redis.Redis] = None
+_listener: Optional[threading.Thread] = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.25,  # bound connect blocking (fail-open)
+            socket_timeout=0.25,  # bound read/write blocking (fail-open)
+        )
+    return _client
+
+
+def _set_client_for_tests(client: Optional[redis.Redis]) -> None:
+    """Test seam: swap in a fakeredis/in-memory client, or None to reset."""
+    global _client
+    _client = client
+
+
+def invalidate(namespaces: Optional[set[str]] = None) -> None:
+    """Invalidate locally and broadcast to the other workers. Best-effort."""
+    targets = sorted(namespaces) if namespaces else [None]
+    for ns in targets:
+        cache.invalidate(ns)
+    try:
+        client = _get_client()
+        for ns in targets:
+            client.publish(CHANNEL, ns or "*")
+    except redis.RedisError as exc:
+        logger.warning("Reference cache invalidation publish failed (TTL-only until recovery): %s", exc)
+
+
+def _handle_message(message: dict) -> None:
+    if message.get("type") != "message":
+        return
+    data = message.get("data")
+    ns = data.decode() if isinstance(data, bytes) else str(data)
+    cache.invalidate(None if ns == "*" else ns)
+
+
+def _listen_forever(client: redis.Redis, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            # After (re)connecting we can't know what we missed → drop everything
+            cache.invalidate()
+            while not stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    _handle_message(message)
+        except redis.RedisError as exc:
+            logger.warning("Reference cache subscriber disconnected, retrying in 5s: %s", exc)
+            stop.wait(5.0)
+
+
+_stop = threading.Event()
+
+
+def start_invalidation_listener(client: Optional[redis.Redis] = None) -> None:
+    """Start the pub/sub subscriber thread once per process (idempotent)."""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    if client is None:
+        # Dedicated connection without socket_timeout: get_message bounds the wait
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.25)
+    _stop.clear()
+    _listener = threading.Thread(
+        target=_listen_forever, args=(client, _stop), name="refcache-invalidation", daemon=True
+    )
+    _listener.start()
+
+
+def stop_invalidation_listener() -> None:
+    global _listener
+    _stop.set()
+    if _listener is not None:
+        _listener.join(timeout=2.0)
+    _listener = None
@@ -1,9 +1,26 @@
 """
 SSE (Server-Sent Events) infrastructure for real-time push notifications.
 
-Replaces frontend polling with event-driven updates via Redis pub/sub fan-out.
-Each backend mutation publishes a lightweight signal to Redis; the SSEConnectionManager
-subscribes to sse:* channels and fans out to connected clients.
+Replaces frontend polling with event-driven updates. Each backend mutation
+publishes a lightweight signal to Redis; the SSEConnectionManager of every API
+worker tails it and fans it out to its connected clients.
+
+Design:
+  - Transport is a Redis Stream (`sse:stream`, trimmed to ~SSE_REPLAY_MAXLEN
+    entries). The entry ID is the SSE `id:`, so it is the same on every worker
+    and a reconnecting client's `Last-Event-ID` can be replayed from the stream
+    (only its channels, capped at REPLAY_MAX_EVENTS) before live events.
+  - Fan-out is indexed: channel → set of connections. Each event is encoded
+    once (bytes) and the same object is queued to every subscriber, so the
+    cost per event is O(subscribers of that channel), not O(all connections).
+  - Reload hints (`{"hint": "reload"}`) are coalesced per channel: the first
+    one goes out immediately, the ones that arrive during the following
+    SSE_COALESCE_MS collapse into a single trailing event. Bursty writers
+    (colecta uploads, bulk etiquetas) cost one client re-fetch per window.
+    Any other payload flushes the pending hint first, so order is kept.
+  - Publishers outside this app that PUBLISH on `sse:<channel>` pub/sub
+    (ml-webhook's shipments:webhook) are still fanned out, without an ID —
+    they are not replayable.
 
 Usage:
     # In mutation endpoints (fire-and-forget):
@@ -13,13 +30,14 @@ Usage:
     # In main.py lifespan:
     from app.core.sse import SSEConnectionManager, set_redis
     set_redis(redis_client)
-    manager = SSEConnectionManager(redis_client, max_connections=100)
+    manager = SSEConnectionManager(redis_client, max_connections=5000)
     await manager.start()
 """
 
 from __future__ import annotations
 
 import asyncio
+import re
 from collections import OrderedDict
 from datetime import UTC, datetime
 from typing import Any
@@ -28,10 +46,22 @@ from uuid import uuid4
 from pydantic import BaseModel, ConfigDict
 from redis.asyncio import Redis
 
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+STREAM_KEY = "sse:stream"
+PUBSUB_PATTERN = "sse:*"
+RELOAD_HINT = {"hint": "reload"}
+
+READ_BLOCK_MS = 5000
+READ_COUNT = 500
+REPLAY_MAX_EVENTS = 1000
+CLIENT_QUEUE_SIZE = 64
+
+_STREAM_ID = re.compile(r"^\d+-\d+$")
+
 
 # ── SSE Event Model ─────────────────────────────────────────────
 
@@ -54,6 +84,21 @@ class SSEEvent(BaseModel):
         )
 
 
+def encode_event(channel: str, data: str, event_id: str | None = None) -> bytes:
+    """Wire format of one event; built once and shared by every subscriber."""
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {channel}\ndata: {data}\n\n".encode()
+
+
+def _text(value: str | bytes) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _id_key(event_id: str) -> tuple[int, int]:
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+
 # ── Redis reference + publish utility ────────────────────────────
 
 _redis: Redis | None = None
@@ -69,11 +114,11 @@ def set_redis(redis_client: Redis, loop: asyncio.AbstractEventLoop | None = None
 
 async def sse_publish(channel: str, data: dict[str, Any] | None = None) -> None:
     """
-    Publish an SSE notification event to Redis pub/sub.
+    Append an SSE notification event to the Redis stream.
 
-    Fire-and-forget: if Redis is unavailable or no subscribers exist,
-    the event is silently dropped.  This is intentional — SSE is best-effort
-    and MUST NEVER block the primary mutation.
+    Fire-and-forget: if Redis is unavailable the event is silently dropped.
+    This is intentional — SSE is best-effort and MUST NEVER block the
+    primary mutation.
 
     Args:
         channel: Channel name (e.g., "etiquetas:changed", "alertas:updated")
@@ -84,10 +129,18 @@ async def sse_publish(channel: str, data: dict[str, Any] | None = None) -> None:
         return
 
     event = SSEEvent.create(channel=channel, data=data)
-    redis_channel = f"sse:{channel}"
+    fields = {"channel": channel, "data": event.model_dump_json()}
+    if event.data == RELOAD_HINT:
+        fields["reload"] = "1"
 
     try:
-        await _redis.publish(redis_channel, event.model_dump_json())
+        publish = _redis.xadd(STREAM_KEY, fields, maxlen=settings.SSE_REPLAY_MAXLEN, approximate=True)
+        if _event_loop is not None and asyncio.get_running_loop() is not _event_loop:
+            # Called from another loop (worker runtime task threads): the client
+            # belongs to the loop set in set_redis(), so publish from there.
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(publish, _event_loop))
+        else:
+            await publish
     except Exception:
         logger.exception("Failed to publish SSE event (channel=%s)", channel)
         # Swallow — SSE is best-effort, never block the mutation
@@ -116,53 +169,87 @@ def sse_publish_bg(channel: str, data: dict[str, Any] | None = None) -> None:
 class _ClientConnection:
     """Internal: tracks a single SSE client's subscribed channels and event queue."""
 
-    __slots__ = ("channels", "queue")
+    __slots__ = ("client_id", "channels", "queue")
 
-    def __init__(self, channels: set[str], queue: asyncio.Queue) -> None:
+    def __init__(self, client_id: str, channels: set[str], queue: asyncio.Queue) -> None:
+        self.client_id = client_id
         self.channels = channels
         self.queue = queue
 
 
+class _CoalesceWindow:
+    """Internal: an open coalescing window for one channel's reload hints."""
+
+    __slots__ = ("timer", "pending")
+
+    def __init__(self, timer: asyncio.TimerHandle) -> None:
+        self.timer = timer
+        self.pending: bytes | None = None
+
+
 class SSEConnectionManager:
     """
-    Manages active SSE client connections and Redis pub/sub fan-out.
+    Manages active SSE client connections and the Redis fan-out.
 
     Lifecycle:
     - Created in main.py lifespan startup
-    - start() launches the Redis subscriber background task
-    - stop() cancels the subscriber and cleans up all connections
-    - register()/unregister() called per SSE endpoint request
+    - start() launches the stream reader and the legacy pub/sub listener
+    - stop() cancels both and cleans up all connections
+    - connect()/unregister() called per SSE endpoint request
 
-    Thread safety: all methods are async and run on the same event loop.
+    Thread safety: all methods run on the same event loop.
     """
 
-    def __init__(self, redis: Redis, max_connections: int = 100) -> None:
+    def __init__(
+        self,
+        redis: Redis,
+        max_connections: int = 100,
+        coalesce_seconds: float = 0.25,
+    ) -> None:
         self._redis = redis
         self._max_connections = max_connections
+        self._coalesce_seconds = coalesce_seconds
         # OrderedDict for LRU eviction: oldest connections evicted first
         self._connections: OrderedDict[str, _ClientConnection] = OrderedDict()
-        self._subscriber_task: asyncio.Task | None = None
-        self._event_id: int = 0  # Monotonic event ID counter
+        self._by_channel: dict[str, set[_ClientConnection]] = {}
+        self._windows: dict[str, _CoalesceWindow] = {}
+        self._tasks: list[asyncio.Task] = []
+        # Last stream ID read (and dispatched or coalesced); None until the reader starts
+        self._last_id: str | None = None
+        self.dropped_events = 0
 
     async def start(self) -> None:
-        """Start the Redis subscriber background task."""
-        self._subscriber_task = asyncio.create_task(self._redis_subscriber())
+        """Start the Redis stream reader and pub/sub listener background tasks."""
+        self._tasks = [asyncio.create_task(self._pubsub_listener())]
+        try:
+            # Live events start after the current tail; older ones only via replay
+            last = await self._redis.xrevrange(STREAM_KEY, count=1)
+            self._last_id = _text(last[0][0]) if last else "0-0"
+            self._tasks.append(asyncio.create_task(self._stream_reader()))
+        except Exception:
+            logger.warning("SSE: Redis stream unavailable — SSE events disabled")
         logger.info("SSE connection manager started (max_connections=%d)", self._max_connections)
 
     async def stop(self) -> None:
-        """Stop subscriber and close all connections."""
-        if self._subscriber_task:
-            self._subscriber_task.cancel()
+        """Stop the background tasks and close all connections."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
             try:
-                await self._subscriber_task
+                await task
             except asyncio.CancelledError:
                 pass
+        self._tasks = []
+        for window in self._windows.values():
+            window.timer.cancel()
+        self._windows.clear()
         for conn in list(self._connections.values()):
             try:
                 conn.queue.put_nowait(None)  # Signal generators to stop
             except asyncio.QueueFull:
                 pass
         self._connections.clear()
+        self._by_channel.clear()
         logger.info("SSE connection manager stopped")
 
     def register(self, channels: list[str]) -> tuple[str, asyncio.Queue]:
@@ -175,7 +262,9 @@ class SSEConnectionManager:
         At capacity, the oldest connection is evicted (LRU).
         """
         while len(self._connections) >= self._max_connections:
-            oldest_id, oldest_conn = self._connections.popitem(last=False)
+            oldest_id = next(iter(self._connections))
+            oldest_conn = self._connections[oldest_id]
+            self.unregister(oldest_id)
             try:
                 oldest_conn.queue.put_nowait(None)  # Signal to close
             except asyncio.QueueFull:
@@ -187,71 +276,165 @@ class SSEConnectionManager:
             )
 
         client_id = str(uuid4())
-        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
-        self._connections[client_id] = _ClientConnection(
-            channels=set(channels),
-            queue=queue,
-        )
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        conn = _ClientConnection(client_id=client_id, channels=set(channels), queue=queue)
+        self._connections[client_id] = conn
+        for channel in conn.channels:
+            self._by_channel.setdefault(channel, set()).add(conn)
         return client_id, queue
 
+    async def connect(
+        self, channels: list[str], last_event_id: str | None = None
+    ) -> tuple[str, asyncio.Queue, list[bytes]]:
+        """
+        Register a client and fetch what it missed since `last_event_id`.
+
+        Returns:
+            (client_id, queue, replay) — the caller sends `replay` first, then
+            reads the queue. Registration and the replay bound are taken
+            without yielding to the loop, so every event lands in exactly one
+            of the two (a coalesced hint may land in both; it is idempotent).
+        """
+        client_id, queue = self.register(channels)
+        upto = self._last_id
+        replay: list[bytes] = []
+        if last_event_id and upto:
+            replay = await self.replay(set(channels), last_event_id, upto)
+        return client_id, queue, replay
+
+    async def replay(self, channels: set[str], after: str, upto: str) -> list[bytes]:
+        """Encoded events of `channels` with after < id <= upto, reload hints coalesced."""
+        if not _STREAM_ID.match(after) or _id_key(after) >= _id_key(upto):
+            return []  # unknown format (pre-stream integer IDs) or nothing missed
+        try:
+            entries = await self._redis.xrange(STREAM_KEY, min=f"({after}", max=upto, count=REPLAY_MAX_EVENTS)
+        except Exception:
+            logger.warning("SSE: replay from %s failed, client resumes live only", after)
+            return []
+        if len(entries) == REPLAY_MAX_EVENTS:
+            logger.warning("SSE: replay from %s truncated at %d events", after, REPLAY_MAX_EVENTS)
+
+        # Newest first, so only the last reload hint of each channel is kept
+        replay: list[bytes] = []
+        reloaded: set[str] = set()
+        for entry_id, fields in reversed(entries):
+            channel = _text(_field(fields, "channel"))
+            if channel not in channels:
+                continue
+            if _is_reload(fields):
+                if channel in reloaded:
+                    continue
+                reloaded.add(channel)
+            replay.append(encode_event(channel, _text(_field(fields, "data")), _text(entry_id)))
+        replay.reverse()
+        return replay
+
     def unregister(self, client_id: str) -> None:
         """Remove a client connection (called on disconnect)."""
-        self._connections.pop(client_id, None)
+        conn = self._connections.pop(client_id, None)
+        if conn is None:
+            return
+        for channel in conn.channels:
+            subscribers = self._by_channel.get(channel)
+            if subscribers is not None:
+                subscribers.discard(conn)
+                if not subscribers:
+                    del self._by_channel[channel]
 
     @property
     def active_connections(self) -> int:
         return len(self._connections)
 
-    def _next_event_id(self) -> int:
-        self._event_id += 1
-        return self._event_id
+    # ── Fan-out ──────────────────────────────────────────────────
+
+    def dispatch(self, channel: str, payload: bytes, reload: bool = False) -> None:
+        """Fan an encoded event out to the channel's subscribers (reload hints coalesced)."""
+        window = self._windows.get(channel)
+        if reload and self._coalesce_seconds > 0:
+            if window is not None:
+                window.pending = payload  # the newest wins: its ID is the highest
+                return
+            self._open_window(channel)
+        elif window is not None and window.pending is not None:
+            # A non-reload event: flush the pending hint first to keep order
+            self._fanout(channel, window.pending)
+            window.pending = None
+        self._fanout(channel, payload)
+
+    def _open_window(self, channel: str) -> None:
+        loop = asyncio.get_running_loop()
+        self._windows[channel] = _CoalesceWindow(loop.call_later(self._coalesce_seconds, self._close_window, channel))
+
+    def _close_window(self, channel: str) -> None:
+        window = self._windows.pop(channel, None)
+        if window is not None and window.pending is not None:
+            # Trailing event; it opens the next window so a steady burst is
+            # throttled to one event per window
+            self.dispatch(channel, window.pending, reload=True)
+
+    def _fanout(self, channel: str, payload: bytes) -> None:
+        for conn in self._by_channel.get(channel, ()):
+            try:
+                conn.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.dropped_events += 1
+                logger.warning("SSE: queue full for client %s, dropping event", conn.client_id)
+
+    # ── Redis readers ────────────────────────────────────────────
 
-    async def _redis_subscriber(self) -> None:
-        """Background task: subscribe to sse:* channels and fan out to clients."""
+    async def _stream_reader(self) -> None:
+        """Background task: tail the SSE stream and fan out each entry."""
+        logger.info("SSE: Redis stream reader started (stream=%s, from=%s)", STREAM_KEY, self._last_id)
+        while True:
+            try:
+                response = await self._redis.xread({STREAM_KEY: self._last_id}, block=READ_BLOCK_MS, count=READ_COUNT)
+            except asyncio.CancelledError:
+                return
+            except Exception:
+                logger.exception("SSE: Redis stream read failed, retrying")
+                await asyncio.sleep(1.0)
+                continue
+            for _stream, entries in response or ():
+                for entry_id, fields in entries:
+                    self._last_id = _text(entry_id)
+                    channel = _text(_field(fields, "channel"))
+                    payload = encode_event(channel, _text(_field(fields, "data")), self._last_id)
+                    self.dispatch(channel, payload, reload=_is_reload(fields))
+
+    async def _pubsub_listener(self) -> None:
+        """Background task: fan out events PUBLISHed on sse:* by other services."""
         pubsub = self._redis.pubsub()
         try:
-            await pubsub.psubscribe("sse:*")
+            await pubsub.psubscribe(PUBSUB_PATTERN)
         except Exception:
-            logger.warning("SSE: Redis subscriber failed to connect — SSE events disabled")
+            logger.warning("SSE: Redis pub/sub listener failed to connect — external SSE events disabled")
             return
 
-        logger.info("SSE: Redis subscriber started (pattern=sse:*)")
-
         try:
             async for message in pubsub.listen():
                 if message["type"] != "pmessage":
                     continue
-
-                redis_channel: str | bytes = message["channel"]
-                if isinstance(redis_channel, bytes):
-                    redis_channel = redis_channel.decode()
-
-                # "sse:etiquetas:changed" → "etiquetas:changed"
-                channel = redis_channel.removeprefix("sse:")
-                raw_data = message["data"]
-                if isinstance(raw_data, bytes):
-                    raw_data = raw_data.decode()
-
-                event_id = self._next_event_id()
-
-                # Fan out to all clients subscribed to this channel
-                for client_id, conn in list(self._connections.items()):
-                    if channel in conn.channels:
-                        sse_payload = f"id: {event_id}\nevent: {channel}\ndata: {raw_data}\n\n"
-                        try:
-                            conn.queue.put_nowait(sse_payload)
-                        except asyncio.QueueFull:
-                            logger.warning(
-                                "SSE: queue full for client %s, dropping event",
-                                client_id,
-                            )
+                # "sse:shipments:webhook" → "shipments:webhook"
+                channel = _text(message["channel"]).removeprefix("sse:")
+                self._fanout(channel, encode_event(channel, _text(message["data"])))
         except asyncio.CancelledError:
             pass
         except Exception:
-            logger.exception("SSE: Redis subscriber crashed")
+            logger.exception("SSE: Redis pub/sub listener crashed")
         finally:
             try:
-                await pubsub.punsubscribe("sse:*")
+                await pubsub.punsubscribe(PUBSUB_PATTERN)
                 await pubsub.aclose()
             except Exception:
                 pass
+
+
+def _field(fields: dict, name: str) -> str | bytes:
+    """Stream entry field, for clients with and without decode_responses."""
+    value = fields.get(name.encode())
+    return fields[name] if value is None else value
+
+
+def _is_reload(fields: dict) -> bool:
+    value = fields.get(b"reload", fields.get("reload"))
+    return value is not None and _text(value) == "1"
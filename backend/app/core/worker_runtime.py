@@ -0,0 +1,392 @@
+"""Background worker runtime — Redis leader lease + scheduler for periodic tasks.
+
+The periodic loops (sale orders sync, pedidos en preparación, free-shipping
+auto-fix, ML questions ingest/draft/publish) used to run as asyncio tasks
+inside ONE uvicorn worker, elected with a `/tmp` flock. They do heavy
+synchronous ORM work, so while they ran that worker stopped serving HTTP, and
+the flock only excluded workers on the same host.
+
+Design:
+  - Leader election is a Redis lease (`worker:leader`): `SET NX PX` with a
+    random token, renewed every ttl/3 and released on shutdown. Renew and
+    release are compare-and-set on the token (WATCH/MULTI, no Lua needed), so
+    a worker never extends or drops a lease someone else took over. Any
+    number of worker processes on any number of hosts can run; one leads.
+    If renewals keep failing for a whole TTL the leader stops its tasks,
+    since by then another process may already hold the lease.
+  - Each task runs its coroutine on its OWN event loop in its own thread.
+    Blocking ORM work stalls only that thread: the runtime loop keeps
+    renewing the lease and other tasks keep their schedule. Loop-bound
+    resources (httpx registry clients, asyncio locks) stay consistent because
+    a task always uses the same loop.
+  - Scheduling: initial delay, then `interval` (fixed, or resolved before
+    each run) with ±`jitter` fraction. The next run is planned after the
+    current one ends, so a task never overlaps itself. A run that exceeds
+    `timeout` is cancelled; if its blocking code has not returned by the next
+    tick, that tick is skipped (`skipped_overlap`) instead of piling up.
+  - Status per task lives in the Redis hash `worker:status` (JSON per task:
+    last start/end, duration, result, error, next run, counters).
+    `read_status()` adds the current lag and backs `GET /api/worker/status`.
+  - Without Redis (`client=None`) the lease falls back to `LocalLease`, the
+    old `/tmp` flock: one leader per host and no status hash, but the tasks
+    keep running on a single-host deployment where Redis is down.
+
+Entry point: `python -m app.worker` (see app/worker.py and
+pricing-worker.service.example). With `WORKER_EMBEDDED=true` (the default,
+until the worker unit is deployed) the API lifespan runs the same runtime.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, Union
+from uuid import uuid4
+
+import redis
+from redis.asyncio import Redis as AsyncRedis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = "worker:leader"
+STATUS_KEY = "worker:status"
+LOCAL_LOCK_PATH = "/tmp/pricing-bg-tasks.lock"
+
+
+@dataclass
+class ScheduledTask:
+    """A periodic task: `run()` is one cycle, `interval` is seconds or an async resolver."""
+
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    interval: Union[float, Callable[[], Awaitable[float]]]
+    initial_delay: float = 0.0
+    timeout: float = 600.0
+    jitter: float = 0.1
+
+    async def resolve_interval(self) -> float:
+        if callable(self.interval):
+            return float(await self.interval())
+        return float(self.interval)
+
+
+# ───────────────────────── Leader lease ─────────────────────────
+
+
+class LeaderLease:
+    """Redis lease with a random per-process token. All methods are safe to call repeatedly."""
+
+    def __init__(self, client: AsyncRedis, ttl_seconds: float, key: str = LEASE_KEY) -> None:
+        self._client = client
+        self._ttl_ms = int(ttl_seconds * 1000)
+        self.key = key
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        return bool(await self._client.set(self.key, self.token, nx=True, px=self._ttl_ms))
+
+    async def renew(self) -> bool:
+        """Extend the lease if we still hold it. False means it expired or someone else holds it."""
+        return await self._if_holder(lambda pipe: pipe.pexpire(self.key, self._ttl_ms))
+
+    async def release(self) -> bool:
+        return await self._if_holder(lambda pipe: pipe.delete(self.key))
+
+    async def _if_holder(self, action: Callable[[Any], Any]) -> bool:
+        async with self._client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.key)
+                holder = await pipe.get(self.key)
+                if holder is None or holder.decode() != self.token:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                action(pipe)
+                await pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+
+class LocalLease:
+    """Single-host fallback for `LeaderLease` when Redis is unavailable: a non-blocking flock."""
+
+    def __init__(self, path: str = LOCAL_LOCK_PATH) -> None:
+        self.key = path
+        self.token = f"{socket.gethostname()}:{os.getpid()}:flock"
+        self._fd = None
+
+    async def acquire(self) -> bool:
+        import fcntl
+
+        fd = None
+        try:
+            fd = open(self.key, "w")
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            if fd is not None:
+                fd.close()
+            return False
+        fd.write(self.token)
+        fd.flush()
+        self._fd = fd
+        return True
+
+    async def renew(self) -> bool:
+        # The flock is held until released or the process exits; it cannot be taken over
+        return self._fd is not None
+
+    async def release(self) -> bool:
+        import fcntl
+
+        if self._fd is None:
+            return False
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._fd.close()
+        self._fd = None
+        return True
+
+
+# ───────────────────────── Task runner ─────────────────────────
+
+
+class _LoopThread:
+    """A daemon thread running its own event loop; coroutines are submitted to it."""
+
+    def __init__(self, name: str) -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=f"worker-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro: Awaitable[Any]):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        from app.core.http_clients import close_http_clients
+
+        try:
+            self.submit(close_http_clients()).result(timeout=timeout)
+        except Exception:
+            logger.warning("worker: could not close HTTP clients of %s", self._thread.name, exc_info=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=timeout)
+        if not self._thread.is_alive():
+            self.loop.close()
+
+
+class _TaskRunner:
+    """Schedules one `ScheduledTask` on its own loop thread and records its status."""
+
+    def __init__(self, task: ScheduledTask, status: "_StatusWriter") -> None:
+        self.task = task
+        self._status = status
+        self._thread = _LoopThread(task.name)
+        self._busy = threading.Event()  # set while a cycle is executing in the task thread
+        self.state: dict[str, Any] = {
+            "name": task.name,
+            "state": "idle",
+            "runs": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "skipped": 0,
+        }
+
+    async def _tracked(self) -> Any:
+        try:
+            return await self.task.run()
+        finally:
+            self._busy.clear()
+
+    async def run_once(self, scheduled_at: float) -> str:
+        """Run one cycle (or skip it if the previous one is still stuck). Returns the result label."""
+        if self._busy.is_set():
+            self.state["skipped"] += 1
+            self.state["last_result"] = "skipped_overlap"
+            logger.warning("worker: %s still running from a previous cycle, skipping", self.task.name)
+            await self._status.write(self.state)
+            return "skipped_overlap"
+
+        started = time.time()
+        self.state.update(state="running", last_started_at=started, last_start_delay_s=max(0.0, started - scheduled_at))
+        await self._status.write(self.state)
+
+        self._busy.set()
+        future = self._thread.submit(self._tracked())
+        error: Optional[str] = None
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.task.timeout)
+            result = "ok"
+        except asyncio.TimeoutError:
+            future.cancel()
+            result = "timeout"
+            self.state["timeouts"] += 1
+            logger.error("worker: %s exceeded its timeout (%.0fs), cancelled", self.task.name, self.task.timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            result = "error"
+            error = f"{exc.__class__.__name__}: {exc}"
+            self.state["failures"] += 1
+            logger.error("worker: %s failed: %s", self.task.name, exc, exc_info=True)
+
+        finished = time.time()
+        self.state["runs"] += 1
+        self.state.update(
+            state="idle",
+            last_finished_at=finished,
+            last_duration_s=round(finished - started, 3),
+            last_result=result,
+            last_error=error,
+        )
+        return result
+
+    async def loop(self) -> None:
+        delay = self.task.initial_delay
+        while True:
+            scheduled_at = time.time() + delay
+            self.state.update(next_run_at=scheduled_at)
+            await self._status.write(self.state)
+            await asyncio.sleep(delay)
+            await self.run_once(scheduled_at)
+            try:
+                interval = await self.task.resolve_interval()
+            except Exception:
+                logger.warning("worker: could not resolve interval of %s, keeping the last one", self.task.name)
+                interval = self.state.get("interval_s") or 60.0
+            self.state["interval_s"] = interval
+            delay = max(0.0, interval * (1 + random.uniform(-self.task.jitter, self.task.jitter)))
+
+    def close(self) -> None:
+        self._thread.stop()
+
+
+class _StatusWriter:
+    def __init__(self, client: Optional[AsyncRedis]) -> None:
+        self._client = client
+
+    async def write(self, state: dict[str, Any]) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.hset(STATUS_KEY, state["name"], json.dumps(state))
+        except redis.RedisError as exc:
+            logger.debug("worker: could not write status of %s: %s", state["name"], exc)
+
+
+# ───────────────────────── Runtime ─────────────────────────
+
+
+class WorkerRuntime:
+    """Holds (or waits for) the leader lease and runs the tasks while it holds it.
+
+    `client=None` runs on a `LocalLease` (single host, no status hash).
+    """
+
+    def __init__(
+        self,
+        tasks: list[ScheduledTask],
+        client: Optional[AsyncRedis],
+        lease_ttl_seconds: Optional[float] = None,
+        local_lock_path: str = LOCAL_LOCK_PATH,
+    ) -> None:
+        self.tasks = tasks
+        self._client = client
+        ttl = lease_ttl_seconds or settings.WORKER_LEASE_TTL_SECONDS
+        self.lease = LeaderLease(client, ttl) if client is not None else LocalLease(local_lock_path)
+        self._ttl = ttl
+        self._status = _StatusWriter(client)
+        self._runners: list[_TaskRunner] = []
+        self._loops: list[asyncio.Task] = []
+
+    @property
+    def is_leader(self) -> bool:
+        return bool(self._loops)
+
+    def _start_tasks(self) -> None:
+        logger.info("worker: leader lease acquired (%s), starting %d tasks", self.lease.token, len(self.tasks))
+        self._runners = [_TaskRunner(task, self._status) for task in self.tasks]
+        self._loops = [asyncio.create_task(r.loop(), name=f"worker:{r.task.name}") for r in self._runners]
+
+    async def _stop_tasks(self) -> None:
+        for task in self._loops:
+            task.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        for runner in self._runners:
+            await asyncio.to_thread(runner.close)
+        self._loops, self._runners = [], []
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        stop = stop or asyncio.Event()
+        last_renewed = 0.0
+        try:
+            while not stop.is_set():
+                try:
+                    if not self.is_leader:
+                        if await self.lease.acquire():
+                            last_renewed = time.monotonic()
+                            self._start_tasks()
+                    elif await self.lease.renew():
+                        last_renewed = time.monotonic()
+                    else:
+                        logger.warning("worker: leader lease lost, stopping tasks")
+                        await self._stop_tasks()
+                except redis.RedisError as exc:
+                    logger.warning("worker: Redis error on the leader lease: %s", exc)
+                    if self.is_leader and time.monotonic() - last_renewed > self._ttl:
+                        logger.warning("worker: lease not renewed for a full TTL, stopping tasks")
+                        await self._stop_tasks()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self._ttl / 3)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self.is_leader:
+                await self._stop_tasks()
+                try:
+                    await self.lease.release()
+                except redis.RedisError:
+                    pass
+
+
+# ───────────────────────── Status (API side) ─────────────────────────
+
+_client: Optional[redis.Redis] = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.25, socket_timeout=0.25)
+    return _client
+
+
+def _set_client_for_tests(client: Optional[redis.Redis]) -> None:
+    """Test seam: a fakeredis client, or None to go back to the real one."""
+    global _client
+    _client = client
+
+
+def read_status(now: Optional[float] = None) -> dict[str, Any]:
+    """Leader and per-task status as written by the runtime, plus `lag_s` (how overdue the next run is)."""
+    now = time.time() if now is None else now
+    client = _get_client()
+    leader = client.get(LEASE_KEY)
+    tasks = []
+    for raw in client.hgetall(STATUS_KEY).values():
+        state = json.loads(raw)
+        next_run = state.get("next_run_at")
+        idle = state.get("state") != "running"
+        state["lag_s"] = round(max(0.0, now - next_run), 3) if idle and next_run else 0.0
+        tasks.append(state)
+    return {
+        "leader": leader.decode() if leader else None,
+        "tasks": sorted(tasks, key=lambda t: t["name"]),
+    }
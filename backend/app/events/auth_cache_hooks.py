@@ -0,0 +1,19 @@
+"""
+Invalida el cache de identidades autenticadas (namespace "auth" de
+``app.core.reference_cache``, ver ``app.services.identidad_service``) cuando
+se escriben usuarios, roles, permisos base de rol u overrides por usuario.
+
+Reutiliza el ciclo de ``pricing_reference_hooks``: after_flush / UPDATE-DELETE
+masivos anotan el namespace, after_commit invalida local + Redis pub/sub.
+"""
+
+from __future__ import annotations
+
+from app.events import pricing_reference_hooks
+from app.models.permiso import Permiso, RolPermisoBase, UsuarioPermisoOverride
+from app.models.rol import Rol
+from app.models.usuario import Usuario
+
+NAMESPACE = "auth"
+
+pricing_reference_hooks.registrar_modelos((Usuario, Rol, Permiso, RolPermisoBase, UsuarioPermisoOverride), NAMESPACE)
@@ -0,0 +1,94 @@
+"""
+SQLAlchemy event listeners que invalidan los exports cacheados
+(``app.services.export_jobs_service``) cuando se escriben datos que leen.
+
+Decisión técnica:
+- Mismo ciclo que `pricing_reference_hooks`: `after_flush` y
+  `do_orm_execute` (UPDATE/DELETE masivos) anotan en `session.info` qué
+  dominios de export tocó la transacción; `after_commit` incrementa sus
+  contadores de versión en Redis; `after_rollback` descarta lo anotado.
+- Un contador nuevo cambia la clave de los exports del dominio: el archivo
+  viejo deja de encontrarse y el próximo `POST` genera uno nuevo. No se borra
+  nada del disco acá (lo limpia el TTL).
+- Los syncs del ERP escriben por SQL crudo y no pasan por estos hooks: entran
+  en la versión vía `sync_job_runs.fin`.
+
+Importar este módulo (desde `app/main.py`) dispara los `@event.listens_for`.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.comision_config import ComisionListaGrupo, SubcategoriaGrupo
+from app.models.comision_versionada import ComisionAdicionalCuota, ComisionBase, ComisionVersion
+from app.models.marca_pm import MarcaPM
+from app.models.markup_tienda import MarkupTiendaBrand, MarkupTiendaProducto
+from app.models.mla_banlist import MLABanlist
+from app.models.oferta_ml import OfertaML
+from app.models.precio_gremio_override import PrecioGremioOverride
+from app.models.precio_ml import PrecioML
+from app.models.pricing_constants import PricingConstants
+from app.models.producto import ProductoERP, ProductoPricing
+from app.models.publicacion_ml import PublicacionML
+from app.models.tipo_cambio import TipoCambio
+from app.services import export_jobs_service
+
+# Clave usada en `session.info` con los dominios escritos y no commiteados.
+PENDING_KEY = "_export_cache_pending"
+
+_DOMINIOS_BY_MODEL: dict[type, frozenset[str]] = {
+    ProductoERP: frozenset({"productos"}),
+    ProductoPricing: frozenset({"productos"}),
+    PrecioML: frozenset({"productos"}),
+    OfertaML: frozenset({"productos"}),
+    PublicacionML: frozenset({"productos"}),
+    MLABanlist: frozenset({"productos"}),
+    MarkupTiendaBrand: frozenset({"productos"}),
+    MarkupTiendaProducto: frozenset({"productos"}),
+    PrecioGremioOverride: frozenset({"productos"}),
+    # Inputs globales del cálculo: afectan precios y las métricas de ventas ML
+    TipoCambio: frozenset({"productos", "ventas_ml"}),
+    PricingConstants: frozenset({"productos", "ventas_ml"}),
+    MarcaPM: frozenset({"productos", "ventas_ml"}),
+    ComisionVersion: frozenset({"ventas_ml"}),
+    ComisionBase: frozenset({"ventas_ml"}),
+    ComisionAdicionalCuota: frozenset({"ventas_ml"}),
+    ComisionListaGrupo: frozenset({"ventas_ml"}),
+    SubcategoriaGrupo: frozenset({"ventas_ml"}),
+}
+
+
+def _anotar(session: Session, dominios: set[str]) -> None:
+    if dominios:
+        session.info.setdefault(PENDING_KEY, set()).update(dominios)
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_exports_escritos(session: Session, flush_context) -> None:
+    dominios: set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        dominios |= _DOMINIOS_BY_MODEL.get(type(obj), frozenset())
+    _anotar(session, dominios)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _anotar_escrituras_masivas(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _DOMINIOS_BY_MODEL:
+        _anotar(orm_execute_state.session, set(_DOMINIOS_BY_MODEL[mapper.class_]))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session: Session) -> None:
+    dominios = session.info.pop(PENDING_KEY, None)
+    if dominios:
+        export_jobs_service.incrementar_versiones(dominios)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
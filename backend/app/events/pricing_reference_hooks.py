@@ -0,0 +1,95 @@
+"""
+SQLAlchemy event listeners que invalidan el cache de datos de referencia de
+pricing (``app.core.reference_cache``) cuando se escriben constantes, tipos de
+cambio, comisiones o el mapeo subcategoría → grupo.
+
+Decisión técnica:
+- `after_flush` a nivel `Session` anota en `session.info` qué namespaces tocó
+  la transacción. Mientras la transacción está abierta, `pricing_calculator`
+  NO usa el cache para esa sesión (lee de la DB y no guarda): así la propia
+  sesión ve sus cambios sin commitear y nadie más los ve antes del commit.
+- `after_commit` invalida localmente y publica por Redis a los demás workers.
+- `after_rollback` descarta lo anotado (no hubo cambio real).
+- `do_orm_execute` cubre los UPDATE/DELETE masivos (`query(...).delete()`),
+  que no pasan por `session.dirty`/`session.deleted`.
+- Otros caches del mismo `reference_cache` registran sus modelos con
+  `registrar_modelos` (ej. `auth_cache_hooks` → namespace "auth") y reutilizan
+  este mismo ciclo anotar → commit → invalidar.
+
+Importar este módulo (desde `app/main.py` y `pricing_calculator`) dispara los
+`@event.listens_for`.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import reference_cache
+from app.models.comision_config import ComisionListaGrupo, SubcategoriaGrupo
+from app.models.comision_versionada import ComisionAdicionalCuota, ComisionBase, ComisionVersion
+from app.models.pricing_constants import PricingConstants
+from app.models.tipo_cambio import TipoCambio
+
+# Clave usada en `session.info` con los namespaces escritos y no commiteados.
+PENDING_KEY = "_reference_cache_pending"
+
+_NAMESPACE_BY_MODEL: dict[type, str] = {
+    PricingConstants: "constantes",
+    TipoCambio: "tipo_cambio",
+    ComisionVersion: "comisiones",
+    ComisionBase: "comisiones",
+    ComisionAdicionalCuota: "comisiones",
+    ComisionListaGrupo: "comisiones",
+    # El mapeo subcategoría → grupo también cambia el envío promedio por grupo
+    SubcategoriaGrupo: "subcategorias",
+}
+
+
+def registrar_modelos(modelos: tuple[type, ...], namespace: str) -> None:
+    """Invalida `namespace` cuando una transacción que escribió alguno de `modelos` commitea."""
+    for modelo in modelos:
+        _NAMESPACE_BY_MODEL[modelo] = namespace
+
+
+def _anotar(session: Session, tocados: set[str]) -> None:
+    if "subcategorias" in tocados:
+        tocados.add("envio_promedio")
+    if tocados:
+        session.info.setdefault(PENDING_KEY, set()).update(tocados)
+
+
+def namespaces_pendientes(session: Session) -> set[str]:
+    """Namespaces que esta sesión escribió y todavía no commiteó."""
+    return session.info.get(PENDING_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_referencias_escritas(session: Session, flush_context) -> None:
+    tocados = {
+        _NAMESPACE_BY_MODEL[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in _NAMESPACE_BY_MODEL
+    }
+    _anotar(session, tocados)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _anotar_escrituras_masivas(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _NAMESPACE_BY_MODEL:
+        _anotar(orm_execute_state.session, {_NAMESPACE_BY_MODEL[mapper.class_]})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session: Session) -> None:
+    tocados = session.info.pop(PENDING_KEY, None)
+    if tocados:
+        reference_cache.invalidate(tocados)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,127 @@
+"""
+SQLAlchemy event listeners que invalidan filas de ``pricing_snapshots`` cuando
+cambia un input por ítem del cálculo de precios / markups.
+
+Decisión técnica:
+- `after_insert`/`after_update`/`after_delete` sobre `ProductoPricing`,
+  `ProductoERP` (sólo si cambió costo, moneda, IVA, envío o subcategoría),
+  `PrecioML` y `OfertaML` encolan `item_id` (u `mla`) en `session.info`.
+- Un único listener `after_flush` a nivel `Session` drena la cola y emite
+  un `UPDATE pricing_snapshots SET stale = true` (dos si hubo ofertas) en la MISMA conexión,
+  o sea dentro de la misma transacción que la edición: si la edición se
+  rollbackea, la invalidación también.
+- Los UPDATE/DELETE masivos ORM sobre `ProductoPricing`
+  (`query(...).update()`, `update(ProductoPricing)`) no disparan los
+  listeners por instancia: `do_orm_execute` marca stale los ítems que
+  matchea su WHERE, antes de ejecutarlo (después puede dejar de matchear,
+  p. ej. `participa_rebate == True`). Los UPDATE Core sobre la tabla quedan
+  afuera a propósito (el refresh escribe markups así).
+- El recálculo NO corre acá: lo hace el cron `refrescar_pricing_snapshot`
+  y, mientras tanto, los endpoints calculan en el momento las filas stale.
+
+Los inputs globales (tipo de cambio, constantes, comisiones) no necesitan
+hook: entran en la huella `inputs_hash` y una huella distinta invalida la fila.
+
+Importar este módulo (desde `app/main.py`) dispara los `@event.listens_for`.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models.oferta_ml import OfertaML
+from app.models.precio_ml import PrecioML
+from app.models.pricing_snapshot import PricingSnapshot
+from app.models.producto import ProductoERP, ProductoPricing
+from app.models.publicacion_ml import PublicacionML
+
+
+# Claves usadas en `session.info` para encolar trabajo pendiente.
+_ITEMS_KEY = "_pricing_snapshot_items"
+_MLAS_KEY = "_pricing_snapshot_mlas"
+
+# Columnas de ProductoERP que afectan el cálculo (stock/descripción no).
+_ERP_ATTRS_PRICING = ("costo", "moneda_costo", "iva", "envio", "subcategoria_id")
+
+
+# ───────────────────────── Helpers ─────────────────────────
+
+
+def _enqueue(target, key: str, value) -> None:
+    if value is None:
+        return
+    session = Session.object_session(target)
+    if session is None:
+        return
+    session.info.setdefault(key, set()).add(value)
+
+
+# ──────────────── Listeners — inputs por ítem ────────────────
+
+
+@event.listens_for(ProductoPricing, "after_insert")
+@event.listens_for(ProductoPricing, "after_update")
+@event.listens_for(ProductoPricing, "after_delete")
+def _on_producto_pricing_change(mapper, connection, target):
+    _enqueue(target, _ITEMS_KEY, target.item_id)
+
+
+@event.listens_for(ProductoERP, "after_update")
+def _on_producto_erp_after_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[attr].history.has_changes() for attr in _ERP_ATTRS_PRICING):
+        _enqueue(target, _ITEMS_KEY, target.item_id)
+
+
+@event.listens_for(PrecioML, "after_insert")
+@event.listens_for(PrecioML, "after_update")
+@event.listens_for(PrecioML, "after_delete")
+def _on_precio_ml_change(mapper, connection, target):
+    _enqueue(target, _ITEMS_KEY, target.item_id)
+
+
+@event.listens_for(OfertaML, "after_insert")
+@event.listens_for(OfertaML, "after_update")
+@event.listens_for(OfertaML, "after_delete")
+def _on_oferta_ml_change(mapper, connection, target):
+    _enqueue(target, _MLAS_KEY, target.mla)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_producto_pricing_masivo(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not ProductoPricing:
+        return
+    items = select(ProductoPricing.item_id)
+    if orm_execute_state.statement.whereclause is not None:
+        items = items.where(orm_execute_state.statement.whereclause)
+    orm_execute_state.session.connection().execute(
+        update(PricingSnapshot).where(PricingSnapshot.item_id.in_(items)).values(stale=True)
+    )
+
+
+# ─────────────── Listener `after_flush` — misma transacción ───────────────
+
+
+@event.listens_for(Session, "after_flush")
+def _marcar_snapshot_stale(session: Session, flush_context) -> None:
+    """Drena las colas y marca stale las filas afectadas (máximo 2 UPDATEs por flush)."""
+    item_ids = session.info.pop(_ITEMS_KEY, None)
+    mlas = session.info.pop(_MLAS_KEY, None)
+    if not item_ids and not mlas:
+        return
+
+    conditions = []
+    if item_ids:
+        conditions.append(PricingSnapshot.item_id.in_(list(item_ids)))
+    if mlas:
+        conditions.append(
+            PricingSnapshot.item_id.in_(select(PublicacionML.item_id).where(PublicacionML.mla.in_(list(mlas))))
+        )
+
+    connection = session.connection()
+    for condition in conditions:
+        connection.execute(update(PricingSnapshot).where(condition).values(stale=True))
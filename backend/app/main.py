@@ -76,6 +76,7 @@ from app.routers import (
     claims_dashboard,
     document_templates,
     empresas,
+    export_jobs,
     free_shipping_alerts,
     prearmado,
     prearmado_stats,
@@ -95,6 +96,7 @@ from app.routers import (
     rma_control_deposito,
     rma_proveedores,
     weather,
+    worker_status,
 )
 from app.tickets.api.endpoints import (
     tickets as tickets_ep,
@@ -112,30 +114,23 @@ from app.core.rate_limit import limiter, rate_limit_exceeded_handler
 # para que los listeners estén activos cuando empiece a aceptar requests.
 from app.events import rrhh_he_hooks  # noqa: F401  (side-effect: registra listeners)
 
-logger = get_logger(__name__)
-
-# ── Worker-level lock for background tasks ───────────────────────
-# With multiple uvicorn workers, lifespan() runs on EACH worker.
-# Without a lock, background tasks run N times (once per worker),
-# causing duplicated DB writes, TRUNCATE races, and wasted resources.
-# Only one worker acquires the lock; the rest skip background tasks.
+# Idem para `pricing_snapshot_hooks`: marca stale el snapshot de pricing ante
+# ediciones de pricing / precios ML / ofertas / costos.
+from app.events import pricing_snapshot_hooks  # noqa: F401  (side-effect: registra listeners)
 
-_BG_LOCK_PATH = "/tmp/pricing-bg-tasks.lock"
+# Idem para `pricing_reference_hooks`: invalida el cache de datos de referencia
+# de pricing (constantes, TC, comisiones) al commitear cambios.
+from app.events import pricing_reference_hooks  # noqa: F401  (side-effect: registra listeners)
 
+# Idem para `auth_cache_hooks`: invalida el cache de usuario + permisos de
+# get_current_user al commitear cambios de usuarios, roles u overrides.
+from app.events import auth_cache_hooks  # noqa: F401  (side-effect: registra modelos)
 
-def _try_acquire_bg_lock():
-    """Try to acquire exclusive lock for background tasks. Returns fd or None."""
-    import fcntl
-    import os
+# Idem para `export_cache_hooks`: invalida los exports a Excel cacheados al
+# commitear cambios en los datos que leen.
+from app.events import export_cache_hooks  # noqa: F401  (side-effect: registra listeners)
 
-    try:
-        lock_fd = open(_BG_LOCK_PATH, "w")
-        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-        lock_fd.write(str(os.getpid()))
-        lock_fd.flush()
-        return lock_fd  # Keep fd open — lock releases when process exits
-    except OSError:
-        return None
+logger = get_logger(__name__)
 
 
 @asynccontextmanager
@@ -177,37 +172,44 @@ async def lifespan(app: FastAPI):
         set_redis(redis, loop=asyncio.get_running_loop())
         app.state.redis = redis
 
-        sse_manager = SSEConnectionManager(redis, max_connections=settings.SSE_MAX_CONNECTIONS)
+        sse_manager = SSEConnectionManager(
+            redis,
+            max_connections=settings.SSE_MAX_CONNECTIONS,
+            coalesce_seconds=settings.SSE_COALESCE_MS / 1000,
+        )
         await sse_manager.start()
         app.state.sse_manager = sse_manager
         app.state.sse_heartbeat_seconds = settings.SSE_HEARTBEAT_SECONDS
         logger.info("SSE enabled (Redis connected)")
+
+        # Invalidación cross-worker del cache de referencia de pricing
+        from app.core.reference_cache import start_invalidation_listener
+
+        start_invalidation_listener()
     except Exception:
         logger.warning("Redis unavailable — SSE disabled, polling fallback active")
+        redis = None
         app.state.redis = None
         app.state.sse_manager = None
         app.state.sse_heartbeat_seconds = 30
 
-    # ── Background tasks (only on ONE worker) ─────────────────────
-    bg_lock_fd = _try_acquire_bg_lock()
+    # ── Background tasks ──────────────────────────────────────────
+    # Run in the worker process (`python -m app.worker`, see app/worker.py).
+    # WORKER_EMBEDDED (default until pricing-worker.service is deployed) runs
+    # the same runtime here (Redis lease, so only one API worker — or the
+    # worker process — actually runs the tasks, each on its own thread).
+    # Without Redis it falls back to the old /tmp flock: one leader per host.
     bg_tasks = []
+    if settings.WORKER_EMBEDDED:
+        from app.core.worker_runtime import WorkerRuntime
+        from app.worker import build_tasks
 
-    if bg_lock_fd:
-        import os
-
-        logger.info("This worker (pid=%d) owns background tasks", os.getpid())
-        bg_tasks = [
-            asyncio.create_task(sync_pedidos_preparacion_task()),
-            asyncio.create_task(free_shipping_auto_fix_task()),
-            asyncio.create_task(sync_sale_orders_task()),
-            asyncio.create_task(ml_questions_ingest_task()),
-            asyncio.create_task(ml_questions_draft_task()),
-            asyncio.create_task(ml_questions_publish_task()),
-        ]
-    else:
-        import os
-
-        logger.info("This worker (pid=%d) skips background tasks (another worker owns them)", os.getpid())
+        if redis is None:
+            logger.error(
+                "WORKER_EMBEDDED set but Redis is unavailable — background tasks fall back to a local "
+                "flock (single host only, no /api/worker/status)"
+            )
+        bg_tasks.append(asyncio.create_task(WorkerRuntime(build_tasks(), redis).run()))
 
     yield
 
@@ -221,15 +223,25 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
 
+    from app.core.reference_cache import stop_invalidation_listener
+
+    stop_invalidation_listener()
+
+    from app.core.http_clients import close_http_clients
+
+    await close_http_clients()
+
+    from app.services.export_jobs_service import cerrar_pool
+
+    cerrar_pool()
+
+    from app.core.database import dispose_async_engine
+
+    await dispose_async_engine()
     if sse_manager:
         await sse_manager.stop()
     if redis:
         await redis.close()
-    if bg_lock_fd:
-        import fcntl
-
-        fcntl.flock(bg_lock_fd, fcntl.LOCK_UN)
-        bg_lock_fd.close()
 
 
 def _docs_urls(environment: str) -> dict[str, str | None]:
@@ -330,6 +342,8 @@ app.include_router(usuarios_erp.router, prefix="/api", tags=["usuarios-erp"])
 app.include_router(produccion_banlist.router, prefix="/api", tags=["produccion-banlist"])
 app.include_router(prearmado.router, prefix="/api", tags=["prearmado"])
 app.include_router(prearmado_stats.router, prefix="/api", tags=["prearmados-stats"])
+app.include_router(export_jobs.router, prefix="/api", tags=["exports"])
+app.include_router(worker_status.router, prefix="/api", tags=["worker"])
 app.include_router(turbo_routing.router, prefix="/api", tags=["turbo-routing"])
 app.include_router(alertas.router, prefix="/api", tags=["alertas"])
 app.include_router(asignaciones.router, prefix="/api/asignaciones", tags=["asignaciones"])
@@ -392,160 +406,3 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok", "timestamp": datetime.now(UTC).isoformat()}
-
-
-async def sync_pedidos_preparacion_task():
-    """
-    Tarea de background que sincroniza pedidos en preparación cada 5 minutos.
-    """
-    from app.scripts.sync_pedidos_preparacion import sync_pedidos_preparacion
-
-    # Esperar 30 segundos después del inicio para que todo esté listo
-    await asyncio.sleep(30)
-    logger.info("Background task started: sync pedidos preparacion (interval=300s)")
-
-    while True:
-        try:
-            await sync_pedidos_preparacion()
-        except Exception as e:
-            logger.error("Sync pedidos preparacion failed: %s", e, exc_info=True)
-
-        # Esperar 5 minutos
-        await asyncio.sleep(300)
-
-
-async def sync_sale_orders_task():
-    """
-    Tarea de background que sincroniza sale orders del ERP cada 10 minutos.
-    Trae headers + details actualizados de los últimos 7 días.
-    """
-    from app.scripts.sync_sale_orders_all import main_async
-
-    # Esperar 60 segundos para no competir con el startup
-    await asyncio.sleep(60)
-    logger.info("Background task started: sync sale orders (interval=600s)")
-
-    while True:
-        try:
-            await main_async(days=7)
-        except Exception as e:
-            logger.error("Sync sale orders failed: %s", e, exc_info=True)
-
-        # Esperar 10 minutos
-        await asyncio.sleep(600)
-
-
-async def _resolve_ml_bot_poll_interval_seconds() -> int:
-    """Judgment Day fix: `poll_interval_seconds` is seeded/documented as the
-    panel-editable interval for the ml-bot ingest/draft loops below, but was
-    never actually read — both loops hardcoded `asyncio.sleep(30)`. Read live
-    from a short-lived DB session (ADR-5) each tick; any failure (DB error,
-    malformed value already handled inside `resolve_poll_interval_seconds`)
-    falls back to the same default so a bad read can never crash the loop.
-    """
-    from app.core.database import get_background_db
-    from app.services.ml_questions import policy
-
-    try:
-        with get_background_db() as db:
-            return policy.resolve_poll_interval_seconds(db)
-    except Exception as exc:
-        logger.warning("ml-bot: failed to resolve poll_interval_seconds, using default=30s: %s", exc)
-        return 30
-
-
-async def ml_questions_ingest_task():
-    """
-    Tarea de background que ingesta preguntas nuevas de MercadoLibre
-    (topic='questions') desde la BD mlwebhook hacia ml_bot_questions
-    (Slice C — solo ingesta, sin drafting ni publicación).
-    """
-    from app.services.ml_questions.ingestion_service import run_ml_questions_ingest_cycle
-
-    # Esperar 60 segundos para que todo esté listo (DB, ML client, etc.)
-    await asyncio.sleep(60)
-    logger.info("Background task started: ml_questions_ingest (interval=poll_interval_seconds, default 30s)")
-
-    while True:
-        try:
-            stats = await run_ml_questions_ingest_cycle()
-            if stats["ingested"] or stats["duplicates"] or stats["skipped_answered"]:
-                logger.info("ML questions ingest stats: %s", stats)
-        except Exception as e:
-            logger.error("ML questions ingest failed: %s", e, exc_info=True)
-
-        # Intervalo panel-editable (ml_bot_config.poll_interval_seconds), fail-safe default 30s.
-        await asyncio.sleep(await _resolve_ml_bot_poll_interval_seconds())
-
-
-async def ml_questions_publish_task():
-    """
-    Tarea de background que publica en ML las preguntas cuyo wait_until ya
-    venció (Slice E — wait-window publisher): claim CAS, POST /answers fuera
-    de cualquier sesión de DB, y ruteo a published/waiting(retry)/failed.
-    """
-    from app.services.ml_questions.publisher_service import run_ml_questions_publish_cycle
-
-    # Esperar 120 segundos para que ingesta (60s) y drafting (90s) ya hayan
-    # corrido al menos una vez y existan filas 'waiting' para publicar.
-    await asyncio.sleep(120)
-    logger.info("Background task started: ml_questions_publish (interval=poll_interval_seconds, default 30s)")
-
-    while True:
-        try:
-            stats = await run_ml_questions_publish_cycle()
-            if stats["published"] or stats["retry"] or stats["failed"]:
-                logger.info("ML questions publish stats: %s", stats)
-        except Exception as e:
-            logger.error("ML questions publish failed: %s", e, exc_info=True)
-
-        # Intervalo panel-editable (ml_bot_config.poll_interval_seconds), fail-safe default 30s.
-        await asyncio.sleep(await _resolve_ml_bot_poll_interval_seconds())
-
-
-async def ml_questions_draft_task():
-    """
-    Tarea de background que orquesta el drafting de preguntas nuevas
-    (status='received') vía el pipeline LLM (Slice D2): claim CAS,
-    manipulation-signal check, contexto escopeado + Groq, denylist,
-    y ruteo a waiting/pending_morning/failed.
-    """
-    from app.services.ml_questions.drafting_service import run_ml_questions_draft_cycle
-
-    # Esperar 90 segundos para que ingesta (60s) ya haya corrido al menos una vez.
-    await asyncio.sleep(90)
-    logger.info("Background task started: ml_questions_draft (interval=poll_interval_seconds, default 30s)")
-
-    while True:
-        try:
-            stats = await run_ml_questions_draft_cycle()
-            if not stats.get("not_eligible"):
-                logger.info("ML questions draft stats: %s", stats)
-        except Exception as e:
-            logger.error("ML questions draft failed: %s", e, exc_info=True)
-
-        # Intervalo panel-editable (ml_bot_config.poll_interval_seconds), fail-safe default 30s.
-        await asyncio.sleep(await _resolve_ml_bot_poll_interval_seconds())
-
-
-async def free_shipping_auto_fix_task():
-    """
-    Tarea de background que desactiva envío gratis en publicaciones
-    con free_shipping_error=true (no mandatory) cada 5 minutos.
-    """
-    from app.services.free_shipping_auto_fix import run_free_shipping_auto_fix
-
-    # Esperar 60 segundos para que todo esté listo (DB, ML client, etc.)
-    await asyncio.sleep(60)
-    logger.info("Background task started: free_shipping_auto_fix (interval=300s)")
-
-    while True:
-        try:
-            stats = await run_free_shipping_auto_fix()
-            if stats["fixed"] > 0 or stats["failed"] > 0:
-                logger.info("Free shipping auto-fix stats: %s", stats)
-        except Exception as e:
-            logger.error("Free shipping auto-fix failed: %s", e, exc_info=True)
-
-        # Esperar 5 minutos
-        await asyncio.sleep(300)
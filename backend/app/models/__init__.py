@@ -6,6 +6,10 @@ from app.models.subcategoria import Subcategoria
 from app.models.comision_config import GrupoComision, SubcategoriaGrupo, ComisionListaGrupo
 from app.models.auditoria_precio import AuditoriaPrecio
 from app.models.precio_ml import PrecioML
+from app.models.pricing_snapshot import PricingSnapshot
+from app.models.erp_sync_state import ERPSyncState
+from app.models.sync_job_run import SyncJobRun
+from app.models.export_job import ExportJob
 from app.models.auditoria import Auditoria
 from app.models.marca_pm import MarcaPM
 from app.models.mla_banlist import MLABanlist
@@ -28,6 +32,7 @@ from app.models.tb_item_association import TbItemAssociation
 from app.models.tb_price_list_items import TbPriceListItems
 from app.models.tb_item_storage import TbItemStorage
 from app.models.stock_por_deposito import StockPorDeposito
+from app.models.ranking_item_deposito import RankingItemDeposito
 from app.models.offset_ganancia import OffsetGanancia
 from app.models.offset_grupo import OffsetGrupo
 from app.models.offset_grupo_filtro import OffsetGrupoFiltro
@@ -154,6 +159,7 @@ from app.models.compra_evento import CompraEvento
 from app.models.orden_pago import OrdenPago
 from app.models.imputacion import Imputacion
 from app.models.cc_proveedor_movimiento import CCProveedorMovimiento
+from app.models.cc_proveedor_saldo import CCProveedorSaldo
 from app.models.cc_reconciliacion_log import CCReconciliacionLog
 from app.models.compras_papelera import ComprasPapelera
 from app.models.compra_adjunto import CompraAdjunto
@@ -193,6 +199,10 @@ __all__ = [
     "PublicacionML",
     "AuditoriaPrecio",
     "PrecioML",
+    "PricingSnapshot",
+    "ERPSyncState",
+    "SyncJobRun",
+    "ExportJob",
     "Auditoria",
     "MarcaPM",
     "MLABanlist",
@@ -215,6 +225,7 @@ __all__ = [
     "TbPriceListItems",
     "TbItemStorage",
     "StockPorDeposito",
+    "RankingItemDeposito",
     "OffsetGanancia",
     "OffsetGrupo",
     "OffsetGrupoFiltro",
@@ -349,6 +360,7 @@ __all__ = [
     "OrdenPago",
     "Imputacion",
     "CCProveedorMovimiento",
+    "CCProveedorSaldo",
     "CCReconciliacionLog",
     "ComprasPapelera",
     "CompraAdjunto",
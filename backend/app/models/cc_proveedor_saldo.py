@@ -0,0 +1,45 @@
+"""
+CCProveedorSaldo — saldo mantenido por (proveedor, empresa, moneda).
+
+Proyección del libro mayor `cc_proveedor_movimientos`: `insertar_mov` hace un
+upsert acá en la misma transacción que el INSERT del movimiento, así que el
+saldo corriente se lee sin agregar el mayor. `saldo` usa la misma fórmula que
+`calcular_saldo_por_moneda` (debe +, haber −, ajuste signo_ajuste × monto).
+
+La reconciliación diaria compara esta tabla contra el mayor en un solo query
+(`cc_proveedor_service.verificar_saldos_mantenidos`); el mayor sigue siendo la
+fuente de verdad.
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class CCProveedorSaldo(Base):
+    """Saldo corriente de CC por proveedor/empresa/moneda."""
+
+    __tablename__ = "cc_proveedor_saldos"
+
+    proveedor_id = Column(
+        Integer,
+        ForeignKey("proveedores.id", ondelete="RESTRICT"),
+        primary_key=True,
+    )
+    empresa_id = Column(
+        Integer,
+        ForeignKey("empresas.id", ondelete="RESTRICT"),
+        primary_key=True,
+    )
+    moneda = Column(String(3), primary_key=True)
+    saldo = Column(Numeric(18, 2), nullable=False, default=0)
+    movimientos = Column(Integer, nullable=False, default=0)
+    ultimo_movimiento_id = Column(BigInteger, nullable=True)
+    actualizado_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return (
+            f"<CCProveedorSaldo(proveedor_id={self.proveedor_id}, empresa_id={self.empresa_id}, "
+            f"saldo={self.saldo} {self.moneda})>"
+        )
@@ -0,0 +1,30 @@
+"""SQLAlchemy model for erp_sync_state.
+
+Estado por tabla del motor declarativo de sync del ERP
+(``app.services.erp_sync_engine``): watermark alcanzado y datos de la última
+ejecución. El watermark se guarda como texto y se interpreta con el tipo de la
+columna watermark de la spec.
+
+Se actualiza en la misma transacción que cada lote mergeado, así que después
+de un corte el siguiente incremental arranca desde el último lote commiteado.
+"""
+
+from sqlalchemy import Column, DateTime, Float, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ERPSyncState(Base):
+    __tablename__ = "erp_sync_state"
+
+    tabla = Column(String(100), primary_key=True)
+    watermark = Column(String(100))
+
+    modo = Column(String(20))  # full | incremental
+    estado = Column(String(20))  # ok | error | en_curso
+    filas = Column(Integer)  # filas escritas en la última ejecución
+    duracion_s = Column(Float)
+    error = Column(Text)
+
+    actualizado_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
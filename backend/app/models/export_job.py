@@ -0,0 +1,37 @@
+"""
+ExportJob — export a Excel corrido en segundo plano.
+
+`POST /api/exports/{tipo}` crea la fila y el worker pool de
+`app.services.export_jobs_service` genera el archivo. `clave` es el hash de
+(tipo, parámetros, usuario, versión de datos): un job `listo` con la misma
+clave y el archivo todavía en disco se sirve directo, sin volver a generar.
+"""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+
+    id = Column(String(36), primary_key=True)  # uuid4
+    tipo = Column(String(50), nullable=False)
+    parametros = Column(JSONB, nullable=False, default=dict)
+    clave = Column(String(64), nullable=False)
+    version_datos = Column(String(200), nullable=True)  # None = sin versión → no se cachea
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente | corriendo | listo | error
+    filas = Column(Integer, nullable=False, default=0)
+    archivo = Column(String(500), nullable=True)
+    filename = Column(String(255), nullable=True)
+    error = Column(Text, nullable=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    creado_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    terminado_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_export_jobs_clave_estado", "clave", "estado"),)
+
+    def __repr__(self) -> str:
+        return f"<ExportJob(id={self.id}, tipo={self.tipo}, estado={self.estado}, filas={self.filas})>"
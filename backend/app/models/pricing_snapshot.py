@@ -0,0 +1,58 @@
+"""SQLAlchemy model for pricing_snapshots.
+
+Snapshot desnormalizado de pricing: una fila por (item_id, pricelist_id) con el
+precio vigente de esa lista y su markup ya calculado (comisión ML + tiers +
+varios + envío), usando el tipo de cambio, las constantes y la versión de
+comisiones del momento del cálculo.
+
+La fila de la lista clásica (pricelist_id = 4) además guarda los datos a nivel
+ítem que no pertenecen a una lista: rebate y mejor oferta vigente.
+
+Mantenido por: ``app.services.pricing_snapshot_service`` (refresh incremental,
+cron ``app.scripts.refrescar_pricing_snapshot``) y ``app.events.pricing_snapshot_hooks``
+(marca filas ``stale`` ante ediciones de pricing / ofertas / precios ML).
+Usado por: ``GET /productos`` y los exports de productos.
+"""
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, Index, Integer, PrimaryKeyConstraint, String
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class PricingSnapshot(Base):
+    __tablename__ = "pricing_snapshots"
+
+    item_id = Column(Integer, nullable=False)
+    pricelist_id = Column(Integer, nullable=False)
+
+    precio = Column(Float)
+    markup = Column(Float)  # porcentaje (ej: 12.5 = 12.5%)
+    costo_ars = Column(Float)
+    costo_envio = Column(Float)
+    comision_total = Column(Float)
+    limpio = Column(Float)
+
+    # Datos a nivel ítem — sólo en la fila de la lista clásica (4)
+    precio_rebate = Column(Float)
+    markup_rebate = Column(Float)  # porcentaje
+    mejor_oferta_mla = Column(String(50))
+    mejor_oferta_precio = Column(Float)
+    mejor_oferta_pvp = Column(Float)
+    mejor_oferta_monto = Column(Float)
+    mejor_oferta_porcentaje = Column(Float)
+    mejor_oferta_fecha_hasta = Column(Date)
+    markup_oferta = Column(Float)  # porcentaje
+
+    # Huella de los inputs globales (tipo de cambio, constantes, comisiones,
+    # envío promedio por grupo). Si no coincide con la actual, la fila
+    # está vencida aunque stale sea False.
+    inputs_hash = Column(String(64), nullable=False)
+    stale = Column(Boolean, nullable=False, default=False)
+    calculado_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("item_id", "pricelist_id", name="pk_pricing_snapshots"),
+        Index("ix_pricing_snapshots_pricelist_markup", "pricelist_id", "markup"),
+        Index("ix_pricing_snapshots_stale", "stale"),
+    )
@@ -20,12 +20,12 @@ class ProductoERP(Base):
     categoria = Column(String(100), index=True)
     subcategoria_id = Column(Integer, index=True)
 
-    costo = Column(Float)
+    costo = Column(Float, index=True)
     moneda_costo = Column(SQLEnum(TipoMoneda), default=TipoMoneda.ARS)
     iva = Column(Float, default=21.0)
     envio = Column(Float, default=0.0)
 
-    stock = Column(Integer, default=0)
+    stock = Column(Integer, default=0, index=True)
     activo = Column(Boolean, default=True)
 
     fecha_sync = Column(DateTime(timezone=True), server_default=func.now())
@@ -45,12 +45,12 @@ class ProductoPricing(Base):
     item_id = Column(Integer, ForeignKey("productos_erp.item_id"), index=True, unique=True)
 
     precio_lista_ml = Column(Float)
-    markup_calculado = Column(Float)
-    markup_rebate = Column(Float)
-    markup_oferta = Column(Float)
+    markup_calculado = Column(Float, index=True)
+    markup_rebate = Column(Float, index=True)
+    markup_oferta = Column(Float, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
     motivo_cambio = Column(String(255))
-    markup_web_real = Column(Numeric(10, 2))
+    markup_web_real = Column(Numeric(10, 2), index=True)
     fecha_modificacion = Column(DateTime(timezone=True), server_default=func.now())
 
     # Precios con cuotas
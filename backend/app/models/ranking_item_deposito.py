@@ -0,0 +1,55 @@
+"""SQLAlchemy model for ranking_item_deposito.
+
+Precomputed ageing/stock rollup behind the consultas ranking endpoints, so a
+page never aggregates tb_item_transactions or stock_por_deposito at request
+time. Two kinds of rows share the (item_id, stor_id) key, like a GROUPING SETS
+((item_id, stor_id), (item_id)) result:
+
+  - stor_id > 0 (one per item/depot): ``stock`` mirrors stock_por_deposito
+    (sentinel included; the ranking still filters it out when summing).
+  - stor_id = 0 (STOR_ID_ITEM, one per item): item-wide facts — last sale
+    date (ADR-1 sale definition), last purchase and the combo flag.
+
+Maintained by: ``app.services.ranking_rollup_service`` (incremental from the
+item-transaction and stock syncs; full rebuild via
+``python -m app.scripts.rebuild_ranking_rollup``).
+Used by: ``app.routers.consultas`` (ranking, resumen, kpis).
+"""
+
+from datetime import date, datetime, UTC
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Index, Integer, Numeric, PrimaryKeyConstraint, text
+
+from app.core.database import Base
+
+
+class RankingItemDeposito(Base):
+    __tablename__ = "ranking_item_deposito"
+
+    item_id: int = Column(Integer, nullable=False)
+    stor_id: int = Column(Integer, nullable=False)
+    # Depot rows only (NULL on the item row)
+    stock: int | None = Column(Integer, nullable=True)
+    # Item row only (NULL on depot rows)
+    ultima_venta: date | None = Column(Date, nullable=True)
+    ultima_compra_cd: datetime | None = Column(DateTime, nullable=True)
+    ultima_compra_fecha: date | None = Column(Date, nullable=True)
+    ultima_compra_cant: float | None = Column(Numeric(18, 4), nullable=True)
+    es_combo: bool = Column(Boolean, nullable=False, default=False, server_default="false")
+    updated_at: datetime = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(UTC),
+        server_default="NOW()",
+    )
+
+    __table_args__ = (
+        PrimaryKeyConstraint("item_id", "stor_id", name="pk_ranking_item_deposito"),
+        # solo_muerto / capital muerto: range over the item rows
+        Index(
+            "ix_ranking_item_deposito_ultima_venta",
+            "ultima_venta",
+            postgresql_where=text("stor_id = 0"),
+            sqlite_where=text("stor_id = 0"),
+        ),
+    )
@@ -106,5 +106,8 @@ class SaleOrderDetail(Base):
     sod_auxtmpvalue = Column(Numeric(18, 6))
     sod_itemdiscount2 = Column(Numeric(18, 6))
 
+    # Huella del contenido del ERP (sync_sale_orders_all): sólo se reescribe la fila si cambia
+    sync_hash = Column(String(32))
+
     def __repr__(self):
         return f"<SaleOrderDetail(soh_id={self.soh_id}, sod_id={self.sod_id}, item_id={self.item_id})>"
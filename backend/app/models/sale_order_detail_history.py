@@ -75,5 +75,8 @@ class SaleOrderDetailHistory(Base):
     sops_user_id = Column(Integer)
     sops_lastupdate = Column(DateTime)
 
+    # Huella del contenido del ERP (sync_sale_orders_all): sólo se reescribe la fila si cambia
+    sync_hash = Column(String(32))
+
     def __repr__(self):
         return f"<SaleOrderDetailHistory(soh_id={self.soh_id}, sohh_id={self.sohh_id}, sod_id={self.sod_id}, item_id={self.item_id})>"
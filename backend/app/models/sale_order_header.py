@@ -121,5 +121,8 @@ class SaleOrderHeader(Base):
     override_num_bultos = Column(Integer)  # Número de bultos para etiquetas
     override_tipo_domicilio = Column(String(50))  # Particular, Comercial, Sucursal
 
+    # Huella del contenido del ERP (sync_sale_orders_all): sólo se reescribe la fila si cambia
+    sync_hash = Column(String(32))
+
     def __repr__(self):
         return f"<SaleOrderHeader(soh_id={self.soh_id}, comp_id={self.comp_id}, mlo_id={self.mlo_id})>"
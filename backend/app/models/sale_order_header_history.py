@@ -65,5 +65,8 @@ class SaleOrderHeaderHistory(Base):
     sohh_ispackingofpreinvoice = Column(Boolean)
     soh_uniqueid = Column(Integer)
 
+    # Huella del contenido del ERP (sync_sale_orders_all): sólo se reescribe la fila si cambia
+    sync_hash = Column(String(32))
+
     def __repr__(self):
         return f"<SaleOrderHeaderHistory(soh_id={self.soh_id}, sohh_id={self.sohh_id}, sohh_typeofhistory={self.sohh_typeofhistory})>"
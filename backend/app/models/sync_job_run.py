@@ -0,0 +1,32 @@
+"""SQLAlchemy model for sync_job_runs.
+
+Una fila por job y por corrida del orquestador de syncs
+(``app.services.sync_scheduler``): estado, duración y filas procesadas. Todas
+las filas de una misma ejecución del DAG comparten ``corrida_id``.
+
+Usado para ver el camino crítico de la ventana de sync y qué job falló o se
+volvió lento.
+"""
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, Text
+
+from app.core.database import Base
+
+
+class SyncJobRun(Base):
+    __tablename__ = "sync_job_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    corrida_id = Column(String(36), nullable=False)
+    job = Column(String(100), nullable=False)
+    estado = Column(String(20), nullable=False)  # ok | error
+    inicio = Column(DateTime(timezone=True), nullable=False)
+    fin = Column(DateTime(timezone=True), nullable=False)
+    duracion_s = Column(Float, nullable=False)
+    filas = Column(Integer)  # None si el job no reporta conteo
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_sync_job_runs_corrida", "corrida_id"),
+        Index("ix_sync_job_runs_job_inicio", "job", "inicio"),
+    )
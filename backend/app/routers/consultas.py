@@ -5,11 +5,10 @@ Endpoint: GET /api/consultas/ranking
 
 Returns a paginated, sortable ranking of products aggregated from ERP data.
 Each row contains:
-  - Calculated ageing (days since last SALE, using tb_item_transactions ⋈
-    tb_commercial_transactions with the canonical sale definition confirmed
-    in ADR-1: sd_id IN SD_VENTAS, df_id IN DF_VENTA_TODOS).
+  - Calculated ageing (days since last SALE, canonical sale definition from
+    ADR-1: sd_id IN SD_VENTAS, df_id IN DF_VENTA_TODOS).
   - Last purchase data (puco_id=10, latest it_cd).
-  - Stock total across selected depots (stock_por_deposito.stock — ERP real-time available stock).
+  - Stock total across selected depots (ERP real-time available stock).
   - Monetary valuations in BOTH ARS and USD (valor_costo_ars, valor_costo_usd).
   - valor_venta in ARS (price list clasica prli_id=4).
   - ERP-sourced ageing from productos_ageing (LEFT JOIN — null at launch).
@@ -22,6 +21,10 @@ ADR references:
   ADR-5: Dual-currency cost columns (ARS + USD); FX via TipoCambio.venta.
   ADR-7: Dynamic multi-column sort via SORT_COLUMNS whitelist.
   ADR-8: incluir_sin_stock / incluir_combos filter params.
+  ADR-10: ranking/resumen/kpis read the precomputed ranking_item_deposito
+          rollup (last sale, last purchase, combo flag, stock per depot)
+          instead of aggregating transaction history per request. Maintained
+          by app.services.ranking_rollup_service from the syncs.
 """
 
 from __future__ import annotations
@@ -31,12 +34,14 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, require_algun_permiso
-from app.core.database import get_db
+from app.core.database import get_async_db, get_async_session
 from app.models.usuario import Usuario
 from app.services.permisos_service import PermisosService
+from app.services.ranking_rollup_service import STOR_ID_ITEM
 from app.core.logging import get_logger
 from app.schemas.consultas import (
     SORT_COLUMNS_PERMITIDAS,
@@ -87,7 +92,7 @@ _background_tasks: set[asyncio.Task] = set()
     dependencies=[Depends(require_algun_permiso(["consultas.ver_ranking", "consultas.ver_mi_ranking"]))],
 )
 async def get_stock_status(
-    db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_session),
 ) -> StockStatusResponse:
     """Return the freshness timestamp of the stock_por_deposito snapshot.
 
@@ -98,7 +103,9 @@ async def get_stock_status(
     Permission required: consultas.ver_ranking o consultas.ver_mi_ranking
     """
     try:
-        row = db.execute(text("SELECT MAX(updated_at) AS last_updated FROM stock_por_deposito")).fetchone()
+        row = (
+            await async_db.execute(text("SELECT MAX(updated_at) AS last_updated FROM stock_por_deposito"))
+        ).fetchone()
     except Exception as exc:
         logger.error("Error querying stock_por_deposito freshness: %s", exc, exc_info=True)
         raise HTTPException(
@@ -166,62 +173,13 @@ async def post_stock_refresh() -> StockRefreshResponse:
 
 
 # ---------------------------------------------------------------------------
-# Sale definition constants (ADR-1)
+# Ranking constants
 # ---------------------------------------------------------------------------
 
-SD_VENTAS: list[int] = [1, 4, 21, 56]
-SD_DEVOLUCIONES: list[int] = [3, 6, 23, 66]
-
-# DF_PERMITIDOS = fuera-ML channel (from ventas_fuera_ml.py)
-DF_PERMITIDOS: list[int] = [
-    1,
-    2,
-    3,
-    4,
-    5,
-    6,
-    63,
-    85,
-    86,
-    87,
-    65,
-    67,
-    68,
-    69,
-    70,
-    71,
-    72,
-    73,
-    74,
-    81,
-    103,
-    105,
-    106,
-    109,
-    111,
-    115,
-    116,
-    117,
-    118,
-    122,
-    124,
-    125,
-    126,
-    127,
-]
-# TN channel df_ids
-DF_TN: list[int] = [113, 114]
-# ML channel df_ids
-DF_ML: list[int] = [129, 130, 131, 132]
-
-# Union of all sale channel df_ids (ADR-1)
-DF_VENTA_TODOS: list[int] = list(set(DF_PERMITIDOS) | set(DF_TN) | set(DF_ML))
-
-# Items excluded from sale calculation
-ITEMS_EXCLUIDOS: list[int] = [16, 460]
-
-# puco_id for purchases
-PUCO_COMPRAS: int = 10
+# The sale definition (ADR-1: SD_VENTAS, DF_VENTA_TODOS, ITEMS_EXCLUIDOS) and
+# PUCO_COMPRAS live in app.services.ranking_rollup_service, which applies them
+# when maintaining ranking_item_deposito.
+
 # prli_id for price list "clasica"
 PRLI_CLASICA: int = 4
 # comp_id of the main company (price list / cost list rows are keyed by comp_id)
@@ -235,6 +193,32 @@ DIAS_MUERTO_UMBRAL: int = 365
 # and the sentinel), so it is excluded from valuation to avoid inflating capital.
 STOCK_SENTINEL: int = 99999999
 
+# Joins shared by ranking/resumen/kpis (ADR-10):
+#   rr  — item row of the rollup (last sale, last purchase, combo flag)
+#   stk — stock summed over the selected depots' rollup rows (PK lookup)
+_ROLLUP_JOINS_SQL: str = f"""
+        LEFT JOIN ranking_item_deposito rr
+          ON rr.item_id = pe.item_id
+         AND rr.stor_id = {STOR_ID_ITEM}
+        LEFT JOIN LATERAL (
+            SELECT SUM(stock) AS total_stock
+            FROM ranking_item_deposito
+            WHERE item_id = pe.item_id
+              AND stor_id = ANY(:stor_ids)
+              AND stock < {STOCK_SENTINEL}
+        ) stk ON TRUE"""
+
+# incluir_combos=False → exclude parents in tb_item_association (ADR-8), precomputed.
+# rr.es_combo is refreshed (refrescar_combos) by the tb_item_association sync and
+# also by the stock / item transactions syncs.
+_EXCLUIR_COMBOS_SQL: str = "rr.es_combo IS NOT TRUE"
+
+# solo_muerto=True → no sale in the last DIAS_MUERTO_UMBRAL days: the last sale is
+# older than the cutoff or never happened. NO user input is interpolated.
+_SOLO_MUERTO_SQL: str = (
+    f"(rr.ultima_venta IS NULL OR rr.ultima_venta < NOW()::date - INTERVAL '{DIAS_MUERTO_UMBRAL} days')"
+)
+
 
 # ---------------------------------------------------------------------------
 # Permission constants (ADR-9: scoped ranking access)
@@ -384,10 +368,27 @@ def _scope_user_id(current_user: Usuario, db: Session) -> Optional[int]:
     return current_user.id
 
 
-def _get_tc_venta(db: Session) -> Optional[float]:
+async def _resolver_scope(current_user: Usuario, auth_db: Session, async_db: AsyncSession) -> Optional[int]:
+    """Resolve the ADR-9 scope and release the auth session before the ranking SQL.
+
+    The permission check runs through ``async_db.run_sync`` so a cache miss in
+    PermisosService queries the async connection instead of blocking the loop.
+    ``auth_db`` is the session get_current_user / require_algun_permiso used
+    (FastAPI caches the dependency per request); closing it here returns its
+    connection to the pool, so the request never holds it idle-in-transaction
+    (pinning a PgBouncer server connection) while awaiting the async queries.
+    """
+    scope_uid = await async_db.run_sync(lambda sync_db: _scope_user_id(current_user, sync_db))
+    auth_db.close()
+    return scope_uid
+
+
+async def _get_tc_venta(async_db: AsyncSession) -> Optional[float]:
     """Return the latest USD→ARS venta rate from tipo_cambio, or None."""
-    row = db.execute(
-        text("SELECT venta FROM tipo_cambio WHERE moneda = 'USD' ORDER BY fecha DESC, id DESC LIMIT 1")
+    row = (
+        await async_db.execute(
+            text("SELECT venta FROM tipo_cambio WHERE moneda = 'USD' ORDER BY fecha DESC, id DESC LIMIT 1")
+        )
     ).fetchone()
     if row is None:
         return None
@@ -447,13 +448,16 @@ async def get_ranking(
     ),
     # Auth resolved by FastAPI dep-dedup — same session as require_algun_permiso.
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    # Same cached session as get_current_user; released before the ranking SQL runs
+    auth_db: Session = Depends(get_async_db),
+    # Heavy ranking SQL runs on the async engine so it doesn't block the event loop
+    async_db: AsyncSession = Depends(get_async_session),
 ) -> RankingResponse:
     """Product ranking ordered by sales ageing and configurable metrics.
 
     Aggregates ERP transaction data to compute:
     - dias_sin_venta: days since last sale across all channels (unbounded).
-    - total_stock: sum of stock_por_deposito.stock for selected depots (ERP real-time available stock).
+    - total_stock: sum of depot stock for selected depots (ERP real-time available stock).
     - valor_costo_ars: stock × costo in ARS (FX applied when origin is USD).
     - valor_costo_usd: stock × costo in USD (FX applied when origin is ARS).
     - valor_venta: total_stock × precio from tb_price_list_items (prli_id=4) in ARS.
@@ -469,13 +473,11 @@ async def get_ranking(
     # misaligns even if duplicate fields are sent.
     sort_tuples = _parse_sort_params(orden_campos, orden_direcciones)
 
-    # Resolve FX rate once per request (ADR-5); null → costo columns may be null
-    tc_venta: Optional[float] = _get_tc_venta(db)
+    # ADR-9: scope to the user's own PM assignments when they lack FULL access (None = full)
+    scope_uid = await _resolver_scope(current_user, auth_db, async_db)
 
-    # Build parameterised lists for IN clauses
-    sd_ventas_str = ",".join(str(x) for x in SD_VENTAS)
-    df_venta_str = ",".join(str(x) for x in DF_VENTA_TODOS)
-    items_excl_str = ",".join(str(x) for x in ITEMS_EXCLUIDOS)
+    # Resolve FX rate once per request (ADR-5); null → costo columns may be null
+    tc_venta: Optional[float] = await _get_tc_venta(async_db)
 
     # ---- Dynamic ORDER BY ----
     order_clause = _build_order_clause(sort_tuples)
@@ -513,28 +515,13 @@ async def get_ranking(
 
     # incluir_combos=False → exclude products that are parents in tb_item_association (ADR-8)
     if not incluir_combos:
-        filter_clauses.append(
-            "NOT EXISTS (SELECT 1 FROM tb_item_association ia WHERE ia.item_id = pe.item_id AND ia.iasso_qty > 0)"
-        )
+        filter_clauses.append(_EXCLUIR_COMBOS_SQL)
 
     # solo_muerto=True → restrict to dead stock: no sale in the last DIAS_MUERTO_UMBRAL days.
-    # NOT EXISTS is self-contained (references pe.item_id only) — works in both data and count queries.
-    # NO user input is interpolated; DIAS_MUERTO_UMBRAL is an int constant.
+    # Reads rr (joined in both data and count queries).
     if solo_muerto:
-        filter_clauses.append(
-            f"NOT EXISTS ("
-            f"SELECT 1 FROM tb_item_transactions tit_m"
-            f" JOIN tb_commercial_transactions tct_m ON tct_m.ct_transaction = tit_m.ct_transaction"
-            f" WHERE tit_m.item_id = pe.item_id"
-            f" AND tct_m.sd_id IN ({sd_ventas_str})"
-            f" AND tct_m.df_id IN ({df_venta_str})"
-            f" AND tit_m.it_qty <> 0"
-            f" AND tct_m.ct_date >= NOW()::date - INTERVAL '{DIAS_MUERTO_UMBRAL} days'"
-            f")"
-        )
+        filter_clauses.append(_SOLO_MUERTO_SQL)
 
-    # ADR-9: scoped ranking — restrict to user's own PM assignments when they lack FULL access
-    scope_uid = _scope_user_id(current_user, db)
     if scope_uid is not None:
         filter_clauses.append(
             "EXISTS ("
@@ -549,10 +536,8 @@ async def get_ranking(
     where_sql = " AND ".join(filter_clauses)
 
     # ---- Main query ----
-    # Two LATERALs:
-    #   ls — last_sale: MAX(ct_date) over all channels (unbounded)
-    #   lp — last_purchase: most recent purchase row (puco_id=10)
-    # Stock: SUM(stock) FROM stock_por_deposito WHERE stor_id = ANY(:stor_ids)
+    # Rollup joins (ADR-10): rr — item row (last sale, last purchase, combo flag);
+    # stk — SUM(stock) over the selected depots' rollup rows.
     # Monetary: dual-currency cost (ARS + USD) via :tc_venta; precio from tb_price_list_items prli_id=4
     # LEFT JOIN productos_ageing for erp_ageing_dias
     # NOTE: stk LATERAL is referenced in WHERE when incluir_sin_stock=False,
@@ -569,15 +554,15 @@ async def get_ranking(
             u_pm.nombre                                        AS pm,
             -- calculated ageing
             CASE
-                WHEN ls.last_sale_date IS NOT NULL
-                THEN CAST(NOW()::date - ls.last_sale_date::date AS INTEGER)
+                WHEN rr.ultima_venta IS NOT NULL
+                THEN CAST(NOW()::date - rr.ultima_venta AS INTEGER)
                 ELSE NULL
             END                                                AS dias_sin_venta,
             -- ERP ageing (null until sync_ageing runs)
             pa.ageing_dias                                     AS erp_ageing_dias,
             -- last purchase
-            lp.last_purchase_date,
-            lp.last_purchase_qty,
+            rr.ultima_compra_fecha                             AS last_purchase_date,
+            rr.ultima_compra_cant                              AS last_purchase_qty,
             -- stock
             COALESCE(stk.total_stock, 0)                      AS total_stock,
             -- valor_costo_ars: stock × costo in ARS (ADR-5)
@@ -637,43 +622,8 @@ async def get_ranking(
                 ELSE NULL
             END                                                AS valor_venta
         FROM productos_erp pe
-        -- LATERAL: last sale date (unbounded — dias_sin_venta = NOW()::date - last_sale_date::date)
-        LEFT JOIN LATERAL (
-            SELECT
-                MAX(tct.ct_date)                              AS last_sale_date
-            FROM tb_item_transactions tit
-            JOIN tb_commercial_transactions tct
-              ON tct.ct_transaction = tit.ct_transaction
-            WHERE tit.item_id = pe.item_id
-              AND tct.sd_id IN ({sd_ventas_str})
-              AND tct.df_id IN ({df_venta_str})
-              AND tit.it_qty <> 0
-              AND tit.item_id NOT IN ({items_excl_str})
-        ) ls ON TRUE
-        -- LATERAL: last purchase
-        -- Filter puco_id on tb_item_transactions (tit2) so the composite index
-        -- ix_tit_item_puco_cd (item_id, puco_id, it_cd DESC) drives the lookup.
-        -- The tct2 join only resolves ct_date for the single resulting row.
-        LEFT JOIN LATERAL (
-            SELECT
-                tct2.ct_date::date                            AS last_purchase_date,
-                tit2.it_qty                                   AS last_purchase_qty
-            FROM tb_item_transactions tit2
-            JOIN tb_commercial_transactions tct2
-              ON tct2.ct_transaction = tit2.ct_transaction
-            WHERE tit2.item_id = pe.item_id
-              AND tit2.puco_id = {PUCO_COMPRAS}
-            ORDER BY tit2.it_cd DESC
-            LIMIT 1
-        ) lp ON TRUE
-        -- Stock across selected depots (also drives incluir_sin_stock filter via WHERE)
-        LEFT JOIN LATERAL (
-            SELECT SUM(stock) AS total_stock
-            FROM stock_por_deposito
-            WHERE item_id = pe.item_id
-              AND stor_id = ANY(:stor_ids)
-              AND stock < {STOCK_SENTINEL}
-        ) stk ON TRUE
+        -- Rollup: item row + stock across selected depots (stk also drives incluir_sin_stock)
+        {_ROLLUP_JOINS_SQL}
         -- Price list clasica (prli_id=4). comp_id is part of the PK
         -- (comp_id, prli_id, item_id) — without it the LEFT JOIN can multiply rows.
         LEFT JOIN tb_price_list_items prli
@@ -700,14 +650,8 @@ async def get_ranking(
     count_sql = f"""
         SELECT COUNT(*) AS total
         FROM productos_erp pe
-        -- Stock LATERAL needed for incluir_sin_stock filter consistency
-        LEFT JOIN LATERAL (
-            SELECT SUM(stock) AS total_stock
-            FROM stock_por_deposito
-            WHERE item_id = pe.item_id
-              AND stor_id = ANY(:stor_ids)
-              AND stock < {STOCK_SENTINEL}
-        ) stk ON TRUE
+        -- Rollup joins needed for incluir_sin_stock / incluir_combos / solo_muerto consistency
+        {_ROLLUP_JOINS_SQL}
         LEFT JOIN marcas_pm mp
           ON mp.marca = pe.marca
          AND mp.categoria = pe.categoria
@@ -717,10 +661,12 @@ async def get_ranking(
     """
 
     try:
-        rows = db.execute(text(main_sql), params).fetchall()
-        count_row = db.execute(
-            text(count_sql),
-            {k: v for k, v in params.items() if k not in ("offset", "limit")},
+        rows = (await async_db.execute(text(main_sql), params)).fetchall()
+        count_row = (
+            await async_db.execute(
+                text(count_sql),
+                {k: v for k, v in params.items() if k not in ("offset", "limit")},
+            )
         ).fetchone()
     except Exception as exc:
         logger.error("Error in consultas ranking query: %s", exc, exc_info=True)
@@ -799,7 +745,10 @@ async def get_ranking_resumen(
         description="Agrupar por 'marca' o 'pm'.",
     ),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    # Same cached session as get_current_user; released before the ranking SQL runs
+    auth_db: Session = Depends(get_async_db),
+    # Heavy ranking SQL runs on the async engine so it doesn't block the event loop
+    async_db: AsyncSession = Depends(get_async_session),
 ) -> ResumenResponse:
     """Grouped totals (brand or PM) for the product ranking view.
 
@@ -822,16 +771,13 @@ async def get_ranking_resumen(
             detail=f"group_by '{group_by}' no es válido. Opciones: {sorted(_VALID_GROUP_BY)}",
         )
 
-    tc_venta: Optional[float] = _get_tc_venta(db)
+    # ADR-9: scope to the user's own PM assignments when they lack FULL access (None = full)
+    scope_uid = await _resolver_scope(current_user, auth_db, async_db)
 
-    # Build IN-list strings for the solo_muerto NOT EXISTS clause (ADR-1).
-    # Only used when solo_muerto=True, but built unconditionally (cheap string join).
-    sd_ventas_str = ",".join(str(x) for x in SD_VENTAS)
-    df_venta_str = ",".join(str(x) for x in DF_VENTA_TODOS)
+    tc_venta: Optional[float] = await _get_tc_venta(async_db)
 
-    # NOTE: the resumen aggregates stock/cost/value only — no sale predicate
-    # (no dias_sin_venta here), so the SD_VENTAS/DF_VENTA_TODOS lists are not used
-    # for the main aggregation — only for the optional solo_muerto filter below.
+    # NOTE: the resumen aggregates stock/cost/value only — no dias_sin_venta here;
+    # the rollup item row (rr) is joined for the combo / solo_muerto filters.
 
     # ---- WHERE clauses (same as /ranking, minus the pagination columns) ----
     filter_clauses: list[str] = ["pe.activo = TRUE"]
@@ -858,25 +804,11 @@ async def get_ranking_resumen(
         filter_clauses.append("COALESCE(stk.total_stock, 0) > 0")
 
     if not incluir_combos:
-        filter_clauses.append(
-            "NOT EXISTS (SELECT 1 FROM tb_item_association ia WHERE ia.item_id = pe.item_id AND ia.iasso_qty > 0)"
-        )
+        filter_clauses.append(_EXCLUIR_COMBOS_SQL)
 
     if solo_muerto:
-        filter_clauses.append(
-            f"NOT EXISTS ("
-            f"SELECT 1 FROM tb_item_transactions tit_m"
-            f" JOIN tb_commercial_transactions tct_m ON tct_m.ct_transaction = tit_m.ct_transaction"
-            f" WHERE tit_m.item_id = pe.item_id"
-            f" AND tct_m.sd_id IN ({sd_ventas_str})"
-            f" AND tct_m.df_id IN ({df_venta_str})"
-            f" AND tit_m.it_qty <> 0"
-            f" AND tct_m.ct_date >= NOW()::date - INTERVAL '{DIAS_MUERTO_UMBRAL} days'"
-            f")"
-        )
+        filter_clauses.append(_SOLO_MUERTO_SQL)
 
-    # ADR-9: scoped ranking
-    scope_uid = _scope_user_id(current_user, db)
     if scope_uid is not None:
         filter_clauses.append(
             "EXISTS ("
@@ -956,13 +888,7 @@ async def get_ranking_resumen(
                     ELSE NULL
                 END                                                     AS valor_venta
             FROM productos_erp pe
-            LEFT JOIN LATERAL (
-                SELECT SUM(stock) AS total_stock
-                FROM stock_por_deposito
-                WHERE item_id = pe.item_id
-                  AND stor_id = ANY(:stor_ids)
-                  AND stock < {STOCK_SENTINEL}
-            ) stk ON TRUE
+            {_ROLLUP_JOINS_SQL}
             LEFT JOIN tb_price_list_items prli
               ON prli.item_id = pe.item_id
              AND prli.prli_id = {PRLI_CLASICA}
@@ -1022,8 +948,8 @@ async def get_ranking_resumen(
     """
 
     try:
-        rows = db.execute(text(resumen_sql), params).fetchall()
-        totales_row = db.execute(text(totales_sql), params).fetchone()
+        rows = (await async_db.execute(text(resumen_sql), params)).fetchall()
+        totales_row = (await async_db.execute(text(totales_sql), params)).fetchone()
     except Exception as exc:
         logger.error("Error in consultas ranking/resumen query: %s", exc, exc_info=True)
         raise HTTPException(
@@ -1098,13 +1024,16 @@ async def get_ranking_kpis(
         description="Búsqueda por código o descripción (ILIKE).",
     ),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    # Same cached session as get_current_user; released before the ranking SQL runs
+    auth_db: Session = Depends(get_async_db),
+    # Heavy ranking SQL runs on the async engine so it doesn't block the event loop
+    async_db: AsyncSession = Depends(get_async_session),
 ) -> KpisResponse:
     """Aggregate KPI metrics over all products matching the active filter set.
 
     Reuses the exact same per-product computed expressions and filters as /ranking
-    (total_stock, valor_costo_ars, valor_costo_usd, valor_venta, dias_sin_venta via
-    last-sale LATERAL — sd_id IN SD_VENTAS, df_id IN DF_VENTA_TODOS) to guarantee
+    (total_stock, valor_costo_ars, valor_costo_usd, valor_venta, dias_sin_venta from
+    the ranking_item_deposito rollup — ADR-1 sale definition) to guarantee
     consistency between the KPI cards and the ranked table.
 
     Returned aggregates:
@@ -1120,11 +1049,10 @@ async def get_ranking_kpis(
 
     Permission required: consultas.ver_ranking o consultas.ver_mi_ranking
     """
-    tc_venta: Optional[float] = _get_tc_venta(db)
+    # ADR-9: scope to the user's own PM assignments when they lack FULL access (None = full)
+    scope_uid = await _resolver_scope(current_user, auth_db, async_db)
 
-    sd_ventas_str = ",".join(str(x) for x in SD_VENTAS)
-    df_venta_str = ",".join(str(x) for x in DF_VENTA_TODOS)
-    items_excl_str = ",".join(str(x) for x in ITEMS_EXCLUIDOS)
+    tc_venta: Optional[float] = await _get_tc_venta(async_db)
 
     # ---- WHERE clauses (identical to /ranking) ----
     filter_clauses: list[str] = ["pe.activo = TRUE"]
@@ -1155,25 +1083,11 @@ async def get_ranking_kpis(
         filter_clauses.append("COALESCE(stk.total_stock, 0) > 0")
 
     if not incluir_combos:
-        filter_clauses.append(
-            "NOT EXISTS (SELECT 1 FROM tb_item_association ia WHERE ia.item_id = pe.item_id AND ia.iasso_qty > 0)"
-        )
+        filter_clauses.append(_EXCLUIR_COMBOS_SQL)
 
     if solo_muerto:
-        filter_clauses.append(
-            f"NOT EXISTS ("
-            f"SELECT 1 FROM tb_item_transactions tit_m"
-            f" JOIN tb_commercial_transactions tct_m ON tct_m.ct_transaction = tit_m.ct_transaction"
-            f" WHERE tit_m.item_id = pe.item_id"
-            f" AND tct_m.sd_id IN ({sd_ventas_str})"
-            f" AND tct_m.df_id IN ({df_venta_str})"
-            f" AND tit_m.it_qty <> 0"
-            f" AND tct_m.ct_date >= NOW()::date - INTERVAL '{DIAS_MUERTO_UMBRAL} days'"
-            f")"
-        )
+        filter_clauses.append(_SOLO_MUERTO_SQL)
 
-    # ADR-9: scoped ranking
-    scope_uid = _scope_user_id(current_user, db)
     if scope_uid is not None:
         filter_clauses.append(
             "EXISTS ("
@@ -1188,17 +1102,17 @@ async def get_ranking_kpis(
     where_sql = " AND ".join(filter_clauses)
 
     # ---- Per-product CTE — exact same expressions as /ranking ----
-    # Includes dias_sin_venta (last-sale LATERAL) so we can bucket "dead stock".
+    # Includes dias_sin_venta (rollup last sale) so we can bucket "dead stock".
     # CRITICAL: all ROUND() must CAST to NUMERIC (ADR-5).
     kpis_sql = f"""
         WITH per_product AS (
             SELECT
                 pe.item_id,
                 -- last sale date (for dias_sin_venta + dead-stock bucket)
-                ls.last_sale_date,
+                rr.ultima_venta                                         AS last_sale_date,
                 CASE
-                    WHEN ls.last_sale_date IS NOT NULL
-                    THEN CAST(NOW()::date - ls.last_sale_date::date AS INTEGER)
+                    WHEN rr.ultima_venta IS NOT NULL
+                    THEN CAST(NOW()::date - rr.ultima_venta AS INTEGER)
                     ELSE NULL
                 END                                                     AS dias_sin_venta,
                 -- stock
@@ -1259,26 +1173,8 @@ async def get_ranking_kpis(
                     ELSE NULL
                 END                                                     AS valor_venta
             FROM productos_erp pe
-            -- last sale LATERAL (ADR-1: sd_id IN SD_VENTAS, df_id IN DF_VENTA_TODOS)
-            LEFT JOIN LATERAL (
-                SELECT MAX(tct.ct_date) AS last_sale_date
-                FROM tb_item_transactions tit
-                JOIN tb_commercial_transactions tct
-                  ON tct.ct_transaction = tit.ct_transaction
-                WHERE tit.item_id = pe.item_id
-                  AND tct.sd_id IN ({sd_ventas_str})
-                  AND tct.df_id IN ({df_venta_str})
-                  AND tit.it_qty <> 0
-                  AND tit.item_id NOT IN ({items_excl_str})
-            ) ls ON TRUE
-            -- stock across selected depots
-            LEFT JOIN LATERAL (
-                SELECT SUM(stock) AS total_stock
-                FROM stock_por_deposito
-                WHERE item_id = pe.item_id
-                  AND stor_id = ANY(:stor_ids)
-                  AND stock < {STOCK_SENTINEL}
-            ) stk ON TRUE
+            -- rollup: last sale (ADR-1 definition) + stock across selected depots
+            {_ROLLUP_JOINS_SQL}
             -- price list clasica
             LEFT JOIN tb_price_list_items prli
               ON prli.item_id = pe.item_id
@@ -1317,7 +1213,7 @@ async def get_ranking_kpis(
     """
 
     try:
-        row = db.execute(text(kpis_sql), params).fetchone()
+        row = (await async_db.execute(text(kpis_sql), params)).fetchone()
     except Exception as exc:
         logger.error("Error in consultas ranking/kpis query: %s", exc, exc_info=True)
         raise HTTPException(
@@ -1363,7 +1259,10 @@ async def get_ranking_facets(
     categoria: Optional[str] = Query(None, description="Cross-filter: narrow marcas/pms to this categoria"),
     pm: Optional[str] = Query(None, description="Cross-filter: narrow marcas/categorias to this PM (or 'sin_pm')"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    # Same cached session as get_current_user; released before the ranking SQL runs
+    auth_db: Session = Depends(get_async_db),
+    # Heavy ranking SQL runs on the async engine so it doesn't block the event loop
+    async_db: AsyncSession = Depends(get_async_session),
 ) -> RankingFacetsResponse:
     """Return distinct filter values for the ranking page dropdowns.
 
@@ -1380,7 +1279,7 @@ async def get_ranking_facets(
     Permission required: consultas.ver_ranking o consultas.ver_mi_ranking
     """
     # ADR-9: compute scope for this user (None = full access)
-    scope_uid = _scope_user_id(current_user, db)
+    scope_uid = await _resolver_scope(current_user, auth_db, async_db)
 
     # ---------------------------------------------------------------------------
     # Helper: build the pm JOIN clause for productos_erp queries.
@@ -1507,24 +1406,26 @@ async def get_ranking_facets(
             """
 
     try:
-        marcas_rows = db.execute(text(marcas_sql), marcas_params).fetchall()
-
-        categorias_rows = db.execute(text(cats_sql), cats_params).fetchall()
-
-        pms_rows = db.execute(text(pms_sql), pms_params).fetchall()
-
-        depositos_rows = db.execute(
-            text(
-                """
-                SELECT DISTINCT st.stor_id, s.stor_desc
-                FROM tb_item_storage st
-                LEFT JOIN tb_storage s
-                  ON s.stor_id = st.stor_id AND s.comp_id = :comp_id
-                WHERE st.stor_id IS NOT NULL
-                ORDER BY st.stor_id ASC
-                """
-            ),
-            {"comp_id": COMP_ID},
+        marcas_rows = (await async_db.execute(text(marcas_sql), marcas_params)).fetchall()
+
+        categorias_rows = (await async_db.execute(text(cats_sql), cats_params)).fetchall()
+
+        pms_rows = (await async_db.execute(text(pms_sql), pms_params)).fetchall()
+
+        depositos_rows = (
+            await async_db.execute(
+                text(
+                    """
+                    SELECT DISTINCT st.stor_id, s.stor_desc
+                    FROM tb_item_storage st
+                    LEFT JOIN tb_storage s
+                      ON s.stor_id = st.stor_id AND s.comp_id = :comp_id
+                    WHERE st.stor_id IS NOT NULL
+                    ORDER BY st.stor_id ASC
+                    """
+                ),
+                {"comp_id": COMP_ID},
+            )
         ).fetchall()
 
     except Exception as exc:
@@ -0,0 +1,90 @@
+"""FastAPI router for background export jobs.
+
+Routes (all under prefix /api added in main.py):
+  POST /api/exports/{tipo}             — enqueue an export (or reuse a cached / in-flight one)
+  GET  /api/exports/{job_id}           — job state (progress also goes out on SSE ``exports:progress:<usuario_id>``)
+  GET  /api/exports/{job_id}/archivo   — download the generated XLSX
+
+``tipo`` is one of ``export_jobs_service.TIPOS`` and ``parametros`` are the
+same query/body params the synchronous export endpoint takes. Permission
+checks stay in those endpoints: the job runs them as the requesting user.
+A user only sees their own jobs.
+"""
+
+from __future__ import annotations
+
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.core.database import get_db
+from app.models.export_job import ExportJob
+from app.models.usuario import Usuario
+from app.schemas.export_job import ExportJobRequest, ExportJobResponse
+from app.services import export_jobs_service
+from app.utils.xlsx_stream import MEDIA_TYPE_XLSX
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+
+def _respuesta(job: ExportJob, cache: bool = False) -> ExportJobResponse:
+    resp = ExportJobResponse.model_validate(job)
+    resp.cache = cache
+    if job.estado == "listo":
+        resp.descarga_url = f"/api/exports/{job.id}/archivo"
+    return resp
+
+
+def _job_propio(db: Session, job_id: str, current_user: Usuario) -> ExportJob:
+    job = db.get(ExportJob, job_id)
+    if job is None or job.usuario_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Export no encontrado")
+    return job
+
+
+@router.post("/{tipo}", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def crear_export(
+    tipo: str,
+    body: ExportJobRequest,
+    response: Response,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> ExportJobResponse:
+    """Encola el export. 202 si se creó un job, 200 si se reutilizó uno listo o en curso."""
+    if tipo not in export_jobs_service.TIPOS:
+        raise HTTPException(status_code=404, detail=f"Tipo de export desconocido: {tipo}")
+    try:
+        job, nuevo = export_jobs_service.solicitar_export(db, tipo, body.parametros, current_user)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if not nuevo:
+        response.status_code = status.HTTP_200_OK
+    return _respuesta(job, cache=not nuevo)
+
+
+@router.get("/{job_id}", response_model=ExportJobResponse)
+def obtener_export(
+    job_id: str,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> ExportJobResponse:
+    """Estado del job."""
+    return _respuesta(_job_propio(db, job_id, current_user))
+
+
+@router.get("/{job_id}/archivo")
+def descargar_export(
+    job_id: str,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> FileResponse:
+    """Descarga el XLSX generado. 409 si el job todavía no terminó (o falló)."""
+    job = _job_propio(db, job_id, current_user)
+    if job.estado != "listo":
+        raise HTTPException(status_code=409, detail=f"El export está en estado '{job.estado}'")
+    if not job.archivo or not os.path.exists(job.archivo):
+        raise HTTPException(status_code=404, detail="El archivo del export ya no está disponible")
+    return FileResponse(path=job.archivo, filename=job.filename, media_type=MEDIA_TYPE_XLSX)
@@ -870,6 +870,9 @@ def borrar_serial(
         raise HTTPException(status_code=404, detail="Serial no encontrado")
 
     db.delete(s)
+    # El borrado no deja fila con updated_at: se toca el prearmado para que el
+    # matcher incremental lo re-evalúe (el set restante puede quedar completo).
+    p.updated_at = func.now()
     db.commit()
     db.refresh(p)
     return _to_detail(p)
@@ -4,10 +4,16 @@ SSE stream endpoint — single multiplexed connection per client.
 Clients subscribe to channels via query params and receive real-time
 notification events when backend mutations occur. Events are lightweight
 signals ("something changed"); the client re-fetches data via REST.
+On reconnect, the `Last-Event-ID` header replays the events missed since
+(see app/core/sse.py).
+
+Per-user channels (`<prefix>:<usuario_id>`, e.g. `exports:progress:42`)
+carry data about a single user's work; a client may only subscribe to its own.
 
 Usage:
     GET /api/sse/stream?channels=etiquetas:changed,notificaciones:updated
     Authorization: Bearer <token>
+    Last-Event-ID: 1760700000000-0   (optional, on reconnect)
 """
 
 import asyncio
@@ -39,6 +45,19 @@ VALID_CHANNELS = {
     "ml_bot:questions",
 }
 
+# Prefixes of per-user channels: "<prefix>:<usuario_id>"
+USER_CHANNEL_PREFIXES = {
+    "exports:progress",
+}
+
+
+def _is_valid_channel(channel: str, user: Usuario) -> bool:
+    """Global channel, or a per-user channel that belongs to `user`."""
+    if channel in VALID_CHANNELS:
+        return True
+    prefix, _, user_id = channel.rpartition(":")
+    return prefix in USER_CHANNEL_PREFIXES and user_id == str(user.id)
+
 
 @router.get("/stream")
 async def sse_stream(
@@ -66,8 +85,8 @@ async def sse_stream(
             detail="At least one channel is required",
         )
 
-    valid = [ch for ch in requested_channels if ch in VALID_CHANNELS]
-    invalid = [ch for ch in requested_channels if ch not in VALID_CHANNELS]
+    valid = [ch for ch in requested_channels if _is_valid_channel(ch, current_user)]
+    invalid = [ch for ch in requested_channels if ch not in valid]
 
     if invalid:
         logger.warning(
@@ -88,22 +107,26 @@ async def sse_stream(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="SSE not available (Redis not connected)",
         )
-    client_id, queue = manager.register(valid)
+    last_event_id = request.headers.get("last-event-id")
+    client_id, queue, replay = await manager.connect(valid, last_event_id)
 
     logger.info(
-        "SSE: client %s connected (user=%s, channels=%s, total=%d)",
+        "SSE: client %s connected (user=%s, channels=%s, replayed=%d, total=%d)",
         client_id,
         current_user.username,
         valid,
+        len(replay),
         manager.active_connections,
     )
 
-    async def event_generator() -> AsyncGenerator[str, None]:
-        """Yields SSE events from the client's queue, with heartbeat."""
+    async def event_generator() -> AsyncGenerator[bytes, None]:
+        """Yields missed events, then SSE events from the client's queue, with heartbeat."""
         heartbeat_seconds = request.app.state.sse_heartbeat_seconds
         try:
             # Initial connection comment
-            yield ": connected\n\n"
+            yield b": connected\n\n"
+            for event in replay:
+                yield event
 
             while True:
                 if await request.is_disconnected():
@@ -116,7 +139,7 @@ async def sse_stream(
                     yield event
                 except asyncio.TimeoutError:
                     # No events for heartbeat_seconds → send heartbeat
-                    yield ": heartbeat\n\n"
+                    yield b": heartbeat\n\n"
         finally:
             manager.unregister(client_id)
             logger.info(
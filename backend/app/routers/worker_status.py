@@ -0,0 +1,29 @@
+"""FastAPI router for the background worker status.
+
+Routes (all under prefix /api added in main.py):
+  GET /api/worker/status — leader lease holder and per-task last run, duration and lag
+
+The worker (`python -m app.worker`, app/core/worker_runtime.py) writes the
+status to Redis; this endpoint only reads it, so it answers from any API
+worker. Admin only.
+"""
+
+from __future__ import annotations
+
+import redis
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_admin
+from app.core.worker_runtime import read_status
+from app.schemas.worker_status import WorkerStatusResponse
+
+router = APIRouter(prefix="/worker", tags=["worker"], dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/status", response_model=WorkerStatusResponse)
+def worker_status() -> WorkerStatusResponse:
+    """Estado del worker de tareas periódicas. Si Redis no responde, `redis_disponible=false`."""
+    try:
+        return WorkerStatusResponse.model_validate(read_status())
+    except redis.RedisError:
+        return WorkerStatusResponse(redis_disponible=False)
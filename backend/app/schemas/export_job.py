@@ -0,0 +1,37 @@
+"""Pydantic schemas for background export jobs.
+
+Endpoints:
+  POST /api/exports/{tipo}             → ExportJobRequest / ExportJobResponse
+  GET  /api/exports/{job_id}           → ExportJobResponse
+  GET  /api/exports/{job_id}/archivo   → the XLSX file
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ExportJobRequest(BaseModel):
+    """Request body for POST /api/exports/{tipo}: the same params the sync export endpoint takes."""
+
+    parametros: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ExportJobResponse(BaseModel):
+    """State of an export job. ``cache`` is true when an existing job was reused."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    tipo: str
+    estado: str
+    filas: int
+    filename: Optional[str] = None
+    error: Optional[str] = None
+    creado_at: Optional[datetime] = None
+    terminado_at: Optional[datetime] = None
+    cache: bool = False
+    descarga_url: Optional[str] = None
@@ -0,0 +1,39 @@
+"""Pydantic schemas for the background worker status endpoint.
+
+Endpoints:
+  GET /api/worker/status → WorkerStatusResponse
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class WorkerTaskStatus(BaseModel):
+    """Status of one periodic task as last written by the leader (timestamps are epoch seconds)."""
+
+    name: str
+    state: str  # idle | running
+    interval_s: Optional[float] = None
+    last_started_at: Optional[float] = None
+    last_finished_at: Optional[float] = None
+    last_duration_s: Optional[float] = None
+    last_start_delay_s: Optional[float] = None
+    last_result: Optional[str] = None  # ok | error | timeout | skipped_overlap
+    last_error: Optional[str] = None
+    next_run_at: Optional[float] = None
+    lag_s: float = 0.0  # how overdue next_run_at is; grows if the worker is down
+    runs: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    skipped: int = 0
+
+
+class WorkerStatusResponse(BaseModel):
+    """Response for GET /api/worker/status. ``leader`` is None when no process holds the lease."""
+
+    leader: Optional[str] = None
+    redis_disponible: bool = True
+    tasks: List[WorkerTaskStatus] = []
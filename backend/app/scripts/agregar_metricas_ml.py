@@ -29,31 +29,20 @@ from app.models.mercadolibre_order_shipping import MercadoLibreOrderShipping
 from app.models.mercadolibre_item_publicado import MercadoLibreItemPublicado
 from app.models.item_cost_list_history import ItemCostListHistory
 from app.models.producto import ProductoERP
-from app.models.tipo_cambio import TipoCambio
 from app.services.pricing_calculator import (
     obtener_constantes_pricing,
     obtener_grupo_subcategoria,
     obtener_comision_versionada,
+    obtener_tipo_cambio_fecha,
     calcular_comision_ml_total,
 )
 
 
 async def obtener_cotizacion_fecha(db: Session, fecha: date) -> float:
     """Obtiene la cotización del dólar para una fecha específica"""
-    tc = db.query(TipoCambio).filter(TipoCambio.moneda == "USD", TipoCambio.fecha == fecha).first()
-
-    if tc:
-        return float(tc.venta)
-
-    # Si no hay para esa fecha, buscar la más reciente anterior
-    tc = (
-        db.query(TipoCambio)
-        .filter(TipoCambio.moneda == "USD", TipoCambio.fecha <= fecha)
-        .order_by(TipoCambio.fecha.desc())
-        .first()
-    )
-
-    return float(tc.venta) if tc else 1000.0
+    # Exacta o, si no hay, la más reciente anterior (cacheada por fecha en el proceso)
+    tc = obtener_tipo_cambio_fecha(db, fecha, "USD")
+    return tc if tc else 1000.0
 
 
 def obtener_costo_item(
@@ -3,6 +3,11 @@ Script para agregar métricas de ventas ML - INCREMENTAL
 Versión incremental que procesa los últimos 10 minutos de datos
 Diseñado para ejecutarse cada 5 minutos en cron
 
+Procesa por lotes: precarga métricas, productos, offsets y notificaciones
+existentes de toda la ventana, calcula en memoria y escribe con
+INSERT ... ON CONFLICT (id_operacion) DO UPDATE en chunks de CHUNK_SIZE
+(un commit por chunk). Reporta filas/s para comparar throughput.
+
 Ejecutar:
     python app/scripts/agregar_metricas_ml_incremental.py
 """
@@ -19,12 +24,15 @@ from dotenv import load_dotenv
 env_path = backend_dir / ".env"
 load_dotenv(dotenv_path=env_path)
 
+import time
+from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from sqlalchemy.orm import Session
+from typing import Optional
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import text, and_, or_, func, case, desc
 
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, insert_on_conflict
 from app.models.ml_venta_metrica import MLVentaMetrica
 from app.models.notificacion import Notificacion
 from app.models.producto import ProductoERP, ProductoPricing
@@ -351,7 +359,169 @@ def calcular_metricas_adicionales(row, count_per_pack, db_session):
     }
 
 
-def crear_notificacion_markup_bajo(db: Session, row, metricas, producto_erp):
+# ── Prefetch de la ventana ─────────────────────────────────────────
+#
+# Antes cada fila hacía SELECT de su métrica, de su producto, de sus offsets,
+# consumos, resúmenes, usuarios y notificaciones. Ahora todo eso se carga una
+# vez para la ventana completa (IN por lotes) y el resto se resuelve en memoria.
+
+CHUNK_SIZE = 500  # filas por INSERT ... ON CONFLICT y por commit
+IN_CHUNK = 1000  # valores por cláusula IN en el prefetch
+
+
+def _fecha_de(row) -> date:
+    return row.fecha_venta.date() if hasattr(row.fecha_venta, "date") else row.fecha_venta
+
+
+def _en_chunks(valores, n: int = IN_CHUNK):
+    valores = list(valores)
+    for i in range(0, len(valores), n):
+        yield valores[i : i + n]
+
+
+def _vigente(offset, fecha: date) -> bool:
+    return offset.fecha_desde <= fecha and (offset.fecha_hasta is None or offset.fecha_hasta >= fecha)
+
+
+@dataclass
+class LoteVentas:
+    """Datos de referencia de una ventana de ventas, precargados una sola vez."""
+
+    existentes: set  # id_operacion ya presentes en ml_ventas_metricas
+    productos_erp: dict  # item_id → ProductoERP
+    markup_calculado: dict  # item_id → markup_calculado de productos_pricing
+    offsets_grupo: dict  # item_id → [OffsetGanancia] de grupo con límites (orden por id)
+    offsets_individuales: list  # OffsetGanancia sin grupo con límites
+    consumos_grupo: dict  # id_operacion → OffsetGrupoConsumo
+    consumos_individuales: dict  # (id_operacion, offset_id) → OffsetIndividualConsumo
+    resumenes_grupo: dict  # grupo_id → OffsetGrupoResumen
+    resumenes_individuales: dict  # offset_id → OffsetIndividualResumen
+    notificaciones_existentes: set  # (id_operacion, user_id) con tipo markup_bajo
+    usuarios_notificar: Optional[list] = None  # lazy: solo si alguna venta notifica
+    marcas_pm: Optional[tuple] = None  # lazy: ({(marca, categoria): MarcaPM}, {marca: MarcaPM})
+
+
+def cargar_lote(db: Session, rows) -> LoteVentas:
+    """Precarga todo lo que process_and_insert consulta por fila, para la ventana completa"""
+    ids_operacion = {row.id_operacion for row in rows}
+    item_ids = {row.item_id for row in rows if row.item_id is not None}
+    fechas = [_fecha_de(row) for row in rows]
+    fecha_min, fecha_max = min(fechas), max(fechas)
+
+    existentes = set()
+    consumos_grupo = {}
+    consumos_individuales = {}
+    notificaciones_existentes = set()
+    for chunk in _en_chunks(ids_operacion):
+        existentes.update(
+            r[0] for r in db.query(MLVentaMetrica.id_operacion).filter(MLVentaMetrica.id_operacion.in_(chunk))
+        )
+        for consumo in db.query(OffsetGrupoConsumo).filter(OffsetGrupoConsumo.id_operacion.in_(chunk)):
+            consumos_grupo.setdefault(consumo.id_operacion, consumo)
+        for consumo in db.query(OffsetIndividualConsumo).filter(OffsetIndividualConsumo.id_operacion.in_(chunk)):
+            consumos_individuales.setdefault((consumo.id_operacion, consumo.offset_id), consumo)
+        notificaciones_existentes.update(
+            (r[0], r[1])
+            for r in db.query(Notificacion.id_operacion, Notificacion.user_id).filter(
+                Notificacion.tipo == "markup_bajo", Notificacion.id_operacion.in_(chunk)
+            )
+        )
+
+    productos_erp = {}
+    markup_calculado = {}
+    offsets_grupo: dict = {}
+    con_limites = or_(OffsetGanancia.max_unidades.isnot(None), OffsetGanancia.max_monto_usd.isnot(None))
+    for chunk in _en_chunks(item_ids):
+        productos_erp.update({p.item_id: p for p in db.query(ProductoERP).filter(ProductoERP.item_id.in_(chunk))})
+        markup_calculado.update(
+            {
+                item_id: float(markup)
+                for item_id, markup in db.query(ProductoPricing.item_id, ProductoPricing.markup_calculado).filter(
+                    ProductoPricing.item_id.in_(chunk), ProductoPricing.markup_calculado.isnot(None)
+                )
+            }
+        )
+        offsets = (
+            db.query(OffsetGanancia)
+            .filter(
+                OffsetGanancia.item_id.in_(chunk),
+                OffsetGanancia.grupo_id.isnot(None),
+                OffsetGanancia.aplica_ml == True,
+                OffsetGanancia.fecha_desde <= fecha_max,
+                or_(OffsetGanancia.fecha_hasta.is_(None), OffsetGanancia.fecha_hasta >= fecha_min),
+                con_limites,
+            )
+            .order_by(OffsetGanancia.id)
+        )
+        for offset in offsets:
+            offsets_grupo.setdefault(offset.item_id, []).append(offset)
+
+    offsets_individuales = (
+        db.query(OffsetGanancia)
+        .filter(
+            OffsetGanancia.grupo_id.is_(None),
+            OffsetGanancia.aplica_ml == True,
+            OffsetGanancia.fecha_desde <= fecha_max,
+            or_(OffsetGanancia.fecha_hasta.is_(None), OffsetGanancia.fecha_hasta >= fecha_min),
+            con_limites,
+        )
+        .order_by(OffsetGanancia.id)
+        .all()
+    )
+
+    grupo_ids = {o.grupo_id for lista in offsets_grupo.values() for o in lista}
+    resumenes_grupo = {}
+    if grupo_ids:
+        resumenes_grupo = {
+            r.grupo_id: r for r in db.query(OffsetGrupoResumen).filter(OffsetGrupoResumen.grupo_id.in_(grupo_ids))
+        }
+    resumenes_individuales = {}
+    if offsets_individuales:
+        resumenes_individuales = {
+            r.offset_id: r
+            for r in db.query(OffsetIndividualResumen).filter(
+                OffsetIndividualResumen.offset_id.in_({o.id for o in offsets_individuales})
+            )
+        }
+
+    return LoteVentas(
+        existentes=existentes,
+        productos_erp=productos_erp,
+        markup_calculado=markup_calculado,
+        offsets_grupo=offsets_grupo,
+        offsets_individuales=offsets_individuales,
+        consumos_grupo=consumos_grupo,
+        consumos_individuales=consumos_individuales,
+        resumenes_grupo=resumenes_grupo,
+        resumenes_individuales=resumenes_individuales,
+        notificaciones_existentes=notificaciones_existentes,
+    )
+
+
+def _usuarios_notificar(db: Session, lote: LoteVentas) -> list:
+    if lote.usuarios_notificar is None:
+        permisos_service = PermisosService(db)
+        usuarios_activos = db.query(Usuario).filter(Usuario.activo == True).all()
+        lote.usuarios_notificar = [
+            u for u in usuarios_activos if permisos_service.tiene_permiso(u, PERMISO_RECIBIR_MARKUP)
+        ]
+    return lote.usuarios_notificar
+
+
+def _marcas_pm(db: Session, lote: LoteVentas) -> tuple:
+    if lote.marcas_pm is None:
+        from app.models.marca_pm import MarcaPM
+
+        por_marca_categoria = {}
+        por_marca = {}
+        for marca_pm in db.query(MarcaPM).options(joinedload(MarcaPM.usuario)).order_by(MarcaPM.id):
+            por_marca_categoria.setdefault((marca_pm.marca, marca_pm.categoria), marca_pm)
+            por_marca.setdefault(marca_pm.marca, marca_pm)
+        lote.marcas_pm = (por_marca_categoria, por_marca)
+    return lote.marcas_pm
+
+
+def crear_notificacion_markup_bajo(db: Session, row, metricas, lote: LoteVentas):
     """
     Crea una notificación si el markup real es NEGATIVO y está por debajo del markup_calculado
     Solo alerta ventas en pérdida que están peor de lo esperado
@@ -362,17 +532,16 @@ def crear_notificacion_markup_bajo(db: Session, row, metricas, producto_erp):
     if row.pack_id:
         return False
 
-    if not producto_erp:
+    producto_actual = lote.productos_erp.get(row.item_id)
+    if not producto_actual:
         return False
 
-    # Buscar el pricing del producto para obtener el markup_calculado como referencia
+    # Usar el markup_calculado del producto como referencia
     try:
-        producto_pricing = db.query(ProductoPricing).filter(ProductoPricing.item_id == row.item_id).first()
-
-        if not producto_pricing or producto_pricing.markup_calculado is None:
+        if row.item_id not in lote.markup_calculado:
             return False
 
-        markup_calculado = float(producto_pricing.markup_calculado)
+        markup_calculado = lote.markup_calculado[row.item_id]
         markup_real = float(metricas["markup_porcentaje"])
 
         # Solo notificar si:
@@ -382,12 +551,8 @@ def crear_notificacion_markup_bajo(db: Session, row, metricas, producto_erp):
         diferencia = markup_calculado - markup_real
 
         if markup_real < 0 and markup_real < markup_calculado and diferencia > 0.5:
-            # Obtener usuarios con permiso para recibir notificaciones de markup
-            permisos_service = PermisosService(db)
-            usuarios_activos = db.query(Usuario).filter(Usuario.activo == True).all()
-            usuarios_notificar = [
-                u for u in usuarios_activos if permisos_service.tiene_permiso(u, PERMISO_RECIBIR_MARKUP)
-            ]
+            # Usuarios con permiso para recibir notificaciones de markup
+            usuarios_notificar = _usuarios_notificar(db, lote)
 
             if not usuarios_notificar:
                 return False
@@ -399,189 +564,148 @@ def crear_notificacion_markup_bajo(db: Session, row, metricas, producto_erp):
             notificaciones_creadas = 0
             for usuario in usuarios_notificar:
                 # Verificar si ya existe una notificación para esta operación y usuario
-                existe_notif = (
-                    db.query(Notificacion)
-                    .filter(
-                        Notificacion.id_operacion == row.id_operacion,
-                        Notificacion.tipo == "markup_bajo",
-                        Notificacion.user_id == usuario.id,
-                    )
-                    .first()
-                )
-
-                if not existe_notif:
-                    # Obtener TC usado para la operación (de cambio_momento de la query)
-                    # Solo se usa si el costo está en USD (curr_id = 2)
-                    # Convertir a int para comparación segura (puede venir como Decimal)
-                    es_usd = row.moneda_costo is not None and int(row.moneda_costo) == 2
-
-                    tc_operacion = None
-                    if es_usd and row.cambio_momento:
-                        tc_operacion = float(row.cambio_momento)
-
-                    # Obtener costo actual del producto desde ProductoERP
-                    costo_actual = None
-                    tc_actual = None  # TC usado para costo actual
-                    try:
-                        producto_actual = db.query(ProductoERP).filter(ProductoERP.item_id == row.item_id).first()
-                        if producto_actual and producto_actual.costo is not None:
-                            # Convertir a ARS si está en USD (curr_id = 2)
-                            if es_usd:
-                                # Usar tabla tipo_cambio (TC actual del día)
-                                from app.models.tipo_cambio import TipoCambio
-
-                                tc = (
-                                    db.query(TipoCambio)
-                                    .filter(TipoCambio.moneda == "USD")
-                                    .order_by(TipoCambio.fecha.desc())
-                                    .first()
-                                )
-                                if tc and tc.venta:
-                                    tc_actual = float(tc.venta)
-                                else:
-                                    # Fallback a tb_cur_exch_history
-                                    tc_query = text("""
-                                        SELECT ceh_exchange FROM tb_cur_exch_history ORDER BY ceh_cd DESC LIMIT 1
-                                    """)
-                                    tc_result = db.execute(tc_query).fetchone()
-                                    tc_actual = float(tc_result[0]) if tc_result else 1.0
-                                costo_actual = float(producto_actual.costo) * tc_actual
+                if (row.id_operacion, usuario.id) in lote.notificaciones_existentes:
+                    continue
+
+                # Obtener TC usado para la operación (de cambio_momento de la query)
+                # Solo se usa si el costo está en USD (curr_id = 2)
+                # Convertir a int para comparación segura (puede venir como Decimal)
+                es_usd = row.moneda_costo is not None and int(row.moneda_costo) == 2
+
+                tc_operacion = None
+                if es_usd and row.cambio_momento:
+                    tc_operacion = float(row.cambio_momento)
+
+                # Costo actual del producto desde ProductoERP
+                costo_actual = None
+                tc_actual = None  # TC usado para costo actual
+                try:
+                    if producto_actual.costo is not None:
+                        # Convertir a ARS si está en USD (curr_id = 2)
+                        if es_usd:
+                            # Usar tabla tipo_cambio (TC actual del día, cacheado en el proceso)
+                            from app.services.pricing_calculator import obtener_tipo_cambio_actual
+
+                            tc_venta = obtener_tipo_cambio_actual(db, "USD")
+                            if tc_venta:
+                                tc_actual = float(tc_venta)
                             else:
-                                costo_actual = float(producto_actual.costo)
-                    except:
-                        pass
-
-                    # Obtener precio_lista_ml del producto
-                    precio_lista_ml = None
-                    try:
-                        if producto_actual and producto_actual.precio_lista_ml is not None:
-                            precio_lista_ml = float(producto_actual.precio_lista_ml)
-                    except:
-                        pass
-
-                    # Obtener porcentaje de comisión usando el sistema versionado (base + adicional cuotas)
-                    from app.services.pricing_calculator import obtener_comision_versionada, obtener_grupo_subcategoria
-
-                    comision_porcentaje = None
-                    if row.subcat_id and row.pricelist_id:
-                        grupo_id = obtener_grupo_subcategoria(db, row.subcat_id)
-                        if grupo_id:
-                            fecha_venta = (
-                                row.fecha_venta.date() if hasattr(row.fecha_venta, "date") else row.fecha_venta
-                            )
-                            comision_porcentaje = obtener_comision_versionada(
-                                db, grupo_id, row.pricelist_id, fecha_venta
-                            )
-                    # Fallback si no se pudo obtener
-                    if comision_porcentaje is None and row.comision_base_porcentaje is not None:
-                        comision_porcentaje = float(row.comision_base_porcentaje)
-
-                    # Obtener nombre de pricelist para tipo_publicacion
-                    tipo_publicacion = None
-                    if row.pricelist_id:
-                        pricelist_names = {
-                            4: "Clásica",
-                            12: "Clásica",
-                            17: "3 Cuotas",
-                            18: "3 Cuotas",
-                            14: "6 Cuotas",
-                            19: "6 Cuotas",
-                            13: "9 Cuotas",
-                            20: "9 Cuotas",
-                            23: "12 Cuotas",
-                            21: "12 Cuotas",
-                        }
-                        tipo_publicacion = pricelist_names.get(row.pricelist_id, f"Lista {row.pricelist_id}")
-
-                    # Obtener PM asignado a la marca+categoría del producto
-                    from app.models.marca_pm import MarcaPM
-
-                    pm_nombre = None
-
-                    # Intentar con marca+categoría de tb_brand/tb_category primero
-                    if row.marca and row.categoria:
-                        marca_pm = (
-                            db.query(MarcaPM)
-                            .filter(MarcaPM.marca == row.marca, MarcaPM.categoria == row.categoria)
-                            .first()
+                                # Fallback a tb_cur_exch_history
+                                tc_query = text("""
+                                    SELECT ceh_exchange FROM tb_cur_exch_history ORDER BY ceh_cd DESC LIMIT 1
+                                """)
+                                tc_result = db.execute(tc_query).fetchone()
+                                tc_actual = float(tc_result[0]) if tc_result else 1.0
+                            costo_actual = float(producto_actual.costo) * tc_actual
+                        else:
+                            costo_actual = float(producto_actual.costo)
+                except:
+                    pass
+
+                # Obtener precio_lista_ml del producto
+                precio_lista_ml = None
+                try:
+                    if producto_actual.precio_lista_ml is not None:
+                        precio_lista_ml = float(producto_actual.precio_lista_ml)
+                except:
+                    pass
+
+                # Obtener porcentaje de comisión usando el sistema versionado (base + adicional cuotas)
+                from app.services.pricing_calculator import obtener_comision_versionada, obtener_grupo_subcategoria
+
+                comision_porcentaje = None
+                if row.subcat_id and row.pricelist_id:
+                    grupo_id = obtener_grupo_subcategoria(db, row.subcat_id)
+                    if grupo_id:
+                        comision_porcentaje = obtener_comision_versionada(
+                            db, grupo_id, row.pricelist_id, _fecha_de(row)
                         )
-                        if marca_pm and marca_pm.usuario:
-                            pm_nombre = marca_pm.usuario.nombre
-
-                    # Si no encontró PM, intentar con marca+categoría de productos_erp como fallback
-                    if not pm_nombre and producto_actual and producto_actual.marca and producto_actual.categoria:
-                        marca_pm = (
-                            db.query(MarcaPM)
-                            .filter(
-                                MarcaPM.marca == producto_actual.marca, MarcaPM.categoria == producto_actual.categoria
-                            )
-                            .first()
-                        )
-                        if marca_pm and marca_pm.usuario:
-                            pm_nombre = marca_pm.usuario.nombre
-
-                    # Último fallback: buscar solo por marca (cualquier categoría)
-                    if not pm_nombre and (row.marca or (producto_actual and producto_actual.marca)):
-                        marca_buscar = row.marca or producto_actual.marca
-                        marca_pm = db.query(MarcaPM).filter(MarcaPM.marca == marca_buscar).first()
-                        if marca_pm and marca_pm.usuario:
-                            pm_nombre = marca_pm.usuario.nombre
-
-                    # Calcular costo total de la operación (unitario × cantidad)
-                    costo_total_operacion = None
-                    if row.costo_sin_iva is not None and row.cantidad:
-                        costo_total_operacion = float(row.costo_sin_iva) * float(row.cantidad)
-
-                    # Obtener código y descripción del producto
-                    codigo_prod = row.codigo
-                    descripcion_prod = row.descripcion
-
-                    # Si no vienen de tb_item, buscar en productos_erp como fallback
-                    if not codigo_prod or not descripcion_prod:
-                        producto_erp = db.query(ProductoERP).filter(ProductoERP.item_id == row.item_id).first()
-                        if producto_erp:
-                            if not codigo_prod:
-                                codigo_prod = producto_erp.codigo
-                            if not descripcion_prod:
-                                descripcion_prod = producto_erp.descripcion
-
-                    notificacion = Notificacion(
-                        user_id=usuario.id,
-                        tipo="markup_bajo",
-                        item_id=row.item_id,
-                        id_operacion=row.id_operacion,
-                        ml_id=row.ml_id,
-                        pack_id=row.pack_id,
-                        codigo_producto=codigo_prod,
-                        descripcion_producto=descripcion_prod[:500] if descripcion_prod else None,
-                        mensaje=mensaje,
-                        markup_real=Decimal(str(markup_real)),
-                        markup_objetivo=Decimal(str(markup_calculado)),
-                        monto_venta=Decimal(str(row.monto_total)),
-                        fecha_venta=row.fecha_venta,
-                        # Campos adicionales
-                        pm=pm_nombre,
-                        costo_operacion=Decimal(str(costo_total_operacion))
-                        if costo_total_operacion is not None
-                        else None,
-                        costo_actual=Decimal(str(costo_actual)) if costo_actual is not None else None,
-                        tipo_cambio_operacion=Decimal(str(tc_operacion)) if tc_operacion is not None else None,
-                        tipo_cambio_actual=Decimal(str(tc_actual)) if tc_actual is not None else None,
-                        precio_venta_unitario=Decimal(str(row.monto_unitario))
-                        if row.monto_unitario is not None
-                        else None,
-                        precio_publicacion=Decimal(str(precio_lista_ml)) if precio_lista_ml is not None else None,
-                        tipo_publicacion=tipo_publicacion,
-                        comision_ml=Decimal(str(comision_porcentaje))
-                        if comision_porcentaje is not None
-                        else None,  # Guardar el % para mostrar
-                        iva_porcentaje=Decimal(str(row.iva)) if row.iva is not None else None,
-                        cantidad=int(row.cantidad) if row.cantidad else None,
-                        costo_envio=Decimal(str(metricas["costo_envio"])) if metricas.get("costo_envio") else None,
-                        leida=False,
-                    )
-                    db.add(notificacion)
-                    notificaciones_creadas += 1
+                # Fallback si no se pudo obtener
+                if comision_porcentaje is None and row.comision_base_porcentaje is not None:
+                    comision_porcentaje = float(row.comision_base_porcentaje)
+
+                # Obtener nombre de pricelist para tipo_publicacion
+                tipo_publicacion = None
+                if row.pricelist_id:
+                    pricelist_names = {
+                        4: "Clásica",
+                        12: "Clásica",
+                        17: "3 Cuotas",
+                        18: "3 Cuotas",
+                        14: "6 Cuotas",
+                        19: "6 Cuotas",
+                        13: "9 Cuotas",
+                        20: "9 Cuotas",
+                        23: "12 Cuotas",
+                        21: "12 Cuotas",
+                    }
+                    tipo_publicacion = pricelist_names.get(row.pricelist_id, f"Lista {row.pricelist_id}")
+
+                # PM asignado a la marca+categoría del producto
+                por_marca_categoria, por_marca = _marcas_pm(db, lote)
+                pm_nombre = None
+
+                # Intentar con marca+categoría de tb_brand/tb_category primero
+                if row.marca and row.categoria:
+                    marca_pm = por_marca_categoria.get((row.marca, row.categoria))
+                    if marca_pm and marca_pm.usuario:
+                        pm_nombre = marca_pm.usuario.nombre
+
+                # Si no encontró PM, intentar con marca+categoría de productos_erp como fallback
+                if not pm_nombre and producto_actual.marca and producto_actual.categoria:
+                    marca_pm = por_marca_categoria.get((producto_actual.marca, producto_actual.categoria))
+                    if marca_pm and marca_pm.usuario:
+                        pm_nombre = marca_pm.usuario.nombre
+
+                # Último fallback: buscar solo por marca (cualquier categoría)
+                if not pm_nombre and (row.marca or producto_actual.marca):
+                    marca_pm = por_marca.get(row.marca or producto_actual.marca)
+                    if marca_pm and marca_pm.usuario:
+                        pm_nombre = marca_pm.usuario.nombre
+
+                # Calcular costo total de la operación (unitario × cantidad)
+                costo_total_operacion = None
+                if row.costo_sin_iva is not None and row.cantidad:
+                    costo_total_operacion = float(row.costo_sin_iva) * float(row.cantidad)
+
+                # Código y descripción: de tb_item, con productos_erp como fallback
+                codigo_prod = row.codigo or producto_actual.codigo
+                descripcion_prod = row.descripcion or producto_actual.descripcion
+
+                notificacion = Notificacion(
+                    user_id=usuario.id,
+                    tipo="markup_bajo",
+                    item_id=row.item_id,
+                    id_operacion=row.id_operacion,
+                    ml_id=row.ml_id,
+                    pack_id=row.pack_id,
+                    codigo_producto=codigo_prod,
+                    descripcion_producto=descripcion_prod[:500] if descripcion_prod else None,
+                    mensaje=mensaje,
+                    markup_real=Decimal(str(markup_real)),
+                    markup_objetivo=Decimal(str(markup_calculado)),
+                    monto_venta=Decimal(str(row.monto_total)),
+                    fecha_venta=row.fecha_venta,
+                    # Campos adicionales
+                    pm=pm_nombre,
+                    costo_operacion=Decimal(str(costo_total_operacion)) if costo_total_operacion is not None else None,
+                    costo_actual=Decimal(str(costo_actual)) if costo_actual is not None else None,
+                    tipo_cambio_operacion=Decimal(str(tc_operacion)) if tc_operacion is not None else None,
+                    tipo_cambio_actual=Decimal(str(tc_actual)) if tc_actual is not None else None,
+                    precio_venta_unitario=Decimal(str(row.monto_unitario)) if row.monto_unitario is not None else None,
+                    precio_publicacion=Decimal(str(precio_lista_ml)) if precio_lista_ml is not None else None,
+                    tipo_publicacion=tipo_publicacion,
+                    comision_ml=Decimal(str(comision_porcentaje))
+                    if comision_porcentaje is not None
+                    else None,  # Guardar el % para mostrar
+                    iva_porcentaje=Decimal(str(row.iva)) if row.iva is not None else None,
+                    cantidad=int(row.cantidad) if row.cantidad else None,
+                    costo_envio=Decimal(str(metricas["costo_envio"])) if metricas.get("costo_envio") else None,
+                    leida=False,
+                )
+                db.add(notificacion)
+                lote.notificaciones_existentes.add((row.id_operacion, usuario.id))
+                notificaciones_creadas += 1
 
             return notificaciones_creadas > 0
 
@@ -592,7 +716,7 @@ def crear_notificacion_markup_bajo(db: Session, row, metricas, producto_erp):
     return False
 
 
-def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool):
+def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool, lote: LoteVentas):
     """
     Registra el consumo de offset de grupo para una venta ML.
     Solo registra si el item pertenece a un grupo con límites.
@@ -601,39 +725,21 @@ def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool):
         db: Sesión de base de datos
         row: Datos de la venta
         es_nuevo: True si es una nueva venta, False si es actualización
+        lote: Offsets, consumos y resúmenes precargados de la ventana
 
     Returns:
         True si se registró consumo, False si no
     """
     try:
-        # Buscar si el item tiene un offset con grupo que tiene límites
-        offset = (
-            db.query(OffsetGanancia)
-            .filter(
-                OffsetGanancia.item_id == row.item_id,
-                OffsetGanancia.grupo_id.isnot(None),
-                OffsetGanancia.aplica_ml == True,
-                OffsetGanancia.fecha_desde <= row.fecha_venta.date()
-                if hasattr(row.fecha_venta, "date")
-                else row.fecha_venta,
-                or_(
-                    OffsetGanancia.fecha_hasta.is_(None),
-                    OffsetGanancia.fecha_hasta >= row.fecha_venta.date()
-                    if hasattr(row.fecha_venta, "date")
-                    else row.fecha_venta,
-                ),
-                or_(OffsetGanancia.max_unidades.isnot(None), OffsetGanancia.max_monto_usd.isnot(None)),
-            )
-            .first()
-        )
+        # Offset con grupo con límites vigente para el item a la fecha de la venta
+        fecha_venta = _fecha_de(row)
+        offset = next((o for o in lote.offsets_grupo.get(row.item_id, []) if _vigente(o, fecha_venta)), None)
 
         if not offset:
             return False
 
         # Verificar si ya existe un registro de consumo para esta operación
-        consumo_existente = (
-            db.query(OffsetGrupoConsumo).filter(OffsetGrupoConsumo.id_operacion == row.id_operacion).first()
-        )
+        consumo_existente = lote.consumos_grupo.get(row.id_operacion)
 
         if consumo_existente:
             # Si existe y no es nuevo, actualizar si cambió la cantidad
@@ -647,6 +753,7 @@ def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool):
                 # Actualizar resumen (restar viejo, sumar nuevo)
                 actualizar_resumen_grupo(
                     db,
+                    lote.resumenes_grupo,
                     offset.grupo_id,
                     consumo_existente.cantidad,
                     float(consumo_existente.monto_offset_aplicado or 0),
@@ -660,7 +767,13 @@ def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool):
                 consumo_existente.cotizacion_dolar = cotizacion
 
                 actualizar_resumen_grupo(
-                    db, offset.grupo_id, row.cantidad, monto_offset_ars, monto_offset_usd, restar=False
+                    db,
+                    lote.resumenes_grupo,
+                    offset.grupo_id,
+                    row.cantidad,
+                    monto_offset_ars,
+                    monto_offset_usd,
+                    restar=False,
                 )
             return True
 
@@ -685,10 +798,18 @@ def registrar_consumo_grupo_offset(db: Session, row, es_nuevo: bool):
             else None,
         )
         db.add(consumo)
+        lote.consumos_grupo[row.id_operacion] = consumo
 
         # Actualizar resumen del grupo
         actualizar_resumen_grupo(
-            db, offset.grupo_id, row.cantidad, monto_offset_ars, monto_offset_usd, restar=False, offset=offset
+            db,
+            lote.resumenes_grupo,
+            offset.grupo_id,
+            row.cantidad,
+            monto_offset_ars,
+            monto_offset_usd,
+            restar=False,
+            offset=offset,
         )
 
         return True
@@ -731,10 +852,17 @@ def calcular_monto_offset(offset, cantidad, costo_sin_iva, cotizacion):
 
 
 def actualizar_resumen_grupo(
-    db: Session, grupo_id: int, cantidad: int, monto_ars: float, monto_usd: float, restar: bool = False, offset=None
+    db: Session,
+    resumenes: dict,
+    grupo_id: int,
+    cantidad: int,
+    monto_ars: float,
+    monto_usd: float,
+    restar: bool = False,
+    offset=None,
 ):
-    """Actualiza o crea el resumen del grupo"""
-    resumen = db.query(OffsetGrupoResumen).filter(OffsetGrupoResumen.grupo_id == grupo_id).first()
+    """Actualiza o crea el resumen del grupo (resumenes: grupo_id → OffsetGrupoResumen precargados)"""
+    resumen = resumenes.get(grupo_id)
 
     factor = -1 if restar else 1
 
@@ -766,6 +894,7 @@ def actualizar_resumen_grupo(
             ultima_venta_fecha=datetime.now(),
         )
         db.add(resumen)
+        resumenes[grupo_id] = resumen
 
         # Verificar límites
         if offset:
@@ -777,7 +906,33 @@ def actualizar_resumen_grupo(
                 resumen.fecha_limite_alcanzado = datetime.now()
 
 
-def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
+def _offset_individual_aplica(offset, row, fecha_venta: date) -> bool:
+    """Mismos criterios que el filtro SQL: por producto, marca, categoría o subcategoría"""
+    if not _vigente(offset, fecha_venta):
+        return False
+    if row.item_id is not None and offset.item_id == row.item_id:  # Por producto
+        return True
+    if (
+        row.marca is not None
+        and offset.marca == row.marca
+        and offset.item_id is None
+        and offset.categoria is None
+        and offset.subcategoria_id is None
+    ):  # Por marca (sin producto específico)
+        return True
+    if (
+        row.categoria is not None
+        and offset.categoria == row.categoria
+        and offset.item_id is None
+        and offset.marca is None
+        and offset.subcategoria_id is None
+    ):  # Por categoría
+        return True
+    # Por subcategoría
+    return row.subcat_id is not None and offset.subcategoria_id == row.subcat_id and offset.item_id is None
+
+
+def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool, lote: LoteVentas):
     """
     Registra el consumo de offsets individuales (sin grupo) con límites.
     Aplica a offsets por producto, marca, categoría, subcategoría.
@@ -786,45 +941,17 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
         db: Sesión de base de datos
         row: Datos de la venta
         es_nuevo: True si es una nueva venta, False si es actualización
+        lote: Offsets, consumos y resúmenes precargados de la ventana
 
     Returns:
         int: Cantidad de consumos registrados
     """
     try:
-        fecha_venta = row.fecha_venta.date() if hasattr(row.fecha_venta, "date") else row.fecha_venta
+        fecha_venta = _fecha_de(row)
 
-        # Buscar offsets individuales (sin grupo) con límites que apliquen a esta venta
+        # Offsets individuales (sin grupo) con límites que apliquen a esta venta
         # Puede haber múltiples offsets aplicables (por producto, marca, categoría, etc.)
-        offsets = (
-            db.query(OffsetGanancia)
-            .filter(
-                OffsetGanancia.grupo_id.is_(None),  # Sin grupo
-                OffsetGanancia.aplica_ml == True,
-                OffsetGanancia.fecha_desde <= fecha_venta,
-                or_(OffsetGanancia.fecha_hasta.is_(None), OffsetGanancia.fecha_hasta >= fecha_venta),
-                or_(OffsetGanancia.max_unidades.isnot(None), OffsetGanancia.max_monto_usd.isnot(None)),
-                # Filtrar por criterios que apliquen a esta venta
-                or_(
-                    OffsetGanancia.item_id == row.item_id,  # Por producto
-                    and_(
-                        OffsetGanancia.marca == row.marca,
-                        OffsetGanancia.item_id.is_(None),
-                        OffsetGanancia.categoria.is_(None),
-                        OffsetGanancia.subcategoria_id.is_(None),
-                    ),  # Por marca (sin producto específico)
-                    and_(
-                        OffsetGanancia.categoria == row.categoria,
-                        OffsetGanancia.item_id.is_(None),
-                        OffsetGanancia.marca.is_(None),
-                        OffsetGanancia.subcategoria_id.is_(None),
-                    ),  # Por categoría
-                    and_(
-                        OffsetGanancia.subcategoria_id == row.subcat_id, OffsetGanancia.item_id.is_(None)
-                    ),  # Por subcategoría
-                ),
-            )
-            .all()
-        )
+        offsets = [o for o in lote.offsets_individuales if _offset_individual_aplica(o, row, fecha_venta)]
 
         if not offsets:
             return 0
@@ -834,14 +961,7 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
 
         for offset in offsets:
             # Verificar si ya existe un registro de consumo para esta operación y offset
-            consumo_existente = (
-                db.query(OffsetIndividualConsumo)
-                .filter(
-                    OffsetIndividualConsumo.id_operacion == row.id_operacion,
-                    OffsetIndividualConsumo.offset_id == offset.id,
-                )
-                .first()
-            )
+            consumo_existente = lote.consumos_individuales.get((row.id_operacion, offset.id))
 
             if consumo_existente:
                 # Si existe y no es nuevo, actualizar si cambió la cantidad
@@ -853,6 +973,7 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
                     # Actualizar resumen (restar viejo, sumar nuevo)
                     actualizar_resumen_offset_individual(
                         db,
+                        lote.resumenes_individuales,
                         offset.id,
                         consumo_existente.cantidad,
                         float(consumo_existente.monto_offset_aplicado or 0),
@@ -866,7 +987,14 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
                     consumo_existente.cotizacion_dolar = cotizacion
 
                     actualizar_resumen_offset_individual(
-                        db, offset.id, row.cantidad, monto_offset_ars, monto_offset_usd, restar=False, offset=offset
+                        db,
+                        lote.resumenes_individuales,
+                        offset.id,
+                        row.cantidad,
+                        monto_offset_ars,
+                        monto_offset_usd,
+                        restar=False,
+                        offset=offset,
                     )
                 continue
 
@@ -891,10 +1019,18 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
                 else None,
             )
             db.add(consumo)
+            lote.consumos_individuales[(row.id_operacion, offset.id)] = consumo
 
             # Actualizar resumen del offset
             actualizar_resumen_offset_individual(
-                db, offset.id, row.cantidad, monto_offset_ars, monto_offset_usd, restar=False, offset=offset
+                db,
+                lote.resumenes_individuales,
+                offset.id,
+                row.cantidad,
+                monto_offset_ars,
+                monto_offset_usd,
+                restar=False,
+                offset=offset,
             )
 
             consumos_registrados += 1
@@ -907,10 +1043,17 @@ def registrar_consumo_offset_individual(db: Session, row, es_nuevo: bool):
 
 
 def actualizar_resumen_offset_individual(
-    db: Session, offset_id: int, cantidad: int, monto_ars: float, monto_usd: float, restar: bool = False, offset=None
+    db: Session,
+    resumenes: dict,
+    offset_id: int,
+    cantidad: int,
+    monto_ars: float,
+    monto_usd: float,
+    restar: bool = False,
+    offset=None,
 ):
-    """Actualiza o crea el resumen del offset individual"""
-    resumen = db.query(OffsetIndividualResumen).filter(OffsetIndividualResumen.offset_id == offset_id).first()
+    """Actualiza o crea el resumen del offset individual (resumenes: offset_id → OffsetIndividualResumen precargados)"""
+    resumen = resumenes.get(offset_id)
 
     factor = -1 if restar else 1
 
@@ -942,6 +1085,7 @@ def actualizar_resumen_offset_individual(
             ultima_venta_fecha=datetime.now(),
         )
         db.add(resumen)
+        resumenes[offset_id] = resumen
 
         # Verificar límites
         if offset:
@@ -953,14 +1097,113 @@ def actualizar_resumen_offset_individual(
                 resumen.fecha_limite_alcanzado = datetime.now()
 
 
-def process_and_insert(db: Session, rows):
-    """Procesa los registros y los inserta en ml_ventas_metricas"""
+def _datos_metrica(row, metricas, fecha_calculo: date) -> dict:
+    return {
+        "id_operacion": row.id_operacion,
+        "ml_order_id": str(row.ml_id) if row.ml_id else None,
+        "pack_id": row.pack_id,
+        "item_id": row.item_id,
+        "codigo": row.codigo,
+        "descripcion": row.descripcion,
+        "marca": row.marca,
+        "categoria": row.categoria,
+        "subcategoria": row.subcategoria,
+        "fecha_venta": row.fecha_venta,
+        "fecha_calculo": fecha_calculo,
+        "cantidad": row.cantidad,
+        "monto_unitario": Decimal(str(row.monto_unitario)) if row.monto_unitario else Decimal("0"),
+        "monto_total": Decimal(str(row.monto_total)) if row.monto_total else Decimal("0"),
+        "costo_unitario_sin_iva": Decimal(str(row.costo_sin_iva)) if row.costo_sin_iva else Decimal("0"),
+        "costo_total_sin_iva": Decimal(str(metricas["costo_total_sin_iva"])),
+        "comision_ml": Decimal(str(metricas["comision_ml"])),
+        "costo_envio_ml": Decimal(str(metricas["costo_envio"])),
+        "tipo_logistica": row.tipo_logistica,
+        "monto_limpio": Decimal(str(metricas["monto_limpio"])),
+        "ganancia": Decimal(str(metricas["ganancia"])),
+        "markup_porcentaje": Decimal(str(metricas["markup_porcentaje"])),
+        "mla_id": str(row.mlp_id) if hasattr(row, "mlp_id") and row.mlp_id else None,
+        "mlp_official_store_id": row.mlp_official_store_id if hasattr(row, "mlp_official_store_id") else None,
+        "offset_flex": Decimal(str(metricas["offset_flex"])),
+    }
+
+
+def upsert_metricas(db: Session, payload: list[dict]) -> None:
+    """INSERT ... ON CONFLICT (id_operacion) DO UPDATE de un chunk de métricas"""
+    stmt = insert_on_conflict(db, MLVentaMetrica).values(payload)
+    update_cols = {key: stmt.excluded[key] for key in payload[0] if key != "id_operacion"}
+    update_cols["updated_at"] = func.now()
+    stmt = stmt.on_conflict_do_update(index_elements=["id_operacion"], set_=update_cols)
+    db.execute(stmt)
+
+
+def _escribir(db: Session, calculadas, lote: LoteVentas) -> int:
+    """Upsert + consumos de offset + notificaciones de un grupo de operaciones (sin commit)"""
+    upsert_metricas(db, [data for _, _, data in calculadas])
+
+    notificaciones = 0
+    for row, metricas, _ in calculadas:
+        # Registrar consumo de offsets (si aplica)
+        es_nuevo = row.id_operacion not in lote.existentes
+        registrar_consumo_grupo_offset(db, row, es_nuevo, lote)  # Offsets de grupo
+        registrar_consumo_offset_individual(db, row, es_nuevo, lote)  # Offsets individuales
+
+        # Verificar markup y crear notificación si es necesario
+        # NOTA: Requiere que tb_cur_exch_history esté sincronizado con el ERP
+        # Ejecutar: python app/scripts/sync_cur_exch_history.py
+        if crear_notificacion_markup_bajo(db, row, metricas, lote):
+            notificaciones += 1
+    return notificaciones
+
+
+def _escribir_chunk(db: Session, calculadas: dict, lote: LoteVentas, rows) -> tuple[list, int, LoteVentas]:
+    """Escribe y commitea un chunk; si falla, lo reintenta fila por fila
+
+    Una sola operación mala hace fallar el INSERT multi-VALUES entero: sin el
+    reintento se perdían las otras CHUNK_SIZE - 1. Las que vuelven a fallar
+    solas se informan con su id_operacion y se descartan (quedan para la
+    próxima corrida). Devuelve (ids escritos, notificaciones, lote vigente).
+    """
+    try:
+        notificaciones = _escribir(db, calculadas.values(), lote)
+        db.commit()
+        return list(calculadas), notificaciones, lote
+    except Exception as e:
+        print(f"  ⚠️  Error en chunk de {len(calculadas)} operaciones, reintentando de a una: {str(e)}")
+        db.rollback()
+
+    # El rollback descarta consumos/resúmenes pendientes: volver a precargar el estado
+    lote = cargar_lote(db, rows)
+    escritas = []
+    notificaciones = 0
+    for id_operacion, calculada in calculadas.items():
+        try:
+            creadas = _escribir(db, [calculada], lote)
+            db.commit()
+        except Exception as e:
+            print(f"  ⚠️  Operación {id_operacion} descartada: {str(e)}")
+            db.rollback()
+            lote = cargar_lote(db, rows)
+            continue
+        escritas.append(id_operacion)
+        notificaciones += creadas
+    return escritas, notificaciones, lote
+
+
+def process_and_insert(db: Session, rows, chunk_size: int = CHUNK_SIZE):
+    """Procesa los registros y los inserta en ml_ventas_metricas
+
+    Pipeline por lotes: precarga de la ventana (cargar_lote), métricas en
+    memoria, upsert por chunk y consumos de offset / notificaciones
+    acumulados en la sesión; un commit por chunk (si falla, el chunk se
+    reintenta fila por fila, ver _escribir_chunk).
+    """
 
     if not rows:
         print("  ⚠️  No hay datos para procesar")
         return 0, 0, 0, 0
 
     print(f"\n📊 Procesando {len(rows)} registros...")
+    inicio = time.perf_counter()
 
     # Calcular count_per_pack (cuántos items por paquete)
     pack_counts = {}
@@ -975,84 +1218,40 @@ def process_and_insert(db: Session, rows):
     total_notificaciones = 0
 
     fecha_calculo = date.today()
+    lote = cargar_lote(db, rows)
+
+    for desde in range(0, len(rows), chunk_size):
+        # Métricas en memoria; una fila por id_operacion (ON CONFLICT no admite repetidos en un mismo INSERT)
+        calculadas = {}
+        for row in rows[desde : desde + chunk_size]:
+            try:
+                count_per_pack = pack_counts.get(row.pack_id, 1)
+                metricas = calcular_metricas_adicionales(row, count_per_pack, db)
+                calculadas[row.id_operacion] = (row, metricas, _datos_metrica(row, metricas, fecha_calculo))
+            except Exception as e:
+                total_errores += 1
+                print(f"  ⚠️  Error procesando operación {row.id_operacion}: {str(e)}")
+
+        if not calculadas:
+            continue
 
-    for row in rows:
-        try:
-            # Verificar si ya existe
-            existente = db.query(MLVentaMetrica).filter(MLVentaMetrica.id_operacion == row.id_operacion).first()
-
-            # Calcular métricas adicionales
-            count_per_pack = pack_counts.get(row.pack_id, 1)
-            metricas = calcular_metricas_adicionales(row, count_per_pack, db)
-
-            # Preparar datos
-            data = {
-                "id_operacion": row.id_operacion,
-                "ml_order_id": str(row.ml_id) if row.ml_id else None,
-                "pack_id": row.pack_id,
-                "item_id": row.item_id,
-                "codigo": row.codigo,
-                "descripcion": row.descripcion,
-                "marca": row.marca,
-                "categoria": row.categoria,
-                "subcategoria": row.subcategoria,
-                "fecha_venta": row.fecha_venta,
-                "fecha_calculo": fecha_calculo,
-                "cantidad": row.cantidad,
-                "monto_unitario": Decimal(str(row.monto_unitario)) if row.monto_unitario else Decimal("0"),
-                "monto_total": Decimal(str(row.monto_total)) if row.monto_total else Decimal("0"),
-                "costo_unitario_sin_iva": Decimal(str(row.costo_sin_iva)) if row.costo_sin_iva else Decimal("0"),
-                "costo_total_sin_iva": Decimal(str(metricas["costo_total_sin_iva"])),
-                "comision_ml": Decimal(str(metricas["comision_ml"])),
-                "costo_envio_ml": Decimal(str(metricas["costo_envio"])),
-                "tipo_logistica": row.tipo_logistica,
-                "monto_limpio": Decimal(str(metricas["monto_limpio"])),
-                "ganancia": Decimal(str(metricas["ganancia"])),
-                "markup_porcentaje": Decimal(str(metricas["markup_porcentaje"])),
-                "mla_id": str(row.mlp_id) if hasattr(row, "mlp_id") and row.mlp_id else None,
-                "mlp_official_store_id": row.mlp_official_store_id if hasattr(row, "mlp_official_store_id") else None,
-                "offset_flex": Decimal(str(metricas["offset_flex"])),
-            }
+        nuevos = {id_operacion for id_operacion in calculadas if id_operacion not in lote.existentes}
+        escritas, notificaciones_chunk, lote = _escribir_chunk(db, calculadas, lote, rows)
 
-            if existente:
-                # Actualizar
-                for key, value in data.items():
-                    if key != "id_operacion":  # No actualizar PK
-                        setattr(existente, key, value)
-                total_actualizados += 1
-            else:
-                # Insertar nuevo
-                nueva_metrica = MLVentaMetrica(**data)
-                db.add(nueva_metrica)
-                total_insertados += 1
-
-            # Registrar consumo de offsets (si aplica)
-            es_nuevo = not existente
-            registrar_consumo_grupo_offset(db, row, es_nuevo)  # Offsets de grupo
-            registrar_consumo_offset_individual(db, row, es_nuevo)  # Offsets individuales
-
-            # Verificar markup y crear notificación si es necesario
-            # NOTA: Requiere que tb_cur_exch_history esté sincronizado con el ERP
-            # Ejecutar: python app/scripts/sync_cur_exch_history.py
-            producto_erp = db.query(ProductoERP).filter(ProductoERP.item_id == row.item_id).first()
-            if crear_notificacion_markup_bajo(db, row, metricas, producto_erp):
-                total_notificaciones += 1
-
-            # Commit cada 100 registros
-            if (total_insertados + total_actualizados) % 100 == 0:
-                db.commit()
-                print(
-                    f"  📊 Progreso: {total_insertados + total_actualizados}/{len(rows)} | Notificaciones: {total_notificaciones}"
-                )
+        total_errores += len(calculadas) - len(escritas)
+        total_insertados += sum(1 for id_operacion in escritas if id_operacion in nuevos)
+        total_actualizados += sum(1 for id_operacion in escritas if id_operacion not in nuevos)
+        total_notificaciones += notificaciones_chunk
+        lote.existentes.update(escritas)
 
-        except Exception as e:
-            total_errores += 1
-            print(f"  ⚠️  Error procesando operación {row.id_operacion}: {str(e)}")
-            db.rollback()  # Rollback para continuar con los demás
-            continue
+        procesados = total_insertados + total_actualizados
+        print(
+            f"  📊 Progreso: {procesados}/{len(rows)} | Notificaciones: {total_notificaciones} | "
+            f"{procesados / max(time.perf_counter() - inicio, 1e-9):,.0f} filas/s"
+        )
 
-    # Commit final
-    db.commit()
+    duracion = time.perf_counter() - inicio
+    print(f"  ⏱️  {len(rows)} filas en {duracion:.2f}s ({len(rows) / max(duracion, 1e-9):,.0f} filas/s)")
 
     return total_insertados, total_actualizados, total_errores, total_notificaciones
 
@@ -34,11 +34,11 @@ from app.models.mercadolibre_order_shipping import MercadoLibreOrderShipping
 from app.models.mercadolibre_item_publicado import MercadoLibreItemPublicado
 from app.models.item_cost_list_history import ItemCostListHistory
 from app.models.producto import ProductoERP
-from app.models.tipo_cambio import TipoCambio
 from app.services.pricing_calculator import (
     obtener_constantes_pricing,
     obtener_grupo_subcategoria,
     obtener_comision_versionada,
+    obtener_tipo_cambio_fecha,
     calcular_comision_ml_total,
 )
 
@@ -54,19 +54,9 @@ _MISSING_COST_SAMPLE_CAP = 20
 
 async def obtener_cotizacion_fecha(db: Session, fecha: date) -> float:
     """Obtains the USD exchange rate for a specific date."""
-    tc = db.query(TipoCambio).filter(TipoCambio.moneda == "USD", TipoCambio.fecha == fecha).first()
-
-    if tc:
-        return float(tc.venta)
-
-    tc = (
-        db.query(TipoCambio)
-        .filter(TipoCambio.moneda == "USD", TipoCambio.fecha <= fecha)
-        .order_by(TipoCambio.fecha.desc())
-        .first()
-    )
-
-    return float(tc.venta) if tc else 1000.0
+    # Exacta o, si no hay, la más reciente anterior (cacheada por fecha en el proceso)
+    tc = obtener_tipo_cambio_fecha(db, fecha, "USD")
+    return tc if tc else 1000.0
 
 
 def obtener_costo_item(
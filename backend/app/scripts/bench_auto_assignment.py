@@ -0,0 +1,141 @@
+"""
+Benchmark de la asignación automática de envíos Turbo a zonas.
+
+Compara, para N envíos contra Z zonas sintéticas (polígonos irregulares sobre
+AMBA que se tocan entre sí, como las zonas reales):
+
+  - legacy: por cada envío, `punto_en_poligono` zona por zona (re-parsea el
+    GeoJSON y recalcula el buffer en cada llamada).
+  - índice frío: construye el IndiceZonas (parseo + buffer + STRtree) y
+    clasifica todos los puntos en una pasada.
+  - índice cacheado: mismas zonas, el índice ya está construido.
+
+Verifica además que las tres variantes asignen exactamente las mismas zonas.
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.bench_auto_assignment
+    python -m app.scripts.bench_auto_assignment --envios 1000 5000 --zonas 20 60
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import argparse
+import logging
+import math
+import random
+import statistics
+import time
+
+from app.services.auto_assignment_service import (
+    IndiceZonas,
+    asignar_envios_automaticamente,
+    obtener_indice_zonas,
+    punto_en_poligono,
+)
+
+REPETICIONES = 3
+
+# Caja aproximada de CABA + conurbano
+LAT_MIN, LAT_MAX = -34.85, -34.45
+LNG_MIN, LNG_MAX = -58.75, -58.30
+
+
+def _zonas(z: int, rnd: random.Random) -> list[dict]:
+    """Grilla de Z celdas con bordes irregulares (≈30 vértices por zona)."""
+    columnas = math.ceil(math.sqrt(z))
+    filas = math.ceil(z / columnas)
+    alto = (LAT_MAX - LAT_MIN) / filas
+    ancho = (LNG_MAX - LNG_MIN) / columnas
+    zonas = []
+    for i in range(z):
+        f, c = divmod(i, columnas)
+        lat0, lng0 = LAT_MIN + f * alto, LNG_MIN + c * ancho
+        anillo = []
+        for k in range(32):
+            angulo = 2 * math.pi * k / 32
+            radio = 0.5 + rnd.uniform(-0.05, 0.05)
+            anillo.append(
+                [lng0 + ancho * (0.5 + radio * math.cos(angulo)), lat0 + alto * (0.5 + radio * math.sin(angulo))]
+            )
+        anillo.append(anillo[0])
+        zonas.append(
+            {
+                "id": i + 1,
+                "nombre": f"Zona {i + 1}",
+                "poligono": {"type": "Polygon", "coordinates": [anillo]},
+                "motoquero_id": i % 7 + 1,
+                "motoquero_nombre": f"Moto {i % 7 + 1}",
+            }
+        )
+    return zonas
+
+
+def _envios(n: int, rnd: random.Random) -> list[tuple[str, float, float]]:
+    return [(str(40_000_000_000 + i), rnd.uniform(LAT_MIN, LAT_MAX), rnd.uniform(LNG_MIN, LNG_MAX)) for i in range(n)]
+
+
+def _legacy(envios, zonas) -> list:
+    resultado = []
+    for _, lat, lng in envios:
+        resultado.append(next((z["id"] for z in zonas if punto_en_poligono(lat, lng, z["poligono"])), None))
+    return resultado
+
+
+def _indice(envios, zonas, indice: IndiceZonas) -> list:
+    posiciones = indice.clasificar([e[1] for e in envios], [e[2] for e in envios])
+    return [zonas[p]["id"] if p >= 0 else None for p in posiciones]
+
+
+def _medir(fn, repeticiones: int = REPETICIONES) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def correr(envios_sizes: list[int], zonas_sizes: list[int], legacy_max: int) -> None:
+    print(
+        f"{'envíos':>7} | {'zonas':>5} | {'legacy ms':>10} | {'índice frío ms':>14} | "
+        f"{'índice cache ms':>15} | {'speedup':>7}"
+    )
+    print("-" * 75)
+    for z in zonas_sizes:
+        rnd = random.Random(z)
+        zonas = _zonas(z, rnd)
+        for n in envios_sizes:
+            envios = _envios(n, rnd)
+            esperado = _indice(envios, zonas, IndiceZonas(zonas))
+
+            legacy_ms = None
+            if n <= legacy_max:
+                assert _legacy(envios, zonas) == esperado
+                legacy_ms = _medir(lambda: _legacy(envios, zonas), repeticiones=1)
+
+            frio_ms = _medir(lambda: _indice(envios, zonas, IndiceZonas(zonas)))
+            obtener_indice_zonas(zonas)
+            cache_ms = _medir(lambda: asignar_envios_automaticamente(envios, zonas))
+
+            legacy_txt = f"{legacy_ms:>10.1f}" if legacy_ms is not None else f"{'-':>10}"
+            speedup_txt = f"{legacy_ms / cache_ms:>6.0f}x" if legacy_ms is not None else f"{'-':>7}"
+            print(f"{n:>7} | {z:>5} | {legacy_txt} | {frio_ms:>14.1f} | {cache_ms:>15.1f} | {speedup_txt}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de asignación automática Turbo (point-in-polygon)")
+    parser.add_argument("--envios", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--zonas", type=int, nargs="+", default=[12, 40, 80])
+    parser.add_argument(
+        "--legacy-max", type=int, default=5000, help="No medir legacy por encima de estos envíos (es lento)"
+    )
+    args = parser.parse_args()
+    # El servicio loguea cada envío sin zona / cada asignación
+    logging.disable(logging.WARNING)
+    correr(args.envios, args.zonas, args.legacy_max)
@@ -0,0 +1,133 @@
+"""
+Benchmark de paginación del listado de productos (GET /productos).
+
+Compara, para catálogos sintéticos de distinto tamaño, la latencia de una
+página ordenada por una columna "dinámica" (precio_rebate):
+
+  - legacy: trae todas las filas, ordena en Python y corta la página
+    (lo que hacía listar_productos antes de productos_paginacion).
+  - offset: ORDER BY + OFFSET/LIMIT en SQL.
+  - keyset: ORDER BY + cursor (sin OFFSET), página profunda.
+
+Corre contra SQLite en memoria para no depender de la base productiva; los
+números absolutos no son los de PostgreSQL, pero la forma de la curva sí:
+legacy crece lineal con el catálogo, keyset queda plano.
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.bench_productos_listing
+    python -m app.scripts.bench_productos_listing --sizes 1000 10000 50000 --page-size 50
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models.producto import ProductoERP, ProductoPricing
+from app.services.productos_paginacion import paginar, parse_orden
+
+REPETICIONES = 5
+
+
+def _crear_catalogo(n: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[ProductoERP.__table__, ProductoPricing.__table__])
+
+    rnd = random.Random(n)
+    marcas = ["SAMSUNG", "LG", "NOBLEX", "PHILIPS", "SONY", "XIAOMI"]
+    with engine.begin() as conn:
+        conn.execute(
+            ProductoERP.__table__.insert(),
+            [
+                {
+                    "item_id": i,
+                    "codigo": f"C{i:06d}",
+                    "descripcion": f"Producto {i}",
+                    "marca": rnd.choice(marcas),
+                    "costo": rnd.uniform(1000, 500000),
+                    "moneda_costo": "ARS",
+                    "iva": 21.0,
+                    "stock": rnd.randint(0, 50),
+                    "activo": True,
+                }
+                for i in range(1, n + 1)
+            ],
+        )
+        conn.execute(
+            ProductoPricing.__table__.insert(),
+            [
+                {
+                    "item_id": i,
+                    "precio_lista_ml": rnd.uniform(2000, 900000),
+                    "markup_calculado": rnd.uniform(-10, 60),
+                    "markup_rebate": None if i % 9 == 0 else rnd.uniform(-10, 60),
+                    "markup_oferta": rnd.uniform(-10, 60),
+                    "out_of_cards": False,
+                }
+                for i in range(1, n + 1)
+            ],
+        )
+    return sessionmaker(bind=engine)()
+
+
+def _query(db):
+    return db.query(ProductoERP, ProductoPricing).outerjoin(
+        ProductoPricing, ProductoERP.item_id == ProductoPricing.item_id
+    )
+
+
+def _legacy(db, page: int, page_size: int) -> list:
+    rows = _query(db).all()
+    rows.sort(key=lambda r: (r[1].markup_rebate is None, -(r[1].markup_rebate or 0)))
+    offset = (page - 1) * page_size
+    return rows[offset : offset + page_size]
+
+
+def _medir(fn) -> float:
+    tiempos = []
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos)
+
+
+def correr(sizes: list[int], page_size: int) -> None:
+    orden = parse_orden("precio_rebate", "desc")
+    print(f"{'catálogo':>10} | {'legacy ms':>10} | {'offset p1 ms':>12} | {'keyset p20 ms':>13}")
+    print("-" * 56)
+    for n in sizes:
+        db = _crear_catalogo(n)
+        try:
+            # Cursor de la página 20 para medir keyset en profundidad
+            cursor = None
+            for _ in range(19):
+                _, cursor = paginar(_query(db), orden, 1, page_size, cursor=cursor)
+
+            legacy_ms = _medir(lambda: _legacy(db, 1, page_size))
+            offset_ms = _medir(lambda: paginar(_query(db), orden, 1, page_size))
+            keyset_ms = _medir(lambda: paginar(_query(db), orden, 1, page_size, cursor=cursor))
+            print(f"{n:>10} | {legacy_ms:>10.1f} | {offset_ms:>12.1f} | {keyset_ms:>13.1f}")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de paginación de GET /productos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    correr(args.sizes, args.page_size)
@@ -0,0 +1,161 @@
+"""
+Benchmark del fan-out SSE: scan lineal (anterior) vs. índice canal → clientes.
+
+Para cada cantidad de streams (cada cliente suscripto a 2 de 20 canales, con
+un consumidor que drena su cola como lo hace `event_generator` en
+app/routers/sse.py) mide:
+
+  - lineal: lo que hacía `_redis_subscriber` antes — recorrer todas las
+    conexiones por evento y armar el string SSE para cada suscriptor.
+  - indexado: `SSEConnectionManager.dispatch` (índice por canal, un único
+    payload en bytes compartido).
+    En ambos se mide sólo el fan-out (µs por evento); el drenado de las colas
+    corre entre eventos, fuera de la medición.
+  - punta a punta: `sse_publish` → Redis stream → lector → cola del cliente,
+    con latencia p50/p99 de publicación a entrega. Sin --redis-url usa
+    fakeredis (mide el código, no la red).
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.bench_sse_fanout
+    python -m app.scripts.bench_sse_fanout --streams 1000 5000 10000 --eventos 500
+    python -m app.scripts.bench_sse_fanout --redis-url redis://localhost:6379/15
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.core import sse
+from app.core.sse import SSEConnectionManager, encode_event
+
+CANALES = [f"bench:{i}" for i in range(20)]
+
+
+def _canales_cliente(i: int) -> list[str]:
+    return [CANALES[i % len(CANALES)], CANALES[(i * 7 + 3) % len(CANALES)]]
+
+
+def _lineal(conexiones: list[tuple[set, asyncio.Queue]], canal: str, data: str, event_id: int) -> None:
+    for canales, cola in conexiones:
+        if canal in canales:
+            payload = f"id: {event_id}\nevent: {canal}\ndata: {data}\n\n"
+            if not cola.full():
+                cola.put_nowait(payload)
+
+
+async def _drenar(cola: asyncio.Queue, recibidos: list[int]) -> None:
+    while True:
+        if await cola.get() is None:
+            return
+        recibidos[0] += 1
+
+
+async def _fanout(streams: int, eventos: int) -> tuple[float, float]:
+    data = json.dumps({"channel": "bench", "data": {"count": 1}, "timestamp": "2026-01-01T00:00:00+00:00"})
+    recibidos = [0]
+
+    conexiones = [(set(_canales_cliente(i)), asyncio.Queue(maxsize=64)) for i in range(streams)]
+    consumidores = [asyncio.create_task(_drenar(cola, recibidos)) for _, cola in conexiones]
+    lineal = 0.0
+    for n in range(eventos):
+        t0 = time.perf_counter()
+        _lineal(conexiones, CANALES[n % len(CANALES)], data, n)
+        lineal += time.perf_counter() - t0
+        await asyncio.sleep(0)  # los consumidores drenan entre eventos (fuera de la medición)
+    for _, cola in conexiones:
+        cola.put_nowait(None)
+    await asyncio.gather(*consumidores)
+
+    manager = SSEConnectionManager(None, max_connections=streams, coalesce_seconds=0)
+    colas = [manager.register(_canales_cliente(i))[1] for i in range(streams)]
+    consumidores = [asyncio.create_task(_drenar(cola, recibidos)) for cola in colas]
+    indexado = 0.0
+    for n in range(eventos):
+        canal = CANALES[n % len(CANALES)]
+        t0 = time.perf_counter()
+        manager.dispatch(canal, encode_event(canal, data, f"{n}-0"))
+        indexado += time.perf_counter() - t0
+        await asyncio.sleep(0)
+    for cola in colas:
+        cola.put_nowait(None)
+    await asyncio.gather(*consumidores)
+    return lineal / eventos, indexado / eventos
+
+
+async def _punta_a_punta(streams: int, eventos: int, redis_url: str | None) -> tuple[float, float, int]:
+    if redis_url:
+        from redis.asyncio import Redis
+
+        redis = Redis.from_url(redis_url)
+        await redis.delete(sse.STREAM_KEY)
+    else:
+        import fakeredis
+
+        redis = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    sse.set_redis(redis, asyncio.get_running_loop())
+    manager = SSEConnectionManager(redis, max_connections=streams, coalesce_seconds=0)
+    await manager.start()
+
+    enviados: dict[int, float] = {}
+    latencias: list[float] = []
+
+    async def cliente(cola: asyncio.Queue) -> None:
+        while (payload := await cola.get()) is not None:
+            n = json.loads(payload.rsplit(b"data: ", 1)[1])["data"]["n"]
+            latencias.append(time.perf_counter() - enviados[n])
+
+    colas = [manager.register(_canales_cliente(i))[1] for i in range(streams)]
+    consumidores = [asyncio.create_task(cliente(cola)) for cola in colas]
+    try:
+        for n in range(eventos):
+            enviados[n] = time.perf_counter()
+            await sse.sse_publish(CANALES[n % len(CANALES)], {"n": n})
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.5)
+    finally:
+        await manager.stop()
+        await asyncio.gather(*consumidores)
+        if redis_url:
+            await redis.delete(sse.STREAM_KEY)
+        await redis.aclose()
+        sse.set_redis(None, None)
+
+    latencias.sort()
+    p50 = statistics.median(latencias) if latencias else 0.0
+    p99 = latencias[int(len(latencias) * 0.99) - 1] if latencias else 0.0
+    return p50, p99, len(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del fan-out SSE")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1000, 2000, 5000])
+    parser.add_argument("--eventos", type=int, default=200)
+    parser.add_argument("--redis-url", default=None, help="Redis real para el punta a punta (se borra sse:stream)")
+    args = parser.parse_args()
+
+    print(
+        f"{'streams':>8} | {'lineal µs/ev':>12} | {'indexado µs/ev':>14} | "
+        f"{'e2e p50 ms':>10} | {'e2e p99 ms':>10} | {'entregas':>9}"
+    )
+    print("-" * 80)
+    for streams in args.streams:
+        lineal, indexado = asyncio.run(_fanout(streams, args.eventos))
+        p50, p99, entregas = asyncio.run(_punta_a_punta(streams, args.eventos, args.redis_url))
+        print(
+            f"{streams:>8} | {lineal * 1e6:>12.0f} | {indexado * 1e6:>14.0f} | "
+            f"{p50 * 1e3:>10.2f} | {p99 * 1e3:>10.2f} | {entregas:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark de los exports a Excel: Workbook + BytesIO vs. writer en streaming.
+
+Compara, para distintas cantidades de filas (8 columnas, como Lista Gremio):
+
+  - workbook: `openpyxl.Workbook()` + `ws.append` + `wb.save(BytesIO)`, lo que
+    hacían los exports antes de app.utils.xlsx_stream. El primer byte sale
+    cuando el archivo está completo.
+  - stream: `stream_xlsx` sobre un generador de filas (como el de
+    `filas_por_lotes`), consumiendo los chunks a medida que salen.
+
+Mide el pico de RSS (crecimiento de ru_maxrss sobre la base del proceso), el
+tiempo al primer byte y el tiempo total. Cada corrida va en un proceso aparte
+porque ru_maxrss es monotónico: si no, la segunda medición arrastraría el pico
+de la primera. Las filas son sintéticas (no hace falta base): se mide el
+armado del archivo; `query.all()` vs. cursor server-side suma aparte, en el
+mismo sentido.
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.bench_xlsx_export
+    python -m app.scripts.bench_xlsx_export --filas 10000 100000 300000
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import argparse
+import multiprocessing
+import resource
+import time
+from io import BytesIO
+
+from app.utils.xlsx_stream import ENCABEZADO_AZUL, Hoja, stream_xlsx
+
+ENCABEZADO = ["Marca", "Categoría", "Subcategoría", "Código", "Descripción", "Stock", "Precio s/IVA", "Precio c/IVA"]
+ANCHOS = [15, 20, 20, 15, 50, 10, 18, 18]
+
+
+def _filas(n: int):
+    marcas = ["SAMSUNG", "LG", "NOBLEX", "PHILIPS", "SONY", "XIAOMI"]
+    for i in range(n):
+        precio = 1000 + (i * 37) % 90000
+        yield [
+            marcas[i % len(marcas)],
+            "Electro",
+            "Televisores",
+            f"C{i:07d}",
+            f"Producto de prueba número {i} con descripción larga",
+            i % 50,
+            round(precio / 1.21, 2),
+            float(precio),
+        ]
+
+
+def _workbook(n: int) -> tuple[float, int]:
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    t0 = time.perf_counter()
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Bench"
+    ws.append(ENCABEZADO)
+    for cell in ws[1]:
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.alignment = Alignment(horizontal="center")
+    for fila in _filas(n):
+        ws.append(fila)
+    for i, ancho in enumerate(ANCHOS, 1):
+        ws.column_dimensions[ws.cell(row=1, column=i).column_letter].width = ancho
+    output = BytesIO()
+    wb.save(output)
+    ttfb = time.perf_counter() - t0  # recién acá puede salir el primer byte
+    return ttfb, len(output.getvalue())
+
+
+def _stream(n: int) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    ttfb = None
+    total = 0
+    hoja = Hoja(
+        titulo="Bench", filas=_filas(n), encabezado=ENCABEZADO, estilo_encabezado=ENCABEZADO_AZUL, anchos=ANCHOS
+    )
+    for chunk in stream_xlsx([hoja]):
+        if ttfb is None:
+            ttfb = time.perf_counter() - t0
+        total += len(chunk)
+    return ttfb, total
+
+
+def _medir(modo: str, n: int, resultado) -> None:
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    ttfb, tamano = (_workbook if modo == "workbook" else _stream)(n)
+    total = time.perf_counter() - t0
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_kb
+    resultado.put((pico_kb / 1024, ttfb * 1000, total * 1000, tamano / 1024 / 1024))
+
+
+def _en_proceso(modo: str, n: int) -> tuple[float, float, float, float]:
+    cola = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_medir, args=(modo, n, cola))
+    proc.start()
+    resultado = cola.get()
+    proc.join()
+    return resultado
+
+
+def correr(filas: list[int]) -> None:
+    print(f"{'filas':>8} | {'modo':>8} | {'pico RSS MB':>11} | {'1er byte ms':>11} | {'total ms':>9} | {'MB':>6}")
+    print("-" * 68)
+    for n in filas:
+        for modo in ("workbook", "stream"):
+            pico, ttfb, total, tamano = _en_proceso(modo, n)
+            print(f"{n:>8} | {modo:>8} | {pico:>11.1f} | {ttfb:>11.1f} | {total:>9.1f} | {tamano:>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de exports XLSX (Workbook vs. streaming)")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10000, 50000, 200000])
+    args = parser.parse_args()
+    correr(args.filas)
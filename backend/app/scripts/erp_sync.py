@@ -0,0 +1,83 @@
+"""
+Sync declarativo de tablas del ERP (motor app.services.erp_sync_engine).
+
+Full e incremental son el mismo camino: el incremental arranca desde el
+watermark guardado en erp_sync_state.
+
+Modos de uso:
+    # Incremental de una tabla
+    python -m app.scripts.erp_sync item_transactions
+
+    # Recarga completa
+    python -m app.scripts.erp_sync suppliers --full
+
+    # Todas las tablas con spec
+    python -m app.scripts.erp_sync --all
+"""
+
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+
+env_path = backend_dir / ".env"
+load_dotenv(dotenv_path=env_path)
+
+import argparse
+import asyncio
+
+import app.models  # noqa
+from app.core.database import SessionLocal
+from app.core.http_clients import close_http_clients
+from app.services.erp_sync_engine import MODO_FULL, MODO_INCREMENTAL, sincronizar
+from app.services.erp_sync_specs import SPECS
+
+
+async def sync_tablas(nombres: list[str], modo: str) -> bool:
+    """Sincroniza las tablas en orden. Devuelve False si alguna falló."""
+    ok = True
+    db = SessionLocal()
+    try:
+        for nombre in nombres:
+            print(f"\n🔄 {nombre} ({modo})")
+            try:
+                r = await sincronizar(db, SPECS[nombre], modo=modo)
+            except Exception as e:
+                ok = False
+                print(f"   ❌ Error: {e}")
+                continue
+            print(
+                f"   ✅ {r.leidas} leídas, {r.escritas} escritas, {r.descartadas} descartadas "
+                f"en {r.lotes} lotes ({r.duracion_s:.1f}s, {r.filas_por_segundo:.0f} filas/s)"
+            )
+            print(f"   Watermark: {r.watermark_inicial} → {r.watermark_final}")
+    finally:
+        db.close()
+        await close_http_clients()
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync declarativo de tablas del ERP")
+    parser.add_argument("tablas", nargs="*", help=f"Tablas a sincronizar ({', '.join(SPECS)})")
+    parser.add_argument("--all", action="store_true", help="Sincronizar todas las tablas con spec")
+    parser.add_argument("--full", action="store_true", help="Recarga completa (ignora el watermark)")
+    args = parser.parse_args()
+
+    nombres = list(SPECS) if args.all else args.tablas
+    if not nombres:
+        parser.error("Indicar al menos una tabla o --all")
+    desconocidas = [n for n in nombres if n not in SPECS]
+    if desconocidas:
+        parser.error(f"Tablas sin spec: {', '.join(desconocidas)}")
+
+    ok = asyncio.run(sync_tablas(nombres, MODO_FULL if args.full else MODO_INCREMENTAL))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Reconstruye el rollup del ranking de consultas (ranking_item_deposito) desde cero.
+
+Los syncs lo mantienen al día de forma incremental (stock por depósito y
+última venta/compra sólo avanzan). Correr esto cuando el ERP borra o corrige
+transacciones viejas, o si cambia la definición de venta (ADR-1). Todo corre
+en una transacción: el ranking sigue leyendo la versión anterior hasta el
+commit.
+
+Cron sugerido (semanal, fuera de horario pico):
+    30 4 * * 0 /path/to/venv/bin/python -m app.scripts.rebuild_ranking_rollup
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.rebuild_ranking_rollup
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import time
+
+from app.core.database import SessionLocal
+
+# Importar todos los modelos para evitar problemas de dependencias circulares
+import app.models  # noqa
+from app.services import ranking_rollup_service
+
+
+def main():
+    print("🚀 Reconstruyendo ranking_item_deposito")
+    print("=" * 60)
+
+    db = SessionLocal()
+    inicio = time.perf_counter()
+    try:
+        resultado = ranking_rollup_service.reconstruir(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error reconstruyendo el rollup: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+    print(f"✅ Filas por depósito: {resultado['depositos']}")
+    print(f"✅ Items con venta/compra: {resultado['items']}")
+    print(f"   Duración: {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,10 @@ Uso manual:
     python -m app.scripts.reconciliar_cc_proveedor
     python -m app.scripts.reconciliar_cc_proveedor --fecha 2026-04-20
 
+Además verifica que los saldos mantenidos (`cc_proveedor_saldos`, que
+`insertar_mov` actualiza en cada movimiento) sigan cuadrando con el mayor;
+los desfasajes se loguean como WARNING y se cuentan en el resumen.
+
 Idempotencia: la UNIQUE constraint `(fecha_corrida, proveedor_id, moneda)`
 en `cc_reconciliacion_log` garantiza que re-correr con la misma fecha
 NO duplica logs (la segunda corrida explota en el flush y se rollbackea).
@@ -40,7 +44,10 @@ sys.path.insert(0, str(backend_dir))
 from app.core.database import SessionLocal  # noqa: E402
 from app.core.logging import get_logger  # noqa: E402
 from app.schemas.configuracion_compras import leer_configuracion  # noqa: E402
-from app.services.cc_proveedor_service import reconciliar_diario  # noqa: E402
+from app.services.cc_proveedor_service import (  # noqa: E402
+    reconciliar_diario,
+    verificar_saldos_mantenidos,
+)
 
 logger = get_logger("scripts.reconciliar_cc_proveedor")
 
@@ -63,7 +70,7 @@ def correr(fecha: date, *, ventana_dias: int = 365) -> dict:
         ventana_dias: filtro de proveedores activos.
 
     Returns:
-        Resumen retornado por `reconciliar_diario`.
+        Resumen retornado por `reconciliar_diario` + `saldos_desfasados`.
     """
     session = SessionLocal()
     try:
@@ -84,6 +91,10 @@ def correr(fecha: date, *, ventana_dias: int = 365) -> dict:
             tolerancias=tolerancias,
             ventana_dias=ventana_dias,
         )
+        desfasados = verificar_saldos_mantenidos(session)
+        for fila in desfasados:
+            logger.warning("Saldo mantenido desfasado del mayor: %s", fila)
+        resumen["saldos_desfasados"] = len(desfasados)
         session.commit()
 
         logger.info("Reconciliación %s completada: %s", fecha, resumen)
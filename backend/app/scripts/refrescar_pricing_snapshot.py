@@ -0,0 +1,49 @@
+"""
+Refresh del snapshot de pricing (tabla pricing_snapshots).
+
+Por defecto es incremental: recalcula sólo los ítems cuyo snapshot falta,
+está marcado stale (hooks de edición), tiene otra huella de inputs globales
+(tipo de cambio, constantes, comisiones) o cuyos inputs sincronizados
+(productos_erp, ofertas_ml, precios_ml) cambiaron después del último cálculo.
+También actualiza productos_pricing.markup_rebate / markup_oferta.
+
+Cron sugerido (cada 10 minutos, después de los syncs):
+    */10 * * * * cd /var/www/html/pricing-app/backend && \\
+        venv/bin/python -m app.scripts.refrescar_pricing_snapshot >> /var/log/pricing-app/pricing_snapshot.log 2>&1
+
+Ejecutar desde el directorio backend:
+    python -m app.scripts.refrescar_pricing_snapshot
+    python -m app.scripts.refrescar_pricing_snapshot --completo
+    python -m app.scripts.refrescar_pricing_snapshot --items 123 456
+"""
+
+import sys
+import os
+
+if __name__ == "__main__":
+    backend_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if backend_path not in sys.path:
+        sys.path.insert(0, backend_path)
+
+import argparse
+
+from app.core.database import SessionLocal
+import app.models  # noqa: F401
+from app.services.pricing_snapshot_service import CHUNK_SIZE, refrescar_snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh del snapshot de pricing")
+    parser.add_argument("--completo", action="store_true", help="Recalcular todos los productos")
+    parser.add_argument("--items", type=int, nargs="+", help="Recalcular sólo estos item_id")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = refrescar_snapshot(db, item_ids=args.items, completo=args.completo, chunk_size=args.chunk_size)
+        print(
+            f"✅ Snapshot de pricing actualizado: {stats['items']} ítems, {stats['filas']} filas en {stats['segundos']}s"
+        )
+    finally:
+        db.close()
@@ -1,10 +1,11 @@
 """
-Script para ejecutar todas las sincronizaciones incrementales en orden
-Ejecuta todos los syncs de forma secuencial con manejo de errores
+Script para ejecutar todas las sincronizaciones incrementales
+Ejecuta los syncs como un DAG de dependencias, en un solo proceso: las ramas
+independientes corren en paralelo y cada job queda registrado en sync_job_runs
 
 Ejecutar desde el directorio backend:
     cd /var/www/html/pricing-app/backend
-    python -m app.scripts.sync_all_incremental
+    python -m app.scripts.sync_all_incremental [--max-paralelo N]
 """
 
 import sys
@@ -23,8 +24,16 @@ if __name__ == "__main__":
     env_path = Path(backend_path) / ".env"
     load_dotenv(dotenv_path=env_path)
 
+import argparse
 import asyncio
-from app.core.database import SessionLocal
+from app.core.http_clients import close_http_clients
+from app.services.sync_scheduler import (
+    ESTADO_OK,
+    MAX_PARALELO_DEFAULT,
+    ResultadoJob,
+    SyncJob,
+    ejecutar_dag,
+)
 
 # Importar todas las funciones de sincronización
 from app.scripts.sync_erp_master_tables_incremental import main_async as sync_erp_master_tables
@@ -45,141 +54,90 @@ from app.scripts.sync_price_list_items import sync_price_list_items_incremental
 from app.scripts.sync_item_storage import sync_item_storage_incremental
 
 
-# Wrappers async para los syncs sync (usan requests bloqueante via gbp-parser).
-# `asyncio.to_thread` evita bloquear el event loop del orquestador.
-async def _sync_price_list_items_wrapper(db):
-    return await asyncio.to_thread(sync_price_list_items_incremental, db, price_list_id=4)
-
-
-async def _sync_item_storage_wrapper(db):
-    return await asyncio.to_thread(sync_item_storage_incremental, db, stor_id=1)
-
-
-async def ejecutar_todas_sincronizaciones():
+# Todos los syncs y sus dependencias. Las ramas independientes corren en
+# paralelo (ver app/services/sync_scheduler.py); `depende_de` sólo ordena:
+# si una dependencia falla, el job igual corre (cada sync retoma desde su
+# propio watermark), como en la versión secuencial.
+# `bloqueante=True`: usan `requests` dentro de una función async, corren en
+# un thread para no frenar el event loop.
+# NOTA: ML Publications Snapshot se ejecuta en un cron separado (cada 4-6 horas)
+# porque procesa 14k+ registros y hace que este script tarde demasiado
+SYNC_JOBS = [
+    SyncJob("Tablas Maestras ERP", sync_erp_master_tables, usa_db=False),
+    SyncJob("Commercial Transactions", sync_transacciones_incrementales, kwargs={"batch_size": 1000}),
+    SyncJob("Item Transactions", sync_item_transactions_incremental, depende_de=("Commercial Transactions",)),
+    SyncJob("Item Transaction Details", sync_details_incremental, depende_de=("Item Transactions",)),
+    SyncJob(
+        "Price List Items (lista 4 = ML)",
+        sync_price_list_items_incremental,
+        depende_de=("Tablas Maestras ERP",),
+        kwargs={"price_list_id": 4},
+    ),
+    SyncJob(
+        "Item Storage (depósito 1)",
+        sync_item_storage_incremental,
+        depende_de=("Tablas Maestras ERP",),
+        kwargs={"stor_id": 1},
+    ),
+    SyncJob("Item Cost List", sync_item_cost_list_incremental, depende_de=("Tablas Maestras ERP",), bloqueante=True),
+    SyncJob(
+        "Item Cost List History",
+        sync_item_cost_history_incremental,
+        depende_de=("Tablas Maestras ERP",),
+        bloqueante=True,
+    ),
+    SyncJob("ML Orders", sync_ml_orders_incremental),
+    SyncJob("ML Orders Detail", sync_ml_orders_detail_incremental, depende_de=("ML Orders",)),
+    SyncJob("ML Orders Shipping", sync_ml_orders_shipping_updater, depende_de=("ML Orders Detail",)),
+    SyncJob("ML Items Publicados", sync_items_publicados_incremental),
+    SyncJob("Customers (Clientes)", sync_customers_incremental, kwargs={"batch_size": 1000}, bloqueante=True),
+    SyncJob("ML Users Data", sync_ml_users_data_incremental, depende_de=("ML Orders",)),
+]
+
+
+def _informar(r: ResultadoJob) -> None:
+    if r.estado == ESTADO_OK:
+        print(
+            f"✅ {r.nombre} completado en {r.duracion_s:.1f}s" + (f" ({r.filas} filas)" if r.filas is not None else "")
+        )
+    else:
+        print(f"❌ Error en {r.nombre}: {r.error}")
+
+
+async def ejecutar_todas_sincronizaciones(max_paralelo: int = MAX_PARALELO_DEFAULT):
     """
-    Ejecuta todas las sincronizaciones incrementales en orden
+    Ejecuta todas las sincronizaciones incrementales respetando sus dependencias
     """
     timestamp_inicio = datetime.now()
     print("\n" + "=" * 60)
     print(f"🔄 Inicio sincronización completa: {timestamp_inicio.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"   {len(SYNC_JOBS)} syncs, hasta {max_paralelo} en paralelo")
     print("=" * 60)
 
-    resultados = {"exitosos": [], "errores": []}
-
-    # Lista de sincronizaciones a ejecutar
-    sincronizaciones = [
-        {
-            "nombre": "Tablas Maestras ERP (tb_brand, tb_category, tb_subcategory, tb_tax_name, tb_item, tb_item_taxes)",
-            "emoji": "📋",
-            "funcion": sync_erp_master_tables,
-            "args_batch": False,
-            "skip_db": True,  # Esta función maneja su propia conexión
-        },
-        {
-            "nombre": "Commercial Transactions",
-            "emoji": "📊",
-            "funcion": sync_transacciones_incrementales,
-            "args_batch": True,  # Usa batch_size
-        },
-        {
-            "nombre": "Item Transactions",
-            "emoji": "📦",
-            "funcion": sync_item_transactions_incremental,
-            "args_batch": False,
-        },
-        {"nombre": "Item Transaction Details", "emoji": "📋", "funcion": sync_details_incremental, "args_batch": False},
-        {
-            "nombre": "Price List Items (lista 4 = ML)",
-            "emoji": "🏷️",
-            "funcion": _sync_price_list_items_wrapper,
-            "args_batch": False,
-        },
-        {
-            "nombre": "Item Storage (depósito 1)",
-            "emoji": "📦",
-            "funcion": _sync_item_storage_wrapper,
-            "args_batch": False,
-        },
-        {"nombre": "Item Cost List", "emoji": "💵", "funcion": sync_item_cost_list_incremental, "args_batch": False},
-        {
-            "nombre": "Item Cost List History",
-            "emoji": "💰",
-            "funcion": sync_item_cost_history_incremental,
-            "args_batch": False,
-        },
-        {"nombre": "ML Orders", "emoji": "🛒", "funcion": sync_ml_orders_incremental, "args_batch": False},
-        {
-            "nombre": "ML Orders Detail",
-            "emoji": "📄",
-            "funcion": sync_ml_orders_detail_incremental,
-            "args_batch": False,
-        },
-        {
-            "nombre": "ML Orders Shipping",
-            "emoji": "🚚",
-            "funcion": sync_ml_orders_shipping_updater,
-            "args_batch": False,
-        },
-        {
-            "nombre": "ML Items Publicados",
-            "emoji": "📢",
-            "funcion": sync_items_publicados_incremental,
-            "args_batch": False,
-        },
-        {
-            "nombre": "Customers (Clientes)",
-            "emoji": "👥",
-            "funcion": sync_customers_incremental,
-            "args_batch": True,  # Usa batch_size
-        },
-        {
-            "nombre": "ML Users Data",
-            "emoji": "👤",
-            "funcion": sync_ml_users_data_incremental,
-            "args_batch": False,
-        },
-        # NOTA: ML Publications Snapshot se movió a un cron separado (cada 4-6 horas)
-        # porque procesa 14k+ registros y hace que este script tarde demasiado
-    ]
-
-    for i, sync in enumerate(sincronizaciones, 1):
-        skip_db = sync.get("skip_db", False)
-        db = None if skip_db else SessionLocal()
-        try:
-            print(f"\n{sync['emoji']} [{i}/{len(sincronizaciones)}] Sincronizando {sync['nombre']}...")
-
-            # Ejecutar la función según sus requerimientos
-            if skip_db:
-                # Función que maneja su propia conexión a DB
-                result = await sync["funcion"]()
-            elif sync["args_batch"]:
-                result = await sync["funcion"](db, batch_size=1000)
-            else:
-                result = await sync["funcion"](db)
-
-            print(f"✅ {sync['nombre']} completado")
+    try:
+        corrida = await ejecutar_dag(SYNC_JOBS, max_paralelo=max_paralelo, al_terminar=_informar)
+    finally:
+        await close_http_clients()
 
-            # Guardar resultado
-            if isinstance(result, tuple):
-                resultados["exitosos"].append(f"{sync['nombre']}: {result}")
+    resultados = {"exitosos": [], "errores": []}
+    for job in SYNC_JOBS:
+        r = corrida.jobs[job.nombre]
+        if r.estado == ESTADO_OK:
+            if isinstance(r.resultado, tuple):
+                resultados["exitosos"].append(f"{r.nombre}: {r.resultado}")
             else:
-                resultados["exitosos"].append(sync["nombre"])
-
-        except Exception as e:
-            error_msg = f"{sync['nombre']}: {str(e)}"
-            print(f"❌ Error en {sync['nombre']}: {str(e)}")
-            resultados["errores"].append(error_msg)
-        finally:
-            if db:
-                db.close()
+                resultados["exitosos"].append(r.nombre)
+        else:
+            resultados["errores"].append(f"{r.nombre}: {r.error}")
 
     # Resumen final
     timestamp_fin = datetime.now()
-    duracion = (timestamp_fin - timestamp_inicio).total_seconds()
 
     print("\n" + "=" * 60)
     print(f"✨ Sincronización completa finalizada: {timestamp_fin.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"⏱️  Duración: {duracion:.2f} segundos")
+    print(f"⏱️  Duración: {corrida.duracion_s:.2f} segundos")
+    print(f"🧭 Camino crítico ({corrida.duracion_camino_critico_s:.2f}s): {' → '.join(corrida.camino_critico)}")
+    print(f"🆔 Corrida: {corrida.corrida_id} (ver tabla sync_job_runs)")
     print("=" * 60)
 
     print("\n📊 Resumen:")
@@ -198,7 +156,11 @@ if __name__ == "__main__":
     print("🚀 Iniciando sincronización completa de datos ERP...")
 
     try:
-        resultados = asyncio.run(ejecutar_todas_sincronizaciones())
+        parser = argparse.ArgumentParser(description="Sincronizaciones incrementales (DAG en paralelo)")
+        parser.add_argument("--max-paralelo", type=int, default=MAX_PARALELO_DEFAULT, help="Syncs a la vez")
+        args = parser.parse_args()
+
+        resultados = asyncio.run(ejecutar_todas_sincronizaciones(max_paralelo=args.max_paralelo))
 
         # Exit code basado en resultados
         if resultados["errores"]:
@@ -21,6 +21,7 @@ from decimal import Decimal
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal
 from app.models.tb_item_association import TbItemAssociation
+from app.services import ranking_rollup_service
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -325,6 +326,9 @@ def sync_item_associations(
             else:
                 reconciliar_asociaciones_global(db_local, itema_ids_erp, comp_ids_erp, local_count_pre)
 
+        # es_combo del ranking (filtro incluir_combos) sale de esta tabla
+        ranking_rollup_service.refrescar_combos(db_local)
+
         # Commit final
         db_local.commit()
 
@@ -423,6 +427,9 @@ async def sync_item_associations_all(db: Session):
             comp_ids_erp = {r.get("comp_id", 1) for r in registros_erp if r.get("itema_id")}
             reconciliar_asociaciones_global(db, itema_ids, comp_ids_erp, local_count_pre)
 
+        # es_combo del ranking (filtro incluir_combos) sale de esta tabla
+        ranking_rollup_service.refrescar_combos(db)
+
         # Commit
         db.commit()
 
@@ -503,6 +510,9 @@ async def sync_item_associations_incremental(db: Session):
                 db.add(nuevo_registro)
                 total_nuevos += 1
 
+        # es_combo del ranking (filtro incluir_combos) sale de esta tabla
+        ranking_rollup_service.refrescar_combos(db)
+
         # Commit
         db.commit()
 
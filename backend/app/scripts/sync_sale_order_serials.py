@@ -178,10 +178,13 @@ def fetch_and_process(db: Session, params: dict) -> list[dict]:
     return normalized_data
 
 
-def _run_post_sync_hooks(db: Session) -> None:
+def _run_post_sync_hooks(db: Session, incremental: bool = False) -> None:
     """
     Hooks que corren después de un sync exitoso de tb_sale_order_serials.
 
+    Con `incremental=True` el matcher solo evalúa los prearmados con seriales
+    sincronizados (o modificados) desde su corrida anterior.
+
     Errores se loguean pero NO abortan el sync. Solo se invoca desde sync_full y
     sync_incremental — NO desde sync_by_filter (uso puntual de inspección).
     """
@@ -189,7 +192,7 @@ def _run_post_sync_hooks(db: Session) -> None:
         # Import local para evitar dependencias circulares
         from app.services.prearmado_matcher import match_prearmados_with_sales_orders
 
-        result = match_prearmados_with_sales_orders(db)
+        result = match_prearmados_with_sales_orders(db, incremental=incremental)
         print(
             f"✅ Post-sync matcher: matched={result['matched']}/"
             f"{result['total_checked']} errors={len(result['errors'])}"
@@ -308,7 +311,7 @@ def sync_incremental(db: Session, from_id: int | None = None) -> None:
     print("\n✅ Sincronización incremental finalizada")
     print(f"   Total actualizado: {total_procesado} registros")
 
-    _run_post_sync_hooks(db)
+    _run_post_sync_hooks(db, incremental=True)
 
 
 def sync_by_filter(db: Session, filter_name: str, filter_value: int) -> None:
@@ -8,10 +8,31 @@ Tablas sincronizadas:
 - tbSaleOrderHeaderHistory (historial de cabecera)
 - tbSaleOrderDetailHistory (historial de detalle)
 
+Detección de cambios:
+    Cada corrida re-descarga la ventana completa (`--days`), pero casi todo ya
+    está en la base sin cambios. Por eso cada fila guarda `sync_hash`, una
+    huella (blake2b) de lo que vino del ERP ya coercionado al tipo de la
+    columna. Por tabla:
+
+      1. Se mapea el lote entero y se calcula la huella de cada fila.
+      2. Se leen en bloque (por `soh_id`) las huellas actuales.
+      3. Sólo las filas nuevas o con huella distinta se escriben, con el
+         merge en bloque de `erp_sync_engine.cargar_lote` (COPY a staging +
+         INSERT ... ON CONFLICT en PostgreSQL), un commit por lote.
+
+    Las cuatro descargas al ERP corren en paralelo; el trabajo de base de
+    cada tabla va a un thread con su propia sesión. Cada tabla reporta
+    descargadas / cambiadas / escritas para ajustar la ventana.
+
+    Las columnas locales (`override_*` de la cabecera) no entran en la huella
+    ni en el merge. Si otro proceso reescribe estas tablas sin actualizar
+    `sync_hash`, `--forzar` ignora las huellas y reescribe toda la ventana.
+
 Ejecutar:
     python -m app.scripts.sync_sale_orders_all
     python -m app.scripts.sync_sale_orders_all --days 7
     python -m app.scripts.sync_sale_orders_all --days 1  # Solo hoy
+    python -m app.scripts.sync_sale_orders_all --forzar
 """
 
 import sys
@@ -30,19 +51,35 @@ if __name__ == "__main__":
     load_dotenv(dotenv_path=env_path)
 
 import argparse
-import httpx
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, date
+from typing import Any, Callable
+
+from sqlalchemy import Boolean, select
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.core.database import SessionLocal, get_background_db
+
+from app.core.database import get_background_db
+from app.core.http_clients import get_http_client
 from app.models.sale_order_header import SaleOrderHeader
 from app.models.sale_order_detail import SaleOrderDetail
 from app.models.sale_order_header_history import SaleOrderHeaderHistory
 from app.models.sale_order_detail_history import SaleOrderDetailHistory
+from app.services.erp_sync_engine import TableSpec, cargar_lote, coercion_para
+
+logger = logging.getLogger(__name__)
 
 # URL del endpoint gbp-parser
 GBP_PARSER_URL = "http://localhost:8002/api/gbp-parser"
 
+TIMEOUT_ERP = 300.0
+LOTE_ESCRITURA = 5000
+LOTE_HUELLAS = 1000  # soh_ids por SELECT de huellas
+
 
 def parse_dt(val: str | None) -> datetime | None:
     """Parse fecha del ERP. Soporta ISO format y US format con AM/PM."""
@@ -61,583 +98,362 @@ def parse_dt(val: str | None) -> datetime | None:
         return None
 
 
-async def sync_sale_order_header(db: Session, days: int = 7):
+# ------------------------------------------------------------------ mapeos
+
+
+def _datos_header(record: dict) -> dict:
+    """Datos principales + campos necesarios para traza/envíos."""
+    return {
+        "comp_id": record.get("comp_id"),
+        "bra_id": record.get("bra_id"),
+        "soh_id": record.get("soh_id"),
+        "soh_cd": parse_dt(record.get("soh_cd")),
+        "soh_deliverydate": parse_dt(record.get("soh_deliveryDate")),
+        "cust_id": record.get("cust_id"),
+        "sm_id": record.get("sm_id"),
+        "st_id": record.get("st_id"),
+        "soh_total": record.get("soh_total"),
+        "soh_quotation": record.get("soh_quotation"),
+        "soh_observation1": record.get("soh_observation1"),
+        "soh_observation2": record.get("soh_observation2"),
+        "soh_lastupdate": parse_dt(record.get("soh_lastUpdate")),
+        "mlo_id": record.get("mlo_id"),
+        "soh_mlid": record.get("soh_MLId"),
+        "soh_mlguia": record.get("soh_MLGUIA"),
+        "soh_internalannotation": record.get("soh_internalAnnotation"),
+        "prli_id": record.get("prli_id"),
+        "ssos_id": record.get("ssos_id"),
+        "df_id": record.get("df_id"),
+        "user_id": record.get("user_id"),
+        "stor_id": record.get("stor_id"),
+        "soh_deliveryaddress": record.get("soh_deliveryAddress"),
+        "soh_mldeliverylabel": record.get("soh_MLdeliveryLabel"),
+        # Campos de TiendaNube
+        "ws_internalid": record.get("ws_internalID"),
+        "tiendanube_number": record.get("tiendaNube_number"),
+        # Campo de ML shipping — necesario para cruzar estado ERP en envíos flex
+        "mlshippingid": record.get("MLShippingID"),
+    }
+
+
+def _datos_detail(record: dict) -> dict:
+    """Sólo columnas que EXISTEN en el modelo."""
+    return {
+        "comp_id": record.get("comp_id"),
+        "bra_id": record.get("bra_id"),
+        "soh_id": record.get("soh_id"),
+        "sod_id": record.get("sod_id"),
+        "item_id": record.get("item_id"),
+        "sod_qty": record.get("sod_qty"),
+        "sod_price": record.get("sod_price"),
+        "prli_id": record.get("prli_id"),
+        "sod_priority": record.get("sod_priority"),
+        "sod_detail": record.get("sod_detail"),
+        "curr_id": record.get("curr_id"),
+        "sod_initqty": record.get("sod_initqty"),
+        "stor_id": record.get("stor_id"),
+        "user_id": record.get("user_id"),
+        "sod_quotation": record.get("sod_quotation"),
+        "sod_itemdiscount": record.get("sod_itemdiscount"),
+        "sod_cost": record.get("sod_cost"),
+        "mlo_id": record.get("mlo_id"),
+        "sod_itemdesc": record.get("sod_itemdesc"),
+        "sod_discountbyitem": record.get("sod_discountbyitem"),
+        "sod_discountbytotal": record.get("sod_discountbytotal"),
+    }
+
+
+def _datos_header_history(record: dict) -> dict:
+    """Todas las columnas del JSON."""
+    return {
+        "comp_id": record.get("comp_id"),
+        "bra_id": record.get("bra_id"),
+        "soh_id": record.get("soh_id"),
+        "sohh_id": record.get("sohh_id"),
+        "sohh_typeofhistory": record.get("sohh_TypeOfHistory"),
+        "soh_cd": parse_dt(record.get("soh_cd")),
+        "soh_deliverydate": parse_dt(record.get("soh_deliveryDate")),
+        "soh_observation1": record.get("soh_observation1"),
+        "soh_observation2": record.get("soh_observation2"),
+        "soh_observation3": record.get("soh_observation3"),
+        "soh_observation4": record.get("soh_observation4"),
+        "soh_quotation": record.get("soh_quotation"),
+        "sm_id": record.get("sm_id"),
+        "cust_id": record.get("cust_id"),
+        "st_id": record.get("st_id"),
+        "disc_id": record.get("disc_id"),
+        "dl_id": record.get("dl_id"),
+        "soh_lastupdate": parse_dt(record.get("soh_lastUpdate")),
+        "soh_limitdate": parse_dt(record.get("soh_limitDate")),
+        "tt_id": record.get("tt_id"),
+        "tt_class": record.get("tt_class"),
+        "soh_statusof": record.get("soh_StatusOf"),
+        "user_id": record.get("user_id"),
+        "soh_isediting": record.get("soh_isEditing"),
+        "soh_iseditingcd": parse_dt(record.get("soh_isEditingCd")),
+        "df_id": record.get("df_id"),
+        "soh_total": record.get("soh_total"),
+        "ssos_id": record.get("ssos_id"),
+        "soh_exchangetocustomercurrency": record.get("soh_ExchangeToCustomerCurrency"),
+        "soh_customercurrency": record.get("soh_CustomerCurrency"),
+        "soh_discount": record.get("soh_discount"),
+        "soh_packagesqty": record.get("soh_packagesQty"),
+        "soh_internalannotation": record.get("soh_internalAnnotation"),
+        "curr_id4exchange": record.get("curr_id4Exchange"),
+        "curr_idexchange": record.get("curr_idExchange"),
+        "soh_atotal": record.get("soh_ATotal"),
+        "soh_incash": record.get("soh_inCash"),
+        "ct_transaction": record.get("ct_transaction"),
+        "sohh_cd": parse_dt(record.get("sohh_cd")),
+        "sohh_user_id": record.get("sohh_user_id"),
+        "soh_mlquestionsandanswers": record.get("soh_MLQuestionsAndAnswers"),
+        "soh_mlid": record.get("soh_MLId"),
+        "soh_mlguia": record.get("soh_MLGUIA"),
+        "ws_paymentgatewaystatusid": record.get("ws_paymentGateWayStatusID"),
+        "soh_deliveryaddress": record.get("soh_deliveryAddress"),
+        "stor_id": record.get("stor_id"),
+        "mlo_id": record.get("mlo_id"),
+        "soh_note4externaluse": record.get("soh_note4ExternalUse"),
+        "sohh_ispackingofpreinvoice": record.get("sohh_isPackingOfPreInvoice"),
+        "soh_uniqueid": record.get("soh_uniqueID"),
+    }
+
+
+def _datos_detail_history(record: dict) -> dict:
+    """Todas las columnas del JSON."""
+    return {
+        "comp_id": record.get("comp_id"),
+        "bra_id": record.get("bra_id"),
+        "soh_id": record.get("soh_id"),
+        "sohh_id": record.get("sohh_id"),
+        "sod_id": record.get("sod_id"),
+        "sod_priority": record.get("sod_priority"),
+        "item_id": record.get("item_id"),
+        "sod_itemdesc": record.get("sod_itemDesc"),
+        "sod_detail": record.get("sod_detail"),
+        "curr_id": record.get("curr_id"),
+        "sod_initqty": record.get("sod_initQty"),
+        "sod_qty": record.get("sod_qty"),
+        "prli_id": record.get("prli_id"),
+        "sod_price": record.get("sod_price"),
+        "stor_id": record.get("stor_id"),
+        "sod_lastupdate": parse_dt(record.get("sod_lastUpdate")),
+        "sod_isediting": record.get("sod_isEditing"),
+        "sod_insertdate": parse_dt(record.get("sod_insertDate")),
+        "user_id": record.get("user_id"),
+        "sod_cost": record.get("sod_cost"),
+        "sod_note2": record.get("sod_note2"),
+        "sod_itemdiscount": record.get("sod_itemDiscount"),
+        "sod_isparentassociate": record.get("sod_isParentAssociate"),
+        "sod_ismade": record.get("sod_isMade"),
+        "sod_expirationdate": parse_dt(record.get("sod_expirationDate")),
+        "sod_mlcost": record.get("sod_MLCost"),
+        "mlo_id": record.get("mlo_id"),
+        "sod_mecost": record.get("sod_MECost"),
+        "sod_mpcost": record.get("sod_MPCost"),
+        "sod_isdivided": record.get("sod_isDivided"),
+        "sod_isdivided_costcoeficient": record.get("sod_isDivided_costCoeficient"),
+    }
+
+
+# ------------------------------------------------------------------ tablas
+
+
+@dataclass(frozen=True)
+class TablaSaleOrders:
+    nombre: str
+    modelo: type
+    script: str  # strScriptLabel del gbp-parser
+    mapear: Callable[[dict], dict]
+    params_fecha: tuple[str, str] = ("updateFromDate", "updateToDate")
+
+    @property
+    def claves(self) -> tuple[str, ...]:
+        return tuple(c.name for c in self.modelo.__table__.primary_key.columns)
+
+    @property
+    def spec(self) -> TableSpec:
+        return TableSpec(modelo=self.modelo, script=self.script)
+
+
+TABLAS = (
+    TablaSaleOrders("Sale Order Header", SaleOrderHeader, "scriptSaleOrderHeader", _datos_header),
+    TablaSaleOrders("Sale Order Detail", SaleOrderDetail, "scriptSaleOrderDetail", _datos_detail),
+    TablaSaleOrders("Header History", SaleOrderHeaderHistory, "scriptSaleOrderHeaderHistory", _datos_header_history),
+    TablaSaleOrders(
+        "Detail History",
+        SaleOrderDetailHistory,
+        "scriptSaleOrderDetailHistory",
+        _datos_detail_history,
+        params_fecha=("fromDate", "toDate"),
+    ),
+)
+
+
+@dataclass
+class ResultadoTabla:
+    tabla: str
+    descargadas: int = 0
+    descartadas: int = 0  # sin clave completa
+    cambiadas: int = 0  # nuevas o con huella distinta
+    escritas: int = 0  # filas que el merge efectivamente insertó/actualizó
+    duracion_s: float = 0.0
+    error: str | None = None
+
+
+# ---------------------------------------------------------------- huellas
+
+
+def _coercion(columna) -> Callable[[Any], Any]:
+    coercion = coercion_para(columna.type)
+    if isinstance(columna.type, Boolean):
+        # to_bool convierte None en False; acá un NULL del ERP queda NULL
+        return lambda valor: None if valor is None else coercion(valor)
+    return coercion
+
+
+def normalizar(tabla: TablaSaleOrders, record: dict) -> dict:
+    """Mapea un registro del ERP y coerciona cada valor al tipo de su columna."""
+    columnas = tabla.modelo.__table__.c
+    return {nombre: _coercion(columnas[nombre])(valor) for nombre, valor in tabla.mapear(record).items()}
+
+
+def huella(datos: dict) -> str:
+    contenido = json.dumps(datos, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(contenido.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def huellas_actuales(db: Session, tabla: TablaSaleOrders, soh_ids: set) -> dict[tuple, str | None]:
+    """Huellas guardadas de todas las filas de esos pedidos, por clave primaria."""
+    modelo = tabla.modelo
+    columnas = [getattr(modelo, c) for c in tabla.claves]
+    actuales: dict[tuple, str | None] = {}
+    ids = sorted(soh_ids)
+    for i in range(0, len(ids), LOTE_HUELLAS):
+        filas = db.execute(select(*columnas, modelo.sync_hash).where(modelo.soh_id.in_(ids[i : i + LOTE_HUELLAS])))
+        for fila in filas:
+            actuales[tuple(fila[:-1])] = fila[-1]
+    return actuales
+
+
+def aplicar_registros(
+    db: Session, tabla: TablaSaleOrders, registros: list[dict], forzar: bool = False
+) -> ResultadoTabla:
     """
-    Sincroniza cabecera de órdenes de venta.
+    Escribe en bloque sólo las filas nuevas o cambiadas de `registros`.
 
     Args:
-        db: Sesión de base de datos
-        days: Días hacia atrás para sincronizar (default: 7 para ejecuciones frecuentes)
-
-    Returns:
-        tuple: (nuevos, actualizados, errores, set_soh_ids)
+        db: Sesión; se commitea una vez por lote escrito.
+        tabla: Tabla destino.
+        registros: Respuesta del gbp-parser (JSON crudo).
+        forzar: Ignorar las huellas guardadas y reescribir todo.
     """
-    print(f"  📋 Sale Order Header (últimos {days} días)...", end=" ", flush=True)
-
-    try:
-        # Fecha desde: día inicial a las 00:00:00
-        from_date = (date.today() - timedelta(days=days)).isoformat()
-        # Fecha hasta: día SIGUIENTE a las 00:00:00 (incluye todo el día de hoy)
-        to_date = (date.today() + timedelta(days=1)).isoformat()
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.get(
-                GBP_PARSER_URL,
-                params={
-                    "strScriptLabel": "scriptSaleOrderHeader",
-                    "updateFromDate": from_date,
-                    "updateToDate": to_date,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-
-        if not isinstance(data, list) or len(data) == 0:
-            print("✓ (sin datos)")
-            return (0, 0, 0)
-
-        nuevos = 0
-        actualizados = 0
-        errores = 0
-
-        for record in data:
-            try:
-                comp_id = record.get("comp_id")
-                bra_id = record.get("bra_id")
-                soh_id = record.get("soh_id")
-
-                if not all([comp_id, bra_id, soh_id]):
-                    errores += 1
-                    continue
-
-                # Buscar existente
-                existente = (
-                    db.query(SaleOrderHeader)
-                    .filter(
-                        and_(
-                            SaleOrderHeader.comp_id == comp_id,
-                            SaleOrderHeader.bra_id == bra_id,
-                            SaleOrderHeader.soh_id == soh_id,
-                        )
-                    )
-                    .first()
-                )
-
-                # Datos principales + campos necesarios para traza/envíos
-                datos = {
-                    "comp_id": comp_id,
-                    "bra_id": bra_id,
-                    "soh_id": soh_id,
-                    "soh_cd": parse_dt(record.get("soh_cd")),
-                    "soh_deliverydate": parse_dt(record.get("soh_deliveryDate")),
-                    "cust_id": record.get("cust_id"),
-                    "sm_id": record.get("sm_id"),
-                    "st_id": record.get("st_id"),
-                    "soh_total": record.get("soh_total"),
-                    "soh_quotation": record.get("soh_quotation"),
-                    "soh_observation1": record.get("soh_observation1"),
-                    "soh_observation2": record.get("soh_observation2"),
-                    "soh_lastupdate": parse_dt(record.get("soh_lastUpdate")),
-                    "mlo_id": record.get("mlo_id"),
-                    "soh_mlid": record.get("soh_MLId"),
-                    "soh_mlguia": record.get("soh_MLGUIA"),
-                    "soh_internalannotation": record.get("soh_internalAnnotation"),
-                    "prli_id": record.get("prli_id"),
-                    "ssos_id": record.get("ssos_id"),
-                    "df_id": record.get("df_id"),
-                    "user_id": record.get("user_id"),
-                    "stor_id": record.get("stor_id"),
-                    "soh_deliveryaddress": record.get("soh_deliveryAddress"),
-                    "soh_mldeliverylabel": record.get("soh_MLdeliveryLabel"),
-                    # Campos de TiendaNube
-                    "ws_internalid": record.get("ws_internalID"),
-                    "tiendanube_number": record.get("tiendaNube_number"),
-                    # Campo de ML shipping — necesario para cruzar estado ERP en envíos flex
-                    "mlshippingid": record.get("MLShippingID"),
-                }
-
-                if existente:
-                    for key, value in datos.items():
-                        setattr(existente, key, value)
-                    actualizados += 1
-                else:
-                    nuevo = SaleOrderHeader(**datos)
-                    db.add(nuevo)
-                    nuevos += 1
-
-                # Commit cada 500
-                if (nuevos + actualizados) % 500 == 0:
-                    db.commit()
-
-            except Exception as e:
-                errores += 1
-                if errores <= 5:
-                    print(f"\n  ⚠️  Error en registro: {str(e)}")
-                continue
-
+    resultado = ResultadoTabla(tabla=tabla.nombre, descargadas=len(registros))
+    por_clave: dict[tuple, dict] = {}
+    for record in registros:
+        datos = normalizar(tabla, record)
+        clave = tuple(datos[c] for c in tabla.claves)
+        if not all(clave):
+            resultado.descartadas += 1
+            continue
+        datos["sync_hash"] = huella(datos)
+        por_clave[clave] = datos  # el ERP puede repetir una fila: gana la última
+
+    actuales = {} if forzar else huellas_actuales(db, tabla, {clave[2] for clave in por_clave})
+    cambiadas = [datos for clave, datos in por_clave.items() if forzar or actuales.get(clave, "") != datos["sync_hash"]]
+    resultado.cambiadas = len(cambiadas)
+
+    for i in range(0, len(cambiadas), LOTE_ESCRITURA):
+        resultado.escritas += cargar_lote(db, tabla.spec, cambiadas[i : i + LOTE_ESCRITURA])
         db.commit()
-        print(f"✓ ({nuevos} nuevos, {actualizados} actualizados, {errores} errores)")
-        return (nuevos, actualizados, errores)
-
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        db.rollback()
-        return (0, 0, 0)
+    return resultado
 
 
-async def sync_sale_order_detail(db: Session, days: int = 7):
-    """
-    Sincroniza detalle de órdenes de venta.
+# ------------------------------------------------------------------- sync
 
-    Args:
-        db: Sesión de base de datos
-        days: Días hacia atrás para sincronizar (default: 7 para ejecuciones frecuentes)
-    """
-    print(f"  📋 Sale Order Detail (últimos {days} días)...", end=" ", flush=True)
 
-    try:
-        # Fecha desde: día inicial a las 00:00:00
-        from_date = (date.today() - timedelta(days=days)).isoformat()
-        # Fecha hasta: día SIGUIENTE a las 00:00:00 (incluye todo el día de hoy)
-        to_date = (date.today() + timedelta(days=1)).isoformat()
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.get(
-                GBP_PARSER_URL,
-                params={
-                    "strScriptLabel": "scriptSaleOrderDetail",
-                    "updateFromDate": from_date,
-                    "updateToDate": to_date,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-
-        if not isinstance(data, list) or len(data) == 0:
-            print("✓ (sin datos)")
-            return (0, 0, 0)
-
-        nuevos = 0
-        actualizados = 0
-        errores = 0
-        errores_por_tipo = {}
-
-        for record in data:
-            try:
-                comp_id = record.get("comp_id")
-                bra_id = record.get("bra_id")
-                soh_id = record.get("soh_id")
-                sod_id = record.get("sod_id")
-
-                if not all([comp_id, bra_id, soh_id, sod_id]):
-                    errores += 1
-                    error_key = "campos_null"
-                    errores_por_tipo[error_key] = errores_por_tipo.get(error_key, 0) + 1
-                    if errores <= 3:
-                        print(f"\n  ⚠️  PKs nulas: comp_id={comp_id}, bra_id={bra_id}, soh_id={soh_id}, sod_id={sod_id}")
-                    continue
-
-                existente = (
-                    db.query(SaleOrderDetail)
-                    .filter(
-                        and_(
-                            SaleOrderDetail.comp_id == comp_id,
-                            SaleOrderDetail.bra_id == bra_id,
-                            SaleOrderDetail.soh_id == soh_id,
-                            SaleOrderDetail.sod_id == sod_id,
-                        )
-                    )
-                    .first()
-                )
-
-                # Mapear solo columnas que EXISTEN en el modelo
-                datos = {
-                    "comp_id": comp_id,
-                    "bra_id": bra_id,
-                    "soh_id": soh_id,
-                    "sod_id": sod_id,
-                    "item_id": record.get("item_id"),
-                    "sod_qty": record.get("sod_qty"),
-                    "sod_price": record.get("sod_price"),
-                    "prli_id": record.get("prli_id"),
-                    "sod_priority": record.get("sod_priority"),
-                    "sod_detail": record.get("sod_detail"),
-                    "curr_id": record.get("curr_id"),
-                    "sod_initqty": record.get("sod_initqty"),
-                    "stor_id": record.get("stor_id"),
-                    "user_id": record.get("user_id"),
-                    "sod_quotation": record.get("sod_quotation"),
-                    "sod_itemdiscount": record.get("sod_itemdiscount"),
-                    "sod_cost": record.get("sod_cost"),
-                    "mlo_id": record.get("mlo_id"),
-                    "sod_itemdesc": record.get("sod_itemdesc"),
-                    "sod_discountbyitem": record.get("sod_discountbyitem"),
-                    "sod_discountbytotal": record.get("sod_discountbytotal"),
-                }
-
-                if existente:
-                    for key, value in datos.items():
-                        setattr(existente, key, value)
-                    actualizados += 1
-                else:
-                    nuevo = SaleOrderDetail(**datos)
-                    db.add(nuevo)
-                    nuevos += 1
-
-                # Commit cada 100 para detectar errores más rápido
-                if (nuevos + actualizados) % 100 == 0:
-                    try:
-                        db.commit()
-                    except Exception as commit_err:
-                        db.rollback()
-                        errores += 1
-                        error_key = type(commit_err).__name__
-                        errores_por_tipo[error_key] = errores_por_tipo.get(error_key, 0) + 1
-                        if errores <= 3:
-                            print(f"\n  ⚠️  Error en commit: {str(commit_err)[:100]}")
-
-            except Exception as e:
-                errores += 1
-                error_key = type(e).__name__
-                errores_por_tipo[error_key] = errores_por_tipo.get(error_key, 0) + 1
-                if errores <= 3:
-                    print(f"\n  ⚠️  Error: {str(e)[:100]}")
-                continue
-
-        try:
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            if errores_por_tipo:
-                print(f"\n  📊 Errores por tipo: {errores_por_tipo}")
-        print(f"✓ ({nuevos} nuevos, {actualizados} actualizados, {errores} errores)")
-        return (nuevos, actualizados, errores)
+async def descargar(tabla: TablaSaleOrders, days: int) -> list[dict]:
+    """Registros de la ventana desde el gbp-parser (de `days` días atrás a mañana 00:00)."""
+    # Fecha desde: día inicial a las 00:00:00
+    from_date = (date.today() - timedelta(days=days)).isoformat()
+    # Fecha hasta: día SIGUIENTE a las 00:00:00 (incluye todo el día de hoy)
+    to_date = (date.today() + timedelta(days=1)).isoformat()
+    desde, hasta = tabla.params_fecha
 
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        db.rollback()
-        return (0, 0, 0)
+    response = await get_http_client("erp").get(
+        GBP_PARSER_URL,
+        params={"strScriptLabel": tabla.script, desde: from_date, hasta: to_date},
+        timeout=TIMEOUT_ERP,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if not isinstance(data, list) or (data and "Column1" in data[0]):
+        return []  # sin datos / error del ERP: [{"Column1": "-9"}]
+    return data
 
 
-async def sync_sale_order_header_history(db: Session, days: int = 7):
-    """
-    Sincroniza historial de cabecera de órdenes.
+def _aplicar_en_sesion(tabla: TablaSaleOrders, registros: list[dict], forzar: bool) -> ResultadoTabla:
+    # Sesión corta por tabla: no retiene conexiones del pool durante la descarga
+    with get_background_db() as db:
+        return aplicar_registros(db, tabla, registros, forzar)
 
-    Args:
-        db: Sesión de base de datos
-        days: Días hacia atrás para sincronizar (default: 7 para ejecuciones frecuentes)
-    """
-    print(f"  📜 Sale Order Header History (últimos {days} días)...", end=" ", flush=True)
 
+async def sincronizar_tabla(tabla: TablaSaleOrders, days: int, forzar: bool = False) -> ResultadoTabla:
+    inicio = time.perf_counter()
     try:
-        # Fecha desde: día inicial a las 00:00:00
-        from_date = (date.today() - timedelta(days=days)).isoformat()
-        # Fecha hasta: día SIGUIENTE a las 00:00:00 (incluye todo el día de hoy)
-        to_date = (date.today() + timedelta(days=1)).isoformat()
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.get(
-                GBP_PARSER_URL,
-                params={
-                    "strScriptLabel": "scriptSaleOrderHeaderHistory",
-                    "updateFromDate": from_date,
-                    "updateToDate": to_date,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-
-        if not isinstance(data, list) or len(data) == 0:
-            print("✓ (sin datos)")
-            return (0, 0, 0)
-
-        nuevos = 0
-        actualizados = 0
-        errores = 0
-
-        for record in data:
-            try:
-                comp_id = record.get("comp_id")
-                bra_id = record.get("bra_id")
-                soh_id = record.get("soh_id")
-                sohh_id = record.get("sohh_id")
-
-                if not all([comp_id, bra_id, soh_id, sohh_id]):
-                    continue
-
-                existente = (
-                    db.query(SaleOrderHeaderHistory)
-                    .filter(
-                        and_(
-                            SaleOrderHeaderHistory.comp_id == comp_id,
-                            SaleOrderHeaderHistory.bra_id == bra_id,
-                            SaleOrderHeaderHistory.soh_id == soh_id,
-                            SaleOrderHeaderHistory.sohh_id == sohh_id,
-                        )
-                    )
-                    .first()
-                )
-
-                # Mapear TODAS las columnas del JSON al modelo
-                datos = {
-                    "comp_id": comp_id,
-                    "bra_id": bra_id,
-                    "soh_id": soh_id,
-                    "sohh_id": sohh_id,
-                    "sohh_typeofhistory": record.get("sohh_TypeOfHistory"),
-                    "soh_cd": parse_dt(record.get("soh_cd")),
-                    "soh_deliverydate": parse_dt(record.get("soh_deliveryDate")),
-                    "soh_observation1": record.get("soh_observation1"),
-                    "soh_observation2": record.get("soh_observation2"),
-                    "soh_observation3": record.get("soh_observation3"),
-                    "soh_observation4": record.get("soh_observation4"),
-                    "soh_quotation": record.get("soh_quotation"),
-                    "sm_id": record.get("sm_id"),
-                    "cust_id": record.get("cust_id"),
-                    "st_id": record.get("st_id"),
-                    "disc_id": record.get("disc_id"),
-                    "dl_id": record.get("dl_id"),
-                    "soh_lastupdate": parse_dt(record.get("soh_lastUpdate")),
-                    "soh_limitdate": parse_dt(record.get("soh_limitDate")),
-                    "tt_id": record.get("tt_id"),
-                    "tt_class": record.get("tt_class"),
-                    "soh_statusof": record.get("soh_StatusOf"),
-                    "user_id": record.get("user_id"),
-                    "soh_isediting": record.get("soh_isEditing"),
-                    "soh_iseditingcd": parse_dt(record.get("soh_isEditingCd")),
-                    "df_id": record.get("df_id"),
-                    "soh_total": record.get("soh_total"),
-                    "ssos_id": record.get("ssos_id"),
-                    "soh_exchangetocustomercurrency": record.get("soh_ExchangeToCustomerCurrency"),
-                    "soh_customercurrency": record.get("soh_CustomerCurrency"),
-                    "soh_discount": record.get("soh_discount"),
-                    "soh_packagesqty": record.get("soh_packagesQty"),
-                    "soh_internalannotation": record.get("soh_internalAnnotation"),
-                    "curr_id4exchange": record.get("curr_id4Exchange"),
-                    "curr_idexchange": record.get("curr_idExchange"),
-                    "soh_atotal": record.get("soh_ATotal"),
-                    "soh_incash": record.get("soh_inCash"),
-                    "ct_transaction": record.get("ct_transaction"),
-                    "sohh_cd": parse_dt(record.get("sohh_cd")),
-                    "sohh_user_id": record.get("sohh_user_id"),
-                    "soh_mlquestionsandanswers": record.get("soh_MLQuestionsAndAnswers"),
-                    "soh_mlid": record.get("soh_MLId"),
-                    "soh_mlguia": record.get("soh_MLGUIA"),
-                    "ws_paymentgatewaystatusid": record.get("ws_paymentGateWayStatusID"),
-                    "soh_deliveryaddress": record.get("soh_deliveryAddress"),
-                    "stor_id": record.get("stor_id"),
-                    "mlo_id": record.get("mlo_id"),
-                    "soh_note4externaluse": record.get("soh_note4ExternalUse"),
-                    "sohh_ispackingofpreinvoice": record.get("sohh_isPackingOfPreInvoice"),
-                    "soh_uniqueid": record.get("soh_uniqueID"),
-                }
-
-                if existente:
-                    for key, value in datos.items():
-                        setattr(existente, key, value)
-                    actualizados += 1
-                else:
-                    nuevo = SaleOrderHeaderHistory(**datos)
-                    db.add(nuevo)
-                    nuevos += 1
-
-                if (nuevos + actualizados) % 500 == 0:
-                    db.commit()
-
-            except Exception as e:
-                errores += 1
-                # Loggear primeros 10 errores Y cualquier error del pedido 10280
-                if errores <= 10 or soh_id == 10280:
-                    print(f"\n  ⚠️  Error en soh_id={soh_id}: {str(e)[:200]}")
-                continue
-
-        db.commit()
-        print(f"✓ ({nuevos} nuevos, {actualizados} actualizados)")
-        return (nuevos, actualizados, 0)
-
+        registros = await descargar(tabla, days)
+        resultado = await asyncio.to_thread(_aplicar_en_sesion, tabla, registros, forzar)
     except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        db.rollback()
-        return (0, 0, 0)
+        logger.exception("Sync %s falló", tabla.nombre)
+        resultado = ResultadoTabla(tabla=tabla.nombre, error=str(e)[:500])
+    resultado.duracion_s = time.perf_counter() - inicio
+    return resultado
 
 
-async def sync_sale_order_detail_history(db: Session, days: int = 7):
+async def main_async(days: int = 7, forzar: bool = False) -> list[ResultadoTabla]:
     """
-    Sincroniza historial de detalle de órdenes.
+    Función principal async: las cuatro tablas en paralelo.
 
     Args:
-        db: Sesión de base de datos
         days: Días hacia atrás para sincronizar (default: 7 para ejecuciones frecuentes)
-    """
-    print(f"  📜 Sale Order Detail History (últimos {days} días)...", end=" ", flush=True)
-
-    try:
-        # Fecha desde: día inicial a las 00:00:00
-        from_date = (date.today() - timedelta(days=days)).isoformat()
-        # Fecha hasta: día SIGUIENTE a las 00:00:00 (incluye todo el día de hoy)
-        to_date = (date.today() + timedelta(days=1)).isoformat()
-
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.get(
-                GBP_PARSER_URL,
-                params={"strScriptLabel": "scriptSaleOrderDetailHistory", "fromDate": from_date, "toDate": to_date},
-            )
-            response.raise_for_status()
-            data = response.json()
-
-        if not isinstance(data, list) or len(data) == 0:
-            print("✓ (sin datos)")
-            return (0, 0, 0)
-
-        nuevos = 0
-        actualizados = 0
-
-        for record in data:
-            try:
-                comp_id = record.get("comp_id")
-                bra_id = record.get("bra_id")
-                soh_id = record.get("soh_id")
-                sohh_id = record.get("sohh_id")
-                sod_id = record.get("sod_id")
-
-                if not all([comp_id, bra_id, soh_id, sohh_id, sod_id]):
-                    continue
-
-                existente = (
-                    db.query(SaleOrderDetailHistory)
-                    .filter(
-                        and_(
-                            SaleOrderDetailHistory.comp_id == comp_id,
-                            SaleOrderDetailHistory.bra_id == bra_id,
-                            SaleOrderDetailHistory.soh_id == soh_id,
-                            SaleOrderDetailHistory.sohh_id == sohh_id,
-                            SaleOrderDetailHistory.sod_id == sod_id,
-                        )
-                    )
-                    .first()
-                )
-
-                # Mapear TODAS las columnas del JSON al modelo
-                datos = {
-                    "comp_id": comp_id,
-                    "bra_id": bra_id,
-                    "soh_id": soh_id,
-                    "sohh_id": sohh_id,
-                    "sod_id": sod_id,
-                    "sod_priority": record.get("sod_priority"),
-                    "item_id": record.get("item_id"),
-                    "sod_itemdesc": record.get("sod_itemDesc"),
-                    "sod_detail": record.get("sod_detail"),
-                    "curr_id": record.get("curr_id"),
-                    "sod_initqty": record.get("sod_initQty"),
-                    "sod_qty": record.get("sod_qty"),
-                    "prli_id": record.get("prli_id"),
-                    "sod_price": record.get("sod_price"),
-                    "stor_id": record.get("stor_id"),
-                    "sod_lastupdate": parse_dt(record.get("sod_lastUpdate")),
-                    "sod_isediting": record.get("sod_isEditing"),
-                    "sod_insertdate": parse_dt(record.get("sod_insertDate")),
-                    "user_id": record.get("user_id"),
-                    "sod_cost": record.get("sod_cost"),
-                    "sod_note2": record.get("sod_note2"),
-                    "sod_itemdiscount": record.get("sod_itemDiscount"),
-                    "sod_isparentassociate": record.get("sod_isParentAssociate"),
-                    "sod_ismade": record.get("sod_isMade"),
-                    "sod_expirationdate": parse_dt(record.get("sod_expirationDate")),
-                    "sod_mlcost": record.get("sod_MLCost"),
-                    "mlo_id": record.get("mlo_id"),
-                    "sod_mecost": record.get("sod_MECost"),
-                    "sod_mpcost": record.get("sod_MPCost"),
-                    "sod_isdivided": record.get("sod_isDivided"),
-                    "sod_isdivided_costcoeficient": record.get("sod_isDivided_costCoeficient"),
-                }
-
-                if existente:
-                    for key, value in datos.items():
-                        setattr(existente, key, value)
-                    actualizados += 1
-                else:
-                    nuevo = SaleOrderDetailHistory(**datos)
-                    db.add(nuevo)
-                    nuevos += 1
-
-                if (nuevos + actualizados) % 500 == 0:
-                    db.commit()
-
-            except Exception as e:
-                if (nuevos + actualizados) < 5:
-                    print(f"\n  ⚠️  Error en registro: {str(e)[:100]}")
-                continue
+        forzar: Reescribir toda la ventana aunque las huellas coincidan
 
-        db.commit()
-        print(f"✓ ({nuevos} nuevos, {actualizados} actualizados)")
-        return (nuevos, actualizados, 0)
-
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        db.rollback()
-        return (0, 0, 0)
-
-
-async def main_async(days: int = 7):
-    """
-    Función principal async.
-
-    Cuando corre como background task dentro de uvicorn, usa get_background_db()
-    para abrir/cerrar una sesión por cada tabla — no retiene conexiones del pool
-    durante toda la sincronización.
-
-    Cuando corre como script standalone (python -m), usa SessionLocal() con
-    NullPool (detectado automáticamente por _is_script_context()).
+    Returns:
+        Un `ResultadoTabla` por tabla (descargadas / cambiadas / escritas).
 
-    Args:
-        days: Días hacia atrás para sincronizar (default: 7 para ejecuciones frecuentes)
+    Raises:
+        RuntimeError: si alguna tabla falló (las demás igual se sincronizan).
     """
-    from app.core.database import _is_script_context
-
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print("=" * 60)
     print(f"SYNC SALE ORDERS (últimos {days} días) - {timestamp}")
     print("=" * 60)
 
-    if _is_script_context():
-        # Script standalone: una sola sesión (NullPool, no compite con nadie)
-        db = SessionLocal()
-        try:
-            result_header = await sync_sale_order_header(db, days)
-            result_detail = await sync_sale_order_detail(db, days)
-            result_header_hist = await sync_sale_order_header_history(db, days)
-            result_detail_hist = await sync_sale_order_detail_history(db, days)
-        except Exception as e:
-            print(f"\n❌ Error durante la sincronización: {str(e)}")
-            import traceback
-
-            traceback.print_exc()
-            db.rollback()
-            sys.exit(1)
-        finally:
-            db.close()
-    else:
-        # Background task en uvicorn: sesión corta por tabla para no drenar el pool
-        with get_background_db() as db:
-            result_header = await sync_sale_order_header(db, days)
-
-        with get_background_db() as db:
-            result_detail = await sync_sale_order_detail(db, days)
-
-        with get_background_db() as db:
-            result_header_hist = await sync_sale_order_header_history(db, days)
-
-        with get_background_db() as db:
-            result_detail_hist = await sync_sale_order_detail_history(db, days)
-
-    print("\n" + "=" * 60)
+    resultados = await asyncio.gather(*(sincronizar_tabla(tabla, days, forzar) for tabla in TABLAS))
+
+    print(f"{'tabla':<20} | {'descargadas':>11} | {'cambiadas':>9} | {'escritas':>8} | {'seg':>6}")
+    print("-" * 66)
+    for r in resultados:
+        if r.error:
+            print(f"{r.tabla:<20} | ❌ {r.error}")
+            continue
+        print(f"{r.tabla:<20} | {r.descargadas:>11} | {r.cambiadas:>9} | {r.escritas:>8} | {r.duracion_s:>6.1f}")
+        logger.info(
+            "Sync %s (%d días): %d descargadas, %d descartadas, %d cambiadas, %d escritas en %.1fs",
+            r.tabla,
+            days,
+            r.descargadas,
+            r.descartadas,
+            r.cambiadas,
+            r.escritas,
+            r.duracion_s,
+        )
+
+    fallidas = [r.tabla for r in resultados if r.error]
+    if fallidas:
+        raise RuntimeError(f"Sync sale orders falló en: {', '.join(fallidas)}")
     print("✅ SINCRONIZACIÓN COMPLETADA")
-    print("=" * 60)
-    print(f"Sale Order Header: {result_header[0]} nuevos, {result_header[1]} actualizados")
-    print(f"Sale Order Detail: {result_detail[0]} nuevos, {result_detail[1]} actualizados")
-    print(f"Header History: {result_header_hist[0]} nuevos, {result_header_hist[1]} actualizados")
-    print(f"Detail History: {result_detail_hist[0]} nuevos, {result_detail_hist[1]} actualizados")
+    return list(resultados)
 
 
 def main():
@@ -648,11 +464,18 @@ def main():
         default=7,
         help="Días hacia atrás para sincronizar (default: 7 para ejecuciones cada 5-10 min)",
     )
+    parser.add_argument(
+        "--forzar",
+        action="store_true",
+        help="Ignorar las huellas (sync_hash) y reescribir toda la ventana",
+    )
     args = parser.parse_args()
 
-    import asyncio
-
-    asyncio.run(main_async(args.days))
+    try:
+        asyncio.run(main_async(args.days, args.forzar))
+    except RuntimeError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
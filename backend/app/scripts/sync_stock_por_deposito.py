@@ -19,6 +19,10 @@ Cron recomendado (diario fuera de horario pico, después de sync_ageing)::
 
 El timeout HTTP por depósito es 300 s (igual que ERP_FETCH_TIMEOUT en erp_sync).
 Errores por depósito individual se loguean y el script continúa con el siguiente.
+
+Cada lote también actualiza las filas por depósito del rollup del ranking
+(``ranking_item_deposito``) y al final se refresca el flag de combos, en la
+misma transacción.
 """
 
 import asyncio
@@ -40,6 +44,7 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.stock_por_deposito import StockPorDeposito
+from app.services import ranking_rollup_service
 
 logging.basicConfig(
     level=logging.INFO,
@@ -113,7 +118,7 @@ def _get_depot_ids(db: Session) -> list[int]:
 
 
 def _upsert_batch(db: Session, rows: list[dict]) -> None:
-    """Bulk-upsert a batch of rows into stock_por_deposito.
+    """Bulk-upsert a batch of rows into stock_por_deposito and the ranking rollup.
 
     Args:
         db: Active SQLAlchemy session (no autocommit).
@@ -130,6 +135,7 @@ def _upsert_batch(db: Session, rows: list[dict]) -> None:
         },
     )
     db.execute(stmt)
+    ranking_rollup_service.actualizar_stock(db, rows)
 
 
 # ---------------------------------------------------------------------------
@@ -193,6 +199,7 @@ async def run_sync() -> None:
             except RuntimeError as exc:
                 logger.error("❌ Error de formato para stor_id=%d: %s — continuando", stor_id, exc)
 
+        ranking_rollup_service.refrescar_combos(db)
         db.commit()
         logger.info("✅ Sync completado: %d filas upsertadas en total", grand_total)
 
@@ -9,14 +9,36 @@ Algoritmo:
    - Asignar al motoquero asociado a esa zona
 4. Crear registros en asignaciones_turbo
 5. Retornar resumen de asignaciones
+
+Índice de zonas (`IndiceZonas`): antes cada envío recorría todas las zonas y
+por cada una re-parseaba el GeoJSON, recalculaba el buffer y hacía
+`contains` (O(envíos × zonas) con la geometría reconstruida cada vez). Ahora
+las zonas se parsean y bufferean UNA vez, se preparan y se cargan en un
+STRtree; todos los puntos se clasifican en una sola consulta vectorizada
+(`STRtree.query(puntos, predicate="within")`). El índice se cachea por
+contenido de las zonas (id + polígono): se reconstruye sólo si cambian.
+
+Semántica idéntica a la versión punto a punto: buffer de 0.001°, `contains`
+estricto sobre el polígono expandido y, si un punto cae en varias zonas, gana
+la primera en el orden recibido. Zonas sin polígono o con GeoJSON inválido se
+ignoran (con log).
 """
 
+import json
 import logging
+import threading
 from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+import shapely
 from shapely.geometry import Point, shape
+from shapely.strtree import STRtree
 
 logger = logging.getLogger(__name__)
 
+# 0.001 grados ≈ 111 metros (suficiente para compensar puntos en el borde)
+BUFFER_GRADOS = 0.001
+
 
 def punto_en_poligono(lat: float, lng: float, poligono_geojson: Dict[str, Any]) -> bool:
     """
@@ -39,7 +61,7 @@ def punto_en_poligono(lat: float, lng: float, poligono_geojson: Dict[str, Any])
 
         # BUFFER: Expandir polígono levemente para incluir puntos en el borde
         # 0.001 grados ≈ 111 metros (suficiente para compensar puntos en el borde)
-        poligono_buffered = poligono.buffer(0.001)
+        poligono_buffered = poligono.buffer(BUFFER_GRADOS)
 
         # Verificar si el punto está dentro (usando polígono expandido)
         resultado = poligono_buffered.contains(punto)
@@ -54,6 +76,70 @@ def punto_en_poligono(lat: float, lng: float, poligono_geojson: Dict[str, Any])
         return False
 
 
+class IndiceZonas:
+    """Zonas parseadas, expandidas y preparadas, indexadas en un STRtree.
+
+    `clasificar` devuelve, por punto, la posición (en la lista de zonas con la
+    que se construyó el índice) de la primera zona que lo contiene, o -1.
+    """
+
+    def __init__(self, zonas: List[Dict[str, Any]]) -> None:
+        posiciones = []
+        geometrias = []
+        for posicion, zona in enumerate(zonas):
+            if "poligono" not in zona:
+                logger.warning(f"Zona {zona.get('id')} sin poligono definido")
+                continue
+            try:
+                geometria = shape(zona["poligono"]).buffer(BUFFER_GRADOS)
+            except Exception as e:
+                logger.error(f"Error parseando poligono de zona {zona.get('id')}: {e}")
+                continue
+            shapely.prepare(geometria)
+            posiciones.append(posicion)
+            geometrias.append(geometria)
+        self._posiciones = np.asarray(posiciones, dtype=np.int64)
+        self._arbol = STRtree(geometrias) if geometrias else None
+
+    def clasificar(self, lats: Any, lngs: Any) -> np.ndarray:
+        """Posición de la zona de cada punto, -1 si no cae en ninguna."""
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        resultado = np.full(len(lats), -1, dtype=np.int64)
+        if self._arbol is None or len(lats) == 0:
+            return resultado
+
+        # GeoJSON usa (lng, lat)
+        puntos = shapely.points(lngs, lats)
+        idx_puntos, idx_arbol = self._arbol.query(puntos, predicate="within")
+        if len(idx_puntos):
+            # Varias zonas para un punto → la primera en el orden recibido
+            sin_zona = len(self._posiciones)
+            primera = np.full(len(lats), sin_zona, dtype=np.int64)
+            np.minimum.at(primera, idx_puntos, idx_arbol)
+            con_zona = primera < sin_zona
+            resultado[con_zona] = self._posiciones[primera[con_zona]]
+        return resultado
+
+
+_cache_indice: Optional[Tuple[str, IndiceZonas]] = None
+_cache_lock = threading.Lock()
+
+
+def _huella_zonas(zonas: List[Dict[str, Any]]) -> str:
+    return json.dumps([[z.get("id"), z.get("poligono")] for z in zonas], sort_keys=True, default=str)
+
+
+def obtener_indice_zonas(zonas: List[Dict[str, Any]]) -> IndiceZonas:
+    """Índice para estas zonas; se reutiliza mientras ids, polígonos y orden no cambien."""
+    global _cache_indice
+    huella = _huella_zonas(zonas)
+    with _cache_lock:
+        if _cache_indice is None or _cache_indice[0] != huella:
+            _cache_indice = (huella, IndiceZonas(zonas))
+        return _cache_indice[1]
+
+
 def asignar_envio_a_zona(lat: float, lng: float, zonas: List[Dict[str, Any]]) -> Optional[int]:
     """
     Encuentra la zona que contiene un punto dado.
@@ -75,23 +161,11 @@ def asignar_envio_a_zona(lat: float, lng: float, zonas: List[Dict[str, Any]]) ->
     Returns:
         ID de la zona que contiene el punto, o None si no está en ninguna
     """
-    logger.debug(f"Buscando zona para punto: lat={lat}, lng={lng}")
-    logger.debug(f"Total zonas disponibles: {len(zonas)}")
-
-    for zona in zonas:
-        if "poligono" not in zona:
-            logger.warning(f"Zona {zona.get('id')} sin poligono definido")
-            continue
-
-        resultado = punto_en_poligono(lat, lng, zona["poligono"])
-        logger.debug(f"  Zona '{zona['nombre']}' (ID {zona['id']}): {'MATCH' if resultado else 'NO MATCH'}")
-
-        if resultado:
-            logger.info(f"Punto ({lat}, {lng}) encontrado en zona {zona['nombre']}")
-            return zona["id"]
-
-    logger.warning(f"Punto ({lat}, {lng}) NO esta en ninguna de las {len(zonas)} zonas")
-    return None
+    posicion = int(obtener_indice_zonas(zonas).clasificar([lat], [lng])[0])
+    if posicion < 0:
+        logger.warning(f"Punto ({lat}, {lng}) NO esta en ninguna de las {len(zonas)} zonas")
+        return None
+    return zonas[posicion]["id"]
 
 
 def asignar_envios_automaticamente(
@@ -134,27 +208,29 @@ def asignar_envios_automaticamente(
     asignaciones = []
     sin_zona = []
 
-    for mlshippingid, lat, lng in envios_coords:
-        zona_id = asignar_envio_a_zona(lat, lng, zonas_motoqueros)
-
-        if zona_id:
-            # Encontrar datos de la zona
-            zona = next((z for z in zonas_motoqueros if z["id"] == zona_id), None)
-
-            if zona and zona.get("motoquero_id"):
-                asignaciones.append(
-                    {
-                        "mlshippingid": mlshippingid,
-                        "zona_id": zona_id,
-                        "zona_nombre": zona["nombre"],
-                        "motoquero_id": zona["motoquero_id"],
-                        "motoquero_nombre": zona.get("motoquero_nombre", "Sin nombre"),
-                    }
-                )
-            else:
-                logger.warning(f"Zona {zona_id} sin motoquero asignado")
-                sin_zona.append(mlshippingid)
+    # Clasificación de todos los puntos en una sola pasada sobre el índice
+    posiciones = obtener_indice_zonas(zonas_motoqueros).clasificar(
+        [lat for _, lat, _ in envios_coords], [lng for _, _, lng in envios_coords]
+    )
+
+    for (mlshippingid, _lat, _lng), posicion in zip(envios_coords, posiciones):
+        if posicion < 0:
+            sin_zona.append(mlshippingid)
+            continue
+
+        zona = zonas_motoqueros[posicion]
+        if zona.get("motoquero_id"):
+            asignaciones.append(
+                {
+                    "mlshippingid": mlshippingid,
+                    "zona_id": zona["id"],
+                    "zona_nombre": zona["nombre"],
+                    "motoquero_id": zona["motoquero_id"],
+                    "motoquero_nombre": zona.get("motoquero_nombre", "Sin nombre"),
+                }
+            )
         else:
+            logger.warning(f"Zona {zona['id']} sin motoquero asignado")
             sin_zona.append(mlshippingid)
 
     resultado = {
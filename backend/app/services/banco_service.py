@@ -20,6 +20,7 @@ from sqlalchemy.orm import Session, joinedload
 
 from app.models.banco_empresa import BancoEmpresa
 from app.models.banco_movimiento import BancoMovimiento
+from app.services.saldos_service import LIBRO_BANCO, recalcular_saldos
 
 # Sentinel: distinguishes "not passed" from "explicitly passed as None"
 _UNSET = object()
@@ -275,31 +276,16 @@ class BancoService:
         )
         return items, total, summary
 
-    def recalcular_saldo(self, banco_id: int) -> Decimal:
+    def recalcular_saldo(self, banco_id: int, desde: Optional[tuple[date, int]] = None) -> Decimal:
         """Repair utility: recomputes saldo_actual and corrects saldo_posterior snapshots.
 
         This is the ONE sanctioned exception to the append-only invariant — it
         mutates saldo_posterior on existing rows to correct drift caused by manual
         DB fixes or data-import errors. It MUST NOT be called in the normal
         payment flow; it is a controlled reconciliation tool only.
+
+        Only movements from `desde` = (fecha, id) onward are rewritten (None →
+        the whole account), in one window-function UPDATE (see saldos_service).
         """
         banco = self.obtener_banco(banco_id)
-        saldo = Decimal(str(banco.saldo_inicial))
-
-        movimientos = (
-            self.db.query(BancoMovimiento)
-            .filter(BancoMovimiento.banco_id == banco_id)
-            .order_by(BancoMovimiento.fecha.asc(), BancoMovimiento.id.asc())
-            .all()
-        )
-        for mov in movimientos:
-            monto = Decimal(str(mov.monto))
-            if mov.tipo == "ingreso":
-                saldo += monto
-            else:
-                saldo -= monto
-            mov.saldo_posterior = saldo
-
-        banco.saldo_actual = saldo
-        self.db.flush()
-        return saldo
+        return recalcular_saldos(self.db, LIBRO_BANCO, banco, desde)
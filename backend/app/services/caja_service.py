@@ -32,6 +32,7 @@ from app.models.caja import (
     CajaTag,
     CajaTipoDocumento,
 )
+from app.services.saldos_service import LIBRO_CAJA, recalcular_saldos
 
 # Allowed MIME types for file uploads
 ALLOWED_MIME_TYPES = {
@@ -285,28 +286,10 @@ class CajaService:
 
         return items, total, summary
 
-    def recalcular_saldo(self, caja_id: int) -> Decimal:
-        """Recalcula saldo_actual desde saldo_inicial + todos los movimientos."""
+    def recalcular_saldo(self, caja_id: int, desde: Optional[tuple[date, int]] = None) -> Decimal:
+        """Recalcula saldo_posterior desde `desde` = (fecha, id) en adelante (None → todos) y saldo_actual."""
         caja = self.obtener_caja(caja_id)
-        saldo = Decimal(str(caja.saldo_inicial))
-
-        movimientos = (
-            self.db.query(CajaMovimiento)
-            .filter(CajaMovimiento.caja_id == caja_id)
-            .order_by(CajaMovimiento.fecha.asc(), CajaMovimiento.id.asc())
-            .all()
-        )
-        for mov in movimientos:
-            monto = Decimal(str(mov.monto))
-            if mov.tipo == "ingreso":
-                saldo += monto
-            else:
-                saldo -= monto
-            mov.saldo_posterior = saldo
-
-        caja.saldo_actual = saldo
-        self.db.flush()
-        return saldo
+        return recalcular_saldos(self.db, LIBRO_CAJA, caja, desde)
 
     # ──────────────────────────────────────────────
     # Categorías
@@ -16,6 +16,7 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models.caja import Caja, CajaMovimiento
 from app.models.empresa import Empresa
+from app.services.saldos_service import LIBRO_CAJA, recalcular_saldos
 
 # Tab name → caja metadata.
 SHEET_TAB_MAPPING: dict[str, dict] = {
@@ -262,6 +263,7 @@ class CajaSheetsSync:
         if new_movements:
             # Sort chronologically for proper balance calculation
             new_movements.sort(key=lambda m: (m["fecha"], 0))
+            nuevos = []
             for mov_data in new_movements:
                 mov = CajaMovimiento(
                     caja_id=mov_data["caja_id"],
@@ -272,30 +274,17 @@ class CajaSheetsSync:
                     saldo_posterior=Decimal("0"),  # will be recalculated
                     origen=mov_data["origen"],
                 )
-                self.db.add(mov)
+                nuevos.append(mov)
+            self.db.add_all(nuevos)
             self.db.flush()
             result.nuevas += len(new_movements)
 
-            # Recalculate running balance for the entire caja
-            self._recalculate_balance(caja)
+            # Recalculate the running balance from the earliest new movement onward
+            self._recalculate_balance(caja, desde=min((m.fecha, m.id) for m in nuevos))
 
-    def _recalculate_balance(self, caja: Caja) -> None:
-        """Recalculates saldo_posterior for all movements and updates caja.saldo_actual."""
-        saldo = Decimal(str(caja.saldo_inicial))
-        movimientos = (
-            self.db.query(CajaMovimiento)
-            .filter(CajaMovimiento.caja_id == caja.id)
-            .order_by(CajaMovimiento.fecha.asc(), CajaMovimiento.id.asc())
-            .all()
-        )
-        for mov in movimientos:
-            monto = Decimal(str(mov.monto))
-            if mov.tipo == "ingreso":
-                saldo += monto
-            else:
-                saldo -= monto
-            mov.saldo_posterior = saldo
-        caja.saldo_actual = saldo
+    def _recalculate_balance(self, caja: Caja, desde: Optional[tuple[date, int]] = None) -> None:
+        """Recalculates saldo_posterior from `desde` = (fecha, id) onward and updates caja.saldo_actual."""
+        recalcular_saldos(self.db, LIBRO_CAJA, caja, desde)
 
     @staticmethod
     def _parse_fecha(fecha_str: str, default_year: int = 2023) -> tuple[Optional[date], bool]:
@@ -14,6 +14,14 @@ F2 cubre:
 `aplicar_imputacion` (disparado desde imputaciones_service) va en F4.
 `reconciliar_diario` (cron diario vs snapshot ERP) va en F3 (COMPRAS-3.6).
 
+Saldos mantenidos:
+    `insertar_mov` actualiza `cc_proveedor_saldos` (saldo por proveedor,
+    empresa y moneda) con un upsert en la misma transacción que el INSERT del
+    movimiento. `reconciliar_diario` arma mayor vs snapshot ERP para todos los
+    proveedores en UN query agrupado (antes era un `calcular_saldo_por_moneda`
+    + una lectura de snapshot por proveedor), y `verificar_saldos_mantenidos`
+    compara los saldos mantenidos contra el mayor también en un solo query.
+
 Responsabilidad del caller:
   - Apertura/cierre de transacción.
   - Invocar al service dentro de la misma tx que el origen (OP, imputación,
@@ -31,12 +39,15 @@ from decimal import Decimal
 from typing import TYPE_CHECKING, Final, Literal, Optional
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, case, func, select, text
+from sqlalchemy import and_, case, func, literal, select, union_all
 from sqlalchemy.orm import Session
 
+from app.core.database import insert_on_conflict
 from app.core.logging import get_logger
 from app.models.cc_proveedor_movimiento import CCProveedorMovimiento
+from app.models.cc_proveedor_saldo import CCProveedorSaldo
 from app.models.cc_reconciliacion_log import CCReconciliacionLog
+from app.models.cuenta_corriente_proveedor import CuentaCorrienteProveedor
 from app.models.imputacion import Imputacion
 from app.models.tipo_cambio import TipoCambio
 
@@ -152,6 +163,53 @@ def _validar_entrada_mov(
 # ──────────────────────────────────────────────────────────────────────────
 
 
+def _importe_signado():
+    """Importe con signo de un movimiento: debe +, haber −, ajuste signo_ajuste × monto."""
+    return case(
+        (CCProveedorMovimiento.tipo == "debe", CCProveedorMovimiento.monto),
+        (CCProveedorMovimiento.tipo == "haber", -CCProveedorMovimiento.monto),
+        (
+            CCProveedorMovimiento.tipo == "ajuste",
+            CCProveedorMovimiento.signo_ajuste * CCProveedorMovimiento.monto,
+        ),
+        else_=0,
+    )
+
+
+def _actualizar_saldo_mantenido(session: Session, mov: CCProveedorMovimiento) -> None:
+    """
+    Suma `mov` al saldo de `cc_proveedor_saldos` (upsert atómico por PK).
+
+    Corre en la tx del caller: si el origen rollbackea, el saldo también.
+    """
+    if mov.tipo == "debe":
+        importe = mov.monto
+    elif mov.tipo == "haber":
+        importe = -mov.monto
+    else:
+        importe = mov.signo_ajuste * mov.monto
+
+    stmt = insert_on_conflict(session, CCProveedorSaldo).values(
+        proveedor_id=mov.proveedor_id,
+        empresa_id=mov.empresa_id,
+        moneda=mov.moneda,
+        saldo=importe,
+        movimientos=1,
+        ultimo_movimiento_id=mov.id,
+    )
+    tabla = CCProveedorSaldo.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["proveedor_id", "empresa_id", "moneda"],
+        set_={
+            "saldo": tabla.saldo + stmt.excluded.saldo,
+            "movimientos": tabla.movimientos + 1,
+            "ultimo_movimiento_id": stmt.excluded.ultimo_movimiento_id,
+            "actualizado_at": func.now(),
+        },
+    )
+    session.execute(stmt)
+
+
 def insertar_mov(
     session: Session,
     *,
@@ -197,7 +255,8 @@ def insertar_mov(
         signo_ajuste: requerido solo si tipo='ajuste'.
 
     Returns:
-        El `CCProveedorMovimiento` recién insertado con `id` asignado.
+        El `CCProveedorMovimiento` recién insertado con `id` asignado. El saldo
+        de `cc_proveedor_saldos` ya incluye el movimiento.
 
     Raises:
         HTTPException 400 por cualquiera de las validaciones.
@@ -231,6 +290,7 @@ def insertar_mov(
     )
     session.add(mov)
     session.flush()
+    _actualizar_saldo_mantenido(session, mov)
 
     logger.info(
         "cc_mov_creado id=%s proveedor_id=%s empresa_id=%s tipo=%s monto=%s %s origen=%s:%s",
@@ -535,15 +595,7 @@ def calcular_saldo_por_moneda(
         Signo: saldo positivo → le debo al proveedor; negativo → el
         proveedor me debe (saldo a favor).
     """
-    importe_signado = case(
-        (CCProveedorMovimiento.tipo == "debe", CCProveedorMovimiento.monto),
-        (CCProveedorMovimiento.tipo == "haber", -CCProveedorMovimiento.monto),
-        (
-            CCProveedorMovimiento.tipo == "ajuste",
-            CCProveedorMovimiento.signo_ajuste * CCProveedorMovimiento.monto,
-        ),
-        else_=0,
-    )
+    importe_signado = _importe_signado()
 
     condiciones = [CCProveedorMovimiento.proveedor_id == proveedor_id]
     if empresa_id is not None:
@@ -602,6 +654,17 @@ def listar_movimientos(
     return list(session.execute(stmt).scalars().all())
 
 
+def _stmt_proveedores_recientes(*, ventana_dias: int, hasta_fecha: date):
+    """SELECT DISTINCT proveedor_id con movimientos en `[hasta_fecha - ventana_dias, hasta_fecha]`."""
+    desde = hasta_fecha.replace() if hasta_fecha else date.today()
+    return (
+        select(CCProveedorMovimiento.proveedor_id)
+        .where(CCProveedorMovimiento.fecha_movimiento >= _fecha_menos_dias(desde, ventana_dias))
+        .where(CCProveedorMovimiento.fecha_movimiento <= desde)
+        .distinct()
+    )
+
+
 def _proveedores_con_movimientos_recientes(
     session: Session,
     *,
@@ -613,15 +676,10 @@ def _proveedores_con_movimientos_recientes(
     `cc_proveedor_movimientos` dentro de la ventana
     `[hasta_fecha - ventana_dias, hasta_fecha]`.
 
-    Usado por `reconciliar_diario` para no procesar proveedores inactivos.
+    Usado por el tablero de reconciliación; `reconciliar_diario` usa el mismo
+    filtro como subquery.
     """
-    desde = hasta_fecha.replace() if hasta_fecha else date.today()
-    stmt = (
-        select(CCProveedorMovimiento.proveedor_id)
-        .where(CCProveedorMovimiento.fecha_movimiento >= _fecha_menos_dias(desde, ventana_dias))
-        .where(CCProveedorMovimiento.fecha_movimiento <= desde)
-        .distinct()
-    )
+    stmt = _stmt_proveedores_recientes(ventana_dias=ventana_dias, hasta_fecha=hasta_fecha)
     return [row[0] for row in session.execute(stmt).all()]
 
 
@@ -631,47 +689,146 @@ def _fecha_menos_dias(base: date, dias: int) -> date:
     return base - timedelta(days=dias)
 
 
-def _leer_snapshot_cc(
-    session: Session,
-    *,
-    proveedor_id: int,
-    moneda: str,
-) -> Optional[Decimal]:
+def _snapshots_cc():
     """
-    Lee el saldo pendiente del snapshot `cuentas_corrientes_proveedores`
-    del ERP para `(proveedor_id, moneda)`.
+    Subquery `(proveedor_id, moneda, pendiente)` con el último snapshot de
+    `cuentas_corrientes_proveedores` (ERP) por proveedor.
 
     El modelo actual (`cuenta_corriente_proveedor`) NO tiene columna
     `moneda` — el ERP sincroniza saldos totales por proveedor. Para v1,
     usamos:
       - ARS → columna `pendiente` (asumimos que el snapshot ya está en ARS
         al ser importado).
-      - USD → `None` (el snapshot no diferencia moneda; si hay saldo USD,
+      - USD → sin fila (el snapshot no diferencia moneda; si hay saldo USD,
         hay que esperar a que el ERP sincronice esa columna).
 
     Esta función es el UNICO lugar donde se define la política de mapeo
     snapshot → moneda, así que cuando el ERP agregue el split puede
     actualizarse acá sin tocar `reconciliar_diario`.
     """
-    if moneda != "ARS":
-        return None
+    ultimo = (
+        select(
+            CuentaCorrienteProveedor.id_proveedor.label("proveedor_id"),
+            CuentaCorrienteProveedor.pendiente.label("pendiente"),
+            func.row_number()
+            .over(
+                partition_by=CuentaCorrienteProveedor.id_proveedor,
+                order_by=(CuentaCorrienteProveedor.synced_at.desc(), CuentaCorrienteProveedor.id.desc()),
+            )
+            .label("orden"),
+        )
+    ).subquery("cc_erp_ordenado")
+    return (
+        select(ultimo.c.proveedor_id, literal("ARS").label("moneda"), ultimo.c.pendiente)
+        .where(ultimo.c.orden == 1)
+        .subquery("cc_erp_snapshot")
+    )
+
 
-    # Query directo (el modelo usa `id_proveedor`, no `proveedor_id`).
-    stmt = text(
-        """
-        SELECT pendiente
-        FROM cuentas_corrientes_proveedores
-        WHERE id_proveedor = :pid
-        ORDER BY synced_at DESC
-        LIMIT 1
-        """
+def _saldos_mayor_vs_snapshot(
+    session: Session,
+    *,
+    fecha_corrida: date,
+    ventana_dias: int,
+) -> list[tuple[int, str, Decimal, Optional[Decimal]]]:
+    """
+    `(proveedor_id, moneda, saldo_mayor, saldo_snapshot)` de todos los
+    proveedores activos en un solo query: el mayor agrupado por
+    (proveedor, moneda) hasta `fecha_corrida` + LEFT JOIN al último snapshot.
+    `saldo_snapshot` es None cuando no hay con qué comparar.
+    """
+    mayor = (
+        select(
+            CCProveedorMovimiento.proveedor_id.label("proveedor_id"),
+            CCProveedorMovimiento.moneda.label("moneda"),
+            func.coalesce(func.sum(_importe_signado()), 0).label("saldo"),
+        )
+        .where(
+            CCProveedorMovimiento.fecha_movimiento <= fecha_corrida,
+            CCProveedorMovimiento.proveedor_id.in_(
+                _stmt_proveedores_recientes(ventana_dias=ventana_dias, hasta_fecha=fecha_corrida)
+            ),
+        )
+        .group_by(CCProveedorMovimiento.proveedor_id, CCProveedorMovimiento.moneda)
+        .subquery("mayor")
     )
-    valor = session.execute(stmt, {"pid": proveedor_id}).scalar_one_or_none()
-    if valor is None:
-        return None
+    snap = _snapshots_cc()
+    stmt = (
+        select(mayor.c.proveedor_id, mayor.c.moneda, mayor.c.saldo, snap.c.pendiente)
+        .select_from(mayor)
+        .outerjoin(
+            snap,
+            and_(snap.c.proveedor_id == mayor.c.proveedor_id, snap.c.moneda == mayor.c.moneda),
+        )
+        .order_by(mayor.c.proveedor_id, mayor.c.moneda)
+    )
+    return [
+        (prov_id, moneda, _a_decimal(saldo), None if pendiente is None else _a_decimal(pendiente))
+        for prov_id, moneda, saldo, pendiente in session.execute(stmt).all()
+    ]
+
+
+def _a_decimal(valor) -> Decimal:
     return valor if isinstance(valor, Decimal) else Decimal(str(valor))
 
 
+def verificar_saldos_mantenidos(session: Session) -> list[dict]:
+    """
+    Compara `cc_proveedor_saldos` contra el libro mayor en un solo query.
+
+    UNION ALL de (mayor agrupado, saldos mantenidos con signo opuesto) y
+    GROUP BY (proveedor, empresa, moneda) HAVING suma ≠ 0 o cantidad ≠ 0: sólo
+    vuelven las claves desfasadas (incluye claves que existen de un solo lado).
+
+    Returns:
+        Lista de dicts `proveedor_id, empresa_id, moneda, saldo_mayor,
+        saldo_mantenido, diferencia` (vacía si todo cuadra).
+    """
+    mov = CCProveedorMovimiento
+    cero = literal(0)
+    lados = union_all(
+        select(
+            mov.proveedor_id.label("proveedor_id"),
+            mov.empresa_id.label("empresa_id"),
+            mov.moneda.label("moneda"),
+            func.sum(_importe_signado()).label("saldo_mayor"),
+            cero.label("saldo_mantenido"),
+            func.count().label("cantidad"),
+        ).group_by(mov.proveedor_id, mov.empresa_id, mov.moneda),
+        select(
+            CCProveedorSaldo.proveedor_id,
+            CCProveedorSaldo.empresa_id,
+            CCProveedorSaldo.moneda,
+            cero,
+            CCProveedorSaldo.saldo,
+            -CCProveedorSaldo.movimientos,
+        ),
+    ).subquery("lados")
+
+    saldo_mayor = func.sum(lados.c.saldo_mayor)
+    saldo_mantenido = func.sum(lados.c.saldo_mantenido)
+    stmt = (
+        select(lados.c.proveedor_id, lados.c.empresa_id, lados.c.moneda, saldo_mayor, saldo_mantenido)
+        .group_by(lados.c.proveedor_id, lados.c.empresa_id, lados.c.moneda)
+        .having((saldo_mayor != saldo_mantenido) | (func.sum(lados.c.cantidad) != 0))
+        .order_by(lados.c.proveedor_id, lados.c.empresa_id, lados.c.moneda)
+    )
+    desfasados = []
+    for prov_id, empresa_id, moneda, mayor, mantenido in session.execute(stmt).all():
+        mayor, mantenido = _a_decimal(mayor), _a_decimal(mantenido)
+        desfasados.append(
+            {
+                "proveedor_id": prov_id,
+                "empresa_id": empresa_id,
+                "moneda": moneda,
+                "saldo_mayor": mayor,
+                "saldo_mantenido": mantenido,
+                "diferencia": mayor - mantenido,
+            }
+        )
+    return desfasados
+
+
 def reconciliar_diario(
     session: Session,
     *,
@@ -683,10 +840,10 @@ def reconciliar_diario(
     Cron diario de reconciliación CC libro mayor vs snapshot ERP (design §8.2).
 
     Flujo:
-      1. Lista proveedores con mov en últimos `ventana_dias` días.
+      1. Un solo query trae, para los proveedores con mov en los últimos
+         `ventana_dias` días, el saldo del mayor por (proveedor, moneda)
+         hasta `fecha_corrida` y el último snapshot ERP (`_snapshots_cc`).
       2. Por cada (proveedor, moneda_con_mov):
-         - `saldo_mayor = calcular_saldo_por_moneda(proveedor_id=p)[moneda]`
-         - `saldo_snap = leer_snapshot_cc(p, moneda)`
          - Si `saldo_snap is None` → skip (no hay con qué comparar).
          - `diferencia = abs(saldo_mayor - saldo_snap)`
          - `tolerancia = tolerancias[moneda]` (cierre 2 del usuario:
@@ -725,46 +882,34 @@ def reconciliar_diario(
     if not {"ARS", "USD"}.issubset(tolerancias.keys()):
         raise ValueError(f"tolerancias debe incluir claves 'ARS' y 'USD' (recibidas: {set(tolerancias.keys())})")
 
-    proveedores_ids = _proveedores_con_movimientos_recientes(
-        session,
-        ventana_dias=ventana_dias,
-        hasta_fecha=fecha_corrida,
-    )
+    filas = _saldos_mayor_vs_snapshot(session, fecha_corrida=fecha_corrida, ventana_dias=ventana_dias)
+    proveedores_ids = {prov_id for prov_id, _, _, _ in filas}
 
     divergencias_logs: list[CCReconciliacionLog] = []
     comparaciones = 0
 
-    for prov_id in proveedores_ids:
-        saldos = calcular_saldo_por_moneda(
-            session,
+    for prov_id, moneda, saldo_mayor, saldo_snap in filas:
+        if saldo_snap is None:
+            continue  # sin snapshot para comparar
+
+        comparaciones += 1
+        diferencia = abs(saldo_mayor - saldo_snap)
+        tolerancia = tolerancias.get(moneda, Decimal("0"))
+        estado = CCReconciliacionLog.ESTADO_OK if diferencia <= tolerancia else CCReconciliacionLog.ESTADO_DIVERGENCIA
+
+        log = CCReconciliacionLog(
+            fecha_corrida=fecha_corrida,
             proveedor_id=prov_id,
-            hasta_fecha=fecha_corrida,
+            moneda=moneda,
+            saldo_libro_mayor=saldo_mayor,
+            saldo_snapshot=saldo_snap,
+            diferencia=diferencia,
+            tolerancia_aplicada=tolerancia,
+            estado=estado,
         )
-        for moneda, saldo_mayor in saldos.items():
-            saldo_snap = _leer_snapshot_cc(session, proveedor_id=prov_id, moneda=moneda)
-            if saldo_snap is None:
-                continue  # sin snapshot para comparar
-
-            comparaciones += 1
-            diferencia = abs(Decimal(saldo_mayor) - Decimal(saldo_snap))
-            tolerancia = tolerancias.get(moneda, Decimal("0"))
-            estado = (
-                CCReconciliacionLog.ESTADO_OK if diferencia <= tolerancia else CCReconciliacionLog.ESTADO_DIVERGENCIA
-            )
-
-            log = CCReconciliacionLog(
-                fecha_corrida=fecha_corrida,
-                proveedor_id=prov_id,
-                moneda=moneda,
-                saldo_libro_mayor=saldo_mayor,
-                saldo_snapshot=saldo_snap,
-                diferencia=diferencia,
-                tolerancia_aplicada=tolerancia,
-                estado=estado,
-            )
-            session.add(log)
-            if estado == CCReconciliacionLog.ESTADO_DIVERGENCIA:
-                divergencias_logs.append(log)
+        session.add(log)
+        if estado == CCReconciliacionLog.ESTADO_DIVERGENCIA:
+            divergencias_logs.append(log)
 
     # Flush para que las logs entries tengan PK antes de armar alertas/notifs
     session.flush()
@@ -0,0 +1,438 @@
+"""Motor declarativo de sync de tablas del ERP.
+
+Contexto: cada `app/scripts/sync_*` mapeaba a mano decenas de campos JSON con
+sus propios `to_int` / `to_decimal` / `parse_date`, armaba un objeto ORM por
+fila y calculaba su "último id" con `func.max(...)`. Full e incremental eran
+scripts distintos y el costo dominante era el INSERT fila por fila.
+
+Decisión: una tabla se describe con un `TableSpec` (modelo, script del
+gbp-parser, clave natural, columna watermark, política de upsert, renombres)
+y `sincronizar()` hace siempre lo mismo:
+
+  1. Lee el watermark de `erp_sync_state` (bootstrap: `max(columna)` de la
+     tabla). En modo full no hay watermark: mismo camino, sin el parámetro.
+  2. Consume el gbp-parser en modo NDJSON (`ERPWorkerClient.stream_rows`):
+     las filas se procesan mientras baja la respuesta.
+  3. Mapea y coerciona cada fila según el TIPO de la columna del modelo
+     (Integer → int, Numeric → Decimal, Boolean, DateTime, Date, UUID,
+     String). El campo del ERP se matchea por nombre sin distinguir
+     mayúsculas; `renombres` cubre las excepciones.
+  4. Por lote: dedup por clave (gana la última), y en PostgreSQL `COPY` a una
+     tabla temporal de staging (creada y descartada dentro de la transacción
+     del lote) + un único `INSERT ... SELECT ... ON CONFLICT`
+     (DO UPDATE sólo si algo cambió, o DO NOTHING). En otros dialectos
+     (SQLite en tests) el mismo merge con un executemany.
+  5. El watermark nuevo (máximo del lote) y el estado se escriben en la misma
+     transacción que el lote: un corte a mitad de sync no pierde ni duplica.
+
+Las specs viven en `app.services.erp_sync_specs`; el CLI es
+`python -m app.scripts.erp_sync <tabla> [--full]`.
+"""
+
+import io
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterable, Callable, Iterable, Optional, Union
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, String, Text, Uuid, func, select
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Session
+
+from app.core.database import insert_on_conflict
+from app.models.erp_sync_state import ERPSyncState
+from app.services.erp_worker_client import erp_worker_client
+
+logger = logging.getLogger(__name__)
+
+MODO_FULL = "full"
+MODO_INCREMENTAL = "incremental"
+
+POLITICA_UPSERT = "upsert"  # ON CONFLICT DO UPDATE (sólo si cambió algo)
+POLITICA_INSERT = "insert"  # ON CONFLICT DO NOTHING (tablas append-only)
+
+LOTE_DEFAULT = 5000
+TIMEOUT_ERP = 120.0  # lectura entre chunks del stream
+
+
+# ---------------------------------------------------------------- coerción
+
+
+def to_int(value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            numero = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(numero) if numero.is_integer() else None
+
+
+def to_decimal(value: Any) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    try:
+        numero = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return numero if numero.is_finite() else None
+
+
+def to_float(value: Any) -> Optional[float]:
+    numero = to_decimal(value)
+    return float(numero) if numero is not None else None
+
+
+def to_bool(value: Any) -> bool:
+    """Mismo criterio que los scripts: None / no reconocido → False."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "t")
+    return False
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def to_date(value: Any) -> Optional[date]:
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    parsed = to_datetime(value)
+    return parsed.date() if parsed else None
+
+
+def to_uuid(value: Any) -> Optional[uuid.UUID]:
+    if not value:
+        return None
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def to_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def coercion_para(tipo: Any) -> Callable[[Any], Any]:
+    """Función de coerción según el tipo SQLAlchemy de la columna."""
+    if isinstance(tipo, Boolean):
+        return to_bool
+    if isinstance(tipo, Integer):
+        return to_int
+    if isinstance(tipo, Float):
+        return to_float
+    if isinstance(tipo, Numeric):
+        return to_decimal
+    if isinstance(tipo, DateTime):
+        return to_datetime
+    if isinstance(tipo, Date):
+        return to_date
+    if isinstance(tipo, (PG_UUID, Uuid)):
+        return to_uuid
+    if isinstance(tipo, (String, Text)):
+        return to_str
+    return lambda value: value
+
+
+# -------------------------------------------------------------------- spec
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """Descripción declarativa de una tabla espejo del ERP."""
+
+    modelo: type
+    script: str  # strScriptLabel del gbp-parser
+    clave: tuple[str, ...] = ()  # clave natural; default: PK del modelo
+    watermark: Optional[str] = None  # columna monótona; None → siempre full
+    watermark_param: Optional[str] = None  # parámetro del script que recibe el watermark
+    politica: str = POLITICA_UPSERT
+    renombres: dict[str, str] = field(default_factory=dict)  # campo ERP → columna
+    excluir: tuple[str, ...] = ("created_at", "updated_at")  # columnas que no vienen del ERP
+    params: dict[str, Any] = field(default_factory=dict)  # parámetros fijos del script
+    lote: int = LOTE_DEFAULT
+
+    @property
+    def tabla(self) -> str:
+        return self.modelo.__table__.name
+
+    @property
+    def claves(self) -> tuple[str, ...]:
+        return self.clave or tuple(c.name for c in self.modelo.__table__.primary_key.columns)
+
+    def columnas(self) -> list[tuple[str, str, Callable[[Any], Any]]]:
+        """(columna, campo ERP en minúsculas, coerción) para cada columna sincronizada."""
+        por_columna = {columna: campo.lower() for campo, columna in self.renombres.items()}
+        return [
+            (c.name, por_columna.get(c.name, c.name.lower()), coercion_para(c.type))
+            for c in self.modelo.__table__.columns
+            if c.name not in self.excluir
+        ]
+
+
+@dataclass
+class ResultadoSync:
+    tabla: str
+    modo: str
+    leidas: int = 0
+    escritas: int = 0  # insertadas + actualizadas (sin contar las que no cambiaron)
+    descartadas: int = 0  # sin clave
+    lotes: int = 0
+    watermark_inicial: Any = None
+    watermark_final: Any = None
+    duracion_s: float = 0.0
+
+    @property
+    def filas_por_segundo(self) -> float:
+        return self.leidas / self.duracion_s if self.duracion_s else 0.0
+
+
+def es_error_erp(fila: Any) -> bool:
+    """Respuesta "sin datos" / error del ERP: [{"Column1": "-9"}] o similar."""
+    return isinstance(fila, dict) and "Column1" in fila
+
+
+def mapear_fila(fila: dict[str, Any], columnas: list[tuple[str, str, Callable[[Any], Any]]]) -> dict[str, Any]:
+    por_campo = {k.lower(): v for k, v in fila.items()}
+    return {columna: coercion(por_campo.get(campo)) for columna, campo, coercion in columnas}
+
+
+# -------------------------------------------------------------- watermarks
+
+
+def leer_watermark(db: Session, spec: TableSpec) -> Any:
+    """Watermark persistido; si no hay, el máximo actual de la columna."""
+    if not spec.watermark:
+        return None
+    coercion = coercion_para(spec.modelo.__table__.c[spec.watermark].type)
+    estado = db.get(ERPSyncState, spec.tabla)
+    if estado is not None and estado.watermark is not None:
+        return coercion(estado.watermark)
+    return db.execute(select(func.max(spec.modelo.__table__.c[spec.watermark]))).scalar()
+
+
+def _guardar_estado(db: Session, spec: TableSpec, **campos: Any) -> None:
+    estado = db.get(ERPSyncState, spec.tabla)
+    if estado is None:
+        estado = ERPSyncState(tabla=spec.tabla)
+        db.add(estado)
+    if "watermark" in campos:
+        valor = campos.pop("watermark")
+        estado.watermark = valor.isoformat() if isinstance(valor, (date, datetime)) else to_str(valor)
+    for nombre, valor in campos.items():
+        setattr(estado, nombre, valor)
+
+
+# ------------------------------------------------------------------- merge
+
+
+def _campo_csv(valor: Any) -> str:
+    """Campo CSV de COPY: NULL = vacío sin comillas; texto siempre entre comillas."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, (int, float, Decimal)):
+        return str(valor)
+    texto = valor.isoformat() if isinstance(valor, (datetime, date)) else str(valor)
+    return '"' + texto.replace("\x00", "").replace('"', '""') + '"'
+
+
+def lote_a_csv(filas: list[dict[str, Any]], columnas: list[str]) -> io.StringIO:
+    """Lote en el formato CSV de `COPY ... WITH (FORMAT csv)`."""
+    buffer = io.StringIO()
+    for fila in filas:
+        buffer.write(",".join(_campo_csv(fila[c]) for c in columnas))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def sql_merge(spec: TableSpec, columnas: list[str], staging: str) -> str:
+    """INSERT ... SELECT desde staging con la política de conflicto de la spec."""
+    tabla = spec.modelo.__table__
+    lista = ", ".join(f'"{c}"' for c in columnas)
+    conflicto = ", ".join(f'"{c}"' for c in spec.claves)
+    sql = f'INSERT INTO "{tabla.name}" ({lista}) SELECT {lista} FROM "{staging}" ON CONFLICT ({conflicto}) '
+    actualizables = [c for c in columnas if c not in spec.claves]
+    if spec.politica == POLITICA_INSERT or not actualizables:
+        return sql + "DO NOTHING"
+    asignaciones = [f'"{c}" = EXCLUDED."{c}"' for c in actualizables]
+    if "updated_at" in tabla.c and "updated_at" not in columnas:
+        asignaciones.append('"updated_at" = now()')
+    actuales = ", ".join(f'"{tabla.name}"."{c}"' for c in actualizables)
+    nuevos = ", ".join(f'EXCLUDED."{c}"' for c in actualizables)
+    return sql + f"DO UPDATE SET {', '.join(asignaciones)} WHERE ({actuales}) IS DISTINCT FROM ({nuevos})"
+
+
+def _merge_postgres(db: Session, spec: TableSpec, filas: list[dict[str, Any]], columnas: list[str]) -> int:
+    # La staging nace y muere en la transacción del lote (ON COMMIT DROP) y con
+    # nombre único: con PgBouncer en modo transacción cada transacción puede caer
+    # en otra conexión de servidor, así que no se asume afinidad de sesión.
+    staging = f"_stg_{spec.tabla}_{uuid.uuid4().hex[:12]}"
+    conn = db.connection()
+    conn.exec_driver_sql(f'CREATE TEMP TABLE "{staging}" (LIKE "{spec.tabla}" INCLUDING DEFAULTS) ON COMMIT DROP')
+    lista = ", ".join(f'"{c}"' for c in columnas)
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY "{staging}" ({lista}) FROM STDIN WITH (FORMAT csv)', lote_a_csv(filas, columnas))
+    return conn.exec_driver_sql(sql_merge(spec, columnas, staging)).rowcount
+
+
+def _merge_generico(db: Session, spec: TableSpec, filas: list[dict[str, Any]], columnas: list[str]) -> int:
+    stmt = insert_on_conflict(db, spec.modelo.__table__)
+    actualizables = [c for c in columnas if c not in spec.claves]
+    if spec.politica == POLITICA_INSERT or not actualizables:
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(spec.claves))
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(spec.claves), set_={c: stmt.excluded[c] for c in actualizables}
+        )
+    db.execute(stmt, filas)
+    return len(filas)
+
+
+def cargar_lote(db: Session, spec: TableSpec, filas: list[dict[str, Any]]) -> int:
+    """Mergea un lote ya mapeado (sin commit). Devuelve filas escritas."""
+    if not filas:
+        return 0
+    # Dedup por clave: ON CONFLICT no admite la misma clave dos veces por sentencia
+    unicas = list({tuple(f[c] for c in spec.claves): f for f in filas}.values())
+    columnas = list(unicas[0])
+    if db.get_bind().dialect.name == "postgresql":
+        return _merge_postgres(db, spec, unicas, columnas)
+    return _merge_generico(db, spec, unicas, columnas)
+
+
+# --------------------------------------------------------------------- sync
+
+
+async def _iterar(filas: Union[AsyncIterable[dict], Iterable[dict]]):
+    if hasattr(filas, "__aiter__"):
+        async for fila in filas:
+            yield fila
+    else:
+        for fila in filas:
+            yield fila
+
+
+async def sincronizar(
+    db: Session,
+    spec: TableSpec,
+    modo: str = MODO_INCREMENTAL,
+    filas: Optional[Union[AsyncIterable[dict], Iterable[dict]]] = None,
+) -> ResultadoSync:
+    """Sincroniza una tabla (full o incremental: mismo camino).
+
+    Args:
+        db: Sesión; se commitea una vez por lote.
+        spec: Descripción de la tabla.
+        modo: "incremental" (desde el watermark) o "full".
+        filas: Fuente de filas del ERP; por defecto el gbp-parser en modo NDJSON.
+    """
+    inicio = time.perf_counter()
+    watermark = leer_watermark(db, spec) if modo == MODO_INCREMENTAL else None
+    resultado = ResultadoSync(tabla=spec.tabla, modo=modo, watermark_inicial=watermark, watermark_final=watermark)
+
+    if filas is None:
+        params = dict(spec.params)
+        if watermark is not None and spec.watermark_param:
+            params[spec.watermark_param] = watermark.isoformat() if isinstance(watermark, date) else watermark
+        filas = erp_worker_client.stream_rows(spec.script, params, timeout=TIMEOUT_ERP)
+
+    columnas = spec.columnas()
+    claves = spec.claves
+    pendientes: list[dict[str, Any]] = []
+
+    def _flush() -> None:
+        if not pendientes:
+            return
+        resultado.escritas += cargar_lote(db, spec, pendientes)
+        resultado.lotes += 1
+        if spec.watermark:
+            valores = [f[spec.watermark] for f in pendientes if f[spec.watermark] is not None]
+            if valores and (resultado.watermark_final is None or max(valores) > resultado.watermark_final):
+                resultado.watermark_final = max(valores)
+        _guardar_estado(
+            db,
+            spec,
+            watermark=resultado.watermark_final,
+            modo=modo,
+            estado="en_curso",
+            filas=resultado.escritas,
+            error=None,
+        )
+        db.commit()
+        pendientes.clear()
+
+    try:
+        primera = True
+        async for fila in _iterar(filas):
+            if primera:
+                primera = False
+                if es_error_erp(fila):
+                    break
+            resultado.leidas += 1
+            mapeada = mapear_fila(fila, columnas)
+            if any(mapeada[c] is None for c in claves):
+                resultado.descartadas += 1
+                continue
+            pendientes.append(mapeada)
+            if len(pendientes) >= spec.lote:
+                _flush()
+        _flush()
+    except Exception as e:
+        db.rollback()
+        resultado.duracion_s = time.perf_counter() - inicio
+        _guardar_estado(db, spec, modo=modo, estado="error", duracion_s=resultado.duracion_s, error=str(e)[:2000])
+        db.commit()
+        logger.exception("Sync %s (%s) falló tras %d lotes", spec.tabla, modo, resultado.lotes)
+        raise
+
+    resultado.duracion_s = time.perf_counter() - inicio
+    _guardar_estado(
+        db,
+        spec,
+        watermark=resultado.watermark_final,
+        modo=modo,
+        estado="ok",
+        filas=resultado.escritas,
+        duracion_s=resultado.duracion_s,
+        error=None,
+    )
+    db.commit()
+    logger.info(
+        "Sync %s (%s): %d leídas, %d escritas, %d descartadas, %d lotes, %.0f filas/s, watermark %s → %s",
+        spec.tabla,
+        modo,
+        resultado.leidas,
+        resultado.escritas,
+        resultado.descartadas,
+        resultado.lotes,
+        resultado.filas_por_segundo,
+        resultado.watermark_inicial,
+        resultado.watermark_final,
+    )
+    return resultado
@@ -0,0 +1,35 @@
+"""Specs de las tablas sincronizadas con `app.services.erp_sync_engine`.
+
+Para sumar una tabla alcanza con agregar su `TableSpec` acá: el mapeo de
+campos sale de las columnas del modelo (mismo nombre que el campo del ERP sin
+distinguir mayúsculas) y `renombres` cubre los campos del ERP con otro nombre.
+
+Alcance: por ahora sólo `item_transactions` y `suppliers` pasan por el motor.
+El resto de los `app/scripts/sync_*` sigue con su lógica propia y se migra de
+a una tabla, validando el mapeo contra el ERP real antes de retirar el script
+(varios hacen más que un upsert: borrados, filtros por compañía, tablas
+derivadas).
+"""
+
+from app.models.item_transaction import ItemTransaction
+from app.models.tb_supplier import TBSupplier
+from app.services.erp_sync_engine import TableSpec
+
+SPECS: dict[str, TableSpec] = {
+    "item_transactions": TableSpec(
+        modelo=ItemTransaction,
+        script="scriptItemTransaction",
+        watermark="it_transaction",
+        watermark_param="itTransaction",
+        renombres={
+            "it_priceWithOutOthers": "it_pricewithoothers",
+            "it_isFromPCConfigCTRLId": "it_isfrompconfigctrlid",
+            "it_disablePrintInEmmition": "it_disableprintinemission",
+        },
+    ),
+    "suppliers": TableSpec(
+        modelo=TBSupplier,
+        script="scriptSupplier",
+        renombres={"supp_taxNumber": "supp_tax_number"},
+    ),
+}
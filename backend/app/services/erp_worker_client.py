@@ -2,10 +2,15 @@
 Cliente para consumir los endpoints del Cloudflare Worker del ERP
 """
 
-import httpx
-from typing import Optional, List, Dict, Any
+import json
+from typing import Optional, List, Dict, Any, AsyncIterator
 from datetime import date
 from app.core.config import settings
+from app.core.http_clients import get_http_client
+
+
+class ERPStreamError(Exception):
+    """El gbp-parser cortó un stream NDJSON a la mitad (línea `truncated`)."""
 
 
 class ERPWorkerClient:
@@ -30,10 +35,45 @@ class ERPWorkerClient:
         if params:
             query_params.update(params)
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(self.base_url, params=query_params)
+        client = get_http_client("erp")
+        response = await client.get(self.base_url, params=query_params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_rows(
+        self, script_label: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Igual que `_fetch`, pero en modo NDJSON: devuelve las filas a medida que
+        el gbp-parser las va parseando, sin esperar la respuesta completa.
+
+        Pensado para syncs grandes, que pueden ir insertando/commiteando
+        mientras baja la descarga.
+
+        Args:
+            script_label: Nombre del script a ejecutar (ej: scriptItemTransaction)
+            params: Parámetros opcionales para el query
+            timeout: Timeout de lectura entre chunks (default: self.timeout)
+
+        Raises:
+            ERPStreamError: si el stream se cortó con un error del lado del parser
+        """
+        query_params = {"strScriptLabel": script_label, "format": "ndjson"}
+        if params:
+            query_params.update(params)
+
+        client = get_http_client("erp")
+        async with client.stream(
+            "GET", self.base_url, params=query_params, timeout=timeout or self.timeout
+        ) as response:
             response.raise_for_status()
-            return response.json()
+            async for linea in response.aiter_lines():
+                if not linea:
+                    continue
+                fila = json.loads(linea)
+                if isinstance(fila, dict) and fila.get("truncated"):
+                    raise ERPStreamError(fila.get("error"))
+                yield fila
 
     async def get_brands(self, brand_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,397 @@
+"""
+Export jobs — exports a Excel fuera del request, con archivos cacheados.
+
+Problema:
+    `/exportar-vista-actual`, `/exportar-web-transferencia`,
+    `/ventas-ml/exportar-operaciones`, etc. generaban el archivo dentro del
+    request: una conexión del pool y un thread de Starlette ocupados durante
+    toda la generación, y el mismo export pedido dos veces se calculaba dos
+    veces aunque los datos no hubieran cambiado.
+
+Decisión técnica:
+    - `POST /api/exports/{tipo}` crea un `ExportJob` y lo encola en un
+      `ThreadPoolExecutor` propio (`EXPORT_JOBS_WORKERS` threads, cada uno con
+      su sesión): el request vuelve enseguida con el id del job.
+    - El job llama al MISMO endpoint de siempre (`TIPOS` mapea tipo →
+      función) con los parámetros guardados; los endpoints devuelven una
+      `RespuestaXlsx` que conserva las hojas, y acá se escriben a disco con
+      `stream_xlsx` (memoria constante, ver app/utils/xlsx_stream.py). No hay
+      una segunda implementación de cada export.
+    - Progreso por SSE en el canal del usuario `exports:progress:<usuario_id>`
+      ({job_id, tipo, estado, filas}) cada `FILAS_POR_LOTE_DB` filas y en cada
+      cambio de estado. routers/sse.py sólo deja suscribirse al canal propio.
+    - El archivo queda en `EXPORTS_CACHE_DIR/{clave}_{job}.xlsx`, con
+      `clave = sha256(tipo, parámetros, usuario, versión de datos)`. El usuario
+      entra en la clave porque varios exports filtran por sus marcas/permisos.
+    - Versión de datos = contadores por dominio en Redis
+      (`exports:version:{dominio}`, los incrementa
+      app/events/export_cache_hooks.py tras cada commit que escribió un modelo
+      del dominio) + el último `sync_job_runs.fin` que procesó filas (los syncs
+      del ERP escriben por SQL crudo, sin hooks). Si cambian, la clave cambia y
+      el archivo viejo deja de encontrarse.
+    - Un `POST` con la misma clave que un job `listo` (dentro de
+      `EXPORTS_CACHE_TTL_MINUTES` y con el archivo en disco) devuelve ese job
+      sin generar nada; uno con la misma clave todavía en curso devuelve el job
+      en curso (no se encolan dos iguales).
+    - Si Redis no responde no hay versión confiable: el job corre igual pero
+      no reutiliza ni se reutiliza (fail-open, como reference_cache). El TTL
+      acota lo que una invalidación perdida puede servir viejo.
+
+Cada proceso uvicorn tiene su pool; el estado vive en `export_jobs` y el
+archivo en disco, así que el GET/descarga puede caer en cualquier worker.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any, Callable, Iterable, Optional
+from uuid import uuid4
+
+import redis
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter
+from pydantic.fields import FieldInfo
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.sse import sse_publish_bg
+from app.models.export_job import ExportJob
+from app.models.sync_job_run import SyncJobRun
+from app.models.usuario import Usuario
+from app.utils.xlsx_stream import FILAS_POR_LOTE_DB, RespuestaXlsx, stream_xlsx
+
+logger = logging.getLogger(__name__)
+
+CANAL_SSE = "exports:progress"  # prefijo: el canal real es por usuario (canal_sse)
+_CLAVE_VERSION = "exports:version:{}"
+_ARGS_INYECTADOS = ("db", "current_user")
+
+ESTADOS_EN_CURSO = ("pendiente", "corriendo")
+
+
+@dataclass(frozen=True)
+class TipoExport:
+    """Export disponible como job: endpoint a invocar ("modulo:funcion") y dominios de datos que lee."""
+
+    endpoint: str
+    dominios: tuple[str, ...]
+
+    def funcion(self) -> Callable[..., Any]:
+        modulo, nombre = self.endpoint.split(":")
+        return getattr(importlib.import_module(modulo), nombre)
+
+
+_PRODUCTOS = "app.api.endpoints.productos_export"
+
+TIPOS: dict[str, TipoExport] = {
+    "vista-actual": TipoExport(f"{_PRODUCTOS}:exportar_vista_actual", ("productos",)),
+    "web-transferencia": TipoExport(f"{_PRODUCTOS}:exportar_web_transferencia", ("productos",)),
+    "clasica": TipoExport(f"{_PRODUCTOS}:exportar_clasica", ("productos",)),
+    "rebate": TipoExport(f"{_PRODUCTOS}:exportar_rebate", ("productos",)),
+    "lista-gremio": TipoExport(f"{_PRODUCTOS}:exportar_lista_gremio", ("productos",)),
+    "lista-sugerido": TipoExport(f"{_PRODUCTOS}:exportar_lista_sugerido", ("productos",)),
+    "lista-web-transferencia": TipoExport(f"{_PRODUCTOS}:exportar_lista_web_transferencia", ("productos",)),
+    "operaciones-ml": TipoExport("app.api.endpoints.ventas_ml:exportar_operaciones", ("ventas_ml",)),
+}
+
+
+# ───────────────────────── Versión de datos ─────────────────────────
+
+_client: Optional[redis.Redis] = None
+
+
+def _get_client() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.25,  # fail-open, mismos timeouts que reference_cache
+            socket_timeout=0.25,
+        )
+    return _client
+
+
+def _set_client_for_tests(client: Optional[redis.Redis]) -> None:
+    """Test seam: fakeredis, o None para volver al cliente real."""
+    global _client
+    _client = client
+
+
+def incrementar_versiones(dominios: Iterable[str]) -> None:
+    """Invalida los exports cacheados de `dominios`. Best-effort (lo llaman los hooks tras commit)."""
+    try:
+        client = _get_client()
+        for dominio in sorted(set(dominios)):
+            client.incr(_CLAVE_VERSION.format(dominio))
+    except redis.RedisError as exc:
+        logger.warning("No se pudo incrementar la versión de exports %s: %s", sorted(set(dominios)), exc)
+
+
+def version_datos(db: Session, dominios: tuple[str, ...]) -> Optional[str]:
+    """
+    Huella de los datos que lee un export. None si Redis no responde (no se
+    puede saber si cambiaron → no se cachea).
+    """
+    try:
+        contadores = _get_client().mget([_CLAVE_VERSION.format(d) for d in dominios])
+    except redis.RedisError as exc:
+        logger.warning("Versión de exports no disponible, se genera sin cache: %s", exc)
+        return None
+
+    ultimo_sync = db.execute(
+        select(func.max(SyncJobRun.fin)).where(or_(SyncJobRun.filas.is_(None), SyncJobRun.filas != 0))
+    ).scalar()
+    partes = [f"{d}={int(c or 0)}" for d, c in zip(dominios, contadores)]
+    partes.append(f"sync={ultimo_sync.isoformat() if ultimo_sync else '-'}")
+    return ";".join(partes)
+
+
+def clave_export(tipo: str, parametros: dict, usuario_id: int, version: Optional[str]) -> str:
+    base = json.dumps(
+        {"tipo": tipo, "parametros": parametros, "usuario": usuario_id, "version": version},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(base.encode()).hexdigest()
+
+
+# ───────────────────────── Parámetros ─────────────────────────
+
+
+def argumentos_endpoint(funcion: Callable[..., Any], parametros: dict) -> dict[str, Any]:
+    """
+    kwargs para llamar al endpoint fuera de FastAPI: cada parámetro sale de
+    `parametros` (validado contra su anotación) o de su default (`Query(...)`
+    incluido). Un parámetro que es un modelo pydantic (body) se arma con todo
+    `parametros`. `db` / `current_user` los agrega el caller.
+
+    Raises:
+        ValueError: parámetro desconocido, faltante o con tipo inválido.
+    """
+    firma = inspect.signature(funcion)
+    anotaciones = typing.get_type_hints(funcion)
+    kwargs: dict[str, Any] = {}
+    con_body = False
+
+    for nombre, param in firma.parameters.items():
+        if nombre in _ARGS_INYECTADOS:
+            continue
+        anotacion = anotaciones.get(nombre, Any)
+        if isinstance(anotacion, type) and issubclass(anotacion, BaseModel):
+            kwargs[nombre] = anotacion.model_validate(parametros)
+            con_body = True
+            continue
+
+        default = param.default
+        requerido = default is inspect.Parameter.empty
+        if isinstance(default, FieldInfo):
+            requerido = default.is_required()
+            default = None if requerido else default.get_default(call_default_factory=True)
+
+        if nombre in parametros:
+            kwargs[nombre] = TypeAdapter(anotacion).validate_python(parametros[nombre])
+        elif requerido:
+            raise ValueError(f"Falta el parámetro '{nombre}'")
+        else:
+            kwargs[nombre] = default
+
+    desconocidos = set(parametros) - set(firma.parameters)
+    if desconocidos and not con_body:
+        raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+    return kwargs
+
+
+# ───────────────────────── Pool ─────────────────────────
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_JOBS_WORKERS, thread_name_prefix="export-job")
+        return _executor
+
+
+def _lanzar(job_id: str) -> None:
+    _pool().submit(ejecutar_export, job_id)
+
+
+def cerrar_pool() -> None:
+    """Shutdown del lifespan: los jobs pendientes quedan en la tabla y vencen por timeout."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# ───────────────────────── Jobs ─────────────────────────
+
+
+def canal_sse(usuario_id: int) -> str:
+    """Canal SSE con el progreso de los jobs de un usuario."""
+    return f"{CANAL_SSE}:{usuario_id}"
+
+
+def _publicar(job: ExportJob, filas: Optional[int] = None) -> None:
+    sse_publish_bg(
+        canal_sse(job.usuario_id),
+        {
+            "job_id": job.id,
+            "tipo": job.tipo,
+            "estado": job.estado,
+            "filas": job.filas if filas is None else filas,
+        },
+    )
+
+
+def _job_reutilizable(db: Session, clave: str) -> Optional[ExportJob]:
+    ahora = datetime.now(UTC)
+    listo = (
+        db.query(ExportJob)
+        .filter(
+            ExportJob.clave == clave,
+            ExportJob.estado == "listo",
+            ExportJob.terminado_at >= ahora - timedelta(minutes=settings.EXPORTS_CACHE_TTL_MINUTES),
+        )
+        .order_by(ExportJob.terminado_at.desc())
+        .first()
+    )
+    if listo is not None and listo.archivo and os.path.exists(listo.archivo):
+        return listo
+    return (
+        db.query(ExportJob)
+        .filter(
+            ExportJob.clave == clave,
+            ExportJob.estado.in_(ESTADOS_EN_CURSO),
+            ExportJob.creado_at >= ahora - timedelta(minutes=settings.EXPORT_JOBS_TIMEOUT_MINUTES),
+        )
+        .order_by(ExportJob.creado_at.desc())
+        .first()
+    )
+
+
+def solicitar_export(db: Session, tipo: str, parametros: dict, usuario: Usuario) -> tuple[ExportJob, bool]:
+    """
+    Encola un export, o devuelve uno equivalente ya hecho / en curso.
+
+    Returns:
+        (job, nuevo): `nuevo` es False si se reutilizó un job existente.
+
+    Raises:
+        KeyError: tipo desconocido.
+        ValueError: parámetros inválidos para el endpoint.
+    """
+    spec = TIPOS[tipo]
+    argumentos_endpoint(spec.funcion(), parametros)  # validar antes de encolar
+
+    version = version_datos(db, spec.dominios)
+    clave = clave_export(tipo, parametros, usuario.id, version)
+    if version is not None:
+        existente = _job_reutilizable(db, clave)
+        if existente is not None:
+            return existente, False
+
+    job = ExportJob(
+        id=str(uuid4()),
+        tipo=tipo,
+        parametros=parametros,
+        clave=clave,
+        version_datos=version,
+        estado="pendiente",
+        filas=0,
+        usuario_id=usuario.id,
+    )
+    db.add(job)
+    db.commit()
+    _lanzar(job.id)
+    return job, True
+
+
+def _escribir_archivo(job: ExportJob, respuesta: RespuestaXlsx) -> tuple[str, int]:
+    """Escribe las hojas a `EXPORTS_CACHE_DIR` (tmp + rename) publicando el progreso. Devuelve (ruta, filas)."""
+    os.makedirs(settings.EXPORTS_CACHE_DIR, exist_ok=True)
+    destino = os.path.join(settings.EXPORTS_CACHE_DIR, f"{job.clave}_{job.id[:8]}.xlsx")
+    temporal = f"{destino}.tmp"
+    filas = 0
+
+    def contar(iterable):
+        nonlocal filas
+        for fila in iterable:
+            yield fila
+            filas += 1
+            if filas % FILAS_POR_LOTE_DB == 0:
+                _publicar(job, filas)
+
+    hojas = [dataclasses.replace(hoja, filas=contar(hoja.filas)) for hoja in respuesta.hojas]
+    try:
+        with open(temporal, "wb") as archivo:
+            for chunk in stream_xlsx(hojas):
+                archivo.write(chunk)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return destino, filas
+
+
+def ejecutar_export(job_id: str, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Corre un job `pendiente` (en el pool). Deja el job en `listo` o `error`; nunca propaga."""
+    db = session_factory()
+    try:
+        job = db.get(ExportJob, job_id)
+        if job is None or job.estado != "pendiente":
+            return
+        job.estado = "corriendo"
+        db.commit()
+        _publicar(job)
+
+        archivo = filename = error = None
+        filas = 0
+        try:
+            funcion = TIPOS[job.tipo].funcion()
+            kwargs = argumentos_endpoint(funcion, job.parametros)
+            usuario = db.get(Usuario, job.usuario_id)
+            respuesta = funcion(**kwargs, db=db, current_user=usuario)
+            if not isinstance(respuesta, RespuestaXlsx):
+                raise TypeError(f"El endpoint de '{job.tipo}' no devolvió un XLSX en streaming")
+            archivo, filas = _escribir_archivo(job, respuesta)
+            filename = respuesta.filename
+        except HTTPException as exc:
+            error = str(exc.detail)
+        except Exception as exc:
+            logger.exception("Export job %s (%s) falló", job_id, job.tipo)
+            error = str(exc) or exc.__class__.__name__
+
+        db.rollback()  # la lectura del export no escribe nada
+        job = db.get(ExportJob, job_id)
+        job.estado = "error" if error else "listo"
+        job.error = error
+        job.archivo = archivo
+        job.filename = filename
+        job.filas = filas
+        job.terminado_at = datetime.now(UTC)
+        db.commit()
+        _publicar(job)
+    except Exception:
+        logger.exception("Export job %s: no se pudo actualizar el estado", job_id)
+        db.rollback()
+    finally:
+        db.close()
@@ -1,13 +1,26 @@
 """
 Servicio de geocoding para convertir direcciones a coordenadas (lat, lng).
 Usa Mapbox Geocoding API con cache para evitar consultas repetidas.
+
+Batch (`geocodificar_lote`): en lugar de N llamadas a `geocode_address`
+(una query al cache, un request y un commit por dirección, con sleeps fijos):
+  1. Todos los hits del cache se resuelven con UNA query por `direccion_hash`.
+  2. Los misses (deduplicados por hash) se geocodifican en paralelo, con un
+     máximo de requests en vuelo y un token bucket por proveedor (Mapbox
+     600 req/min, Nominatim 1 req/s) en lugar de `asyncio.sleep` fijos.
+  3. Los resultados nuevos se escriben al cache en un solo upsert.
+Cada corrida devuelve estadísticas de hits/misses/latencia.
 """
 
 import asyncio
 import re
+import threading
+import time
 import httpx
 import logging
-from typing import Optional, Tuple, Dict, List
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Tuple, Dict, List
 from urllib.parse import quote
 
 from sqlalchemy.orm import Session
@@ -15,6 +28,8 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.models.geocoding_cache import GeocodingCache
 from app.core.config import settings
+from app.core.database import get_background_db, insert_on_conflict
+from app.core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +37,61 @@ logger = logging.getLogger(__name__)
 # Docs: https://docs.mapbox.com/api/search/geocoding/
 MAPBOX_GEOCODING_URL = "https://api.mapbox.com/geocoding/v5/mapbox.places"
 
+PROVIDER_MAPBOX = "mapbox"
+PROVIDER_NOMINATIM = "nominatim"
+
+# Requests en vuelo como máximo en un lote (el token bucket fija el ritmo)
+CONCURRENCIA_LOTE_DEFAULT = 8
+
+_CABA_ALIASES = {
+    "caba",
+    "capital federal",
+    "cap. fed.",
+    "cap fed",
+    "c.a.b.a.",
+    "c.a.b.a",
+    "ciudad autónoma de buenos aires",
+    "ciudad autonoma de buenos aires",
+    "cdad de buenos aires",
+}
+
+
+class TokenBucket:
+    """Rate limiter por token bucket: `rate` tokens/seg, ráfaga de `capacidad`.
+
+    `adquirir()` reserva un token (el saldo puede quedar negativo: cada
+    llamador reserva su turno) y duerme hasta que le toca. La reserva es
+    sincrónica, así que sirve para cualquier event loop y entre threads.
+    """
+
+    def __init__(self, rate: float, capacidad: float) -> None:
+        self.rate = rate
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self) -> float:
+        """Reserva un token y devuelve cuántos segundos hay que esperar."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.rate)
+            self._ultimo = ahora
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def adquirir(self) -> None:
+        espera = self.reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+# Mapbox permite 600 req/min (10 req/seg); Nominatim pide 1 req/seg
+RATE_LIMITS: Dict[str, TokenBucket] = {
+    PROVIDER_MAPBOX: TokenBucket(rate=10.0, capacidad=10),
+    PROVIDER_NOMINATIM: TokenBucket(rate=1.0, capacidad=1),
+}
+
 
 def _es_cp_caba(zip_code: Optional[str]) -> bool:
     """
@@ -97,46 +167,9 @@ def _postcodes_compatible(expected: str, actual: str) -> bool:
     return True
 
 
-async def geocode_address(
-    direccion: str,
-    ciudad: str = "Buenos Aires",
-    pais: str = "Argentina",
-    zip_code: Optional[str] = None,
-    db: Optional[Session] = None,
-    usar_cache: bool = True,
-) -> Optional[Tuple[float, float]]:
-    """
-    Geocodifica una dirección y devuelve (latitud, longitud).
-    Usa Mapbox Geocoding API v5.
-
-    Args:
-        direccion: Dirección completa (calle, número, etc)
-        ciudad: Ciudad (default Buenos Aires)
-        pais: País (default Argentina)
-        zip_code: Código postal (opcional, mejora precisión)
-        db: Sesión de BD para cache (opcional)
-        usar_cache: Si True, busca en cache antes de consultar API
-
-    Returns:
-        Tupla (latitud, longitud) o None si no se encuentra
-    """
-    # Verificar que existe el token de Mapbox
-    if not settings.MAPBOX_ACCESS_TOKEN:
-        logger.error("MAPBOX_ACCESS_TOKEN no configurado en .env")
-        return None
-
+def _normalizar_query(direccion: str, ciudad: str, pais: str, zip_code: Optional[str]) -> Tuple[str, str]:
+    """Devuelve (ciudad normalizada, query completa) para una dirección."""
     # Normalizar variantes de CABA → "Buenos Aires" (Mapbox no entiende "CABA")
-    _CABA_ALIASES = {
-        "caba",
-        "capital federal",
-        "cap. fed.",
-        "cap fed",
-        "c.a.b.a.",
-        "c.a.b.a",
-        "ciudad autónoma de buenos aires",
-        "ciudad autonoma de buenos aires",
-        "cdad de buenos aires",
-    }
     if ciudad.lower().strip() in _CABA_ALIASES:
         logger.info("Normalizing ciudad '%s' → 'Buenos Aires'", ciudad)
         ciudad = "Buenos Aires"
@@ -156,15 +189,13 @@ async def geocode_address(
         query = f"{direccion}, {zip_code} {ciudad}, {pais}"
     else:
         query = f"{direccion}, {ciudad}, {pais}"
+    return ciudad, query
 
-    # Verificar cache si está disponible
-    if usar_cache and db:
-        cache_entry = get_from_cache(query, db)
-        if cache_entry:
-            logger.info(f"Geocoding cache HIT: {query[:50]}...")
-            return (cache_entry.latitud, cache_entry.longitud)
 
-    # Consultar Mapbox Geocoding API
+async def _geocode_remoto(
+    direccion: str, ciudad: str, pais: str, zip_code: Optional[str], query: str
+) -> Optional[Tuple[float, float, str]]:
+    """Consulta Mapbox (y Nominatim como fallback). Devuelve (lat, lng, provider) o None."""
     try:
         logger.info(f"Geocoding API call (Mapbox): {query[:50]}...")
 
@@ -188,93 +219,137 @@ async def geocode_address(
         if zip_code:
             params["types"] = "address,poi,neighborhood,locality"
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        await RATE_LIMITS[PROVIDER_MAPBOX].adquirir()
+        client = get_http_client("mapbox")
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        # Verificar que hay resultados
+        if not data.get("features") or len(data["features"]) == 0:
+            logger.warning(f"Geocoding (Mapbox) sin resultados: {query[:50]}, trying Nominatim...")
+            return await _con_provider(_nominatim_fallback(direccion, ciudad, pais, zip_code))
+
+        # Obtener primera coincidencia
+        feature = data["features"][0]
+
+        # ── Validación de confianza ──────────────────────────────
+        # Mapbox relevance: 0-1 (1 = match perfecto)
+        relevance = feature.get("relevance", 0)
+        place_type = feature.get("place_type", [])
+        mapbox_rejected = False
+        reject_reason = ""
+
+        # Rechazar resultados de baja relevancia (dirección mal escrita)
+        if relevance < 0.6:
+            reject_reason = f"low relevance {relevance:.2f}"
+            mapbox_rejected = True
+
+        # Rechazar si Mapbox solo matcheó a nivel de ciudad/región/país
+        # (significa que no encontró la dirección, solo la ciudad)
+        if not mapbox_rejected:
+            coarse_types = {"place", "region", "country", "district"}
+            if place_type and set(place_type).issubset(coarse_types):
+                reject_reason = f"coarse place_type {place_type}"
+                mapbox_rejected = True
 
-            # Verificar que hay resultados
-            if not data.get("features") or len(data["features"]) == 0:
-                logger.warning(f"Geocoding (Mapbox) sin resultados: {query[:50]}, trying Nominatim...")
-                fallback = await _nominatim_fallback(direccion, ciudad, pais, zip_code)
-                if fallback and usar_cache and db:
-                    save_to_cache(query, fallback[0], fallback[1], db)
-                return fallback
-
-            # Obtener primera coincidencia
-            feature = data["features"][0]
-
-            # ── Validación de confianza ──────────────────────────────
-            # Mapbox relevance: 0-1 (1 = match perfecto)
-            relevance = feature.get("relevance", 0)
-            place_type = feature.get("place_type", [])
-            mapbox_rejected = False
-            reject_reason = ""
-
-            # Rechazar resultados de baja relevancia (dirección mal escrita)
-            if relevance < 0.6:
-                reject_reason = f"low relevance {relevance:.2f}"
+        # Si tenemos CP, validar que el resultado esté en la misma zona postal
+        # Esto previene "calle X en CABA" → match en Rosario
+        if not mapbox_rejected and zip_code:
+            result_postcode = _extract_postcode_from_context(feature)
+            if result_postcode and not _postcodes_compatible(zip_code, result_postcode):
+                reject_reason = f"postcode mismatch (expected {zip_code}, got {result_postcode})"
                 mapbox_rejected = True
 
-            # Rechazar si Mapbox solo matcheó a nivel de ciudad/región/país
-            # (significa que no encontró la dirección, solo la ciudad)
-            if not mapbox_rejected:
-                coarse_types = {"place", "region", "country", "district"}
-                if place_type and set(place_type).issubset(coarse_types):
-                    reject_reason = f"coarse place_type {place_type}"
-                    mapbox_rejected = True
-
-            # Si tenemos CP, validar que el resultado esté en la misma zona postal
-            # Esto previene "calle X en CABA" → match en Rosario
-            if not mapbox_rejected and zip_code:
-                result_postcode = _extract_postcode_from_context(feature)
-                if result_postcode and not _postcodes_compatible(zip_code, result_postcode):
-                    reject_reason = f"postcode mismatch (expected {zip_code}, got {result_postcode})"
-                    mapbox_rejected = True
-
-            if mapbox_rejected:
-                logger.warning(
-                    "Mapbox REJECTED (%s): %s → %s, trying Nominatim...",
-                    reject_reason,
-                    query[:60],
-                    feature.get("place_name", "?"),
-                )
-                fallback = await _nominatim_fallback(direccion, ciudad, pais, zip_code)
-                if fallback and usar_cache and db:
-                    save_to_cache(query, fallback[0], fallback[1], db)
-                return fallback
-
-            # ── Resultado válido ─────────────────────────────────────
-            # Mapbox devuelve coordenadas en formato [longitud, latitud]
-            coordinates = feature["geometry"]["coordinates"]
-            longitud = float(coordinates[0])
-            latitud = float(coordinates[1])
-
-            # Guardar en cache si está disponible
-            if usar_cache and db:
-                save_to_cache(query, latitud, longitud, db)
-
-            logger.info(
-                "Geocoding SUCCESS (relevance=%.2f, type=%s): %s -> (%.6f, %.6f)",
-                relevance,
-                place_type,
-                query[:50],
-                latitud,
-                longitud,
+        if mapbox_rejected:
+            logger.warning(
+                "Mapbox REJECTED (%s): %s → %s, trying Nominatim...",
+                reject_reason,
+                query[:60],
+                feature.get("place_name", "?"),
             )
-            return (latitud, longitud)
+            return await _con_provider(_nominatim_fallback(direccion, ciudad, pais, zip_code))
+
+        # ── Resultado válido ─────────────────────────────────────
+        # Mapbox devuelve coordenadas en formato [longitud, latitud]
+        coordinates = feature["geometry"]["coordinates"]
+        longitud = float(coordinates[0])
+        latitud = float(coordinates[1])
+
+        logger.info(
+            "Geocoding SUCCESS (relevance=%.2f, type=%s): %s -> (%.6f, %.6f)",
+            relevance,
+            place_type,
+            query[:50],
+            latitud,
+            longitud,
+        )
+        return (latitud, longitud, PROVIDER_MAPBOX)
 
     except httpx.HTTPStatusError as e:
         logger.error(f"Geocoding HTTP error: {e.response.status_code} - {e.response.text}")
-        return await _nominatim_fallback(direccion, ciudad, pais, zip_code)
+        return await _con_provider(_nominatim_fallback(direccion, ciudad, pais, zip_code))
     except httpx.RequestError as e:
         logger.error(f"Geocoding request error: {e}")
-        return await _nominatim_fallback(direccion, ciudad, pais, zip_code)
+        return await _con_provider(_nominatim_fallback(direccion, ciudad, pais, zip_code))
     except (ValueError, KeyError, IndexError) as e:
         logger.error(f"Geocoding parse error: {e}")
         return None
 
 
+async def _con_provider(fallback) -> Optional[Tuple[float, float, str]]:
+    coords = await fallback
+    return (coords[0], coords[1], PROVIDER_NOMINATIM) if coords else None
+
+
+async def geocode_address(
+    direccion: str,
+    ciudad: str = "Buenos Aires",
+    pais: str = "Argentina",
+    zip_code: Optional[str] = None,
+    db: Optional[Session] = None,
+    usar_cache: bool = True,
+) -> Optional[Tuple[float, float]]:
+    """
+    Geocodifica una dirección y devuelve (latitud, longitud).
+    Usa Mapbox Geocoding API v5.
+
+    Args:
+        direccion: Dirección completa (calle, número, etc)
+        ciudad: Ciudad (default Buenos Aires)
+        pais: País (default Argentina)
+        zip_code: Código postal (opcional, mejora precisión)
+        db: Sesión de BD para cache (opcional)
+        usar_cache: Si True, busca en cache antes de consultar API
+
+    Returns:
+        Tupla (latitud, longitud) o None si no se encuentra
+    """
+    # Verificar que existe el token de Mapbox
+    if not settings.MAPBOX_ACCESS_TOKEN:
+        logger.error("MAPBOX_ACCESS_TOKEN no configurado en .env")
+        return None
+
+    ciudad, query = _normalizar_query(direccion, ciudad, pais, zip_code)
+
+    # Verificar cache si está disponible
+    if usar_cache and db:
+        cache_entry = get_from_cache(query, db)
+        if cache_entry:
+            logger.info(f"Geocoding cache HIT: {query[:50]}...")
+            return (cache_entry.latitud, cache_entry.longitud)
+
+    resultado = await _geocode_remoto(direccion, ciudad, pais, zip_code, query)
+    if resultado is None:
+        return None
+
+    latitud, longitud, provider = resultado
+    # Guardar en cache si está disponible
+    if usar_cache and db:
+        save_to_cache(query, latitud, longitud, db, provider=provider)
+    return (latitud, longitud)
+
+
 def _strip_street_prefix(direccion: str) -> str:
     """
     Quita prefijos de tipo de vía que Nominatim no entiende.
@@ -302,7 +377,8 @@ async def _nominatim_fallback(
     Used when Mapbox fails to find a confident result.
 
     Nominatim has better coverage of small Argentine streets (pasajes, etc.)
-    but is rate-limited to 1 req/sec. Only used as fallback, never primary.
+    but is rate-limited to 1 req/sec (RATE_LIMITS bucket). Only used as
+    fallback, never primary.
 
     Tries twice: first with the original address, then stripping street type
     prefixes (Pasaje, Pje, Diagonal, etc.) that OSM doesn't use.
@@ -313,75 +389,75 @@ async def _nominatim_fallback(
         attempts.append(stripped)
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            data = None
-
-            for attempt in attempts:
-                # Structured search is more precise than free-form for Nominatim
-                params = {
-                    "street": attempt,
-                    "city": ciudad,
-                    "country": pais,
-                    "format": "json",
-                    "limit": 1,
-                    "addressdetails": "1",
-                }
-                if zip_code:
-                    params["postalcode"] = zip_code
-
-                response = await client.get(
-                    "https://nominatim.openstreetmap.org/search",
-                    params=params,
-                    headers={"User-Agent": "pricing-app/1.0"},
+        client = get_http_client("nominatim")
+        data = None
+
+        for attempt in attempts:
+            # Rate limit: 1 req/sec (compartido por todos los llamadores)
+            await RATE_LIMITS[PROVIDER_NOMINATIM].adquirir()
+
+            # Structured search is more precise than free-form for Nominatim
+            params = {
+                "street": attempt,
+                "city": ciudad,
+                "country": pais,
+                "format": "json",
+                "limit": 1,
+                "addressdetails": "1",
+            }
+            if zip_code:
+                params["postalcode"] = zip_code
+
+            response = await client.get(
+                "https://nominatim.openstreetmap.org/search",
+                params=params,
+                headers={"User-Agent": "pricing-app/1.0"},
+            )
+            response.raise_for_status()
+            data = response.json()
+
+            if data:
+                logger.info(
+                    "Nominatim hit with '%s' (attempt: '%s')",
+                    attempt[:50],
+                    "original" if attempt == direccion else "stripped",
+                )
+                break
+
+        if not data:
+            logger.info("Nominatim fallback: sin resultados para '%s, %s'", direccion[:50], ciudad)
+            return None
+
+        result = data[0]
+        lat = float(result["lat"])
+        lng = float(result["lon"])
+
+        # Validar que el resultado esté en la ciudad correcta
+        addr = result.get("address", {})
+        result_city = addr.get("city") or addr.get("town") or addr.get("village") or ""
+
+        # Verificar que la ciudad del resultado sea compatible
+        if result_city and ciudad.lower() not in result_city.lower() and result_city.lower() not in ciudad.lower():
+            # Chequeo relajado: si el CP coincide, aceptar
+            result_postcode = addr.get("postcode", "")
+            if zip_code and result_postcode and not _postcodes_compatible(zip_code, result_postcode):
+                logger.warning(
+                    "Nominatim fallback REJECTED (city mismatch: expected '%s', got '%s'): %s",
+                    ciudad,
+                    result_city,
+                    direccion[:50],
                 )
-                response.raise_for_status()
-                data = response.json()
-
-                if data:
-                    logger.info(
-                        "Nominatim hit with '%s' (attempt: '%s')",
-                        attempt[:50],
-                        "original" if attempt == direccion else "stripped",
-                    )
-                    break
-
-                # Rate limit: 1 req/sec
-                await asyncio.sleep(1.1)
-
-            if not data:
-                logger.info("Nominatim fallback: sin resultados para '%s, %s'", direccion[:50], ciudad)
                 return None
 
-            result = data[0]
-            lat = float(result["lat"])
-            lng = float(result["lon"])
-
-            # Validar que el resultado esté en la ciudad correcta
-            addr = result.get("address", {})
-            result_city = addr.get("city") or addr.get("town") or addr.get("village") or ""
-
-            # Verificar que la ciudad del resultado sea compatible
-            if result_city and ciudad.lower() not in result_city.lower() and result_city.lower() not in ciudad.lower():
-                # Chequeo relajado: si el CP coincide, aceptar
-                result_postcode = addr.get("postcode", "")
-                if zip_code and result_postcode and not _postcodes_compatible(zip_code, result_postcode):
-                    logger.warning(
-                        "Nominatim fallback REJECTED (city mismatch: expected '%s', got '%s'): %s",
-                        ciudad,
-                        result_city,
-                        direccion[:50],
-                    )
-                    return None
-
-            logger.info(
-                "Nominatim fallback SUCCESS: '%s, %s' → (%.6f, %.6f) [%s]",
-                direccion[:50],
-                ciudad,
-                lat,
-                lng,
-                result.get("display_name", "")[:80],
-            )
-            return (lat, lng)
+        logger.info(
+            "Nominatim fallback SUCCESS: '%s, %s' → (%.6f, %.6f) [%s]",
+            direccion[:50],
+            ciudad,
+            lat,
+            lng,
+            result.get("display_name", "")[:80],
+        )
+        return (lat, lng)
 
     except Exception:
         logger.exception("Nominatim fallback error for '%s, %s'", direccion[:50], ciudad)
@@ -403,7 +479,7 @@ def get_from_cache(direccion: str, db: Session) -> Optional[GeocodingCache]:
     return db.query(GeocodingCache).filter(GeocodingCache.direccion_hash == hash_dir).first()
 
 
-def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session) -> None:
+def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session, provider: Optional[str] = None) -> None:
     """
     Guarda una geocodificación en cache.
 
@@ -412,6 +488,7 @@ def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session)
         latitud: Latitud resultante
         longitud: Longitud resultante
         db: Sesión de BD
+        provider: Proveedor que la resolvió (mapbox / nominatim)
     """
     try:
         hash_dir = GeocodingCache.hash_direccion(direccion)
@@ -423,6 +500,7 @@ def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session)
             # Actualizar
             existing.latitud = latitud
             existing.longitud = longitud
+            existing.provider = provider
         else:
             # Crear nuevo
             cache_entry = GeocodingCache(
@@ -430,6 +508,7 @@ def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session)
                 direccion_hash=hash_dir,
                 latitud=latitud,
                 longitud=longitud,
+                provider=provider,
             )
             db.add(cache_entry)
 
@@ -444,31 +523,207 @@ def save_to_cache(direccion: str, latitud: float, longitud: float, db: Session)
         db.rollback()
 
 
-async def geocode_batch(
-    direcciones: List[str], db: Session, delay_ms: int = 100
-) -> Dict[str, Optional[Tuple[float, float]]]:
+# ── Batch ────────────────────────────────────────────────────────────────
+
+_CHUNK_CACHE = 1000
+
+
+@dataclass(frozen=True)
+class SolicitudGeocoding:
+    """Una dirección a geocodificar dentro de un lote; `clave` la identifica en el resultado."""
+
+    clave: str
+    direccion: str
+    ciudad: str = "Buenos Aires"
+    pais: str = "Argentina"
+    zip_code: Optional[str] = None
+
+
+@dataclass
+class EstadisticasGeocoding:
+    """Estadísticas de una corrida de `geocodificar_lote`."""
+
+    total: int = 0
+    direcciones_unicas: int = 0
+    hits: int = 0
+    misses: int = 0
+    resueltos: int = 0
+    fallidos: int = 0
+    por_provider: Dict[str, int] = field(default_factory=dict)
+    latencias_ms: List[float] = field(default_factory=list)
+    duracion_s: float = 0.0
+
+    @staticmethod
+    def _percentil(valores: List[float], p: float) -> Optional[float]:
+        if not valores:
+            return None
+        ordenados = sorted(valores)
+        return round(ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))], 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "direcciones_unicas": self.direcciones_unicas,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "hit_rate": round(self.hits / self.direcciones_unicas, 3) if self.direcciones_unicas else None,
+            "resueltos": self.resueltos,
+            "fallidos": self.fallidos,
+            "por_provider": dict(self.por_provider),
+            "latencia_ms_p50": self._percentil(self.latencias_ms, 0.5),
+            "latencia_ms_p95": self._percentil(self.latencias_ms, 0.95),
+            "latencia_ms_max": round(max(self.latencias_ms), 1) if self.latencias_ms else None,
+            "duracion_s": round(self.duracion_s, 3),
+        }
+
+
+@dataclass
+class ResultadoLoteGeocoding:
+    coordenadas: Dict[str, Optional[Tuple[float, float]]]  # clave → (lat, lng) o None
+    stats: EstadisticasGeocoding
+
+
+def buscar_en_cache_bulk(hashes: List[str], db: Session) -> Dict[str, GeocodingCache]:
+    """Entradas del cache para muchos hashes (una query por cada 1000)."""
+    encontrados: Dict[str, GeocodingCache] = {}
+    unicos = list(dict.fromkeys(hashes))
+    for i in range(0, len(unicos), _CHUNK_CACHE):
+        chunk = unicos[i : i + _CHUNK_CACHE]
+        for row in db.query(GeocodingCache).filter(GeocodingCache.direccion_hash.in_(chunk)).all():
+            encontrados[row.direccion_hash] = row
+    return encontrados
+
+
+def guardar_en_cache_bulk(entradas: List[Dict[str, Any]], db: Session) -> None:
+    """Upsert de muchas geocodificaciones en un solo statement.
+
+    `entradas`: dicts con direccion_hash, direccion_normalizada, latitud,
+    longitud y provider.
+    """
+    if not entradas:
+        return
+    stmt = insert_on_conflict(db, GeocodingCache).values(entradas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeocodingCache.direccion_hash],
+        set_={
+            "latitud": stmt.excluded.latitud,
+            "longitud": stmt.excluded.longitud,
+            "provider": stmt.excluded.provider,
+        },
+    )
+    db.execute(stmt)
+
+
+async def geocodificar_lote(
+    solicitudes: List[SolicitudGeocoding],
+    session_factory: Callable[[], AbstractContextManager[Session]] = get_background_db,
+    concurrencia: int = CONCURRENCIA_LOTE_DEFAULT,
+    usar_cache: bool = True,
+) -> ResultadoLoteGeocoding:
     """
-    Geocodifica múltiples direcciones con rate limiting.
+    Geocodifica un lote de direcciones: cache en bulk, misses en paralelo con
+    rate limit por proveedor, resultados nuevos al cache en un solo upsert.
+
+    La sesión (`session_factory`, un context manager) se abre sólo para la
+    lectura y para la escritura del cache: ninguna conexión queda tomada
+    mientras se espera a Mapbox/Nominatim.
 
     Args:
-        direcciones: Lista de direcciones a geocodificar
-        db: Sesión de BD para cache
-        delay_ms: Delay entre requests en milisegundos (default 100ms)
-                  Mapbox permite hasta 600 req/min = 10 req/seg = 100ms entre requests
+        solicitudes: Direcciones a geocodificar (la `clave` identifica cada una)
+        session_factory: Context manager que da una Session (commit al salir)
+        concurrencia: Requests en vuelo como máximo
+        usar_cache: Si False, consulta siempre la API (y no escribe el cache)
 
     Returns:
-        Diccionario {direccion: (lat, lng) o None}
+        ResultadoLoteGeocoding con coordenadas por clave y estadísticas
     """
+    t0 = time.perf_counter()
+    stats = EstadisticasGeocoding(total=len(solicitudes))
+    coordenadas: Dict[str, Optional[Tuple[float, float]]] = {s.clave: None for s in solicitudes}
+
+    if not settings.MAPBOX_ACCESS_TOKEN:
+        logger.error("MAPBOX_ACCESS_TOKEN no configurado en .env")
+        stats.fallidos = len(solicitudes)
+        return ResultadoLoteGeocoding(coordenadas, stats)
+
+    # Agrupar por dirección normalizada: cada hash se resuelve una sola vez
+    por_hash: Dict[str, List[SolicitudGeocoding]] = {}
+    consultas: Dict[str, Tuple[str, str, SolicitudGeocoding]] = {}  # hash → (query, ciudad, solicitud)
+    for sol in solicitudes:
+        ciudad, query = _normalizar_query(sol.direccion, sol.ciudad, sol.pais, sol.zip_code)
+        hash_dir = GeocodingCache.hash_direccion(query)
+        por_hash.setdefault(hash_dir, []).append(sol)
+        consultas.setdefault(hash_dir, (query, ciudad, sol))
+    stats.direcciones_unicas = len(por_hash)
+
+    resueltos: Dict[str, Tuple[float, float]] = {}
+    if usar_cache and por_hash:
+        with session_factory() as db:
+            for hash_dir, row in buscar_en_cache_bulk(list(por_hash), db).items():
+                resueltos[hash_dir] = (float(row.latitud), float(row.longitud))
+    stats.hits = len(resueltos)
+
+    misses = [h for h in por_hash if h not in resueltos]
+    stats.misses = len(misses)
+    semaforo = asyncio.Semaphore(concurrencia)
+    nuevos: List[Dict[str, Any]] = []
+
+    async def _resolver(hash_dir: str) -> None:
+        query, ciudad, sol = consultas[hash_dir]
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                resultado = await _geocode_remoto(sol.direccion, ciudad, sol.pais, sol.zip_code, query)
+            except Exception:
+                logger.exception("Geocoding batch: error inesperado para '%s'", query[:60])
+                resultado = None
+            stats.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        if resultado is None:
+            return
+        latitud, longitud, provider = resultado
+        resueltos[hash_dir] = (latitud, longitud)
+        stats.por_provider[provider] = stats.por_provider.get(provider, 0) + 1
+        nuevos.append(
+            {
+                "direccion_hash": hash_dir,
+                "direccion_normalizada": query[:500],
+                "latitud": latitud,
+                "longitud": longitud,
+                "provider": provider,
+            }
+        )
+
+    await asyncio.gather(*(_resolver(h) for h in misses))
 
-    resultados = {}
+    if usar_cache and nuevos:
+        try:
+            with session_factory() as db:
+                guardar_en_cache_bulk(nuevos, db)
+        except SQLAlchemyError as e:
+            logger.error(f"Error de BD guardando geocoding cache (batch de {len(nuevos)}): {e}")
 
-    for direccion in direcciones:
-        coords = await geocode_address(direccion, db=db)
-        resultados[direccion] = coords
+    for hash_dir, sols in por_hash.items():
+        coords = resueltos.get(hash_dir)
+        for sol in sols:
+            coordenadas[sol.clave] = coords
+    stats.resueltos = sum(1 for c in coordenadas.values() if c is not None)
+    stats.fallidos = len(coordenadas) - stats.resueltos
+    stats.duracion_s = time.perf_counter() - t0
 
-        # Rate limiting: Mapbox permite 600 req/min (10 req/seg)
-        # Con 100ms de delay = 10 requests/segundo (dentro del límite)
-        if delay_ms > 0:
-            await asyncio.sleep(delay_ms / 1000.0)
+    logger.info("Geocoding batch: %s", stats.as_dict())
+    return ResultadoLoteGeocoding(coordenadas, stats)
 
-    return resultados
+
+async def geocode_batch(
+    direcciones: List[str], session_factory: Callable[[], AbstractContextManager[Session]] = get_background_db
+) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Geocodifica múltiples direcciones (ciudad por defecto) vía `geocodificar_lote`.
+
+    Returns:
+        Diccionario {direccion: (lat, lng) o None}
+    """
+    resultado = await geocodificar_lote(
+        [SolicitudGeocoding(clave=d, direccion=d) for d in dict.fromkeys(direcciones)], session_factory
+    )
+    return resultado.coordenadas
@@ -0,0 +1,106 @@
+"""
+identidad_service — resolución cacheada del usuario autenticado (JWT `sub`).
+
+`get_current_user` es `async def` pero consultaba usuario + rol + permisos con
+SQLAlchemy sync en el event loop: cada request autenticado frenaba el loop que
+también sirve SSE y background tasks.
+
+Design decisions (ADR):
+  1. Cache por `sub` en el namespace "auth" de app.core.reference_cache (TTL
+     corto, invalidación local + Redis pub/sub al commitear escrituras sobre
+     usuarios / roles / permisos / overrides — ver app/events/auth_cache_hooks).
+     En hit no hay ningún round-trip a la DB.
+  2. Lo cacheado es una copia DETACHED del Usuario (+ su Rol) y el set de
+     permisos. En cada request se adjunta a la sesión del request con
+     `merge(load=False)` (sin SQL): los endpoints siguen recibiendo un Usuario
+     persistente en su sesión, que pueden modificar y commitear como antes, y
+     la copia cacheada nunca se comparte entre sesiones.
+  3. En miss, la carga corre en un thread (`asyncio.to_thread`), no en el loop.
+  4. Si la sesión tiene escrituras de auth sin commitear (o no es una Session
+     real), no se usa el cache (misma regla que pricing_calculator._cacheado).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core import reference_cache
+from app.events import auth_cache_hooks, pricing_reference_hooks
+from app.models.usuario import Usuario
+from app.services.permisos_service import PermisosService
+
+NAMESPACE = auth_cache_hooks.NAMESPACE
+
+
+@dataclass(frozen=True)
+class Identidad:
+    usuario: Usuario  # copia detached, solo lectura
+    permisos: frozenset[str]
+
+
+def _copia_detached(obj):
+    """Copia de las columnas de una instancia persistente, como si viniera de una query ya cerrada."""
+    mapper = sa_inspect(obj).mapper
+    return mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+
+def cargar_usuario(db: Session, username: str) -> Optional[Usuario]:
+    """Usuario por username o email (backward compatibility) con `_permisos_cache` cargado. Sync: hace queries."""
+    # Eager-load rol_obj to avoid lazy load on es_superadmin check
+    usuario = (
+        db.query(Usuario)
+        .options(joinedload(Usuario.rol_obj))
+        .filter((Usuario.username == username) | (Usuario.email == username))
+        .first()
+    )
+    if usuario is not None:
+        usuario._permisos_cache = PermisosService(db).obtener_permisos_usuario(usuario)
+    return usuario
+
+
+def cargar_identidad(db: Session, username: str) -> Optional[Identidad]:
+    """cargar_usuario + copia detached para el cache."""
+    usuario = cargar_usuario(db, username)
+    if usuario is None:
+        return None
+
+    copia = _copia_detached(usuario)
+    if usuario.rol_obj is not None:
+        rol = _copia_detached(usuario.rol_obj)
+        make_transient_to_detached(rol)
+        # Sin backref: Rol.usuarios de la copia queda sin cargar (no una lista de 1)
+        set_committed_value(copia, "rol_obj", rol)
+    make_transient_to_detached(copia)
+    return Identidad(usuario=copia, permisos=frozenset(usuario._permisos_cache))
+
+
+def adjuntar(db: Session, identidad: Identidad) -> Usuario:
+    """Usuario persistente en `db` a partir de la identidad cacheada (sin SQL)."""
+    usuario = db.merge(identidad.usuario, load=False)
+    usuario._permisos_cache = set(identidad.permisos)
+    return usuario
+
+
+async def resolver_usuario(db: Session, username: str) -> Optional[Usuario]:
+    """Usuario del token con `_permisos_cache` cargado, o None si no existe.
+
+    No verifica `activo`: eso sigue siendo responsabilidad del caller.
+    """
+    # Sin sesión real, o con escrituras de auth sin commitear: directo de la DB
+    if not isinstance(db, Session) or NAMESPACE in pricing_reference_hooks.namespaces_pendientes(db):
+        return await asyncio.to_thread(cargar_usuario, db, username)
+
+    identidad = reference_cache.cache.get(NAMESPACE, username)
+    if identidad is None:
+        identidad = await asyncio.to_thread(
+            reference_cache.cache.get_or_load, NAMESPACE, username, lambda: cargar_identidad(db, username)
+        )
+    if identidad is None:
+        return None
+    return adjuntar(db, identidad)
@@ -12,17 +12,43 @@ Ventajas:
 - Balancea automáticamente la cantidad de paquetes por motoquero
 - Se adapta a la distribución REAL de envíos del día
 - No requiere APIs externas
+
+Re-zonificación incremental:
+- Warm start: si hay centroides previos (las zonas automáticas de ayer, o el
+  último ajuste de este proceso) se usan como `init` con una sola
+  inicialización, en lugar de 50 inicializaciones k-means++ desde cero.
+  Además mantiene estable la numeración/color de cada zona entre corridas.
+- Con muchos puntos (>= UMBRAL_MINIBATCH) se usa MiniBatchKMeans.
+- Membresías, centroides y hulls se calculan agrupando con NumPy (argsort +
+  bincount) y shapely vectorizado, sin recorrer una máscara por cluster.
+- El resultado se cachea por (conjunto de envíos + coordenadas, K): repetir
+  la zonificación con los mismos envíos no vuelve a ajustar nada.
 """
 
+import copy
 import logging
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Tuple, Optional
 import numpy as np
-from sklearn.cluster import KMeans
-from shapely.geometry import Polygon, MultiPoint
-from shapely.errors import GeometryTypeError
+import shapely
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from shapely.geometry import Polygon, shape
 
 logger = logging.getLogger(__name__)
 
+# A partir de esta cantidad de puntos se usa MiniBatchKMeans
+UMBRAL_MINIBATCH = 5000
+MINIBATCH_BATCH_SIZE = 1024
+
+# Inicializaciones k-means++ sin centroides previos (con warm start: 1)
+N_INIT_FRIO = 50
+
+_CACHE_MAX = 16
+_cache_zonas: "OrderedDict[Tuple[frozenset, int], List[Dict[str, Any]]]" = OrderedDict()
+_ultimos_centroides: Dict[int, np.ndarray] = {}  # K → centroides (lat, lng) del último ajuste
+_lock = threading.Lock()
+
 # Colores para zonas (máximo 6 motoqueros)
 COLORES_ZONAS = [
     "#ef4444",  # Rojo - Zona 1
@@ -34,13 +60,85 @@ COLORES_ZONAS = [
 ]
 
 
-def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad_zonas: int) -> List[Dict[str, Any]]:
+def _clave_cache(coords: np.ndarray, envios_ids: List[Any], cantidad_zonas: int) -> Tuple[frozenset, int]:
+    # Conjunto de envíos (sin importar el orden) con sus coordenadas
+    return frozenset(zip(envios_ids, map(tuple, coords.tolist()))), cantidad_zonas
+
+
+def _completar_centroides(previos: np.ndarray, coords: np.ndarray, k: int) -> np.ndarray:
+    """Ajusta los centroides previos a K: recorta o agrega los puntos más lejanos."""
+    centroides = np.asarray(previos, dtype=float).reshape(-1, 2)[:k]
+    while len(centroides) < k:
+        if len(centroides) == 0:
+            centroides = coords.mean(axis=0, keepdims=True)
+            continue
+        distancias = ((coords[:, None, :] - centroides[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        centroides = np.vstack([centroides, coords[int(distancias.argmax())]])
+    return centroides
+
+
+def _ajustar(coords: np.ndarray, k: int, centroides_previos: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Devuelve (labels, centroides)."""
+    if centroides_previos is not None and len(centroides_previos):
+        init: Any = _completar_centroides(centroides_previos, coords, k)
+        n_init = 1
+    else:
+        init = "k-means++"  # Mejor inicialización que random
+        n_init = N_INIT_FRIO if len(coords) < UMBRAL_MINIBATCH else 3
+
+    if len(coords) >= UMBRAL_MINIBATCH:
+        modelo: Any = MiniBatchKMeans(
+            n_clusters=k, init=init, n_init=n_init, batch_size=MINIBATCH_BATCH_SIZE, max_iter=100
+        )
+    else:
+        modelo = KMeans(n_clusters=k, init=init, n_init=n_init, max_iter=300)
+    labels = modelo.fit_predict(coords)
+    return labels, modelo.cluster_centers_
+
+
+def _hulls(coords: np.ndarray, labels: np.ndarray, k: int) -> List[Optional[Dict[str, Any]]]:
+    """Polígono GeoJSON por cluster (ConvexHull, o buffer circular con < 3 puntos)."""
+    conteos = np.bincount(labels, minlength=k)
+    orden = np.argsort(labels, kind="stable")
+    # Un MultiPoint por cluster en una sola llamada (GeoJSON: lng, lat);
+    # los clusters vacíos quedan en None
+    multipuntos = shapely.multipoints(
+        shapely.points(coords[orden, 1], coords[orden, 0]),
+        indices=labels[orden],
+        out=np.full(k, None, dtype=object),
+    )
+    hulls = shapely.convex_hull(multipuntos)
+
+    poligonos: List[Optional[Dict[str, Any]]] = []
+    for cluster_id in range(k):
+        if conteos[cluster_id] == 0:
+            poligonos.append(None)
+        elif conteos[cluster_id] < 3:
+            # ConvexHull requiere al menos 3 puntos
+            logger.warning(f"Solo {conteos[cluster_id]} puntos, creando buffer")
+            poligonos.append(generar_buffer_circular(coords[labels == cluster_id]))
+        elif isinstance(hulls[cluster_id], Polygon):
+            poligonos.append({"type": "Polygon", "coordinates": [list(hulls[cluster_id].exterior.coords)]})
+        else:
+            logger.warning(f"ConvexHull no es Polygon: {type(hulls[cluster_id])}")
+            poligonos.append(None)
+    return poligonos
+
+
+def generar_zonas_kmeans(
+    envios_coords: List[Tuple[float, float, int]],
+    cantidad_zonas: int,
+    centroides_previos: Optional[List[Tuple[float, float]]] = None,
+) -> List[Dict[str, Any]]:
     """
     Genera zonas usando K-Means clustering sobre envíos geocodificados.
 
     Args:
         envios_coords: Lista de tuplas (lat, lng, envio_id)
         cantidad_zonas: Cantidad de clusters/zonas a crear (K)
+        centroides_previos: Centroides (lat, lng) de la zonificación anterior
+            para warm start. Si no se pasan, se usan los del último ajuste con
+            el mismo K en este proceso (si hay).
 
     Returns:
         Lista de diccionarios con información de cada zona:
@@ -51,7 +149,8 @@ def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad
                 'color': '#ef4444',
                 'cantidad_envios': 15,
                 'descripcion': 'Zona generada automáticamente (15 envíos)',
-                'envios_ids': [123, 456, ...]
+                'envios_ids': [123, 456, ...],
+                'centroide': (lat, lng),
             },
             ...
         ]
@@ -69,42 +168,48 @@ def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad
 
     try:
         # Preparar datos para K-Means
-        coords = np.array([(lat, lng) for lat, lng, _ in envios_coords])
-        envios_ids = [envio_id for _, _, envio_id in envios_coords]
-
-        logger.info(f"Aplicando K-Means con K={cantidad_zonas} sobre {len(coords)} envíos")
-
-        # Aplicar K-Means con múltiples inicializaciones para mejor distribución
-        kmeans = KMeans(
-            n_clusters=cantidad_zonas,
-            init="k-means++",  # Mejor inicialización que random
-            n_init=50,  # Más inicializaciones = mejor resultado (default es 10)
-            max_iter=300,
-            random_state=None,  # Permitir aleatoriedad para mejor distribución
+        coords = np.array([(lat, lng) for lat, lng, _ in envios_coords], dtype=float)
+        envios_ids = np.array([envio_id for _, _, envio_id in envios_coords], dtype=object)
+
+        clave = _clave_cache(coords, envios_ids.tolist(), cantidad_zonas)
+        with _lock:
+            if clave in _cache_zonas:
+                _cache_zonas.move_to_end(clave)
+                logger.info(f"K-Means cache HIT: {len(coords)} envíos, K={cantidad_zonas}")
+                return copy.deepcopy(_cache_zonas[clave])
+            previos = centroides_previos if centroides_previos else _ultimos_centroides.get(cantidad_zonas)
+
+        logger.info(
+            f"Aplicando {'MiniBatchKMeans' if len(coords) >= UMBRAL_MINIBATCH else 'K-Means'} con K={cantidad_zonas} "
+            f"sobre {len(coords)} envíos ({'warm start' if previos is not None else 'desde cero'})"
         )
-        labels = kmeans.fit_predict(coords)
+        labels, centroides = _ajustar(coords, cantidad_zonas, None if previos is None else np.asarray(previos))
+
+        # Membresías y centroides reales agrupando una sola vez
+        conteos = np.bincount(labels, minlength=cantidad_zonas)
+        orden = np.argsort(labels, kind="stable")
+        miembros = np.split(envios_ids[orden], np.cumsum(conteos)[:-1])
+        con_puntos = np.maximum(conteos, 1)
+        centroides_lat = np.bincount(labels, weights=coords[:, 0], minlength=cantidad_zonas) / con_puntos
+        centroides_lng = np.bincount(labels, weights=coords[:, 1], minlength=cantidad_zonas) / con_puntos
+        poligonos = _hulls(coords, labels, cantidad_zonas)
 
         # Generar zonas por cluster
         zonas = []
         for cluster_id in range(cantidad_zonas):
-            # Filtrar puntos del cluster
-            mask = labels == cluster_id
-            cluster_coords = coords[mask]
-            cluster_envios = [envios_ids[i] for i, is_in_cluster in enumerate(mask) if is_in_cluster]
-
-            if len(cluster_coords) == 0:
+            if conteos[cluster_id] == 0:
                 logger.warning(f"Cluster {cluster_id} vacío, saltando")
                 continue
 
-            # Generar polígono ConvexHull
-            poligono_geojson = generar_convex_hull(cluster_coords)
-
+            poligono_geojson = poligonos[cluster_id]
             if not poligono_geojson:
                 logger.warning(f"No se pudo generar polígono para cluster {cluster_id}")
                 continue
 
             # Determinar orientación geográfica del cluster
-            orientacion = calcular_orientacion(cluster_coords)
+            centroide = (float(centroides_lat[cluster_id]), float(centroides_lng[cluster_id]))
+            orientacion = orientacion_de_centroide(*centroide)
+            cluster_envios = miembros[cluster_id].tolist()
 
             zona = {
                 "nombre": f"Zona {cluster_id + 1} {orientacion}",
@@ -113,6 +218,7 @@ def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad
                 "cantidad_envios": len(cluster_envios),
                 "descripcion": f"Zona generada automáticamente ({len(cluster_envios)} envíos - {orientacion})",
                 "envios_ids": cluster_envios,
+                "centroide": centroide,
             }
 
             zonas.append(zona)
@@ -122,6 +228,11 @@ def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad
                 f"{len(poligono_geojson['coordinates'][0])} puntos en polígono"
             )
 
+        with _lock:
+            _ultimos_centroides[cantidad_zonas] = np.asarray(centroides)
+            _cache_zonas[clave] = copy.deepcopy(zonas)
+            while len(_cache_zonas) > _CACHE_MAX:
+                _cache_zonas.popitem(last=False)
         return zonas
 
     except Exception as e:
@@ -129,46 +240,18 @@ def generar_zonas_kmeans(envios_coords: List[Tuple[float, float, int]], cantidad
         return []
 
 
-def generar_convex_hull(coords: np.ndarray) -> Optional[Dict[str, Any]]:
-    """
-    Genera un polígono ConvexHull (envolvente convexa) desde coordenadas.
-
-    El ConvexHull es el polígono más pequeño que contiene todos los puntos.
-    Similar a poner una banda elástica alrededor de los puntos.
-
-    Args:
-        coords: Array numpy de shape (N, 2) con (lat, lng)
-
-    Returns:
-        GeoJSON Polygon o None si falla
-    """
-    try:
-        if len(coords) < 3:
-            # ConvexHull requiere al menos 3 puntos
-            # Si hay 1-2 puntos, crear buffer circular
-            logger.warning(f"Solo {len(coords)} puntos, creando buffer")
-            return generar_buffer_circular(coords)
-
-        # Invertir coords a (lng, lat) para GeoJSON
-        points = [(lng, lat) for lat, lng in coords]
-
-        # Crear MultiPoint y obtener ConvexHull
-        multipoint = MultiPoint(points)
-        hull = multipoint.convex_hull
-
-        # Convertir a GeoJSON
-        if isinstance(hull, Polygon):
-            # Extraer coordenadas exteriores
-            exterior_coords = list(hull.exterior.coords)
-
-            return {"type": "Polygon", "coordinates": [exterior_coords]}
-        else:
-            logger.warning(f"ConvexHull no es Polygon: {type(hull)}")
-            return None
-
-    except (GeometryTypeError, Exception) as e:
-        logger.error(f"Error generando ConvexHull: {e}")
-        return None
+def centroides_de_zonas(poligonos: List[Dict[str, Any]]) -> List[Tuple[float, float]]:
+    """Centroides (lat, lng) de polígonos GeoJSON, para warm start desde zonas guardadas."""
+    centroides = []
+    for poligono in poligonos:
+        try:
+            centro = shape(poligono).centroid
+        except Exception as e:
+            logger.warning(f"Polígono inválido para warm start: {e}")
+            continue
+        if not centro.is_empty:
+            centroides.append((centro.y, centro.x))
+    return centroides
 
 
 def generar_buffer_circular(coords: np.ndarray, radio_km: float = 1.0) -> Dict[str, Any]:
@@ -214,14 +297,15 @@ def calcular_orientacion(coords: np.ndarray) -> str:
     Returns:
         String con orientación: 'Norte', 'Sur', 'Este', 'Oeste', 'Centro', etc.
     """
+    return orientacion_de_centroide(coords[:, 0].mean(), coords[:, 1].mean())
+
+
+def orientacion_de_centroide(centroid_lat: float, centroid_lng: float) -> str:
+    """Orientación geográfica de un centroide (lat, lng) respecto al centro de distribución."""
     # Felipe Vallese 1559, CABA (centro de distribución)
     CENTRO_LAT = -34.6282
     CENTRO_LNG = -58.4642
 
-    # Calcular centroide del cluster
-    centroid_lat = coords[:, 0].mean()
-    centroid_lng = coords[:, 1].mean()
-
     # Calcular diferencia respecto al centro
     delta_lat = centroid_lat - CENTRO_LAT
     delta_lng = centroid_lng - CENTRO_LNG
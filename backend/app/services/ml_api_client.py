@@ -8,6 +8,7 @@ from sqlalchemy import text
 
 from app.core.config import settings
 from app.core.database import get_mlwebhook_engine
+from app.core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -132,17 +133,17 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/{item_id}", headers={"Authorization": f"Bearer {token}"}
-                )
+            client = get_http_client("ml")
+            response = await client.get(
+                f"{self.base_url}/items/{item_id}", headers={"Authorization": f"Bearer {token}"}
+            )
 
-                if response.status_code == 404:
-                    logger.warning(f"Item {item_id} no encontrado en ML")
-                    return None
+            if response.status_code == 404:
+                logger.warning(f"Item {item_id} no encontrado en ML")
+                return None
 
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
 
         except Exception as e:
             logger.error(f"Error obteniendo item {item_id} de ML: {e}")
@@ -167,19 +168,19 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/items/{item_id}/description", headers={"Authorization": f"Bearer {token}"}
-                )
+            client = get_http_client("ml")
+            response = await client.get(
+                f"{self.base_url}/items/{item_id}/description", headers={"Authorization": f"Bearer {token}"}
+            )
 
-                if response.status_code == 404:
-                    logger.warning(f"Descripción del item {item_id} no encontrada en ML")
-                    return None
+            if response.status_code == 404:
+                logger.warning(f"Descripción del item {item_id} no encontrada en ML")
+                return None
 
-                response.raise_for_status()
-                data = response.json()
-                plain_text = data.get("plain_text")
-                return plain_text if isinstance(plain_text, str) else None
+            response.raise_for_status()
+            data = response.json()
+            plain_text = data.get("plain_text")
+            return plain_text if isinstance(plain_text, str) else None
 
         except Exception as e:
             logger.error(f"Error obteniendo descripción del item {item_id} de ML: {e}")
@@ -208,18 +209,18 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/questions/{question_id}",
-                    headers={"Authorization": f"Bearer {token}"},
-                )
+            client = get_http_client("ml")
+            response = await client.get(
+                f"{self.base_url}/questions/{question_id}",
+                headers={"Authorization": f"Bearer {token}"},
+            )
 
-                if response.status_code == 404:
-                    logger.warning(f"Pregunta {question_id} no encontrada en ML")
-                    raise QuestionNotFoundError(question_id)
+            if response.status_code == 404:
+                logger.warning(f"Pregunta {question_id} no encontrada en ML")
+                raise QuestionNotFoundError(question_id)
 
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
 
         except QuestionNotFoundError:
             raise
@@ -251,30 +252,30 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/answers",
-                    headers={"Authorization": f"Bearer {token}"},
-                    json={"question_id": question_id, "text": text},
-                )
+            client = get_http_client("ml")
+            response = await client.post(
+                f"{self.base_url}/answers",
+                headers={"Authorization": f"Bearer {token}"},
+                json={"question_id": question_id, "text": text},
+            )
 
-                if 200 <= response.status_code < 300:
-                    return response.json()
+            if 200 <= response.status_code < 300:
+                return response.json()
 
-                if response.status_code in _TRANSIENT_4XX_STATUS_CODES:
-                    logger.warning(
-                        "ml-bot post_answer: transient HTTP %s from ML for question %s — will be retried",
-                        response.status_code,
-                        question_id,
-                    )
-                    return None
+            if response.status_code in _TRANSIENT_4XX_STATUS_CODES:
+                logger.warning(
+                    "ml-bot post_answer: transient HTTP %s from ML for question %s — will be retried",
+                    response.status_code,
+                    question_id,
+                )
+                return None
 
-                if 400 <= response.status_code < 500:
-                    self._classify_post_answer_client_error(question_id, response)
-                    # _classify_post_answer_client_error always raises.
+            if 400 <= response.status_code < 500:
+                self._classify_post_answer_client_error(question_id, response)
+                # _classify_post_answer_client_error always raises.
 
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
 
         except (QuestionAlreadyAnsweredError, AnswerPostPermanentError):
             raise
@@ -346,27 +347,28 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            # ML permite hasta 20 items por request
+            # ML permite hasta 20 items por request; todos los chunks reusan la conexión
+            client = get_http_client("ml")
             batch_size = 20
             for i in range(0, len(item_ids), batch_size):
                 batch = item_ids[i : i + batch_size]
                 ids_param = ",".join(batch)
 
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    response = await client.get(
-                        f"{self.base_url}/items",
-                        params={"ids": ids_param},
-                        headers={"Authorization": f"Bearer {token}"},
-                    )
-                    response.raise_for_status()
-
-                    # La respuesta es un array de objetos con code, body
-                    data = response.json()
-                    for item_response in data:
-                        if item_response.get("code") == 200:
-                            body = item_response.get("body")
-                            if body:
-                                results[body["id"]] = body
+                response = await client.get(
+                    f"{self.base_url}/items",
+                    params={"ids": ids_param},
+                    headers={"Authorization": f"Bearer {token}"},
+                    timeout=15.0,
+                )
+                response.raise_for_status()
+
+                # La respuesta es un array de objetos con code, body
+                data = response.json()
+                for item_response in data:
+                    if item_response.get("code") == 200:
+                        body = item_response.get("body")
+                        if body:
+                            results[body["id"]] = body
 
         except Exception as e:
             logger.error(f"Error obteniendo items en batch: {e}")
@@ -395,24 +397,25 @@ class MercadoLibreAPIClient:
             # Limpiar None del payload
             payload["shipping"] = {k: v for k, v in payload["shipping"].items() if v is not None}
 
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.put(
-                    f"{self.base_url}/items/{item_id}",
-                    json=payload,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
+            client = get_http_client("ml")
+            response = await client.put(
+                f"{self.base_url}/items/{item_id}",
+                json=payload,
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=15.0,
+            )
 
-                if response.status_code == 200:
-                    logger.info("Item %s shipping updated: free_shipping=%s", item_id, free_shipping)
-                    return response.json()
+            if response.status_code == 200:
+                logger.info("Item %s shipping updated: free_shipping=%s", item_id, free_shipping)
+                return response.json()
 
-                logger.warning(
-                    "ML rejected shipping update for %s: %s %s",
-                    item_id,
-                    response.status_code,
-                    response.text,
-                )
-                return None
+            logger.warning(
+                "ML rejected shipping update for %s: %s %s",
+                item_id,
+                response.status_code,
+                response.text,
+            )
+            return None
 
         except Exception as e:
             logger.error("Error updating shipping for %s: %s", item_id, e)
@@ -434,22 +437,23 @@ class MercadoLibreAPIClient:
         try:
             token = await self.get_access_token()
 
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/users/{user_id}/items/search",
-                    params={"limit": limit, "offset": 0},
-                    headers={"Authorization": f"Bearer {token}"},
-                )
-                response.raise_for_status()
-                data = response.json()
+            client = get_http_client("ml")
+            response = await client.get(
+                f"{self.base_url}/users/{user_id}/items/search",
+                params={"limit": limit, "offset": 0},
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=15.0,
+            )
+            response.raise_for_status()
+            data = response.json()
 
-                item_ids = data.get("results", [])
+            item_ids = data.get("results", [])
 
-                # Obtener detalles de cada item
-                if item_ids:
-                    return await self.get_items_batch(item_ids)
+            # Obtener detalles de cada item
+            if item_ids:
+                return await self.get_items_batch(item_ids)
 
-                return {}
+            return {}
 
         except Exception as e:
             logger.error(f"Error obteniendo items del usuario {user_id}: {e}")
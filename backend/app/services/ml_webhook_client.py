@@ -1,17 +1,92 @@
-import httpx
-from typing import Dict, Optional, List
+"""
+Cliente del servicio ml-webhook (proxy de la API de MercadoLibre).
+
+Design decisions (ADR):
+  1. Cliente "ml_webhook" del registry (app/core/http_clients.py): keep-alive
+     y pool dimensionado a la concurrencia del batch. Reabrir TLS por request
+     (o por batch) dominaba la latencia de get_items_batch.
+  2. get_items_batch corre concurrente de verdad (asyncio.gather) acotado por
+     un semáforo, para no saturar al ml-webhook ni a ML.
+  3. Cada ítem tiene su propio timeout total y reintentos con backoff
+     exponencial ante timeouts, errores de red, 429 y 5xx. 404 y el resto de
+     4xx son definitivos. Un ítem que falla no tira el batch: queda fuera
+     del resultado, igual que antes.
+  4. Cada batch deja sus métricas (latencias p50/p95, ítems/s, reintentos)
+     en `ultimo_batch` y en el log.
+"""
+
+import asyncio
 import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
 
 from app.core.config import settings
+from app.core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
+# Requests simultáneos por batch (y tamaño del pool de conexiones)
+BATCH_CONCURRENCY = 32
+# Timeout total por intento de cada ítem (segundos)
+ITEM_TIMEOUT = 10.0
+# Reintentos por ítem ante errores transitorios
+ITEM_RETRIES = 2
+# Backoff: BACKOFF_BASE * 2**intento, con tope BACKOFF_MAX (segundos)
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+
+_RETRYABLE_STATUS = frozenset({408, 429})
+
+
+@dataclass
+class MetricasBatch:
+    """Métricas de una corrida de get_items_batch"""
+
+    total: int
+    encontrados: int
+    errores: int  # sin datos: 404, otro 4xx o reintentos agotados
+    reintentos: int
+    duracion_s: float
+    latencia_p50_ms: float
+    latencia_p95_ms: float
+
+    @property
+    def items_por_segundo(self) -> float:
+        return self.total / self.duracion_s if self.duracion_s > 0 else 0.0
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, math.ceil(p * len(ordenados)) - 1)]
+
 
 class MLWebhookClient:
     """Cliente para el servicio ml-webhook que consulta la API de MercadoLibre"""
 
-    def __init__(self):
-        self.base_url = settings.ML_WEBHOOK_BASE_URL
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        concurrency: int = BATCH_CONCURRENCY,
+        item_timeout: float = ITEM_TIMEOUT,
+        retries: int = ITEM_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+    ):
+        self.base_url = base_url or settings.ML_WEBHOOK_BASE_URL
+        self.concurrency = concurrency
+        self.item_timeout = item_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.ultimo_batch: Optional[MetricasBatch] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Cliente compartido del registry (keep-alive, pool dimensionado a la concurrencia)"""
+        return get_http_client("ml_webhook")
 
     async def get_item_preview(self, mla_id: str, include_price_to_win: bool = False) -> Optional[Dict]:
         """Obtiene preview de un item de MercadoLibre
@@ -30,15 +105,16 @@ class MLWebhookClient:
             if include_price_to_win:
                 resource = f"/items/{mla_id}/price_to_win?version=v2"
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.base_url}/api/ml/preview", params={"resource": resource})
+            response = await self._get_client().get(
+                f"{self.base_url}/api/ml/preview", params={"resource": resource}, timeout=10.0
+            )
 
-                if response.status_code == 404:
-                    logger.warning(f"Item {mla_id} no encontrado en ML")
-                    return None
+            if response.status_code == 404:
+                logger.warning(f"Item {mla_id} no encontrado en ML")
+                return None
 
-                response.raise_for_status()
-                return response.json()
+            response.raise_for_status()
+            return response.json()
 
         except Exception as e:
             logger.error(f"Error obteniendo preview de {mla_id}: {e}")
@@ -54,32 +130,65 @@ class MLWebhookClient:
             Dict con todos los datos del item incluyendo listing_type_id, available_quantity, etc.
         """
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # Consultar directamente usando el endpoint render que tiene acceso a la API
-                response = await client.get(
-                    f"{self.base_url}/api/ml/render", params={"resource": f"/items/{mla_id}", "format": "json"}
-                )
+            client = self._get_client()
+            # Consultar directamente usando el endpoint render que tiene acceso a la API
+            response = await client.get(
+                f"{self.base_url}/api/ml/render",
+                params={"resource": f"/items/{mla_id}", "format": "json"},
+                timeout=10.0,
+            )
 
-                if response.status_code == 404:
-                    return None
+            if response.status_code == 404:
+                return None
 
-                # El render devuelve HTML, pero podemos parsear o usar preview + consulta directa
-                # Mejor usamos el preview y complementamos
-                preview_response = await client.get(
-                    f"{self.base_url}/api/ml/preview", params={"resource": f"/items/{mla_id}"}
-                )
+            # El render devuelve HTML, pero podemos parsear o usar preview + consulta directa
+            # Mejor usamos el preview y complementamos
+            preview_response = await client.get(
+                f"{self.base_url}/api/ml/preview", params={"resource": f"/items/{mla_id}"}, timeout=10.0
+            )
 
-                if preview_response.status_code != 200:
-                    return None
+            if preview_response.status_code != 200:
+                return None
 
-                return preview_response.json()
+            return preview_response.json()
 
         except Exception as e:
             logger.error(f"Error obteniendo item completo {mla_id}: {e}")
             return None
 
+    async def _get_preview_con_reintentos(self, mla_id: str) -> tuple[Optional[Dict], int]:
+        """Preview de un ítem con timeout total por intento y backoff.
+
+        Returns:
+            (data o None, cantidad de reintentos usados)
+        """
+        url = f"{self.base_url}/api/ml/preview"
+        params = {"resource": f"/items/{mla_id}"}
+        client = self._get_client()
+
+        for intento in range(self.retries + 1):
+            try:
+                response = await asyncio.wait_for(client.get(url, params=params), timeout=self.item_timeout)
+                if response.status_code == 200:
+                    return response.json(), intento
+                if response.status_code < 500 and response.status_code not in _RETRYABLE_STATUS:
+                    # 404 / 4xx: definitivo
+                    return None, intento
+                error = f"HTTP {response.status_code}"
+            except (asyncio.TimeoutError, httpx.TimeoutException):
+                error = "timeout"
+            except httpx.HTTPError as e:
+                error = f"error de red: {e}"
+
+            if intento < self.retries:
+                logger.warning(f"Reintentando {mla_id} ({error}, intento {intento + 1}/{self.retries + 1})")
+                await asyncio.sleep(min(self.backoff_base * 2**intento, BACKOFF_MAX))
+            else:
+                logger.error(f"Error obteniendo {mla_id}: {error}")
+        return None, self.retries
+
     async def get_items_batch(self, mla_ids: List[str]) -> Dict[str, Dict]:
-        """Obtiene múltiples items en batch
+        """Obtiene múltiples items en paralelo (acotado por `concurrency`)
 
         Args:
             mla_ids: Lista de IDs de items
@@ -87,33 +196,52 @@ class MLWebhookClient:
         Returns:
             Dict con {mla_id: data} para cada item encontrado
         """
-        results = {}
+        results: Dict[str, Dict] = {}
 
         if not mla_ids:
             return results
 
-        # El servicio no tiene endpoint batch, así que hacemos requests en paralelo
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                tasks = []
-                for mla_id in mla_ids:
-                    task = client.get(f"{self.base_url}/api/ml/preview", params={"resource": f"/items/{mla_id}"})
-                    tasks.append((mla_id, task))
-
-                # Ejecutar todas las requests en paralelo
-                for mla_id, task in tasks:
-                    try:
-                        response = await task
-                        if response.status_code == 200:
-                            data = response.json()
-                            results[mla_id] = data
-                    except Exception as e:
-                        logger.error(f"Error obteniendo {mla_id}: {e}")
-                        continue
-
-        except Exception as e:
-            logger.error(f"Error en batch de items: {e}")
-
+        # El servicio no tiene endpoint batch: un request por MLA, concurrentes
+        semaforo = asyncio.Semaphore(self.concurrency)
+        latencias: List[float] = []
+        reintentos = 0
+        errores = 0
+
+        async def _fetch(mla_id: str) -> None:
+            nonlocal reintentos, errores
+            async with semaforo:
+                inicio = time.perf_counter()
+                try:
+                    data, usados = await self._get_preview_con_reintentos(mla_id)
+                except Exception as e:
+                    logger.error(f"Error obteniendo {mla_id}: {e}")
+                    data, usados = None, 0
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                reintentos += usados
+                if data is not None:
+                    results[mla_id] = data
+                else:
+                    errores += 1
+
+        unicos = list(dict.fromkeys(mla_ids))
+        inicio_batch = time.perf_counter()
+        await asyncio.gather(*(_fetch(mla_id) for mla_id in unicos))
+
+        self.ultimo_batch = MetricasBatch(
+            total=len(unicos),
+            encontrados=len(results),
+            errores=errores,
+            reintentos=reintentos,
+            duracion_s=time.perf_counter() - inicio_batch,
+            latencia_p50_ms=_percentil(latencias, 0.50),
+            latencia_p95_ms=_percentil(latencias, 0.95),
+        )
+        m = self.ultimo_batch
+        logger.info(
+            f"ml-webhook batch: {m.encontrados}/{m.total} items en {m.duracion_s:.2f}s "
+            f"({m.items_por_segundo:.1f} items/s, p50={m.latencia_p50_ms:.0f}ms, "
+            f"p95={m.latencia_p95_ms:.0f}ms, reintentos={m.reintentos})"
+        )
         return results
 
 
@@ -54,14 +54,11 @@ def resolver_usuarios_con_algun_permiso(
     """
     from app.services.permisos_service import PermisosService  # noqa: PLC0415
 
-    svc = PermisosService(session)
-    activos = session.query(Usuario).filter(Usuario.activo.is_(True)).all()
-
-    resultado: list[Usuario] = []
-    for u in activos:
-        if svc.tiene_algun_permiso(u, permisos_requeridos):
-            resultado.append(u)
-    return resultado
+    # Índice inverso permiso → usuarios (cacheado): sin evaluar usuario por usuario
+    ids = PermisosService(session).usuarios_con_algun_permiso(permisos_requeridos)
+    if not ids:
+        return []
+    return session.query(Usuario).filter(Usuario.id.in_(ids), Usuario.activo.is_(True)).order_by(Usuario.id).all()
 
 
 def crear_notificaciones_para_permisos(
@@ -1,21 +1,40 @@
 """
 Servicio de verificación de permisos.
 Implementa el sistema híbrido: rol base + overrides por usuario.
+
+Los sets de permisos (todos los códigos, permisos base por rol, overrides por
+usuario y el índice inverso permiso → usuarios activos) se cachean para todo
+el proceso en el namespace "auth" de app.core.reference_cache, compartido
+entre instancias de PermisosService. Cualquier commit que escriba usuarios,
+roles, permisos u overrides (agregar_override / eliminar_override incluidos)
+lo invalida vía app/events/auth_cache_hooks.
 """
 
-from typing import List, Optional, Set
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple, TypeVar
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_
+from app.core import reference_cache
+from app.events import auth_cache_hooks, pricing_reference_hooks
 from app.models.permiso import Permiso, RolPermisoBase, UsuarioPermisoOverride
 from app.models.usuario import Usuario
 
+T = TypeVar("T")
+
+
+def _cacheado(db: Session, key: Hashable, loader: Callable[[], T]) -> T:
+    """Cache compartido del proceso, salvo que `db` no sea una sesión real o tenga escrituras de auth sin commitear."""
+    namespace = auth_cache_hooks.NAMESPACE
+    if not isinstance(db, Session) or namespace in pricing_reference_hooks.namespaces_pendientes(db):
+        return loader()
+    return reference_cache.cache.get_or_load(namespace, key, loader)
+
 
 class PermisosService:
     """Servicio para verificar y gestionar permisos de usuarios"""
 
     def __init__(self, db: Session):
         self.db = db
-        self._cache_permisos_rol = {}
 
     def obtener_permisos_usuario(self, usuario: Usuario) -> Set[str]:
         """
@@ -27,8 +46,7 @@ class PermisosService:
         """
         # SUPERADMIN siempre tiene TODOS los permisos
         if usuario.es_superadmin:
-            todos_permisos = self.db.query(Permiso.codigo).all()
-            return {p.codigo for p in todos_permisos}
+            return set(self._obtener_todos_los_codigos())
 
         # Obtener permisos base del rol (usando rol_id si existe, sino fallback a rol enum)
         if usuario.rol_id:
@@ -36,58 +54,121 @@ class PermisosService:
         else:
             permisos_rol = self._obtener_permisos_rol_por_codigo(usuario.rol.value if usuario.rol else "VENTAS")
 
-        # Obtener overrides del usuario (con permiso eager-loaded para evitar N+1)
-        overrides = (
-            self.db.query(UsuarioPermisoOverride)
-            .options(joinedload(UsuarioPermisoOverride.permiso))
-            .filter(UsuarioPermisoOverride.usuario_id == usuario.id)
-            .all()
-        )
-
         # Aplicar overrides
         permisos_finales = set(permisos_rol)
 
-        for override in overrides:
-            permiso = override.permiso  # Already loaded via joinedload
-            if permiso:
-                if override.concedido:
-                    permisos_finales.add(permiso.codigo)
-                else:
-                    permisos_finales.discard(permiso.codigo)
+        for codigo, concedido in self._obtener_overrides(usuario.id):
+            if concedido:
+                permisos_finales.add(codigo)
+            else:
+                permisos_finales.discard(codigo)
 
         return permisos_finales
 
+    def _obtener_todos_los_codigos(self) -> FrozenSet[str]:
+        """Catálogo completo de códigos (permisos efectivos de SUPERADMIN)"""
+        return _cacheado(self.db, "todos", lambda: frozenset(p.codigo for p in self.db.query(Permiso.codigo).all()))
+
+    def _obtener_overrides(self, usuario_id: int) -> Tuple[Tuple[str, bool], ...]:
+        """Overrides del usuario como (codigo, concedido)"""
+
+        def _cargar() -> Tuple[Tuple[str, bool], ...]:
+            # Permiso eager-loaded para evitar N+1
+            overrides = (
+                self.db.query(UsuarioPermisoOverride)
+                .options(joinedload(UsuarioPermisoOverride.permiso))
+                .filter(UsuarioPermisoOverride.usuario_id == usuario_id)
+                .all()
+            )
+            return tuple((o.permiso.codigo, bool(o.concedido)) for o in overrides if o.permiso)
+
+        return _cacheado(self.db, ("overrides", usuario_id), _cargar)
+
     def _obtener_permisos_rol_por_id(self, rol_id: int) -> List[str]:
         """Obtiene los permisos base de un rol por ID"""
-        cache_key = f"id_{rol_id}"
-        if cache_key in self._cache_permisos_rol:
-            return self._cache_permisos_rol[cache_key]
-
-        permisos = (
-            self.db.query(Permiso.codigo)
-            .join(RolPermisoBase, RolPermisoBase.permiso_id == Permiso.id)
-            .filter(RolPermisoBase.rol_id == rol_id)
-            .all()
-        )
 
-        codigos = [p.codigo for p in permisos]
-        self._cache_permisos_rol[cache_key] = codigos
-        return codigos
+        def _cargar() -> Tuple[str, ...]:
+            permisos = (
+                self.db.query(Permiso.codigo)
+                .join(RolPermisoBase, RolPermisoBase.permiso_id == Permiso.id)
+                .filter(RolPermisoBase.rol_id == rol_id)
+                .all()
+            )
+            return tuple(p.codigo for p in permisos)
+
+        return list(_cacheado(self.db, ("rol", rol_id), _cargar))
 
     def _obtener_permisos_rol_por_codigo(self, rol_codigo: str) -> List[str]:
         """Obtiene los permisos base de un rol por código (compatibilidad)"""
         from app.models.rol import Rol
 
-        cache_key = f"codigo_{rol_codigo}"
-        if cache_key in self._cache_permisos_rol:
-            return self._cache_permisos_rol[cache_key]
+        def _cargar() -> Optional[int]:
+            rol = self.db.query(Rol.id).filter(Rol.codigo == rol_codigo).first()
+            return rol.id if rol else None
 
         # Buscar el rol por código
-        rol = self.db.query(Rol).filter(Rol.codigo == rol_codigo).first()
-        if not rol:
+        rol_id = _cacheado(self.db, ("rol_codigo", rol_codigo), _cargar)
+        if rol_id is None:
             return []
 
-        return self._obtener_permisos_rol_por_id(rol.id)
+        return self._obtener_permisos_rol_por_id(rol_id)
+
+    def _obtener_indice_permisos(self) -> Dict[str, object]:
+        """Índice inverso de usuarios activos: {"superadmins": ids, "por_permiso": {codigo: ids}}.
+
+        Se arma con cuatro queries (usuarios, roles, permisos base, overrides)
+        en vez de evaluar los permisos usuario por usuario.
+        """
+        from app.models.rol import Rol
+
+        def _cargar() -> Dict[str, object]:
+            usuarios = (
+                self.db.query(Usuario).options(joinedload(Usuario.rol_obj)).filter(Usuario.activo.is_(True)).all()
+            )
+            rol_id_por_codigo = {codigo: rol_id for rol_id, codigo in self.db.query(Rol.id, Rol.codigo)}
+
+            permisos_por_rol: Dict[int, Set[str]] = defaultdict(set)
+            for rol_id, codigo in self.db.query(RolPermisoBase.rol_id, Permiso.codigo).join(
+                Permiso, RolPermisoBase.permiso_id == Permiso.id
+            ):
+                permisos_por_rol[rol_id].add(codigo)
+
+            overrides_por_usuario: Dict[int, List[Tuple[str, bool]]] = defaultdict(list)
+            for usuario_id, codigo, concedido in self.db.query(
+                UsuarioPermisoOverride.usuario_id, Permiso.codigo, UsuarioPermisoOverride.concedido
+            ).join(Permiso, UsuarioPermisoOverride.permiso_id == Permiso.id):
+                overrides_por_usuario[usuario_id].append((codigo, bool(concedido)))
+
+            superadmins: Set[int] = set()
+            por_permiso: Dict[str, Set[int]] = defaultdict(set)
+            for u in usuarios:
+                if u.es_superadmin:
+                    superadmins.add(u.id)
+                    continue
+                rol_id = u.rol_id or rol_id_por_codigo.get(u.rol.value if u.rol else "VENTAS")
+                efectivos = set(permisos_por_rol.get(rol_id, ()))
+                for codigo, concedido in overrides_por_usuario.get(u.id, ()):
+                    if concedido:
+                        efectivos.add(codigo)
+                    else:
+                        efectivos.discard(codigo)
+                for codigo in efectivos:
+                    por_permiso[codigo].add(u.id)
+
+            return {
+                "superadmins": frozenset(superadmins),
+                "por_permiso": {codigo: frozenset(ids) for codigo, ids in por_permiso.items()},
+            }
+
+        return _cacheado(self.db, "indice", _cargar)
+
+    def usuarios_con_algun_permiso(self, permisos: List[str]) -> Set[int]:
+        """IDs de usuarios activos con al menos uno de los permisos (SUPERADMIN siempre incluido)"""
+        indice = self._obtener_indice_permisos()
+        ids = set(indice["superadmins"])
+        for codigo in permisos:
+            ids.update(indice["por_permiso"].get(codigo, ()))
+        return ids
 
     def tiene_permiso(self, usuario: Usuario, permiso_codigo: str) -> bool:
         """
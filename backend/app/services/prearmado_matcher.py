@@ -19,17 +19,52 @@ Reglas:
 - Items con `requiere_serie=false` (gabinete, descuento, Win11 implícito) NO entran al check.
 - Match por completitud de set: el sales order debe contener TODOS los is_ids del prearmado.
 - Prearmados en estado `consumido` o `anulado` se ignoran (terminales).
-- Errores por prearmado se acumulan pero no abortan el resto.
+- Si el set completo está en más de un pedido, gana el de menor soh_id.
+
+Matching por conjuntos:
+    Antes se cargaban los prearmados activos con sus seriales y se corrían hasta
+    dos `GROUP BY ... HAVING` por prearmado (2N queries). Ahora los pares
+    candidatos (prearmado, comp_id, is_id) son un CTE que arma la propia base, y
+    cada camino es UN query que agrupa por (prearmado, soh_id) y compara el
+    `COUNT(DISTINCT is_id)` contra el tamaño del set de ese prearmado. El
+    fallback por factura solo corre si quedaron prearmados activos sin match. Los
+    consumidos se escriben en un único UPDATE por PK.
+
+    No hace falta mandar los pares desde Python (temp table / unnest): ya están
+    en `prearmados_seriales`, así que el CTE evita el ida y vuelta.
+
+Modo incremental:
+    Con `incremental=True` solo se evalúan los prearmados "tocados" desde la
+    corrida anterior: los que tienen algún is_id en filas nuevas de
+    `tb_sale_order_serials` (sose_id) o `tb_item_transaction_serials` (its_id),
+    o cuyos seriales / estado cambiaron (updated_at). El check de completitud
+    sigue mirando TODAS las filas del ERP de esos prearmados. Los watermarks
+    se guardan en `erp_sync_state` bajo la clave `prearmado_matcher`; sin
+    watermark previo la corrida es completa. Toda corrida (completa o no)
+    actualiza el watermark.
+
+    `desde` es el now() de la transacción de la corrida anterior, y now() es el
+    inicio de cada transacción: una edición que commiteó después de esa lectura
+    puede tener un updated_at anterior. Por eso el filtro por updated_at se
+    corre `SOLAPAMIENTO_DESDE` hacia atrás (re-evaluar un prearmado es
+    idempotente). Borrar un serial no deja fila para mirar: el endpoint que lo
+    borra toca `prearmados.updated_at`.
 """
 
+import json
 import logging
-from typing import Dict, List
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
-from sqlalchemy import text
+from sqlalchemy import and_, distinct, or_, select, union, update
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
-from app.models.prearmado import Prearmado
+from app.models.commercial_transaction import CommercialTransaction
+from app.models.erp_sync_state import ERPSyncState
+from app.models.prearmado import Prearmado, PrearmadoSerial
+from app.models.tb_item_transaction_serials import TbItemTransactionSerial
+from app.models.tb_sale_order_serial import TbSaleOrderSerial
 
 
 logger = logging.getLogger(__name__)
@@ -37,85 +72,177 @@ logger = logging.getLogger(__name__)
 
 _ESTADOS_ACTIVOS = ("pendiente", "en_proceso", "armado")
 
-
-def match_prearmados_with_sales_orders(db: Session) -> Dict[str, object]:
+CLAVE_WATERMARK = "prearmado_matcher"
+
+# Margen hacia atrás del filtro por updated_at (transacciones concurrentes)
+SOLAPAMIENTO_DESDE = timedelta(minutes=10)
+
+
+def _leer_watermark(db: Session) -> Optional[dict]:
+    estado = db.get(ERPSyncState, CLAVE_WATERMARK)
+    if estado is None or not estado.watermark:
+        return None
+    wm = json.loads(estado.watermark)
+    return {"sose_id": wm["sose_id"], "its_id": wm["its_id"], "desde": datetime.fromisoformat(wm["desde"])}
+
+
+def _guardar_watermark(db: Session, wm: dict, modo: str, filas: int) -> None:
+    estado = db.get(ERPSyncState, CLAVE_WATERMARK)
+    if estado is None:
+        estado = ERPSyncState(tabla=CLAVE_WATERMARK)
+        db.add(estado)
+    estado.watermark = json.dumps(
+        {"sose_id": wm["sose_id"], "its_id": wm["its_id"], "desde": wm["desde"].isoformat()}, separators=(",", ":")
+    )
+    estado.modo = modo
+    estado.estado = "ok"
+    estado.filas = filas
+    estado.error = None
+
+
+def _watermark_actual(db: Session) -> dict:
+    """Máximos de los cursores del ERP + reloj de la base, tomados ANTES de matchear."""
+    fila = db.execute(
+        select(
+            select(func.max(TbSaleOrderSerial.sose_id)).scalar_subquery(),
+            select(func.max(TbItemTransactionSerial.its_id)).scalar_subquery(),
+            func.now(),
+        )
+    ).one()
+    desde = fila[2]
+    if isinstance(desde, str):  # SQLite devuelve CURRENT_TIMESTAMP como texto
+        desde = datetime.fromisoformat(desde)
+    return {"sose_id": fila[0] or 0, "its_id": fila[1] or 0, "desde": desde}
+
+
+def _prearmados_tocados(wm: dict):
+    """Subquery de prearmado_id con novedades desde el watermark `wm`."""
+    nuevos_sose = select(TbSaleOrderSerial.is_id).where(TbSaleOrderSerial.sose_id > wm["sose_id"])
+    nuevos_its = select(TbItemTransactionSerial.is_id).where(TbItemTransactionSerial.its_id > wm["its_id"])
+    desde = wm["desde"] - SOLAPAMIENTO_DESDE
+    return union(
+        select(PrearmadoSerial.prearmado_id).where(
+            or_(
+                PrearmadoSerial.is_id.in_(nuevos_sose),
+                PrearmadoSerial.is_id.in_(nuevos_its),
+                PrearmadoSerial.updated_at >= desde,
+            )
+        ),
+        select(Prearmado.id).where(Prearmado.updated_at >= desde),
+    )
+
+
+def match_prearmados_with_sales_orders(db: Session, incremental: bool = False) -> Dict[str, object]:
     """
-    Itera los prearmados activos y los marca como `consumido` si sus seriales matchean
-    un sales order completo.
+    Marca como `consumido` los prearmados activos cuyos seriales matchean un sales
+    order completo.
+
+    Args:
+        db: sesión; se commitea al final (match + watermark).
+        incremental: evaluar solo los prearmados con novedades desde la corrida
+            anterior (ver docstring del módulo).
 
     Returns:
         Dict con `matched` (cuántos pasaron a consumido), `total_checked` (cuántos
-        prearmados activos se evaluaron) y `errors` (lista de mensajes por prearmado).
+        prearmados activos se evaluaron) y `errors` (se mantiene por compatibilidad
+        con `RematchResponse`; un error de base ahora aborta la corrida entera).
     """
-    activos: List[Prearmado] = db.query(Prearmado).filter(Prearmado.estado.in_(_ESTADOS_ACTIVOS)).all()
-
-    matched = 0
-    errors: List[str] = []
-
-    for p in activos:
-        try:
-            is_ids = [s.is_id for s in p.seriales if s.requiere_serie and s.validado and s.is_id is not None]
-            if not is_ids:
-                # Sin seriales serializables válidos no podemos matchear todavía
-                continue
-
-            params = {"is_ids": is_ids, "comp_id": p.comp_id, "n": len(is_ids)}
-
-            # Camino 1: pedido pendiente — sales order todavía no facturado.
-            result = db.execute(
-                text(
-                    """
-                    SELECT soh_id
-                    FROM tb_sale_order_serials
-                    WHERE is_id = ANY(:is_ids)
-                      AND comp_id = :comp_id
-                    GROUP BY soh_id
-                    HAVING COUNT(DISTINCT is_id) = :n
-                    LIMIT 1
-                    """
-                ),
-                params,
-            ).first()
-            via = "sale_order_pendiente"
-
-            # Camino 2 (fallback): pedido ya facturado — los seriales pasaron a la
-            # transacción comercial. Recuperamos el soh_id origen via ct_soh_id.
-            if not result:
-                result = db.execute(
-                    text(
-                        """
-                        SELECT ct.ct_soh_id AS soh_id
-                        FROM tb_item_transaction_serials its
-                        INNER JOIN tb_commercial_transactions ct
-                            ON ct.ct_transaction = its.ct_transaction
-                        WHERE its.is_id = ANY(:is_ids)
-                          AND its.comp_id = :comp_id
-                          AND ct.ct_soh_id IS NOT NULL
-                        GROUP BY ct.ct_soh_id
-                        HAVING COUNT(DISTINCT its.is_id) = :n
-                        LIMIT 1
-                        """
-                    ),
-                    params,
-                ).first()
-                via = "factura"
-
-            if result:
-                p.estado = "consumido"
-                p.consumido_por_soh_id = result.soh_id
-                p.consumido_at = func.now()
-                matched += 1
-                logger.info(f"✅ Prearmado {p.codigo} → consumido (soh_id={result.soh_id}, via={via}, is_ids={is_ids})")
-        except Exception as e:
-            msg = f"prearmado {p.id} ({p.codigo}): {e}"
-            errors.append(msg)
-            logger.error(f"❌ Error matching {msg}", exc_info=True)
-
-    if matched > 0:
-        db.commit()
+    anterior = _leer_watermark(db) if incremental else None
+    nuevo_wm = _watermark_actual(db)
+
+    activos = Prearmado.estado.in_(_ESTADOS_ACTIVOS)
+    if anterior is not None:
+        activos = and_(activos, Prearmado.id.in_(_prearmados_tocados(anterior)))
+
+    total_checked = db.execute(select(func.count()).select_from(Prearmado).where(activos)).scalar()
+
+    candidatos = (
+        select(
+            PrearmadoSerial.prearmado_id.label("prearmado_id"),
+            Prearmado.comp_id.label("comp_id"),
+            PrearmadoSerial.is_id.label("is_id"),
+        )
+        .join(Prearmado, Prearmado.id == PrearmadoSerial.prearmado_id)
+        .where(
+            activos,
+            PrearmadoSerial.requiere_serie.is_(True),
+            PrearmadoSerial.validado.is_(True),
+            PrearmadoSerial.is_id.isnot(None),
+        )
+        .distinct()
+        .cte("candidatos")
+    )
+    objetivo = (
+        select(candidatos.c.prearmado_id, func.count(candidatos.c.is_id).label("n"))
+        .group_by(candidatos.c.prearmado_id)
+        .cte("objetivo")
+    )
+
+    def _completos(is_id, comp_id, soh_id, origen, excluir: List[int]):
+        """(prearmado_id, soh_id) donde el sales order contiene el set completo."""
+        q = (
+            select(candidatos.c.prearmado_id, soh_id.label("soh_id"))
+            .select_from(candidatos)
+            .join(objetivo, objetivo.c.prearmado_id == candidatos.c.prearmado_id)
+            .join(origen, and_(is_id == candidatos.c.is_id, comp_id == candidatos.c.comp_id))
+            .where(soh_id.isnot(None))
+            .group_by(candidatos.c.prearmado_id, soh_id, objetivo.c.n)
+            .having(func.count(distinct(is_id)) == objetivo.c.n)
+        )
+        if excluir:
+            q = q.where(candidatos.c.prearmado_id.notin_(excluir))
+        return q
+
+    caminos = [
+        (
+            "sale_order_pendiente",
+            TbSaleOrderSerial.is_id,
+            TbSaleOrderSerial.comp_id,
+            TbSaleOrderSerial.soh_id,
+            TbSaleOrderSerial.__table__,
+        ),
+        (
+            "factura",
+            TbItemTransactionSerial.is_id,
+            TbItemTransactionSerial.comp_id,
+            CommercialTransaction.ct_soh_id,
+            TbItemTransactionSerial.__table__.join(
+                CommercialTransaction.__table__,
+                CommercialTransaction.ct_transaction == TbItemTransactionSerial.ct_transaction,
+            ),
+        ),
+    ]
+
+    matches: Dict[int, int] = {}
+    pendientes = total_checked
+    for via, is_id, comp_id, soh_id, origen in caminos:
+        if pendientes <= len(matches):
+            break
+        filas = db.execute(_completos(is_id, comp_id, soh_id, origen, list(matches))).all()
+        por_prearmado: Dict[int, int] = {}
+        for prearmado_id, soh in filas:
+            por_prearmado[prearmado_id] = min(soh, por_prearmado.get(prearmado_id, soh))
+        for prearmado_id, soh in por_prearmado.items():
+            matches[prearmado_id] = soh
+            logger.info(f"✅ Prearmado {prearmado_id} → consumido (soh_id={soh}, via={via})")
+
+    if matches:
+        ahora = nuevo_wm["desde"]
+        db.execute(
+            # executemany no admite IN expandido: el guard de estado va como OR
+            update(Prearmado).where(or_(*(Prearmado.estado == e for e in _ESTADOS_ACTIVOS))),
+            [
+                {"id": pid, "estado": "consumido", "consumido_por_soh_id": soh, "consumido_at": ahora}
+                for pid, soh in matches.items()
+            ],
+            execution_options={"synchronize_session": False},
+        )
+
+    _guardar_watermark(db, nuevo_wm, "incremental" if anterior is not None else "full", total_checked)
+    db.commit()
 
     return {
-        "matched": matched,
-        "total_checked": len(activos),
-        "errors": errors,
+        "matched": len(matches),
+        "total_checked": total_checked,
+        "errors": [],
     }
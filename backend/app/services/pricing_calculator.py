@@ -1,4 +1,6 @@
 from typing import Dict, Optional
+from app.core.reference_cache import cache as reference_cache
+from app.events import pricing_reference_hooks  # registra listeners de invalidación del cache
 from app.models.tipo_cambio import TipoCambio
 from app.models.comision_config import SubcategoriaGrupo, ComisionListaGrupo
 from app.models.comision_versionada import ComisionVersion, ComisionBase, ComisionAdicionalCuota
@@ -18,15 +20,25 @@ VARIOS_DEFAULT = 6.5
 GRUPO_DEFAULT = 1  # Grupo por defecto si la subcategoría no está asignada
 
 
-def obtener_constantes_pricing(db: Session) -> Dict[str, float]:
-    """Obtiene las constantes de pricing vigentes desde la base de datos"""
+def _cacheado(db: Session, namespace: str, key, loader):
+    """Lee del cache de referencia (app.core.reference_cache) o carga con `loader`.
+
+    No usa el cache si `db` no es una sesión real, ni si esta misma sesión
+    escribió datos de ese namespace sin commitear (tiene que verlos ella sola).
+    """
+    if not isinstance(db, Session) or namespace in pricing_reference_hooks.namespaces_pendientes(db):
+        return loader()
+    return reference_cache.get_or_load(namespace, key, loader)
+
+
+def _cargar_constantes_pricing(db: Session, hoy: date) -> Dict[str, float]:
     # Ordenar por fecha_desde DESC para tomar la versión más reciente si hay múltiples vigentes
     constants = (
         db.query(PricingConstants)
         .filter(
             and_(
-                PricingConstants.fecha_desde <= date.today(),
-                or_(PricingConstants.fecha_hasta.is_(None), PricingConstants.fecha_hasta >= date.today()),
+                PricingConstants.fecha_desde <= hoy,
+                or_(PricingConstants.fecha_hasta.is_(None), PricingConstants.fecha_hasta >= hoy),
             )
         )
         .order_by(PricingConstants.fecha_desde.desc())
@@ -62,16 +74,74 @@ def obtener_constantes_pricing(db: Session) -> Dict[str, float]:
     }
 
 
+def obtener_constantes_pricing(db: Session) -> Dict[str, float]:
+    """Obtiene las constantes de pricing vigentes desde la base de datos (cacheadas por día)"""
+    hoy = date.today()
+    constantes = _cacheado(db, "constantes", hoy, lambda: _cargar_constantes_pricing(db, hoy))
+    # Copia: el dict cacheado es compartido por todo el proceso
+    return dict(constantes)
+
+
+def obtener_constantes_metricas(db: Session, fecha: date) -> Optional[Dict[str, Optional[float]]]:
+    """Constantes con fecha_desde <= fecha más reciente (criterio de los calculadores de métricas ML), cacheadas.
+
+    Returns:
+        Dict con tiers, varios y offset_flex, o None si no hay constantes cargadas
+    """
+
+    def _cargar() -> Optional[Dict[str, Optional[float]]]:
+        constants = (
+            db.query(PricingConstants)
+            .filter(PricingConstants.fecha_desde <= fecha)
+            .order_by(PricingConstants.fecha_desde.desc())
+            .first()
+        )
+        if not constants:
+            return None
+        return {
+            "monto_tier1": float(constants.monto_tier1),
+            "monto_tier2": float(constants.monto_tier2),
+            "monto_tier3": float(constants.monto_tier3),
+            "tier1": float(constants.comision_tier1),
+            "tier2": float(constants.comision_tier2),
+            "tier3": float(constants.comision_tier3),
+            "varios": float(constants.varios_porcentaje),
+            "offset_flex": float(constants.offset_flex) if constants.offset_flex is not None else None,
+        }
+
+    return _cacheado(db, "constantes", ("metricas", fecha), _cargar)
+
+
 def obtener_tipo_cambio_actual(db: Session, moneda: str = "USD") -> Optional[float]:
     """Obtiene el tipo de cambio de venta actual"""
-    tc = db.query(TipoCambio).filter(TipoCambio.moneda == moneda, TipoCambio.fecha == date.today()).first()
+    hoy = date.today()
+
+    def _cargar() -> Optional[float]:
+        tc = db.query(TipoCambio).filter(TipoCambio.moneda == moneda, TipoCambio.fecha == hoy).first()
 
-    if tc:
-        return tc.venta
+        if tc:
+            return tc.venta
 
-    tc = db.query(TipoCambio).filter(TipoCambio.moneda == moneda).order_by(TipoCambio.fecha.desc()).first()
+        tc = db.query(TipoCambio).filter(TipoCambio.moneda == moneda).order_by(TipoCambio.fecha.desc()).first()
 
-    return tc.venta if tc else None
+        return tc.venta if tc else None
+
+    return _cacheado(db, "tipo_cambio", ("actual", moneda, hoy), _cargar)
+
+
+def obtener_tipo_cambio_fecha(db: Session, fecha: date, moneda: str = "USD") -> Optional[float]:
+    """Tipo de cambio de venta de una fecha; si no hay, el más reciente anterior"""
+
+    def _cargar() -> Optional[float]:
+        tc = (
+            db.query(TipoCambio)
+            .filter(TipoCambio.moneda == moneda, TipoCambio.fecha <= fecha)
+            .order_by(TipoCambio.fecha.desc())
+            .first()
+        )
+        return float(tc.venta) if tc and tc.venta is not None else None
+
+    return _cacheado(db, "tipo_cambio", ("fecha", moneda, fecha), _cargar)
 
 
 def convertir_a_pesos(costo: float, moneda: str, tipo_cambio: Optional[float]) -> float:
@@ -83,10 +153,21 @@ def convertir_a_pesos(costo: float, moneda: str, tipo_cambio: Optional[float]) -
     return costo
 
 
+def obtener_mapa_subcategoria_grupo(db: Session) -> Dict[int, int]:
+    """Mapeo completo subcat_id → grupo_id (una query, cacheado)"""
+
+    def _cargar() -> Dict[int, int]:
+        return {
+            subcat_id: grupo_id
+            for subcat_id, grupo_id in db.query(SubcategoriaGrupo.subcat_id, SubcategoriaGrupo.grupo_id)
+        }
+
+    return _cacheado(db, "subcategorias", "mapa", _cargar)
+
+
 def obtener_grupo_subcategoria(db: Session, subcategoria_id: int) -> int:
     """Obtiene el grupo al que pertenece una subcategoría. Si no existe, retorna grupo 1"""
-    mapping = db.query(SubcategoriaGrupo).filter(SubcategoriaGrupo.subcat_id == subcategoria_id).first()
-    return mapping.grupo_id if mapping else GRUPO_DEFAULT
+    return obtener_mapa_subcategoria_grupo(db).get(subcategoria_id, GRUPO_DEFAULT)
 
 
 def obtener_envio_promedio_grupo(db: Session, grupo_id: int) -> float:
@@ -102,22 +183,69 @@ def obtener_envio_promedio_grupo(db: Session, grupo_id: int) -> float:
     from app.models.producto import ProductoERP
     from sqlalchemy import func
 
-    # Obtener subcategorías del grupo
-    subcategorias = db.query(SubcategoriaGrupo.subcat_id).filter(SubcategoriaGrupo.grupo_id == grupo_id).all()
+    def _cargar() -> Dict[int, float]:
+        # Promedio de envío de productos activos con envío > 0, para todos los grupos de una vez
+        rows = (
+            db.query(SubcategoriaGrupo.grupo_id, func.avg(ProductoERP.envio))
+            .join(ProductoERP, ProductoERP.subcategoria_id == SubcategoriaGrupo.subcat_id)
+            .filter(ProductoERP.activo == True, ProductoERP.envio > 0)
+            .group_by(SubcategoriaGrupo.grupo_id)
+            .all()
+        )
+        return {gid: float(avg) for gid, avg in rows if avg}
 
-    if not subcategorias:
-        return 0.0
+    return _cacheado(db, "envio_promedio", "por_grupo", _cargar).get(grupo_id, 0.0)
 
-    subcat_ids = [s[0] for s in subcategorias]
 
-    # Calcular promedio de envío para productos activos con envío > 0
-    resultado = (
-        db.query(func.avg(ProductoERP.envio))
-        .filter(ProductoERP.subcategoria_id.in_(subcat_ids), ProductoERP.activo == True, ProductoERP.envio > 0)
-        .scalar()
-    )
+def obtener_envio_promedio_subcategorias(db: Session) -> Dict[int, float]:
+    """Envío promedio de productos activos con envío > 0, por subcategoría (cacheado)"""
+    from app.models.producto import ProductoERP
+    from sqlalchemy import func
 
-    return float(resultado) if resultado else 0.0
+    def _cargar() -> Dict[int, float]:
+        rows = (
+            db.query(ProductoERP.subcategoria_id, func.avg(ProductoERP.envio))
+            .filter(ProductoERP.subcategoria_id.isnot(None), ProductoERP.activo == True, ProductoERP.envio > 0)
+            .group_by(ProductoERP.subcategoria_id)
+            .all()
+        )
+        return {sc_id: float(avg) for sc_id, avg in rows if avg}
+
+    return _cacheado(db, "envio_promedio", "por_subcategoria", _cargar)
+
+
+def obtener_comisiones_vigentes(db: Session, fecha: date) -> Optional[Dict]:
+    """Versión de comisiones vigente en `fecha` con sus bases por grupo y adicionales por cuotas.
+
+    Returns:
+        {"version_id", "base_by_grupo", "adicional_by_cuotas"} o None si no hay versión activa
+    """
+
+    def _cargar() -> Optional[Dict]:
+        version = (
+            db.query(ComisionVersion)
+            .filter(
+                and_(
+                    ComisionVersion.fecha_desde <= fecha,
+                    or_(ComisionVersion.fecha_hasta.is_(None), ComisionVersion.fecha_hasta >= fecha),
+                    ComisionVersion.activo == True,
+                )
+            )
+            .first()
+        )
+        if not version:
+            return None
+        base_by_grupo = {
+            cb.grupo_id: float(cb.comision_base)
+            for cb in db.query(ComisionBase).filter(ComisionBase.version_id == version.id).all()
+        }
+        adicional_by_cuotas = {
+            ca.cuotas: float(ca.adicional)
+            for ca in db.query(ComisionAdicionalCuota).filter(ComisionAdicionalCuota.version_id == version.id).all()
+        }
+        return {"version_id": version.id, "base_by_grupo": base_by_grupo, "adicional_by_cuotas": adicional_by_cuotas}
+
+    return _cacheado(db, "comisiones", fecha, _cargar)
 
 
 def obtener_comision_versionada(
@@ -151,35 +279,18 @@ def obtener_comision_versionada(
     if fecha is None:
         fecha = date.today()
 
-    # Obtener versión vigente para la fecha
-    version = (
-        db.query(ComisionVersion)
-        .filter(
-            and_(
-                ComisionVersion.fecha_desde <= fecha,
-                or_(ComisionVersion.fecha_hasta.is_(None), ComisionVersion.fecha_hasta >= fecha),
-                ComisionVersion.activo == True,
-            )
-        )
-        .first()
-    )
+    # Versión vigente para la fecha (con bases y adicionales ya cargados)
+    comisiones = obtener_comisiones_vigentes(db, fecha)
 
-    if not version:
+    if not comisiones:
         # No hay versión activa para esta fecha
         return None
 
-    # Obtener comisión base para este grupo
-    comision_base_obj = (
-        db.query(ComisionBase)
-        .filter(and_(ComisionBase.version_id == version.id, ComisionBase.grupo_id == grupo_id))
-        .first()
-    )
+    comision_base = comisiones["base_by_grupo"].get(grupo_id)
 
-    if not comision_base_obj:
+    if comision_base is None:
         return None
 
-    comision_base = float(comision_base_obj.comision_base)
-
     # Si es lista 4 (clásica), retornar solo la base
     if pricelist_id == 4:
         return comision_base
@@ -197,17 +308,11 @@ def obtener_comision_versionada(
         # Si no es una lista de cuotas conocida, retornar la base
         return comision_base
 
-    # Obtener adicional para estas cuotas
-    adicional_obj = (
-        db.query(ComisionAdicionalCuota)
-        .filter(and_(ComisionAdicionalCuota.version_id == version.id, ComisionAdicionalCuota.cuotas == cuotas))
-        .first()
-    )
+    adicional = comisiones["adicional_by_cuotas"].get(cuotas)
 
-    if not adicional_obj:
+    if adicional is None:
         return comision_base
 
-    adicional = float(adicional_obj.adicional)
     return comision_base + adicional
 
 
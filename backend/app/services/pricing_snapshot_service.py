@@ -0,0 +1,672 @@
+"""
+pricing_snapshot_service — snapshot desnormalizado de precios y markups por ítem/lista.
+
+El listado, los exports y el pricing recalculaban por producto y por request
+el rebate, la mejor oferta y los markups de cuotas / PVP, llamando una y otra
+vez a calcular_comision_ml_total / calcular_limpio / calcular_markup con el
+mismo tipo de cambio, constantes y versión de comisiones. Este módulo
+concentra ese cálculo y lo persiste en ``pricing_snapshots`` (ver modelo).
+
+Design decisions (ADR):
+  1. Una única función pura (calcular_snapshot_item) arma las filas de un ítem.
+     La usan tanto el refresh como los endpoints cuando una fila falta o está
+     vencida → una sola fórmula, sin divergencias entre listado y export.
+  2. Inputs globales (tipo de cambio, constantes, set de comisiones vigente,
+     envío promedio por grupo) se resumen en una huella (inputs_hash). Un
+     cambio en cualquiera invalida todas las filas sin tener que escribirlas:
+     la lectura sólo acepta filas con la huella actual. La fecha NO entra en
+     la huella (vencería todo el catálogo a medianoche): las ofertas que
+     entran o salen de vigencia después del día de cálculo invalidan sólo
+     los ítems afectados (_items_con_vigencia_cruzada).
+  3. Inputs por ítem: ediciones ORM de ProductoPricing / PrecioML / OfertaML /
+     ProductoERP marcan ``stale`` vía app.events.pricing_snapshot_hooks; los
+     syncs que escriben por fuera del ORM se detectan por timestamps
+     (updated_at / fecha_modificacion / fecha_actualizacion posteriores a
+     calculado_at).
+  4. El refresh escribe delete+insert por chunk (portable, sin ON CONFLICT) y
+     también actualiza productos_pricing.markup_rebate / markup_oferta, que
+     usan los filtros y el ordenamiento en SQL del listado. calculado_at es
+     el instante ANTERIOR a leer los inputs, y antes de insertar se releen
+     los timestamps de ERP / pricing: un ítem editado mientras se calculaba
+     (timestamp distinto al leído) no se escribe y queda faltante, o sea
+     pendiente, en vez de pisar su stale con un cálculo de inputs viejos.
+  5. El costo de envío real (mlwebhook) no tiene timestamp local: se relee
+     cuando el ítem se recalcula por cualquier otro motivo o en el refresh completo.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, time as dt_time
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.models.oferta_ml import OfertaML
+from app.models.precio_ml import PrecioML
+from app.models.pricing_snapshot import PricingSnapshot
+from app.models.producto import ProductoERP, ProductoPricing
+from app.models.publicacion_ml import PublicacionML
+from app.services.envio_real_service import resolver_costos_envio_batch
+from app.services.pricing_calculator import (
+    GRUPO_DEFAULT,
+    calcular_comision_ml_total,
+    calcular_limpio,
+    calcular_markup,
+    convertir_a_pesos,
+    obtener_comisiones_vigentes,
+    obtener_constantes_pricing,
+    obtener_envio_promedio_subcategorias,
+    obtener_mapa_subcategoria_grupo,
+    obtener_tipo_cambio_actual,
+)
+
+logger = logging.getLogger(__name__)
+
+LISTA_CLASICA = 4
+
+# pricelist_id → atributo de ProductoPricing con el precio de esa lista
+LISTAS_CUOTAS: dict[int, str] = {
+    17: "precio_3_cuotas",
+    14: "precio_6_cuotas",
+    13: "precio_9_cuotas",
+    23: "precio_12_cuotas",
+}
+LISTAS_PVP: dict[int, str] = {
+    12: "precio_pvp",
+    18: "precio_pvp_3_cuotas",
+    19: "precio_pvp_6_cuotas",
+    20: "precio_pvp_9_cuotas",
+    21: "precio_pvp_12_cuotas",
+}
+
+# Mismos mapeos que obtener_comision_versionada
+PRICELIST_PVP_TO_WEB: dict[int, int] = {12: 4, 18: 17, 19: 14, 20: 13, 21: 23}
+PRICELIST_TO_CUOTAS: dict[int, int] = {17: 3, 14: 6, 13: 9, 23: 12}
+
+CHUNK_SIZE = 1000
+
+
+# ---------------------------------------------------------------------------
+# Contexto global de pricing (un set de queries por request / refresh)
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ContextoPricing:
+    """Inputs globales del cálculo, precargados una sola vez."""
+
+    fecha: date
+    tipo_cambio_usd: Optional[float]
+    constantes: dict
+    subcat_to_grupo: dict[int, int]
+    version_id: Optional[int]
+    comision_base_by_grupo: dict[int, float]
+    adicional_by_cuotas: dict[int, float]
+    envio_promedio_by_grupo: dict[int, float]
+    _fingerprint: Optional[str] = field(default=None, repr=False)
+
+    def grupo(self, subcategoria_id: Optional[int]) -> int:
+        return self.subcat_to_grupo.get(subcategoria_id, GRUPO_DEFAULT)
+
+    def comision(self, pricelist_id: int, grupo_id: int) -> Optional[float]:
+        """Equivalente en memoria de obtener_comision_base."""
+        if self.version_id is None:
+            return None
+        base = self.comision_base_by_grupo.get(grupo_id)
+        if base is None:
+            return None
+        resolved_pl = PRICELIST_PVP_TO_WEB.get(pricelist_id, pricelist_id)
+        if resolved_pl == LISTA_CLASICA:
+            return base
+        cuotas = PRICELIST_TO_CUOTAS.get(resolved_pl)
+        if cuotas is None:
+            return base
+        return base + self.adicional_by_cuotas.get(cuotas, 0)
+
+    def resolver_envio(
+        self, envio_real: Optional[float], envio_erp: Optional[float], grupo_id: int, precio: float
+    ) -> float:
+        """Costo real de mlwebhook primero; si no, envío ERP con fallback al promedio del grupo."""
+        if envio_real is not None:
+            return envio_real
+        costo_envio = envio_erp or 0
+        if costo_envio == 0 and precio >= self.constantes["monto_tier3"] and grupo_id is not None:
+            costo_envio = self.envio_promedio_by_grupo.get(grupo_id, 0.0)
+        return costo_envio
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            payload = {
+                "tc": self.tipo_cambio_usd,
+                "constantes": self.constantes,
+                "version": self.version_id,
+                "base": sorted(self.comision_base_by_grupo.items()),
+                "adicional": sorted(self.adicional_by_cuotas.items()),
+                "subcat": sorted(self.subcat_to_grupo.items()),
+                "envio": sorted((g, round(v, 2)) for g, v in self.envio_promedio_by_grupo.items()),
+            }
+            raw = json.dumps(payload, sort_keys=True, default=str)
+            self._fingerprint = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+
+def cargar_contexto_pricing(db: Session, hoy: Optional[date] = None) -> ContextoPricing:
+    """Precarga tipo de cambio, constantes, grupos, comisiones y envío promedio por grupo."""
+    hoy = hoy or date.today()
+
+    # Datos de referencia: salen del cache de proceso (app.core.reference_cache)
+    subcat_to_grupo = obtener_mapa_subcategoria_grupo(db)
+    comisiones = obtener_comisiones_vigentes(db, hoy)
+
+    # Envío promedio por grupo = promedio de los promedios por subcategoría
+    subcat_envio_avg = obtener_envio_promedio_subcategorias(db)
+    envio_promedio_by_grupo: dict[int, float] = {gid: 0.0 for gid in set(subcat_to_grupo.values())}
+    grupo_to_subcats: dict[int, list[int]] = {}
+    for sc_id, g_id in subcat_to_grupo.items():
+        grupo_to_subcats.setdefault(g_id, []).append(sc_id)
+    for gid, sc_list in grupo_to_subcats.items():
+        vals = [subcat_envio_avg[sc] for sc in sc_list if sc in subcat_envio_avg]
+        if vals:
+            envio_promedio_by_grupo[gid] = sum(vals) / len(vals)
+
+    return ContextoPricing(
+        fecha=hoy,
+        tipo_cambio_usd=obtener_tipo_cambio_actual(db, "USD"),
+        constantes=obtener_constantes_pricing(db),
+        subcat_to_grupo=subcat_to_grupo,
+        version_id=comisiones["version_id"] if comisiones else None,
+        comision_base_by_grupo=comisiones["base_by_grupo"] if comisiones else {},
+        adicional_by_cuotas=comisiones["adicional_by_cuotas"] if comisiones else {},
+        envio_promedio_by_grupo=envio_promedio_by_grupo,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Inputs por ítem (publicaciones, ofertas, precios ML, envío real)
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class InputsItems:
+    pubs_by_item: dict[int, list] = field(default_factory=dict)
+    ofertas_by_mla: dict[str, OfertaML] = field(default_factory=dict)
+    precios_pvp_by_item: dict[int, dict[int, Optional[float]]] = field(default_factory=dict)
+    envio_real_by_item: dict[int, float] = field(default_factory=dict)
+
+
+def cargar_pubs_items(db: Session, item_ids: list[int]) -> dict[int, list]:
+    pubs_by_item: dict[int, list] = {}
+    if item_ids:
+        for pub in db.query(PublicacionML).filter(PublicacionML.item_id.in_(item_ids)).all():
+            pubs_by_item.setdefault(pub.item_id, []).append(pub)
+    return pubs_by_item
+
+
+def cargar_inputs_items(
+    db: Session, ctx: ContextoPricing, item_ids: list[int], pubs_by_item: Optional[dict[int, list]] = None
+) -> InputsItems:
+    """Carga en bloque (4 queries) todo lo que calcular_snapshot_item necesita por ítem."""
+    if pubs_by_item is None:
+        pubs_by_item = cargar_pubs_items(db, item_ids)
+
+    all_mlas = [pub.mla for pubs in pubs_by_item.values() for pub in pubs]
+    ofertas_by_mla: dict[str, OfertaML] = {}
+    if all_mlas:
+        ofertas = (
+            db.query(OfertaML)
+            .filter(
+                OfertaML.mla.in_(all_mlas),
+                OfertaML.fecha_desde <= ctx.fecha,
+                OfertaML.fecha_hasta >= ctx.fecha,
+                OfertaML.pvp_seller.isnot(None),
+            )
+            .all()
+        )
+        for oferta in ofertas:
+            ofertas_by_mla.setdefault(oferta.mla, oferta)
+
+    precios_pvp_by_item: dict[int, dict[int, Optional[float]]] = {}
+    if item_ids:
+        rows = (
+            db.query(PrecioML.item_id, PrecioML.pricelist_id, PrecioML.precio)
+            .filter(PrecioML.item_id.in_(item_ids), PrecioML.pricelist_id.in_(list(LISTAS_PVP)))
+            .all()
+        )
+        for item_id, pricelist_id, precio in rows:
+            precios_pvp_by_item.setdefault(item_id, {})[pricelist_id] = float(precio) if precio else None
+
+    return InputsItems(
+        pubs_by_item=pubs_by_item,
+        ofertas_by_mla=ofertas_by_mla,
+        precios_pvp_by_item=precios_pvp_by_item,
+        envio_real_by_item=resolver_costos_envio_batch(db, item_ids, pubs_by_item=pubs_by_item) if item_ids else {},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Cálculo puro
+# ---------------------------------------------------------------------------
+
+
+def calcular_snapshot_item(
+    ctx: ContextoPricing,
+    producto_erp: ProductoERP,
+    producto_pricing: Optional[ProductoPricing],
+    inputs: InputsItems,
+) -> dict[int, dict]:
+    """Calcula las filas de snapshot de un ítem: {pricelist_id: {campo: valor}}.
+
+    Siempre devuelve la fila de la lista clásica (con rebate / mejor oferta);
+    el resto de las listas sólo si tienen precio. Markups en porcentaje.
+    """
+    item_id = producto_erp.item_id
+    iva = producto_erp.iva
+    grupo_id = ctx.grupo(producto_erp.subcategoria_id)
+    tipo_cambio = ctx.tipo_cambio_usd if producto_erp.moneda_costo == "USD" else None
+    costo_ars = convertir_a_pesos(producto_erp.costo, producto_erp.moneda_costo, tipo_cambio)
+    envio_real = inputs.envio_real_by_item.get(item_id)
+
+    def _calcular(precio: float, pricelist_id: int) -> Optional[dict]:
+        comision_base = ctx.comision(pricelist_id, grupo_id)
+        if not comision_base:
+            return None
+        comisiones = calcular_comision_ml_total(precio, comision_base, iva, constantes=ctx.constantes)
+        costo_envio = ctx.resolver_envio(envio_real, producto_erp.envio, grupo_id, precio)
+        limpio = calcular_limpio(precio, iva, costo_envio, comisiones["comision_total"], constantes=ctx.constantes)
+        return {
+            "markup": calcular_markup(limpio, costo_ars) * 100,
+            "costo_envio": costo_envio,
+            "comision_total": comisiones["comision_total"],
+            "limpio": limpio,
+        }
+
+    def _fila(precio: Optional[float], pricelist_id: int, redondear: bool = False) -> dict:
+        fila = {"precio": precio, "markup": None, "costo_ars": costo_ars}
+        if precio and precio > 0:
+            try:
+                calculo = _calcular(precio, pricelist_id)
+            except Exception:
+                calculo = None
+            if calculo:
+                fila.update(calculo)
+                if redondear:
+                    fila["markup"] = round(fila["markup"], 2)
+        return fila
+
+    # ── Lista clásica + datos a nivel ítem ───────────────────────────────
+    precio_lista = (
+        float(producto_pricing.precio_lista_ml) if producto_pricing and producto_pricing.precio_lista_ml else None
+    )
+    clasica = _fila(precio_lista, LISTA_CLASICA)
+
+    # Mejor oferta vigente: primera publicación con oferta
+    mejor_oferta = mejor_pub = None
+    for pub in inputs.pubs_by_item.get(item_id, []):
+        oferta = inputs.ofertas_by_mla.get(pub.mla)
+        if oferta:
+            mejor_oferta, mejor_pub = oferta, pub
+            break
+
+    oferta_campos: dict = {
+        "mejor_oferta_mla": None,
+        "mejor_oferta_precio": None,
+        "mejor_oferta_pvp": None,
+        "mejor_oferta_monto": None,
+        "mejor_oferta_porcentaje": None,
+        "mejor_oferta_fecha_hasta": None,
+        "markup_oferta": None,
+    }
+    if mejor_oferta:
+        precio_final = float(mejor_oferta.precio_final) if mejor_oferta.precio_final else None
+        pvp = float(mejor_oferta.pvp_seller) if mejor_oferta.pvp_seller else None
+        oferta_campos.update(
+            mejor_oferta_mla=mejor_pub.mla,
+            mejor_oferta_precio=precio_final,
+            mejor_oferta_pvp=pvp,
+            mejor_oferta_porcentaje=(
+                float(mejor_oferta.aporte_meli_porcentaje) if mejor_oferta.aporte_meli_porcentaje else None
+            ),
+            mejor_oferta_fecha_hasta=mejor_oferta.fecha_hasta,
+            mejor_oferta_monto=pvp - precio_final if precio_final and pvp else None,
+        )
+        if pvp and pvp > 0:
+            calculo = _calcular(pvp, mejor_pub.pricelist_id)
+            if calculo:
+                oferta_campos["markup_oferta"] = calculo["markup"]
+
+    precio_rebate = markup_rebate = None
+    if producto_pricing and producto_pricing.precio_lista_ml and producto_pricing.participa_rebate:
+        porcentaje = float(
+            producto_pricing.porcentaje_rebate if producto_pricing.porcentaje_rebate is not None else 3.8
+        )
+        precio_rebate = float(producto_pricing.precio_lista_ml) / (1 - porcentaje / 100)
+        if precio_rebate > 0:
+            calculo = _calcular(precio_rebate, LISTA_CLASICA)
+            if calculo:
+                markup_rebate = calculo["markup"]
+
+    clasica.update(oferta_campos, precio_rebate=precio_rebate, markup_rebate=markup_rebate)
+    filas: dict[int, dict] = {LISTA_CLASICA: clasica}
+
+    # ── Cuotas ───────────────────────────────────────────────────────────
+    if producto_pricing:
+        for pricelist_id, attr in LISTAS_CUOTAS.items():
+            precio = getattr(producto_pricing, attr)
+            if precio is not None:
+                filas[pricelist_id] = _fila(float(precio), pricelist_id)
+
+    # ── PVP: precios_ml manda si el ítem tiene precios PVP sincronizados ──
+    precios_pvp_ml = inputs.precios_pvp_by_item.get(item_id)
+    for pricelist_id, attr in LISTAS_PVP.items():
+        if precios_pvp_ml is not None:
+            precio = precios_pvp_ml.get(pricelist_id)
+            redondear = False
+        else:
+            valor = getattr(producto_pricing, attr) if producto_pricing else None
+            precio = float(valor) if valor else None
+            redondear = True
+        if precio is not None:
+            filas[pricelist_id] = _fila(precio, pricelist_id, redondear=redondear)
+
+    return filas
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+_CAMPOS_SNAPSHOT = [
+    c.name
+    for c in PricingSnapshot.__table__.columns
+    if c.name not in ("item_id", "pricelist_id", "inputs_hash", "stale", "calculado_at")
+]
+
+
+def _fila_a_dict(row: PricingSnapshot) -> dict:
+    return {campo: getattr(row, campo) for campo in _CAMPOS_SNAPSHOT}
+
+
+def _dia_calculo(calculado_at: datetime) -> date:
+    """Día local en que se calculó la fila (SQLite devuelve el timestamp UTC sin zona)."""
+    if calculado_at.tzinfo is None:
+        calculado_at = calculado_at.replace(tzinfo=UTC)
+    return calculado_at.astimezone().date()
+
+
+def _items_con_vigencia_cruzada(db: Session, ctx: ContextoPricing, dia_por_item: dict[int, date]) -> set[int]:
+    """Ítems con alguna oferta que entró o salió de vigencia entre el día en que
+    se calculó su snapshot y ``ctx.fecha``. Las filas calculadas hoy nunca lo están."""
+    viejos = {item_id: dia for item_id, dia in dia_por_item.items() if dia < ctx.fecha}
+    if not viejos:
+        return set()
+    desde_min = min(viejos.values())
+    query = (
+        db.query(PublicacionML.item_id, OfertaML.fecha_desde, OfertaML.fecha_hasta)
+        .join(OfertaML, OfertaML.mla == PublicacionML.mla)
+        .filter(
+            OfertaML.pvp_seller.isnot(None),
+            or_(
+                and_(OfertaML.fecha_desde > desde_min, OfertaML.fecha_desde <= ctx.fecha),
+                and_(OfertaML.fecha_hasta >= desde_min, OfertaML.fecha_hasta < ctx.fecha),
+            ),
+        )
+    )
+    if len(viejos) <= CHUNK_SIZE:
+        query = query.filter(PublicacionML.item_id.in_(list(viejos)))
+
+    cruzados: set[int] = set()
+    for item_id, fecha_desde, fecha_hasta in query.all():
+        dia = viejos.get(item_id)
+        if dia is None:
+            continue
+        # Entró en vigencia después del cálculo, o estaba vigente ese día y ya venció
+        if dia < fecha_desde <= ctx.fecha or dia <= fecha_hasta < ctx.fecha:
+            cruzados.add(item_id)
+    return cruzados
+
+
+def leer_snapshot_vigente(db: Session, ctx: ContextoPricing, item_ids: list[int]) -> dict[int, dict[int, dict]]:
+    """Filas vigentes (no stale, huella actual) agrupadas por ítem."""
+    resultado: dict[int, dict[int, dict]] = {}
+    if not item_ids:
+        return resultado
+    rows = (
+        db.query(PricingSnapshot)
+        .filter(
+            PricingSnapshot.item_id.in_(item_ids),
+            PricingSnapshot.stale == False,
+            PricingSnapshot.inputs_hash == ctx.fingerprint,
+        )
+        .all()
+    )
+    dia_por_item: dict[int, date] = {}
+    for row in rows:
+        resultado.setdefault(row.item_id, {})[row.pricelist_id] = _fila_a_dict(row)
+        if row.pricelist_id == LISTA_CLASICA:
+            dia_por_item[row.item_id] = _dia_calculo(row.calculado_at)
+    cruzados = _items_con_vigencia_cruzada(db, ctx, dia_por_item)
+    # Un ítem sin fila clásica no está completo (el refresh siempre la escribe)
+    return {
+        item_id: filas for item_id, filas in resultado.items() if LISTA_CLASICA in filas and item_id not in cruzados
+    }
+
+
+def obtener_snapshot(
+    db: Session,
+    ctx: ContextoPricing,
+    productos: list[tuple[ProductoERP, Optional[ProductoPricing]]],
+    pubs_by_item: Optional[dict[int, list]] = None,
+) -> dict[int, dict[int, dict]]:
+    """Snapshot de los productos dados: lee las filas vigentes y calcula en el
+    momento sólo las que faltan o están vencidas (sin escribirlas)."""
+    item_ids = [erp.item_id for erp, _ in productos]
+    snapshot = leer_snapshot_vigente(db, ctx, item_ids)
+
+    faltantes = [(erp, pricing) for erp, pricing in productos if erp.item_id not in snapshot]
+    if faltantes:
+        faltantes_ids = [erp.item_id for erp, _ in faltantes]
+        pubs = (
+            {iid: pubs_by_item[iid] for iid in faltantes_ids if iid in pubs_by_item}
+            if pubs_by_item is not None
+            else None
+        )
+        inputs = cargar_inputs_items(db, ctx, faltantes_ids, pubs_by_item=pubs)
+        for erp, pricing in faltantes:
+            snapshot[erp.item_id] = calcular_snapshot_item(ctx, erp, pricing, inputs)
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Invalidación y refresh
+# ---------------------------------------------------------------------------
+
+
+def marcar_stale(db: Session, item_ids: Iterable[int]) -> int:
+    """Marca como vencidas todas las filas de los ítems dados."""
+    ids = list({i for i in item_ids if i is not None})
+    if not ids:
+        return 0
+    result = db.execute(
+        update(PricingSnapshot).where(PricingSnapshot.item_id.in_(ids)).values(stale=True),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount or 0
+
+
+def items_pendientes(db: Session, ctx: ContextoPricing) -> list[int]:
+    """Ítems cuyo snapshot falta, está marcado stale, tiene otra huella, o cuyos
+    inputs (ERP, pricing, ofertas, precios ML) cambiaron después del último cálculo."""
+    snap = aliased(PricingSnapshot)
+    join_snap = and_(snap.item_id == ProductoERP.item_id, snap.pricelist_id == LISTA_CLASICA)
+
+    pendientes = {
+        item_id
+        for (item_id,) in db.query(ProductoERP.item_id)
+        .outerjoin(ProductoPricing, ProductoPricing.item_id == ProductoERP.item_id)
+        .outerjoin(snap, join_snap)
+        .filter(
+            or_(
+                snap.item_id.is_(None),
+                snap.stale == True,
+                snap.inputs_hash != ctx.fingerprint,
+                ProductoERP.updated_at > snap.calculado_at,
+                ProductoPricing.fecha_modificacion > snap.calculado_at,
+            )
+        )
+        .all()
+    }
+
+    ofertas_cambiadas = (
+        db.query(PublicacionML.item_id)
+        .join(OfertaML, OfertaML.mla == PublicacionML.mla)
+        .join(snap, and_(snap.item_id == PublicacionML.item_id, snap.pricelist_id == LISTA_CLASICA))
+        .filter(func.coalesce(OfertaML.updated_at, OfertaML.fecha_sync) > snap.calculado_at)
+        .distinct()
+        .all()
+    )
+    precios_cambiados = (
+        db.query(PrecioML.item_id)
+        .join(snap, and_(snap.item_id == PrecioML.item_id, snap.pricelist_id == LISTA_CLASICA))
+        .filter(PrecioML.pricelist_id.in_(list(LISTAS_PVP)), PrecioML.fecha_actualizacion > snap.calculado_at)
+        .distinct()
+        .all()
+    )
+    pendientes.update(item_id for (item_id,) in ofertas_cambiadas)
+    pendientes.update(item_id for (item_id,) in precios_cambiados)
+
+    # Filas de días anteriores: sólo las de ítems con ofertas que cruzaron su vigencia
+    inicio_hoy = datetime.combine(ctx.fecha, dt_time()).astimezone(UTC)
+    calculadas_antes = (
+        db.query(PricingSnapshot.item_id, PricingSnapshot.calculado_at)
+        .filter(PricingSnapshot.pricelist_id == LISTA_CLASICA, PricingSnapshot.calculado_at < inicio_hoy)
+        .all()
+    )
+    pendientes.update(
+        _items_con_vigencia_cruzada(
+            db, ctx, {item_id: _dia_calculo(calculado_at) for item_id, calculado_at in calculadas_antes}
+        )
+    )
+    return sorted(pendientes)
+
+
+def _versiones(db: Session, item_ids: list[int]) -> dict[int, tuple]:
+    """(updated_at ERP, fecha_modificacion pricing) por ítem, leídos de la base (no del identity map)."""
+    filas = db.execute(
+        select(ProductoERP.item_id, ProductoERP.updated_at, ProductoPricing.fecha_modificacion)
+        .outerjoin(ProductoPricing, ProductoPricing.item_id == ProductoERP.item_id)
+        .where(ProductoERP.item_id.in_(item_ids))
+    )
+    return {item_id: (updated_at, fecha_modificacion) for item_id, updated_at, fecha_modificacion in filas}
+
+
+def _escribir_chunk(db: Session, ctx: ContextoPricing, item_ids: list[int]) -> int:
+    # Antes de leer los inputs: una edición posterior queda más nueva que calculado_at
+    inicio = datetime.now(UTC)
+    leidas = _versiones(db, item_ids)
+    productos = (
+        db.query(ProductoERP, ProductoPricing)
+        .outerjoin(ProductoPricing, ProductoERP.item_id == ProductoPricing.item_id)
+        .filter(ProductoERP.item_id.in_(item_ids))
+        .all()
+    )
+    inputs = cargar_inputs_items(db, ctx, [erp.item_id for erp, _ in productos])
+
+    filas: list[dict] = []
+    markups_pricing: list[dict] = []
+    for erp, pricing in productos:
+        try:
+            snapshot = calcular_snapshot_item(ctx, erp, pricing, inputs)
+        except Exception as e:
+            logger.warning("pricing_snapshot: error calculando item %s: %s", erp.item_id, e)
+            continue
+        for pricelist_id, valores in snapshot.items():
+            fila = {campo: None for campo in _CAMPOS_SNAPSHOT}
+            fila.update(valores)
+            fila.update(
+                item_id=erp.item_id,
+                pricelist_id=pricelist_id,
+                inputs_hash=ctx.fingerprint,
+                stale=False,
+                calculado_at=inicio,
+            )
+            filas.append(fila)
+        if pricing is not None:
+            clasica = snapshot[LISTA_CLASICA]
+            markups_pricing.append(
+                {
+                    "b_item_id": erp.item_id,
+                    "markup_rebate": clasica["markup_rebate"],
+                    "markup_oferta": clasica["markup_oferta"],
+                }
+            )
+
+    db.execute(
+        PricingSnapshot.__table__.delete().where(PricingSnapshot.item_id.in_(item_ids)),
+    )
+    # El DELETE espera a las ediciones que tenían tomada la fila (su UPDATE stale);
+    # los ítems cuyos inputs cambiaron desde la lectura quedan sin fila → pendientes
+    versiones = _versiones(db, item_ids)
+    editados = {item_id for item_id, leida in leidas.items() if versiones.get(item_id) != leida}
+    if editados:
+        logger.info("pricing_snapshot: %d ítems editados durante el cálculo, quedan pendientes", len(editados))
+        filas = [fila for fila in filas if fila["item_id"] not in editados]
+        markups_pricing = [m for m in markups_pricing if m["b_item_id"] not in editados]
+    if filas:
+        db.execute(PricingSnapshot.__table__.insert(), filas)
+    if markups_pricing:
+        # Core UPDATE (no ORM) → no dispara los hooks que marcan stale
+        tabla = ProductoPricing.__table__
+        db.execute(
+            tabla.update()
+            .where(tabla.c.item_id == bindparam("b_item_id"))
+            .values(markup_rebate=bindparam("markup_rebate"), markup_oferta=bindparam("markup_oferta")),
+            markups_pricing,
+        )
+    return len(filas)
+
+
+def refrescar_snapshot(
+    db: Session,
+    item_ids: Optional[Iterable[int]] = None,
+    completo: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """Recalcula y persiste el snapshot.
+
+    - ``completo``: todos los productos.
+    - ``item_ids``: sólo esos ítems.
+    - ninguno: refresh incremental (items_pendientes).
+
+    Commitea por chunk. Devuelve estadísticas del run.
+    """
+    inicio = time.monotonic()
+    ctx = cargar_contexto_pricing(db)
+
+    if completo:
+        objetivo = [item_id for (item_id,) in db.query(ProductoERP.item_id).order_by(ProductoERP.item_id).all()]
+    elif item_ids is not None:
+        objetivo = sorted(set(item_ids))
+    else:
+        objetivo = items_pendientes(db, ctx)
+
+    filas = 0
+    for i in range(0, len(objetivo), chunk_size):
+        chunk = objetivo[i : i + chunk_size]
+        filas += _escribir_chunk(db, ctx, chunk)
+        db.commit()
+
+    stats = {
+        "items": len(objetivo),
+        "filas": filas,
+        "inputs_hash": ctx.fingerprint,
+        "segundos": round(time.monotonic() - inicio, 2),
+    }
+    logger.info("pricing_snapshot refresh: %s", stats)
+    return stats
@@ -0,0 +1,255 @@
+"""
+pricing_vectorizado — solver de precios por markup sobre arrays NumPy.
+
+`precio_por_markup_goalseek` bisecta hasta 50 veces por precio, y los cálculos
+masivos (PVP / cuotas) lo llaman por ítem × lista. Este módulo resuelve el
+catálogo entero de una vez: cada iteración de la bisección opera sobre todos
+los ítems a la vez con máscaras, y un ítem deja de iterar cuando converge.
+
+Design decisions (ADR):
+  1. Misma bisección, no fórmula cerrada. Dentro de cada tramo de tier el
+     precio se despeja analíticamente, pero el resultado que se guarda hoy es
+     round(punto medio de la bisección cuando |Δmarkup| < 0.001 o el intervalo
+     < $1), que difiere del precio exacto en algunos pesos. Para que los
+     precios guardados no cambien, se replica la bisección (mismos extremos,
+     mismos puntos medios, mismo corte) con aritmética float64 en el mismo
+     orden de operaciones que pricing_calculator → paridad bit a bit.
+  2. Redondeos: round(precio) de Python es half-even, igual que np.rint. El
+     markup real se redondea con round(x, 2) de Python por elemento, porque
+     np.round(x, 2) (x*100 → rint → /100) difiere en algunos casos borde.
+  3. Los datos de referencia (constantes, comisión por lista y grupo, envío
+     promedio por grupo) se resuelven una vez por grupo con los helpers
+     cacheados de pricing_calculator; el solver en sí no toca la DB.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.pricing_calculator import (
+    MONTOT1,
+    MONTOT2,
+    MONTOT3,
+    TIER1,
+    TIER2,
+    TIER3,
+    VARIOS_DEFAULT,
+    obtener_comision_base,
+    obtener_constantes_pricing,
+    obtener_envio_promedio_grupo,
+)
+
+ArrayLike = Union[np.ndarray, Sequence[float], float]
+
+MAX_ITERACIONES = 50
+
+
+@dataclass
+class ResultadoLista:
+    """Resultado por lista: arrays alineados con los ítems de entrada."""
+
+    precio: np.ndarray  # NaN donde no hay comisión configurada
+    markup_real: np.ndarray  # porcentaje redondeado a 2 decimales, NaN si no válido
+    valido: np.ndarray  # bool: False = equivalente al {"error": ...} del escalar
+
+
+def costo_calculable(costo: Optional[float], iva: Optional[float]) -> bool:
+    """Si el ítem entra en los arrays: costo > 0 e IVA no nulo ni negativo.
+
+    Un costo NULL se vuelve NaN en el array (precio 0, markup NaN al guardar)
+    y en USD hace fallar convertir_a_pesos para todo el lote; el cálculo por
+    ítem lo descartaba con su try/except. IVA 0 (exento) es válido.
+    """
+    if costo is None or iva is None:
+        return False
+    return float(costo) > 0 and float(iva) >= 0
+
+
+def _arr(valor: ArrayLike, n: Optional[int] = None) -> np.ndarray:
+    a = np.asarray(valor, dtype=np.float64)
+    if n is not None and a.ndim == 0:
+        a = np.full(n, float(a))
+    return a
+
+
+def _tiers(constantes: Optional[Mapping], varios: float) -> tuple:
+    if constantes:
+        return (
+            constantes["monto_tier1"],
+            constantes["monto_tier2"],
+            constantes["monto_tier3"],
+            constantes["tier1"],
+            constantes["tier2"],
+            constantes["tier3"],
+            constantes["varios"],
+        )
+    return MONTOT1, MONTOT2, MONTOT3, TIER1, TIER2, TIER3, varios
+
+
+def markup_vectorizado(
+    precio: ArrayLike,
+    costo: ArrayLike,
+    iva: ArrayLike,
+    comision_ml: ArrayLike,
+    costo_envio: ArrayLike,
+    constantes: Optional[Mapping] = None,
+    varios: float = VARIOS_DEFAULT,
+    envio_promedio: Optional[ArrayLike] = None,
+) -> np.ndarray:
+    """Markup (fracción) de cada precio: calcular_comision_ml_total + calcular_limpio + calcular_markup.
+
+    `envio_promedio` replica el fallback de calcular_limpio con grupo_id: si el
+    envío del ítem es 0 y el precio supera el tier 3, se usa el promedio del grupo.
+    """
+    precio = _arr(precio)
+    n = precio.shape[0] if precio.ndim else None
+    costo, iva, comision_ml, costo_envio = (_arr(v, n) for v in (costo, iva, comision_ml, costo_envio))
+    m1, m2, m3, t1, t2, t3, varios_pct = _tiers(constantes, varios)
+
+    comision_base = precio * (comision_ml / 100) / 1.21
+    tier = np.where(precio < m1, t1 / 1.21, np.where(precio < m2, t2 / 1.21, np.where(precio < m3, t3 / 1.21, 0.0)))
+    comision_con_tier = np.where(precio >= m3, comision_base, comision_base + tier)
+    comision_varios = (precio / (1 + iva / 100)) * (varios_pct / 100)
+    comision_total = comision_con_tier + comision_varios
+
+    precio_sin_iva = precio / (1 + iva / 100)
+    envio = costo_envio
+    if envio_promedio is not None:
+        envio = np.where(costo_envio == 0, _arr(envio_promedio, n), costo_envio)
+    envio_sin_iva = np.where(precio >= m3, envio / 1.21, 0.0)
+    limpio = precio_sin_iva - envio_sin_iva - comision_total
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        markup = np.where(costo == 0, 0.0, (limpio / costo) - 1)
+    return markup
+
+
+def precio_por_markup_vectorizado(
+    costo: ArrayLike,
+    markup_objetivo: ArrayLike,
+    iva: ArrayLike,
+    comision_ml: ArrayLike,
+    costo_envio: ArrayLike,
+    constantes: Optional[Mapping] = None,
+    varios: float = VARIOS_DEFAULT,
+    envio_promedio: Optional[ArrayLike] = None,
+) -> np.ndarray:
+    """Equivalente vectorizado de precio_por_markup_goalseek (mismo resultado por elemento).
+
+    `constantes` = obtener_constantes_pricing(db) equivale a llamar al escalar
+    con db; None equivale a db=None (tiers por defecto y `varios` explícito).
+    """
+    costo = _arr(costo)
+    n = costo.shape[0]
+    markup_objetivo, iva, comision_ml, costo_envio = (
+        _arr(v, n) for v in (markup_objetivo, iva, comision_ml, costo_envio)
+    )
+    if envio_promedio is not None:
+        envio_promedio = _arr(envio_promedio, n)
+
+    markup_objetivo_decimal = markup_objetivo / 100
+    negativo = markup_objetivo < 0
+    precio_min = np.where(negativo, costo * 0.5, costo)
+    precio_max = np.where(negativo, costo * 5, costo * 10)
+    precio = (precio_min + precio_max) / 2
+
+    resultado = np.zeros(n)
+    activo = costo > 0
+
+    for _ in range(MAX_ITERACIONES):
+        if not activo.any():
+            break
+        markup_actual = markup_vectorizado(
+            precio, costo, iva, comision_ml, costo_envio, constantes, varios, envio_promedio
+        )
+        diferencia = markup_objetivo_decimal - markup_actual
+
+        convergio = activo & (np.abs(diferencia) < 0.001)
+        resultado[convergio] = precio[convergio]
+        activo &= ~convergio
+
+        sube = markup_actual < markup_objetivo_decimal
+        precio_min = np.where(activo & sube, precio, precio_min)
+        precio_max = np.where(activo & ~sube, precio, precio_max)
+        precio = np.where(activo, (precio_min + precio_max) / 2, precio)
+
+        cerrado = activo & (precio_max - precio_min < 1)
+        resultado[cerrado] = precio[cerrado]
+        activo &= ~cerrado
+
+    resultado[activo] = precio[activo]
+    return np.rint(resultado)
+
+
+def _redondear_markup(markup: np.ndarray) -> np.ndarray:
+    # round() de Python por elemento (ver ADR 2)
+    return np.array([round(float(m) * 100, 2) if np.isfinite(m) else np.nan for m in markup])
+
+
+def calcular_precios_listas(
+    db: Session,
+    costo_ars: ArrayLike,
+    iva: ArrayLike,
+    envio: ArrayLike,
+    grupo_ids: Sequence[int],
+    markup_objetivo: ArrayLike,
+    adicional_por_lista: Mapping[int, ArrayLike],
+) -> dict[int, ResultadoLista]:
+    """calcular_precio_producto para todo el catálogo y varias listas en una llamada.
+
+    Args:
+        costo_ars, iva, envio: arrays por ítem (costo ya convertido a pesos,
+            envío ya resuelto: real de mlwebhook o ERP).
+        grupo_ids: grupo de comisión por ítem.
+        markup_objetivo: markup objetivo por ítem (o escalar), en porcentaje.
+        adicional_por_lista: {pricelist_id: adicional} (escalar o array por ítem);
+            define también qué listas se calculan.
+
+    Returns:
+        {pricelist_id: ResultadoLista}
+    """
+    costo_ars = _arr(costo_ars)
+    n = costo_ars.shape[0]
+    iva, envio, markup_objetivo = (_arr(v, n) for v in (iva, envio, markup_objetivo))
+    grupos = np.asarray(grupo_ids, dtype=np.int64)
+
+    constantes = obtener_constantes_pricing(db)
+    grupos_unicos = [int(g) for g in np.unique(grupos)]
+    envio_promedio = np.zeros(n)
+    for g in grupos_unicos:
+        envio_promedio[grupos == g] = obtener_envio_promedio_grupo(db, g)
+
+    resultados: dict[int, ResultadoLista] = {}
+    for pricelist_id, adicional in adicional_por_lista.items():
+        comision = np.full(n, np.nan)
+        for g in grupos_unicos:
+            base = obtener_comision_base(db, pricelist_id, g)
+            if base is not None:
+                comision[grupos == g] = base
+        valido = ~np.isnan(comision)
+
+        precio = np.full(n, np.nan)
+        markup_real = np.full(n, np.nan)
+        if valido.any():
+            markup_total = markup_objetivo + _arr(adicional, n)
+            args = (costo_ars[valido], iva[valido], comision[valido], envio[valido])
+            precio_validos = precio_por_markup_vectorizado(
+                args[0],
+                markup_total[valido],
+                args[1],
+                args[2],
+                args[3],
+                constantes=constantes,
+                envio_promedio=envio_promedio[valido],
+            )
+            markup_validos = markup_vectorizado(
+                precio_validos, *args, constantes=constantes, envio_promedio=envio_promedio[valido]
+            )
+            precio[valido] = precio_validos
+            markup_real[valido] = _redondear_markup(markup_validos)
+        resultados[pricelist_id] = ResultadoLista(precio=precio, markup_real=markup_real, valido=valido)
+    return resultados
@@ -0,0 +1,186 @@
+"""
+productos_paginacion — ordenamiento y paginación en SQL para GET /productos.
+
+Antes el listado traía TODAS las filas que matcheaban los filtros cuando el
+orden incluía una columna "dinámica" (precio_rebate / mejor_oferta), armaba un
+ProductoResponse por producto, ordenaba en Python y recién ahí cortaba la
+página. Con ~30k SKUs cada página costaba lo mismo que un export completo.
+
+Este módulo empuja el ordenamiento multi-columna a SQL y agrega paginación
+keyset con cursor opaco, de modo que el enriquecimiento (ofertas, catálogo,
+TN, PVP) sólo se calcula para las filas de la página.
+
+Design decisions (ADR):
+  1. Las columnas dinámicas se ordenan por los markups persistidos en
+     productos_pricing (markup_rebate / markup_oferta), que mantiene
+     calcular_markups_rebate_oferta. mejor_oferta replica la regla de
+     out_of_cards del listado: si está fuera de cuotas con rebate, usa el
+     markup del rebate.
+  2. item_id se agrega siempre como desempate final → orden total y estable,
+     requisito para que el cursor keyset no saltee ni repita filas.
+  3. NULLS LAST en ambas direcciones (mismo criterio que el sort anterior).
+  4. El cursor es base64url(JSON) con los valores de orden de la última fila;
+     no se firma porque sólo posiciona, los filtros se siguen aplicando.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional
+
+from sqlalchemy import and_, case, or_
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.producto import ProductoERP, ProductoPricing
+
+
+class CursorInvalidoError(ValueError):
+    """El cursor recibido no se puede decodificar o no coincide con el orden."""
+
+
+_MEJOR_OFERTA_MARKUP = case(
+    (
+        and_(ProductoPricing.out_of_cards == True, ProductoPricing.markup_rebate.isnot(None)),
+        ProductoPricing.markup_rebate,
+    ),
+    else_=ProductoPricing.markup_oferta,
+)
+
+# Mapeo de campos del frontend a expresiones SQL ordenables.
+ORDEN_COLUMNAS: dict[str, ColumnElement] = {
+    "item_id": ProductoERP.item_id,
+    "codigo": ProductoERP.codigo,
+    "descripcion": ProductoERP.descripcion,
+    "marca": ProductoERP.marca,
+    "moneda_costo": ProductoERP.moneda_costo,
+    "costo": ProductoERP.costo,
+    "stock": ProductoERP.stock,
+    "precio_lista_ml": ProductoPricing.precio_lista_ml,
+    "markup": ProductoPricing.markup_calculado,
+    "precio_clasica": ProductoPricing.markup_calculado,
+    "precio_rebate": ProductoPricing.markup_rebate,
+    "mejor_oferta": _MEJOR_OFERTA_MARKUP,
+    "web_transf": ProductoPricing.markup_web_real,
+}
+
+
+@dataclass(frozen=True)
+class OrdenColumna:
+    campo: str
+    expr: ColumnElement
+    desc: bool
+
+
+def parse_orden(orden_campos: Optional[str], orden_direcciones: Optional[str]) -> list[OrdenColumna]:
+    """Traduce los parámetros CSV del frontend a una lista de columnas de orden.
+
+    Campos desconocidos se ignoran (mismo comportamiento que antes). item_id se
+    agrega al final como desempate si no vino explícito.
+    """
+    orden: list[OrdenColumna] = []
+    if orden_campos and orden_direcciones:
+        for campo, direccion in zip(orden_campos.split(","), orden_direcciones.split(",")):
+            campo = campo.strip()
+            expr = ORDEN_COLUMNAS.get(campo)
+            if expr is None:
+                continue
+            orden.append(OrdenColumna(campo=campo, expr=expr, desc=direccion.strip() != "asc"))
+
+    if not any(o.campo == "item_id" for o in orden):
+        orden.append(OrdenColumna(campo="item_id", expr=ProductoERP.item_id, desc=False))
+    return orden
+
+
+def aplicar_orden(query: Query, orden: list[OrdenColumna]) -> Query:
+    """Agrega ORDER BY (NULLS LAST) para cada columna de orden."""
+    return query.order_by(*[(o.expr.desc() if o.desc else o.expr.asc()).nullslast() for o in orden])
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def encode_cursor(orden: list[OrdenColumna], valores: list[Any]) -> str:
+    """Serializa los valores de orden de la última fila en un cursor opaco."""
+    payload = {"c": [o.campo for o in orden], "v": [_json_value(v) for v in valores]}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, orden: list[OrdenColumna]) -> list[Any]:
+    """Decodifica un cursor y valida que corresponda al orden actual."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        campos, valores = payload["c"], payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError) as e:
+        raise CursorInvalidoError("Cursor inválido") from e
+
+    if campos != [o.campo for o in orden] or len(valores) != len(orden):
+        raise CursorInvalidoError("El cursor no corresponde al ordenamiento solicitado")
+    return valores
+
+
+def filtro_keyset(orden: list[OrdenColumna], valores: list[Any]) -> ColumnElement:
+    """Construye el predicado "fila posterior al cursor" respetando NULLS LAST.
+
+    Para columnas (c1..cn) y valores (v1..vn) genera
+    ``OR_k (c1 = v1 AND ... AND c(k-1) = v(k-1) AND ck "después de" vk)``,
+    donde "después de" depende de la dirección y de si vk es NULL: con NULLS
+    LAST, después de un valor no nulo vienen los mayores/menores y los NULL; y
+    después de un NULL sólo pueden venir otros NULL (que igualan, no avanzan).
+    """
+    ramas = []
+    iguales: list[ColumnElement] = []
+    for o, v in zip(orden, valores):
+        if v is None:
+            despues = None
+            igual = o.expr.is_(None)
+        else:
+            despues = or_(o.expr < v if o.desc else o.expr > v, o.expr.is_(None))
+            igual = o.expr == v
+        if despues is not None:
+            ramas.append(and_(*iguales, despues))
+        iguales.append(igual)
+    return or_(*ramas)
+
+
+def paginar(
+    query: Query,
+    orden: list[OrdenColumna],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> tuple[list, Optional[str]]:
+    """Devuelve (filas de la página, cursor de la siguiente).
+
+    Con ``cursor`` se usa keyset (sin OFFSET); sin cursor se usa page/page_size
+    como hasta ahora. En ambos casos el ORDER BY corre en SQL y se pide una
+    fila extra para saber si hay página siguiente.
+    """
+    columnas_orden = [o.expr.label(f"_orden_{i}") for i, o in enumerate(orden)]
+    query = aplicar_orden(query.add_columns(*columnas_orden), orden)
+
+    if cursor:
+        query = query.filter(filtro_keyset(orden, decode_cursor(cursor, orden)))
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    filas = query.limit(page_size + 1).all()
+    hay_siguiente = len(filas) > page_size
+    filas = filas[:page_size]
+
+    n = len(orden)
+    resultados = [tuple(fila[:-n]) for fila in filas]
+    next_cursor = encode_cursor(orden, list(filas[-1][-n:])) if hay_siguiente and filas else None
+    return resultados, next_cursor
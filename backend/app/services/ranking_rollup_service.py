@@ -0,0 +1,375 @@
+"""
+Rollup de ageing/stock del ranking de consultas (tabla ranking_item_deposito).
+
+El ranking (/consultas/ranking, /resumen, /kpis) calculaba en cada request
+MAX(ct_date) sobre tb_item_transactions ⋈ tb_commercial_transactions, la
+última compra, SUM(stock) sobre stock_por_deposito y NOT EXISTS contra
+tb_item_association. Con historia creciente eso no escala: cada página
+recorría la historia de ventas de todo el catálogo.
+
+Este módulo mantiene esos valores precalculados:
+
+  - Filas por depósito (stor_id > 0): stock, actualizado con cada lote de
+    sync_stock_por_deposito (`actualizar_stock`).
+  - Fila del ítem (stor_id = STOR_ID_ITEM): última venta (definición ADR-1),
+    última compra (puco_id=10, it_cd más reciente) y si es combo.
+    `actualizar_desde_transacciones` procesa sólo las item transactions
+    nuevas desde su propio watermark (fila "ranking_item_deposito" en
+    erp_sync_state) y se queda con el máximo: la última venta/compra sólo
+    avanza. Lo llama sync_item_transactions_incremental después de cada sync.
+  - `refrescar_combos`: marca/desmarca es_combo desde tb_item_association
+    (tabla chica, se recalcula entera). Lo llaman el sync de asociaciones
+    (app/scripts/sync_item_associations.py) y los de stock / transacciones.
+
+Lo que un incremental no puede ver (transacciones borradas o corregidas en el
+ERP, cambios de la definición de venta) se corrige con `reconstruir`:
+    python -m app.scripts.rebuild_ranking_rollup
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime
+from typing import Any, Optional
+
+from sqlalchemy import delete, func, literal, select, true, update
+from sqlalchemy.orm import Session
+
+from app.core.database import insert_on_conflict
+from app.core.logging import get_logger
+from app.models.commercial_transaction import CommercialTransaction
+from app.models.erp_sync_state import ERPSyncState
+from app.models.item_transaction import ItemTransaction
+from app.models.ranking_item_deposito import RankingItemDeposito
+from app.models.stock_por_deposito import StockPorDeposito
+from app.models.tb_item_association import TbItemAssociation
+
+logger = get_logger(__name__)
+
+# ---------------------------------------------------------------------------
+# Definición de venta (ADR-1) — fuente única para el rollup y el ranking
+# ---------------------------------------------------------------------------
+
+SD_VENTAS: list[int] = [1, 4, 21, 56]
+SD_DEVOLUCIONES: list[int] = [3, 6, 23, 66]
+
+# DF_PERMITIDOS = canal fuera-ML (de ventas_fuera_ml.py)
+DF_PERMITIDOS: list[int] = [
+    1,
+    2,
+    3,
+    4,
+    5,
+    6,
+    63,
+    85,
+    86,
+    87,
+    65,
+    67,
+    68,
+    69,
+    70,
+    71,
+    72,
+    73,
+    74,
+    81,
+    103,
+    105,
+    106,
+    109,
+    111,
+    115,
+    116,
+    117,
+    118,
+    122,
+    124,
+    125,
+    126,
+    127,
+]
+# df_ids del canal TN
+DF_TN: list[int] = [113, 114]
+# df_ids del canal ML
+DF_ML: list[int] = [129, 130, 131, 132]
+
+# Unión de todos los canales de venta (ADR-1)
+DF_VENTA_TODOS: list[int] = list(set(DF_PERMITIDOS) | set(DF_TN) | set(DF_ML))
+
+# Items excluidos del cálculo de ventas
+ITEMS_EXCLUIDOS: list[int] = [16, 460]
+
+# puco_id de compras
+PUCO_COMPRAS: int = 10
+
+# stor_id de la fila con los datos del ítem (no es un depósito del ERP)
+STOR_ID_ITEM: int = 0
+
+# Nombre del watermark en erp_sync_state
+ESTADO_ROLLUP = "ranking_item_deposito"
+
+LOTE = 1000
+
+_tabla = RankingItemDeposito.__table__
+_tit = ItemTransaction.__table__
+_tct = CommercialTransaction.__table__
+
+
+def _insert(db: Session):
+    return insert_on_conflict(db, _tabla)
+
+
+def _a_fecha(valor: Any) -> Optional[date]:
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.fromisoformat(str(valor)).date()
+
+
+def _a_datetime(valor: Any) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+
+def _en_lotes(filas: list[dict]):
+    for i in range(0, len(filas), LOTE):
+        yield filas[i : i + LOTE]
+
+
+# ---------------------------------------------------------------------------
+# Stock (filas por depósito)
+# ---------------------------------------------------------------------------
+
+
+def actualizar_stock(db: Session, filas: list[dict]) -> int:
+    """Upsert del stock por (item_id, stor_id). Sin commit.
+
+    Args:
+        filas: dicts con item_id, stor_id y stock (el mismo lote que se
+            escribió en stock_por_deposito).
+    """
+    unicas = {(f["item_id"], f["stor_id"]): f["stock"] for f in filas if f["stor_id"] != STOR_ID_ITEM}
+    if not unicas:
+        return 0
+    valores = [{"item_id": i, "stor_id": s, "stock": stock} for (i, s), stock in unicas.items()]
+    for lote in _en_lotes(valores):
+        stmt = _insert(db)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["item_id", "stor_id"],
+            set_={"stock": stmt.excluded.stock, "updated_at": func.now()},
+            where=_tabla.c.stock.is_distinct_from(stmt.excluded.stock),
+        )
+        db.execute(stmt.values([{**v, "updated_at": datetime.now(UTC)} for v in lote]))
+    return len(valores)
+
+
+# ---------------------------------------------------------------------------
+# Última venta / última compra (fila del ítem)
+# ---------------------------------------------------------------------------
+
+
+def _ultimas_ventas(db: Session, desde: Optional[int], hasta: int) -> list[dict]:
+    stmt = (
+        select(_tit.c.item_id, func.max(_tct.c.ct_date).label("ultima"))
+        .select_from(_tit.join(_tct, _tct.c.ct_transaction == _tit.c.ct_transaction))
+        .where(
+            _tct.c.sd_id.in_(SD_VENTAS),
+            _tct.c.df_id.in_(DF_VENTA_TODOS),
+            _tit.c.it_qty != 0,
+            _tit.c.item_id.is_not(None),
+            _tit.c.item_id.not_in(ITEMS_EXCLUIDOS),
+            _tit.c.it_transaction <= hasta,
+        )
+        .group_by(_tit.c.item_id)
+    )
+    if desde is not None:
+        stmt = stmt.where(_tit.c.it_transaction > desde)
+    return [
+        {"item_id": row.item_id, "stor_id": STOR_ID_ITEM, "ultima_venta": _a_fecha(row.ultima)}
+        for row in db.execute(stmt)
+        if row.ultima is not None
+    ]
+
+
+def _ultimas_compras(db: Session, desde: Optional[int], hasta: int) -> list[dict]:
+    orden = func.row_number().over(
+        partition_by=_tit.c.item_id, order_by=(_tit.c.it_cd.desc(), _tit.c.it_transaction.desc())
+    )
+    compras = (
+        select(
+            _tit.c.item_id,
+            _tit.c.it_cd,
+            _tit.c.it_qty,
+            _tct.c.ct_date,
+            orden.label("orden"),
+        )
+        .select_from(_tit.join(_tct, _tct.c.ct_transaction == _tit.c.ct_transaction))
+        .where(
+            _tit.c.puco_id == PUCO_COMPRAS,
+            _tit.c.item_id.is_not(None),
+            _tit.c.it_cd.is_not(None),
+            _tit.c.it_transaction <= hasta,
+        )
+    )
+    if desde is not None:
+        compras = compras.where(_tit.c.it_transaction > desde)
+    compras = compras.subquery()
+    stmt = select(compras.c.item_id, compras.c.it_cd, compras.c.it_qty, compras.c.ct_date).where(compras.c.orden == 1)
+    return [
+        {
+            "item_id": row.item_id,
+            "stor_id": STOR_ID_ITEM,
+            "ultima_compra_cd": _a_datetime(row.it_cd),
+            "ultima_compra_fecha": _a_fecha(row.ct_date),
+            "ultima_compra_cant": row.it_qty,
+        }
+        for row in db.execute(stmt)
+    ]
+
+
+def _aplicar_ventas(db: Session, filas: list[dict]) -> None:
+    for lote in _en_lotes(filas):
+        stmt = _insert(db)
+        nueva = stmt.excluded.ultima_venta
+        avanza = (_tabla.c.ultima_venta.is_(None)) | (nueva > _tabla.c.ultima_venta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["item_id", "stor_id"],
+            set_={"ultima_venta": nueva, "updated_at": func.now()},
+            where=avanza,
+        )
+        db.execute(stmt.values([{**f, "updated_at": datetime.now(UTC)} for f in lote]))
+
+
+def _aplicar_compras(db: Session, filas: list[dict]) -> None:
+    for lote in _en_lotes(filas):
+        stmt = _insert(db)
+        nueva = stmt.excluded
+        avanza = (_tabla.c.ultima_compra_cd.is_(None)) | (nueva.ultima_compra_cd > _tabla.c.ultima_compra_cd)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["item_id", "stor_id"],
+            set_={
+                "ultima_compra_cd": nueva.ultima_compra_cd,
+                "ultima_compra_fecha": nueva.ultima_compra_fecha,
+                "ultima_compra_cant": nueva.ultima_compra_cant,
+                "updated_at": func.now(),
+            },
+            where=avanza,
+        )
+        db.execute(stmt.values([{**f, "updated_at": datetime.now(UTC)} for f in lote]))
+
+
+def _leer_watermark(db: Session) -> Optional[int]:
+    estado = db.get(ERPSyncState, ESTADO_ROLLUP)
+    if estado is None or not estado.watermark:
+        return None
+    return int(estado.watermark)
+
+
+def _guardar_watermark(db: Session, hasta: int, modo: str, filas: int) -> None:
+    estado = db.get(ERPSyncState, ESTADO_ROLLUP)
+    if estado is None:
+        estado = ERPSyncState(tabla=ESTADO_ROLLUP)
+        db.add(estado)
+    estado.watermark = str(hasta)
+    estado.modo = modo
+    estado.estado = "ok"
+    estado.filas = filas
+    estado.error = None
+
+
+def actualizar_desde_transacciones(db: Session) -> int:
+    """Aplica las item transactions nuevas desde el watermark del rollup. Sin commit.
+
+    El rango es (watermark, MAX(it_transaction) al arrancar]: lo que el sync
+    inserte mientras tanto queda para la próxima. Sin watermark previo
+    recorre toda la historia (equivale a reconstruir la fila del ítem).
+
+    Returns:
+        Ítems cuya última venta o compra entró en el cálculo.
+    """
+    desde = _leer_watermark(db)
+    hasta = db.execute(select(func.max(_tit.c.it_transaction))).scalar()
+    if hasta is None or (desde is not None and hasta <= desde):
+        return 0
+
+    ventas = _ultimas_ventas(db, desde, hasta)
+    compras = _ultimas_compras(db, desde, hasta)
+    _aplicar_ventas(db, ventas)
+    _aplicar_compras(db, compras)
+
+    items = len({f["item_id"] for f in ventas} | {f["item_id"] for f in compras})
+    _guardar_watermark(db, hasta, "incremental" if desde is not None else "full", items)
+    logger.info(
+        "Rollup ranking: it_transaction (%s, %s] → %d ventas, %d compras",
+        desde,
+        hasta,
+        len(ventas),
+        len(compras),
+    )
+    return items
+
+
+# ---------------------------------------------------------------------------
+# Combos
+# ---------------------------------------------------------------------------
+
+
+def refrescar_combos(db: Session) -> None:
+    """es_combo = el ítem es padre en tb_item_association (iasso_qty > 0). Sin commit."""
+    # Las sentencias Core no disparan autoflush: asociaciones ORM pendientes del caller
+    db.flush()
+    ia = TbItemAssociation.__table__
+    combos = select(ia.c.item_id).where(ia.c.iasso_qty > 0, ia.c.item_id.is_not(None)).distinct().subquery()
+
+    # WHERE explícito: SQLite no parsea INSERT ... SELECT ... ON CONFLICT sin él
+    nuevos = select(combos.c.item_id, literal(STOR_ID_ITEM), true(), func.now()).where(true())
+    stmt = _insert(db).from_select(["item_id", "stor_id", "es_combo", "updated_at"], nuevos)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["item_id", "stor_id"],
+        set_={"es_combo": true(), "updated_at": func.now()},
+        where=_tabla.c.es_combo.is_(False),
+    )
+    db.execute(stmt)
+
+    db.execute(
+        update(_tabla)
+        .where(
+            _tabla.c.stor_id == STOR_ID_ITEM,
+            _tabla.c.es_combo.is_(True),
+            _tabla.c.item_id.not_in(select(combos.c.item_id)),
+        )
+        .values(es_combo=False, updated_at=func.now())
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reconstrucción completa
+# ---------------------------------------------------------------------------
+
+
+def reconstruir(db: Session) -> dict[str, int]:
+    """Recalcula la tabla entera desde stock_por_deposito, la historia y las asociaciones. Sin commit.
+
+    Corre en una sola transacción: los lectores ven la versión anterior hasta
+    el commit.
+    """
+    db.execute(delete(_tabla))
+    estado = db.get(ERPSyncState, ESTADO_ROLLUP)
+    if estado is not None:
+        estado.watermark = None
+
+    spd = StockPorDeposito.__table__
+    depositos = db.execute(
+        _insert(db).from_select(
+            ["item_id", "stor_id", "stock", "updated_at"],
+            select(spd.c.item_id, spd.c.stor_id, spd.c.stock, func.now()).where(spd.c.stor_id != STOR_ID_ITEM),
+        )
+    ).rowcount
+    items = actualizar_desde_transacciones(db)
+    refrescar_combos(db)
+    return {"depositos": depositos, "items": items}
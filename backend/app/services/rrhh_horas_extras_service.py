@@ -2,7 +2,10 @@
 Service layer del módulo Horas Extras (HE) — Batch 2.
 
 Responsabilidades:
-- Detección automática de bloques HE a partir de fichadas + turnos.
+- Detección automática de bloques HE a partir de fichadas + turnos. El cálculo de
+  un empleado-día es puro (`calcular_bloques_dia`); `detectar_he_periodo` carga
+  todo el rango en bloque, calcula en memoria (opcionalmente en un pool de
+  procesos) y escribe solo las diferencias.
 - Workflow de transiciones de estado (aprobar / rechazar / reabrir / liquidar).
 - Manejo de anomalías (fichadas faltantes / descartar día).
 - Hooks idempotentes ante modificación de fichadas y cambios de turno.
@@ -30,12 +33,15 @@ Notas de divergencia con el design:
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from itertools import repeat
 from typing import Any
 
 from fastapi import HTTPException
-from sqlalchemy import Date, cast, func, or_
+from sqlalchemy import Date, cast, delete, func, or_, type_coerce
 from sqlalchemy.orm import Session
 
 from app.models.rrhh_empleado import RRHHEmpleado
@@ -93,6 +99,273 @@ _ACCION_FICHADA_MODIFICADA = "fichada_modificada_post_aprobacion"
 _ACCION_RECALCULO_CAMBIO_TURNO = "recalculo_por_cambio_turno"
 
 
+# ─── Cálculo puro de un empleado-día ────────────────────────────────────
+#
+# El cálculo de HE de un día no necesita la sesión: recibe las fichadas, los
+# turnos, el presentismo y si el día es feriado ya cargados. Así lo comparten
+# el recálculo de un día (`_calcular_he_dia`, queries puntuales) y el motor
+# por período (`detectar_he_periodo`, carga en bloque + cálculo en memoria,
+# opcionalmente en un pool de procesos — por eso todo es picklable).
+
+_FIN_DIA = time(23, 59, 59, 999999)
+_INICIO_DIA = time(0, 0, 0)
+
+
+@dataclass(frozen=True)
+class TurnoHE:
+    """Turno asignado (snapshot de `RRHHHorarioConfig`)."""
+
+    id: int
+    activo: bool
+    dias_semana: str
+    hora_entrada: time
+    hora_salida: time
+
+
+@dataclass(frozen=True)
+class ParametrosHE:
+    """Valores del singleton de config que usa el cálculo."""
+
+    porcentajes: dict[str, Decimal]  # TipoDiaHE.value → porcentaje_recargo
+    hora_corte_sabado: time
+    tolerancia_extras_minutos: int
+
+    @classmethod
+    def desde_config(cls, config: RRHHHorasExtrasConfig) -> ParametrosHE:
+        return cls(
+            porcentajes={
+                TipoDiaHE.HABIL_50.value: Decimal(config.porcentaje_dia_habil),
+                TipoDiaHE.SABADO_100.value: Decimal(config.porcentaje_sabado_pm),
+                TipoDiaHE.DOMINGO_100.value: Decimal(config.porcentaje_domingo),
+                TipoDiaHE.FERIADO_100.value: Decimal(config.porcentaje_feriado),
+            },
+            hora_corte_sabado=config.hora_corte_sabado,
+            tolerancia_extras_minutos=config.tolerancia_extras_minutos,
+        )
+
+    def porcentaje(self, tipo_dia: TipoDiaHE) -> Decimal:
+        # MANUAL — no hay default, se setea explícitamente.
+        return self.porcentajes.get(tipo_dia.value, Decimal("0.00"))
+
+
+@dataclass
+class DiaHE:
+    """Entrada del cálculo de un empleado-día."""
+
+    empleado_id: int
+    fecha: date
+    fichadas: list[tuple[int, datetime]]  # (id, timestamp) ascendente
+    presentismo_bloquea: bool
+    turnos: list[TurnoHE] | None  # None = empleado sin ninguna asignación de turno
+    es_feriado: bool
+
+
+def _tramos_dia(fecha: date, es_feriado: bool, hora_corte_sabado: time) -> list[tuple[TipoDiaHE, time, time]]:
+    """Tramos (tipo_dia, inicio, fin) del día — ver `HorasExtrasService._clasificar_tipo_dia`."""
+    if es_feriado:
+        return [(TipoDiaHE.FERIADO_100, _INICIO_DIA, _FIN_DIA)]
+
+    weekday = fecha.weekday()  # 0=Lunes ... 6=Domingo
+    if weekday == 6:
+        return [(TipoDiaHE.DOMINGO_100, _INICIO_DIA, _FIN_DIA)]
+    if weekday == 5:
+        # Si por alguna config bizarra el corte es 00:00 → todo es sabado_100.
+        if hora_corte_sabado <= _INICIO_DIA:
+            return [(TipoDiaHE.SABADO_100, _INICIO_DIA, _FIN_DIA)]
+        return [
+            (TipoDiaHE.HABIL_50, _INICIO_DIA, hora_corte_sabado),
+            (TipoDiaHE.SABADO_100, hora_corte_sabado, _FIN_DIA),
+        ]
+    return [(TipoDiaHE.HABIL_50, _INICIO_DIA, _FIN_DIA)]
+
+
+def _minutos_turno(turnos, fecha: date) -> int:
+    """
+    Minutos esperados de los turnos activos que cubren el weekday de `fecha`.
+
+    `turnos`: objetos con id / activo / dias_semana / hora_entrada / hora_salida
+    (`TurnoHE` o `RRHHHorarioConfig`). Deduplica por id (riesgo §12 del design:
+    asignación M:N duplicada no cuenta el turno dos veces).
+    """
+    # weekday(): 0=Lun ... 6=Dom; en RRHHHorarioConfig.dias_semana 1=Lun ... 7=Dom.
+    weekday_str = str(fecha.weekday() + 1)
+    vistos: set[int] = set()
+    minutos = 0
+    for t in turnos:
+        if not t.activo or t.id in vistos:
+            continue
+        vistos.add(t.id)
+        # Filtrar por weekday — el campo `dias_semana` es CSV "1,2,3,4,5".
+        dias = [d.strip() for d in (t.dias_semana or "").split(",") if d.strip()]
+        if weekday_str not in dias:
+            continue
+        entrada_min = t.hora_entrada.hour * 60 + t.hora_entrada.minute
+        salida_min = t.hora_salida.hour * 60 + t.hora_salida.minute
+        minutos += max(salida_min - entrada_min, 0)
+    return minutos
+
+
+def _split_extras_por_tramo(
+    fichadas_pares: list[tuple[datetime, datetime]],
+    tramos_dia: list[tuple[TipoDiaHE, time, time]],
+    extras_minutos_total: int,
+    trabajado_minutos_total: int,
+) -> dict[TipoDiaHE, dict[str, int]]:
+    """Ver `HorasExtrasService._split_extras_por_tramo`."""
+    # Calculamos minutos trabajados por tramo.
+    por_tramo: dict[TipoDiaHE, int] = {tipo: 0 for tipo, _, _ in tramos_dia}
+
+    for entrada_dt, salida_dt in fichadas_pares:
+        for tipo, hi, hf in tramos_dia:
+            # Convertimos hi/hf del tramo a datetime del mismo día que la fichada.
+            base = entrada_dt.date()
+            tramo_inicio = datetime.combine(base, hi, tzinfo=entrada_dt.tzinfo)
+            # Si hf es FIN_DIA sentinel → fin real es 24:00 = inicio del día siguiente.
+            if hf == _FIN_DIA:
+                tramo_fin = datetime.combine(base + timedelta(days=1), time(0, 0), tzinfo=entrada_dt.tzinfo)
+            else:
+                tramo_fin = datetime.combine(base, hf, tzinfo=entrada_dt.tzinfo)
+            # Intersección [entrada_dt, salida_dt] ∩ [tramo_inicio, tramo_fin).
+            inter_inicio = max(entrada_dt, tramo_inicio)
+            inter_fin = min(salida_dt, tramo_fin)
+            if inter_fin > inter_inicio:
+                por_tramo[tipo] += int((inter_fin - inter_inicio).total_seconds() // 60)
+
+    # Distribuir extras_minutos_total proporcional a trabajado.
+    if trabajado_minutos_total <= 0:
+        return {}
+
+    resultado: dict[TipoDiaHE, dict[str, int]] = {}
+    asignado = 0
+    # Lista de tipos con minutos>0, ordenada por enum.value para determinismo.
+    tipos_con_trabajo = [t for t, m in por_tramo.items() if m > 0]
+    for idx, tipo in enumerate(tipos_con_trabajo):
+        trabajado_t = por_tramo[tipo]
+        if idx == len(tipos_con_trabajo) - 1:
+            # Último: absorbe el resto para evitar pérdidas por redondeo.
+            extras_t = extras_minutos_total - asignado
+        else:
+            extras_t = int(round(extras_minutos_total * trabajado_t / trabajado_minutos_total))
+        asignado += extras_t
+        if extras_t > 0:
+            resultado[tipo] = {"extras": extras_t, "trabajado": trabajado_t}
+    return resultado
+
+
+def calcular_bloques_dia(dia: DiaHE, params: ParametrosHE) -> list[dict[str, Any]]:
+    """
+    Bloques HE de un empleado-día (los 8 steps del design §7, sin queries).
+
+    Ver `HorasExtrasService._calcular_he_dia` para el contrato de los dicts.
+    """
+    fichadas = dia.fichadas
+    base = {
+        "empleado_id": dia.empleado_id,
+        "fecha": dia.fecha,
+        "fichada_entrada_id": fichadas[0][0] if fichadas else None,
+        "fichada_salida_id": fichadas[-1][0] if fichadas else None,
+        "generada_por": GeneradaPorHE.SISTEMA.value,
+    }
+
+    # 2. Presentismo bloqueante. 3. Sin fichadas → no HE.
+    if dia.presentismo_bloquea or not fichadas:
+        return []
+
+    # 4. Validar: primera fichada = entrada, última = salida; una sola es ambigua.
+    if len(fichadas) == 1:
+        error_tipo = ErrorTipoHE.FICHADA_UNICA
+        return [
+            {
+                **base,
+                "turno_esperado_minutos": 0,
+                "trabajado_minutos": None,
+                "extras_minutos": None,
+                "tipo_dia": TipoDiaHE.HABIL_50.value,  # placeholder; estado=error
+                "porcentaje_recargo": Decimal("0.00"),
+                "estado": EstadoHE.ERROR_FICHADAS.value,
+                "error_tipo": error_tipo.value,
+                "observaciones": f"Fichadas del día inválidas: {error_tipo.value}",
+            }
+        ]
+
+    # 5. Minutos trabajados (última - primera).
+    entrada, salida = fichadas[0][1], fichadas[-1][1]
+    trabajado_min = max(int((salida - entrada).total_seconds() // 60), 0)
+
+    # 6. Turno esperado.
+    if dia.turnos is None:
+        return [
+            {
+                **base,
+                "turno_esperado_minutos": 0,
+                "trabajado_minutos": trabajado_min,
+                "extras_minutos": None,
+                "tipo_dia": TipoDiaHE.HABIL_50.value,
+                "porcentaje_recargo": Decimal("0.00"),
+                "estado": EstadoHE.PENDIENTE_ASIGNACION_TURNO.value,
+                "error_tipo": None,
+                "observaciones": ("Empleado sin turno asignado. Asignar turno y reprocesar para detectar HE reales."),
+            }
+        ]
+    turno_esperado_min = _minutos_turno(dia.turnos, dia.fecha)
+
+    # 7. Spec: HE menor O IGUAL a tolerancia NO se registra.
+    extras_brutos = max(0, trabajado_min - turno_esperado_min)
+    if extras_brutos <= params.tolerancia_extras_minutos:
+        return []
+
+    # 8. Clasificar tipo_dia y dividir si corresponde (sábado).
+    tramos = _tramos_dia(dia.fecha, dia.es_feriado, params.hora_corte_sabado)
+    if len(tramos) == 1:
+        distribucion = {tramos[0][0]: {"extras": extras_brutos, "trabajado": trabajado_min}}
+    else:
+        # Ventana única (primera → última fichada): el scope NO contempla almuerzo.
+        distribucion = _split_extras_por_tramo([(entrada, salida)], tramos, extras_brutos, trabajado_min)
+
+    return [
+        {
+            **base,
+            "turno_esperado_minutos": turno_esperado_min,
+            "trabajado_minutos": datos["trabajado"],
+            "extras_minutos": datos["extras"],
+            "tipo_dia": tipo.value,
+            "porcentaje_recargo": params.porcentaje(tipo),
+            "estado": EstadoHE.DETECTADA.value,
+            "error_tipo": None,
+            "observaciones": None,
+        }
+        for tipo, datos in distribucion.items()
+    ]
+
+
+def _calcular_dias(dias: list[DiaHE], params: ParametrosHE) -> list[list[dict[str, Any]] | None]:
+    """Calcula un lote de empleado-días; `None` en la posición de los que fallan."""
+    resultado: list[list[dict[str, Any]] | None] = []
+    for dia in dias:
+        try:
+            resultado.append(calcular_bloques_dia(dia, params))
+        except Exception as exc:  # noqa: BLE001 — boundary por empleado-día
+            logger.error(
+                "❌ Error detectando HE empleado=%s fecha=%s: %s",
+                dia.empleado_id,
+                dia.fecha,
+                exc,
+                exc_info=True,
+            )
+            resultado.append(None)
+    return resultado
+
+
+def _calcular_en_pool(dias: list[DiaHE], params: ParametrosHE, procesos: int) -> list[list[dict[str, Any]] | None]:
+    """`_calcular_dias` en `procesos` workers (chunks contiguos); en proceso si procesos <= 1."""
+    if procesos <= 1 or len(dias) < procesos:
+        return _calcular_dias(dias, params)
+    tam = -(-len(dias) // (procesos * 4))
+    chunks = [dias[i : i + tam] for i in range(0, len(dias), tam)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return [r for parcial in pool.map(_calcular_dias, chunks, repeat(params)) for r in parcial]
+
+
 class HorasExtrasService:
     """
     Lógica de negocio del módulo HE.
@@ -159,33 +432,9 @@ class HorasExtrasService:
           por lo que usamos `time(23, 59, 59, 999999)` como sentinel y los callers
           tratan a "hasta fin del día" comparando `< 24:00` lógicamente.
         """
-        FIN_DIA = time(23, 59, 59, 999999)
-        INICIO_DIA = time(0, 0, 0)
-
-        # 1. Excepción del calendario (feriado u otro día especial no laborable).
+        # Excepción del calendario (feriado u otro día especial no laborable).
         excepcion = self.db.query(RRHHHorarioExcepcion).filter(RRHHHorarioExcepcion.fecha == fecha).first()
-        if excepcion is not None and not excepcion.es_laborable:
-            return [(TipoDiaHE.FERIADO_100, INICIO_DIA, FIN_DIA)]
-
-        weekday = fecha.weekday()  # 0=Lunes ... 6=Domingo
-
-        # 2. Domingo.
-        if weekday == 6:
-            return [(TipoDiaHE.DOMINGO_100, INICIO_DIA, FIN_DIA)]
-
-        # 3. Sábado: split por corte.
-        if weekday == 5:
-            # Si por alguna config bizarra el corte es 00:00 → todo es sabado_100.
-            if hora_corte_sabado <= INICIO_DIA:
-                return [(TipoDiaHE.SABADO_100, INICIO_DIA, FIN_DIA)]
-            # Si corte >= 24:00 (no debería pasar) → todo habil_50.
-            return [
-                (TipoDiaHE.HABIL_50, INICIO_DIA, hora_corte_sabado),
-                (TipoDiaHE.SABADO_100, hora_corte_sabado, FIN_DIA),
-            ]
-
-        # 4. Lunes-Viernes.
-        return [(TipoDiaHE.HABIL_50, INICIO_DIA, FIN_DIA)]
+        return _tramos_dia(fecha, excepcion is not None and not excepcion.es_laborable, hora_corte_sabado)
 
     # ─── T-2.2 — Validación de fichadas del día ─────────────────────────
 
@@ -269,48 +518,31 @@ class HorasExtrasService:
             distingue "empleado sin turno asignado" (→ pendiente_asignacion_turno)
             de "empleado con turnos pero ninguno cubre este weekday" (→ HE puro).
         """
-        # weekday(): 0=Lun ... 6=Dom; en RRHHHorarioConfig.dias_semana 1=Lun ... 7=Dom.
-        weekday_str = str(fecha.weekday() + 1)
-
-        # ¿El empleado tiene CUALQUIER asignación de turno? (independiente del día).
-        tiene_alguna = (
-            self.db.query(RRHHEmpleadoHorario).filter(RRHHEmpleadoHorario.empleado_id == empleado_id).first()
-            is not None
-        )
-
-        if not tiene_alguna:
+        turnos = self._turnos_empleado(empleado_id)
+        if turnos is None:
             return 0, False
-
-        # Turnos del empleado que cubren este weekday y están activos.
-        turnos = (
-            self.db.query(RRHHHorarioConfig)
+        return _minutos_turno(turnos, fecha), True
+
+    def _turnos_empleado(self, empleado_id: int) -> list[TurnoHE] | None:
+        """Turnos asignados al empleado (activos o no); None si no tiene ninguna asignación."""
+        filas = (
+            self.db.query(
+                RRHHHorarioConfig.id,
+                RRHHHorarioConfig.activo,
+                RRHHHorarioConfig.dias_semana,
+                RRHHHorarioConfig.hora_entrada,
+                RRHHHorarioConfig.hora_salida,
+            )
             .join(
                 RRHHEmpleadoHorario,
                 RRHHEmpleadoHorario.horario_config_id == RRHHHorarioConfig.id,
             )
-            .filter(
-                RRHHEmpleadoHorario.empleado_id == empleado_id,
-                RRHHHorarioConfig.activo.is_(True),
-            )
+            .filter(RRHHEmpleadoHorario.empleado_id == empleado_id)
             .all()
         )
-
-        # Dedup por id (riesgo §12).
-        vistos: set[int] = set()
-        minutos = 0
-        for t in turnos:
-            if t.id in vistos:
-                continue
-            vistos.add(t.id)
-            # Filtrar por weekday — el campo `dias_semana` es CSV "1,2,3,4,5".
-            dias = [d.strip() for d in (t.dias_semana or "").split(",") if d.strip()]
-            if weekday_str not in dias:
-                continue
-            entrada_min = t.hora_entrada.hour * 60 + t.hora_entrada.minute
-            salida_min = t.hora_salida.hour * 60 + t.hora_salida.minute
-            minutos += max(salida_min - entrada_min, 0)
-
-        return minutos, True
+        if not filas:
+            return None
+        return [TurnoHE(*fila) for fila in filas]
 
     def _hay_presentismo_bloqueante(self, empleado_id: int, fecha: date) -> bool:
         """True si presentismo es vacaciones/art/licencia/feriado."""
@@ -344,44 +576,7 @@ class HorasExtrasService:
         Returns:
             { TipoDiaHE: { 'extras': int, 'trabajado': int } } — solo tramos con extras > 0.
         """
-        # Calculamos minutos trabajados por tramo.
-        por_tramo: dict[TipoDiaHE, int] = {tipo: 0 for tipo, _, _ in tramos_dia}
-
-        for entrada_dt, salida_dt in fichadas_pares:
-            for tipo, hi, hf in tramos_dia:
-                # Convertimos hi/hf del tramo a datetime del mismo día que la fichada.
-                base = entrada_dt.date()
-                tramo_inicio = datetime.combine(base, hi, tzinfo=entrada_dt.tzinfo)
-                # Si hf es FIN_DIA sentinel → fin real es 24:00 = inicio del día siguiente.
-                if hf == time(23, 59, 59, 999999):
-                    tramo_fin = datetime.combine(base + timedelta(days=1), time(0, 0), tzinfo=entrada_dt.tzinfo)
-                else:
-                    tramo_fin = datetime.combine(base, hf, tzinfo=entrada_dt.tzinfo)
-                # Intersección [entrada_dt, salida_dt] ∩ [tramo_inicio, tramo_fin).
-                inter_inicio = max(entrada_dt, tramo_inicio)
-                inter_fin = min(salida_dt, tramo_fin)
-                if inter_fin > inter_inicio:
-                    por_tramo[tipo] += int((inter_fin - inter_inicio).total_seconds() // 60)
-
-        # Distribuir extras_minutos_total proporcional a trabajado.
-        if trabajado_minutos_total <= 0:
-            return {}
-
-        resultado: dict[TipoDiaHE, dict[str, int]] = {}
-        asignado = 0
-        # Lista de tipos con minutos>0, ordenada por enum.value para determinismo.
-        tipos_con_trabajo = [t for t, m in por_tramo.items() if m > 0]
-        for idx, tipo in enumerate(tipos_con_trabajo):
-            trabajado_t = por_tramo[tipo]
-            if idx == len(tipos_con_trabajo) - 1:
-                # Último: absorbe el resto para evitar pérdidas por redondeo.
-                extras_t = extras_minutos_total - asignado
-            else:
-                extras_t = int(round(extras_minutos_total * trabajado_t / trabajado_minutos_total))
-            asignado += extras_t
-            if extras_t > 0:
-                resultado[tipo] = {"extras": extras_t, "trabajado": trabajado_t}
-        return resultado
+        return _split_extras_por_tramo(fichadas_pares, tramos_dia, extras_minutos_total, trabajado_minutos_total)
 
     def _calcular_he_dia(
         self, empleado: RRHHEmpleado, fecha: date, config: RRHHHorasExtrasConfig
@@ -407,125 +602,19 @@ class HorasExtrasService:
             porcentaje_recargo, estado, generada_por, observaciones, error_tipo.
 
         Idempotencia: este método NO consulta ni borra bloques existentes — eso lo
-        hace `detectar_he_periodo`. Es un cálculo puro modulo sus queries.
+        hace el caller. Carga los datos del día con queries puntuales y delega en
+        `calcular_bloques_dia` (el mismo cálculo que usa `detectar_he_periodo`).
         """
-        # 1. Fichadas del día.
-        fichadas = self._fichadas_del_dia(empleado.id, fecha)
-
-        # 2. Presentismo bloqueante.
-        if self._hay_presentismo_bloqueante(empleado.id, fecha):
-            return []
-
-        # 3. Sin fichadas → no HE.
-        if not fichadas:
-            return []
-
-        # 4. Validar.
-        valido, error_tipo = self._validar_fichadas_dia(fichadas)
-        if not valido and error_tipo is not None:
-            # Bloque único de error.
-            return [
-                {
-                    "empleado_id": empleado.id,
-                    "fecha": fecha,
-                    "fichada_entrada_id": fichadas[0].id if fichadas else None,
-                    "fichada_salida_id": fichadas[-1].id if fichadas else None,
-                    "turno_esperado_minutos": 0,
-                    "trabajado_minutos": None,
-                    "extras_minutos": None,
-                    "tipo_dia": TipoDiaHE.HABIL_50.value,  # placeholder; estado=error
-                    "porcentaje_recargo": Decimal("0.00"),
-                    "estado": EstadoHE.ERROR_FICHADAS.value,
-                    "error_tipo": error_tipo.value,
-                    "generada_por": GeneradaPorHE.SISTEMA.value,
-                    "observaciones": f"Fichadas del día inválidas: {error_tipo.value}",
-                }
-            ]
-
-        # 5. Minutos trabajados.
-        trabajado_min = self._minutos_trabajados(fichadas)
-
-        # 6. Turno esperado.
-        turno_esperado_min, tiene_asignacion = self._turno_esperado_minutos(empleado.id, fecha)
-
-        if not tiene_asignacion:
-            return [
-                {
-                    "empleado_id": empleado.id,
-                    "fecha": fecha,
-                    "fichada_entrada_id": fichadas[0].id,
-                    "fichada_salida_id": fichadas[-1].id,
-                    "turno_esperado_minutos": 0,
-                    "trabajado_minutos": trabajado_min,
-                    "extras_minutos": None,
-                    "tipo_dia": TipoDiaHE.HABIL_50.value,
-                    "porcentaje_recargo": Decimal("0.00"),
-                    "estado": EstadoHE.PENDIENTE_ASIGNACION_TURNO.value,
-                    "error_tipo": None,
-                    "generada_por": GeneradaPorHE.SISTEMA.value,
-                    "observaciones": (
-                        "Empleado sin turno asignado. Asignar turno y reprocesar para detectar HE reales."
-                    ),
-                }
-            ]
-
-        # 7. Comparar contra tolerancia.
-        # Spec: HE menor O IGUAL a tolerancia NO se registra.
-        extras_brutos = max(0, trabajado_min - turno_esperado_min)
-        if extras_brutos <= config.tolerancia_extras_minutos:
-            return []
-
-        # 8. Clasificar tipo_dia y dividir si corresponde.
-        tramos = self._clasificar_tipo_dia(fecha, config.hora_corte_sabado)
-
-        # Ventana única (primera → última fichada). No pareamos cortes
-        # intermedios porque el scope NO contempla almuerzo: todo el rango
-        # entre la primera y la última fichada se considera trabajado.
-        pares: list[tuple[datetime, datetime]] = [(fichadas[0].timestamp, fichadas[-1].timestamp)]
-
-        if len(tramos) == 1:
-            # Caso simple: todo el extra va al único tipo_dia.
-            tipo, _hi, _hf = tramos[0]
-            return [
-                {
-                    "empleado_id": empleado.id,
-                    "fecha": fecha,
-                    "fichada_entrada_id": fichadas[0].id,
-                    "fichada_salida_id": fichadas[-1].id,
-                    "turno_esperado_minutos": turno_esperado_min,
-                    "trabajado_minutos": trabajado_min,
-                    "extras_minutos": extras_brutos,
-                    "tipo_dia": tipo.value,
-                    "porcentaje_recargo": self._porcentaje_para_tipo_dia(tipo, config),
-                    "estado": EstadoHE.DETECTADA.value,
-                    "error_tipo": None,
-                    "generada_por": GeneradaPorHE.SISTEMA.value,
-                    "observaciones": None,
-                }
-            ]
-
-        # Caso sábado split.
-        distribucion = self._split_extras_por_tramo(pares, tramos, extras_brutos, trabajado_min)
-        bloques: list[dict[str, Any]] = []
-        for tipo, datos in distribucion.items():
-            bloques.append(
-                {
-                    "empleado_id": empleado.id,
-                    "fecha": fecha,
-                    "fichada_entrada_id": fichadas[0].id,
-                    "fichada_salida_id": fichadas[-1].id,
-                    "turno_esperado_minutos": turno_esperado_min,
-                    "trabajado_minutos": datos["trabajado"],
-                    "extras_minutos": datos["extras"],
-                    "tipo_dia": tipo.value,
-                    "porcentaje_recargo": self._porcentaje_para_tipo_dia(tipo, config),
-                    "estado": EstadoHE.DETECTADA.value,
-                    "error_tipo": None,
-                    "generada_por": GeneradaPorHE.SISTEMA.value,
-                    "observaciones": None,
-                }
-            )
-        return bloques
+        excepcion = self.db.query(RRHHHorarioExcepcion).filter(RRHHHorarioExcepcion.fecha == fecha).first()
+        dia = DiaHE(
+            empleado_id=empleado.id,
+            fecha=fecha,
+            fichadas=[(f.id, f.timestamp) for f in self._fichadas_del_dia(empleado.id, fecha)],
+            presentismo_bloquea=self._hay_presentismo_bloqueante(empleado.id, fecha),
+            turnos=self._turnos_empleado(empleado.id),
+            es_feriado=excepcion is not None and not excepcion.es_laborable,
+        )
+        return calcular_bloques_dia(dia, ParametrosHE.desde_config(config))
 
     # ─── T-2.5 — Audit trail append-only ────────────────────────────────
 
@@ -580,23 +669,35 @@ class HorasExtrasService:
         fecha_desde: date,
         fecha_hasta: date,
         empleado_ids: list[int] | None = None,
+        procesos: int = 1,
     ) -> dict[str, int]:
         """
         Detecta HE para todos los empleados activos en el rango [desde, hasta].
 
+        Motor por período: carga fichadas, turnos, presentismo, feriados y bloques
+        existentes de TODO el rango en una query por tabla, calcula cada
+        empleado-día en memoria (`calcular_bloques_dia`) y escribe solo las
+        diferencias contra lo que ya estaba persistido.
+
         Idempotente:
           - Bloques en estado congelado (aprobada/rechazada/liquidada/error_fichadas)
-            NO se sobrescriben — se conservan.
+            NO se sobrescriben — se conservan y el día no se recalcula.
           - Bloques en estado editable (detectada/pendiente_asignacion_turno) se
-            ELIMINAN antes de recalcular para mantener el resultado actualizado.
+            comparan con el recálculo por tipo_dia: iguales → no se tocan;
+            distintos → UPDATE + historial `recalculada`; sobrantes → DELETE;
+            nuevos → INSERT + historial `detectada`.
 
         Args:
             fecha_desde: inclusive.
             fecha_hasta: inclusive.
             empleado_ids: si provisto, restringe el cálculo a esos IDs.
+            procesos: > 1 reparte el cálculo en un ProcessPoolExecutor (recálculos
+                mensuales de toda la nómina). Las queries y escrituras siguen
+                siendo de este proceso.
 
         Returns:
-            { procesados, creados, actualizados, alertas, errores, pendientes_turno }
+            { procesados, creados, actualizados, sin_cambios, alertas, errores, pendientes_turno }
+            `actualizados` cuenta bloques editables modificados o borrados.
         """
         if fecha_hasta < fecha_desde:
             raise HTTPException(
@@ -604,125 +705,231 @@ class HorasExtrasService:
                 detail=f"fecha_hasta ({fecha_hasta}) debe ser >= fecha_desde ({fecha_desde})",
             )
 
-        config = self._get_config()
+        params = ParametrosHE.desde_config(self._get_config())
 
-        emp_query = self.db.query(RRHHEmpleado).filter(
+        emp_query = self.db.query(RRHHEmpleado.id).filter(
             RRHHEmpleado.activo.is_(True),
             RRHHEmpleado.estado == "activo",
         )
         if empleado_ids is not None:
             emp_query = emp_query.filter(RRHHEmpleado.id.in_(empleado_ids))
+        ids = [fila.id for fila in emp_query.all()]
 
-        empleados = emp_query.all()
-
-        procesados = 0
-        creados = 0
-        actualizados = 0
-        alertas = 0
-        errores = 0
-        pendientes_turno = 0
-
-        # Iterar fechas.
         dias: list[date] = []
         d = fecha_desde
         while d <= fecha_hasta:
             dias.append(d)
             d = d + timedelta(days=1)
 
-        for emp in empleados:
+        contadores = dict.fromkeys(
+            ("creados", "actualizados", "sin_cambios", "alertas", "errores", "pendientes_turno"), 0
+        )
+        if not ids:
+            return {"procesados": 0, **contadores}
+
+        # ── Carga en bloque ──
+        existentes = self._bloques_periodo(ids, fecha_desde, fecha_hasta)
+        fichadas = self._fichadas_periodo(ids, fecha_desde, fecha_hasta)
+        turnos = self._turnos_periodo(ids)
+        bloqueados = self._presentismo_bloqueante_periodo(ids, fecha_desde, fecha_hasta)
+        feriados = self._feriados_periodo(fecha_desde, fecha_hasta)
+
+        # Días con algún bloque congelado: no se recalculan (el hook
+        # `notificar_fichada_modificada` detecta divergencias), pero sus
+        # bloques editables se borran igual que antes.
+        a_borrar: list[RRHHHorasExtras] = []
+        a_calcular: list[DiaHE] = []
+        for emp_id in ids:
             for fecha in dias:
-                procesados += 1
-                try:
-                    # Borrar bloques editables existentes (recálculo).
-                    existentes_editables = (
-                        self.db.query(RRHHHorasExtras)
-                        .filter(
-                            RRHHHorasExtras.empleado_id == emp.id,
-                            RRHHHorasExtras.fecha == fecha,
-                            RRHHHorasExtras.estado.in_(_ESTADOS_EDITABLES),
-                        )
-                        .all()
-                    )
-                    for old in existentes_editables:
-                        self.db.delete(old)
-                        actualizados += 1
-
-                    # Forzar DELETE antes de los INSERTs siguientes. SQLAlchemy
-                    # no garantiza el orden DELETE→INSERT en un flush sobre la
-                    # misma tabla, y el unique constraint
-                    # uq_rrhh_he_emp_fecha_tipo (empleado_id, fecha, tipo_dia)
-                    # rompería si el INSERT corre antes que el DELETE.
-                    if existentes_editables:
-                        self.db.flush()
-
-                    # Si quedan bloques congelados para (emp, fecha), no recalculamos
-                    # nada nuevo (ya fueron procesados). El service confía en el hook
-                    # `notificar_fichada_modificada` para detectar divergencias.
-                    tiene_congelados = (
-                        self.db.query(RRHHHorasExtras.id)
-                        .filter(
-                            RRHHHorasExtras.empleado_id == emp.id,
-                            RRHHHorasExtras.fecha == fecha,
-                            RRHHHorasExtras.estado.in_(_ESTADOS_CONGELADOS),
-                        )
-                        .first()
-                        is not None
+                previos = existentes.get((emp_id, fecha), [])
+                if any(b.estado in _ESTADOS_CONGELADOS for b in previos):
+                    a_borrar.extend(b for b in previos if b.estado in _ESTADOS_EDITABLES)
+                    continue
+                a_calcular.append(
+                    DiaHE(
+                        empleado_id=emp_id,
+                        fecha=fecha,
+                        fichadas=fichadas.get((emp_id, fecha), []),
+                        presentismo_bloquea=(emp_id, fecha) in bloqueados,
+                        turnos=turnos.get(emp_id),
+                        es_feriado=fecha in feriados,
                     )
-                    if tiene_congelados:
-                        continue
-
-                    # Calcular nuevos bloques.
-                    nuevos = self._calcular_he_dia(emp, fecha, config)
-                    for data in nuevos:
-                        bloque = RRHHHorasExtras(**data)
-                        self.db.add(bloque)
-                        # flush para obtener id antes del historial.
-                        self.db.flush()
-                        creados += 1
-                        if bloque.estado == EstadoHE.PENDIENTE_ASIGNACION_TURNO.value:
-                            pendientes_turno += 1
-                        if bloque.estado == EstadoHE.ERROR_FICHADAS.value:
-                            errores += 1
-                        self._log_historial(
-                            bloque,
-                            accion=_ACCION_DETECTADA,
-                            estado_anterior=None,
-                            estado_nuevo=bloque.estado,
-                            usuario_id=None,
-                            motivo="Detección automática (cron / batch)",
-                        )
-                except HTTPException:
-                    raise
-                except Exception as exc:  # noqa: BLE001 — boundary del loop
-                    errores += 1
-                    logger.error(
-                        "❌ Error detectando HE empleado=%s fecha=%s: %s",
-                        emp.id,
-                        fecha,
-                        exc,
-                        exc_info=True,
+                )
+
+        # ── Cálculo en memoria ──
+        calculados = _calcular_en_pool(a_calcular, params, procesos)
+
+        # ── Diff contra lo persistido ──
+        nuevos: list[RRHHHorasExtras] = []
+        for dia, bloques in zip(a_calcular, calculados):
+            if bloques is None:
+                contadores["errores"] += 1
+                continue
+            previos = {b.tipo_dia: b for b in existentes.get((dia.empleado_id, dia.fecha), [])}
+            for data in bloques:
+                if data["estado"] == EstadoHE.PENDIENTE_ASIGNACION_TURNO.value:
+                    contadores["pendientes_turno"] += 1
+                if data["estado"] == EstadoHE.ERROR_FICHADAS.value:
+                    contadores["errores"] += 1
+
+                previo = previos.pop(data["tipo_dia"], None)
+                if previo is None:
+                    nuevos.append(RRHHHorasExtras(**data))
+                elif any(getattr(previo, campo) != valor for campo, valor in data.items()):
+                    snapshot_anterior = self._snapshot_bloque(previo)
+                    estado_anterior = previo.estado
+                    for campo, valor in data.items():
+                        setattr(previo, campo, valor)
+                    self._log_historial(
+                        previo,
+                        accion=_ACCION_RECALCULADA,
+                        estado_anterior=estado_anterior,
+                        estado_nuevo=previo.estado,
+                        usuario_id=None,
+                        motivo="Recálculo automático (cron / batch)",
+                        snapshot=snapshot_anterior,
                     )
+                    contadores["actualizados"] += 1
+                else:
+                    contadores["sin_cambios"] += 1
+            a_borrar.extend(previos.values())
+
+        # ── Escritura en bloque ──
+        # DELETE primero y por statement: los INSERT de abajo pueden reusar el
+        # (empleado_id, fecha, tipo_dia) de uq_rrhh_he_emp_fecha_tipo. El historial
+        # y las alertas caen por ON DELETE CASCADE.
+        if a_borrar:
+            self.db.execute(
+                delete(RRHHHorasExtras).where(RRHHHorasExtras.id.in_([b.id for b in a_borrar])),
+                execution_options={"synchronize_session": False},
+            )
+            for b in a_borrar:
+                self.db.expunge(b)
+            contadores["actualizados"] += len(a_borrar)
+
+        # Un flush: INSERTs agrupados (RETURNING de los ids) + UPDATEs de los modificados.
+        self.db.add_all(nuevos)
+        self.db.flush()
+        for bloque in nuevos:
+            self._log_historial(
+                bloque,
+                accion=_ACCION_DETECTADA,
+                estado_anterior=None,
+                estado_nuevo=bloque.estado,
+                usuario_id=None,
+                motivo="Detección automática (cron / batch)",
+            )
+        contadores["creados"] = len(nuevos)
 
         self.db.commit()
 
+        resultado = {"procesados": len(ids) * len(dias), **contadores}
         logger.info(
-            "✅ detectar_he_periodo procesados=%d creados=%d actualizados=%d errores=%d pendientes_turno=%d alertas=%d",
-            procesados,
-            creados,
-            actualizados,
-            errores,
-            pendientes_turno,
-            alertas,
+            "✅ detectar_he_periodo procesados=%d creados=%d actualizados=%d sin_cambios=%d errores=%d "
+            "pendientes_turno=%d alertas=%d",
+            resultado["procesados"],
+            resultado["creados"],
+            resultado["actualizados"],
+            resultado["sin_cambios"],
+            resultado["errores"],
+            resultado["pendientes_turno"],
+            resultado["alertas"],
         )
+        return resultado
 
-        return {
-            "procesados": procesados,
-            "creados": creados,
-            "actualizados": actualizados,
-            "alertas": alertas,
-            "errores": errores,
-            "pendientes_turno": pendientes_turno,
-        }
+    # ─── Cargas en bloque del motor por período ─────────────────────────
+
+    def _bloques_periodo(
+        self, empleado_ids: list[int], desde: date, hasta: date
+    ) -> dict[tuple[int, date], list[RRHHHorasExtras]]:
+        por_dia: dict[tuple[int, date], list[RRHHHorasExtras]] = {}
+        bloques = (
+            self.db.query(RRHHHorasExtras)
+            .filter(
+                RRHHHorasExtras.empleado_id.in_(empleado_ids),
+                RRHHHorasExtras.fecha.between(desde, hasta),
+            )
+            .all()
+        )
+        for b in bloques:
+            por_dia.setdefault((b.empleado_id, b.fecha), []).append(b)
+        return por_dia
+
+    def _fichadas_periodo(
+        self, empleado_ids: list[int], desde: date, hasta: date
+    ) -> dict[tuple[int, date], list[tuple[int, datetime]]]:
+        """
+        Fichadas del rango agrupadas por (empleado, día), ascendentes.
+
+        El día se calcula en el servidor igual que `_fichadas_del_dia`
+        (cast(timestamp, Date)); el filtro por timestamp con un día de margen
+        es solo para que use el índice.
+        """
+        if self.db.get_bind().dialect.name == "sqlite":
+            # SQLite no tiene CAST(... AS DATE): date() devuelve el día como texto.
+            dia = type_coerce(func.date(RRHHFichada.timestamp), Date)
+        else:
+            dia = cast(RRHHFichada.timestamp, Date)
+        filas = (
+            self.db.query(RRHHFichada.empleado_id, dia.label("dia"), RRHHFichada.id, RRHHFichada.timestamp)
+            .filter(
+                RRHHFichada.empleado_id.in_(empleado_ids),
+                RRHHFichada.timestamp >= datetime.combine(desde - timedelta(days=1), time(0), tzinfo=ART_TZ),
+                RRHHFichada.timestamp < datetime.combine(hasta + timedelta(days=2), time(0), tzinfo=ART_TZ),
+                dia.between(desde, hasta),
+            )
+            .order_by(RRHHFichada.empleado_id, RRHHFichada.timestamp.asc())
+            .all()
+        )
+        por_dia: dict[tuple[int, date], list[tuple[int, datetime]]] = {}
+        for fila in filas:
+            por_dia.setdefault((fila.empleado_id, fila.dia), []).append((fila.id, fila.timestamp))
+        return por_dia
+
+    def _turnos_periodo(self, empleado_ids: list[int]) -> dict[int, list[TurnoHE]]:
+        """Turnos asignados por empleado; los que no tienen asignación no aparecen."""
+        filas = (
+            self.db.query(
+                RRHHEmpleadoHorario.empleado_id,
+                RRHHHorarioConfig.id,
+                RRHHHorarioConfig.activo,
+                RRHHHorarioConfig.dias_semana,
+                RRHHHorarioConfig.hora_entrada,
+                RRHHHorarioConfig.hora_salida,
+            )
+            .join(RRHHHorarioConfig, RRHHHorarioConfig.id == RRHHEmpleadoHorario.horario_config_id)
+            .filter(RRHHEmpleadoHorario.empleado_id.in_(empleado_ids))
+            .all()
+        )
+        por_empleado: dict[int, list[TurnoHE]] = {}
+        for emp_id, *turno in filas:
+            por_empleado.setdefault(emp_id, []).append(TurnoHE(*turno))
+        return por_empleado
+
+    def _presentismo_bloqueante_periodo(
+        self, empleado_ids: list[int], desde: date, hasta: date
+    ) -> set[tuple[int, date]]:
+        filas = (
+            self.db.query(RRHHPresentismoDiario.empleado_id, RRHHPresentismoDiario.fecha)
+            .filter(
+                RRHHPresentismoDiario.empleado_id.in_(empleado_ids),
+                RRHHPresentismoDiario.fecha.between(desde, hasta),
+                RRHHPresentismoDiario.estado.in_(_PRESENTISMOS_BLOQUEAN_HE),
+            )
+            .all()
+        )
+        return {(fila.empleado_id, fila.fecha) for fila in filas}
+
+    def _feriados_periodo(self, desde: date, hasta: date) -> set[date]:
+        filas = (
+            self.db.query(RRHHHorarioExcepcion.fecha)
+            .filter(
+                RRHHHorarioExcepcion.fecha.between(desde, hasta),
+                RRHHHorarioExcepcion.es_laborable.is_(False),
+            )
+            .all()
+        )
+        return {fila.fecha for fila in filas}
 
     # ─── T-2.6 — Workflow ───────────────────────────────────────────────
 
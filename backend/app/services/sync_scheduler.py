@@ -0,0 +1,235 @@
+"""Orquestador de syncs como DAG, en proceso y con paralelismo acotado.
+
+Contexto: `sync_all_incremental.sh` lanzaba un proceso Python por sync, en
+serie: cada uno pagaba el import de SQLAlchemy/modelos y un ERP lento frenaba
+todo lo que venía detrás, aunque no dependiera de él.
+
+Decisión:
+  - Cada sync es un `SyncJob` con sus dependencias (`depende_de`). Un job
+    arranca cuando TERMINARON sus dependencias (ok o con error: los syncs
+    incrementales son idempotentes y retoman desde su propio watermark, igual
+    que el script secuencial seguía después de un error).
+  - Ramas independientes corren en paralelo, con un máximo de
+    `max_paralelo` jobs a la vez (semáforo). La ventana total tiende al
+    camino crítico del DAG en lugar de la suma de todos los jobs.
+  - Un solo proceso: un engine (`SessionLocal`) y el pool HTTP del registry
+    (`get_http_client`) compartidos. Cada job recibe su propia Session.
+  - Los jobs async corren en el loop principal. Los que bloquean (usan
+    `requests` o son funciones sync) se marcan `bloqueante=True` y corren en
+    un thread, para no frenar al resto.
+  - Cada job registra estado, duración y filas en `sync_job_runs`.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy.orm import Session, configure_mappers
+
+from app.core.database import SessionLocal
+from app.models.sync_job_run import SyncJobRun
+
+logger = logging.getLogger(__name__)
+
+MAX_PARALELO_DEFAULT = 4
+
+ESTADO_OK = "ok"
+ESTADO_ERROR = "error"
+
+
+@dataclass(frozen=True)
+class SyncJob:
+    """Un sync del DAG.
+
+    `funcion` recibe una Session como primer argumento (salvo `usa_db=False`)
+    más `kwargs`; puede ser async o sync.
+    """
+
+    nombre: str
+    funcion: Callable[..., Any]
+    depende_de: tuple[str, ...] = ()
+    usa_db: bool = True
+    bloqueante: bool = False
+    kwargs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ResultadoJob:
+    nombre: str
+    estado: str
+    inicio: float  # relativo al inicio de la corrida
+    fin: float
+    filas: Optional[int] = None
+    error: Optional[str] = None
+    resultado: Any = None
+
+    @property
+    def duracion_s(self) -> float:
+        return self.fin - self.inicio
+
+
+@dataclass
+class ResultadoCorrida:
+    corrida_id: str
+    jobs: dict[str, ResultadoJob]
+    duracion_s: float
+    camino_critico: list[str]
+    duracion_camino_critico_s: float
+
+    @property
+    def errores(self) -> list[ResultadoJob]:
+        return [r for r in self.jobs.values() if r.estado == ESTADO_ERROR]
+
+
+def validar_dag(jobs: list[SyncJob]) -> list[str]:
+    """Orden topológico de los jobs. ValueError si hay duplicados, dependencias desconocidas o ciclos."""
+    por_nombre: dict[str, SyncJob] = {}
+    for job in jobs:
+        if job.nombre in por_nombre:
+            raise ValueError(f"Job duplicado: {job.nombre}")
+        por_nombre[job.nombre] = job
+    for job in jobs:
+        faltantes = [d for d in job.depende_de if d not in por_nombre]
+        if faltantes:
+            raise ValueError(f"{job.nombre} depende de jobs inexistentes: {', '.join(faltantes)}")
+
+    orden: list[str] = []
+    pendientes = {job.nombre: set(job.depende_de) for job in jobs}
+    while pendientes:
+        listos = [nombre for nombre, deps in pendientes.items() if not deps]
+        if not listos:
+            raise ValueError(f"Ciclo de dependencias entre: {', '.join(sorted(pendientes))}")
+        for nombre in listos:
+            orden.append(nombre)
+            del pendientes[nombre]
+        for deps in pendientes.values():
+            deps.difference_update(listos)
+    return orden
+
+
+def camino_critico(jobs: list[SyncJob], duraciones: dict[str, float]) -> tuple[list[str], float]:
+    """Cadena de dependencias de mayor duración total (con las duraciones medidas)."""
+    por_nombre = {job.nombre: job for job in jobs}
+    mejor: dict[str, tuple[float, list[str]]] = {}
+    for nombre in validar_dag(jobs):
+        previo = max((mejor[d] for d in por_nombre[nombre].depende_de), default=(0.0, []), key=lambda x: x[0])
+        mejor[nombre] = (previo[0] + duraciones.get(nombre, 0.0), previo[1] + [nombre])
+    if not mejor:
+        return [], 0.0
+    total, cadena = max(mejor.values(), key=lambda x: x[0])
+    return cadena, total
+
+
+def contar_filas(resultado: Any) -> Optional[int]:
+    """Filas procesadas según lo que devuelve cada sync (tupla de conteos, int, ResultadoSync...)."""
+    if isinstance(resultado, bool):
+        return None
+    if isinstance(resultado, int):
+        return resultado
+    if isinstance(resultado, tuple):
+        conteos = [v for v in resultado[:2] if isinstance(v, int) and not isinstance(v, bool)]
+        return sum(conteos) if conteos else None
+    if isinstance(resultado, dict):
+        conteos = [
+            v for k, v in resultado.items() if k in ("insertados", "actualizados", "nuevos") and isinstance(v, int)
+        ]
+        return sum(conteos) if conteos else None
+    escritas = getattr(resultado, "escritas", None)
+    return escritas if isinstance(escritas, int) else None
+
+
+def _registrar(session_factory: Callable[[], Session], corrida_id: str, base: datetime, r: ResultadoJob) -> None:
+    db = session_factory()
+    try:
+        db.add(
+            SyncJobRun(
+                corrida_id=corrida_id,
+                job=r.nombre,
+                estado=r.estado,
+                inicio=datetime.fromtimestamp(base.timestamp() + r.inicio, tz=timezone.utc),
+                fin=datetime.fromtimestamp(base.timestamp() + r.fin, tz=timezone.utc),
+                duracion_s=r.duracion_s,
+                filas=r.filas,
+                error=r.error,
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("No se pudo registrar el resultado del job %s", r.nombre, exc_info=True)
+    finally:
+        db.close()
+
+
+async def _invocar(job: SyncJob, db: Optional[Session]) -> Any:
+    args = (db,) if job.usa_db else ()
+    if inspect.iscoroutinefunction(job.funcion):
+        if job.bloqueante:
+            return await asyncio.to_thread(asyncio.run, job.funcion(*args, **job.kwargs))
+        return await job.funcion(*args, **job.kwargs)
+    return await asyncio.to_thread(job.funcion, *args, **job.kwargs)
+
+
+async def ejecutar_dag(
+    jobs: list[SyncJob],
+    max_paralelo: int = MAX_PARALELO_DEFAULT,
+    session_factory: Callable[[], Session] = SessionLocal,
+    al_terminar: Optional[Callable[[ResultadoJob], None]] = None,
+) -> ResultadoCorrida:
+    """Ejecuta el DAG de jobs y devuelve el resultado de cada uno.
+
+    Args:
+        jobs: Jobs a ejecutar (el orden de la lista no importa).
+        max_paralelo: Jobs corriendo a la vez como máximo.
+        session_factory: Fábrica de sesiones (una por job, más el registro).
+        al_terminar: Callback opcional al terminar cada job (progreso).
+    """
+    validar_dag(jobs)
+    # Configurar los mappers antes de arrancar: la primera query ORM los
+    # configura (~1s, CPU) y frenaría el loop con jobs ya en curso.
+    configure_mappers()
+    corrida_id = str(uuid.uuid4())
+    base = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    semaforo = asyncio.Semaphore(max_paralelo)
+    terminados = {job.nombre: asyncio.Event() for job in jobs}
+    resultados: dict[str, ResultadoJob] = {}
+
+    async def _correr(job: SyncJob) -> None:
+        for dependencia in job.depende_de:
+            await terminados[dependencia].wait()
+        async with semaforo:
+            inicio = time.perf_counter() - t0
+            db = session_factory() if job.usa_db else None
+            try:
+                salida = await _invocar(job, db)
+                r = ResultadoJob(
+                    job.nombre, ESTADO_OK, inicio, time.perf_counter() - t0, contar_filas(salida), resultado=salida
+                )
+            except Exception as e:
+                logger.exception("Job de sync %s falló", job.nombre)
+                r = ResultadoJob(job.nombre, ESTADO_ERROR, inicio, time.perf_counter() - t0, error=str(e)[:2000])
+            finally:
+                if db is not None:
+                    db.close()
+        resultados[job.nombre] = r
+        _registrar(session_factory, corrida_id, base, r)
+        terminados[job.nombre].set()
+        if al_terminar is not None:
+            al_terminar(r)
+
+    await asyncio.gather(*(_correr(job) for job in jobs))
+
+    cadena, duracion_cadena = camino_critico(jobs, {n: r.duracion_s for n, r in resultados.items()})
+    return ResultadoCorrida(
+        corrida_id=corrida_id,
+        jobs=resultados,
+        duracion_s=time.perf_counter() - t0,
+        camino_critico=cadena,
+        duracion_camino_critico_s=duracion_cadena,
+    )
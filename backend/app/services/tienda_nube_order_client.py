@@ -8,6 +8,8 @@ import os
 import logging
 from typing import Optional, Dict
 
+from app.core.http_clients import get_http_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -72,13 +74,13 @@ class TiendaNubeOrderClient:
         logger.debug(f"Consultando TiendaNube API: {url}")
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
+            client = get_http_client("tiendanube")
+            response = await client.get(url, headers=self.headers)
+            response.raise_for_status()
 
-                order_data = response.json()
-                logger.debug(f"Datos de TN orden {order_id} obtenidos: number={order_data.get('number')}")
-                return order_data
+            order_data = response.json()
+            logger.debug(f"Datos de TN orden {order_id} obtenidos: number={order_data.get('number')}")
+            return order_data
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
@@ -3,6 +3,7 @@ from lxml import html
 from sqlalchemy.orm import Session
 from datetime import date
 from app.models.tipo_cambio import TipoCambio
+from app.events import pricing_reference_hooks  # noqa: F401  (side-effect: invalida el cache de TC)
 
 
 def actualizar_tipo_cambio_bna(db: Session):
@@ -8,7 +8,8 @@ reales.
 Las tablas se borran en orden FK-safe (hijos antes que padres):
   - compras_papelera, compras_adjuntos → solo referencian usuarios/empresas/proveedores,
     sin FKs hacia otras tablas del módulo.
-  - cc_reconciliacion_log, compras_eventos, imputaciones, cc_proveedor_movimientos
+  - cc_reconciliacion_log, compras_eventos, imputaciones, cc_proveedor_movimientos,
+    cc_proveedor_saldos
     → hijos que no tienen FKs salientes a ordenes_pago, pedidos, etc.
   - dinero_a_cuenta → leaf table; origen_op_id → ordenes_pago.id (RESTRICT). Debe ir
     ANTES de ordenes_pago para evitar ForeignKeyViolation al borrar OPs.
@@ -53,6 +54,7 @@ TABLAS_COMPRAS_SIEMPRE = [
     "compras_eventos",
     "imputaciones",
     "cc_proveedor_movimientos",
+    "cc_proveedor_saldos",
     "dinero_a_cuenta",
     "ordenes_pago",
     "notas_credito_local",
@@ -43,23 +43,18 @@ def calcular_comision_ml(
     """
     # Obtener constantes de pricing
     if db_session:
-        from app.models.pricing_constants import PricingConstants
+        from app.services.pricing_calculator import obtener_constantes_metricas
 
-        constants = (
-            db_session.query(PricingConstants)
-            .filter(PricingConstants.fecha_desde <= fecha_venta.date())
-            .order_by(PricingConstants.fecha_desde.desc())
-            .first()
-        )
+        constants = obtener_constantes_metricas(db_session, fecha_venta.date())
 
         if constants:
-            monto_tier1 = float(constants.monto_tier1)
-            monto_tier2 = float(constants.monto_tier2)
-            monto_tier3 = float(constants.monto_tier3)
-            comision_tier1 = float(constants.comision_tier1)
-            comision_tier2 = float(constants.comision_tier2)
-            comision_tier3 = float(constants.comision_tier3)
-            varios_porcentaje = float(constants.varios_porcentaje)
+            monto_tier1 = constants["monto_tier1"]
+            monto_tier2 = constants["monto_tier2"]
+            monto_tier3 = constants["monto_tier3"]
+            comision_tier1 = constants["tier1"]
+            comision_tier2 = constants["tier2"]
+            comision_tier3 = constants["tier3"]
+            varios_porcentaje = constants["varios"]
         else:
             # Fallback a valores por defecto
             monto_tier1 = 15000
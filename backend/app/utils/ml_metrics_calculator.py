@@ -81,18 +81,12 @@ def calcular_metricas_ml(
     monto_tier3 = 33000  # Default
     offset_flex_valor = None  # Monto fijo offset Flex (configurable en panel Constantes Pricing)
     if db_session:
-        from app.models.pricing_constants import PricingConstants
+        from app.services.pricing_calculator import obtener_constantes_metricas
 
-        constants = (
-            db_session.query(PricingConstants)
-            .filter(PricingConstants.fecha_desde <= fecha_venta.date())
-            .order_by(PricingConstants.fecha_desde.desc())
-            .first()
-        )
+        constants = obtener_constantes_metricas(db_session, fecha_venta.date())
         if constants:
-            monto_tier3 = float(constants.monto_tier3)
-            if constants.offset_flex is not None:
-                offset_flex_valor = float(constants.offset_flex)
+            monto_tier3 = constants["monto_tier3"]
+            offset_flex_valor = constants["offset_flex"]
 
     # Costo de envío sin IVA
     # Prioridad: seller_shipping_cost (dato real de ML) > fallback threshold con costo_envio_ml
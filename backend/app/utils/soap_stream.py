@@ -0,0 +1,293 @@
+"""Parser incremental de respuestas SOAP del ERP (wsBasicQuery).
+
+`parse_soap_response` cargaba el XML completo en memoria y lo recorría con
+regex: para scripts grandes (scriptItemTransaction, scriptAgeing) eso es el
+body entero + la copia desescapada + la lista de filas al mismo tiempo, y
+nada sale hasta que termina la descarga.
+
+`SoapRowParser` consume el body en chunks de texto (`feed`) y devuelve las
+filas `<Table>` a medida que se completan, con EXACTAMENTE la misma semántica
+que el parser original (que ahora es `parse_soap_response(...)` sobre esta
+clase):
+
+  1. Tag `<...Result ...>`: primer opener y contenido hasta el primer
+     `</...Result>`. Si falta alguno de los dos → fila de error.
+  2. Entidades: los mismos `str.replace` encadenados (&lt; &gt; &amp; &quot;
+     &apos;). Se aplican por segmento; un segmento nunca corta antes de un
+     `&` de los últimos 9 caracteres (la secuencia cruda más larga es
+     `&amp;quot;`, 10 caracteres, y sólo contiene `&` al inicio).
+  3. CDATA: pares `<![CDATA[ ... ]]>` completos se reemplazan por su
+     contenido; un opener sin cierre queda retenido y, al cerrar, sale tal
+     cual (igual que `re.sub` sin match).
+  4. Tablas: bloques `<Table ... </Table>` completos; los campos se extraen
+     con la misma regex y los valores `{...}` / `[...]` se intentan como JSON.
+  5. Una sola fila con un solo campo que es una lista → se devuelven los
+     elementos de la lista. Por eso la primera fila se retiene hasta ver la
+     segunda o hasta `close()`.
+  6. Sin tablas → JSON directo o `{"raw": ...}` sobre el contenido completo.
+     Sólo en este caso se acumula el texto (se descarta al ver la primera
+     tabla).
+
+Memoria: con tablas, lo retenido es la tabla en curso + colas de pocos
+caracteres, independiente del tamaño de la respuesta.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+ERROR_SIN_RESULT = {"error": "No se encontró el tag result"}
+
+_RE_OPENER = re.compile(r"<\w*:?\s*\w+Result[^>]*>")
+_RE_CLOSER = re.compile(r"</\w*:?\s*\w+Result>")
+_RE_CAMPO = re.compile(r"<([^>/\s]+)>([^<]*)</\1>")
+_RE_JSON = re.compile(r"(\{[\s\S]*\}|\[[\s\S]*\])")
+# Texto desde un `<` que todavía puede completar un cierre del Result
+_RE_CIERRE_PARCIAL = re.compile(r"<(?:/[\w:\s]*)?")
+
+_CDATA_OPEN = "<![CDATA["
+_CDATA_CLOSE = "]]>"
+_TABLE_OPEN = "<Table"
+_TABLE_CLOSE = "</Table>"
+
+# Largo máximo de una secuencia cruda que el desescapado encadenado
+# transforma (`&amp;quot;` / `&amp;apos;`), menos uno.
+_COLA_ENTIDAD = 9
+
+
+def desescapar(texto: str) -> str:
+    """Desescapa entidades igual que el parser original (replaces encadenados)."""
+    texto = texto.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+    return texto.replace("&quot;", '"').replace("&apos;", "'")
+
+
+def parse_table(table_xml: str) -> dict[str, Any]:
+    """Extrae los campos de un bloque <Table>...</Table> como dict."""
+    row: dict[str, Any] = {}
+    for tag_name, tag_value in _RE_CAMPO.findall(table_xml):
+        value: Any = tag_value.strip()
+
+        # Intentar parsear JSON
+        if value and len(value) > 1:
+            first, last = value[0], value[-1]
+            if (first == "{" and last == "}") or (first == "[" and last == "]"):
+                try:
+                    value = json.loads(value)
+                except (json.JSONDecodeError, ValueError):
+                    pass
+
+        row[tag_name] = value
+    return row
+
+
+def _prefijo_pendiente(texto: str, marcador: str) -> int:
+    """Largo del sufijo más largo de `texto` que es prefijo propio de `marcador`."""
+    for largo in range(min(len(marcador) - 1, len(texto)), 0, -1):
+        if texto.endswith(marcador[:largo]):
+            return largo
+    return 0
+
+
+class _Delimitado:
+    """Busca bloques `apertura ... cierre` en un stream de texto.
+
+    `procesar(texto)` devuelve una lista de ("texto", str) para lo que está
+    fuera de bloques y ("bloque", contenido) por cada bloque completo. Un
+    bloque abierto se acumula en partes (sin re-copiar el acumulado en cada
+    chunk) y el cierre se busca sólo en la cola anterior + el chunk nuevo.
+    """
+
+    def __init__(self, apertura: str, cierre: str) -> None:
+        self.apertura = apertura
+        self.cierre = cierre
+        self._prefijo = ""  # posible apertura parcial al final del chunk anterior
+        self._partes: Optional[list[str]] = None  # contenido del bloque abierto
+        self._cola = ""  # últimos caracteres del bloque abierto
+
+    def procesar(self, texto: str, final: bool) -> list[tuple[str, str]]:
+        salida: list[tuple[str, str]] = []
+        texto = self._prefijo + texto
+        self._prefijo = ""
+        pos = 0
+        while True:
+            if self._partes is None:
+                inicio = texto.find(self.apertura, pos)
+                if inicio == -1:
+                    retener = 0 if final else _prefijo_pendiente(texto[pos:], self.apertura)
+                    corte = len(texto) - retener
+                    if corte > pos:
+                        salida.append(("texto", texto[pos:corte]))
+                    self._prefijo = texto[corte:]
+                    break
+                if inicio > pos:
+                    salida.append(("texto", texto[pos:inicio]))
+                self._partes = []
+                self._cola = ""
+                pos = inicio + len(self.apertura)
+                desde_cola = False
+            else:
+                desde_cola = True
+
+            busqueda = self._cola + texto[pos:] if desde_cola else texto
+            idx = busqueda.find(self.cierre, 0 if desde_cola else pos)
+            if idx == -1:
+                if pos < len(texto):
+                    self._partes.append(texto[pos:])
+                self._cola = (self._cola + texto[pos:])[-(len(self.cierre) - 1) :]
+                if final:
+                    salida.append(("abierto", "".join(self._partes)))
+                    self._partes = None
+                break
+
+            # Inicio del cierre relativo a `texto` (negativo si empieza en la cola)
+            k = idx - len(self._cola) + pos if desde_cola else idx
+            acumulado = "".join(self._partes)
+            if k >= pos:
+                contenido = acumulado + texto[pos:k]
+            else:
+                contenido = acumulado[: len(acumulado) - (pos - k)]
+            salida.append(("bloque", contenido))
+            self._partes = None
+            self._cola = ""
+            pos = k + len(self.cierre)
+        return salida
+
+
+class SoapRowParser:
+    """Parser incremental: `feed(chunk)` → filas completas; `close()` → el resto.
+
+    Atributos:
+      - `completo`: se encontraron el opener y el cierre del tag Result.
+      - `json_directo`: valor del fallback JSON cuando no hubo tablas (dict o
+        lista), None en otro caso (se completa en `close()`).
+      - `filas_emitidas`: filas devueltas hasta ahora.
+    """
+
+    def __init__(self) -> None:
+        self.completo = False
+        self.json_directo: Optional[Any] = None
+        self.filas_emitidas = 0
+
+        self._abierto = False  # opener del Result encontrado
+        self._crudo = ""  # texto crudo pendiente (cabecera o cola del contenido)
+        self._cdata = _Delimitado(_CDATA_OPEN, _CDATA_CLOSE)
+        self._tablas = _Delimitado(_TABLE_OPEN, _TABLE_CLOSE)
+        self._texto_completo: Optional[list[str]] = []  # para el fallback sin tablas
+        self._primera_fila: Optional[dict[str, Any]] = None
+        self._cerrado = False
+
+    # ------------------------------------------------------------------ API
+
+    def feed(self, chunk: str) -> list[Any]:
+        """Procesa un chunk de texto y devuelve las filas que quedaron completas."""
+        if self._cerrado or self.completo:
+            return []
+        self._crudo += chunk
+
+        if not self._abierto:
+            match = _RE_OPENER.search(self._crudo)
+            if not match:
+                # Sólo un `<` posterior al último `>` puede llegar a ser el opener
+                self._crudo = self._crudo[self._crudo.rfind(">") + 1 :]
+                return []
+            self._abierto = True
+            self._crudo = self._crudo[match.end() :]
+
+        match = _RE_CLOSER.search(self._crudo)
+        if match:
+            segmento = self._crudo[: match.start()]
+            self._crudo = ""
+            self.completo = True
+            return self._procesar_crudo(segmento, final=True)
+
+        # Retener un posible cierre parcial (`</ns:FooRes`)...
+        corte = len(self._crudo)
+        menor = self._crudo.rfind("<")
+        if menor != -1 and _RE_CIERRE_PARCIAL.fullmatch(self._crudo, menor):
+            corte = menor
+        # ...y una posible entidad parcial (`&am`)
+        amp = self._crudo.rfind("&", max(0, corte - _COLA_ENTIDAD), corte)
+        if amp != -1:
+            corte = amp
+        segmento, self._crudo = self._crudo[:corte], self._crudo[corte:]
+        return self._procesar_crudo(segmento, final=False)
+
+    def close(self) -> list[Any]:
+        """Fin del body: emite la fila retenida o el fallback (JSON / raw / error)."""
+        if self._cerrado:
+            return []
+        self._cerrado = True
+        if not self.completo:
+            return [dict(ERROR_SIN_RESULT)]
+
+        if self._texto_completo is None:
+            # Hubo tablas: sólo puede quedar la primera fila retenida
+            if self._primera_fila is None:
+                return []
+            fila, self._primera_fila = self._primera_fila, None
+            # Una sola fila con un solo campo que es un array → el array
+            if len(fila) == 1:
+                value = next(iter(fila.values()))
+                if isinstance(value, list):
+                    self.filas_emitidas += len(value)
+                    return list(value)
+            self.filas_emitidas += 1
+            return [fila]
+
+        # Sin tablas: buscar JSON directo
+        inner_xml = "".join(self._texto_completo)
+        self._texto_completo = None
+        filas: list[Any] = [{"raw": inner_xml}]
+        json_match = _RE_JSON.search(inner_xml)
+        if json_match:
+            try:
+                self.json_directo = json.loads(json_match.group(1))
+                filas = list(self.json_directo) if isinstance(self.json_directo, list) else [self.json_directo]
+            except (json.JSONDecodeError, ValueError):
+                pass
+        self.filas_emitidas += len(filas)
+        return filas
+
+    # ------------------------------------------------------------ internals
+
+    def _procesar_crudo(self, segmento: str, final: bool) -> list[Any]:
+        # Remover CDATA (un CDATA sin cierre queda tal cual)
+        limpio: list[str] = []
+        for tipo, texto in self._cdata.procesar(desescapar(segmento), final):
+            limpio.append(_CDATA_OPEN + texto if tipo == "abierto" else texto)
+
+        filas: list[Any] = []
+        for texto in limpio:
+            if self._texto_completo is not None:
+                self._texto_completo.append(texto)
+            for tipo, contenido in self._tablas.procesar(texto, final=False):
+                if tipo == "bloque":
+                    self._emitir(parse_table(_TABLE_OPEN + contenido + _TABLE_CLOSE), filas)
+        if final:
+            # Una tabla sin cierre se descarta (igual que findall)
+            self._tablas.procesar("", final=True)
+        return filas
+
+    def _emitir(self, fila: dict[str, Any], filas: list[Any]) -> None:
+        self._texto_completo = None
+        if self.filas_emitidas == 0 and self._primera_fila is None:
+            self._primera_fila = fila
+            return
+        if self._primera_fila is not None:
+            filas.append(self._primera_fila)
+            self._primera_fila = None
+            self.filas_emitidas += 1
+        filas.append(fila)
+        self.filas_emitidas += 1
+
+
+def parse_soap_response(xml_content: str) -> Any:
+    """Parsea una respuesta SOAP completa (misma salida que el parser original)."""
+    parser = SoapRowParser()
+    filas = parser.feed(xml_content)
+    filas += parser.close()
+    if not parser.completo:
+        return [dict(ERROR_SIN_RESULT)]
+    if isinstance(parser.json_directo, dict):
+        return parser.json_directo
+    return filas
@@ -0,0 +1,422 @@
+"""Writer XLSX en streaming para los exports (memoria constante).
+
+Los exports armaban un `openpyxl.Workbook()` completo, lo guardaban en un
+`BytesIO` y recién ahí lo envolvían en `StreamingResponse`: todas las celdas
+en RAM (un objeto `Cell` por valor) y el cliente sin recibir nada hasta que
+terminaba el archivo.
+
+`stream_xlsx` escribe el paquete OOXML a mano sobre un `zipfile.ZipFile` en
+modo no-seekable (data descriptors) y va devolviendo los bytes comprimidos a
+medida que salen:
+
+  1. Las partes fijas (`[Content_Types].xml`, rels, `workbook.xml`) se
+     escriben antes de leer la primera fila → el primer chunk sale enseguida.
+  2. Cada hoja es una entrada del zip; las filas se consumen del iterable
+     (lazy) y se serializan a XML por lotes de `FILAS_POR_CHUNK`. Lo retenido
+     es el lote en curso + el buffer del compresor.
+  3. `styles.xml` va al final: los estilos se registran a medida que aparecen.
+
+Strings como `inlineStr` (sin tabla de shared strings que crecería con las
+filas); fechas como serial de Excel con formato de fecha. `None` = celda vacía.
+Anchos de columna y columnas ocultas van antes de `<sheetData>`, así que se
+declaran de entrada (no hay auto-ajuste por contenido).
+
+Las filas deberían venir de un cursor server-side (`filas_por_lotes`) para
+que tampoco la lectura de la base cargue todo. Errores:
+
+  - `RespuestaXlsx` lee la primera fila de cada hoja antes de devolver la
+    respuesta: las queries se ejecutan ahí, y si fallan el endpoint responde
+    500 como cualquier otro (nada salió todavía).
+  - Un error a mitad del stream ya no puede ser un 500 (los headers salieron
+    con 200): se loguea, se escribe una fila `MARCA_ERROR` en la hoja cortada
+    y el libro se cierra bien, así el usuario abre un archivo que dice que
+    está incompleto en vez de uno corrupto o, peor, uno truncado que parece
+    completo.
+"""
+
+from __future__ import annotations
+
+import logging
+import dataclasses
+import itertools
+import re
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+FILAS_POR_CHUNK = 500
+FILAS_POR_LOTE_DB = 1000
+
+MARCA_ERROR = "EXPORT INCOMPLETO: falló la generación del archivo, volvé a descargarlo"
+
+_EPOCH_EXCEL = datetime(1899, 12, 30)
+# Caracteres de control que XML 1.0 no admite (openpyxl levanta IllegalCharacterError)
+_RE_ILEGALES = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+@dataclass(frozen=True)
+class Estilo:
+    """Subconjunto de estilos que usan los exports."""
+
+    negrita: bool = False
+    color: Optional[str] = None  # RGB "FFFFFF"
+    relleno: Optional[str] = None  # RGB "366092"
+    formato: Optional[str] = None  # number format, ej. "#,##0.00"
+    horizontal: Optional[str] = None  # "center" | "left" | "right"
+    vertical: Optional[str] = None
+
+
+ENCABEZADO = Estilo(negrita=True, horizontal="center")
+ENCABEZADO_AZUL = Estilo(negrita=True, color="FFFFFF", relleno="366092", horizontal="center")
+
+_FORMATO_FECHA = "yyyy-mm-dd"
+_FORMATO_FECHA_HORA = "yyyy-mm-dd hh:mm:ss"
+
+
+@dataclass(frozen=True)
+class Celda:
+    """Valor con estilo propio (las celdas sin estilo van como valores pelados)."""
+
+    valor: Any
+    estilo: Estilo
+
+
+@dataclass
+class Hoja:
+    """
+    Una hoja del libro.
+
+    Args:
+        titulo: nombre de la pestaña (se trunca a 31 caracteres, como Excel).
+        filas: iterable de filas (secuencias de valores o `Celda`); se consume
+            una sola vez, mientras se escribe.
+        encabezado: primera fila, con `estilo_encabezado`.
+        anchos: ancho por columna (1-based por posición; None = default).
+        ocultas: columnas (1-based) ocultas.
+    """
+
+    titulo: str
+    filas: Iterable[Sequence[Any]]
+    encabezado: Optional[Sequence[Any]] = None
+    estilo_encabezado: Optional[Estilo] = ENCABEZADO
+    anchos: Sequence[Optional[float]] = ()
+    ocultas: Iterable[int] = field(default_factory=tuple)
+
+
+def columna_letra(n: int) -> str:
+    """1 → A, 27 → AA."""
+    letras = ""
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+class _Salida:
+    """Destino no-seekable del zip: acumula lo escrito hasta que se drena."""
+
+    def __init__(self) -> None:
+        self._partes: list[bytes] = []
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def drenar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+class _Estilos:
+    """Registro de estilos → índice de `cellXfs` (el 0 es el default)."""
+
+    def __init__(self) -> None:
+        self._xfs: dict[Estilo, int] = {Estilo(): 0}
+        self._fuentes: dict[tuple, int] = {(False, None): 0}
+        self._rellenos: dict[Optional[str], int] = {None: 0}
+        self._formatos: dict[str, int] = {}
+
+    def indice(self, estilo: Estilo) -> int:
+        if estilo not in self._xfs:
+            self._fuentes.setdefault((estilo.negrita, estilo.color), len(self._fuentes))
+            self._rellenos.setdefault(estilo.relleno, len(self._rellenos) + 1)  # 0 y 1 reservados
+            if estilo.formato:
+                self._formatos.setdefault(estilo.formato, 164 + len(self._formatos))
+            self._xfs[estilo] = len(self._xfs)
+        return self._xfs[estilo]
+
+    def xml(self) -> str:
+        formatos = "".join(
+            f'<numFmt numFmtId="{i}" formatCode="{escape(f, {chr(34): "&quot;"})}"/>' for f, i in self._formatos.items()
+        )
+        fuentes = ""
+        for negrita, color in self._fuentes:
+            fuentes += (
+                "<font>"
+                + ("<b/>" if negrita else "")
+                + '<sz val="11"/>'
+                + (f'<color rgb="FF{color}"/>' if color else "")
+                + '<name val="Calibri"/></font>'
+            )
+        rellenos = '<fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+        for rgb in list(self._rellenos)[1:]:
+            rellenos += f'<fill><patternFill patternType="solid"><fgColor rgb="FF{rgb}"/></patternFill></fill>'
+        xfs = ""
+        for estilo in self._xfs:
+            fuente = self._fuentes[(estilo.negrita, estilo.color)]
+            relleno = self._rellenos[estilo.relleno] if estilo.relleno else 0
+            formato = self._formatos.get(estilo.formato, 0) if estilo.formato else 0
+            alineacion = ""
+            if estilo.horizontal or estilo.vertical:
+                attrs = "".join(
+                    f' {k}="{v}"' for k, v in (("horizontal", estilo.horizontal), ("vertical", estilo.vertical)) if v
+                )
+                alineacion = f"<alignment{attrs}/>"
+            aplica = (
+                (' applyFont="1"' if fuente else "")
+                + (' applyFill="1"' if relleno else "")
+                + (' applyNumberFormat="1"' if formato else "")
+            )
+            xf = f'<xf numFmtId="{formato}" fontId="{fuente}" fillId="{relleno}" borderId="0" xfId="0"{aplica}'
+            xfs += xf + (f' applyAlignment="1">{alineacion}</xf>' if alineacion else "/>")
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            + (f'<numFmts count="{len(self._formatos)}">{formatos}</numFmts>' if self._formatos else "")
+            + f'<fonts count="{len(self._fuentes)}">{fuentes}</fonts>'
+            + f'<fills count="{len(self._rellenos) + 1}">{rellenos}</fills>'
+            + '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            + '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            + f'<cellXfs count="{len(self._xfs)}">{xfs}</cellXfs>'
+            + '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            + "</styleSheet>"
+        )
+
+
+def _celda_xml(ref: str, valor: Any, estilo: Optional[Estilo], estilos: _Estilos) -> str:
+    if isinstance(valor, datetime) or isinstance(valor, date):
+        if estilo is None or not estilo.formato:
+            formato = _FORMATO_FECHA_HORA if isinstance(valor, datetime) else _FORMATO_FECHA
+            estilo = Estilo(formato=formato) if estilo is None else _con_formato(estilo, formato)
+        if not isinstance(valor, datetime):
+            valor = datetime.combine(valor, time())
+        delta = valor.replace(tzinfo=None) - _EPOCH_EXCEL
+        valor = delta.days + delta.seconds / 86400 + delta.microseconds / 86_400_000_000
+
+    s = f' s="{estilos.indice(estilo)}"' if estilo is not None and estilo != Estilo() else ""
+    if isinstance(valor, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        if valor != valor or valor in (float("inf"), float("-inf")):  # NaN / inf → vacía
+            return f'<c r="{ref}"{s}/>' if s else ""
+        return f'<c r="{ref}"{s}><v>{valor}</v></c>'
+    texto = _RE_ILEGALES.sub("", str(valor))
+    espacio = ' xml:space="preserve"' if texto[:1].isspace() or texto[-1:].isspace() else ""
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t{espacio}>{escape(texto)}</t></is></c>'
+
+
+def _con_formato(estilo: Estilo, formato: str) -> Estilo:
+    return Estilo(estilo.negrita, estilo.color, estilo.relleno, formato, estilo.horizontal, estilo.vertical)
+
+
+def _fila_xml(numero: int, fila: Sequence[Any], estilo_fila: Optional[Estilo], estilos: _Estilos) -> str:
+    celdas = []
+    for col, valor in enumerate(fila, 1):
+        estilo = estilo_fila
+        if isinstance(valor, Celda):
+            valor, estilo = valor.valor, valor.estilo
+        if valor is None and estilo is None:
+            continue
+        ref = f"{columna_letra(col)}{numero}"
+        if valor is None:
+            celdas.append(f'<c r="{ref}" s="{estilos.indice(estilo)}"/>')
+        else:
+            celdas.append(_celda_xml(ref, valor, estilo, estilos))
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+def _inicio_hoja(hoja: Hoja) -> str:
+    ocultas = set(hoja.ocultas)
+    columnas = {i: a for i, a in enumerate(hoja.anchos, 1) if a is not None}
+    cols = ""
+    for col in sorted(set(columnas) | ocultas):
+        ancho = columnas.get(col, 8.43)
+        oculta = ' hidden="1"' if col in ocultas else ""
+        cols += f'<col min="{col}" max="{col}" width="{ancho}" customWidth="1"{oculta}/>'
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        + (f"<cols>{cols}</cols>" if cols else "")
+        + "<sheetData>"
+    )
+
+
+def _partes_fijas(titulos: list[str]) -> dict[str, str]:
+    hojas_ct = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(titulos) + 1)
+    )
+    hojas_wb = "".join(
+        f'<sheet name="{escape(t, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+        for i, t in enumerate(titulos, 1)
+    )
+    hojas_rels = "".join(
+        f'<Relationship Id="rId{i}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(titulos) + 1)
+    )
+    n = len(titulos)
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f"{hojas_ct}</Types>"
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f"<sheets>{hojas_wb}</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f"{hojas_rels}"
+            f'<Relationship Id="rId{n + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>'
+        ),
+    }
+
+
+def stream_xlsx(
+    hojas: Sequence[Hoja], filas_por_chunk: int = FILAS_POR_CHUNK, marcar_error: bool = False
+) -> Iterator[bytes]:
+    """
+    Genera el .xlsx en chunks de bytes; las filas se leen a medida que se escriben.
+
+    Con `marcar_error`, una excepción al leer las filas no corta el zip: se
+    loguea, la hoja termina con una fila `MARCA_ERROR` y las hojas siguientes
+    quedan vacías. Sin él (export jobs, que escriben a disco) se propaga.
+    """
+    salida = _Salida()
+    estilos = _Estilos()
+    titulos = [_RE_ILEGALES.sub("", h.titulo)[:31] or f"Hoja{i}" for i, h in enumerate(hojas, 1)]
+    fallo = False
+
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+        for nombre, contenido in _partes_fijas(titulos).items():
+            zf.writestr(nombre, contenido)
+        yield salida.drenar()
+
+        for i, hoja in enumerate(hojas, 1):
+            with zf.open(f"xl/worksheets/sheet{i}.xml", "w", force_zip64=True) as parte:
+                parte.write(_inicio_hoja(hoja).encode())
+                numero = 0
+                if hoja.encabezado is not None:
+                    numero = 1
+                    parte.write(_fila_xml(1, hoja.encabezado, hoja.estilo_encabezado, estilos).encode())
+                lote: list[str] = []
+                try:
+                    for fila in () if fallo else hoja.filas:
+                        lote.append(_fila_xml(numero + 1, fila, None, estilos))
+                        numero += 1
+                        if len(lote) >= filas_por_chunk:
+                            parte.write("".join(lote).encode())
+                            lote.clear()
+                            datos = salida.drenar()
+                            if datos:
+                                yield datos
+                except Exception:
+                    if not marcar_error:
+                        raise
+                    logger.exception("Export cortado a mitad del stream (hoja %r)", hoja.titulo)
+                    fallo = True
+                    lote.append(_fila_xml(numero + 1, [MARCA_ERROR], ENCABEZADO, estilos))
+                parte.write(("".join(lote) + "</sheetData></worksheet>").encode())
+            yield salida.drenar()
+
+        zf.writestr("xl/styles.xml", estilos.xml())
+    yield salida.drenar()
+
+
+def _con_log(chunks: Iterator[bytes], nombre: str) -> Iterator[bytes]:
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield chunk
+    except Exception:
+        logger.exception("Export %s cortado a mitad del stream", nombre)
+        raise
+
+
+def _precargar(hoja: Hoja) -> Hoja:
+    """Lee la primera fila (ejecuta la query) y devuelve la hoja con el iterable intacto."""
+    filas = iter(hoja.filas)
+    try:
+        primera = next(filas)
+    except StopIteration:
+        return dataclasses.replace(hoja, filas=())
+    return dataclasses.replace(hoja, filas=itertools.chain([primera], filas))
+
+
+class RespuestaXlsx(StreamingResponse):
+    """
+    `StreamingResponse` del libro que además conserva `hojas` y `filename`.
+    Al construirse ya leyó la primera fila de cada hoja, así que un error de
+    query sale del endpoint como 500 y no como un 200 con el archivo cortado.
+    Los export jobs (`app.services.export_jobs_service`) llaman al mismo
+    endpoint y escriben las hojas a disco en lugar de mandarlas al cliente.
+    """
+
+    def __init__(self, hojas: Sequence[Hoja], filename: str) -> None:
+        self.hojas = [_precargar(hoja) for hoja in hojas]
+        self.filename = filename
+        super().__init__(
+            _con_log(stream_xlsx(self.hojas, marcar_error=True), filename),
+            media_type=MEDIA_TYPE_XLSX,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+
+def respuesta_xlsx(hojas: Sequence[Hoja], filename: str) -> RespuestaXlsx:
+    """`StreamingResponse` con el libro en streaming y `Content-Disposition: attachment`."""
+    return RespuestaXlsx(hojas, filename)
+
+
+def filas_por_lotes(query, tamano: int = FILAS_POR_LOTE_DB):
+    """
+    Query ORM leída con cursor server-side (`yield_per` → `stream_results` en
+    PostgreSQL), de a `tamano` filas. Es un iterable lazy: se ejecuta cuando el
+    stream llega a la hoja.
+    """
+    return query.yield_per(tamano)
@@ -0,0 +1,178 @@
+"""
+Worker de tareas periódicas — proceso aparte de la API.
+
+Corre las tareas que antes vivían como `asyncio.create_task` en el lifespan de
+`app/main.py` (sync de sale orders, pedidos en preparación, auto-fix de envío
+gratis, ingesta/drafting/publicación de preguntas ML) con el runtime de
+`app/core/worker_runtime.py`: lease de líder en Redis, un thread + event loop
+por tarea, jitter, timeouts y estado en `GET /api/worker/status`.
+
+Ejecutar desde el directorio backend (uno o más procesos, en uno o más hosts;
+sólo el que tiene el lease corre las tareas):
+    python -m app.worker
+
+Con `WORKER_EMBEDDED=true` (default) la API corre este mismo runtime en su
+lifespan. En producción: instalar pricing-worker.service.example como servicio
+systemd y poner WORKER_EMBEDDED=false en el .env de la API.
+"""
+
+import asyncio
+import signal
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.worker_runtime import ScheduledTask, WorkerRuntime
+
+# Los listeners de SQLAlchemy también tienen que estar activos acá: las tareas
+# escriben modelos que invalidan caches / snapshots (ver app/main.py).
+from app.events import rrhh_he_hooks  # noqa: F401  (side-effect: registra listeners)
+from app.events import pricing_snapshot_hooks  # noqa: F401  (side-effect: registra listeners)
+from app.events import pricing_reference_hooks  # noqa: F401  (side-effect: registra listeners)
+from app.events import auth_cache_hooks  # noqa: F401  (side-effect: registra modelos)
+from app.events import export_cache_hooks  # noqa: F401  (side-effect: registra listeners)
+
+logger = get_logger(__name__)
+
+
+async def sync_pedidos_preparacion_cycle():
+    """Sincroniza pedidos en preparación (cada 5 minutos)."""
+    from app.scripts.sync_pedidos_preparacion import sync_pedidos_preparacion
+
+    await sync_pedidos_preparacion()
+
+
+async def sync_sale_orders_cycle():
+    """Sincroniza sale orders del ERP (cada 10 minutos): headers + details de los últimos 7 días."""
+    from app.scripts.sync_sale_orders_all import main_async
+
+    await main_async(days=7)
+
+
+async def _resolve_ml_bot_poll_interval_seconds() -> int:
+    """Judgment Day fix: `poll_interval_seconds` is seeded/documented as the
+    panel-editable interval for the ml-bot ingest/draft/publish tasks below,
+    but was never actually read — the loops hardcoded `asyncio.sleep(30)`.
+    Read live from a short-lived DB session (ADR-5) before each run; any
+    failure (DB error, malformed value already handled inside
+    `resolve_poll_interval_seconds`) falls back to the same default so a bad
+    read can never stop the task.
+    """
+    from app.core.database import get_background_db
+    from app.services.ml_questions import policy
+
+    try:
+        with get_background_db() as db:
+            return policy.resolve_poll_interval_seconds(db)
+    except Exception as exc:
+        logger.warning("ml-bot: failed to resolve poll_interval_seconds, using default=30s: %s", exc)
+        return 30
+
+
+async def ml_questions_ingest_cycle():
+    """
+    Ingesta preguntas nuevas de MercadoLibre (topic='questions') desde la BD
+    mlwebhook hacia ml_bot_questions (Slice C — solo ingesta, sin drafting ni
+    publicación).
+    """
+    from app.services.ml_questions.ingestion_service import run_ml_questions_ingest_cycle
+
+    stats = await run_ml_questions_ingest_cycle()
+    if stats["ingested"] or stats["duplicates"] or stats["skipped_answered"]:
+        logger.info("ML questions ingest stats: %s", stats)
+
+
+async def ml_questions_draft_cycle():
+    """
+    Orquesta el drafting de preguntas nuevas (status='received') vía el
+    pipeline LLM (Slice D2): claim CAS, manipulation-signal check, contexto
+    escopeado + Groq, denylist, y ruteo a waiting/pending_morning/failed.
+    """
+    from app.services.ml_questions.drafting_service import run_ml_questions_draft_cycle
+
+    stats = await run_ml_questions_draft_cycle()
+    if not stats.get("not_eligible"):
+        logger.info("ML questions draft stats: %s", stats)
+
+
+async def ml_questions_publish_cycle():
+    """
+    Publica en ML las preguntas cuyo wait_until ya venció (Slice E —
+    wait-window publisher): claim CAS, POST /answers fuera de cualquier sesión
+    de DB, y ruteo a published/waiting(retry)/failed.
+    """
+    from app.services.ml_questions.publisher_service import run_ml_questions_publish_cycle
+
+    stats = await run_ml_questions_publish_cycle()
+    if stats["published"] or stats["retry"] or stats["failed"]:
+        logger.info("ML questions publish stats: %s", stats)
+
+
+async def free_shipping_auto_fix_cycle():
+    """Desactiva envío gratis en publicaciones con free_shipping_error=true (no mandatory) cada 5 minutos."""
+    from app.services.free_shipping_auto_fix import run_free_shipping_auto_fix
+
+    stats = await run_free_shipping_auto_fix()
+    if stats["fixed"] > 0 or stats["failed"] > 0:
+        logger.info("Free shipping auto-fix stats: %s", stats)
+
+
+def build_tasks() -> list[ScheduledTask]:
+    """
+    Tareas del worker. Las demoras iniciales son las de los loops originales:
+    ingesta (60s) antes que drafting (90s) antes que publicación (120s), y el
+    sync de sale orders no compite con el arranque. Un run que pasa su timeout
+    se cancela; mientras siga colgado, las corridas siguientes se saltean.
+    """
+    return [
+        ScheduledTask("sync_pedidos_preparacion", sync_pedidos_preparacion_cycle, 300, initial_delay=30, timeout=240),
+        ScheduledTask("free_shipping_auto_fix", free_shipping_auto_fix_cycle, 300, initial_delay=60, timeout=240),
+        ScheduledTask("sync_sale_orders", sync_sale_orders_cycle, 600, initial_delay=60, timeout=1500),
+        ScheduledTask(
+            "ml_questions_ingest",
+            ml_questions_ingest_cycle,
+            _resolve_ml_bot_poll_interval_seconds,
+            initial_delay=60,
+            timeout=120,
+        ),
+        ScheduledTask(
+            "ml_questions_draft",
+            ml_questions_draft_cycle,
+            _resolve_ml_bot_poll_interval_seconds,
+            initial_delay=90,
+            timeout=300,
+        ),
+        ScheduledTask(
+            "ml_questions_publish",
+            ml_questions_publish_cycle,
+            _resolve_ml_bot_poll_interval_seconds,
+            initial_delay=120,
+            timeout=300,
+        ),
+    ]
+
+
+async def main() -> None:
+    from redis.asyncio import Redis as AsyncRedis
+
+    from app.core.sse import set_redis
+
+    redis = AsyncRedis.from_url(settings.REDIS_URL, decode_responses=False)
+    # Los eventos SSE que publican las tareas salen por el mismo Redis (best-effort).
+    set_redis(redis, loop=asyncio.get_running_loop())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runtime = WorkerRuntime(build_tasks(), redis)
+    logger.info("Worker started (token=%s), waiting for the leader lease", runtime.lease.token)
+    try:
+        await runtime.run(stop)
+    finally:
+        await redis.aclose()
+        logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,6 +4,9 @@ Shared test fixtures for the Pricing App backend.
 Provides:
 - In-memory SQLite database with all tables created.
 - FastAPI TestClient wired to the test DB.
+- `get_async_session` bridged onto the same session (SyncSessionAsyncAdapter).
+- `file_db` / `async_client`: file-backed SQLite shared by the sync engine and
+  the real aiosqlite AsyncSession (no bridge) for async-only failure modes.
 - Helper fixtures to create users and obtain auth tokens.
 
 Usage:
@@ -12,14 +15,18 @@ Usage:
         assert response.status_code == 200
 """
 
+import asyncio
 import os
 import re
+import uuid
 from contextlib import contextmanager
 
 # Must be set before `from app.main import app` below, since app.core.rate_limit
 # reads RATE_LIMIT_STORAGE_URI at import time (design §9). Tests never hit a
 # real Redis; in-memory storage keeps limiter tests deterministic and isolated.
 os.environ.setdefault("RATE_LIMIT_STORAGE_URI", "memory://")
+# The API lifespan never runs the periodic worker tasks under test.
+os.environ.setdefault("WORKER_EMBEDDED", "false")
 from datetime import date
 from typing import Optional
 
@@ -27,12 +34,13 @@ import fakeredis
 import pytest
 import sqlalchemy as sa
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, event, BigInteger, Integer, JSON, String
+from sqlalchemy import create_engine, event, BigInteger, Integer, JSON, String, TypeDecorator
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
 
-from app.core.database import Base, get_async_db, get_db
+from app.core import database, reference_cache
+from app.core.database import Base, dispose_async_engine, get_async_db, get_async_session, get_db
 from app.core.security import get_password_hash, create_access_token, create_refresh_token
 from app.core import token_revocation
 from app.main import app
@@ -63,16 +71,136 @@ def _fake_revocation_redis():
     token_revocation._set_client_for_tests(None)
 
 
+@pytest.fixture(autouse=True)
+def _fresh_reference_cache():
+    """Empty pricing reference cache + fakeredis publisher for every test.
+
+    The cache is process-wide: without this, constants/commissions loaded by one
+    test (each test rolls its data back) would be served to the next one.
+    """
+    reference_cache.cache.clear()
+    reference_cache._set_client_for_tests(fakeredis.FakeStrictRedis())
+    yield
+    reference_cache.cache.clear()
+    reference_cache._set_client_for_tests(None)
+
+
+# ---------------------------------------------------------------------------
+# AsyncSession bridge
+# ---------------------------------------------------------------------------
+
+
+class SyncSessionAsyncAdapter:
+    """Exposes a sync Session (or a MagicMock) through the AsyncSession API.
+
+    The test DB is an in-memory SQLite behind a StaticPool that aiosqlite can't
+    share, so endpoints on `get_async_session` get the very session (or mock)
+    the test installed for `get_db`. Fixtures and mock assertions keep working
+    unchanged. It can't surface async-only failures (lazy loads outside
+    `run_sync`, MissingGreenlet, driver param typing): tests for those use
+    `async_client`, which runs the real AsyncSession.
+    """
+
+    def __init__(self, session) -> None:
+        self.sync_session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.sync_session.execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self.sync_session.scalar(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return self.sync_session.scalars(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self.sync_session.get(*args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        return self.sync_session.flush(*args, **kwargs)
+
+    async def commit(self) -> None:
+        self.sync_session.commit()
+
+    async def rollback(self) -> None:
+        self.sync_session.rollback()
+
+    async def refresh(self, *args, **kwargs):
+        return self.sync_session.refresh(*args, **kwargs)
+
+    async def delete(self, instance) -> None:
+        self.sync_session.delete(instance)
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        pass
+
+
+async def _bridged_async_session():
+    provider = app.dependency_overrides.get(get_db)
+    if provider is None:
+        # Test didn't install a DB: behave like production.
+        async for session in get_async_session():
+            yield session
+        return
+
+    produced = provider()
+    if hasattr(produced, "__anext__"):
+        session = await produced.__anext__()
+    elif hasattr(produced, "__next__"):
+        session = next(produced)
+    else:
+        session = produced
+    try:
+        yield SyncSessionAsyncAdapter(session)
+    finally:
+        if hasattr(produced, "aclose"):
+            await produced.aclose()
+        elif hasattr(produced, "close"):
+            produced.close()
+
+
+@pytest.fixture(autouse=True)
+def _async_session_bridge():
+    """Route `get_async_session` to whatever `get_db` resolves to in this test.
+
+    Re-installed for every test because several suites call
+    `app.dependency_overrides.clear()` on teardown.
+    """
+    app.dependency_overrides[get_async_session] = _bridged_async_session
+    yield
+    app.dependency_overrides.pop(get_async_session, None)
+
+
 # ---------------------------------------------------------------------------
 # Database fixtures
 # ---------------------------------------------------------------------------
 
 TEST_DB_URL = "sqlite://"  # in-memory
 
+
+class _SqliteUUID(TypeDecorator):
+    """String(36) that also binds uuid.UUID values (pysqlite/aiosqlite reject them)."""
+
+    impl = String(36)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return str(value) if isinstance(value, uuid.UUID) else value
+
+
 # Map PostgreSQL-specific types to SQLite-compatible equivalents
 _PG_TYPE_MAP = {
     JSONB: lambda: JSON(),
-    PG_UUID: lambda: String(36),
+    PG_UUID: lambda: _SqliteUUID(),
 }
 
 
@@ -166,6 +294,60 @@ def client(db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture()
+def file_db(engine, tmp_path, monkeypatch):
+    """Committing session on a file-backed SQLite that the real async engine also opens.
+
+    Depends on `engine` so the PostgreSQL-only column types are already
+    remapped. DATABASE_URL points at the file, so `get_async_engine()` builds a
+    sqlite+aiosqlite engine over the same data. Data is committed (two engines
+    can't share a transaction) and the file is discarded with tmp_path.
+    """
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    file_engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=file_engine)
+    monkeypatch.setattr(database.settings, "DATABASE_URL", url)
+    asyncio.run(dispose_async_engine())
+
+    session = sessionmaker(bind=file_engine)()
+    yield session
+
+    session.close()
+    asyncio.run(dispose_async_engine())
+    file_engine.dispose()
+
+
+@pytest.fixture()
+def async_client(file_db):
+    """TestClient whose `get_async_session` is the real aiosqlite AsyncSession on `file_db`.
+
+    `get_db` / `get_async_db` hand out fresh sync sessions on the same file.
+    """
+    FileSession = sessionmaker(bind=file_db.get_bind())
+
+    def _override_get_db():
+        session = FileSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def _override_get_async_db():
+        session = FileSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_async_db] = _override_get_async_db
+    # No bridge: endpoints get a real AsyncSession from get_async_engine()
+    app.dependency_overrides.pop(get_async_session, None)
+    with TestClient(app, raise_server_exceptions=False) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+
 # ---------------------------------------------------------------------------
 # Query counting fixture (shared across suites)
 # ---------------------------------------------------------------------------
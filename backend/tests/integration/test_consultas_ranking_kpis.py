@@ -273,9 +273,9 @@ class TestKpis200:
         executed_sql = [
             str(call.args[0])
             for call in mock_db.execute.call_args_list
-            if call.args and "stock_por_deposito" in str(call.args[0])
+            if call.args and "ranking_item_deposito" in str(call.args[0])
         ]
-        assert executed_sql, "No query against stock_por_deposito was executed"
+        assert executed_sql, "No query against ranking_item_deposito was executed"
         assert all(f"stock < {STOCK_SENTINEL}" in sql for sql in executed_sql), (
             "Capital query does not exclude the stock sentinel — capital will be inflated"
         )
@@ -511,3 +511,25 @@ class TestRankingSQLScoping:
         all_params = _get_all_executed_params(mock_db)
         has_scope_param = any(isinstance(p, dict) and "scope_user_id" in p for p in all_params)
         assert has_scope_param
+
+
+# ---------------------------------------------------------------------------
+# 3. One connection per request
+# ---------------------------------------------------------------------------
+
+
+class TestRankingAuthSessionReleased:
+    """The auth session is closed once the scope is known, before the ranking SQL."""
+
+    @pytest.mark.parametrize("path", ["", "/kpis", "/resumen", "/facets"])
+    def test_auth_session_closed_before_ranking_sql(self, client_scoped, path: str) -> None:
+        client, user, mock_db = client_scoped
+        with _PATCH_SCOPED_TIENE, _PATCH_SCOPED_OBTENER, _PATCH_ALGUN_TRUE:
+            response = client.get(f"/api/consultas/ranking{path}", headers=_auth(user))
+        assert response.status_code == 200
+
+        nombres = [c[0] for c in mock_db.mock_calls]
+        primer_ranking_sql = next(
+            i for i, c in enumerate(mock_db.mock_calls) if c[0] == "execute" and "mp_scope.usuario_id" in str(c.args[0])
+        )
+        assert "close" in nombres[:primer_ranking_sql]
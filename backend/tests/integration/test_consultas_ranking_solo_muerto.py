@@ -2,7 +2,7 @@
 Tests for the `solo_muerto` filter on consultas ranking endpoints.
 
 Covers (SQL inspection — same pattern as test_kpis_sql_excludes_stock_sentinel):
-  - /ranking?solo_muerto=true → SQL contains the NOT EXISTS dead-stock clause
+  - /ranking?solo_muerto=true → SQL contains the dead-stock clause
   - /ranking?solo_muerto=false (default) → SQL does NOT contain it
   - count query also gets the clause when solo_muerto=true
   - /ranking/kpis?solo_muerto=true → SQL contains the clause
@@ -142,7 +142,7 @@ def _resumen_rows_and_totals() -> tuple[MagicMock, MagicMock]:
 # Constant to assert (must match what the router will generate)
 # ---------------------------------------------------------------------------
 
-_DEAD_STOCK_CLAUSE = "tct_m.ct_date >= NOW()::date - INTERVAL '365 days'"
+_DEAD_STOCK_CLAUSE = "rr.ultima_venta < NOW()::date - INTERVAL '365 days'"
 
 
 # ---------------------------------------------------------------------------
@@ -178,7 +178,7 @@ class TestRankingSoloMuerto:
         return TestClient(app, raise_server_exceptions=False)
 
     def test_solo_muerto_true_injects_not_exists_clause_in_data_query(self, user_muerto):
-        """solo_muerto=true → data query contains the NOT EXISTS dead-stock clause."""
+        """solo_muerto=true → data query contains the dead-stock clause."""
         mock_db = _make_ranking_mock_db()
         client = self._client_with_mock(mock_db)
 
@@ -203,12 +203,10 @@ class TestRankingSoloMuerto:
         # The data query (first execute call) must contain the clause
         assert sqls, "No SQL was executed"
         data_sql = sqls[0]
-        assert _DEAD_STOCK_CLAUSE in data_sql, (
-            f"Dead-stock NOT EXISTS clause missing from data query.\nSQL:\n{data_sql}"
-        )
+        assert _DEAD_STOCK_CLAUSE in data_sql, f"Dead-stock clause missing from data query.\nSQL:\n{data_sql}"
 
     def test_solo_muerto_true_injects_not_exists_clause_in_count_query(self, user_muerto):
-        """solo_muerto=true → count query ALSO contains the NOT EXISTS dead-stock clause."""
+        """solo_muerto=true → count query ALSO contains the dead-stock clause."""
         mock_db = _make_ranking_mock_db()
         client = self._client_with_mock(mock_db)
 
@@ -231,9 +229,7 @@ class TestRankingSoloMuerto:
         sqls = _all_sql(mock_db)
         assert len(sqls) >= 2, "Expected at least 2 execute calls (data + count)"
         count_sql = sqls[1]
-        assert _DEAD_STOCK_CLAUSE in count_sql, (
-            f"Dead-stock NOT EXISTS clause missing from count query.\nSQL:\n{count_sql}"
-        )
+        assert _DEAD_STOCK_CLAUSE in count_sql, f"Dead-stock clause missing from count query.\nSQL:\n{count_sql}"
 
     def test_solo_muerto_false_omits_clause_from_data_query(self, user_muerto):
         """solo_muerto=false (default) → data query does NOT contain the clause."""
@@ -311,7 +307,7 @@ class TestKpisSoloMuerto:
         return TestClient(app, raise_server_exceptions=False)
 
     def test_solo_muerto_true_injects_clause_in_kpis(self, user_muerto):
-        """solo_muerto=true → kpis SQL contains the NOT EXISTS dead-stock clause."""
+        """solo_muerto=true → kpis SQL contains the dead-stock clause."""
         mock_db = _make_single_row_mock_db(_kpis_row())
         client = self._client_with_mock(mock_db)
 
@@ -334,8 +330,8 @@ class TestKpisSoloMuerto:
         assert response.status_code == 200
         sqls = _all_sql(mock_db)
         assert sqls
-        kpis_sql = next((s for s in sqls if "stock_por_deposito" in s), None)
-        assert kpis_sql is not None, "No KPI query found against stock_por_deposito"
+        kpis_sql = next((s for s in sqls if "ranking_item_deposito" in s), None)
+        assert kpis_sql is not None, "No KPI query found against ranking_item_deposito"
         assert _DEAD_STOCK_CLAUSE in kpis_sql, f"Dead-stock clause missing from kpis SQL.\nSQL:\n{kpis_sql}"
 
     def test_solo_muerto_false_omits_clause_from_kpis(self, user_muerto):
@@ -395,7 +391,7 @@ class TestResumenSoloMuerto:
         return mock_db
 
     def test_solo_muerto_true_injects_clause_in_resumen(self, user_muerto):
-        """solo_muerto=true → resumen SQL contains the NOT EXISTS dead-stock clause."""
+        """solo_muerto=true → resumen SQL contains the dead-stock clause."""
         mock_db = self._make_resumen_mock_db()
         client = self._client_with_mock(mock_db)
 
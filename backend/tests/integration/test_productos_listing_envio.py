@@ -4,8 +4,9 @@ Integration tests for T-11: productos_listing uses resolver_costos_envio_batch.
 Strategy: The listing endpoint is too complex for a full HTTP integration test
 in the SQLite test environment (dozens of lazy-imported models). We verify the
 key contract at the module level:
-  1. resolver_costos_envio_batch is imported in productos_listing.
-  2. _resolve_envio / _resolve_envio_t prefer the batch dict over ERP envio.
+  1. resolver_costos_envio_batch is imported where the listing prices rows
+     (pricing_snapshot_service, which both listing endpoints delegate to).
+  2. The snapshot calculation prefers the batch dict over ERP envio.
 
 RED phase drives T-12 implementation.
 
@@ -17,22 +18,22 @@ from __future__ import annotations
 
 
 class TestListingModuleImportsBatchResolver:
-    """The listing module must import resolver_costos_envio_batch at module level."""
+    """The snapshot service the listings delegate to must import resolver_costos_envio_batch."""
 
     def test_resolver_costos_envio_batch_imported(self):
-        """productos_listing must expose resolver_costos_envio_batch as a module attribute."""
-        import app.api.endpoints.productos_listing as listing
+        """pricing_snapshot_service must expose resolver_costos_envio_batch as a module attribute."""
+        import app.services.pricing_snapshot_service as snapshot_service
 
-        assert hasattr(listing, "resolver_costos_envio_batch"), (
-            "resolver_costos_envio_batch must be imported at module level in productos_listing"
+        assert hasattr(snapshot_service, "resolver_costos_envio_batch"), (
+            "resolver_costos_envio_batch must be imported at module level in pricing_snapshot_service"
         )
 
     def test_resolver_costos_envio_batch_is_callable(self):
         """The imported symbol must be the real resolver function."""
-        import app.api.endpoints.productos_listing as listing
+        import app.services.pricing_snapshot_service as snapshot_service
         from app.services.envio_real_service import resolver_costos_envio_batch
 
-        assert listing.resolver_costos_envio_batch is resolver_costos_envio_batch
+        assert snapshot_service.resolver_costos_envio_batch is resolver_costos_envio_batch
 
 
 class TestResolveEnvioFunctionSignature:
@@ -51,33 +52,35 @@ class TestResolveEnvioFunctionSignature:
         import inspect
         import app.api.endpoints.productos_listing as listing
 
-        src = inspect.getsource(listing)
-        # The updated call pattern must be present
-        assert "_resolve_envio(item_id" in src or "_resolve_envio(producto_erp.item_id" in src, (
+        import app.services.pricing_snapshot_service as snapshot_service
+
+        # listar_productos delega el cálculo en pricing_snapshot_service
+        # (calcular_snapshot_item), que busca el envío real por item_id.
+        src = inspect.getsource(listing) + inspect.getsource(snapshot_service)
+        assert "envio_real_by_item.get(item_id)" in src or "_resolve_envio(producto_erp.item_id" in src, (
             "_resolve_envio must be called with item_id as the first argument (T-12 not applied)"
         )
 
-    def test_resolve_envio_t_accepts_item_id_first_arg(self):
+    def test_listar_productos_tienda_uses_snapshot(self):
         """
-        Same check for _resolve_envio_t (used in listar_productos_tienda).
+        listar_productos_tienda prices rows through obtener_snapshot, like listar_productos.
         """
         import inspect
         import app.api.endpoints.productos_listing as listing
 
-        src = inspect.getsource(listing)
-        assert "_resolve_envio_t(item_id" in src or "_resolve_envio_t(producto_erp.item_id" in src, (
-            "_resolve_envio_t must be called with item_id as the first argument (T-12 not applied)"
-        )
+        src = inspect.getsource(listing.listar_productos_tienda)
+        assert "obtener_snapshot(" in src
+        assert "calcular_markup(" not in src
 
     def test_envio_real_by_item_lookup_in_source(self):
         """
-        Both _resolve_envio and _resolve_envio_t must consult envio_real_by_item / envio_real_by_item_t
-        (the batch dict) before falling back to ERP envio.
+        The snapshot calculation must consult envio_real_by_item (the batch dict)
+        before falling back to ERP envio.
         """
         import inspect
-        import app.api.endpoints.productos_listing as listing
+        import app.services.pricing_snapshot_service as snapshot_service
 
-        src = inspect.getsource(listing)
+        src = inspect.getsource(snapshot_service)
         assert "envio_real_by_item" in src, (
             "Batch dict envio_real_by_item not found in listing — resolver_costos_envio_batch result not used"
         )
@@ -106,14 +106,15 @@ class TestEnvioConsistencyAcrossConsumers:
 
     def test_listing_module_uses_batch_resolver(self):
         """
-        Cross-consumer check: listing module imports and uses resolver_costos_envio_batch
+        Cross-consumer check: the listings read pricing_snapshots, whose
+        context (cargar_contexto_pricing) uses resolver_costos_envio_batch
         (the batch variant of the same resolver).
         """
-        import app.api.endpoints.productos_listing as listing
+        import app.services.pricing_snapshot_service as snapshot
         from app.services.envio_real_service import resolver_costos_envio_batch
 
-        assert listing.resolver_costos_envio_batch is resolver_costos_envio_batch, (
-            "Listing module does not use the real resolver_costos_envio_batch"
+        assert snapshot.resolver_costos_envio_batch is resolver_costos_envio_batch, (
+            "Pricing snapshot does not use the real resolver_costos_envio_batch"
         )
 
     def test_resolver_is_single_source_in_detail(self):
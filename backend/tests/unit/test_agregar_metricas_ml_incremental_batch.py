@@ -0,0 +1,178 @@
+"""
+Unit tests — batched process_and_insert in agregar_metricas_ml_incremental.py.
+
+Verifies:
+- New and existing id_operacion are upserted (INSERT ... ON CONFLICT) and counted apart;
+  columns outside the payload (is_cancelled) survive the update.
+- Per-window prefetch: ml_ventas_metricas / productos_erp / offsets are queried a
+  constant number of times, not once per row.
+- Group-offset consumption accumulates into a single resumen across rows of a window.
+- Low-markup notification is created once per (operation, user), also on re-runs.
+- A failing chunk is retried row by row: only the bad operation is dropped.
+
+SQLite-runnable.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy.orm import sessionmaker
+
+from app.models.ml_venta_metrica import MLVentaMetrica
+from app.models.notificacion import Notificacion
+from app.models.offset_ganancia import OffsetGanancia
+from app.models.offset_grupo import OffsetGrupo
+from app.models.offset_grupo_consumo import OffsetGrupoConsumo, OffsetGrupoResumen
+from app.models.producto import ProductoERP, ProductoPricing
+from app.scripts import agregar_metricas_ml_incremental as incremental
+from app.scripts.agregar_metricas_ml_incremental import process_and_insert
+
+ITEM_ID = 7001
+
+
+def _row(id_operacion: int, **overrides) -> SimpleNamespace:
+    data = {
+        "id_operacion": id_operacion,
+        "item_id": ITEM_ID,
+        "fecha_venta": datetime(2026, 10, 1, 12, 0),
+        "marca": "ACME",
+        "categoria": "Audio",
+        "subcategoria": "Parlantes",
+        "subcat_id": None,
+        "codigo": "ACME-1",
+        "descripcion": "Parlante",
+        "cantidad": 1,
+        "monto_unitario": 10000.0,
+        "monto_total": 10000.0,
+        "costo_sin_iva": 5000.0,
+        "iva": 21.0,
+        "envio_producto": None,
+        "pricelist_id": None,
+        "comision_base_porcentaje": 15.0,
+        "tipo_logistica": "cross_docking",
+        "ml_id": f"ML{id_operacion}",
+        "pack_id": None,
+        "mlp_id": "MLA1",
+        "mlp_official_store_id": None,
+        "moneda_costo": 1,
+        "cambio_momento": 1000.0,
+        "seller_shipping_cost": None,
+        "shipment_total": None,
+    }
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+def _seed_producto(db, markup_calculado: float = 30.0) -> None:
+    db.add(ProductoERP(item_id=ITEM_ID, codigo="ACME-1", descripcion="Parlante", marca="ACME", costo=5000.0))
+    db.add(ProductoPricing(item_id=ITEM_ID, markup_calculado=markup_calculado))
+    db.flush()
+
+
+class TestUpsert:
+    def test_inserta_y_actualiza(self, db) -> None:
+        _seed_producto(db)
+        db.add(
+            MLVentaMetrica(
+                id_operacion=1,
+                fecha_venta=datetime(2026, 10, 1),
+                cantidad=1,
+                monto_total=1,
+                is_cancelled=True,
+            )
+        )
+        db.flush()
+
+        insertados, actualizados, errores, _ = process_and_insert(db, [_row(1), _row(2), _row(3)], chunk_size=2)
+
+        assert (insertados, actualizados, errores) == (2, 1, 0)
+        db.expire_all()
+        metricas = {m.id_operacion: m for m in db.query(MLVentaMetrica).all()}
+        assert set(metricas) == {1, 2, 3}
+        assert float(metricas[1].monto_total) == 10000.0
+        assert metricas[1].is_cancelled is True
+        assert metricas[2].codigo == "ACME-1"
+
+    def test_queries_constantes_por_ventana(self, db, query_counter) -> None:
+        _seed_producto(db)
+        rows = [_row(i) for i in range(1, 41)]
+
+        with query_counter() as counter:
+            process_and_insert(db, rows, chunk_size=500)
+
+        assert counter.matching("ml_ventas_metricas") == 1
+        assert counter.matching("productos_erp") == 1
+        assert counter.matching("offsets_ganancia") == 2
+        assert counter.matching("pricing_constants") <= 1
+
+    def test_chunk_fallido_se_reintenta_de_a_una(self, db, monkeypatch, capsys) -> None:
+        _seed_producto(db)
+        # Sesión con rollback a savepoint: el rollback del script no se lleva el seed
+        session = sessionmaker(bind=db.connection(), join_transaction_mode="create_savepoint")()
+        upsert_original = incremental.upsert_metricas
+
+        def upsert(db_, payload):
+            if any(p["id_operacion"] == 2 for p in payload):
+                raise ValueError("numeric field overflow")
+            upsert_original(db_, payload)
+
+        monkeypatch.setattr(incremental, "upsert_metricas", upsert)
+
+        insertados, actualizados, errores, _ = process_and_insert(session, [_row(i) for i in range(1, 5)])
+
+        assert (insertados, actualizados, errores) == (3, 0, 1)
+        assert {m.id_operacion for m in session.query(MLVentaMetrica)} == {1, 3, 4}
+        assert "Operación 2 descartada" in capsys.readouterr().out
+
+
+class TestOffsetsYNotificaciones:
+    def test_consumo_grupo_acumula_en_un_resumen(self, db) -> None:
+        _seed_producto(db)
+        grupo = OffsetGrupo(nombre="Promo ACME")
+        db.add(grupo)
+        db.flush()
+        offset = OffsetGanancia(
+            item_id=ITEM_ID,
+            grupo_id=grupo.id,
+            tipo_offset="monto_por_unidad",
+            monto=100.0,
+            moneda="ARS",
+            fecha_desde=date(2026, 1, 1),
+            max_unidades=1000,
+            aplica_ml=True,
+        )
+        db.add(offset)
+        db.flush()
+
+        process_and_insert(db, [_row(1, cantidad=2), _row(2, cantidad=3)])
+
+        consumos = db.query(OffsetGrupoConsumo).order_by(OffsetGrupoConsumo.id_operacion).all()
+        assert [(c.id_operacion, c.cantidad) for c in consumos] == [(1, 2), (2, 3)]
+        resumen = db.query(OffsetGrupoResumen).filter(OffsetGrupoResumen.grupo_id == grupo.id).one()
+        assert resumen.total_unidades == 5
+        assert resumen.cantidad_ventas == 2
+
+        # Re-run de la misma ventana con cantidad cambiada: ajusta, no duplica
+        process_and_insert(db, [_row(1, cantidad=4), _row(2, cantidad=3)])
+        db.expire_all()
+        resumen = db.query(OffsetGrupoResumen).filter(OffsetGrupoResumen.grupo_id == grupo.id).one()
+        assert resumen.total_unidades == 7
+        assert db.query(OffsetGrupoConsumo).count() == 2
+
+    def test_notificacion_markup_bajo_una_vez(self, db, rma_superadmin_user) -> None:
+        _seed_producto(db, markup_calculado=30.0)
+        # Costo muy por encima del precio → markup negativo
+        venta = _row(1, costo_sin_iva=20000.0)
+
+        *_, notificaciones = process_and_insert(db, [venta, _row(2, pack_id=99, costo_sin_iva=20000.0)])
+        assert notificaciones == 1
+
+        *_, notificaciones = process_and_insert(db, [venta])
+        assert notificaciones == 0
+
+        notifs = db.query(Notificacion).filter(Notificacion.tipo == "markup_bajo").all()
+        assert [(n.id_operacion, n.user_id, n.codigo_producto) for n in notifs] == [
+            (1, rma_superadmin_user.id, "ACME-1")
+        ]
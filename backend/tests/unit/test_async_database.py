@@ -0,0 +1,190 @@
+"""
+Unit tests for the native async database layer (app.core.database).
+
+Tests cover:
+  - DATABASE_URL → async driver URL (asyncpg / aiosqlite, sslmode → ssl)
+  - the PostgreSQL async engine is pooled for PgBouncer (no connection made)
+  - a real AsyncSession round trip on SQLite: execute, commit, run_sync with
+    a sync ORM helper
+  - migrated endpoints (notificaciones mutations, colecta upload) on the real
+    aiosqlite AsyncSession over a file DB shared with the sync engine
+    (async_client), not the conftest bridge
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import database
+from app.core.database import _async_url, dispose_async_engine, get_async_engine, get_async_session
+from app.core.security import get_password_hash
+from app.models.etiqueta_colecta import EtiquetaColecta
+from app.models.notificacion import EstadoNotificacion, Notificacion
+from app.models.notificacion_ignorada import NotificacionIgnorada
+from app.models.usuario import AuthProvider, RolUsuario, Usuario
+from tests.conftest import TEST_PASSWORD, make_access_token
+
+
+@pytest.fixture()
+def async_database_url(monkeypatch):
+    """Points the async engine at `url` and disposes it afterwards."""
+
+    def _set(url: str) -> None:
+        monkeypatch.setattr(database.settings, "DATABASE_URL", url)
+
+    asyncio.run(dispose_async_engine())
+    yield _set
+    asyncio.run(dispose_async_engine())
+
+
+class TestAsyncUrl:
+    def test_postgres_usa_asyncpg_y_ssl(self) -> None:
+        url = _async_url("postgresql://u:p@127.0.0.1:6432/pricing_app?sslmode=require")
+
+        assert url.drivername == "postgresql+asyncpg"
+        assert url.query == {"ssl": "require"}
+        assert url.port == 6432 and url.database == "pricing_app"
+
+    def test_sqlite_usa_aiosqlite(self) -> None:
+        assert _async_url("sqlite:///./test.db").drivername == "sqlite+aiosqlite"
+
+
+class TestAsyncEngine:
+    def test_postgres_con_pool_acotado(self, async_database_url, monkeypatch) -> None:
+        monkeypatch.setattr(database, "_is_script_context", lambda: False)
+        async_database_url("postgresql://u:p@127.0.0.1:6432/pricing_app")
+
+        engine = get_async_engine()
+
+        assert engine is get_async_engine()
+        assert engine.dialect.driver == "asyncpg"
+        assert engine.pool.size() == 10
+        assert engine.pool._max_overflow == 10
+
+    def test_round_trip_sqlite(self, async_database_url, tmp_path) -> None:
+        async_database_url(f"sqlite:///{tmp_path / 'async.db'}")
+
+        def _contar(sync_db: Session, minimo: int) -> int:
+            return sync_db.execute(text("SELECT count(*) FROM t WHERE n >= :m"), {"m": minimo}).scalar_one()
+
+        async def escenario():
+            sesiones = get_async_session()
+            db = await anext(sesiones)
+            await db.execute(text("CREATE TABLE t (n INTEGER)"))
+            await db.execute(text("INSERT INTO t (n) VALUES (1), (2), (3)"))
+            await db.commit()
+            await sesiones.aclose()
+
+            async for db in get_async_session():
+                total = (await db.execute(text("SELECT sum(n) FROM t"))).scalar_one()
+                contados = await db.run_sync(_contar, 2)
+            return total, contados
+
+        assert asyncio.run(escenario()) == (6, 2)
+
+
+def _usuario(db, username: str, rol: RolUsuario = RolUsuario.VENTAS) -> Usuario:
+    usuario = Usuario(
+        username=username,
+        email=f"{username}@example.com",
+        nombre=username,
+        password_hash=get_password_hash(TEST_PASSWORD),
+        rol=rol,
+        auth_provider=AuthProvider.LOCAL,
+        activo=True,
+    )
+    db.add(usuario)
+    db.commit()
+    return usuario
+
+
+def _headers(usuario: Usuario) -> dict:
+    return {"Authorization": f"Bearer {make_access_token(usuario)}"}
+
+
+class TestNotificacionesAsync:
+    """Real aiosqlite AsyncSession (async_client), not the conftest bridge."""
+
+    def test_sin_bridge(self, async_client) -> None:
+        from app.main import app
+
+        assert get_async_session not in app.dependency_overrides
+        assert get_async_engine().dialect.driver == "aiosqlite"
+
+    def _notificacion(self, db, user, **kwargs) -> int:
+        notificacion = Notificacion(user_id=user.id, tipo="markup_bajo", mensaje="Markup bajo", **kwargs)
+        db.add(notificacion)
+        db.commit()
+        return notificacion.id
+
+    def test_marcar_leida_y_descartar(self, async_client, file_db) -> None:
+        usuario = _usuario(file_db, "notif_user")
+        notificacion_id = self._notificacion(file_db, usuario, item_id=70, markup_real=3.5)
+
+        leida = async_client.patch(f"/api/notificaciones/{notificacion_id}/marcar-leida", headers=_headers(usuario))
+        descartada = async_client.patch(
+            f"/api/notificaciones/{notificacion_id}/descartar",
+            params={"notas": "ok", "crear_regla_ignorar": True},
+            headers=_headers(usuario),
+        )
+
+        assert leida.status_code == 200, leida.text
+        assert descartada.status_code == 200, descartada.text
+        file_db.expire_all()
+        notificacion = file_db.get(Notificacion, notificacion_id)
+        assert notificacion.leida is True and notificacion.fecha_lectura is not None
+        assert notificacion.estado == EstadoNotificacion.DESCARTADA
+        assert notificacion.notas_revision == "ok"
+        # La regla se crea en run_sync sobre la misma conexión async
+        assert file_db.query(NotificacionIgnorada).filter_by(user_id=usuario.id).count() == 1
+
+    def test_bulk_y_limpiar_solo_del_usuario(self, async_client, file_db) -> None:
+        usuario = _usuario(file_db, "notif_user")
+        otro = _usuario(file_db, "notif_otro")
+        propias = [self._notificacion(file_db, usuario) for _ in range(2)]
+        ajena = self._notificacion(file_db, otro)
+
+        marcadas = async_client.post("/api/notificaciones/marcar-todas-leidas", headers=_headers(usuario))
+        limpiadas = async_client.delete("/api/notificaciones/limpiar", headers=_headers(usuario))
+        inexistente = async_client.patch(f"/api/notificaciones/{ajena}/marcar-leida", headers=_headers(usuario))
+
+        assert marcadas.json()["mensaje"].startswith("2 ")
+        assert limpiadas.json()["mensaje"].startswith("2 ")
+        assert inexistente.status_code == 404
+        file_db.expire_all()
+        assert file_db.query(Notificacion).filter(Notificacion.id.in_(propias)).count() == 0
+        assert file_db.get(Notificacion, ajena).leida is False
+
+
+class TestUploadColectaAsync:
+    """upload_etiquetas_colecta on the real AsyncSession: awaited reads + run_sync inserts."""
+
+    def test_upload_txt_registra_y_deduplica(self, async_client, file_db) -> None:
+        usuario = _usuario(file_db, "colecta_admin", RolUsuario.SUPERADMIN)
+        zpl = (
+            '^XA^FO50,50^BQN,2,4^FDQA,{"id":"4001","sender_id":123,"hash_code":"h1"}^FS^XZ\n'
+            '^XA^FO50,50^BQN,2,4^FDQA,{"id":"4002","sender_id":123,"hash_code":"h2"}^FS^XZ\n'
+        )
+
+        def _subir():
+            return async_client.post(
+                "/api/etiquetas-colecta/upload",
+                files=[("files", ("colecta.txt", zpl.encode(), "text/plain"))],
+                data={"fecha": "2026-10-17", "numero": "1"},
+                headers=_headers(usuario),
+            )
+
+        primera = _subir()
+        segunda = _subir()
+
+        assert primera.status_code == 200, primera.text
+        assert (primera.json()["nuevas"], primera.json()["duplicadas"]) == (2, 0)
+        assert (segunda.json()["nuevas"], segunda.json()["duplicadas"]) == (0, 2)
+        file_db.expire_all()
+        etiquetas = file_db.query(EtiquetaColecta).all()
+        assert sorted(e.shipping_id for e in etiquetas) == ["4001", "4002"]
+        assert len({e.colecta_id for e in etiquetas}) == 1
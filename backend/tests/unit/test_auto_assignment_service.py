@@ -0,0 +1,105 @@
+"""
+Unit tests for Turbo auto-assignment over the zone index
+(app.services.auto_assignment_service).
+
+Tests cover:
+  - same zone as the point-by-point `punto_en_poligono` loop, for random
+    points inside, outside and near the (buffered) borders
+  - overlapping zones: the first one in the received order wins
+  - zones without polygon or with invalid GeoJSON are skipped
+  - the index is reused while the polygons do not change
+  - zone without motoquero → sin_zona
+"""
+
+from __future__ import annotations
+
+import random
+
+from app.services import auto_assignment_service as svc
+from app.services.auto_assignment_service import (
+    IndiceZonas,
+    asignar_envio_a_zona,
+    asignar_envios_automaticamente,
+    obtener_indice_zonas,
+    punto_en_poligono,
+)
+
+
+def _cuadrado(lng0: float, lat0: float, lado: float) -> dict:
+    return {
+        "type": "Polygon",
+        "coordinates": [
+            [[lng0, lat0], [lng0 + lado, lat0], [lng0 + lado, lat0 + lado], [lng0, lat0 + lado], [lng0, lat0]]
+        ],
+    }
+
+
+def _zona(id_: int, poligono: dict, motoquero_id: int | None = 1) -> dict:
+    return {"id": id_, "nombre": f"Zona {id_}", "poligono": poligono, "motoquero_id": motoquero_id}
+
+
+ZONAS = [
+    _zona(1, _cuadrado(-58.50, -34.70, 0.10)),
+    _zona(2, _cuadrado(-58.40, -34.70, 0.10)),  # comparte borde con la 1
+    _zona(3, _cuadrado(-58.45, -34.65, 0.10)),  # se superpone con 1 y 2
+    _zona(4, {"type": "Polygon", "coordinates": [[[-58.6, -34.5], [-58.5, -34.5], [-58.55, -34.4], [-58.6, -34.5]]]}),
+]
+
+
+class TestIndice:
+    def test_paridad_con_punto_en_poligono(self) -> None:
+        rnd = random.Random(3)
+        puntos = [(rnd.uniform(-34.75, -34.35), rnd.uniform(-58.65, -58.25)) for _ in range(2000)]
+        # Puntos sobre y cerca de los bordes (dentro / fuera del buffer de 0.001°)
+        puntos += [(-34.70 - d, -58.45) for d in (0, 0.0005, 0.00099, 0.0011, 0.002)]
+        puntos += [(-34.65, -58.30 + d) for d in (0, 0.0009, 0.0012)]
+
+        esperado = [
+            next((z["id"] for z in ZONAS if punto_en_poligono(lat, lng, z["poligono"])), None) for lat, lng in puntos
+        ]
+        posiciones = IndiceZonas(ZONAS).clasificar([p[0] for p in puntos], [p[1] for p in puntos])
+
+        assert [ZONAS[p]["id"] if p >= 0 else None for p in posiciones] == esperado
+        assert {1, 2, 3, 4, None} <= set(esperado)
+
+    def test_primera_zona_gana(self) -> None:
+        # (-34.62, -58.42) está en la 1 y en la 3
+        assert asignar_envio_a_zona(-34.62, -58.42, ZONAS) == 1
+        assert asignar_envio_a_zona(-34.62, -58.42, [ZONAS[2], ZONAS[0]]) == 3
+
+    def test_zonas_invalidas_se_ignoran(self) -> None:
+        zonas = [{"id": 9, "nombre": "sin"}, _zona(8, {"type": "Nada"}), ZONAS[0]]
+        assert asignar_envio_a_zona(-34.65, -58.45, zonas) == 1
+        assert asignar_envio_a_zona(0, 0, zonas) is None
+        assert list(IndiceZonas([]).clasificar([1.0], [1.0])) == [-1]
+
+    def test_cache_por_poligonos(self, monkeypatch) -> None:
+        monkeypatch.setattr(svc, "_cache_indice", None)
+        indice = obtener_indice_zonas(ZONAS)
+        otras = [dict(z, motoquero_id=99) for z in ZONAS]
+
+        assert obtener_indice_zonas(otras) is indice  # sólo cambió el motoquero
+        assert obtener_indice_zonas(ZONAS[:2]) is not indice
+
+
+class TestAsignacion:
+    def test_resumen(self) -> None:
+        zonas = [ZONAS[0], _zona(2, ZONAS[1]["poligono"], motoquero_id=None)]
+        envios = [("a", -34.65, -58.45), ("b", -34.65, -58.35), ("c", 0.0, 0.0)]
+
+        resultado = asignar_envios_automaticamente(envios, zonas)
+
+        assert resultado["asignaciones"] == [
+            {
+                "mlshippingid": "a",
+                "zona_id": 1,
+                "zona_nombre": "Zona 1",
+                "motoquero_id": 1,
+                "motoquero_nombre": "Sin nombre",
+            }
+        ]
+        assert resultado["sin_zona"] == ["b", "c"]
+        assert (resultado["total_asignados"], resultado["total_sin_zona"]) == (1, 2)
+
+    def test_sin_envios(self) -> None:
+        assert asignar_envios_automaticamente([], ZONAS)["total_asignados"] == 0
@@ -0,0 +1,156 @@
+"""
+Unit tests for the declarative ERP sync engine (app.services.erp_sync_engine).
+
+Runs against the SQLite test DB (generic merge path); the PostgreSQL
+COPY + INSERT ... SELECT path is covered at the SQL/CSV level.
+
+Tests cover:
+  - mapping by column type, case-insensitive field names and `renombres`
+  - incremental: watermark bootstrapped from max(col), persisted per batch,
+    passed to the gbp-parser as the script parameter
+  - full and incremental share the path; upsert updates, dedup by key,
+    rows without key are discarded, ERP "Column1" answer is a no-op
+  - failure mid-stream keeps the committed batches and records the error
+  - COPY CSV keeps NULL vs "" apart; merge SQL only updates changed rows
+"""
+
+from __future__ import annotations
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.models.erp_sync_state import ERPSyncState
+from app.models.item_transaction import ItemTransaction
+from app.models.tb_supplier import TBSupplier
+from app.services import erp_sync_engine
+from app.services.erp_sync_engine import (
+    MODO_FULL,
+    TableSpec,
+    lote_a_csv,
+    mapear_fila,
+    sincronizar,
+    sql_merge,
+)
+from app.services.erp_sync_specs import SPECS
+
+
+def _it(it_transaction: int, **extra) -> dict:
+    return {"comp_id": "1", "it_transaction": str(it_transaction), "item_id": "10", "it_qty": "2.5", **extra}
+
+
+def _run(db, spec: TableSpec, filas, modo: str = "incremental"):
+    return asyncio.run(sincronizar(db, spec, modo=modo, filas=filas))
+
+
+class TestMapeo:
+    def test_tipos_y_renombres(self) -> None:
+        fila = mapear_fila(
+            _it(
+                7,
+                it_priceWithOutOthers="100.10",
+                it_isProduction="true",
+                it_cd="2026-01-02T10:00:00Z",
+                it_packinginvoiceselectedguid="0b9f7a5e-1d52-4c3e-9f0b-3a6c2f0f4d11",
+                it_note1="",
+                it_isFromPCConfigCTRLId="3",
+            ),
+            SPECS["item_transactions"].columnas(),
+        )
+        assert fila["it_transaction"] == 7
+        assert fila["it_qty"] == Decimal("2.5")
+        assert fila["it_pricewithoothers"] == Decimal("100.10")
+        assert fila["it_isproduction"] is True
+        assert fila["it_cancelled"] is False  # ausente → False, como los scripts
+        assert fila["it_cd"].year == 2026 and fila["it_cd"].tzinfo is not None
+        # UUID en PostgreSQL; conftest lo remapea a String(36) para SQLite
+        assert str(fila["it_packinginvoiceselectedguid"]) == "0b9f7a5e-1d52-4c3e-9f0b-3a6c2f0f4d11"
+        assert fila["it_note1"] == ""
+        assert fila["it_isfrompconfigctrlid"] == 3
+        assert "created_at" not in fila
+
+
+class TestSincronizar:
+    def test_incremental_watermark_y_lotes(self, db) -> None:
+        db.add(ItemTransaction(it_transaction=100, comp_id=1))
+        db.commit()
+        spec = TableSpec(modelo=ItemTransaction, script="scriptItemTransaction", watermark="it_transaction", lote=2)
+
+        r = _run(db, spec, [_it(101), _it(102), _it(103), _it(103, it_qty="9"), {"comp_id": "1"}])
+
+        assert (r.leidas, r.escritas, r.descartadas, r.lotes) == (5, 3, 1, 2)
+        assert (r.watermark_inicial, r.watermark_final) == (100, 103)
+        assert db.get(ItemTransaction, 103).it_qty == Decimal("9")
+        estado = db.get(ERPSyncState, "tb_item_transactions")
+        assert (estado.watermark, estado.estado, estado.modo) == ("103", "ok", "incremental")
+
+    def test_watermark_como_parametro(self, db, monkeypatch) -> None:
+        db.add(ERPSyncState(tabla="tb_item_transactions", watermark="500"))
+        db.commit()
+        llamadas = []
+
+        async def _stream(script, params, timeout=None):
+            llamadas.append((script, params))
+            yield _it(501)
+
+        monkeypatch.setattr(erp_sync_engine.erp_worker_client, "stream_rows", _stream)
+        r = asyncio.run(sincronizar(db, SPECS["item_transactions"]))
+
+        assert llamadas == [("scriptItemTransaction", {"itTransaction": 500})]
+        assert r.watermark_final == 501
+
+    def test_full_upsert_mismo_camino(self, db) -> None:
+        spec = SPECS["suppliers"]
+        r1 = _run(
+            db, spec, [{"comp_id": "1", "supp_id": "5", "supp_name": "ACME", "supp_taxNumber": "30-1"}], MODO_FULL
+        )
+        r2 = _run(db, spec, [{"comp_id": "1", "supp_id": "5", "supp_name": "ACME SA", "supp_taxNumber": "30-1"}])
+
+        assert (r1.escritas, r2.escritas) == (1, 1)
+        proveedor = db.get(TBSupplier, (1, 5))
+        assert (proveedor.supp_name, proveedor.supp_tax_number) == ("ACME SA", "30-1")
+        assert db.get(ERPSyncState, "tb_supplier").watermark is None
+
+    def test_respuesta_sin_datos(self, db) -> None:
+        r = _run(db, SPECS["suppliers"], [{"Column1": "-9"}])
+        assert (r.leidas, r.escritas, r.lotes) == (0, 0, 0)
+
+    def test_error_a_mitad_conserva_lotes(self, db) -> None:
+        spec = TableSpec(modelo=ItemTransaction, script="scriptItemTransaction", watermark="it_transaction", lote=2)
+
+        async def _filas():
+            for i in (1, 2, 3):
+                yield _it(i)
+            raise RuntimeError("stream cortado")
+
+        with pytest.raises(RuntimeError):
+            _run(db, spec, _filas(), MODO_FULL)
+
+        assert db.get(ItemTransaction, 2) is not None
+        estado = db.get(ERPSyncState, "tb_item_transactions")
+        assert (estado.watermark, estado.estado, estado.error) == ("2", "error", "stream cortado")
+
+
+class TestPostgres:
+    def test_csv_copy(self) -> None:
+        buffer = lote_a_csv(
+            [{"a": 1, "b": None, "c": "", "d": True, "e": Decimal("1.50"), "f": 'di "x"'}],
+            ["a", "b", "c", "d", "e", "f"],
+        )
+        assert buffer.getvalue() == '1,,"",t,1.50,"di ""x"""\n'
+
+    def test_sql_merge(self) -> None:
+        sql = sql_merge(SPECS["suppliers"], ["comp_id", "supp_id", "supp_name", "supp_tax_number"], "_stg")
+        assert sql.startswith('INSERT INTO "tb_supplier" ("comp_id", "supp_id", "supp_name", "supp_tax_number") SELECT')
+        assert 'ON CONFLICT ("comp_id", "supp_id") DO UPDATE SET "supp_name" = EXCLUDED."supp_name"' in sql
+        assert sql.endswith(
+            'WHERE ("tb_supplier"."supp_name", "tb_supplier"."supp_tax_number") '
+            'IS DISTINCT FROM (EXCLUDED."supp_name", EXCLUDED."supp_tax_number")'
+        )
+
+        it_sql = sql_merge(SPECS["item_transactions"], ["it_transaction", "item_id"], "_stg")
+        assert '"updated_at" = now()' in it_sql
+
+        append_only = TableSpec(modelo=TBSupplier, script="x", politica="insert")
+        assert sql_merge(append_only, ["comp_id", "supp_id", "supp_name"], "_stg").endswith("DO NOTHING")
@@ -0,0 +1,190 @@
+"""
+Unit tests for background export jobs (app.services.export_jobs_service,
+app.events.export_cache_hooks, /api/exports).
+
+Tests cover:
+  - POST enqueues a job that writes the XLSX to disk and reports progress on SSE
+  - an identical POST is served from the cached job until the data changes
+  - committing a watched model (ProductoPricing) bumps the data version
+  - parameter validation against the export endpoint signature
+  - without Redis there is no data version and nothing is reused
+  - jobs of other users are not visible
+"""
+
+from __future__ import annotations
+
+import io
+import os
+from decimal import Decimal
+
+import fakeredis
+import pytest
+import redis
+from openpyxl import load_workbook
+from sqlalchemy.orm import sessionmaker
+
+from app.api.endpoints.productos_export import exportar_lista_web_transferencia
+from app.core.config import settings
+from app.models.export_job import ExportJob
+from app.models.producto import ProductoERP, ProductoPricing
+from app.services import export_jobs_service
+
+
+@pytest.fixture()
+def fake_redis():
+    fake = fakeredis.FakeStrictRedis()
+    export_jobs_service._set_client_for_tests(fake)
+    yield fake
+    export_jobs_service._set_client_for_tests(None)
+
+
+@pytest.fixture()
+def eventos(monkeypatch) -> list:
+    publicados: list = []
+    monkeypatch.setattr(export_jobs_service, "sse_publish_bg", lambda canal, data: publicados.append((canal, data)))
+    return publicados
+
+
+@pytest.fixture()
+def jobs_inline(db, monkeypatch, tmp_path, fake_redis, eventos):
+    """Corre los jobs en el mismo thread, con una sesión sobre la transacción del test."""
+    monkeypatch.setattr(settings, "EXPORTS_CACHE_DIR", str(tmp_path))
+    factory = sessionmaker(bind=db.connection(), join_transaction_mode="create_savepoint")
+    monkeypatch.setattr(
+        export_jobs_service, "_lanzar", lambda job_id: export_jobs_service.ejecutar_export(job_id, factory)
+    )
+    return tmp_path
+
+
+@pytest.fixture()
+def productos(db):
+    for item_id, marca, precio in ((1, "LOGI", "1210"), (2, "ACME", "242")):
+        db.add(
+            ProductoERP(
+                item_id=item_id,
+                codigo=f"C{item_id}",
+                descripcion=f"Producto {item_id}",
+                marca=marca,
+                categoria="Perifericos",
+                moneda_costo="ARS",
+                costo=100,
+                iva=21,
+                stock=item_id,
+            )
+        )
+        db.add(
+            ProductoPricing(item_id=item_id, participa_web_transferencia=True, precio_web_transferencia=Decimal(precio))
+        )
+    db.commit()
+
+
+def _post(client, headers, parametros=None, tipo="lista-web-transferencia"):
+    return client.post(f"/api/exports/{tipo}", json={"parametros": parametros or {}}, headers=headers)
+
+
+class TestExportJobs:
+    def test_genera_archivo_y_publica_progreso(self, client, db, admin_auth_headers, jobs_inline, productos, eventos):
+        resp = _post(client, admin_auth_headers, {"marcas": "ACME"})
+
+        assert resp.status_code == 202
+        body = resp.json()
+        assert body["cache"] is False
+        job = db.get(ExportJob, body["id"])
+        db.refresh(job)
+        assert job.estado == "listo", job.error
+        assert job.filas == 1
+        assert os.path.dirname(job.archivo) == str(jobs_inline)
+
+        estado = client.get(f"/api/exports/{job.id}", headers=admin_auth_headers).json()
+        assert estado["estado"] == "listo"
+        assert estado["descarga_url"] == f"/api/exports/{job.id}/archivo"
+
+        archivo = client.get(estado["descarga_url"], headers=admin_auth_headers)
+        assert archivo.status_code == 200
+        assert 'filename="lista_web_transferencia.xlsx"' in archivo.headers["content-disposition"]
+        ws = load_workbook(io.BytesIO(archivo.content))["Lista Web Transferencia"]
+        assert [c.value for c in ws[2]][:5] == ["ACME", "Perifericos", "", "C2", "Producto 2"]
+
+        assert [data["estado"] for canal, data in eventos if canal == f"exports:progress:{job.usuario_id}"] == [
+            "corriendo",
+            "listo",
+        ]
+        assert not any(canal == "exports:progress" or "usuario_id" in data for canal, data in eventos)
+
+    def test_cache_hasta_que_cambian_los_datos(self, client, db, admin_auth_headers, jobs_inline, productos):
+        primero = _post(client, admin_auth_headers).json()
+
+        repetido = _post(client, admin_auth_headers)
+        assert repetido.status_code == 200
+        assert repetido.json()["id"] == primero["id"]
+        assert repetido.json()["cache"] is True
+
+        otros_filtros = _post(client, admin_auth_headers, {"con_stock": True})
+        assert otros_filtros.status_code == 202
+
+        pricing = db.get(ProductoPricing, 1)
+        pricing.precio_web_transferencia = Decimal("1331")
+        db.commit()
+
+        tras_cambio = _post(client, admin_auth_headers)
+        assert tras_cambio.status_code == 202
+        assert tras_cambio.json()["id"] != primero["id"]
+        assert db.query(ExportJob).count() == 3
+
+    def test_archivo_borrado_no_se_reutiliza(self, client, db, admin_auth_headers, jobs_inline, productos):
+        primero = _post(client, admin_auth_headers).json()
+        os.remove(db.get(ExportJob, primero["id"]).archivo)
+
+        resp = _post(client, admin_auth_headers)
+
+        assert resp.status_code == 202
+        assert resp.json()["id"] != primero["id"]
+
+    def test_sin_redis_no_cachea(self, client, db, admin_auth_headers, jobs_inline, fake_redis, productos, monkeypatch):
+        def caido(*args, **kwargs):
+            raise redis.ConnectionError("down")
+
+        monkeypatch.setattr(fake_redis, "mget", caido)
+
+        primero = _post(client, admin_auth_headers).json()
+        segundo = _post(client, admin_auth_headers).json()
+
+        assert primero["id"] != segundo["id"]
+        assert db.get(ExportJob, primero["id"]).version_datos is None
+
+    def test_tipo_y_parametros_invalidos(self, client, admin_auth_headers, jobs_inline):
+        assert _post(client, admin_auth_headers, tipo="no-existe").status_code == 404
+        assert _post(client, admin_auth_headers, {"nada": 1}).status_code == 422
+        assert _post(client, admin_auth_headers, {"currency_id": "dos"}).status_code == 422
+
+    def test_job_de_otro_usuario(self, client, admin_auth_headers, auth_headers, jobs_inline, productos):
+        job_id = _post(client, admin_auth_headers).json()["id"]
+
+        assert client.get(f"/api/exports/{job_id}", headers=auth_headers).status_code == 404
+        assert client.get(f"/api/exports/{job_id}/archivo", headers=auth_headers).status_code == 404
+
+
+class TestArgumentosEndpoint:
+    def test_defaults_y_coercion(self) -> None:
+        kwargs = export_jobs_service.argumentos_endpoint(
+            exportar_lista_web_transferencia, {"currency_id": "2", "con_stock": "true"}
+        )
+
+        assert kwargs == {
+            "search": None,
+            "con_stock": True,
+            "marcas": None,
+            "subcategorias": None,
+            "colores": None,
+            "currency_id": 2,
+            "offset_dolar": 0,
+        }
+
+    def test_query_y_body(self) -> None:
+        from app.api.endpoints.productos_export import exportar_rebate, exportar_web_transferencia
+
+        kwargs = export_jobs_service.argumentos_endpoint(exportar_web_transferencia, {"porcentaje_adicional": "5"})
+        assert kwargs["porcentaje_adicional"] == 5.0
+
+        rebate = export_jobs_service.argumentos_endpoint(exportar_rebate, {})
+        assert set(rebate) == {"request"}
@@ -0,0 +1,151 @@
+"""
+Unit tests for the batch geocoder (app.services.geocoding_service).
+
+Tests cover:
+  - cache hits resolved with one query, no HTTP for them
+  - misses deduplicated by direccion_hash, resolved concurrently (bounded)
+    and written back in one upsert with their provider
+  - Mapbox without a confident match falls back to Nominatim
+  - per-run stats (hits, misses, providers, latency)
+  - TokenBucket reserves consecutive slots at `rate`
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from app.models.geocoding_cache import GeocodingCache
+from app.services import geocoding_service as svc
+from app.services.geocoding_service import (
+    PROVIDER_MAPBOX,
+    PROVIDER_NOMINATIM,
+    SolicitudGeocoding,
+    TokenBucket,
+    geocodificar_lote,
+    guardar_en_cache_bulk,
+)
+
+
+@pytest.fixture()
+def sesiones(db):
+    @contextmanager
+    def _sesion():
+        yield db
+        db.flush()
+
+    return _sesion
+
+
+@pytest.fixture()
+def apis(monkeypatch):
+    """Mapbox/Nominatim falsos: cuenta requests y requests en vuelo."""
+    estado = {"mapbox": [], "nominatim": [], "en_vuelo": 0, "max_en_vuelo": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        estado["en_vuelo"] += 1
+        estado["max_en_vuelo"] = max(estado["max_en_vuelo"], estado["en_vuelo"])
+        await asyncio.sleep(0.02)
+        estado["en_vuelo"] -= 1
+        if request.url.host == "nominatim.openstreetmap.org":
+            estado["nominatim"].append(request.url.params["street"])
+            return httpx.Response(200, json=[{"lat": "-34.6", "lon": "-58.4", "address": {"city": "Buenos Aires"}}])
+        estado["mapbox"].append(request.url.path)
+        if "Pasaje" in request.url.path:
+            return httpx.Response(200, json={"features": []})
+        feature = {"relevance": 0.9, "place_type": ["address"], "geometry": {"coordinates": [-58.5, -34.7]}}
+        return httpx.Response(200, json={"features": [feature]})
+
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(svc, "get_http_client", lambda name: cliente)
+    monkeypatch.setattr(svc.settings, "MAPBOX_ACCESS_TOKEN", "pk.test")
+    monkeypatch.setattr(
+        svc,
+        "RATE_LIMITS",
+        {PROVIDER_MAPBOX: TokenBucket(1000, 1000), PROVIDER_NOMINATIM: TokenBucket(1000, 1000)},
+    )
+    return estado
+
+
+def _query(direccion: str) -> str:
+    return f"{direccion}, Buenos Aires, Argentina"
+
+
+class TestLote:
+    def test_hits_misses_y_upsert(self, db, sesiones, apis, query_counter) -> None:
+        db.add(
+            GeocodingCache(
+                direccion_hash=GeocodingCache.hash_direccion(_query("Cacheada 1")),
+                direccion_normalizada=_query("Cacheada 1"),
+                latitud=Decimal("-34.1"),
+                longitud=Decimal("-58.1"),
+            )
+        )
+        db.flush()
+        solicitudes = [
+            SolicitudGeocoding("a", "Cacheada 1"),
+            SolicitudGeocoding("b", "Nueva 2"),
+            SolicitudGeocoding("c", "NUEVA 2"),  # mismo hash que b
+            SolicitudGeocoding("d", "Pasaje Roux 659", ciudad="CABA"),
+        ]
+
+        with query_counter() as counter:
+            r = asyncio.run(geocodificar_lote(solicitudes, session_factory=sesiones))
+
+        assert r.coordenadas == {
+            "a": (-34.1, -58.1),
+            "b": (-34.7, -58.5),
+            "c": (-34.7, -58.5),
+            "d": (-34.6, -58.4),
+        }
+        assert len(apis["mapbox"]) == 2 and apis["nominatim"] == ["Pasaje Roux 659"]
+        assert counter.matching("geocoding_cache") == 1
+        assert sum(s.startswith("insert into geocoding_cache") for s in counter.statements) == 1
+
+        nueva = db.get(GeocodingCache, GeocodingCache.hash_direccion(_query("Nueva 2")))
+        assert (float(nueva.latitud), nueva.provider) == (-34.7, PROVIDER_MAPBOX)
+        assert db.get(GeocodingCache, GeocodingCache.hash_direccion(_query("Pasaje Roux 659"))).provider == "nominatim"
+
+        stats = r.stats.as_dict()
+        assert (stats["total"], stats["direcciones_unicas"], stats["cache_hits"], stats["cache_misses"]) == (4, 3, 1, 2)
+        assert stats["por_provider"] == {PROVIDER_MAPBOX: 1, PROVIDER_NOMINATIM: 1}
+        assert (stats["resueltos"], stats["fallidos"]) == (4, 0)
+        assert stats["latencia_ms_p50"] >= 20
+
+    def test_concurrencia_acotada(self, sesiones, apis) -> None:
+        solicitudes = [SolicitudGeocoding(str(i), f"Calle {i}") for i in range(12)]
+        r = asyncio.run(geocodificar_lote(solicitudes, session_factory=sesiones, concurrencia=4))
+
+        assert r.stats.resueltos == 12
+        assert apis["max_en_vuelo"] == 4
+
+    def test_sin_token(self, sesiones, apis, monkeypatch) -> None:
+        monkeypatch.setattr(svc.settings, "MAPBOX_ACCESS_TOKEN", None)
+        r = asyncio.run(geocodificar_lote([SolicitudGeocoding("a", "Calle 1")], session_factory=sesiones))
+        assert r.coordenadas == {"a": None} and apis["mapbox"] == []
+
+    def test_upsert_actualiza(self, db) -> None:
+        fila = {
+            "direccion_hash": "h" * 32,
+            "direccion_normalizada": "x",
+            "latitud": -34.0,
+            "longitud": -58.0,
+            "provider": "mapbox",
+        }
+        guardar_en_cache_bulk([fila], db)
+        guardar_en_cache_bulk([dict(fila, latitud=-35.0, provider="nominatim")], db)
+        db.expire_all()
+        entrada = db.get(GeocodingCache, "h" * 32)
+        assert (float(entrada.latitud), entrada.provider) == (-35.0, "nominatim")
+
+
+class TestTokenBucket:
+    def test_reserva_turnos(self) -> None:
+        bucket = TokenBucket(rate=2.0, capacidad=2)
+        esperas = [bucket.reservar() for _ in range(5)]
+        assert esperas[:2] == [0.0, 0.0]
+        assert esperas[2:] == pytest.approx([0.5, 1.0, 1.5], abs=0.01)
@@ -0,0 +1,143 @@
+"""
+Unit tests for app.core.http_clients (pooled per-upstream client registry).
+
+Runs against a local threaded HTTP/1.1 server, so pooling, keep-alive and pool
+wait are real.
+
+Tests cover:
+  - same client per upstream within a loop, a fresh one on a new loop
+  - keep-alive: sequential requests reuse one TCP connection
+  - metrics: request count, latency histogram, 4xx/5xx and transport errors
+  - pool wait is recorded when requests queue behind a saturated pool
+  - close_http_clients closes the loop's clients
+  - unknown upstream → KeyError
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core import http_clients
+from app.core.http_clients import (
+    UpstreamConfig,
+    close_http_clients,
+    get_http_client,
+    http_client_metrics,
+    reset_http_client_metrics,
+)
+
+
+@pytest.fixture()
+def server():
+    estado = {"conexiones": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            estado["conexiones"] += 1
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            status = int(self.path.rsplit("/", 1)[-1])
+            time.sleep(0.05)
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    estado["url"] = f"http://127.0.0.1:{srv.server_address[1]}"
+    yield estado
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture(autouse=True)
+def _metricas_limpias():
+    reset_http_client_metrics()
+    yield
+    reset_http_client_metrics()
+
+
+def _run(coro_factory):
+    async def _main():
+        try:
+            return await coro_factory()
+        finally:
+            await close_http_clients()
+
+    return asyncio.run(_main())
+
+
+class TestRegistry:
+    def test_mismo_cliente_por_loop(self) -> None:
+        async def _clientes():
+            return get_http_client("erp"), get_http_client("erp"), get_http_client("ml")
+
+        a, b, c = _run(_clientes)
+        assert a is b
+        assert a is not c
+        assert a.is_closed  # close_http_clients al salir del loop
+
+        d, _, _ = _run(_clientes)
+        assert d is not a
+
+    def test_upstream_desconocido(self) -> None:
+        async def _get():
+            return get_http_client("nope")
+
+        with pytest.raises(KeyError):
+            _run(_get)
+
+    def test_keep_alive_y_metricas(self, server) -> None:
+        async def _requests():
+            client = get_http_client("erp")
+            for status in (200, 200, 200, 404, 503):
+                await client.get(f"{server['url']}/{status}")
+
+        _run(_requests)
+
+        assert server["conexiones"] == 1
+        m = http_client_metrics()["erp"]
+        assert (m["requests"], m["errors"], m["status_4xx"], m["status_5xx"]) == (5, 0, 1, 1)
+        assert sum(m["latency_histogram_ms"].values()) == 5
+        assert m["latency_histogram_ms"][50] + m["latency_histogram_ms"][100] == 5
+        assert m["latency_avg_ms"] >= 50
+
+    def test_error_de_transporte(self) -> None:
+        async def _request():
+            import httpx
+
+            with pytest.raises(httpx.ConnectError):
+                await get_http_client("tiendanube").get("http://127.0.0.1:1/x", timeout=1.0)
+
+        _run(_request)
+        assert http_client_metrics()["tiendanube"]["errors"] == 1
+
+    def test_pool_wait(self, server, monkeypatch) -> None:
+        monkeypatch.setitem(
+            http_clients.UPSTREAMS, "mapbox", UpstreamConfig(max_connections=1, max_keepalive_connections=1)
+        )
+
+        async def _concurrentes():
+            client = get_http_client("mapbox")
+            await asyncio.gather(*(client.get(f"{server['url']}/200") for _ in range(3)))
+
+        _run(_concurrentes)
+
+        m = http_client_metrics()["mapbox"]
+        assert m["requests"] == 3
+        # Con una sola conexión, el tercero espera a los dos primeros (~100ms)
+        assert m["pool_wait_max_ms"] >= 80
+        assert server["conexiones"] == 1
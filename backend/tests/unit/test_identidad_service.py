@@ -0,0 +1,97 @@
+"""
+Unit tests for app.services.identidad_service (cache de get_current_user).
+
+Tests cover:
+  - segundo resolve del mismo `sub`: cero queries
+  - el Usuario devuelto es persistente en la sesión del request (modificable)
+    y la copia cacheada no se comparte
+  - agregar_override / eliminar_override (DELETE masivo) invalidan y publican "auth"
+  - escrituras de auth sin commitear en la sesión → bypass del cache
+  - get_current_user vía HTTP: el segundo request no consulta usuarios ni permisos
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import fakeredis
+from sqlalchemy import inspect as sa_inspect
+
+from app.core import reference_cache
+from app.models.permiso import Permiso
+from app.services.identidad_service import NAMESPACE, resolver_usuario
+from app.services.permisos_service import PermisosService
+
+
+def _resolver(db, username):
+    return asyncio.run(resolver_usuario(db, username))
+
+
+def _permiso(db, codigo: str = "reportes.ver") -> Permiso:
+    permiso = Permiso(codigo=codigo, nombre=codigo, categoria="reportes")
+    db.add(permiso)
+    db.commit()
+    return permiso
+
+
+class TestResolverUsuario:
+    def test_hit_sin_queries(self, db, active_user, query_counter) -> None:
+        db.commit()
+        assert _resolver(db, "testuser").id == active_user.id
+
+        with query_counter() as counter:
+            usuario = _resolver(db, "testuser")
+            assert usuario.rol_obj.codigo == "VENTAS"
+            assert usuario._permisos_cache == set()
+        assert counter.statements == []
+
+    def test_usuario_adjunto_a_la_sesion(self, db, active_user) -> None:
+        db.commit()
+        _resolver(db, "testuser")
+        db.expunge_all()
+
+        usuario = _resolver(db, "test@example.com")  # email: backward compatibility
+        assert sa_inspect(usuario).persistent
+        assert usuario in db
+
+        usuario.nombre = "Renombrado"
+        db.commit()
+        cacheado = reference_cache.cache.get(NAMESPACE, "test@example.com")
+        assert cacheado is None  # el commit de Usuario invalidó el namespace
+        assert _resolver(db, "testuser").nombre == "Renombrado"
+
+    def test_override_invalida_y_publica(self, db, active_user) -> None:
+        fake = fakeredis.FakeStrictRedis()
+        reference_cache._set_client_for_tests(fake)
+        pubsub = fake.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(reference_cache.CHANNEL)
+        _permiso(db)
+
+        assert "reportes.ver" not in _resolver(db, "testuser")._permisos_cache
+        PermisosService(db).agregar_override(active_user.id, "reportes.ver", concedido=True)
+        assert "reportes.ver" in _resolver(db, "testuser")._permisos_cache
+
+        PermisosService(db).eliminar_override(active_user.id, "reportes.ver")
+        assert "reportes.ver" not in _resolver(db, "testuser")._permisos_cache
+
+        mensajes = [pubsub.get_message(timeout=0.5) for _ in range(3)]
+        assert b"auth" in [m["data"] for m in mensajes if m]
+
+    def test_cambios_sin_commit_no_usan_cache(self, db, active_user) -> None:
+        db.commit()
+        assert _resolver(db, "testuser").activo is True
+
+        active_user.activo = False
+        db.flush()
+        assert _resolver(db, "testuser").activo is False
+
+
+class TestGetCurrentUser:
+    def test_segundo_request_sin_queries_de_auth(self, db, client, auth_headers, query_counter) -> None:
+        db.commit()
+        assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+
+        with query_counter() as counter:
+            assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+        assert counter.matching("usuarios") == 0
+        assert counter.matching("permisos") == 0
@@ -0,0 +1,41 @@
+"""
+Unit tests for app.core.database.insert_on_conflict.
+
+Tests cover:
+  - PostgreSQL session → postgresql insert, compiled with the PG dialect
+  - SQLite session (tests) → sqlite insert, executed against the test DB
+"""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.core.database import insert_on_conflict
+from app.models.geocoding_cache import GeocodingCache
+
+
+def _session(dialecto: str) -> MagicMock:
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = dialecto
+    return db
+
+
+class TestInsertOnConflict:
+    def test_postgresql(self) -> None:
+        stmt = insert_on_conflict(_session("postgresql"), GeocodingCache)
+        assert isinstance(stmt, postgresql.Insert)
+        stmt = stmt.values(direccion_hash="h", latitud=1.0).on_conflict_do_update(
+            index_elements=[GeocodingCache.direccion_hash], set_={"latitud": stmt.excluded.latitud}
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (direccion_hash) DO UPDATE SET latitud = excluded.latitud" in sql
+
+    def test_sqlite(self, db) -> None:
+        stmt = insert_on_conflict(db, GeocodingCache)
+        assert isinstance(stmt, sqlite.Insert)
+        fila = {"direccion_hash": "h", "direccion_normalizada": "calle 1", "latitud": 1.0, "longitud": 2.0}
+        db.execute(stmt.values(fila).on_conflict_do_nothing(index_elements=["direccion_hash"]))
+        db.execute(stmt.values(fila).on_conflict_do_nothing(index_elements=["direccion_hash"]))
+        assert db.query(GeocodingCache).count() == 1
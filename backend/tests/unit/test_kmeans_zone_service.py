@@ -0,0 +1,134 @@
+"""
+Unit tests for K-Means zoning (app.services.kmeans_zone_service).
+
+Tests cover:
+  - well separated groups of envíos end up in one zone each
+  - vectorized hulls match a per-cluster shapely convex hull
+  - warm start from previous centroids: single init, zone numbering follows
+    the previous centroids; completes/truncates to K
+  - result cached by the set of envíos (order does not matter)
+  - MiniBatchKMeans above UMBRAL_MINIBATCH
+  - centroids of stored GeoJSON zones for warm start
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from shapely.geometry import MultiPoint
+
+from app.services import kmeans_zone_service as svc
+from app.services.kmeans_zone_service import (
+    _completar_centroides,
+    _hulls,
+    centroides_de_zonas,
+    generar_buffer_circular,
+    generar_zonas_kmeans,
+)
+
+CENTROS = [(-34.55, -58.45), (-34.70, -58.40), (-34.62, -58.60)]
+
+
+def _envios(n_por_grupo: int = 30, seed: int = 1) -> list[tuple[float, float, int]]:
+    rnd = np.random.default_rng(seed)
+    envios = []
+    for g, (lat, lng) in enumerate(CENTROS):
+        for i in range(n_por_grupo):
+            envios.append((lat + rnd.normal(0, 0.01), lng + rnd.normal(0, 0.01), g * 1000 + i))
+    return envios
+
+
+@pytest.fixture(autouse=True)
+def _estado_limpio(monkeypatch):
+    monkeypatch.setattr(svc, "_cache_zonas", OrderedDict())
+    monkeypatch.setattr(svc, "_ultimos_centroides", {})
+
+
+@pytest.fixture()
+def ajustes(monkeypatch):
+    """Registra cada construcción de KMeans / MiniBatchKMeans."""
+    llamadas = []
+
+    def _espia(clase):
+        class _Espia(clase):
+            def __init__(self, **kwargs):
+                llamadas.append((clase.__name__, kwargs))
+                super().__init__(**kwargs)
+
+        return _Espia
+
+    monkeypatch.setattr(svc, "KMeans", _espia(svc.KMeans))
+    monkeypatch.setattr(svc, "MiniBatchKMeans", _espia(svc.MiniBatchKMeans))
+    return llamadas
+
+
+def _grupos(zonas) -> list[set[int]]:
+    return [{i // 1000 for i in z["envios_ids"]} for z in zonas]
+
+
+class TestZonas:
+    def test_grupos_separados(self, ajustes) -> None:
+        zonas = generar_zonas_kmeans(_envios(), 3)
+
+        assert sorted(len(z["envios_ids"]) for z in zonas) == [30, 30, 30]
+        assert all(len(g) == 1 for g in _grupos(zonas))
+        assert [z["color"] for z in zonas] == svc.COLORES_ZONAS[:3]
+        assert ajustes[0][0] == "KMeans" and ajustes[0][1]["n_init"] == svc.N_INIT_FRIO
+
+    def test_hulls_vectorizados(self) -> None:
+        rnd = np.random.default_rng(4)
+        coords = rnd.random((60, 2))
+        labels = np.repeat([0, 1, 3, 4], [25, 30, 2, 3])  # el 2 vacío, el 3 con 2 puntos
+        hulls = _hulls(coords, labels, 5)
+
+        for k in (0, 1, 4):
+            hull = MultiPoint([(lng, lat) for lat, lng in coords[labels == k]]).convex_hull
+            assert hulls[k] == {"type": "Polygon", "coordinates": [list(hull.exterior.coords)]}, k
+        assert hulls[2] is None
+        assert hulls[3] == generar_buffer_circular(coords[labels == 3])
+
+    def test_warm_start_numera_como_antes(self, ajustes) -> None:
+        previos = [CENTROS[2], CENTROS[0], CENTROS[1]]
+        zonas = generar_zonas_kmeans(_envios(), 3, centroides_previos=previos)
+
+        assert _grupos(zonas) == [{2}, {0}, {1}]
+        assert ajustes[0][1]["n_init"] == 1
+
+        # Siguiente corrida con unos envíos nuevos: warm start desde el último ajuste
+        nuevos = _envios() + [(-34.551, -58.451, 9999)]
+        zonas = generar_zonas_kmeans(nuevos, 3)
+        assert _grupos(zonas)[1] == {0, 9}
+        assert [c[1]["n_init"] for c in ajustes] == [1, 1]
+
+    def test_completar_centroides(self) -> None:
+        coords = np.array([[0.0, 0.0], [0.0, 1.0], [5.0, 5.0]])
+        assert _completar_centroides(np.array([[0.0, 0.5]]), coords, 2).tolist() == [[0.0, 0.5], [5.0, 5.0]]
+        assert _completar_centroides(np.array([[1, 1], [2, 2], [3, 3]]), coords, 2).tolist() == [[1, 1], [2, 2]]
+
+    def test_cache_por_conjunto(self, ajustes) -> None:
+        envios = _envios()
+        primera = generar_zonas_kmeans(envios, 3)
+        segunda = generar_zonas_kmeans(list(reversed(envios)), 3)
+
+        assert len(ajustes) == 1
+        assert segunda == primera and segunda is not primera
+
+        generar_zonas_kmeans(envios[:-1], 3)
+        assert len(ajustes) == 2
+
+    def test_minibatch(self, ajustes, monkeypatch) -> None:
+        monkeypatch.setattr(svc, "UMBRAL_MINIBATCH", 50)
+        zonas = generar_zonas_kmeans(_envios(), 3)
+        assert ajustes[0][0] == "MiniBatchKMeans"
+        assert all(len(g) == 1 for g in _grupos(zonas))
+
+    def test_menos_envios_que_zonas(self) -> None:
+        zonas = generar_zonas_kmeans([(-34.6, -58.4, 1), (-34.7, -58.5, 2)], 4)
+        assert sorted(i for z in zonas for i in z["envios_ids"]) == [1, 2]
+
+
+def test_centroides_de_zonas() -> None:
+    cuadrado = {"type": "Polygon", "coordinates": [[[-58.5, -34.7], [-58.4, -34.7], [-58.4, -34.6], [-58.5, -34.6]]]}
+    assert centroides_de_zonas([cuadrado, {"type": "Nada"}]) == [pytest.approx((-34.65, -58.45))]
@@ -1,7 +1,7 @@
 """
 Judgment Day fix: `poll_interval_seconds` is seeded/documented as the
-panel-editable interval for the ml-bot ingest/draft background loops in
-app/main.py, but was never actually read — both loops hardcoded
+panel-editable interval for the ml-bot ingest/draft background loops
+(now app/worker.py tasks), but was never actually read — both loops hardcoded
 `asyncio.sleep(30)`. Covers `_resolve_ml_bot_poll_interval_seconds()`, the
 helper both loops now call each tick.
 """
@@ -11,8 +11,8 @@ from __future__ import annotations
 import asyncio
 from unittest.mock import patch
 
-from app.main import _resolve_ml_bot_poll_interval_seconds
 from app.models.ml_bot_config import MlBotConfig
+from app.worker import _resolve_ml_bot_poll_interval_seconds
 
 
 class _ctx:
@@ -0,0 +1,162 @@
+"""
+Unit tests for MLWebhookClient.get_items_batch against a local stub server.
+
+The stub is a real threaded HTTP/1.1 server on 127.0.0.1 that answers
+/api/ml/preview with a fixed per-request delay, so the tests exercise the
+actual connection pool, concurrency and timeouts (no transport mocking).
+
+Tests cover:
+  - 500 MLAs with 50ms of server latency each finish in a few seconds
+    (serial would be 25s+), in-flight requests never exceed `concurrency`
+  - keep-alive: far fewer TCP connections than requests
+  - 5xx / 429 are retried with backoff; 404 is not retried
+  - a hung item hits its own timeout and is dropped without failing the batch
+  - batch metrics (p50/p95, items/s, retries) are recorded
+  - get_item_full goes through the shared pooled client (one keep-alive connection)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.core.http_clients import close_http_clients
+from app.services.ml_webhook_client import MLWebhookClient
+
+
+class _Stub:
+    def __init__(self, delay: float = 0.05) -> None:
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self.requests: dict[str, int] = {}
+        self.conexiones = 0
+        self.comportamiento: dict[str, list] = {}  # mla -> lista de status/"hang" por intento
+
+
+@pytest.fixture()
+def stub():
+    estado = _Stub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            with estado.lock:
+                estado.conexiones += 1
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            resource = parse_qs(urlparse(self.path).query)["resource"][0]
+            mla = resource.rsplit("/", 1)[-1]
+            with estado.lock:
+                intento = estado.requests.get(mla, 0)
+                estado.requests[mla] = intento + 1
+                estado.en_vuelo += 1
+                estado.max_en_vuelo = max(estado.max_en_vuelo, estado.en_vuelo)
+            try:
+                plan = estado.comportamiento.get(mla, [])
+                accion = plan[intento] if intento < len(plan) else 200
+                time.sleep(1.0 if accion == "hang" else estado.delay)
+                status = 200 if accion == "hang" else accion
+                body = json.dumps({"id": mla, "price": 1000} if status == 200 else {"error": status}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with estado.lock:
+                    estado.en_vuelo -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    estado.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield estado
+    server.shutdown()
+    server.server_close()
+
+
+def _batch(client: MLWebhookClient, mla_ids: list[str]) -> dict:
+    async def _run() -> dict:
+        try:
+            return await client.get_items_batch(mla_ids)
+        finally:
+            await close_http_clients()
+
+    return asyncio.run(_run())
+
+
+class TestGetItemsBatch:
+    def test_500_mlas_concurrente(self, stub) -> None:
+        client = MLWebhookClient(base_url=stub.base_url, concurrency=32)
+        mla_ids = [f"MLA{i}" for i in range(500)]
+
+        inicio = time.perf_counter()
+        resultado = _batch(client, mla_ids)
+        duracion = time.perf_counter() - inicio
+
+        assert set(resultado) == set(mla_ids)
+        assert resultado["MLA7"] == {"id": "MLA7", "price": 1000}
+        assert duracion < 6.0  # serial: 500 × 50ms = 25s
+        assert 1 < stub.max_en_vuelo <= 32
+        assert stub.conexiones <= 40  # keep-alive: conexiones reutilizadas
+
+        metricas = client.ultimo_batch
+        assert (metricas.total, metricas.encontrados, metricas.errores) == (500, 500, 0)
+        assert metricas.items_por_segundo > 80
+        assert metricas.latencia_p50_ms >= 50
+        assert metricas.latencia_p95_ms >= metricas.latencia_p50_ms
+
+    def test_reintentos_y_404(self, stub) -> None:
+        stub.comportamiento = {"MLA1": [503, 429], "MLA2": [404], "MLA3": [500, 500, 500]}
+        client = MLWebhookClient(base_url=stub.base_url, retries=2, backoff_base=0.01)
+
+        resultado = _batch(client, ["MLA1", "MLA2", "MLA3", "MLA4"])
+
+        assert set(resultado) == {"MLA1", "MLA4"}
+        assert stub.requests == {"MLA1": 3, "MLA2": 1, "MLA3": 3, "MLA4": 1}
+        assert client.ultimo_batch.reintentos == 4
+        assert client.ultimo_batch.errores == 2
+
+    def test_timeout_por_item(self, stub) -> None:
+        stub.comportamiento = {"MLA_LENTO": ["hang"]}
+        client = MLWebhookClient(base_url=stub.base_url, item_timeout=0.3, retries=0)
+
+        inicio = time.perf_counter()
+        resultado = _batch(client, ["MLA_LENTO", "MLA1", "MLA2"])
+
+        assert set(resultado) == {"MLA1", "MLA2"}
+        assert time.perf_counter() - inicio < 0.9
+
+    def test_vacio_no_hace_requests(self, stub) -> None:
+        assert _batch(MLWebhookClient(base_url=stub.base_url), []) == {}
+        assert stub.requests == {}
+
+
+class TestGetItemFull:
+    def test_reusa_el_cliente_compartido(self, stub) -> None:
+        client = MLWebhookClient(base_url=stub.base_url)
+
+        async def _run() -> list:
+            try:
+                return [await client.get_item_full("MLA1"), await client.get_item_full("MLA2")]
+            finally:
+                await close_http_clients()
+
+        assert asyncio.run(_run()) == [{"id": "MLA1", "price": 1000}, {"id": "MLA2", "price": 1000}]
+        # render + preview por ítem sobre una sola conexión keep-alive
+        assert stub.requests == {"MLA1": 2, "MLA2": 2}
+        assert stub.conexiones == 1
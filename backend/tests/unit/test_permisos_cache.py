@@ -0,0 +1,103 @@
+"""
+Unit tests for the process-wide permission cache in PermisosService.
+
+Tests cover:
+  - permisos de rol / overrides compartidos entre instancias: la segunda
+    instancia no consulta la DB
+  - SUPERADMIN: el catálogo completo de códigos se lee una vez
+  - agregar_override / eliminar_override invalidan el cache compartido
+  - índice inverso permiso → usuarios: cantidad de queries acotada (no por
+    usuario), overrides y usuarios inactivos respetados
+"""
+
+from __future__ import annotations
+
+from app.models.permiso import Permiso, RolPermisoBase
+from app.models.usuario import AuthProvider, RolUsuario, Usuario
+from app.services.notificacion_service import resolver_usuarios_con_algun_permiso
+from app.services.permisos_service import PermisosService
+
+
+def _permiso(db, codigo: str) -> Permiso:
+    permiso = Permiso(codigo=codigo, nombre=codigo, categoria="reportes")
+    db.add(permiso)
+    db.flush()
+    return permiso
+
+
+def _usuario(db, username: str, rol_id: int, activo: bool = True) -> Usuario:
+    usuario = Usuario(
+        username=username,
+        email=f"{username}@test.com",
+        nombre=username,
+        password_hash="x",
+        rol=RolUsuario.VENTAS,
+        rol_id=rol_id,
+        auth_provider=AuthProvider.LOCAL,
+        activo=activo,
+    )
+    db.add(usuario)
+    db.flush()
+    return usuario
+
+
+class TestCacheCompartido:
+    def test_segunda_instancia_sin_queries(self, db, active_user, rol_ventas, query_counter) -> None:
+        permiso = _permiso(db, "reportes.ver")
+        db.add(RolPermisoBase(rol_id=rol_ventas.id, permiso_id=permiso.id))
+        db.commit()
+
+        assert PermisosService(db).obtener_permisos_usuario(active_user) == {"reportes.ver"}
+        with query_counter() as counter:
+            assert PermisosService(db).obtener_permisos_usuario(active_user) == {"reportes.ver"}
+        assert counter.statements == []
+
+    def test_superadmin_catalogo_una_query(self, db, rma_superadmin_user, query_counter) -> None:
+        _permiso(db, "reportes.ver")
+        _permiso(db, "ventas.ver")
+        db.commit()
+
+        with query_counter() as counter:
+            for _ in range(3):
+                permisos = PermisosService(db).obtener_permisos_usuario(rma_superadmin_user)
+        assert permisos == {"reportes.ver", "ventas.ver"}
+        assert counter.matching("permisos") == 1
+
+    def test_override_invalida(self, db, active_user) -> None:
+        _permiso(db, "reportes.ver")
+        db.commit()
+
+        assert not PermisosService(db).tiene_permiso(active_user, "reportes.ver")
+        PermisosService(db).agregar_override(active_user.id, "reportes.ver", concedido=True)
+        assert PermisosService(db).tiene_permiso(active_user, "reportes.ver")
+        assert PermisosService(db).usuarios_con_algun_permiso(["reportes.ver"]) == {active_user.id}
+
+        PermisosService(db).eliminar_override(active_user.id, "reportes.ver")
+        assert not PermisosService(db).tiene_permiso(active_user, "reportes.ver")
+        assert PermisosService(db).usuarios_con_algun_permiso(["reportes.ver"]) == set()
+
+
+class TestIndiceInverso:
+    def test_queries_acotadas(self, db, rol_ventas, rma_superadmin_user, query_counter) -> None:
+        ver = _permiso(db, "reportes.ver")
+        _permiso(db, "reportes.editar")
+        db.add(RolPermisoBase(rol_id=rol_ventas.id, permiso_id=ver.id))
+        usuarios = [_usuario(db, f"u{i}", rol_ventas.id) for i in range(20)]
+        inactivo = _usuario(db, "baja", rol_ventas.id, activo=False)
+        db.commit()
+        ids = [u.id for u in usuarios]
+        superadmin_id, inactivo_id = rma_superadmin_user.id, inactivo.id
+        PermisosService(db).agregar_override(usuarios[0].id, "reportes.ver", concedido=False)
+        PermisosService(db).agregar_override(usuarios[1].id, "reportes.editar", concedido=True)
+
+        with query_counter() as counter:
+            con_ver = PermisosService(db).usuarios_con_algun_permiso(["reportes.ver"])
+            con_editar = PermisosService(db).usuarios_con_algun_permiso(["reportes.editar"])
+        assert len(counter.statements) <= 4
+
+        assert con_ver == set(ids[1:]) | {superadmin_id}
+        assert con_editar == {ids[1], superadmin_id}
+        assert inactivo_id not in con_ver
+
+        resueltos = resolver_usuarios_con_algun_permiso(db, permisos_requeridos=["reportes.editar"])
+        assert [u.id for u in resueltos] == sorted([ids[1], superadmin_id])
@@ -0,0 +1,211 @@
+"""
+Unit tests for the set-based prearmado matcher (app.services.prearmado_matcher).
+
+Tests cover:
+  - complete-set match against pending sale orders and, as fallback, against
+    invoiced transactions (soh_id recovered from ct_soh_id)
+  - partial sets, other comp_id, requiere_serie=false and terminal states do
+    not match; lowest soh_id wins when several orders hold the full set
+  - constant number of queries regardless of how many prearmados are active
+  - incremental runs only evaluate prearmados touched since the watermark
+    (new ERP serial rows or updated prearmado/seriales), with a safety overlap
+    on `desde`; deleting a serial touches its prearmado
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models.commercial_transaction import CommercialTransaction
+from app.models.erp_sync_state import ERPSyncState
+from app.models.prearmado import Prearmado, PrearmadoSerial
+from app.models.tb_item_transaction_serials import TbItemTransactionSerial
+from app.models.tb_sale_order_serial import TbSaleOrderSerial
+from app.routers import prearmado
+from app.services.prearmado_matcher import (
+    CLAVE_WATERMARK,
+    SOLAPAMIENTO_DESDE,
+    match_prearmados_with_sales_orders,
+)
+
+VIEJO = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def crear(db, admin_user):
+    def _crear(id_: int, is_ids: list[int], estado: str = "pendiente", sin_serie: bool = False, comp_id: int = 1):
+        p = Prearmado(
+            id=id_,
+            codigo=f"PRE-{id_}",
+            comp_id=comp_id,
+            combo_item_id=1,
+            combo_item_code="COMBO",
+            estado=estado,
+            created_by_user_id=admin_user.id,
+            updated_at=VIEJO,
+        )
+        p.seriales = [
+            PrearmadoSerial(
+                componente_item_id=i,
+                componente_item_code=f"C{i}",
+                is_id=i,
+                requiere_serie=not sin_serie,
+                validado=True,
+                updated_at=VIEJO,
+            )
+            for i in is_ids
+        ]
+        db.add(p)
+        db.flush()
+        return p
+
+    return _crear
+
+
+_sose_id = iter(range(1, 10_000))
+
+
+def _pedido(db, soh_id: int, is_ids: list[int], comp_id: int = 1, sose_id: int | None = None) -> None:
+    for i in is_ids:
+        db.add(TbSaleOrderSerial(comp_id=comp_id, bra_id=1, sose_id=sose_id or next(_sose_id), is_id=i, soh_id=soh_id))
+    db.flush()
+
+
+def _factura(db, ct_transaction: int, soh_id: int, is_ids: list[int]) -> None:
+    db.add(CommercialTransaction(ct_transaction=ct_transaction, comp_id=1, ct_soh_id=soh_id))
+    for k, i in enumerate(is_ids):
+        db.add(
+            TbItemTransactionSerial(
+                comp_id=1, bra_id=1, its_id=ct_transaction * 10 + k, is_id=i, ct_transaction=ct_transaction
+            )
+        )
+    db.flush()
+
+
+def _estado(db, id_: int) -> tuple:
+    p = db.get(Prearmado, id_)
+    db.refresh(p)
+    return p.estado, p.consumido_por_soh_id
+
+
+class TestMatchCompleto:
+    def test_caminos_y_reglas(self, db, crear) -> None:
+        crear(1, [101, 102])
+        _pedido(db, 11, [101])
+        _pedido(db, 12, [101, 102])
+        _pedido(db, 10, [101, 102])  # también completo → gana el menor soh_id
+        crear(2, [201, 202])
+        _factura(db, 500, 20, [201, 202])
+        crear(3, [301, 302])
+        _pedido(db, 30, [301])  # set parcial
+        crear(4, [401], sin_serie=True)
+        _pedido(db, 40, [401])
+        crear(5, [501], estado="anulado")
+        _pedido(db, 50, [501])
+        crear(6, [601], comp_id=2)
+        _pedido(db, 60, [601], comp_id=1)
+
+        r = match_prearmados_with_sales_orders(db)
+
+        assert r == {"matched": 2, "total_checked": 5, "errors": []}
+        assert _estado(db, 1) == ("consumido", 10)
+        assert _estado(db, 2) == ("consumido", 20)
+        assert db.get(Prearmado, 1).consumido_at is not None
+        assert [_estado(db, i)[0] for i in (3, 4, 5, 6)] == ["pendiente", "pendiente", "anulado", "pendiente"]
+
+    def test_queries_constantes(self, db, crear, query_counter) -> None:
+        for i in range(1, 41):
+            crear(i, [i * 10, i * 10 + 1])
+            if i % 2:
+                _pedido(db, i, [i * 10, i * 10 + 1])
+
+        with query_counter() as counter:
+            r = match_prearmados_with_sales_orders(db)
+
+        assert (r["matched"], r["total_checked"]) == (20, 40)
+        assert sum("group by" in s and "having" in s for s in counter.statements) == 2
+        assert sum(s.startswith("update prearmados") for s in counter.statements) == 1
+        assert len(counter.statements) <= 10
+
+
+class TestIncremental:
+    def _watermark(self, db, sose_id: int, its_id: int = 0, desde: datetime = datetime(2026, 1, 1)) -> None:
+        db.add(
+            ERPSyncState(
+                tabla=CLAVE_WATERMARK,
+                watermark=json.dumps({"sose_id": sose_id, "its_id": its_id, "desde": desde.isoformat()}),
+            )
+        )
+        db.flush()
+
+    def test_solo_tocados(self, db, crear) -> None:
+        crear(1, [101, 102])
+        _pedido(db, 10, [101], sose_id=50)
+        _pedido(db, 10, [102], sose_id=60)  # ya estaba antes del watermark
+        crear(2, [201])
+        self._watermark(db, sose_id=100)
+
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert r == {"matched": 0, "total_checked": 0, "errors": []}
+
+        # Fila nueva del ERP con un is_id del prearmado 2 → se evalúa solo ese
+        _pedido(db, 20, [201], sose_id=101)
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert (r["matched"], r["total_checked"]) == (1, 1)
+        assert _estado(db, 2) == ("consumido", 20)
+        assert _estado(db, 1)[0] == "pendiente"
+
+        estado = db.get(ERPSyncState, CLAVE_WATERMARK)
+        assert (json.loads(estado.watermark)["sose_id"], estado.modo) == (101, "incremental")
+
+        # Sin watermark / corrida completa: el prearmado 1 también matchea
+        r = match_prearmados_with_sales_orders(db)
+        assert (r["matched"], r["total_checked"]) == (1, 1)
+        assert _estado(db, 1) == ("consumido", 10)
+
+    def test_tocado_por_validacion(self, db, crear) -> None:
+        p = crear(1, [101])
+        _pedido(db, 10, [101], sose_id=5)
+        self._watermark(db, sose_id=5, desde=datetime(2026, 1, 1))
+        p.seriales[0].updated_at = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        db.flush()
+
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert (r["matched"], r["total_checked"]) == (1, 1)
+
+    def test_solapamiento_desde(self, db, crear) -> None:
+        # Validación commiteada con updated_at apenas anterior al `desde` de la corrida previa
+        desde = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        p = crear(1, [101])
+        _pedido(db, 10, [101], sose_id=5)
+        self._watermark(db, sose_id=5, desde=desde)
+        p.seriales[0].updated_at = desde - SOLAPAMIENTO_DESDE / 2
+        db.flush()
+
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert (r["matched"], r["total_checked"]) == (1, 1)
+
+    def test_tocado_por_borrado_de_serial(self, db, crear) -> None:
+        p = crear(1, [101, 102])
+        _pedido(db, 10, [101], sose_id=5)
+        self._watermark(db, sose_id=5, desde=datetime(2026, 1, 1))
+        assert match_prearmados_with_sales_orders(db, incremental=True)["total_checked"] == 0
+
+        serial_102 = next(s for s in p.seriales if s.is_id == 102)
+        prearmado.borrar_serial(prearmado_id=1, serial_id=serial_102.id, db=db)
+
+        # El set restante ({101}) está completo en el pedido 10
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert (r["matched"], r["total_checked"]) == (1, 1)
+        assert _estado(db, 1) == ("consumido", 10)
+
+    def test_sin_watermark_es_completa(self, db, crear) -> None:
+        crear(1, [101])
+        _pedido(db, 10, [101])
+
+        r = match_prearmados_with_sales_orders(db, incremental=True)
+        assert r["matched"] == 1
+        assert db.get(ERPSyncState, CLAVE_WATERMARK).modo == "full"
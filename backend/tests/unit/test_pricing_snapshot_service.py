@@ -0,0 +1,327 @@
+"""
+Unit tests for app.services.pricing_snapshot_service + pricing_snapshot_hooks.
+
+Tests cover:
+  - calcular_snapshot_item: paridad con pricing_calculator (clásica, rebate,
+    mejor oferta) y PVP desde precios_ml con prioridad sobre productos_pricing
+  - refrescar_snapshot: escribe filas vigentes y actualiza
+    productos_pricing.markup_rebate / markup_oferta
+  - invalidación: cambio de huella global, vigencia de ofertas por día,
+    hooks ORM (pricing, oferta, ERP) y updates masivos de pricing
+  - items_pendientes: faltantes / stale / fecha_modificacion posterior;
+    obtener_snapshot calcula en el momento
+  - un ítem editado mientras el refresh calculaba no se escribe
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+
+import app.events.pricing_snapshot_hooks  # noqa: F401  (registra listeners)
+from app.services import pricing_snapshot_service as svc
+from app.models.comision_versionada import ComisionBase, ComisionVersion
+from app.models.oferta_ml import OfertaML
+from app.models.precio_ml import PrecioML
+from app.models.pricing_snapshot import PricingSnapshot
+from app.models.producto import ProductoERP, ProductoPricing
+from app.models.publicacion_ml import PublicacionML
+from app.services.pricing_calculator import (
+    calcular_comision_ml_total,
+    calcular_limpio,
+    calcular_markup,
+    obtener_constantes_pricing,
+)
+from app.services.pricing_snapshot_service import (
+    LISTA_CLASICA,
+    cargar_contexto_pricing,
+    cargar_inputs_items,
+    calcular_snapshot_item,
+    items_pendientes,
+    leer_snapshot_vigente,
+    obtener_snapshot,
+    refrescar_snapshot,
+)
+
+COMISION_BASE = 15.0
+
+
+def _seed(db, n: int = 3) -> None:
+    hoy = date.today()
+    version = ComisionVersion(nombre="v1", fecha_desde=hoy - timedelta(days=30), activo=True)
+    db.add(version)
+    db.flush()
+    db.add(ComisionBase(version_id=version.id, grupo_id=1, comision_base=COMISION_BASE))
+    for i in range(1, n + 1):
+        db.add(
+            ProductoERP(
+                item_id=i,
+                codigo=f"C{i:03d}",
+                descripcion=f"Producto {i}",
+                marca="LG",
+                costo=10000.0 * i,
+                moneda_costo="ARS",
+                iva=21.0,
+                envio=0.0,
+                stock=1,
+            )
+        )
+        db.add(
+            ProductoPricing(
+                item_id=i,
+                precio_lista_ml=20000.0 * i,
+                participa_rebate=True,
+                porcentaje_rebate=3.8,
+            )
+        )
+    db.flush()
+    db.add(PublicacionML(mla="MLA1", item_id=1, pricelist_id=LISTA_CLASICA))
+    db.flush()
+    db.add(
+        OfertaML(
+            mla="MLA1",
+            fecha_desde=hoy - timedelta(days=1),
+            fecha_hasta=hoy + timedelta(days=1),
+            precio_final=17000.0,
+            pvp_seller=18000.0,
+            aporte_meli_porcentaje=5.0,
+        )
+    )
+    db.flush()
+
+
+def _markup_esperado(db, precio: float, costo: float) -> float:
+    constantes = obtener_constantes_pricing(db)
+    comisiones = calcular_comision_ml_total(precio, COMISION_BASE, 21.0, constantes=constantes)
+    limpio = calcular_limpio(precio, 21.0, 0.0, comisiones["comision_total"], constantes=constantes)
+    return calcular_markup(limpio, costo) * 100
+
+
+def _snapshot_item(db, item_id: int) -> dict:
+    ctx = cargar_contexto_pricing(db)
+    erp = db.query(ProductoERP).filter_by(item_id=item_id).one()
+    pricing = db.query(ProductoPricing).filter_by(item_id=item_id).one()
+    inputs = cargar_inputs_items(db, ctx, [item_id])
+    return calcular_snapshot_item(ctx, erp, pricing, inputs)
+
+
+class TestCalcularSnapshotItem:
+    def test_clasica_rebate_y_oferta_match_pricing_calculator(self, db) -> None:
+        _seed(db)
+        clasica = _snapshot_item(db, 1)[LISTA_CLASICA]
+
+        assert clasica["markup"] == pytest.approx(_markup_esperado(db, 20000.0, 10000.0))
+        precio_rebate = 20000.0 / (1 - 0.038)
+        assert clasica["precio_rebate"] == pytest.approx(precio_rebate)
+        assert clasica["markup_rebate"] == pytest.approx(_markup_esperado(db, precio_rebate, 10000.0))
+        assert clasica["mejor_oferta_mla"] == "MLA1"
+        assert clasica["mejor_oferta_monto"] == pytest.approx(1000.0)
+        assert clasica["markup_oferta"] == pytest.approx(_markup_esperado(db, 18000.0, 10000.0))
+
+    def test_sin_oferta_ni_rebate(self, db) -> None:
+        _seed(db)
+        db.query(ProductoPricing).filter_by(item_id=2).update({"participa_rebate": False})
+        clasica = _snapshot_item(db, 2)[LISTA_CLASICA]
+        assert clasica["mejor_oferta_mla"] is None
+        assert clasica["markup_oferta"] is None
+        assert clasica["precio_rebate"] is None
+        assert clasica["markup_rebate"] is None
+
+    def test_pvp_precios_ml_overrides_pricing(self, db) -> None:
+        _seed(db)
+        db.query(ProductoPricing).filter_by(item_id=1).update({"precio_pvp": 99999.0})
+        db.add(PrecioML(item_id=1, pricelist_id=12, precio=25000))
+        db.flush()
+        filas = _snapshot_item(db, 1)
+        assert filas[12]["precio"] == 25000.0
+        assert filas[12]["markup"] == pytest.approx(_markup_esperado(db, 25000.0, 10000.0))
+
+
+class TestRefrescarSnapshot:
+    def test_completo_escribe_filas_y_markups_pricing(self, db) -> None:
+        _seed(db)
+        stats = refrescar_snapshot(db, completo=True)
+        assert stats["items"] == 3
+
+        filas = db.query(PricingSnapshot).filter_by(pricelist_id=LISTA_CLASICA).all()
+        assert sorted(f.item_id for f in filas) == [1, 2, 3]
+        assert all(not f.stale for f in filas)
+
+        pricing = db.query(ProductoPricing).filter_by(item_id=1).one()
+        db.refresh(pricing)
+        snap = db.query(PricingSnapshot).filter_by(item_id=1, pricelist_id=LISTA_CLASICA).one()
+        assert pricing.markup_rebate == pytest.approx(snap.markup_rebate)
+        assert pricing.markup_oferta == pytest.approx(snap.markup_oferta)
+
+    def test_incremental_sin_cambios_no_recalcula(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+        assert items_pendientes(db, cargar_contexto_pricing(db)) == []
+
+    def test_huella_distinta_invalida_todo(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+        db.query(ComisionBase).update({"comision_base": COMISION_BASE + 1})
+        assert items_pendientes(db, cargar_contexto_pricing(db)) == [1, 2, 3]
+
+    def test_cambio_de_dia_no_invalida_todo(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+        manana = date.today() + timedelta(days=1)
+        ctx_manana = cargar_contexto_pricing(db, hoy=manana)
+        assert ctx_manana.fingerprint == cargar_contexto_pricing(db).fingerprint
+        # La oferta de MLA1 sigue vigente mañana
+        assert items_pendientes(db, ctx_manana) == []
+
+    def test_oferta_que_vence_invalida_solo_su_item(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+        # La oferta de MLA1 vence hoy + 1
+        ctx = cargar_contexto_pricing(db, hoy=date.today() + timedelta(days=2))
+        assert items_pendientes(db, ctx) == [1]
+        assert sorted(leer_snapshot_vigente(db, ctx, [1, 2, 3])) == [2, 3]
+
+    def test_oferta_que_entra_en_vigencia_invalida_su_item(self, db) -> None:
+        _seed(db)
+        db.add(PublicacionML(mla="MLA2", item_id=2, pricelist_id=LISTA_CLASICA))
+        db.add(
+            OfertaML(
+                mla="MLA2",
+                fecha_desde=date.today() + timedelta(days=1),
+                fecha_hasta=date.today() + timedelta(days=5),
+                precio_final=30000.0,
+                pvp_seller=35000.0,
+            )
+        )
+        db.flush()
+        refrescar_snapshot(db, completo=True)
+        assert items_pendientes(db, cargar_contexto_pricing(db)) == []
+
+        ctx_manana = cargar_contexto_pricing(db, hoy=date.today() + timedelta(days=1))
+        assert items_pendientes(db, ctx_manana) == [2]
+
+
+class TestEdicionConcurrente:
+    def test_fecha_modificacion_posterior_queda_pendiente(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        # Escritura por fuera del ORM (sin hooks): sólo la delata el timestamp
+        tabla = ProductoPricing.__table__
+        db.execute(
+            tabla.update()
+            .where(tabla.c.item_id == 2)
+            .values(participa_rebate=False, fecha_modificacion=datetime.now(UTC) + timedelta(minutes=1))
+        )
+
+        assert items_pendientes(db, cargar_contexto_pricing(db)) == [2]
+
+    def test_edicion_durante_el_calculo_no_se_pisa(self, db, monkeypatch) -> None:
+        _seed(db)
+        cargar_original = svc.cargar_inputs_items
+
+        def cargar_y_editar(db_, ctx, item_ids):
+            inputs = cargar_original(db_, ctx, item_ids)
+            # Otra sesión commitea una edición del ítem 3 después de la lectura
+            tabla = ProductoPricing.__table__
+            db_.execute(
+                tabla.update().where(tabla.c.item_id == 3).values(fecha_modificacion=datetime(2030, 1, 1, tzinfo=UTC))
+            )
+            return inputs
+
+        monkeypatch.setattr(svc, "cargar_inputs_items", cargar_y_editar)
+        refrescar_snapshot(db, completo=True)
+
+        escritos = {f.item_id for f in db.query(PricingSnapshot).filter_by(pricelist_id=LISTA_CLASICA).all()}
+        assert escritos == {1, 2}
+        assert 3 in items_pendientes(db, cargar_contexto_pricing(db))
+
+
+class TestHooks:
+    def test_edicion_pricing_marca_stale(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        pricing = db.query(ProductoPricing).filter_by(item_id=2).one()
+        pricing.precio_lista_ml = 50000.0
+        db.flush()
+
+        stale = {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()}
+        assert stale == {2}
+        assert items_pendientes(db, cargar_contexto_pricing(db)) == [2]
+
+    def test_borrado_pricing_marca_stale(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        db.delete(db.query(ProductoPricing).filter_by(item_id=3).one())
+        db.flush()
+
+        stale = {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()}
+        assert stale == {3}
+
+    def test_update_masivo_pricing_marca_stale(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        db.query(ProductoPricing).filter(ProductoPricing.item_id.in_([1, 2])).update(
+            {ProductoPricing.participa_rebate: False}
+        )
+
+        stale = {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()}
+        assert stale == {1, 2}
+
+    def test_limpiar_rebate_marca_stale(self, client, db, admin_auth_headers) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+        db.query(ProductoPricing).filter_by(item_id=3).update({ProductoPricing.participa_rebate: False})
+        db.query(PricingSnapshot).update({PricingSnapshot.stale: False})
+
+        resp = client.post("/api/productos/limpiar-rebate", headers=admin_auth_headers)
+
+        assert resp.status_code == 200
+        assert resp.json()["productos_actualizados"] == 2
+        stale = {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()}
+        assert stale == {1, 2}
+
+    def test_edicion_oferta_marca_stale_por_mla(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        oferta = db.query(OfertaML).filter_by(mla="MLA1").one()
+        oferta.pvp_seller = 19000.0
+        db.flush()
+
+        stale = {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()}
+        assert stale == {1}
+
+    def test_cambio_erp_sin_impacto_no_marca_stale(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        erp = db.query(ProductoERP).filter_by(item_id=3).one()
+        erp.stock = 99
+        db.flush()
+        assert db.query(PricingSnapshot).filter_by(stale=True).count() == 0
+
+        erp.costo = 1.0
+        db.flush()
+        assert {f.item_id for f in db.query(PricingSnapshot).filter_by(stale=True).all()} == {3}
+
+
+class TestObtenerSnapshot:
+    def test_stale_se_calcula_en_el_momento(self, db) -> None:
+        _seed(db)
+        refrescar_snapshot(db, completo=True)
+
+        pricing = db.query(ProductoPricing).filter_by(item_id=2).one()
+        pricing.precio_lista_ml = 50000.0
+        db.flush()
+
+        productos = db.query(ProductoERP, ProductoPricing).join(ProductoPricing).all()
+        snapshot = obtener_snapshot(db, cargar_contexto_pricing(db), productos)
+        assert snapshot[2][LISTA_CLASICA]["precio"] == 50000.0
+        assert snapshot[2][LISTA_CLASICA]["markup"] == pytest.approx(_markup_esperado(db, 50000.0, 20000.0))
+        # El fallback no escribe: la fila sigue stale hasta el próximo refresh
+        assert db.query(PricingSnapshot).filter_by(item_id=2, stale=True).count() >= 1
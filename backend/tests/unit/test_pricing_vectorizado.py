@@ -0,0 +1,151 @@
+"""
+Unit tests for app.services.pricing_vectorizado.
+
+Tests cover:
+  - precio_por_markup_vectorizado == precio_por_markup_goalseek elemento a
+    elemento (sin db: tiers por defecto) sobre un catálogo aleatorio que cruza
+    los tres tiers, markups negativos, envío 0 y costo 0
+  - markup_vectorizado == calcular_comision_ml_total + calcular_limpio + calcular_markup
+  - calcular_precios_listas == calcular_precio_producto (con db: constantes,
+    comisión versionada por lista/grupo, envío promedio del grupo) para las 5
+    listas PVP, incluido el redondeo de markup_real
+  - lista sin comisión configurada → valido=False
+  - costo_calculable descarta costo NULL / no positivo e IVA NULL / negativo
+"""
+
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.models.comision_config import SubcategoriaGrupo
+from app.models.comision_versionada import ComisionAdicionalCuota, ComisionBase, ComisionVersion
+from app.models.producto import ProductoERP
+from app.services.pricing_calculator import (
+    calcular_comision_ml_total,
+    calcular_limpio,
+    calcular_markup,
+    calcular_precio_producto,
+    precio_por_markup_goalseek,
+)
+from app.services.pricing_vectorizado import (
+    calcular_precios_listas,
+    costo_calculable,
+    markup_vectorizado,
+    precio_por_markup_vectorizado,
+)
+
+
+def _catalogo(n: int, seed: int = 7) -> dict:
+    rnd = random.Random(seed)
+    return {
+        "costo": [0.0, 0.0] + [rnd.choice([rnd.uniform(500, 12000), rnd.uniform(12000, 400000)]) for _ in range(n)],
+        "markup": [10.0, -5.0] + [rnd.uniform(-30, 80) for _ in range(n)],
+        "iva": [21.0, 10.5] + [rnd.choice([21.0, 10.5]) for _ in range(n)],
+        "comision": [15.0, 15.0] + [rnd.uniform(10, 20) for _ in range(n)],
+        "envio": [0.0, 0.0] + [rnd.choice([0.0, rnd.uniform(2000, 15000)]) for _ in range(n)],
+    }
+
+
+class TestParidadGoalseek:
+    def test_precio_identico_al_escalar(self) -> None:
+        cat = _catalogo(2000)
+        esperado = [
+            precio_por_markup_goalseek(c, m, i, com, 6.5, e)
+            for c, m, i, com, e in zip(cat["costo"], cat["markup"], cat["iva"], cat["comision"], cat["envio"])
+        ]
+        obtenido = precio_por_markup_vectorizado(
+            cat["costo"], cat["markup"], cat["iva"], cat["comision"], cat["envio"], varios=6.5
+        )
+        assert obtenido.tolist() == [float(p) for p in esperado]
+
+    def test_markup_identico_al_escalar(self) -> None:
+        cat = _catalogo(500, seed=11)
+        precios = [rnd * 3 + 100 for rnd in cat["costo"]]
+        esperado = []
+        for p, c, i, com, e in zip(precios, cat["costo"], cat["iva"], cat["comision"], cat["envio"]):
+            comisiones = calcular_comision_ml_total(p, com, i, 6.5)
+            esperado.append(calcular_markup(calcular_limpio(p, i, e, comisiones["comision_total"]), c))
+        obtenido = markup_vectorizado(precios, cat["costo"], cat["iva"], cat["comision"], cat["envio"], varios=6.5)
+        assert obtenido.tolist() == esperado
+
+
+class TestCalcularPreciosListas:
+    def _seed(self, db) -> None:
+        version = ComisionVersion(nombre="v", fecha_desde=date.today() - timedelta(days=1), activo=True)
+        db.add(version)
+        db.flush()
+        db.add_all(
+            [
+                ComisionBase(version_id=version.id, grupo_id=1, comision_base=15.5),
+                ComisionBase(version_id=version.id, grupo_id=2, comision_base=12.0),
+                ComisionAdicionalCuota(version_id=version.id, cuotas=3, adicional=4.0),
+                ComisionAdicionalCuota(version_id=version.id, cuotas=6, adicional=7.5),
+                ComisionAdicionalCuota(version_id=version.id, cuotas=9, adicional=10.0),
+                ComisionAdicionalCuota(version_id=version.id, cuotas=12, adicional=13.0),
+                SubcategoriaGrupo(subcat_id=100, grupo_id=2),
+                ProductoERP(item_id=1, codigo="X", descripcion="x", subcategoria_id=100, envio=8000.0, activo=True),
+            ]
+        )
+        db.flush()
+
+    def test_paridad_con_calcular_precio_producto(self, db) -> None:
+        self._seed(db)
+        cat = _catalogo(60, seed=3)
+        grupos = [1 if i % 2 else 2 for i in range(len(cat["costo"]))]
+        listas = {12: 0.0, 18: 4.0, 19: 4.0, 20: 4.0, 21: 4.0}
+
+        resultados = calcular_precios_listas(
+            db,
+            costo_ars=cat["costo"],
+            iva=cat["iva"],
+            envio=cat["envio"],
+            grupo_ids=grupos,
+            markup_objetivo=cat["markup"],
+            adicional_por_lista=listas,
+        )
+
+        for pricelist_id, adicional in listas.items():
+            for i, (costo, iva, envio, markup) in enumerate(zip(cat["costo"], cat["iva"], cat["envio"], cat["markup"])):
+                esperado = calcular_precio_producto(
+                    db,
+                    costo=costo,
+                    moneda_costo="ARS",
+                    iva=iva,
+                    envio=envio,
+                    pricelist_id=pricelist_id,
+                    markup_objetivo=markup,
+                    adicional_markup=adicional,
+                    grupo_id=grupos[i],
+                )
+                r = resultados[pricelist_id]
+                assert r.valido[i]
+                assert r.precio[i] == esperado["precio"], (pricelist_id, i)
+                assert r.markup_real[i] == esperado["markup_real"], (pricelist_id, i)
+
+    def test_sin_comision_no_valido(self, db) -> None:
+        self._seed(db)
+        resultados = calcular_precios_listas(
+            db,
+            costo_ars=[1000.0, 2000.0],
+            iva=[21.0, 21.0],
+            envio=[0.0, 0.0],
+            grupo_ids=[1, 99],
+            markup_objetivo=20.0,
+            adicional_por_lista={12: 0.0},
+        )
+        assert resultados[12].valido.tolist() == [True, False]
+        assert np.isnan(resultados[12].precio[1])
+
+
+class TestCostoCalculable:
+    def test_descarta_costo_o_iva_invalidos(self) -> None:
+        assert costo_calculable(1000, 21.0)
+        assert costo_calculable(1000, 0)  # exento
+        assert not costo_calculable(None, 21.0)
+        assert not costo_calculable(0, 21.0)
+        assert not costo_calculable(-5, 21.0)
+        assert not costo_calculable(1000, None)
+        assert not costo_calculable(1000, -1)
@@ -0,0 +1,151 @@
+"""
+Unit tests for app.services.productos_paginacion.
+
+Tests cover:
+  - parse_orden: field mapping, unknown fields ignored, item_id tiebreaker
+  - encode_cursor / decode_cursor: round-trip, tampered and mismatched cursors
+  - paginar: SQL ordering with NULLS LAST, multi-column mixed directions,
+    keyset walk returns exactly the same rows as offset pagination
+  - mejor_oferta ordering honours the out_of_cards → rebate rule
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.models.producto import ProductoERP, ProductoPricing
+from app.services.productos_paginacion import (
+    CursorInvalidoError,
+    decode_cursor,
+    encode_cursor,
+    paginar,
+    parse_orden,
+)
+
+
+def _seed(db, n: int = 23) -> None:
+    for i in range(1, n + 1):
+        db.add(
+            ProductoERP(
+                item_id=i,
+                codigo=f"C{i:03d}",
+                descripcion=f"Producto {i}",
+                marca=["SAMSUNG", "LG", "NOBLEX"][i % 3],
+                costo=float(100 + (i % 5) * 10),
+                moneda_costo="ARS",
+                iva=21.0,
+                stock=i % 4,
+            )
+        )
+        # Cada 4to producto sin markup_rebate → tiene que ir al final (NULLS LAST)
+        db.add(
+            ProductoPricing(
+                item_id=i,
+                precio_lista_ml=1000.0 + i,
+                markup_calculado=float(i % 7),
+                markup_rebate=None if i % 4 == 0 else float(i % 6),
+                markup_oferta=float(i % 5),
+                out_of_cards=(i == 5),
+            )
+        )
+    db.flush()
+
+
+def _query(db):
+    return db.query(ProductoERP, ProductoPricing).outerjoin(
+        ProductoPricing, ProductoERP.item_id == ProductoPricing.item_id
+    )
+
+
+def _walk_keyset(db, orden, page_size: int) -> list[int]:
+    ids: list[int] = []
+    cursor = None
+    while True:
+        rows, cursor = paginar(_query(db), orden, 1, page_size, cursor=cursor)
+        ids.extend(erp.item_id for erp, _ in rows)
+        if cursor is None:
+            return ids
+
+
+class TestParseOrden:
+    def test_maps_fields_and_appends_item_id(self) -> None:
+        orden = parse_orden("marca,costo", "asc,desc")
+        assert [(o.campo, o.desc) for o in orden] == [("marca", False), ("costo", True), ("item_id", False)]
+
+    def test_unknown_fields_ignored(self) -> None:
+        orden = parse_orden("nope,stock", "asc,asc")
+        assert [o.campo for o in orden] == ["stock", "item_id"]
+
+    def test_explicit_item_id_not_duplicated(self) -> None:
+        orden = parse_orden("item_id", "desc")
+        assert [(o.campo, o.desc) for o in orden] == [("item_id", True)]
+
+    def test_no_orden_defaults_to_item_id(self) -> None:
+        assert [o.campo for o in parse_orden(None, None)] == ["item_id"]
+
+
+class TestCursor:
+    def test_round_trip(self) -> None:
+        orden = parse_orden("marca,costo", "asc,desc")
+        cursor = encode_cursor(orden, ["LG", 120.5, 7])
+        assert decode_cursor(cursor, orden) == ["LG", 120.5, 7]
+
+    def test_garbage_raises(self) -> None:
+        with pytest.raises(CursorInvalidoError):
+            decode_cursor("%%%not-base64%%%", parse_orden(None, None))
+
+    def test_cursor_from_other_orden_rejected(self) -> None:
+        cursor = encode_cursor(parse_orden("marca", "asc"), ["LG", 1])
+        with pytest.raises(CursorInvalidoError):
+            decode_cursor(cursor, parse_orden("costo", "asc"))
+
+
+class TestPaginar:
+    def test_offset_page_sorted_in_sql_nulls_last(self, db) -> None:
+        _seed(db)
+        orden = parse_orden("precio_rebate", "desc")
+        rows, next_cursor = paginar(_query(db), orden, 1, 50)
+
+        rebates = [pricing.markup_rebate for _, pricing in rows]
+        no_nulos = [r for r in rebates if r is not None]
+        assert no_nulos == sorted(no_nulos, reverse=True)
+        assert all(r is None for r in rebates[len(no_nulos) :])
+        assert next_cursor is None
+
+    def test_next_cursor_only_when_more_rows(self, db) -> None:
+        _seed(db)
+        orden = parse_orden(None, None)
+        rows, next_cursor = paginar(_query(db), orden, 1, 10)
+        assert len(rows) == 10
+        assert next_cursor is not None
+
+        rows, next_cursor = paginar(_query(db), orden, 3, 10)
+        assert len(rows) == 3
+        assert next_cursor is None
+
+    @pytest.mark.parametrize(
+        "campos,direcciones",
+        [
+            ("item_id", "asc"),
+            ("marca,costo", "asc,desc"),
+            ("precio_rebate,stock", "asc,desc"),
+            ("precio_rebate", "desc"),
+            ("mejor_oferta,marca", "desc,asc"),
+        ],
+    )
+    def test_keyset_walk_matches_offset(self, db, campos: str, direcciones: str) -> None:
+        _seed(db)
+        orden = parse_orden(campos, direcciones)
+
+        esperado, _ = paginar(_query(db), orden, 1, 1000)
+        esperado_ids = [erp.item_id for erp, _ in esperado]
+
+        assert _walk_keyset(db, orden, page_size=4) == esperado_ids
+        assert sorted(esperado_ids) == list(range(1, 24))
+
+    def test_mejor_oferta_uses_rebate_when_out_of_cards(self, db) -> None:
+        _seed(db)
+        # item 5: out_of_cards con markup_rebate=5 y markup_oferta=0 → cuenta como 5
+        orden = parse_orden("mejor_oferta", "desc")
+        rows, _ = paginar(_query(db), orden, 1, 1)
+        assert rows[0][0].item_id == 5
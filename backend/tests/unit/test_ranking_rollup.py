@@ -0,0 +1,156 @@
+"""
+Unit tests for the consultas ranking rollup (app.services.ranking_rollup_service).
+
+Runs against the SQLite test DB (same upsert path as PostgreSQL via
+on_conflict_do_update).
+
+Tests cover:
+  - last sale follows the ADR-1 sale definition and excluded items
+  - last purchase picks the latest it_cd (puco_id=10)
+  - incremental run only reads transactions past the watermark and never
+    moves last sale/purchase backwards
+  - depot stock upsert, combo flag mark/unmark, full rebuild
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from app.models.commercial_transaction import CommercialTransaction
+from app.models.erp_sync_state import ERPSyncState
+from app.models.item_transaction import ItemTransaction
+from app.models.ranking_item_deposito import RankingItemDeposito
+from app.models.stock_por_deposito import StockPorDeposito
+from app.models.tb_item_association import TbItemAssociation
+from app.services import ranking_rollup_service as rollup
+
+VENTA = {"sd_id": 1, "df_id": 1}
+DEVOLUCION = {"sd_id": 3, "df_id": 1}
+
+
+def _tx(db, it_transaction: int, item_id: int, ct_date: datetime, qty: int = 1, puco_id=None, it_cd=None, **ct):
+    db.add(CommercialTransaction(ct_transaction=it_transaction, ct_date=ct_date, **(ct or VENTA)))
+    db.add(
+        ItemTransaction(
+            it_transaction=it_transaction,
+            ct_transaction=it_transaction,
+            item_id=item_id,
+            it_qty=qty,
+            puco_id=puco_id,
+            it_cd=it_cd,
+        )
+    )
+    db.flush()
+
+
+def _fila(db, item_id: int, stor_id: int = rollup.STOR_ID_ITEM) -> RankingItemDeposito | None:
+    db.flush()
+    db.expire_all()
+    return db.get(RankingItemDeposito, (item_id, stor_id))
+
+
+class TestUltimaVenta:
+    def test_definicion_de_venta(self, db) -> None:
+        _tx(db, 1, 100, datetime(2026, 3, 1))
+        _tx(db, 2, 100, datetime(2026, 5, 1), **DEVOLUCION)  # no es venta
+        _tx(db, 3, 100, datetime(2026, 6, 1), qty=0)  # cantidad cero
+        _tx(db, 4, 16, datetime(2026, 6, 1))  # ítem excluido
+
+        assert rollup.actualizar_desde_transacciones(db) == 1
+
+        assert _fila(db, 100).ultima_venta == date(2026, 3, 1)
+        assert _fila(db, 16) is None
+
+    def test_incremental_desde_watermark(self, db) -> None:
+        _tx(db, 1, 100, datetime(2026, 3, 1))
+        rollup.actualizar_desde_transacciones(db)
+        assert db.get(ERPSyncState, rollup.ESTADO_ROLLUP).watermark == "1"
+
+        # Sin transacciones nuevas no hay nada que hacer
+        assert rollup.actualizar_desde_transacciones(db) == 0
+
+        _tx(db, 2, 100, datetime(2026, 7, 1))
+        _tx(db, 3, 200, datetime(2026, 7, 2))
+        assert rollup.actualizar_desde_transacciones(db) == 2
+
+        assert _fila(db, 100).ultima_venta == date(2026, 7, 1)
+        assert _fila(db, 200).ultima_venta == date(2026, 7, 2)
+        estado = db.get(ERPSyncState, rollup.ESTADO_ROLLUP)
+        assert (estado.watermark, estado.modo) == ("3", "incremental")
+
+    def test_no_retrocede(self, db) -> None:
+        _tx(db, 1, 100, datetime(2026, 7, 1))
+        rollup.actualizar_desde_transacciones(db)
+
+        # Venta cargada tarde en el ERP con fecha anterior
+        _tx(db, 2, 100, datetime(2026, 2, 1))
+        rollup.actualizar_desde_transacciones(db)
+
+        assert _fila(db, 100).ultima_venta == date(2026, 7, 1)
+
+
+class TestUltimaCompra:
+    def test_it_cd_mas_reciente(self, db) -> None:
+        compra = {"sd_id": 2, "df_id": 1}
+        _tx(db, 1, 100, datetime(2026, 1, 5), qty=10, puco_id=10, it_cd=datetime(2026, 1, 5, 9), **compra)
+        _tx(db, 2, 100, datetime(2026, 4, 5), qty=20, puco_id=10, it_cd=datetime(2026, 4, 5, 9), **compra)
+        _tx(db, 3, 100, datetime(2026, 6, 5), qty=30, puco_id=11, it_cd=datetime(2026, 6, 5, 9), **compra)
+        rollup.actualizar_desde_transacciones(db)
+
+        fila = _fila(db, 100)
+        assert fila.ultima_compra_fecha == date(2026, 4, 5)
+        assert fila.ultima_compra_cant == 20
+        assert fila.ultima_venta is None
+
+        # Una compra más vieja en el incremental no pisa la última
+        _tx(db, 4, 100, datetime(2025, 12, 1), qty=5, puco_id=10, it_cd=datetime(2025, 12, 1, 9), **compra)
+        rollup.actualizar_desde_transacciones(db)
+        assert _fila(db, 100).ultima_compra_cant == 20
+
+
+class TestStockYCombos:
+    def test_actualizar_stock(self, db) -> None:
+        rollup.actualizar_stock(
+            db, [{"item_id": 100, "stor_id": 1, "stock": 5}, {"item_id": 100, "stor_id": 2, "stock": 0}]
+        )
+        rollup.actualizar_stock(db, [{"item_id": 100, "stor_id": 1, "stock": 7}])
+
+        assert _fila(db, 100, 1).stock == 7
+        assert _fila(db, 100, 2).stock == 0
+        assert _fila(db, 100) is None
+
+    def test_refrescar_combos(self, db) -> None:
+        db.add(TbItemAssociation(comp_id=1, itema_id=1, item_id=100, item_id_1=101, iasso_qty=1))
+        db.add(TbItemAssociation(comp_id=1, itema_id=2, item_id=200, item_id_1=201, iasso_qty=0))
+        db.flush()
+        rollup.refrescar_combos(db)
+
+        assert _fila(db, 100).es_combo is True
+        assert _fila(db, 200) is None
+
+        db.query(TbItemAssociation).filter(TbItemAssociation.itema_id == 1).delete()
+        db.flush()
+        rollup.refrescar_combos(db)
+
+        assert _fila(db, 100).es_combo is False
+
+
+class TestReconstruir:
+    def test_desde_cero(self, db) -> None:
+        # Fila vieja que ya no corresponde (p. ej. transacción borrada en el ERP)
+        rollup.actualizar_stock(db, [{"item_id": 999, "stor_id": 1, "stock": 3}])
+        db.add(StockPorDeposito(item_id=100, stor_id=1, stock=4))
+        _tx(db, 1, 100, datetime(2026, 3, 1))
+
+        resultado = rollup.reconstruir(db)
+
+        assert resultado == {"depositos": 1, "items": 1}
+        filas = db.execute(
+            select(RankingItemDeposito.item_id, RankingItemDeposito.stor_id).order_by(
+                RankingItemDeposito.item_id, RankingItemDeposito.stor_id
+            )
+        ).all()
+        assert [tuple(f) for f in filas] == [(100, 0), (100, 1)]
+        assert db.get(ERPSyncState, rollup.ESTADO_ROLLUP).modo == "full"
@@ -0,0 +1,157 @@
+"""
+Unit tests for app.core.reference_cache + pricing_reference_hooks.
+
+Tests cover:
+  - ReferenceCache: hit/miss, TTL eviction, version bump on invalidate,
+    loader result not stored if the namespace is invalidated mid-load
+  - pricing_calculator lookups hit the DB once, then dictionary-speed
+  - commit of a reference write invalidates locally and publishes on Redis
+  - a session with uncommitted reference writes bypasses the cache
+  - the pub/sub subscriber invalidates on incoming messages
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import date, timedelta
+
+import fakeredis
+
+from app.core import reference_cache
+from app.core.reference_cache import ReferenceCache
+from app.models.comision_versionada import ComisionBase, ComisionVersion
+from app.models.pricing_constants import PricingConstants
+from app.models.tipo_cambio import TipoCambio
+from app.services.pricing_calculator import (
+    obtener_comision_versionada,
+    obtener_constantes_pricing,
+    obtener_tipo_cambio_actual,
+    precio_por_markup_goalseek,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestReferenceCache:
+    def test_get_or_load_caches(self) -> None:
+        cache = ReferenceCache()
+        calls = []
+        for _ in range(3):
+            assert cache.get_or_load("ns", "k", lambda: calls.append(1) or 42) == 42
+        assert len(calls) == 1
+
+    def test_ttl_eviction(self) -> None:
+        clock = _Clock()
+        cache = ReferenceCache(ttl_seconds=10, clock=clock)
+        cache.get_or_load("ns", "k", lambda: 1)
+        clock.now = 9.9
+        assert cache.get("ns", "k") == 1
+        clock.now = 10.0
+        assert cache.get("ns", "k") is None
+
+    def test_invalidate_bumps_only_that_namespace(self) -> None:
+        cache = ReferenceCache()
+        cache.get_or_load("a", "k", lambda: 1)
+        cache.get_or_load("b", "k", lambda: 2)
+        cache.invalidate("a")
+        assert cache.get("a", "k") is None
+        assert cache.get("b", "k") == 2
+        assert cache.version("a") == 1
+
+    def test_invalidate_all(self) -> None:
+        cache = ReferenceCache()
+        cache.get_or_load("a", "k", lambda: 1)
+        cache.get_or_load("b", "k", lambda: 2)
+        cache.invalidate()
+        assert cache.get("a", "k") is None
+        assert cache.get("b", "k") is None
+
+    def test_invalidated_during_load_not_stored(self) -> None:
+        cache = ReferenceCache()
+
+        def _loader():
+            cache.invalidate("ns")
+            return "viejo"
+
+        assert cache.get_or_load("ns", "k", _loader) == "viejo"
+        assert cache.get("ns", "k") is None
+
+
+class TestPricingCalculatorCache:
+    def test_constantes_y_tc_una_query(self, db, query_counter) -> None:
+        db.add(TipoCambio(moneda="USD", fecha=date.today(), compra=1000, venta=1050))
+        db.commit()
+
+        with query_counter() as counter:
+            for _ in range(5):
+                obtener_constantes_pricing(db)
+                assert obtener_tipo_cambio_actual(db, "USD") == 1050
+        assert counter.matching("pricing_constants") == 1
+        assert counter.matching("tipo_cambio") == 1
+
+    def test_goalseek_no_requery(self, db, query_counter) -> None:
+        obtener_constantes_pricing(db)
+        with query_counter() as counter:
+            precio_por_markup_goalseek(10000, 20, 21, 15, 6.5, 0, db=db, grupo_id=1)
+        assert counter.matching("pricing_constants") == 0
+
+    def test_comision_versionada_cacheada(self, db, query_counter) -> None:
+        version = ComisionVersion(nombre="v", fecha_desde=date.today() - timedelta(days=1), activo=True)
+        db.add(version)
+        db.flush()
+        db.add(ComisionBase(version_id=version.id, grupo_id=2, comision_base=14.5))
+        db.commit()
+
+        with query_counter() as counter:
+            for pricelist_id in (4, 12, 4):
+                assert obtener_comision_versionada(db, 2, pricelist_id) == 14.5
+        assert counter.matching("comisiones_versiones") == 1
+
+    def test_commit_invalida_y_publica(self, db) -> None:
+        fake = fakeredis.FakeStrictRedis()
+        reference_cache._set_client_for_tests(fake)
+        pubsub = fake.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(reference_cache.CHANNEL)
+
+        assert obtener_constantes_pricing(db)["varios"] == 6.5
+        db.add(PricingConstants(fecha_desde=date.today() - timedelta(days=1), varios_porcentaje=7.0))
+        db.commit()
+
+        assert obtener_constantes_pricing(db)["varios"] == 7.0
+        mensajes = [pubsub.get_message(timeout=0.5) for _ in range(2)]
+        assert [m["data"] for m in mensajes if m] == [b"constantes"]
+
+    def test_sesion_con_cambios_sin_commit_no_usa_cache(self, db) -> None:
+        assert obtener_constantes_pricing(db)["varios"] == 6.5
+        db.add(PricingConstants(fecha_desde=date.today() - timedelta(days=1), varios_porcentaje=8.0))
+        db.flush()
+
+        # La sesión ve su propio cambio, pero no lo deja en el cache compartido
+        assert obtener_constantes_pricing(db)["varios"] == 8.0
+        assert reference_cache.cache.get("constantes", date.today())["varios"] == 6.5
+
+
+class TestInvalidationListener:
+    def test_mensaje_invalida_namespace(self) -> None:
+        fake = fakeredis.FakeStrictRedis()
+        reference_cache.start_invalidation_listener(client=fake)
+        try:
+            deadline = time.monotonic() + 2
+            while fake.pubsub_numsub(reference_cache.CHANNEL)[0][1] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            reference_cache.cache.get_or_load("tipo_cambio", "k", lambda: 1)
+            fake.publish(reference_cache.CHANNEL, "tipo_cambio")
+
+            deadline = time.monotonic() + 3
+            while reference_cache.cache.get("tipo_cambio", "k") is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert reference_cache.cache.get("tipo_cambio", "k") is None
+        finally:
+            reference_cache.stop_invalidation_listener()
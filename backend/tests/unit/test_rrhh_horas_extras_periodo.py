@@ -0,0 +1,197 @@
+"""
+Unit tests for the period engine of HorasExtrasService.detectar_he_periodo.
+
+Tests cover:
+  - expected blocks per employee-day: extras over tolerance, sin turno →
+    pendiente_asignacion_turno, single fichada → error_fichadas, blocking
+    presentismo, feriado, saturday split
+  - one read per table regardless of employees × days
+  - re-running is a no-op (sin_cambios, no extra historial); a changed day is
+    updated in place with a `recalculada` historial entry; stale editable
+    blocks are deleted
+  - days with frozen blocks are not recalculated
+  - the process pool returns the same blocks as the in-process path
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.events import rrhh_he_hooks
+from app.models.rrhh_empleado import RRHHEmpleado
+from app.models.rrhh_empleado_horario import RRHHEmpleadoHorario
+from app.models.rrhh_fichada import RRHHFichada
+from app.models.rrhh_horario import RRHHHorarioConfig, RRHHHorarioExcepcion
+from app.models.rrhh_horas_extras import (
+    EstadoHE,
+    RRHHHorasExtras,
+    RRHHHorasExtrasConfig,
+    RRHHHorasExtrasHistorial,
+)
+from app.models.rrhh_presentismo import RRHHPresentismoDiario
+from app.services.rrhh_horas_extras_service import (
+    DiaHE,
+    HorasExtrasService,
+    ParametrosHE,
+    TurnoHE,
+    _calcular_dias,
+    _calcular_en_pool,
+)
+
+LUNES = date(2026, 4, 27)
+SABADO = LUNES + timedelta(days=5)
+
+
+@pytest.fixture()
+def nomina(db):
+    """Config + turno 09-17 L-V; empleados 1 y 2 con turno, 3 sin turno."""
+    db.add(RRHHHorasExtrasConfig(id=1))
+    turno = RRHHHorarioConfig(nombre="Central", hora_entrada=time(9), hora_salida=time(17), dias_semana="1,2,3,4,5")
+    db.add(turno)
+    db.flush()
+    for i in (1, 2, 3):
+        db.add(
+            RRHHEmpleado(
+                id=i, nombre=f"E{i}", apellido="X", dni=f"{i}", legajo=f"L{i}", fecha_ingreso=LUNES, estado="activo"
+            )
+        )
+    db.flush()
+    db.add_all([RRHHEmpleadoHorario(empleado_id=i, horario_config_id=turno.id) for i in (1, 2)])
+    db.flush()
+    yield
+    # Los hooks de fichadas / turnos abren otra sesión en el commit: no aplican acá.
+    db.info.pop(rrhh_he_hooks._FICHADAS_KEY, None)
+    db.info.pop(rrhh_he_hooks._HORARIOS_KEY, None)
+
+
+def _fichar(db, empleado_id: int, dia: date, *horas: tuple[int, int]) -> None:
+    for h, m in horas:
+        db.add(RRHHFichada(empleado_id=empleado_id, timestamp=datetime.combine(dia, time(h, m)), tipo="entrada"))
+    db.flush()
+
+
+def _detectar(db, desde: date, hasta: date, **kwargs) -> dict:
+    db.info.pop(rrhh_he_hooks._FICHADAS_KEY, None)
+    db.info.pop(rrhh_he_hooks._HORARIOS_KEY, None)
+    return HorasExtrasService(db).detectar_he_periodo(desde, hasta, **kwargs)
+
+
+def _bloques(db) -> dict[tuple[int, date, str], RRHHHorasExtras]:
+    db.expire_all()
+    return {(b.empleado_id, b.fecha, b.tipo_dia): b for b in db.query(RRHHHorasExtras).all()}
+
+
+class TestDeteccion:
+    def test_bloques_esperados(self, db, nomina) -> None:
+        _fichar(db, 1, LUNES, (9, 0), (12, 0), (19, 0))  # 600 min vs 480 → 120 extras
+        _fichar(db, 1, LUNES + timedelta(days=1), (9, 0), (17, 10))  # 10 min ≤ tolerancia
+        _fichar(db, 2, LUNES, (9, 0))  # fichada única
+        _fichar(db, 3, LUNES, (9, 0), (18, 0))  # sin turno
+        _fichar(db, 2, LUNES + timedelta(days=2), (9, 0), (20, 0))  # vacaciones
+        db.add(RRHHPresentismoDiario(empleado_id=2, fecha=LUNES + timedelta(days=2), estado="vacaciones"))
+        _fichar(db, 2, LUNES + timedelta(days=3), (9, 0), (19, 0))  # feriado
+        db.add(RRHHHorarioExcepcion(fecha=LUNES + timedelta(days=3), tipo="feriado", descripcion="F"))
+        _fichar(db, 1, SABADO, (11, 0), (15, 0))  # sin turno el sábado: 240 extras, corte 13:00
+
+        r = _detectar(db, LUNES, SABADO)
+
+        assert (r["procesados"], r["creados"], r["errores"], r["pendientes_turno"]) == (18, 6, 1, 1)
+        bloques = _bloques(db)
+        assert {k: (b.estado, b.extras_minutos) for k, b in bloques.items()} == {
+            (1, LUNES, "habil_50"): ("detectada", 120),
+            (2, LUNES, "habil_50"): ("error_fichadas", None),
+            (3, LUNES, "habil_50"): ("pendiente_asignacion_turno", None),
+            (2, LUNES + timedelta(days=3), "feriado_100"): ("detectada", 120),
+            (1, SABADO, "habil_50"): ("detectada", 120),
+            (1, SABADO, "sabado_100"): ("detectada", 120),
+        }
+        assert bloques[(1, LUNES, "habil_50")].porcentaje_recargo == Decimal("50.00")
+        assert bloques[(1, LUNES, "habil_50")].turno_esperado_minutos == 480
+        assert db.query(RRHHHorasExtrasHistorial).filter_by(accion="detectada").count() == 6
+
+    def test_queries_constantes(self, db, nomina, query_counter) -> None:
+        for i in range(4, 24):
+            db.add(RRHHEmpleado(id=i, nombre="E", apellido="X", dni=f"{i}", legajo=f"L{i}", fecha_ingreso=LUNES))
+        db.flush()
+        for i in range(1, 24):
+            for d in range(5):
+                _fichar(db, i, LUNES + timedelta(days=d), (8, 0), (18, 0))
+
+        with query_counter() as counter:
+            r = _detectar(db, LUNES, LUNES + timedelta(days=4))
+
+        assert r["creados"] == 23 * 5
+        assert counter.matching("rrhh_fichadas") == 1
+        assert counter.matching("rrhh_presentismo_diario") == 1
+        # Una lectura por tabla; los INSERT los agrupa el flush (insertmanyvalues en
+        # PostgreSQL — SQLite no tiene sentinel para RETURNING y va fila por fila).
+        assert sum(s.startswith("select") for s in counter.statements) == 7
+        assert not any(s.startswith(("update", "delete")) for s in counter.statements)
+
+
+class TestIdempotencia:
+    def test_rerun_sin_cambios_y_update_en_lugar(self, db, nomina) -> None:
+        _fichar(db, 1, LUNES, (9, 0), (19, 0))
+        _fichar(db, 1, LUNES + timedelta(days=1), (9, 0), (19, 0))
+        _detectar(db, LUNES, LUNES + timedelta(days=1))
+        antes = _bloques(db)
+
+        r = _detectar(db, LUNES, LUNES + timedelta(days=1))
+        assert (r["creados"], r["actualizados"], r["sin_cambios"]) == (0, 0, 2)
+        assert db.query(RRHHHorasExtrasHistorial).count() == 2
+
+        # Más tarde el lunes: mismo bloque, actualizado; el martes se queda sin fichadas.
+        _fichar(db, 1, LUNES, (20, 0))
+        db.query(RRHHFichada).filter(
+            RRHHFichada.timestamp >= datetime.combine(LUNES + timedelta(days=1), time(0))
+        ).delete()
+        r = _detectar(db, LUNES, LUNES + timedelta(days=1))
+
+        assert (r["creados"], r["actualizados"], r["sin_cambios"]) == (0, 2, 0)
+        despues = _bloques(db)
+        assert list(despues) == [(1, LUNES, "habil_50")]
+        lunes = despues[(1, LUNES, "habil_50")]
+        assert (lunes.id, lunes.extras_minutos) == (antes[(1, LUNES, "habil_50")].id, 180)
+        hist = db.query(RRHHHorasExtrasHistorial).filter_by(he_id=lunes.id, accion="recalculada").one()
+        assert hist.snapshot["extras_minutos"] == 120
+
+    def test_dia_congelado_no_se_recalcula(self, db, nomina) -> None:
+        _fichar(db, 1, LUNES, (9, 0), (19, 0))
+        _detectar(db, LUNES, LUNES)
+        bloque = _bloques(db)[(1, LUNES, "habil_50")]
+        bloque.estado = EstadoHE.APROBADA.value
+        db.flush()
+
+        _fichar(db, 1, LUNES, (21, 0))
+        r = _detectar(db, LUNES, LUNES)
+
+        assert (r["creados"], r["actualizados"]) == (0, 0)
+        assert _bloques(db)[(1, LUNES, "habil_50")].extras_minutos == 120
+
+
+def test_pool_igual_que_en_proceso() -> None:
+    params = ParametrosHE(
+        porcentajes={"habil_50": Decimal("50"), "sabado_100": Decimal("100")},
+        hora_corte_sabado=time(13),
+        tolerancia_extras_minutos=15,
+    )
+    turno = [TurnoHE(1, True, "1,2,3,4,5", time(9), time(17))]
+    dias = [
+        DiaHE(
+            empleado_id=e,
+            fecha=LUNES + timedelta(days=d),
+            fichadas=[
+                (1, datetime.combine(LUNES + timedelta(days=d), time(8))),
+                (2, datetime.combine(LUNES + timedelta(days=d), time(18 + e % 3))),
+            ],
+            presentismo_bloquea=False,
+            turnos=turno if e % 4 else None,
+            es_feriado=False,
+        )
+        for e in range(40)
+        for d in range(7)
+    ]
+    assert _calcular_en_pool(dias, params, procesos=2) == _calcular_dias(dias, params)
@@ -0,0 +1,242 @@
+"""
+Unit tests for maintained running balances (app.services.saldos_service and
+the cc_proveedor_saldos projection in app.services.cc_proveedor_service).
+
+Tests cover:
+  - caja / banco saldo_posterior recomputed with one window-function UPDATE,
+    full account or only from the earliest affected (fecha, id) onward
+  - Google Sheets sync rewrites the tail from the earliest new movement
+  - insertar_mov keeps cc_proveedor_saldos up to date per (proveedor, empresa, moneda)
+  - verificar_saldos_mantenidos reports drift against the ledger in one query
+  - reconciliar_diario reads ledger + ERP snapshot in one query for all proveedores
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.models.banco_empresa import BancoEmpresa
+from app.models.banco_movimiento import BancoMovimiento
+from app.models.caja import Caja, CajaMovimiento
+from app.models.cc_proveedor_saldo import CCProveedorSaldo
+from app.models.cuenta_corriente_proveedor import CuentaCorrienteProveedor
+from app.models.empresa import Empresa
+from app.models.proveedor import OrigenProveedor, Proveedor
+from app.services.banco_service import BancoService
+from app.services.caja_service import CajaService
+from app.services.caja_sheets_sync import CajaSheetsSync
+from app.services.cc_proveedor_service import insertar_mov, reconciliar_diario, verificar_saldos_mantenidos
+
+ENERO = date(2026, 1, 1)
+
+
+@pytest.fixture()
+def empresa(db) -> Empresa:
+    emp = Empresa(id=1, nombre="Empresa Saldos", activo=True, orden=0)
+    db.add(emp)
+    db.flush()
+    return emp
+
+
+@pytest.fixture()
+def caja(db, empresa) -> Caja:
+    c = Caja(nombre="Caja Test", empresa_id=empresa.id, saldo_inicial=Decimal("1000"), saldo_actual=Decimal("0"))
+    db.add(c)
+    db.flush()
+    return c
+
+
+def _mov_caja(db, caja: Caja, dia: int, tipo: str, monto: str) -> CajaMovimiento:
+    mov = CajaMovimiento(
+        caja_id=caja.id,
+        fecha=date(2026, 1, dia),
+        detalle=f"{tipo} {monto}",
+        tipo=tipo,
+        monto=Decimal(monto),
+        saldo_posterior=Decimal("0"),
+    )
+    db.add(mov)
+    db.flush()
+    return mov
+
+
+def _saldos(db, modelo, cuenta) -> list[Decimal]:
+    db.expire_all()
+    return [m.saldo_posterior for m in db.query(modelo).filter(cuenta).order_by(modelo.fecha, modelo.id).all()]
+
+
+class TestCajaBanco:
+    def test_recalculo_completo(self, db, caja, query_counter) -> None:
+        _mov_caja(db, caja, 3, "egreso", "300")
+        _mov_caja(db, caja, 1, "ingreso", "500")
+        _mov_caja(db, caja, 2, "egreso", "50.25")
+
+        with query_counter() as counter:
+            saldo = CajaService(db).recalcular_saldo(caja.id)
+
+        assert saldo == Decimal("1149.75")
+        assert _saldos(db, CajaMovimiento, CajaMovimiento.caja_id == caja.id) == [
+            Decimal("1500"),
+            Decimal("1449.75"),
+            Decimal("1149.75"),
+        ]
+        assert db.get(Caja, caja.id).saldo_actual == Decimal("1149.75")
+        assert sum(s.startswith("update caja_movimientos") for s in counter.statements) == 1
+
+    def test_recalculo_desde_el_primero_afectado(self, db, caja) -> None:
+        for dia in (1, 2, 5):
+            _mov_caja(db, caja, dia, "ingreso", "100")
+        CajaService(db).recalcular_saldo(caja.id)
+
+        # El primero queda con un valor "imposible" para probar que no se reescribe
+        primero = db.query(CajaMovimiento).filter_by(fecha=date(2026, 1, 1)).one()
+        primero.saldo_posterior = Decimal("1100.01")
+        atrasado = _mov_caja(db, caja, 3, "egreso", "40")
+
+        saldo = CajaService(db).recalcular_saldo(caja.id, desde=(atrasado.fecha, atrasado.id))
+
+        assert saldo == Decimal("1260")
+        assert _saldos(db, CajaMovimiento, CajaMovimiento.caja_id == caja.id) == [
+            Decimal("1100.01"),
+            Decimal("1200"),
+            Decimal("1160"),
+            Decimal("1260"),
+        ]
+
+    def test_banco(self, db, empresa) -> None:
+        banco = BancoEmpresa(banco="Banco", empresa_id=empresa.id, saldo_inicial=Decimal("10"))
+        db.add(banco)
+        db.flush()
+        for dia, tipo, monto in ((2, "egreso", "4"), (1, "ingreso", "5")):
+            db.add(
+                BancoMovimiento(
+                    banco_id=banco.id,
+                    fecha=date(2026, 1, dia),
+                    detalle="x",
+                    tipo=tipo,
+                    monto=Decimal(monto),
+                    saldo_posterior=Decimal("0"),
+                )
+            )
+        db.flush()
+
+        assert BancoService(db).recalcular_saldo(banco.id) == Decimal("11")
+        assert _saldos(db, BancoMovimiento, BancoMovimiento.banco_id == banco.id) == [Decimal("15"), Decimal("11")]
+
+    def test_cuenta_sin_movimientos(self, db, caja) -> None:
+        assert CajaService(db).recalcular_saldo(caja.id) == Decimal("1000")
+
+    def test_sync_sheets_reescribe_la_cola(self, db, caja) -> None:
+        _mov_caja(db, caja, 1, "ingreso", "100")
+        _mov_caja(db, caja, 10, "ingreso", "100")
+        CajaService(db).recalcular_saldo(caja.id)
+
+        sync = CajaSheetsSync.__new__(CajaSheetsSync)
+        sync.db = db
+        nuevo = _mov_caja(db, caja, 5, "egreso", "30")
+        sync._recalculate_balance(caja, desde=(nuevo.fecha, nuevo.id))
+
+        assert _saldos(db, CajaMovimiento, CajaMovimiento.caja_id == caja.id) == [
+            Decimal("1100"),
+            Decimal("1070"),
+            Decimal("1170"),
+        ]
+        assert caja.saldo_actual == Decimal("1170")
+
+
+@pytest.fixture()
+def proveedores(db, empresa) -> list[Proveedor]:
+    provs = [
+        Proveedor(id=i, nombre=f"Prov {i}", supp_id=i, activo=True, origen=OrigenProveedor.ERP.value)
+        for i in (10, 20, 30)
+    ]
+    db.add_all(provs)
+    db.add(Empresa(id=2, nombre="Empresa 2", activo=True, orden=1))
+    db.flush()
+    return provs
+
+
+def _mov_cc(db, proveedor_id: int, tipo: str, monto: str, empresa_id: int = 1, moneda: str = "ARS", **kw):
+    return insertar_mov(
+        db,
+        proveedor_id=proveedor_id,
+        empresa_id=empresa_id,
+        fecha_movimiento=ENERO,
+        tipo=tipo,
+        monto=Decimal(monto),
+        moneda=moneda,
+        origen_tipo="ajuste_manual",
+        origen_id=None,
+        **kw,
+    )
+
+
+class TestSaldosCCProveedor:
+    def test_insertar_mov_mantiene_saldo(self, db, proveedores) -> None:
+        _mov_cc(db, 10, "debe", "1000")
+        _mov_cc(db, 10, "haber", "300")
+        ultimo = _mov_cc(db, 10, "ajuste", "50", signo_ajuste=-1)
+        _mov_cc(db, 10, "debe", "70", empresa_id=2)
+        _mov_cc(db, 10, "debe", "5", moneda="USD")
+
+        db.expire_all()
+        saldos = {(s.empresa_id, s.moneda): s for s in db.query(CCProveedorSaldo).filter_by(proveedor_id=10)}
+        assert {k: (s.saldo, s.movimientos) for k, s in saldos.items()} == {
+            (1, "ARS"): (Decimal("650"), 3),
+            (2, "ARS"): (Decimal("70"), 1),
+            (1, "USD"): (Decimal("5"), 1),
+        }
+        assert saldos[(1, "ARS")].ultimo_movimiento_id == ultimo.id
+        assert verificar_saldos_mantenidos(db) == []
+
+    def test_verificar_detecta_desfasajes(self, db, proveedores, query_counter) -> None:
+        _mov_cc(db, 10, "debe", "100")
+        _mov_cc(db, 20, "debe", "200")
+        db.query(CCProveedorSaldo).filter_by(proveedor_id=10).update({"saldo": Decimal("90")})
+        db.add(CCProveedorSaldo(proveedor_id=30, empresa_id=1, moneda="ARS", saldo=Decimal("0"), movimientos=1))
+        db.flush()
+
+        with query_counter() as counter:
+            desfasados = verificar_saldos_mantenidos(db)
+
+        assert len(counter.statements) == 1
+        assert [(d["proveedor_id"], d["saldo_mayor"], d["saldo_mantenido"]) for d in desfasados] == [
+            (10, Decimal("100"), Decimal("90")),
+            (30, Decimal("0"), Decimal("0")),
+        ]
+        assert desfasados[0]["diferencia"] == Decimal("10")
+
+    def test_reconciliar_un_query(self, db, proveedores, query_counter) -> None:
+        for prov_id, monto in ((10, "1000"), (20, "500"), (30, "10")):
+            _mov_cc(db, prov_id, "debe", monto)
+        _mov_cc(db, 20, "debe", "7", moneda="USD")
+        for prov_id, pendiente in ((10, "1000"), (20, "900"), (20, "510")):  # el último de 20 gana
+            db.add(
+                CuentaCorrienteProveedor(
+                    bra_id=1,
+                    id_proveedor=prov_id,
+                    proveedor="x",
+                    monto_total=Decimal(pendiente),
+                    monto_abonado=Decimal("0"),
+                    pendiente=Decimal(pendiente),
+                )
+            )
+        db.flush()
+
+        with query_counter() as counter:
+            r = reconciliar_diario(
+                db, fecha_corrida=date(2026, 1, 31), tolerancias={"ARS": Decimal("100"), "USD": Decimal("1")}
+            )
+
+        assert r == {
+            "proveedores_procesados": 3,
+            "comparaciones": 2,
+            "divergencias": 0,
+            "alertas_creadas": 0,
+            "notificaciones_creadas": 0,
+        }
+        assert counter.matching("cuentas_corrientes_proveedores") == 1
+        assert sum(s.startswith("select") for s in counter.statements) == 1
@@ -0,0 +1,277 @@
+"""
+Unit tests for the incremental SOAP parser (app.utils.soap_stream) and the
+NDJSON mode of /api/gbp-parser.
+
+Tests cover:
+  - parity with the original regex parser (copied below) on hand-picked and
+    fuzzed responses, for every chunk size: same rows, same fallbacks
+    (JSON directo, raw, error), same CDATA / entity quirks
+  - rows come out while the body is still arriving
+  - /gbp-parser?format=ndjson streams one row per line; TOKEN Expired is
+    retried (also as a 500 SOAP fault); an error mid-stream ends with a
+    `truncated` line; any other error status raises instead of "no rows"
+  - ERPWorkerClient.stream_rows yields rows and raises on `truncated`
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+
+import httpx
+import pytest
+
+from app.api.endpoints import gbp_parser
+from app.services.erp_worker_client import ERPStreamError, ERPWorkerClient
+from app.utils.soap_stream import SoapRowParser, parse_soap_response
+
+
+def _legacy_parse(xml_content: str):
+    """Parser original (pre-streaming), referencia de paridad."""
+    match = re.search(r"<\w*:?\s*\w+Result[^>]*>([\s\S]*?)</\w*:?\s*\w+Result>", xml_content)
+    if not match:
+        return [{"error": "No se encontró el tag result"}]
+    inner_xml = match.group(1)
+    inner_xml = inner_xml.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+    inner_xml = inner_xml.replace("&quot;", '"').replace("&apos;", "'")
+    inner_xml = re.sub(r"<!\[CDATA\[(.*?)\]\]>", r"\1", inner_xml, flags=re.DOTALL)
+    tables = re.findall(r"<Table[\s\S]*?</Table>", inner_xml)
+    if tables:
+        rows = []
+        for table_xml in tables:
+            row = {}
+            for tag_name, tag_value in re.findall(r"<([^>/\s]+)>([^<]*)</\1>", table_xml):
+                value = tag_value.strip()
+                if value and len(value) > 1:
+                    first, last = value[0], value[-1]
+                    if (first == "{" and last == "}") or (first == "[" and last == "]"):
+                        try:
+                            value = json.loads(value)
+                        except (json.JSONDecodeError, ValueError):
+                            pass
+                row[tag_name] = value
+            rows.append(row)
+        if len(rows) == 1 and len(rows[0]) == 1:
+            value = list(rows[0].values())[0]
+            if isinstance(value, list):
+                return value
+        return rows
+    json_match = re.search(r"(\{[\s\S]*\}|\[[\s\S]*\])", inner_xml)
+    if json_match:
+        try:
+            return json.loads(json_match.group(1))
+        except (json.JSONDecodeError, ValueError):
+            return [{"raw": inner_xml}]
+    return [{"raw": inner_xml}]
+
+
+def _en_chunks(xml: str, size: int):
+    parser = SoapRowParser()
+    filas = []
+    for i in range(0, len(xml), size):
+        filas += parser.feed(xml[i : i + size])
+    filas += parser.close()
+    if not parser.completo:
+        return [{"error": "No se encontró el tag result"}]
+    if isinstance(parser.json_directo, dict):
+        return parser.json_directo
+    return filas
+
+
+def _soap(inner: str, tag: str = "wsGBPScriptExecute4DatasetResult") -> str:
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><soap:Envelope><soap:Body>'
+        f'<wsGBPScriptExecute4DatasetResponse xmlns="http://microsoft.com/webservices/"><{tag}>'
+        f"{inner}</{tag}></wsGBPScriptExecute4DatasetResponse></soap:Body></soap:Envelope>"
+    )
+
+
+def _tablas_escapadas(n: int) -> str:
+    return "".join(
+        f"&lt;Table&gt;&lt;item_id&gt;{i}&lt;/item_id&gt;&lt;desc&gt;A &amp;amp; B {i}&lt;/desc&gt;&lt;/Table&gt;"
+        for i in range(n)
+    )
+
+
+MUESTRAS = [
+    _soap("&lt;NewDataSet&gt;" + _tablas_escapadas(5) + "&lt;/NewDataSet&gt;"),
+    _soap("<NewDataSet><Table diffgr:id='1'><a> 1 </a><b>{\"x\": 1}</b></Table><Table><a>[1,</a></Table></NewDataSet>"),
+    _soap("&lt;Table&gt;&lt;Column1&gt;[{&quot;id&quot;: 1}, {&quot;id&quot;: 2}]&lt;/Column1&gt;&lt;/Table&gt;"),
+    _soap("<![CDATA[<Table><a>x</a></Table><Table><a>y</a></Table>]]>"),
+    _soap("<![CDATA[<Table><a>sin cierre</a></Table>"),
+    _soap('{"ok": true, "items": [1, 2]}'),
+    _soap("[1, 2, 3]"),
+    _soap("texto plano &amp;quot;sin&amp;quot; tablas &lt;b&gt;"),
+    _soap("{roto"),
+    _soap("", tag="AuthenticateUserResult"),
+    "<html>TOKEN Expired</html>",
+    _soap("<Table><a>1</a></Table>").replace("</wsGBPScriptExecute4DatasetResult>", ""),
+]
+
+
+class TestParidad:
+    @pytest.mark.parametrize("xml", MUESTRAS)
+    def test_muestras_todos_los_chunks(self, xml: str) -> None:
+        esperado = _legacy_parse(xml)
+        assert parse_soap_response(xml) == esperado
+        for size in range(1, 40):
+            assert _en_chunks(xml, size) == esperado, size
+
+    def test_fuzz(self) -> None:
+        atomos = [
+            "<Table>", "</Table>", "<Table1 x='1'>", "<a>", "</a>", "&lt;", "&gt;", "&amp;", "&quot;",
+            "&apos;", "&amp;quot;", "&lt;Table&gt;", "&lt;/Table&gt;", "&lt;a&gt;", "&lt;/a&gt;",
+            "<![CDATA[", "]]>", "[1,2]", '{"k":1}', "x", " ", "&", "<", ">", "]", "{", "</Foo",
+            "</soap:XResult", "</GetResult>",
+        ]  # fmt: skip
+        rnd = random.Random(7)
+        for _ in range(500):
+            body = "".join(rnd.choice(atomos) for _ in range(rnd.randint(0, 60)))
+            xml = "<soap:Body><GetResult xmlns='x'>" + body + rnd.choice(["</GetResult>", ""])
+            esperado = _legacy_parse(xml)
+            for size in (1, 2, 3, 7, 64):
+                assert _en_chunks(xml, size) == esperado, (xml, size)
+
+
+class TestIncremental:
+    def test_filas_antes_del_final(self) -> None:
+        xml = _soap(_tablas_escapadas(1000))
+        parser = SoapRowParser()
+        mitad = len(xml) // 2
+
+        primeras = parser.feed(xml[:mitad])
+        assert 450 < len(primeras) <= 500
+        assert primeras[0] == {"item_id": "0", "desc": "A &amp; B 0"}  # &amp;amp; se desescapa una sola vez
+
+        resto = parser.feed(xml[mitad:]) + parser.close()
+        assert [f["item_id"] for f in primeras + resto] == [str(i) for i in range(1000)]
+
+
+class _Body(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes], falla: bool = False) -> None:
+        self.chunks = chunks
+        self.falla = falla
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.falla:
+            raise httpx.ReadError("conexión cortada")
+
+
+@pytest.fixture()
+def erp(monkeypatch):
+    """ERP SOAP falso: responde `estado["respuestas"]` en orden, en chunks de 50 bytes."""
+    estado = {"respuestas": [], "acciones": [], "falla": False, "status": 200}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        accion = request.headers["SOAPAction"]
+        estado["acciones"].append(accion)
+        if accion.endswith("AuthenticateUser"):
+            return httpx.Response(200, text="<AuthenticateUserResult>nuevo</AuthenticateUserResult>")
+        xml = estado["respuestas"].pop(0).encode()
+        chunks = [xml[i : i + 50] for i in range(0, len(xml), 50)]
+        return httpx.Response(estado["status"], stream=_Body(chunks, falla=estado["falla"]))
+
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(gbp_parser, "get_http_client", lambda name: cliente)
+    monkeypatch.setitem(gbp_parser._token_cache, "token", "viejo")
+    return estado
+
+
+def _lineas(response) -> list:
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(linea) for linea in response.text.splitlines() if linea]
+
+
+class TestEndpointNdjson:
+    def test_stream_filas(self, client, auth_headers, erp) -> None:
+        erp["respuestas"] = [_soap(_tablas_escapadas(30))]
+        response = client.get(
+            "/api/gbp-parser",
+            params={"strScriptLabel": "scriptItemTransaction", "itTransaction": 5, "format": "ndjson"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        filas = _lineas(response)
+        assert [f["item_id"] for f in filas] == [str(i) for i in range(30)]
+
+    def test_json_sin_cambios(self, client, auth_headers, erp) -> None:
+        xml = _soap(_tablas_escapadas(3))
+        erp["respuestas"] = [xml]
+        response = client.post("/api/gbp-parser", json={"strScriptLabel": "scriptBrand"}, headers=auth_headers)
+        assert response.json() == _legacy_parse(xml)
+
+    def test_accept_ndjson_y_token_expired(self, client, auth_headers, erp) -> None:
+        erp["respuestas"] = [_soap("TOKEN Expired"), _soap(_tablas_escapadas(2))]
+        response = client.post(
+            "/api/gbp-parser",
+            json={"strScriptLabel": "scriptBrand"},
+            headers={**auth_headers, "Accept": "application/x-ndjson"},
+        )
+        assert [f["item_id"] for f in _lineas(response)] == ["0", "1"]
+        assert [a.rsplit("/", 1)[-1] for a in erp["acciones"]] == [
+            "wsGBPScriptExecute4Dataset",
+            "AuthenticateUser",
+            "wsGBPScriptExecute4Dataset",
+        ]
+
+    def test_error_a_mitad_de_stream(self, client, auth_headers, erp) -> None:
+        erp["respuestas"] = [_soap(_tablas_escapadas(30))]
+        erp["falla"] = True
+        response = client.get(
+            "/api/gbp-parser", params={"strScriptLabel": "scriptBrand", "format": "ndjson"}, headers=auth_headers
+        )
+        filas = _lineas(response)
+        assert filas[-1]["truncated"] is True
+        assert [f["item_id"] for f in filas[:-1]] == [str(i) for i in range(len(filas) - 1)]
+
+
+class TestStreamSoapRowsStatus:
+    def _filas(self) -> list:
+        async def _run():
+            return [fila async for fila in gbp_parser.stream_soap_rows("<x/>", "http://x/wsGBPScriptExecute4Dataset")]
+
+        return asyncio.run(_run())
+
+    def test_5xx_levanta(self, erp) -> None:
+        erp["respuestas"] = ["<html>Service Unavailable</html>"]
+        erp["status"] = 503
+        with pytest.raises(httpx.HTTPStatusError):
+            self._filas()
+
+    def test_token_expired_como_soap_fault(self, erp) -> None:
+        erp["respuestas"] = [_soap("TOKEN Expired"), _soap(_tablas_escapadas(2))]
+        erp["status"] = 500
+        with pytest.raises(httpx.HTTPStatusError):
+            # El reintento también responde 500: se propaga
+            self._filas()
+        assert [a.rsplit("/", 1)[-1] for a in erp["acciones"]] == [
+            "wsGBPScriptExecute4Dataset",
+            "AuthenticateUser",
+            "wsGBPScriptExecute4Dataset",
+        ]
+
+
+class TestERPWorkerClientStream:
+    def _filas(self, monkeypatch, body: str) -> list:
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.params["format"] == "ndjson"
+            return httpx.Response(200, content=body.encode())
+
+        cliente = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr("app.services.erp_worker_client.get_http_client", lambda name: cliente)
+
+        async def _run():
+            return [fila async for fila in ERPWorkerClient().stream_rows("scriptItemTransaction", {"itTransaction": 1})]
+
+        return asyncio.run(_run())
+
+    def test_filas(self, monkeypatch) -> None:
+        assert self._filas(monkeypatch, '{"a": 1}\n\n{"a": 2}\n') == [{"a": 1}, {"a": 2}]
+
+    def test_truncated(self, monkeypatch) -> None:
+        with pytest.raises(ERPStreamError, match="cortada"):
+            self._filas(monkeypatch, '{"a": 1}\n{"error": "cortada", "truncated": true}\n')
@@ -0,0 +1,198 @@
+"""
+Unit tests for the SSE fan-out (app.core.sse.SSEConnectionManager).
+
+Tests cover:
+  - channel index: only subscribers get an event, all of them the same
+    encoded bytes; unregister/eviction drop the connection from the index
+  - reload hints coalesced per channel (leading + one trailing event per
+    window); other payloads flush the pending hint first
+  - end to end over a Redis stream: IDs are stream entry IDs, Last-Event-ID
+    replays only the client's channels with reload hints collapsed
+  - thousands of connections on one manager
+  - per-user channels (exports:progress:<id>) only accept the caller's own id
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.core import sse
+from app.core.sse import SSEConnectionManager, encode_event, sse_publish
+from app.models.usuario import Usuario
+from app.routers.sse import _is_valid_channel
+
+
+def _drain(queue: asyncio.Queue) -> list:
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def _data(payload: bytes) -> dict:
+    line = next(linea for linea in payload.decode().splitlines() if linea.startswith("data: "))
+    return json.loads(line.removeprefix("data: "))["data"]
+
+
+@pytest.fixture()
+def redis_sse():
+    """Fake Redis wired into sse_publish for the duration of one asyncio.run."""
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    yield client
+    sse.set_redis(None, None)
+
+
+class TestIndex:
+    def test_solo_suscriptores_y_payload_compartido(self) -> None:
+        async def escenario():
+            manager = SSEConnectionManager(fakeredis.FakeAsyncRedis(), coalesce_seconds=0)
+            _, etiquetas = manager.register(["etiquetas:changed"])
+            _, ambos = manager.register(["etiquetas:changed", "alertas:updated"])
+            _, alertas = manager.register(["alertas:updated"])
+
+            payload = encode_event("etiquetas:changed", '{"x": 1}', "1-0")
+            manager.dispatch("etiquetas:changed", payload)
+            return _drain(etiquetas), _drain(ambos), _drain(alertas), payload
+
+        etiquetas, ambos, alertas, payload = asyncio.run(escenario())
+
+        assert etiquetas == [payload] and ambos == [payload] and alertas == []
+        assert etiquetas[0] is ambos[0]
+        assert payload == b'id: 1-0\nevent: etiquetas:changed\ndata: {"x": 1}\n\n'
+
+    def test_unregister_y_eviction_salen_del_indice(self) -> None:
+        async def escenario():
+            manager = SSEConnectionManager(fakeredis.FakeAsyncRedis(), max_connections=2)
+            primero, cola_primero = manager.register(["a"])
+            segundo, _ = manager.register(["a", "b"])
+            manager.register(["b"])  # desaloja al primero
+            manager.unregister(segundo)
+            return manager, cola_primero
+
+        manager, cola_primero = asyncio.run(escenario())
+
+        assert cola_primero.get_nowait() is None  # señal de cierre
+        assert manager.active_connections == 1
+        assert "a" not in manager._by_channel
+        assert len(manager._by_channel["b"]) == 1
+
+
+class TestCoalescing:
+    def test_rafaga_de_reloads_sale_como_dos_eventos(self) -> None:
+        async def escenario():
+            manager = SSEConnectionManager(fakeredis.FakeAsyncRedis(), coalesce_seconds=0.05)
+            _, cola = manager.register(["colectas:changed"])
+            for i in range(20):
+                manager.dispatch("colectas:changed", encode_event("colectas:changed", "{}", f"{i}-0"), reload=True)
+            inmediatos = _drain(cola)
+            await asyncio.sleep(0.08)
+            al_cerrar = _drain(cola)
+            await asyncio.sleep(0.08)
+            return inmediatos, al_cerrar, _drain(cola)
+
+        inmediatos, al_cerrar, despues = asyncio.run(escenario())
+
+        assert [e.split(b"\n")[0] for e in inmediatos] == [b"id: 0-0"]
+        assert [e.split(b"\n")[0] for e in al_cerrar] == [b"id: 19-0"]
+        assert despues == []
+
+    def test_otro_payload_vacia_el_pendiente_antes(self) -> None:
+        async def escenario():
+            manager = SSEConnectionManager(fakeredis.FakeAsyncRedis(), coalesce_seconds=10)
+            _, cola = manager.register(["tickets:changed"])
+            manager.dispatch("tickets:changed", b"r1", reload=True)
+            manager.dispatch("tickets:changed", b"r2", reload=True)
+            manager.dispatch("tickets:changed", b"count")
+            eventos = _drain(cola)
+            await manager.stop()
+            return eventos
+
+        assert asyncio.run(escenario()) == [b"r1", b"r2", b"count"]
+
+
+class TestStream:
+    def test_ids_del_stream_y_replay_por_last_event_id(self, redis_sse) -> None:
+        async def escenario():
+            sse.set_redis(redis_sse, asyncio.get_running_loop())
+            manager = SSEConnectionManager(redis_sse, coalesce_seconds=0)
+            await manager.start()
+            try:
+                _, cola = manager.register(["etiquetas:changed"])
+                await sse_publish("etiquetas:changed", {"hint": "reload"})
+                vivo = await asyncio.wait_for(cola.get(), timeout=2)
+                visto = vivo.split(b"\n")[0].decode().removeprefix("id: ")
+
+                # Mientras el cliente está desconectado
+                await sse_publish("etiquetas:changed", {"hint": "reload"})
+                await sse_publish("alertas:updated", {"hint": "reload"})
+                await sse_publish("etiquetas:changed", {"count": 3})
+                await sse_publish("etiquetas:changed", {"hint": "reload"})
+                ultimo = (await redis_sse.xrevrange(sse.STREAM_KEY, count=1))[0][0].decode()
+                for _ in range(200):
+                    if manager._last_id == ultimo:
+                        break
+                    await asyncio.sleep(0.01)
+
+                _, _, replay = await manager.connect(["etiquetas:changed"], visto)
+                _, _, sin_id = await manager.connect(["etiquetas:changed"], "42")
+                entradas = await redis_sse.xrange(sse.STREAM_KEY)
+                return vivo, visto, replay, sin_id, entradas
+            finally:
+                await manager.stop()
+
+        vivo, visto, replay, sin_id, entradas = asyncio.run(escenario())
+
+        assert visto == entradas[0][0].decode()
+        assert b"event: etiquetas:changed" in vivo
+        assert [_data(e) for e in replay] == [{"count": 3}, {"hint": "reload"}]
+        assert replay[-1].startswith(f"id: {entradas[-1][0].decode()}\n".encode())
+        assert sin_id == []
+
+    def test_publish_externo_por_pubsub(self, redis_sse) -> None:
+        async def escenario():
+            manager = SSEConnectionManager(redis_sse)
+            await manager.start()
+            try:
+                _, cola = manager.register(["shipments:webhook"])
+                await asyncio.sleep(0.05)
+                await redis_sse.publish("sse:shipments:webhook", '{"data": {"id": 9}}')
+                return await asyncio.wait_for(cola.get(), timeout=2)
+            finally:
+                await manager.stop()
+
+        assert asyncio.run(escenario()) == b'event: shipments:webhook\ndata: {"data": {"id": 9}}\n\n'
+
+
+class TestCarga:
+    def test_miles_de_conexiones(self) -> None:
+        canales = [f"canal:{i}" for i in range(20)]
+
+        async def escenario():
+            manager = SSEConnectionManager(fakeredis.FakeAsyncRedis(), max_connections=5000, coalesce_seconds=0)
+            colas = [manager.register([canales[i % 20], canales[(i + 1) % 20]])[1] for i in range(5000)]
+            for n in range(30):
+                canal = canales[n % 20]
+                manager.dispatch(canal, encode_event(canal, "{}", f"{n}-0"))
+            return manager, [c.qsize() for c in colas]
+
+        manager, recibidos = asyncio.run(escenario())
+
+        assert manager.active_connections == 5000
+        # Los canales 0..9 reciben 2 eventos, 10..19 uno: cada cliente está en dos canales consecutivos
+        esperados = [(2 if i % 20 < 10 else 1) + (2 if (i + 1) % 20 < 10 else 1) for i in range(5000)]
+        assert recibidos == esperados
+        assert manager.dropped_events == 0
+
+
+class TestCanalesPorUsuario:
+    def test_solo_el_canal_propio(self) -> None:
+        usuario = Usuario(id=42)
+        assert _is_valid_channel("exports:progress:42", usuario)
+        assert not _is_valid_channel("exports:progress:7", usuario)
+        assert not _is_valid_channel("exports:progress", usuario)
+        assert not _is_valid_channel("etiquetas:changed:42", usuario)
+        assert _is_valid_channel("etiquetas:changed", usuario)
@@ -2,10 +2,16 @@
 
 Cubre `reconciliar_asociaciones_combo`: borrar componentes fantasma de un combo
 modificado en el ERP, el guard de respuesta vacía y el aislamiento entre combos.
+También que el sync refresca `es_combo` del rollup del ranking.
 """
 
+import asyncio
+
+from app.models.ranking_item_deposito import RankingItemDeposito
 from app.models.tb_item_association import TbItemAssociation
+from app.scripts import sync_item_associations as sync
 from app.scripts.sync_item_associations import reconciliar_asociaciones_combo
+from app.services.ranking_rollup_service import STOR_ID_ITEM
 
 
 def _crear_asociacion(db, itema_id: int, item_id: int, item_id_1: int) -> None:
@@ -74,3 +80,17 @@ def test_sin_fantasmas_no_borra(db):
 
     assert eliminadas == 0
     assert db.query(TbItemAssociation).filter_by(item_id=combo).count() == 2
+
+
+def test_sync_refresca_es_combo_del_ranking(db, monkeypatch):
+    """Un combo nuevo en el ERP queda marcado es_combo sin esperar al sync de stock."""
+    monkeypatch.setattr(
+        sync,
+        "fetch_item_associations_from_erp",
+        lambda **kwargs: [{"comp_id": 1, "itema_id": 1, "item_id": 100, "item_id_1": 500, "iasso_qty": 1}],
+    )
+
+    asyncio.run(sync.sync_item_associations_incremental(db))
+
+    db.expire_all()
+    assert db.get(RankingItemDeposito, (100, STOR_ID_ITEM)).es_combo is True
@@ -0,0 +1,110 @@
+"""
+Unit tests for the sale orders sync (app.scripts.sync_sale_orders_all).
+
+Runs `aplicar_registros` against the SQLite test DB (generic merge path).
+
+Tests cover:
+  - first run writes every row; an identical rerun writes nothing
+  - only rows whose ERP content changed are rewritten; local override_*
+    columns survive the merge
+  - rows without a full key are discarded, ERP duplicates collapse to one
+  - `forzar` ignores stored hashes
+  - main_async runs every table and raises after the others if one fails
+"""
+
+from __future__ import annotations
+
+import asyncio
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app.models.sale_order_detail import SaleOrderDetail
+from app.models.sale_order_header import SaleOrderHeader
+from app.scripts import sync_sale_orders_all as sync
+from app.scripts.sync_sale_orders_all import TABLAS, ResultadoTabla, aplicar_registros, main_async
+
+HEADER = TABLAS[0]
+DETAIL = TABLAS[1]
+
+
+def _header(soh_id: int, **extra) -> dict:
+    return {
+        "comp_id": 1,
+        "bra_id": 1,
+        "soh_id": soh_id,
+        "soh_cd": "2026-10-16T10:00:00",
+        "cust_id": 500 + soh_id,
+        "soh_total": 1250.5,
+        "soh_observation1": f"pedido {soh_id}",
+        **extra,
+    }
+
+
+def _detail(soh_id: int, sod_id: int, **extra) -> dict:
+    return {"comp_id": 1, "bra_id": 1, "soh_id": soh_id, "sod_id": sod_id, "item_id": 10, "sod_qty": 2, **extra}
+
+
+class TestAplicarRegistros:
+    def test_rerun_sin_cambios_no_escribe(self, db) -> None:
+        registros = [_header(i) for i in range(1, 6)]
+
+        primero = aplicar_registros(db, HEADER, registros)
+        segundo = aplicar_registros(db, HEADER, registros)
+
+        assert (primero.descargadas, primero.cambiadas, primero.escritas) == (5, 5, 5)
+        assert (segundo.descargadas, segundo.cambiadas, segundo.escritas) == (5, 0, 0)
+        assert db.query(SaleOrderHeader).count() == 5
+        assert all(h.sync_hash for h in db.query(SaleOrderHeader))
+
+    def test_solo_se_reescribe_lo_que_cambio(self, db) -> None:
+        aplicar_registros(db, HEADER, [_header(1), _header(2)])
+        db.query(SaleOrderHeader).filter_by(soh_id=2).update({"override_notes": "entregar por la tarde"})
+        db.commit()
+
+        resultado = aplicar_registros(db, HEADER, [_header(1), _header(2, soh_total=999)])
+
+        assert (resultado.cambiadas, resultado.escritas) == (1, 1)
+        fila = db.query(SaleOrderHeader).filter_by(soh_id=2).one()
+        db.refresh(fila)
+        assert fila.soh_total == Decimal("999")
+        assert fila.override_notes == "entregar por la tarde"
+
+    def test_sin_clave_se_descarta_y_duplicados_se_colapsan(self, db) -> None:
+        registros = [_detail(1, 1), _detail(1, 2), _detail(1, 2, sod_qty=5), _detail(1, None)]
+
+        resultado = aplicar_registros(db, DETAIL, registros)
+
+        assert (resultado.descargadas, resultado.descartadas, resultado.escritas) == (4, 1, 2)
+        assert db.query(SaleOrderDetail).filter_by(soh_id=1, sod_id=2).one().sod_qty == Decimal("5")
+
+    def test_forzar_ignora_huellas(self, db) -> None:
+        aplicar_registros(db, HEADER, [_header(1)])
+
+        resultado = aplicar_registros(db, HEADER, [_header(1)], forzar=True)
+
+        assert resultado.cambiadas == 1
+
+
+class TestMainAsync:
+    def test_una_tabla_falla_y_las_demas_corren(self) -> None:
+        aplicadas = []
+
+        async def descargar(tabla, days):
+            if tabla is DETAIL:
+                raise RuntimeError("gbp-parser caído")
+            return [{"soh_id": 1}]
+
+        def aplicar(tabla, registros, forzar):
+            aplicadas.append(tabla.nombre)
+            return ResultadoTabla(tabla=tabla.nombre, descargadas=len(registros))
+
+        with (
+            patch.object(sync, "descargar", descargar),
+            patch.object(sync, "_aplicar_en_sesion", aplicar),
+            pytest.raises(RuntimeError, match="Sale Order Detail"),
+        ):
+            asyncio.run(main_async(days=1))
+
+        assert sorted(aplicadas) == sorted(t.nombre for t in TABLAS if t is not DETAIL)
@@ -0,0 +1,184 @@
+"""
+Unit tests for the DAG sync scheduler (app.services.sync_scheduler).
+
+Tests cover:
+  - independent branches overlap; the critical path is reported
+  - a job starts only after all of its dependencies finished
+  - never more than `max_paralelo` jobs at once
+  - a failed job is recorded and its dependents still run
+  - duplicated names, unknown dependencies and cycles are rejected
+  - sync and `bloqueante` jobs run in threads with their own Session
+  - one sync_job_runs row per job, sharing the corrida_id
+  - the sync_all_incremental DAG is valid
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.sync_job_run import SyncJobRun
+from app.services.sync_scheduler import (
+    ESTADO_ERROR,
+    ESTADO_OK,
+    SyncJob,
+    camino_critico,
+    contar_filas,
+    ejecutar_dag,
+    validar_dag,
+)
+
+
+@pytest.fixture()
+def sesiones(db):
+    """Fábrica de sesiones sobre la conexión del test (rollback al final)."""
+    return sessionmaker(bind=db.get_bind())
+
+
+def _dormir(segundos: float, log: list | None = None, nombre: str = "", filas: int = 0):
+    async def _job(db):
+        if log is not None:
+            log.append(("inicio", nombre))
+        await asyncio.sleep(segundos)
+        if log is not None:
+            log.append(("fin", nombre))
+        return (filas, 0)
+
+    return _job
+
+
+def _correr(jobs, sesiones, **kwargs):
+    return asyncio.run(ejecutar_dag(jobs, session_factory=sesiones, **kwargs))
+
+
+class TestEjecucion:
+    def test_ramas_en_paralelo(self, sesiones) -> None:
+        jobs = [
+            SyncJob("a", _dormir(0.2)),
+            SyncJob("b", _dormir(0.2), depende_de=("a",)),
+            SyncJob("c", _dormir(0.2)),
+            SyncJob("d", _dormir(0.2)),
+            SyncJob("e", _dormir(0.2)),
+        ]
+        corrida = _correr(jobs, sesiones, max_paralelo=4)
+        inicios = {n: r.inicio for n, r in corrida.jobs.items()}
+
+        # c, d y e arrancan junto con a; b espera sólo a a
+        assert max(inicios["c"], inicios["d"], inicios["e"]) < 0.1
+        assert inicios["b"] >= corrida.jobs["a"].fin
+        assert corrida.camino_critico == ["a", "b"]
+        assert corrida.duracion_camino_critico_s == pytest.approx(0.4, abs=0.15)
+
+    def test_respeta_dependencias(self, sesiones) -> None:
+        log: list = []
+        jobs = [
+            SyncJob("hijo", _dormir(0.01, log, "hijo"), depende_de=("padre", "otro")),
+            SyncJob("padre", _dormir(0.05, log, "padre")),
+            SyncJob("otro", _dormir(0.02, log, "otro")),
+        ]
+        _correr(jobs, sesiones)
+        assert log.index(("inicio", "hijo")) > log.index(("fin", "padre"))
+        assert log.index(("inicio", "hijo")) > log.index(("fin", "otro"))
+
+    def test_max_paralelo(self, sesiones) -> None:
+        activos = {"ahora": 0, "max": 0}
+
+        async def _job(db):
+            activos["ahora"] += 1
+            activos["max"] = max(activos["max"], activos["ahora"])
+            await asyncio.sleep(0.02)
+            activos["ahora"] -= 1
+
+        _correr([SyncJob(f"j{i}", _job) for i in range(8)], sesiones, max_paralelo=3)
+        assert activos["max"] == 3
+
+    def test_fallo_registrado_y_dependientes_corren(self, db, sesiones) -> None:
+        async def _falla(db):
+            raise RuntimeError("ERP caído")
+
+        jobs = [
+            SyncJob("falla", _falla),
+            SyncJob("despues", _dormir(0, filas=7), depende_de=("falla",)),
+        ]
+        corrida = _correr(jobs, sesiones)
+
+        assert corrida.jobs["falla"].estado == ESTADO_ERROR
+        assert corrida.jobs["despues"].estado == ESTADO_OK
+        assert [r.nombre for r in corrida.errores] == ["falla"]
+
+        filas = db.query(SyncJobRun).filter(SyncJobRun.corrida_id == corrida.corrida_id).order_by(SyncJobRun.id).all()
+        assert [(f.job, f.estado, f.filas, f.error) for f in filas] == [
+            ("falla", ESTADO_ERROR, None, "ERP caído"),
+            ("despues", ESTADO_OK, 7, None),
+        ]
+        assert all(f.duracion_s >= 0 and f.fin >= f.inicio for f in filas)
+
+    def test_jobs_bloqueantes_en_thread(self, sesiones) -> None:
+        principal = threading.get_ident()
+        hilos = {}
+
+        def _sync(db, valor):
+            hilos["sync"] = threading.get_ident()
+            assert db is not None
+            return valor
+
+        async def _bloqueante(db):
+            hilos["bloqueante"] = threading.get_ident()
+            time.sleep(0.01)
+            return 3
+
+        async def _sin_db():
+            hilos["async"] = threading.get_ident()
+
+        corrida = _correr(
+            [
+                SyncJob("sync", _sync, kwargs={"valor": 5}),
+                SyncJob("bloqueante", _bloqueante, bloqueante=True),
+                SyncJob("sin_db", _sin_db, usa_db=False),
+            ],
+            sesiones,
+        )
+        assert hilos["sync"] != principal and hilos["bloqueante"] != principal
+        assert hilos["async"] == principal
+        assert (corrida.jobs["sync"].filas, corrida.jobs["bloqueante"].filas) == (5, 3)
+
+
+class TestDag:
+    @pytest.mark.parametrize(
+        "jobs, mensaje",
+        [
+            ([SyncJob("a", _dormir(0)), SyncJob("a", _dormir(0))], "duplicado"),
+            ([SyncJob("a", _dormir(0), depende_de=("x",))], "inexistentes"),
+            ([SyncJob("a", _dormir(0), depende_de=("b",)), SyncJob("b", _dormir(0), depende_de=("a",))], "Ciclo"),
+        ],
+    )
+    def test_dag_invalido(self, jobs, mensaje) -> None:
+        with pytest.raises(ValueError, match=mensaje):
+            validar_dag(jobs)
+
+    def test_camino_critico(self) -> None:
+        jobs = [
+            SyncJob("a", _dormir(0)),
+            SyncJob("b", _dormir(0), depende_de=("a",)),
+            SyncJob("c", _dormir(0)),
+            SyncJob("d", _dormir(0), depende_de=("b", "c")),
+        ]
+        assert camino_critico(jobs, {"a": 1, "b": 1, "c": 5, "d": 1}) == (["c", "d"], 6)
+
+    def test_contar_filas(self) -> None:
+        assert contar_filas((10, 2, 3)) == 12
+        assert contar_filas(4) == 4
+        assert contar_filas({"insertados": 1, "actualizados": 2, "errores": 9}) == 3
+        assert contar_filas(None) is None
+        assert contar_filas(True) is None
+
+    def test_dag_sync_all_incremental(self) -> None:
+        from app.scripts.sync_all_incremental import SYNC_JOBS
+
+        orden = validar_dag(SYNC_JOBS)
+        assert orden.index("Item Transactions") > orden.index("Commercial Transactions")
+        assert orden.index("ML Orders Shipping") > orden.index("ML Orders Detail")
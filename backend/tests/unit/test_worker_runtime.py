@@ -0,0 +1,283 @@
+"""
+Unit tests for the background worker runtime (app.core.worker_runtime) and
+GET /api/worker/status.
+
+Tests cover:
+  - leader lease: exclusive acquire, renew/release only by the holder
+  - tasks run on their own thread, off the runtime loop
+  - a run past its timeout is cancelled; a stuck run makes the next tick skip
+  - two runtimes on the same Redis: only the leader runs tasks; the standby
+    takes over when the leader stops
+  - without Redis: local flock lease, and the API lifespan still starts the
+    embedded runtime (on the flock) when the Redis ping fails
+  - the status hash (last run, duration, counters) and the lag reported by
+    the endpoint
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app.core import worker_runtime
+from app.core.config import settings
+from app.core.worker_runtime import (
+    STATUS_KEY,
+    LeaderLease,
+    LocalLease,
+    ScheduledTask,
+    WorkerRuntime,
+    _StatusWriter,
+    _TaskRunner,
+)
+
+
+@pytest.fixture()
+def server():
+    return fakeredis.FakeServer()
+
+
+def _async_client(server):
+    return fakeredis.FakeAsyncRedis(server=server)
+
+
+class TestLeaderLease:
+    def test_exclusivo_y_solo_el_titular_renueva(self, server) -> None:
+        async def escenario():
+            client = _async_client(server)
+            a, b = LeaderLease(client, 5), LeaderLease(client, 5)
+
+            assert await a.acquire() is True
+            assert await b.acquire() is False
+            assert await b.renew() is False
+            assert await b.release() is False
+            assert await a.renew() is True
+
+            assert await a.release() is True
+            assert await a.renew() is False
+            assert await b.acquire() is True
+
+        asyncio.run(escenario())
+
+    def test_lease_vencido_no_se_renueva(self, server) -> None:
+        async def escenario():
+            client = _async_client(server)
+            lease = LeaderLease(client, 5)
+            await lease.acquire()
+            await client.delete(lease.key)  # expiró
+            await client.set(lease.key, "otro-host:1:abc")
+
+            assert await lease.renew() is False
+            assert (await client.get(lease.key)) == b"otro-host:1:abc"
+
+        asyncio.run(escenario())
+
+
+class TestTaskRunner:
+    def _runner(self, server, task: ScheduledTask) -> _TaskRunner:
+        return _TaskRunner(task, _StatusWriter(_async_client(server)))
+
+    def test_corre_en_su_propio_thread(self, server) -> None:
+        hilos = []
+
+        async def ciclo():
+            hilos.append(threading.current_thread().name)
+
+        async def escenario():
+            runner = self._runner(server, ScheduledTask("demo", ciclo, 1))
+            try:
+                assert await runner.run_once(time.time()) == "ok"
+            finally:
+                runner.close()
+            return threading.current_thread().name
+
+        principal = asyncio.run(escenario())
+
+        assert hilos == ["worker-demo"]
+        assert hilos[0] != principal
+
+    def test_timeout_cancela_y_bloqueado_saltea(self, server) -> None:
+        liberar = threading.Event()
+
+        async def bloqueante():
+            liberar.wait(5)  # ORM sincrónico: no cede el loop
+
+        async def escenario():
+            runner = self._runner(server, ScheduledTask("lento", bloqueante, 1, timeout=0.05))
+            try:
+                primero = await runner.run_once(time.time())
+                segundo = await runner.run_once(time.time())
+                liberar.set()
+                for _ in range(100):
+                    if not runner._busy.is_set():
+                        break
+                    await asyncio.sleep(0.01)
+                tercero = await runner.run_once(time.time())
+            finally:
+                liberar.set()
+                runner.close()
+            return primero, segundo, tercero, runner.state
+
+        resultados = asyncio.run(escenario())
+
+        assert resultados[:3] == ("timeout", "skipped_overlap", "ok")
+        assert resultados[3]["timeouts"] == 1 and resultados[3]["skipped"] == 1
+
+    def test_error_se_registra(self, server) -> None:
+        async def falla():
+            raise RuntimeError("ERP caído")
+
+        async def escenario():
+            runner = self._runner(server, ScheduledTask("falla", falla, 1))
+            try:
+                return await runner.run_once(time.time()), runner.state
+            finally:
+                runner.close()
+
+        resultado, state = asyncio.run(escenario())
+
+        assert resultado == "error"
+        assert state["failures"] == 1
+        assert state["last_error"] == "RuntimeError: ERP caído"
+
+
+class TestWorkerRuntime:
+    def test_solo_el_lider_corre_y_el_standby_toma_el_relevo(self, server) -> None:
+        corridas: list[str] = []
+
+        def tarea(nombre):
+            async def ciclo():
+                corridas.append(nombre)
+
+            return [ScheduledTask("tick", ciclo, 0.02, jitter=0)]
+
+        async def escenario():
+            lider = WorkerRuntime(tarea("a"), _async_client(server), lease_ttl_seconds=0.15)
+            standby = WorkerRuntime(tarea("b"), _async_client(server), lease_ttl_seconds=0.15)
+            stop_lider, stop_standby = asyncio.Event(), asyncio.Event()
+
+            t_lider = asyncio.create_task(lider.run(stop_lider))
+            await asyncio.sleep(0.02)
+            t_standby = asyncio.create_task(standby.run(stop_standby))
+            await asyncio.sleep(0.3)
+            assert lider.is_leader and not standby.is_leader
+
+            stop_lider.set()
+            await t_lider
+            hasta = len(corridas)
+            await asyncio.sleep(0.3)
+            assert standby.is_leader
+
+            stop_standby.set()
+            await t_standby
+            return hasta
+
+        hasta = asyncio.run(escenario())
+
+        assert set(corridas[:hasta]) == {"a"}
+        assert "b" in corridas[hasta:]
+
+        estado = json.loads(fakeredis.FakeStrictRedis(server=server).hget(STATUS_KEY, "tick"))
+        assert estado["runs"] >= 1
+        assert estado["last_result"] == "ok"
+        assert estado["interval_s"] == 0.02
+
+
+class TestSinRedis:
+    def test_local_lease_exclusivo(self, tmp_path) -> None:
+        async def escenario():
+            ruta = str(tmp_path / "bg.lock")
+            a, b = LocalLease(ruta), LocalLease(ruta)
+
+            assert await a.acquire() is True
+            assert await b.acquire() is False
+            assert await a.renew() is True and await b.renew() is False
+
+            assert await a.release() is True
+            assert await b.acquire() is True
+            await b.release()
+
+        asyncio.run(escenario())
+
+    def test_runtime_corre_con_flock(self, tmp_path) -> None:
+        corridas: list[str] = []
+
+        async def ciclo():
+            corridas.append("tick")
+
+        async def escenario():
+            ruta = str(tmp_path / "bg.lock")
+            lider = WorkerRuntime([ScheduledTask("tick", ciclo, 0.02, jitter=0)], None, 0.15, local_lock_path=ruta)
+            standby = WorkerRuntime([], None, 0.15, local_lock_path=ruta)
+            stop = asyncio.Event()
+            tareas = [asyncio.create_task(lider.run(stop))]
+            await asyncio.sleep(0.02)
+            tareas.append(asyncio.create_task(standby.run(stop)))
+            await asyncio.sleep(0.2)
+            assert lider.is_leader and not standby.is_leader
+            stop.set()
+            await asyncio.gather(*tareas)
+
+        asyncio.run(escenario())
+
+        assert corridas
+
+    def test_lifespan_sin_redis_arranca_el_runtime(self, monkeypatch) -> None:
+        from app.main import app
+
+        clientes = []
+
+        class RuntimeFalso:
+            def __init__(self, tasks, client) -> None:
+                clientes.append(client)
+
+            async def run(self) -> None:
+                pass
+
+        monkeypatch.setattr(settings, "WORKER_EMBEDDED", True)
+        monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+        monkeypatch.setattr(worker_runtime, "WorkerRuntime", RuntimeFalso)
+        monkeypatch.setattr("app.worker.build_tasks", lambda: [])
+
+        with TestClient(app):
+            pass
+
+        assert clientes == [None]
+
+
+class TestStatusEndpoint:
+    def test_estado_con_lag(self, client, admin_auth_headers, auth_headers, server) -> None:
+        sync = fakeredis.FakeStrictRedis(server=server)
+        ahora = time.time()
+        sync.set("worker:leader", "host-1:42:abcd")
+        sync.hset(
+            STATUS_KEY,
+            "sync_sale_orders",
+            json.dumps({"name": "sync_sale_orders", "state": "idle", "runs": 3, "next_run_at": ahora - 90}),
+        )
+        sync.hset(
+            STATUS_KEY,
+            "ml_questions_ingest",
+            json.dumps({"name": "ml_questions_ingest", "state": "running", "runs": 1, "next_run_at": ahora - 5}),
+        )
+        worker_runtime._set_client_for_tests(sync)
+        try:
+            resp = client.get("/api/worker/status", headers=admin_auth_headers)
+            prohibido = client.get("/api/worker/status", headers=auth_headers)
+        finally:
+            worker_runtime._set_client_for_tests(None)
+
+        assert prohibido.status_code == 403
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["leader"] == "host-1:42:abcd"
+        assert [t["name"] for t in body["tasks"]] == ["ml_questions_ingest", "sync_sale_orders"]
+        assert body["tasks"][0]["lag_s"] == 0.0
+        assert 89 <= body["tasks"][1]["lag_s"] < 100
@@ -0,0 +1,203 @@
+"""
+Unit tests for the streaming XLSX writer (app.utils.xlsx_stream) and the
+exports that use it.
+
+Tests cover:
+  - the streamed package opens in openpyxl with values, header style, widths,
+    hidden columns and dates intact
+  - the first chunk is produced before any row is consumed, and rows are
+    pulled lazily as chunks are requested
+  - several sheets in one workbook, empty sheets
+  - errors: a failing first row raises while building the response (→ 500);
+    a failure mid-stream closes the workbook with an error marker row
+  - /exportar-lista-web-transferencia end to end through the TestClient
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from app.models.producto import ProductoERP, ProductoPricing
+from app.models.tb_subcategory import TBSubCategory
+from app.utils.xlsx_stream import (
+    ENCABEZADO_AZUL,
+    MARCA_ERROR,
+    Celda,
+    Estilo,
+    Hoja,
+    columna_letra,
+    respuesta_xlsx,
+    stream_xlsx,
+)
+
+
+def _abrir(chunks) -> Workbook:
+    return load_workbook(io.BytesIO(b"".join(chunks)))
+
+
+class TestStreamXlsx:
+    def test_round_trip_openpyxl(self) -> None:
+        filas = [
+            ["A-1", 10, Decimal("2.50"), date(2026, 1, 31), True],
+            ["B <&> 2", None, 1.5, datetime(2026, 2, 1, 13, 30), False],
+            [Celda("rojo", Estilo(negrita=True, color="FF0000")), float("nan"), "  espacios ", None, "x\x01y"],
+        ]
+        hoja = Hoja(
+            titulo="Datos",
+            filas=filas,
+            encabezado=["Código", "Cant", "Precio", "Fecha", "Activo"],
+            estilo_encabezado=ENCABEZADO_AZUL,
+            anchos=[15, None, 12],
+            ocultas=[5],
+        )
+
+        ws = _abrir(stream_xlsx([hoja]))["Datos"]
+
+        assert [c.value for c in ws[1]] == ["Código", "Cant", "Precio", "Fecha", "Activo"]
+        assert ws["A1"].font.bold and ws["A1"].fill.fgColor.rgb.endswith("366092")
+        assert ws["A1"].alignment.horizontal == "center"
+        assert ws["A2"].value == "A-1" and ws["B2"].value == 10 and ws["C2"].value == 2.5
+        assert ws["D2"].value == datetime(2026, 1, 31) and ws["D2"].is_date
+        assert ws["E2"].value is True and ws["E3"].value is False
+        assert ws["A3"].value == "B <&> 2" and ws["B3"].value is None
+        assert ws["D3"].value == datetime(2026, 2, 1, 13, 30)
+        assert ws["A4"].font.bold and ws["A4"].font.color.rgb.endswith("FF0000")
+        assert ws["B4"].value is None
+        assert ws["C4"].value == "  espacios "
+        assert ws["E4"].value == "xy"
+        assert ws.column_dimensions["A"].width == 15
+        assert ws.column_dimensions["C"].width == 12
+        assert ws.column_dimensions["E"].hidden
+
+    def test_primer_chunk_antes_de_leer_filas(self) -> None:
+        consumidas = []
+
+        def filas():
+            for i in range(2000):
+                consumidas.append(i)
+                yield [i, f"fila {i}"]
+
+        chunks = stream_xlsx([Hoja(titulo="Lazy", filas=filas())], filas_por_chunk=100)
+
+        primero = next(chunks)
+        assert primero.startswith(b"PK")
+        assert consumidas == []
+
+        resto = list(chunks)
+        assert len(consumidas) == 2000
+        ws = _abrir([primero, *resto])["Lazy"]
+        assert ws.max_row == 2000
+        assert ws["B2000"].value == "fila 1999"
+
+    def test_varias_hojas_y_hoja_vacia(self) -> None:
+        wb = _abrir(
+            stream_xlsx(
+                [
+                    Hoja(titulo="Primera", filas=[[1]]),
+                    Hoja(titulo="Vacía", filas=[], encabezado=["Solo header"]),
+                    Hoja(titulo="x" * 40, filas=iter(())),
+                ]
+            )
+        )
+
+        assert wb.sheetnames == ["Primera", "Vacía", "x" * 31]
+        assert wb["Vacía"]["A1"].value == "Solo header"
+        assert wb["Vacía"].max_row == 1
+
+    def test_columna_letra(self) -> None:
+        assert [columna_letra(n) for n in (1, 26, 27, 52, 703)] == ["A", "Z", "AA", "AZ", "AAA"]
+
+
+def _filas_que_fallan(n: int):
+    yield from ([i] for i in range(n))
+    raise RuntimeError("se cayó la conexión")
+
+
+class TestErrores:
+    def test_error_en_la_query_antes_de_responder(self) -> None:
+        def filas():
+            raise RuntimeError("relation does not exist")
+            yield
+
+        with pytest.raises(RuntimeError):
+            respuesta_xlsx([Hoja(titulo="Datos", filas=filas())], "x.xlsx")
+
+    def test_primera_fila_no_se_pierde(self) -> None:
+        respuesta = respuesta_xlsx([Hoja(titulo="A", filas=iter([[1], [2]])), Hoja(titulo="B", filas=[])], "x.xlsx")
+
+        wb = _abrir(stream_xlsx(respuesta.hojas))
+        assert [c.value for c in wb["A"]["A"]] == [1, 2]
+        assert wb["B"].max_row == 1 and wb["B"]["A1"].value is None
+
+    def test_error_a_mitad_marca_el_archivo(self) -> None:
+        hojas = [
+            Hoja(titulo="Datos", filas=_filas_que_fallan(5), encabezado=["n"]),
+            Hoja(titulo="Otra", filas=[[1]]),
+        ]
+
+        wb = _abrir(stream_xlsx(hojas, filas_por_chunk=2, marcar_error=True))
+
+        ws = wb["Datos"]
+        assert [c.value for c in ws["A"]] == ["n", 0, 1, 2, 3, 4, MARCA_ERROR]
+        assert wb["Otra"]["A1"].value is None
+
+    def test_sin_marcar_error_propaga(self) -> None:
+        with pytest.raises(RuntimeError):
+            list(stream_xlsx([Hoja(titulo="Datos", filas=_filas_que_fallan(3))]))
+
+    def test_respuesta_marca_error(self) -> None:
+        respuesta = respuesta_xlsx([Hoja(titulo="Datos", filas=_filas_que_fallan(3))], "x.xlsx")
+
+        async def leer() -> bytes:
+            return b"".join([chunk async for chunk in respuesta.body_iterator])
+
+        contenido = asyncio.run(leer())
+        assert zipfile.is_zipfile(io.BytesIO(contenido))
+        assert load_workbook(io.BytesIO(contenido))["Datos"]["A4"].value == MARCA_ERROR
+
+
+class TestExportListaWebTransferencia:
+    def test_descarga_en_streaming(self, client, db, admin_auth_headers) -> None:
+        db.add(TBSubCategory(comp_id=1, cat_id=1, subcat_id=7, subcat_desc="Mouses"))
+        for item_id, marca, precio in ((1, "LOGI", "1210"), (2, "ACME", "242"), (3, "ZETA", None)):
+            db.add(
+                ProductoERP(
+                    item_id=item_id,
+                    codigo=f"C{item_id}",
+                    descripcion=f"Producto {item_id}",
+                    marca=marca,
+                    categoria="Perifericos",
+                    subcategoria_id=7,
+                    moneda_costo="ARS",
+                    costo=100,
+                    iva=21,
+                    stock=item_id,
+                )
+            )
+            db.add(
+                ProductoPricing(
+                    item_id=item_id,
+                    participa_web_transferencia=True,
+                    precio_web_transferencia=Decimal(precio) if precio else None,
+                )
+            )
+        db.flush()
+
+        resp = client.get("/api/exportar-lista-web-transferencia", headers=admin_auth_headers)
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/vnd.openxmlformats")
+        assert 'filename="lista_web_transferencia.xlsx"' in resp.headers["content-disposition"]
+        ws = load_workbook(io.BytesIO(resp.content))["Lista Web Transferencia"]
+        assert [tuple(c.value for c in fila) for fila in ws.iter_rows(min_row=2)] == [
+            ("ACME", "Perifericos", "Mouses", "C2", "Producto 2", 2, 200, 242),
+            ("LOGI", "Perifericos", "Mouses", "C1", "Producto 1", 1, 1000, 1210),
+        ]
+        assert ws["A1"].font.bold
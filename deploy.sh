@@ -85,6 +85,15 @@ fi
 if [ "$SKIP_BACKEND" = false ]; then
   log "Reiniciando backend..."
   sudo systemctl restart pricing-api 2>/dev/null || warn "No se pudo reiniciar el servicio (¿existe pricing-api.service?)"
+
+  # Worker de tareas periódicas (backend/pricing-worker.service.example).
+  # Sin él, las tareas corren dentro de la API (WORKER_EMBEDDED, default).
+  if systemctl list-unit-files pricing-worker.service --no-legend 2>/dev/null | grep -q pricing-worker; then
+    log "Reiniciando worker..."
+    sudo systemctl restart pricing-worker || warn "No se pudo reiniciar pricing-worker"
+  else
+    warn "pricing-worker.service no instalado — tareas periódicas embebidas en la API (WORKER_EMBEDDED)"
+  fi
 fi
 
 log "Deploy completado"